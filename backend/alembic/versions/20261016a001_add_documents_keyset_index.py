@@ -0,0 +1,33 @@
+"""add documents (doc_date, id) keyset pagination index
+
+Revision ID: 20261016a001
+Revises: 20260819a002
+Create Date: 2026-10-16
+
+公文列表 keyset 分頁以 (doc_date DESC, id DESC) 定位下一頁：
+    WHERE (doc_date, id) < (:d, :i) ORDER BY doc_date DESC, id DESC LIMIT n
+需要與排序完全一致的複合索引，才能直接從索引位置開始掃描，
+深頁延遲不隨頁數增加（OFFSET 需先掃過前面所有列）。
+
+Affected tables:
+  - documents (doc_date DESC, id DESC)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '20261016a001'
+down_revision: Union[str, Sequence[str], None] = '20260819a002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_documents_doc_date_id', 'documents',
+                     [sa.text('doc_date DESC NULLS LAST'), sa.text('id DESC')],
+                     postgresql_using='btree', if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_doc_date_id', table_name='documents', if_exists=True)
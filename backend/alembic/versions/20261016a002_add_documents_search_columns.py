@@ -0,0 +1,89 @@
+"""add documents search_text / search_bigrams generated columns + GIN indexes
+
+Revision ID: 20261016a002
+Revises: 20261016a001
+Create Date: 2026-10-16
+
+DocumentQueryBuilder 關鍵字搜尋原本對 subject / doc_number / sender / receiver /
+content / notes / ck_note 逐欄 ILIKE '%kw%' 再 OR，notes 無索引、且中文兩字詞
+（如「桃園」）抽不出完整 trigram，多關鍵字時一律退化為全表掃描（含大欄位 content）。
+
+新增兩個 STORED generated column（由 PG 自動維護，無需 trigger / 應用程式回填）：
+  - search_text:    lower(subject‖doc_number‖sender‖receiver‖notes‖ck_note)，
+                    gin_trgm_ops → 三字以上關鍵字單一索引掃描
+  - search_bigrams: doc_search_bigrams(search_text‖lower(content))，text[] GIN →
+                    任意長度 ≥ 2 的關鍵字以 @> 取得候選列（中文兩字詞可用）
+
+doc_search_bigrams() 排除含空白的字元對；Python 端
+(app.repositories.query_builders.document_query_builder.document_search_bigrams)
+必須排除相同或更多的字元對，否則會漏掉符合的列。
+
+注意：ADD COLUMN ... STORED 會重寫 documents 表（取得 ACCESS EXCLUSIVE 鎖），
+大表請於維護時段執行。
+
+Affected tables:
+  - documents (search_text, search_bigrams)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '20261016a002'
+down_revision: Union[str, Sequence[str], None] = '20261016a001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_SEARCH_TEXT_EXPR = (
+    "lower("
+    "coalesce(subject, '') || E'\\n' || "
+    "coalesce(doc_number, '') || E'\\n' || "
+    "coalesce(sender, '') || E'\\n' || "
+    "coalesce(receiver, '') || E'\\n' || "
+    "coalesce(notes, '') || E'\\n' || "
+    "coalesce(ck_note, '')"
+    ")"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION doc_search_bigrams(t text) RETURNS text[]
+        LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+            SELECT coalesce(array_agg(DISTINCT bg), '{}'::text[])
+            FROM (
+                SELECT substr(t, i, 2) AS bg
+                FROM generate_series(1, greatest(char_length(t) - 1, 0)) AS i
+            ) s
+            WHERE bg !~ '\s'
+        $$
+    """)
+    op.execute(f"""
+        ALTER TABLE documents
+        ADD COLUMN IF NOT EXISTS search_text text
+        GENERATED ALWAYS AS ({_SEARCH_TEXT_EXPR}) STORED
+    """)
+    op.execute(f"""
+        ALTER TABLE documents
+        ADD COLUMN IF NOT EXISTS search_bigrams text[]
+        GENERATED ALWAYS AS (
+            doc_search_bigrams({_SEARCH_TEXT_EXPR} || E'\\n' || lower(coalesce(content, '')))
+        ) STORED
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_documents_search_text_trgm
+        ON documents USING gin(search_text gin_trgm_ops)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_documents_search_bigrams
+        ON documents USING gin(search_bigrams)
+    """)
+    op.execute("ANALYZE documents")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_documents_search_bigrams")
+    op.execute("DROP INDEX IF EXISTS idx_documents_search_text_trgm")
+    op.execute("ALTER TABLE documents DROP COLUMN IF EXISTS search_bigrams")
+    op.execute("ALTER TABLE documents DROP COLUMN IF EXISTS search_text")
+    op.execute("DROP FUNCTION IF EXISTS doc_search_bigrams(text)")
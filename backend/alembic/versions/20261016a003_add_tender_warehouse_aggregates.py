@@ -0,0 +1,113 @@
+"""add tender warehouse aggregates + unique company links
+
+Revision ID: 20261016a003
+Revises: 20261016a002
+Create Date: 2026-10-16
+
+標案本地倉儲（app.services.tender.warehouse）：
+
+1. tender_company_links 去重後加唯一索引 uq_tender_company_link
+   (tender_record_id, company_name, role) —— upsert 的 ON CONFLICT 目標；
+   role 為 NULL 的舊列先補為 'bidder'（欄位預設值），否則唯一索引擋不住重複
+2. 機關彙總表（PG materialized view 只能整份 REFRESH，改以一般表 +
+   warehouse.refresh_org_aggregates 依受影響機關增量重算）：
+   - tender_org_vendor_stats: 機關×廠商 參與 / 得標次數、得標金額
+   - tender_org_year_stats:   機關×年度×類別 標案數 / 已決標數
+   建表後以既有資料整份回填一次
+3. tender_records.unit_name trigram GIN 索引（機關名稱 ILIKE 查詢）
+
+Affected tables:
+  - tender_company_links (dedupe, uq_tender_company_link)
+  - tender_org_vendor_stats (new)
+  - tender_org_year_stats (new)
+  - tender_records (ix_tender_record_unit_name_trgm)
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '20261016a003'
+down_revision: Union[str, Sequence[str], None] = '20261016a002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE tender_company_links SET role = 'bidder' WHERE role IS NULL")
+    op.execute("""
+        DELETE FROM tender_company_links a
+        USING tender_company_links b
+        WHERE a.id > b.id
+          AND a.tender_record_id = b.tender_record_id
+          AND a.company_name = b.company_name
+          AND a.role = b.role
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_tender_company_link
+        ON tender_company_links (tender_record_id, company_name, role)
+    """)
+
+    op.create_table(
+        'tender_org_vendor_stats',
+        sa.Column('unit_name', sa.String(200), primary_key=True, comment='招標機關'),
+        sa.Column('company_name', sa.String(200), primary_key=True, comment='廠商名稱'),
+        sa.Column('appear_count', sa.Integer(), nullable=False, server_default='0', comment='參與標案數（投標+得標）'),
+        sa.Column('win_count', sa.Integer(), nullable=False, server_default='0', comment='得標標案數'),
+        sa.Column('award_amount', sa.Numeric(18, 2), nullable=True, comment='得標金額合計'),
+        sa.Column('last_announce_date', sa.Date(), nullable=True, comment='最近參與標案公告日'),
+    )
+    op.create_index('ix_tender_org_vendor_company', 'tender_org_vendor_stats', ['company_name'])
+
+    op.create_table(
+        'tender_org_year_stats',
+        sa.Column('unit_name', sa.String(200), primary_key=True, comment='招標機關'),
+        sa.Column('year', sa.Integer(), primary_key=True, comment='公告年度'),
+        sa.Column('category', sa.String(50), primary_key=True, comment='採購類別（空字串=未分類）'),
+        sa.Column('tender_count', sa.Integer(), nullable=False, server_default='0', comment='標案數'),
+        sa.Column('awarded_count', sa.Integer(), nullable=False, server_default='0',
+                  comment='已有得標廠商或決標金額的標案數'),
+    )
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_tender_record_unit_name_trgm
+        ON tender_records USING gin (unit_name gin_trgm_ops)
+    """)
+
+    # 整份回填（與 warehouse.refresh_org_aggregates(db, orgs=None) 相同）
+    op.execute("""
+        INSERT INTO tender_org_vendor_stats
+            (unit_name, company_name, appear_count, win_count, award_amount, last_announce_date)
+        SELECT tr.unit_name, tcl.company_name,
+               COUNT(DISTINCT tr.id),
+               COUNT(DISTINCT tr.id) FILTER (WHERE tcl.role = 'winner'),
+               SUM(COALESCE(tcl.amount, tr.award_amount)) FILTER (WHERE tcl.role = 'winner'),
+               MAX(tr.announce_date)
+        FROM tender_records tr
+        JOIN tender_company_links tcl ON tcl.tender_record_id = tr.id
+        WHERE tr.unit_name IS NOT NULL AND tr.unit_name <> ''
+        GROUP BY tr.unit_name, tcl.company_name
+    """)
+    op.execute("""
+        INSERT INTO tender_org_year_stats (unit_name, year, category, tender_count, awarded_count)
+        SELECT tr.unit_name,
+               COALESCE(EXTRACT(YEAR FROM tr.announce_date)::int, 0),
+               COALESCE(tr.category, ''),
+               COUNT(*),
+               COUNT(*) FILTER (WHERE tr.award_amount IS NOT NULL OR EXISTS (
+                   SELECT 1 FROM tender_company_links w
+                   WHERE w.tender_record_id = tr.id AND w.role = 'winner'
+               ))
+        FROM tender_records tr
+        WHERE tr.unit_name IS NOT NULL AND tr.unit_name <> ''
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_tender_record_unit_name_trgm")
+    op.drop_table('tender_org_year_stats')
+    op.drop_index('ix_tender_org_vendor_company', table_name='tender_org_vendor_stats')
+    op.drop_table('tender_org_vendor_stats')
+    op.execute("DROP INDEX IF EXISTS uq_tender_company_link")
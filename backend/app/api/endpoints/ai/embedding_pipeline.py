@@ -3,7 +3,10 @@ Embedding 批次管線 API 端點
 
 提供 embedding 覆蓋率統計和批次觸發功能。
 
-Version: 1.0.0
+v1.1.0: 公文 / 實體管線改經 EmbeddingManager.get_embeddings_batch（微批次分派器），
+        整批失敗的逐筆回退由 AIConnector.generate_embeddings_batch 負責
+
+Version: 1.1.0
 Created: 2026-02-24
 """
 
@@ -106,9 +109,9 @@ async def _run_batch_pipeline(limit: int, batch_size: int):
     """
     背景執行的批次 embedding 管線
 
-    使用 Ollama /api/embed 的陣列模式，每次送出 batch_size 筆文字
-    一次取得所有 embedding，大幅減少 HTTP 往返次數。
-    若整批失敗，自動回退為逐筆處理該批次。
+    每次取 batch_size 筆文字經 EmbeddingManager（微批次分派器）合併為
+    Ollama /api/embed 陣列請求，大幅減少 HTTP 往返次數；
+    整批失敗時由 connector 逐筆重試，個別失敗者計入失敗數。
     """
     from app.core.ai_connector import get_ai_connector
     from app.db.database import AsyncSessionLocal
@@ -152,37 +155,13 @@ async def _run_batch_pipeline(limit: int, batch_size: int):
                 if not texts:
                     continue
 
-                # 嘗試批次 embedding
-                embeddings = await connector.generate_embeddings_batch(texts)
-
-                # 檢查是否整批失敗（全部為 None）
-                all_failed = all(e is None for e in embeddings)
-
-                if all_failed and len(texts) > 0:
-                    # 回退：逐筆處理本批次
-                    logger.warning(
-                        "批次 embedding 全部失敗，回退逐筆處理 (batch %s~%s)",
-                        batch_start, batch_start + len(batch_docs),
-                    )
-                    for doc, text in zip(valid_docs, texts):
-                        try:
-                            emb = await connector.generate_embedding(text)
-                            if emb is None:
-                                error_count += 1
-                                continue
-                            doc.embedding = emb
-                            success_count += 1
-                        except Exception as e:
-                            logger.error("公文 #%s embedding 失敗: %s", doc.id, e)
-                            error_count += 1
-                else:
-                    # 正常批次結果
-                    for doc, emb in zip(valid_docs, embeddings):
-                        if emb is not None:
-                            doc.embedding = emb
-                            success_count += 1
-                        else:
-                            error_count += 1
+                embeddings = await EmbeddingManager.get_embeddings_batch(texts, connector)
+                for doc, emb in zip(valid_docs, embeddings, strict=True):
+                    if emb is not None:
+                        doc.embedding = emb
+                        success_count += 1
+                    else:
+                        error_count += 1
 
                 # 每批 commit 一次
                 await db.commit()
@@ -270,28 +249,13 @@ async def _run_entity_embedding_pipeline(limit: int, batch_size: int):
                 batch = entities[batch_start:batch_start + batch_size]
                 texts = [e.canonical_name for e in batch]
 
-                embeddings = await connector.generate_embeddings_batch(texts)
-
-                all_failed = all(emb is None for emb in embeddings)
-                if all_failed and texts:
-                    for entity, text in zip(batch, texts):
-                        try:
-                            emb = await connector.generate_embedding(text)
-                            if emb is not None:
-                                entity.embedding = emb
-                                success_count += 1
-                            else:
-                                error_count += 1
-                        except Exception as e:
-                            logger.error("Entity #%s embedding 失敗: %s", entity.id, e)
-                            error_count += 1
-                else:
-                    for entity, emb in zip(batch, embeddings):
-                        if emb is not None:
-                            entity.embedding = emb
-                            success_count += 1
-                        else:
-                            error_count += 1
+                embeddings = await EmbeddingManager.get_embeddings_batch(texts, connector)
+                for entity, emb in zip(batch, embeddings, strict=True):
+                    if emb is not None:
+                        entity.embedding = emb
+                        success_count += 1
+                    else:
+                        error_count += 1
 
                 await db.commit()
 
@@ -50,6 +50,8 @@ PROPOSALS_DIR = WIKI_MEMORY / "proposals"
 CRYSTALS_DIR = WIKI_MEMORY / "crystals"
 EVOLUTIONS_DIR = WIKI_MEMORY / "evolutions"
 
+from app.services.memory.memory_catalog import get_memory_catalog
+
 
 # ────────── Schemas ──────────
 
@@ -257,6 +259,7 @@ async def memory_proposals_reject(req: RejectReq, _admin=Depends(require_admin()
             text, count=1, flags=re.DOTALL,
         )
         path.write_text(text, encoding="utf-8")
+        get_memory_catalog(PROPOSALS_DIR).record_write(path, text)
         return {"success": True, "data": {"proposal_id": req.proposal_id, "status": "rejected"}}
     except Exception as e:
         logger.error("Reject proposal failed: %s", e)
@@ -424,14 +427,9 @@ async def memory_stats():
     def _count_pending_proposals() -> int:
         if not PROPOSALS_DIR.exists():
             return 0
-        cnt = 0
-        for p in PROPOSALS_DIR.glob("*.md"):
-            try:
-                if "status: pending" in p.read_text(encoding="utf-8"):
-                    cnt += 1
-            except Exception:
-                pass
-        return cnt
+        catalog = get_memory_catalog(PROPOSALS_DIR)
+        catalog.reconcile()
+        return catalog.count(status="pending")
 
     data = {
         "diary_days": _count_files(DIARY_DIR),
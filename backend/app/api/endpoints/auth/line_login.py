@@ -379,7 +379,10 @@ async def unbind_line_account(
         )
 
     # 安全檢查：純 LINE 帳號且無其他登入方式
-    has_password = bool(current_user.password_hash)
+    # password_hash 不在主體快取內，讀取 DB 當前值
+    has_password = bool(await db.scalar(
+        select(User.password_hash).where(User.id == current_user.id)
+    ))
     has_google = bool(current_user.google_id)
     if not has_password and not has_google:
         raise HTTPException(
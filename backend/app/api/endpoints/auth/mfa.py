@@ -155,21 +155,23 @@ async def mfa_disable(
             detail="MFA 尚未啟用",
         )
 
-    # 驗證密碼
-    if not current_user.password_hash:
+    # 驗證密碼（password_hash 不在主體快取內，讀取 DB 當前值）
+    user_repo = UserRepository(db)
+    stored_user = await user_repo.get_by_id(current_user.id)
+    password_hash = stored_user.password_hash if stored_user else None
+    if not password_hash:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="此帳號未設定密碼，無法透過密碼驗證停用 MFA。請聯繫管理員。",
         )
 
-    if not AuthService.verify_password(request_data.password, current_user.password_hash):
+    if not AuthService.verify_password(request_data.password, password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="密碼不正確",
         )
 
     # 停用 MFA 並清除相關欄位
-    user_repo = UserRepository(db)
     await user_repo.update_fields(
         current_user.id,
         mfa_enabled=False,
@@ -24,6 +24,7 @@ from app.db.database import get_async_db
 from app.core.auth_service import AuthService, ALGORITHM
 from app.core.config import settings
 from app.core.mfa_service import MFA_TOKEN_EXPIRE_SECONDS
+from app.core.principal_cache import get_principal_cache
 from app.schemas.auth import (
     UserRegister,
     GoogleAuthRequest,
@@ -159,6 +160,7 @@ async def google_oauth_login(
             user.last_login = datetime.utcnow()
             await db.commit()
             await db.refresh(user)
+            await get_principal_cache().invalidate_user(user.id)
             logger.info(f"[AUTH] 現有使用者登入: {user.email} (ID: {user.id})")
         else:
             existing_user = await AuthService.get_user_by_email(db, google_info.email)
@@ -171,6 +173,7 @@ async def google_oauth_login(
                 existing_user.last_login = datetime.utcnow()
                 await db.commit()
                 await db.refresh(existing_user)
+                await get_principal_cache().invalidate_user(existing_user.id)
                 user = existing_user
                 logger.info(f"[AUTH] 現有帳號綁定 Google: {user.email}")
             else:
@@ -185,6 +188,7 @@ async def google_oauth_login(
 
                 await db.commit()
                 await db.refresh(user)
+                await get_principal_cache().invalidate_user(user.id)
                 logger.info(
                     f"[AUTH] 新使用者建立: {user.email} "
                     f"(is_active={user.is_active}, role={user.role})"
@@ -21,6 +21,7 @@ from app.db.database import get_async_db
 from app.core.auth_service import AuthService, security
 from app.core.config import settings
 from app.core.password_policy import validate_password
+from app.core.principal_cache import get_principal_cache
 from app.schemas.auth import UserProfile, ProfileUpdate, PasswordChange
 from app.extended.models import User
 from app.repositories.user_repository import UserRepository
@@ -166,6 +167,7 @@ async def update_profile(
 
         await user_repo.db.commit()
         await user_repo.db.refresh(user)
+        await get_principal_cache().invalidate_user(user.id)
 
         logger.info(f"[AUTH] 個人資料更新成功: user_id={user.id}")
         return UserProfile.model_validate(user)
@@ -239,6 +241,7 @@ async def change_password(
 
         user.password_hash = AuthService.get_password_hash(password_data.new_password)
         await user_repo.db.commit()
+        await get_principal_cache().invalidate_user(user.id)
 
         logger.info(f"[AUTH] 密碼修改成功: user_id={user.id}")
         return {"message": "密碼修改成功"}
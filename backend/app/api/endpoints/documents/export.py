@@ -14,6 +14,7 @@ from fastapi.responses import StreamingResponse
 
 from app.core.rate_limiter import limiter
 from app.core.dependencies import require_auth
+from app.services.taoyuan.export_engine import iter_spooled_file
 from .common import (
     logger, Depends, User,
     DocumentExportQuery, ExcelExportRequest,
@@ -94,7 +95,7 @@ async def export_documents_excel(
     - R 開頭: 收文 (Receive)
     """
     try:
-        excel_bytes = await service.export_to_excel(
+        excel_path = await service.export_to_excel(
             document_ids=body.document_ids,
             category=body.category,
             year=body.year,
@@ -111,7 +112,7 @@ async def export_documents_excel(
         filename_encoded = quote(filename_cn)
 
         return StreamingResponse(
-            iter([excel_bytes]),
+            iter_spooled_file(excel_path),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
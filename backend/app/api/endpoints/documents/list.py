@@ -1,15 +1,18 @@
 """
 公文列表與搜尋 API 端點
 
-包含：列表查詢、優化搜尋、搜尋建議、專案關聯公文查詢
+包含：列表查詢（OFFSET / keyset 分頁、NDJSON 串流）、優化搜尋、搜尋建議、專案關聯公文查詢
 
-@version 3.1.0
-@date 2026-02-04
+@version 3.2.0
+@date 2026-10-16
 """
-from fastapi import APIRouter, Query, Body, Request
-from starlette.responses import Response
+import json
+
+from fastapi import APIRouter, Query, Body, HTTPException, Request
+from starlette.responses import Response, StreamingResponse
 from sqlalchemy import select
 from app.core.rate_limiter import limiter
+from app.db.database import AsyncSessionLocal
 
 from .common import (
     logger, Depends, AsyncSession, get_async_db,
@@ -30,6 +33,96 @@ from .common import (
 # 唯獨 by-project 與 integrated-search 兩條漏掉。
 router = APIRouter(dependencies=[Depends(require_auth())])
 
+# NDJSON 串流每批讀取筆數
+STREAM_BATCH_SIZE = 500
+
+
+def _build_filter(query: DocumentListQuery) -> DocumentFilter:
+    """DocumentListQuery → DocumentFilter"""
+    # 構建篩選條件
+    filters = DocumentFilter(
+        keyword=query.keyword,
+        doc_number=query.doc_number,  # 公文字號專用篩選
+        doc_type=query.doc_type,
+        year=query.year,
+        status=query.status,
+        sender=query.sender,
+        receiver=query.receiver,
+        date_from=query.doc_date_from,
+        date_to=query.doc_date_to,
+        delivery_method=query.delivery_method,
+        contract_case=query.contract_case,  # 直接設定，不用 setattr
+        sort_by=query.sort_by,
+        sort_order=query.sort_order.value if query.sort_order else "desc"
+    )
+
+    # 加入收發文分類篩選 (前端用 send/receive，資料庫用 發文/收文)
+    if query.category:
+        category_mapping = {'send': '發文', 'receive': '收文'}
+        db_category = category_mapping.get(query.category, query.category)
+        setattr(filters, 'category', db_category)
+    return filters
+
+
+async def _to_document_responses(db: AsyncSession, items: list) -> list:
+    """ORM 公文 → DocumentResponse（承辦同仁、附件數以 2 個批次查詢補齊）"""
+    # selectinload 已預載 contract_project / sender_agency / receiver_agency
+    # 只需 2 個額外批次查詢: staff + attachment_count
+    from app.repositories.document_repository import DocumentRepository
+    from app.repositories.project_repository import ProjectRepository
+
+    doc_repo = DocumentRepository(db)
+    proj_repo = ProjectRepository(db)
+
+    project_ids = list(set(doc.contract_project_id for doc in items if doc.contract_project_id))
+    doc_ids = [doc.id for doc in items]
+
+    try:
+        staff_data = await proj_repo.get_staff_by_project_ids(project_ids)
+        attachment_count_map = await doc_repo.get_attachment_counts_batch(doc_ids)
+    except Exception as e:
+        logger.warning(f"關聯查詢失敗: {e}")
+        staff_data, attachment_count_map = {}, {}
+
+    staff_map = {}
+    for pid, members in staff_data.items():
+        staff_map[pid] = [
+            StaffInfo(
+                user_id=m['user_id'],
+                name=m['full_name'],
+                role=m['role'],
+            )
+            for m in members
+        ]
+
+    # 轉換為 DocumentResponse — 直接用 selectinload 資料 (不重複查詢)
+    response_items = []
+    for doc in items:
+        try:
+            doc_dict = {
+                **doc.__dict__,
+                'contract_project_name': (
+                    doc.contract_project.project_name
+                    if doc.contract_project else None
+                ),
+                'assigned_staff': staff_map.get(doc.contract_project_id, []) if doc.contract_project_id else [],
+                'attachment_count': attachment_count_map.get(doc.id, 0),
+                'sender_agency_name': (
+                    doc.sender_agency.agency_name
+                    if doc.sender_agency else None
+                ),
+                'receiver_agency_name': (
+                    doc.receiver_agency.agency_name
+                    if doc.receiver_agency else None
+                ),
+            }
+            doc_dict.pop('_sa_instance_state', None)
+            response_items.append(DocumentResponse.model_validate(doc_dict))
+        except Exception as e:
+            logger.warning(f"轉換公文資料失敗: {e}")
+            continue
+    return response_items
+
 
 # ============================================================================
 # 公文列表 API（POST-only 資安機制）
@@ -82,28 +175,32 @@ async def list_documents(
                    f"doc_date_from={query.doc_date_from}, doc_date_to={query.doc_date_to}, "
                    f"contract_case={query.contract_case}, category={query.category}")
 
-        # 構建篩選條件
-        filters = DocumentFilter(
-            keyword=query.keyword,
-            doc_number=query.doc_number,  # 公文字號專用篩選
-            doc_type=query.doc_type,
-            year=query.year,
-            status=query.status,
-            sender=query.sender,
-            receiver=query.receiver,
-            date_from=query.doc_date_from,
-            date_to=query.doc_date_to,
-            delivery_method=query.delivery_method,
-            contract_case=query.contract_case,  # 直接設定，不用 setattr
-            sort_by=query.sort_by,
-            sort_order=query.sort_order.value if query.sort_order else "desc"
-        )
+        filters = _build_filter(query)
 
-        # 加入收發文分類篩選 (前端用 send/receive，資料庫用 發文/收文)
-        if query.category:
-            category_mapping = {'send': '發文', 'receive': '收文'}
-            db_category = category_mapping.get(query.category, query.category)
-            setattr(filters, 'category', db_category)
+        if query.cursor is not None:
+            # Keyset 分頁：以 (doc_date, id) 定位，頁深不影響延遲
+            try:
+                result = await service.get_documents_keyset(
+                    limit=query.limit,
+                    filters=filters,
+                    current_user=current_user,
+                    cursor=query.cursor or None,
+                    count_mode=query.count_mode,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            items = result["items"]
+            response_items = await _to_document_responses(service.db, items)
+            pagination = PaginationMeta.create(
+                total=result["total"] or 0, page=query.page, limit=query.limit
+            )
+            pagination.has_next = result["has_next"]
+            return DocumentListResponse(
+                items=response_items,
+                pagination=pagination,
+                next_cursor=result["next_cursor"],
+                total_is_estimate=result["total_is_estimate"],
+            )
 
         # 計算 skip
         skip = (query.page - 1) * query.limit
@@ -113,68 +210,15 @@ async def list_documents(
             skip=skip,
             limit=query.limit,
             filters=filters,
-            current_user=current_user
+            current_user=current_user,
+            count_mode=query.count_mode,
         )
 
         # 轉換為統一回應格式
         items = result.get("items", [])
         total = result.get("total", 0)
 
-        # selectinload 已預載 contract_project / sender_agency / receiver_agency
-        # 只需 2 個額外批次查詢: staff + attachment_count
-        from app.repositories.document_repository import DocumentRepository
-        from app.repositories.project_repository import ProjectRepository
-
-        doc_repo = DocumentRepository(service.db)
-        proj_repo = ProjectRepository(service.db)
-
-        project_ids = list(set(doc.contract_project_id for doc in items if doc.contract_project_id))
-        doc_ids = [doc.id for doc in items]
-
-        try:
-            staff_data = await proj_repo.get_staff_by_project_ids(project_ids)
-            attachment_count_map = await doc_repo.get_attachment_counts_batch(doc_ids)
-        except Exception as e:
-            logger.warning(f"關聯查詢失敗: {e}")
-            staff_data, attachment_count_map = {}, {}
-
-        staff_map = {}
-        for pid, members in staff_data.items():
-            staff_map[pid] = [
-                StaffInfo(
-                    user_id=m['user_id'],
-                    name=m['full_name'],
-                    role=m['role'],
-                )
-                for m in members
-            ]
-
-        # 轉換為 DocumentResponse — 直接用 selectinload 資料 (不重複查詢)
-        response_items = []
-        for doc in items:
-            try:
-                doc_dict = {
-                    **doc.__dict__,
-                    'contract_project_name': (
-                        doc.contract_project.project_name
-                        if doc.contract_project else None
-                    ),
-                    'assigned_staff': staff_map.get(doc.contract_project_id, []) if doc.contract_project_id else [],
-                    'attachment_count': attachment_count_map.get(doc.id, 0),
-                    'sender_agency_name': (
-                        doc.sender_agency.agency_name
-                        if doc.sender_agency else None
-                    ),
-                    'receiver_agency_name': (
-                        doc.receiver_agency.agency_name
-                        if doc.receiver_agency else None
-                    ),
-                }
-                doc_dict.pop('_sa_instance_state', None)
-                response_items.append(DocumentResponse.model_validate(doc_dict))
-            except Exception as e:
-                logger.warning(f"轉換公文資料失敗: {e}")
-                continue
+        response_items = await _to_document_responses(service.db, items)
 
         return DocumentListResponse(
             items=response_items,
@@ -182,9 +226,12 @@ async def list_documents(
                 total=total,
                 page=query.page,
                 limit=query.limit
-            )
+            ),
+            total_is_estimate=result.get("total_is_estimate", False),
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"公文查詢失敗: {e}", exc_info=True)
         return DocumentListResponse(
@@ -193,6 +240,50 @@ async def list_documents(
         )
 
 
+@router.post(
+    "/list/stream",
+    summary="串流匯出公文列表 (NDJSON)",
+    description="以 keyset 分批讀取，逐行輸出 DocumentResponse JSON（application/x-ndjson），記憶體用量與筆數無關"
+)
+@limiter.limit("10/minute")
+async def stream_documents(
+    request: Request,
+    query: DocumentListQuery = Body(default=DocumentListQuery()),
+    current_user: User = Depends(require_auth())
+):
+    """
+    串流匯出公文列表（批量消費端用）
+
+    篩選條件與 /list 相同（page / limit / cursor / count_mode 忽略），
+    每行一筆公文；發生錯誤時最後一行為 {"error": "..."}。
+    """
+    filters = _build_filter(query)
+
+    async def ndjson():
+        count = 0
+        try:
+            # 串流期間自行持有 session，不依賴 request 依賴注入的生命週期
+            async with AsyncSessionLocal() as db:
+                service = DocumentService(db, auto_create_events=False)
+                async for batch in service.iter_documents(
+                    filters=filters, current_user=current_user, batch_size=STREAM_BATCH_SIZE
+                ):
+                    for item in await _to_document_responses(db, batch):
+                        yield item.model_dump_json() + "\n"
+                        count += 1
+        except Exception as e:
+            logger.error(f"公文串流匯出失敗 (已輸出 {count} 筆): {e}", exc_info=True)
+            yield json.dumps({"error": "串流匯出中斷，請稍後重試"}, ensure_ascii=False) + "\n"
+            return
+        logger.info(f"[API] 公文串流匯出完成: {count} 筆")
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
 # ============================================================================
 # 優化搜尋 API
 # ============================================================================
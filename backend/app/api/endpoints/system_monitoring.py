@@ -139,6 +139,26 @@ async def get_system_metrics(current_user: User = Depends(require_admin())):
         raise HTTPException(status_code=500, detail="獲取系統指標失敗，請稍後再試")
 
 
+@router.post("/db-query-profile", summary="SQL 查詢熱點 (fingerprint) 與 N+1")
+async def get_db_query_profile(
+    limit: int = Query(20, ge=1, le=200),
+    sort_by: str = Query("total_ms", description="total_ms / count / p95_ms / mean_ms / max_ms"),
+    route: Optional[str] = Query(None, description="只看出現在此路由的語句（路由樣板結尾比對）"),
+    current_user: User = Depends(require_admin()),
+):
+    """本行程啟動（或上次重置）以來的 top-N SQL fingerprint 與 N+1 偵測結果。"""
+    from app.core.db_query_profiler import get_query_profiler
+    return get_query_profiler().snapshot(limit=limit, sort_by=sort_by, route=route)
+
+
+@router.post("/db-query-profile/reset", summary="重置 SQL 查詢熱點統計")
+async def reset_db_query_profile(current_user: User = Depends(require_admin())):
+    from app.core.db_query_profiler import get_query_profiler
+    get_query_profiler().reset()
+    log_info("DB query profile reset", ErrorCategory.SYSTEM)
+    return {"success": True}
+
+
 @router.post("/review-dashboard", summary="系統覆盤儀表板")
 async def get_review_dashboard(
     db: AsyncSession = Depends(get_async_db),
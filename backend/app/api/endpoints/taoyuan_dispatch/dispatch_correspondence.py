@@ -43,6 +43,7 @@ async def confirm_correspondence(
         from app.extended.models import (
             CanonicalEntity, DocumentEntityMention, EntityRelationship,
         )
+        from app.services.ai.graph.graph_change_notifier import queue_relations_changed
         from app.services.ai.graph.graph_helpers import invalidate_graph_cache
 
         if not request.pairs:
@@ -136,6 +137,7 @@ async def confirm_correspondence(
         relationships_created = 0
         relationships_updated = 0
         confirmed_count = 0
+        added_edges: list[list] = []
 
         for incoming_doc_id, outgoing_doc_id in valid_pairs:
             in_ents = doc_entity_map.get(incoming_doc_id, set())
@@ -162,6 +164,7 @@ async def confirm_correspondence(
                     )
                     db.add(rel)
                     existing_rels_map[key] = rel
+                    added_edges.append([source_id, target_id, rel.relation_label])
                     relationships_created += 1
 
             if not shared:
@@ -179,6 +182,8 @@ async def confirm_correspondence(
 
             confirmed_count += 1
 
+        # commit 後通知 CSR 快照（圖譜遍歷）
+        queue_relations_changed(db, added=added_edges)
         await db.commit()
 
         # 失效圖譜快取
@@ -32,6 +32,7 @@ from app.core.exceptions import (
 )
 from app.core.dependencies import require_auth, is_superuser_user, require_admin
 from app.core.auth_service import AuthService
+from app.core.principal_cache import get_principal_cache
 
 router = APIRouter()
 
@@ -331,6 +332,7 @@ async def update_user(
     user.updated_at = datetime.now()
 
     await user_repo.db.commit()
+    await get_principal_cache().invalidate_user(user_id)
     await user_repo.db.refresh(user)
 
     return user
@@ -407,6 +409,7 @@ async def update_user_status(
     user.updated_at = datetime.now()
 
     await user_repo.db.commit()
+    await get_principal_cache().invalidate_user(user_id)
     await user_repo.db.refresh(user)
 
     return user
@@ -4,6 +4,8 @@
 Version: 2.0.0
 Created: 2026-02-04
 Updated: 2026-03-19 - v2.0.0 NVIDIA Cloud API 整合 (3-tier fallback)
+Updated: 2026-10-16 - chat_completion / generate_embedding 併發相同請求 single-flight 合併
+Updated: 2026-10-16 - generate_embeddings_batch 逾時依文字總長放大，整批失敗改逐筆重試
 
 支援的 AI 服務優先順序:
 1. Groq API (免費，超快 ~100-500ms，llama3-70b)
@@ -23,6 +25,7 @@ Thinking mode 處理 (Gemma 4 / Qwen3 / DeepSeek-R1):
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
@@ -31,8 +34,21 @@ from typing import Any, AsyncGenerator, Dict, List, Optional
 
 import httpx
 
+from app.core.single_flight import get_single_flight
+from app.core.ai_http_pool import get_ai_http_client
+
 logger = logging.getLogger(__name__)
 
+# 相同請求併發時只打一次上游（見 app.core.single_flight）
+_chat_flight = get_single_flight("chat")
+_embed_flight = get_single_flight("embedding")
+
+
+def _request_fingerprint(*parts: Any) -> str:
+    """chat_completion 參數指紋（single-flight key）"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 # Groq API 配置
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_DEFAULT_MODEL = "llama-3.3-70b-versatile"
@@ -154,10 +170,15 @@ class AIConnector(AIConnectorManagementMixin):
         task_type: Optional[str] = None,
         response_format: Optional[Dict[str, str]] = None,
         images: Optional[List[str]] = None,
+        coalesce: bool = False,
     ) -> str:
         """
         執行 AI 對話完成
 
+        確定性請求（temperature == 0，或 coalesce=True 的快取路徑）併發相同參數時
+        合併為一次上游呼叫（single-flight，key = 訊息與參數的 SHA256）；
+        一般取樣請求各自呼叫，不共用同一份生成結果。
+
         Args:
             messages: 對話訊息列表，格式為 [{"role": "user/assistant/system", "content": "..."}]
             model: 指定模型（可選，未指定時根據 task_type 從 TASK_MODEL_MAP 取得）
@@ -167,6 +188,7 @@ class AIConnector(AIConnectorManagementMixin):
             task_type: 任務類型（ner/summary/classify/chat），用於選擇對應模型
             response_format: 回應格式（Groq 專用，如 {"type": "json_object"}）
             images: base64-encoded 圖片列表（Ollama vision 專用，如 Gemma 4 multimodal）
+            coalesce: 呼叫端會快取並共用結果（如 BaseAIService._call_ai_with_cache）
 
         Returns:
             AI 生成的回應文字
@@ -174,6 +196,50 @@ class AIConnector(AIConnectorManagementMixin):
         Raises:
             AIServiceException: 所有 AI 服務均不可用時拋出
         """
+        if not (coalesce or temperature == 0):
+            return await self._chat_completion(
+                messages, model=model, temperature=temperature, max_tokens=max_tokens,
+                prefer_local=prefer_local, task_type=task_type,
+                response_format=response_format, images=images,
+            )
+
+        key = _request_fingerprint(
+            id(self), messages, model, temperature, max_tokens,
+            prefer_local, task_type, response_format, images,
+        )
+
+        async def _call():
+            from app.core.inference_provider_context import get_actual_provider, reset_actual_provider
+            # 上游呼叫在獨立 task 執行：provider ContextVar 需帶回呼叫端 context
+            reset_actual_provider()
+            result = await self._chat_completion(
+                messages, model=model, temperature=temperature, max_tokens=max_tokens,
+                prefer_local=prefer_local, task_type=task_type,
+                response_format=response_format, images=images,
+            )
+            return result, get_actual_provider()
+
+        result, provider = await _chat_flight.do(key, _call)
+        if provider:
+            try:
+                from app.core.inference_provider_context import set_actual_provider
+                set_actual_provider(provider)
+            except Exception:
+                pass
+        return result
+
+    async def _chat_completion(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        prefer_local: bool = False,
+        task_type: Optional[str] = None,
+        response_format: Optional[Dict[str, str]] = None,
+        images: Optional[List[str]] = None,
+    ) -> str:
+        """chat_completion 的實際實作（未合併；參數見 chat_completion）"""
         # 2026-04-25: 推理 duration 計時起點（供 Prometheus histogram 觀測）
         import time as _time
         _inference_start_monotonic = _time.monotonic()
@@ -498,21 +564,21 @@ class AIConnector(AIConnectorManagementMixin):
             payload["response_format"] = response_format
 
         async with sem.acquire(timeout=self.cloud_timeout + 10):
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    GROQ_API_URL,
-                    headers={
-                        "Authorization": f"Bearer {self.groq_api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json=payload,
-                    timeout=self.cloud_timeout,
-                )
-                response.raise_for_status()
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                logger.info(f"Groq API 回應成功 (model={model})")
-                return content
+            client = get_ai_http_client("groq")
+            response = await client.post(
+                GROQ_API_URL,
+                headers={
+                    "Authorization": f"Bearer {self.groq_api_key}",
+                    "Content-Type": "application/json",
+                },
+                json=payload,
+                timeout=self.cloud_timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            logger.info(f"Groq API 回應成功 (model={model})")
+            return content
 
     async def _nvidia_completion(
         self,
@@ -546,28 +612,28 @@ class AIConnector(AIConnectorManagementMixin):
             payload["response_format"] = response_format
 
         async with sem.acquire(timeout=_timeout + 10):
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {self.nvidia_api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json=payload,
-                    timeout=_timeout,
-                )
-                response.raise_for_status()
-                data = response.json()
-                msg = data["choices"][0]["message"]
-                # Nemotron 新版：content 可能為 None（推理內容放在 reasoning_content）
-                content = msg.get("content") or msg.get("reasoning_content") or ""
-                if not content:
-                    logger.warning("NVIDIA 回應 content/reasoning_content 皆空: keys=%s", list(msg.keys()))
-                    raise ValueError("NVIDIA returned empty content")
-                # Strip residual <think> tags (Nemotron models may include them)
-                content = self._strip_think_tags(content)
-                logger.info(f"NVIDIA Cloud API 回應成功 (model={model})")
-                return content
+            client = get_ai_http_client("nvidia")
+            response = await client.post(
+                url,
+                headers={
+                    "Authorization": f"Bearer {self.nvidia_api_key}",
+                    "Content-Type": "application/json",
+                },
+                json=payload,
+                timeout=_timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            msg = data["choices"][0]["message"]
+            # Nemotron 新版：content 可能為 None（推理內容放在 reasoning_content）
+            content = msg.get("content") or msg.get("reasoning_content") or ""
+            if not content:
+                logger.warning("NVIDIA 回應 content/reasoning_content 皆空: keys=%s", list(msg.keys()))
+                raise ValueError("NVIDIA returned empty content")
+            # Strip residual <think> tags (Nemotron models may include them)
+            content = self._strip_think_tags(content)
+            logger.info(f"NVIDIA Cloud API 回應成功 (model={model})")
+            return content
 
     @staticmethod
     def _is_thinking_model(model: str) -> bool:
@@ -663,30 +729,30 @@ class AIConnector(AIConnectorManagementMixin):
         if response_format and response_format.get("type") == "json_object":
             payload["format"] = "json"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.ollama_base_url}/api/chat",
-                json=payload,
-                timeout=self.local_timeout,
+        client = get_ai_http_client("ollama")
+        response = await client.post(
+            f"{self.ollama_base_url}/api/chat",
+            json=payload,
+            timeout=self.local_timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        msg = data.get("message", {})
+        content = msg.get("content", "")
+
+        # 若 content 為空但有 thinking 欄位，記錄警告
+        if not content and msg.get("thinking"):
+            logger.warning(
+                "Ollama %s: content 為空但有 thinking 內容 (%d chars)，"
+                "可能 num_predict 不足或 think 參數未生效",
+                model, len(msg["thinking"]),
             )
-            response.raise_for_status()
-            data = response.json()
-            msg = data.get("message", {})
-            content = msg.get("content", "")
-
-            # 若 content 為空但有 thinking 欄位，記錄警告
-            if not content and msg.get("thinking"):
-                logger.warning(
-                    "Ollama %s: content 為空但有 thinking 內容 (%d chars)，"
-                    "可能 num_predict 不足或 think 參數未生效",
-                    model, len(msg["thinking"]),
-                )
 
-            # 安全網：移除殘留 <think> 區塊
-            content = self._strip_think_tags(content)
+        # 安全網：移除殘留 <think> 區塊
+        content = self._strip_think_tags(content)
 
-            logger.info("Ollama 回應成功 (model=%s, len=%d)", model, len(content))
-            return content
+        logger.info("Ollama 回應成功 (model=%s, len=%d)", model, len(content))
+        return content
 
     @staticmethod
     def preprocess_image(image_bytes: bytes, max_size: int = 1024) -> str:
@@ -818,37 +884,37 @@ class AIConnector(AIConnectorManagementMixin):
         max_tokens: int,
     ) -> AsyncGenerator[str, None]:
         """Groq API 串流回應"""
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {self.groq_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": True,
-                },
-                timeout=self.cloud_timeout,
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            delta = data.get("choices", [{}])[0].get("delta", {})
-                            content = delta.get("content", "")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            continue
+        client = get_ai_http_client("groq")
+        async with client.stream(
+            "POST",
+            GROQ_API_URL,
+            headers={
+                "Authorization": f"Bearer {self.groq_api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+            },
+            timeout=self.cloud_timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    if data_str.strip() == "[DONE]":
+                        break
+                    try:
+                        data = json.loads(data_str)
+                        delta = data.get("choices", [{}])[0].get("delta", {})
+                        content = delta.get("content", "")
+                        if content:
+                            yield content
+                    except json.JSONDecodeError:
+                        continue
         logger.info(f"Groq 串流完成 (model={model})")
 
     async def _stream_nvidia(
@@ -862,37 +928,37 @@ class AIConnector(AIConnectorManagementMixin):
         """NVIDIA Cloud / vLLM API 串流回應 (OpenAI-compatible SSE)"""
         url = (api_url or NVIDIA_API_URL.rsplit("/chat/completions", 1)[0]) + "/chat/completions"
         api_key = self.nvidia_api_key or os.getenv("VLLM_API_KEY", "token-placeholder")
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                url,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": True,
-                },
-                timeout=self.cloud_timeout,
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            delta = data.get("choices", [{}])[0].get("delta", {})
-                            content = delta.get("content", "")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            continue
+        client = get_ai_http_client("nvidia")
+        async with client.stream(
+            "POST",
+            url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+            },
+            timeout=self.cloud_timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    if data_str.strip() == "[DONE]":
+                        break
+                    try:
+                        data = json.loads(data_str)
+                        delta = data.get("choices", [{}])[0].get("delta", {})
+                        content = delta.get("content", "")
+                        if content:
+                            yield content
+                    except json.JSONDecodeError:
+                        continue
         logger.info(f"NVIDIA Cloud 串流完成 (model={model})")
 
     async def _stream_ollama(
@@ -919,25 +985,25 @@ class AIConnector(AIConnectorManagementMixin):
         if self._is_thinking_model(model):
             payload["think"] = False
 
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                f"{self.ollama_base_url}/api/chat",
-                json=payload,
-                timeout=self.local_timeout,
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line:
-                        try:
-                            data = json.loads(line)
-                            content = data.get("message", {}).get("content", "")
-                            if content:
-                                yield content
-                            if data.get("done", False):
-                                break
-                        except json.JSONDecodeError:
-                            continue
+        client = get_ai_http_client("ollama")
+        async with client.stream(
+            "POST",
+            f"{self.ollama_base_url}/api/chat",
+            json=payload,
+            timeout=self.local_timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    try:
+                        data = json.loads(line)
+                        content = data.get("message", {}).get("content", "")
+                        if content:
+                            yield content
+                        if data.get("done", False):
+                            break
+                    except json.JSONDecodeError:
+                        continue
         logger.info("Ollama 串流完成 (model=%s)", model)
 
     async def _smart_route_decision(self, input_text: str, task_type: Optional[str] = None) -> bool:
@@ -1038,31 +1104,37 @@ class AIConnector(AIConnectorManagementMixin):
             logger.warning("Embedding 生成跳過：輸入文字為空")
             return None
 
+        # 相同 (模型, 文字) 的併發請求共用一次 Ollama 呼叫
+        key = (self.ollama_base_url, embed_model, hashlib.sha256(truncated_text.encode("utf-8")).hexdigest())
+        return await _embed_flight.do(key, lambda: self._embed_one(truncated_text, embed_model))
+
+    async def _embed_one(self, truncated_text: str, embed_model: str) -> Optional[List[float]]:
+        """呼叫 Ollama /api/embed 產生單筆 embedding（失敗回傳 None）"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/embed",
-                    json={
-                        "model": embed_model,
-                        "input": truncated_text,
-                    },
-                    timeout=self.embed_timeout,
+            client = get_ai_http_client("ollama")
+            response = await client.post(
+                f"{self.ollama_base_url}/api/embed",
+                json={
+                    "model": embed_model,
+                    "input": truncated_text,
+                },
+                timeout=self.embed_timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            # Ollama /api/embed 回傳格式: {"embeddings": [[...]]}
+            embeddings = data.get("embeddings", [])
+            if embeddings and len(embeddings) > 0:
+                embedding = embeddings[0]
+                logger.debug(
+                    f"Embedding 生成成功 (model={embed_model}, "
+                    f"dim={len(embedding)}, text_len={len(truncated_text)})"
                 )
-                response.raise_for_status()
-                data = response.json()
-
-                # Ollama /api/embed 回傳格式: {"embeddings": [[...]]}
-                embeddings = data.get("embeddings", [])
-                if embeddings and len(embeddings) > 0:
-                    embedding = embeddings[0]
-                    logger.debug(
-                        f"Embedding 生成成功 (model={embed_model}, "
-                        f"dim={len(embedding)}, text_len={len(truncated_text)})"
-                    )
-                    return embedding
+                return embedding
 
-                logger.warning(f"Embedding 回應中無有效向量: {data}")
-                return None
+            logger.warning(f"Embedding 回應中無有效向量: {data}")
+            return None
         except Exception as e:
             logger.warning(f"Embedding 生成失敗 (model={embed_model}): {e}")
             return None
@@ -1082,6 +1154,10 @@ class AIConnector(AIConnectorManagementMixin):
             texts: 要生成 embedding 的文字列表
             model: embedding 模型名稱（預設: nomic-embed-text）
 
+        逾時依文字總長放大（每 8000 字一個 embed_timeout）；整批失敗或缺漏的項目
+        改以 generate_embedding 逐筆重試，單筆壞資料不會連帶整批變成 None；
+        逐筆重試同時最多 embedding_fallback_concurrency 筆，避免整批失敗時瞬間打出數百個請求。
+
         Returns:
             與 texts 等長的列表，每項為 embedding 向量或 None（失敗時）
         """
@@ -1102,23 +1178,23 @@ class AIConnector(AIConnectorManagementMixin):
         if not truncated_texts:
             return [None] * len(texts)
 
+        # 建立結果陣列，預設為 None
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        total_chars = sum(len(t) for t in truncated_texts)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/embed",
-                    json={
-                        "model": embed_model,
-                        "input": truncated_texts,
-                    },
-                    timeout=self.embed_timeout,
-                )
-                response.raise_for_status()
-                data = response.json()
+            client = get_ai_http_client("ollama")
+            response = await client.post(
+                f"{self.ollama_base_url}/api/embed",
+                json={
+                    "model": embed_model,
+                    "input": truncated_texts,
+                },
+                timeout=self.embed_timeout * max(1.0, total_chars / 8000),
+            )
+            response.raise_for_status()
+            data = response.json()
 
             embeddings_raw = data.get("embeddings", [])
-
-            # 建立結果陣列，預設為 None
-            results: List[Optional[List[float]]] = [None] * len(texts)
             for idx, valid_i in enumerate(valid_indices):
                 if idx < len(embeddings_raw) and embeddings_raw[idx]:
                     results[valid_i] = embeddings_raw[idx]
@@ -1128,14 +1204,26 @@ class AIConnector(AIConnectorManagementMixin):
                 "批次 embedding 完成: model=%s, 請求=%s, 成功=%s",
                 embed_model, len(truncated_texts), success_count,
             )
-            return results
-
         except Exception as e:
             logger.warning(
-                "批次 embedding 失敗 (model=%s, count=%s): %s",
-                embed_model, len(truncated_texts), e,
+                "批次 embedding 失敗，改逐筆重試 (model=%s, count=%s, chars=%s): %s",
+                embed_model, len(truncated_texts), total_chars, e,
             )
-            return [None] * len(texts)
+
+        missing = [i for i in valid_indices if results[i] is None]
+        if missing and len(valid_indices) > 1:
+            from app.services.ai.core.ai_config import get_ai_config
+
+            limit = asyncio.Semaphore(max(1, get_ai_config().embedding_fallback_concurrency))
+
+            async def retry_one(i: int) -> Optional[List[float]]:
+                async with limit:
+                    return await self.generate_embedding(texts[i], model=embed_model)
+
+            retried = await asyncio.gather(*(retry_one(i) for i in missing))
+            for i, embedding in zip(missing, retried, strict=True):
+                results[i] = embedding
+        return results
 
     # ensure_models, warmup_models, check_health — 繼承自 AIConnectorManagementMixin
 
@@ -16,7 +16,7 @@ import logging
 import os
 from typing import Any, Dict
 
-import httpx
+from app.core.ai_http_pool import get_ai_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -36,42 +36,42 @@ class AIConnectorManagementMixin:
         result: Dict[str, Any] = {"installed": [], "pulled": [], "failed": [], "ollama_available": False}
 
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.ollama_base_url}/api/tags", timeout=5)
-                if resp.status_code != 200:
-                    logger.warning("Ollama /api/tags 回應 HTTP %s", resp.status_code)
-                    return result
-
-                result["ollama_available"] = True
-                installed_models = {m["name"] for m in resp.json().get("models", [])}
-                installed_normalized = set()
-                for m in installed_models:
-                    installed_normalized.add(m)
-                    if ":" in m:
-                        installed_normalized.add(m.split(":")[0])
-                    else:
-                        installed_normalized.add(f"{m}:latest")
-                result["installed"] = sorted(installed_models)
-
-                for required in REQUIRED_MODELS:
-                    req_norm = required.split(":")[0] if ":" in required else required
-                    if required not in installed_normalized and req_norm not in installed_normalized:
-                        logger.info("模型 '%s' 未安裝，開始拉取...", required)
-                        try:
-                            pull_resp = await client.post(
-                                f"{self.ollama_base_url}/api/pull",
-                                json={"name": required, "stream": False},
-                                timeout=600,
-                            )
-                            if pull_resp.status_code == 200:
-                                result["pulled"].append(required)
-                                logger.info("模型 '%s' 拉取成功", required)
-                            else:
-                                result["failed"].append(required)
-                                logger.warning("模型 '%s' 拉取失敗: HTTP %s", required, pull_resp.status_code)
-                        except Exception as pull_err:
+            client = get_ai_http_client("ollama")
+            resp = await client.get(f"{self.ollama_base_url}/api/tags", timeout=5)
+            if resp.status_code != 200:
+                logger.warning("Ollama /api/tags 回應 HTTP %s", resp.status_code)
+                return result
+
+            result["ollama_available"] = True
+            installed_models = {m["name"] for m in resp.json().get("models", [])}
+            installed_normalized = set()
+            for m in installed_models:
+                installed_normalized.add(m)
+                if ":" in m:
+                    installed_normalized.add(m.split(":")[0])
+                else:
+                    installed_normalized.add(f"{m}:latest")
+            result["installed"] = sorted(installed_models)
+
+            for required in REQUIRED_MODELS:
+                req_norm = required.split(":")[0] if ":" in required else required
+                if required not in installed_normalized and req_norm not in installed_normalized:
+                    logger.info("模型 '%s' 未安裝，開始拉取...", required)
+                    try:
+                        pull_resp = await client.post(
+                            f"{self.ollama_base_url}/api/pull",
+                            json={"name": required, "stream": False},
+                            timeout=600,
+                        )
+                        if pull_resp.status_code == 200:
+                            result["pulled"].append(required)
+                            logger.info("模型 '%s' 拉取成功", required)
+                        else:
                             result["failed"].append(required)
-                            logger.warning("模型 '%s' 拉取異常: %s", required, pull_err)
+                            logger.warning("模型 '%s' 拉取失敗: HTTP %s", required, pull_resp.status_code)
+                    except Exception as pull_err:
+                        result["failed"].append(required)
+                        logger.warning("模型 '%s' 拉取異常: %s", required, pull_err)
         except Exception as e:
             logger.warning("Ollama 模型檢查失敗: %s", e)
 
@@ -85,26 +85,26 @@ class AIConnectorManagementMixin:
 
         for required_model in REQUIRED_MODELS:
             try:
-                async with httpx.AsyncClient() as client:
-                    if required_model == TASK_MODEL_MAP.get("embedding", "nomic-embed-text"):
-                        resp = await client.post(
-                            f"{self.ollama_base_url}/api/embed",
-                            json={"model": required_model, "input": "warmup"},
-                            timeout=60,
-                        )
-                    else:
-                        resp = await client.post(
-                            f"{self.ollama_base_url}/api/generate",
-                            json={"model": required_model, "prompt": "hi", "stream": False, "options": {"num_predict": 1}},
-                            timeout=120,
-                        )
-
-                    if resp.status_code == 200:
-                        results[required_model] = True
-                        logger.info("模型 '%s' warm-up 完成", required_model)
-                    else:
-                        results[required_model] = False
-                        logger.warning("模型 '%s' warm-up 失敗: HTTP %s", required_model, resp.status_code)
+                client = get_ai_http_client("ollama")
+                if required_model == TASK_MODEL_MAP.get("embedding", "nomic-embed-text"):
+                    resp = await client.post(
+                        f"{self.ollama_base_url}/api/embed",
+                        json={"model": required_model, "input": "warmup"},
+                        timeout=60,
+                    )
+                else:
+                    resp = await client.post(
+                        f"{self.ollama_base_url}/api/generate",
+                        json={"model": required_model, "prompt": "hi", "stream": False, "options": {"num_predict": 1}},
+                        timeout=120,
+                    )
+
+                if resp.status_code == 200:
+                    results[required_model] = True
+                    logger.info("模型 '%s' warm-up 完成", required_model)
+                else:
+                    results[required_model] = False
+                    logger.warning("模型 '%s' warm-up 失敗: HTTP %s", required_model, resp.status_code)
             except Exception as e:
                 results[required_model] = False
                 logger.warning("模型 '%s' warm-up 異常: %s", required_model, e)
@@ -124,13 +124,13 @@ class AIConnectorManagementMixin:
         # Groq
         if self.groq_api_key:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get("https://api.groq.com/openai/v1/models", headers={"Authorization": f"Bearer {self.groq_api_key}"}, timeout=10)
-                    if response.status_code == 200:
-                        status["groq"]["available"] = True
-                        status["groq"]["message"] = "Groq API 可用"
-                    else:
-                        status["groq"]["message"] = f"HTTP {response.status_code}"
+                client = get_ai_http_client("groq")
+                response = await client.get("https://api.groq.com/openai/v1/models", headers={"Authorization": f"Bearer {self.groq_api_key}"}, timeout=10)
+                if response.status_code == 200:
+                    status["groq"]["available"] = True
+                    status["groq"]["message"] = "Groq API 可用"
+                else:
+                    status["groq"]["message"] = f"HTTP {response.status_code}"
             except Exception as e:
                 status["groq"]["message"] = str(e)
         else:
@@ -139,14 +139,14 @@ class AIConnectorManagementMixin:
         # NVIDIA Cloud
         if self.nvidia_api_key:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get("https://integrate.api.nvidia.com/v1/models", headers={"Authorization": f"Bearer {self.nvidia_api_key}"}, timeout=10)
-                    if response.status_code == 200:
-                        status["nvidia_cloud"]["available"] = True
-                        status["nvidia_cloud"]["message"] = "NVIDIA Cloud API 可用"
-                        status["nvidia_cloud"]["model"] = NVIDIA_DEFAULT_MODEL
-                    else:
-                        status["nvidia_cloud"]["message"] = f"HTTP {response.status_code}"
+                client = get_ai_http_client("nvidia")
+                response = await client.get("https://integrate.api.nvidia.com/v1/models", headers={"Authorization": f"Bearer {self.nvidia_api_key}"}, timeout=10)
+                if response.status_code == 200:
+                    status["nvidia_cloud"]["available"] = True
+                    status["nvidia_cloud"]["message"] = "NVIDIA Cloud API 可用"
+                    status["nvidia_cloud"]["model"] = NVIDIA_DEFAULT_MODEL
+                else:
+                    status["nvidia_cloud"]["message"] = f"HTTP {response.status_code}"
             except Exception as e:
                 status["nvidia_cloud"]["message"] = str(e)
         else:
@@ -158,14 +158,14 @@ class AIConnectorManagementMixin:
             try:
                 vllm_base = os.getenv("VLLM_BASE_URL", "http://localhost:8000/v1")
                 vllm_health_url = vllm_base.rsplit("/v1", 1)[0] + "/health"
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(vllm_health_url, timeout=5)
-                    if response.status_code == 200:
-                        status["vllm_local"]["available"] = True
-                        status["vllm_local"]["message"] = "vLLM 本地可用"
-                        status["vllm_local"]["model"] = VLLM_LOCAL_MODEL
-                    else:
-                        status["vllm_local"]["message"] = f"HTTP {response.status_code}"
+                client = get_ai_http_client("nvidia")
+                response = await client.get(vllm_health_url, timeout=5)
+                if response.status_code == 200:
+                    status["vllm_local"]["available"] = True
+                    status["vllm_local"]["message"] = "vLLM 本地可用"
+                    status["vllm_local"]["model"] = VLLM_LOCAL_MODEL
+                else:
+                    status["vllm_local"]["message"] = f"HTTP {response.status_code}"
             except Exception as e:
                 status["vllm_local"]["message"] = str(e)
         else:
@@ -173,33 +173,33 @@ class AIConnectorManagementMixin:
 
         # Ollama
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.ollama_base_url}/api/tags", timeout=5)
-                if response.status_code == 200:
-                    status["ollama"]["available"] = True
-                    models = response.json().get("models", [])
-                    model_names = [m.get("name", "") for m in models]
-                    status["ollama"]["models"] = model_names
-                    status["ollama"]["message"] = f"Ollama 可用，{len(models)} 個模型"
-
-                    installed_set = set(model_names)
-                    for m in list(installed_set):
-                        installed_set.add(m.split(":")[0])
-                    missing = [req for req in REQUIRED_MODELS if req not in installed_set and req.split(":")[0] not in installed_set]
-                    status["ollama"]["required_models_ready"] = len(missing) == 0
-                    if missing:
-                        status["ollama"]["missing_models"] = missing
-                else:
-                    status["ollama"]["message"] = f"HTTP {response.status_code}"
-
-                try:
-                    ps_resp = await client.get(f"{self.ollama_base_url}/api/ps", timeout=3)
-                    if ps_resp.status_code == 200:
-                        ps_data = ps_resp.json()
-                        running_models = ps_data.get("models", [])
-                        status["ollama"]["gpu_info"] = {"loaded_models": [{"name": rm.get("name", ""), "size": rm.get("size", 0), "size_vram": rm.get("size_vram", 0)} for rm in running_models]}
-                except Exception:
-                    pass
+            client = get_ai_http_client("ollama")
+            response = await client.get(f"{self.ollama_base_url}/api/tags", timeout=5)
+            if response.status_code == 200:
+                status["ollama"]["available"] = True
+                models = response.json().get("models", [])
+                model_names = [m.get("name", "") for m in models]
+                status["ollama"]["models"] = model_names
+                status["ollama"]["message"] = f"Ollama 可用，{len(models)} 個模型"
+
+                installed_set = set(model_names)
+                for m in list(installed_set):
+                    installed_set.add(m.split(":")[0])
+                missing = [req for req in REQUIRED_MODELS if req not in installed_set and req.split(":")[0] not in installed_set]
+                status["ollama"]["required_models_ready"] = len(missing) == 0
+                if missing:
+                    status["ollama"]["missing_models"] = missing
+            else:
+                status["ollama"]["message"] = f"HTTP {response.status_code}"
+
+            try:
+                ps_resp = await client.get(f"{self.ollama_base_url}/api/ps", timeout=3)
+                if ps_resp.status_code == 200:
+                    ps_data = ps_resp.json()
+                    running_models = ps_data.get("models", [])
+                    status["ollama"]["gpu_info"] = {"loaded_models": [{"name": rm.get("name", ""), "size": rm.get("size", 0), "size_vram": rm.get("size_vram", 0)} for rm in running_models]}
+            except Exception:
+                pass
         except Exception as e:
             status["ollama"]["message"] = str(e)
 
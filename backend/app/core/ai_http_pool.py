@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+AI Provider 共用 HTTP 連線池
+
+AIConnector 原本每次呼叫都 ``async with httpx.AsyncClient()``，每個 LLM / embedding
+請求都重做 TCP（+TLS）握手。改為每個 provider 一個長壽 client：
+
+- groq / nvidia: 雲端 HTTPS，安裝 ``h2`` 時啟用 HTTP/2（單連線多工）
+- ollama: 本地 HTTP/1.1，較長 keep-alive（embedding / 短推理高頻呼叫）
+
+連線上限與 keep-alive 可用環境變數逐 provider 覆寫：
+    AI_HTTP_<PROVIDER>_MAX_CONNECTIONS / _MAX_KEEPALIVE / _KEEPALIVE_EXPIRY / _HTTP2
+
+client 綁定建立時的 event loop；lifespan shutdown 呼叫 ``close_ai_http_clients()``。
+
+Metrics:
+- ai_http_pool_requests_in_flight{provider} (Gauge): 佔用連線中的請求數
+- ai_http_pool_wait_seconds{provider} (Histogram): 等待取得連線的時間
+- ai_http_pool_connections_opened_total{provider} (Counter): 新建 TCP 連線數
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_METRIC = "ai_http_pool_requests_in_flight"
+WAIT_METRIC = "ai_http_pool_wait_seconds"
+OPENED_METRIC = "ai_http_pool_connections_opened_total"
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """單一 provider 連線池設定"""
+
+    max_connections: int
+    max_keepalive: int
+    keepalive_expiry: float
+    http2: bool
+
+
+DEFAULT_POOL_CONFIGS: Dict[str, PoolConfig] = {
+    "groq": PoolConfig(max_connections=20, max_keepalive=10, keepalive_expiry=30.0, http2=True),
+    "nvidia": PoolConfig(max_connections=20, max_keepalive=10, keepalive_expiry=30.0, http2=True),
+    "ollama": PoolConfig(max_connections=10, max_keepalive=10, keepalive_expiry=120.0, http2=False),
+}
+
+
+def _h2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def load_pool_config(provider: str) -> PoolConfig:
+    """讀取 provider 預設值並套用環境變數覆寫。"""
+    base = DEFAULT_POOL_CONFIGS.get(provider, DEFAULT_POOL_CONFIGS["ollama"])
+    prefix = f"AI_HTTP_{provider.upper()}_"
+
+    def _num(key: str, default, cast):
+        raw = os.getenv(prefix + key)
+        if not raw:
+            return default
+        try:
+            return cast(raw)
+        except ValueError:
+            logger.warning("%s%s=%r 無效，沿用預設 %s", prefix, key, raw, default)
+            return default
+
+    http2_raw = os.getenv(prefix + "HTTP2")
+    http2 = base.http2 if not http2_raw else http2_raw.lower() in ("1", "true", "yes")
+    return PoolConfig(
+        max_connections=_num("MAX_CONNECTIONS", base.max_connections, int),
+        max_keepalive=_num("MAX_KEEPALIVE", base.max_keepalive, int),
+        keepalive_expiry=_num("KEEPALIVE_EXPIRY", base.keepalive_expiry, float),
+        http2=http2,
+    )
+
+
+class AIHTTPPoolMetrics:
+    """AI provider 連線池 Prometheus 指標收集器。"""
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        reg = registry or REGISTRY
+        self.in_flight = Gauge(
+            IN_FLIGHT_METRIC,
+            "AI provider HTTP requests currently holding a pooled connection",
+            ["provider"],
+            registry=reg,
+        )
+        self.wait = Histogram(
+            WAIT_METRIC,
+            "Time spent waiting for a pooled AI provider HTTP connection",
+            ["provider"],
+            buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0],
+            registry=reg,
+        )
+        self.connections_opened = Counter(
+            OPENED_METRIC,
+            "New TCP connections opened by AI provider HTTP pools",
+            ["provider"],
+            registry=reg,
+        )
+
+
+_pool_metrics: Optional[AIHTTPPoolMetrics] = None
+
+
+def get_ai_http_pool_metrics() -> AIHTTPPoolMetrics:
+    global _pool_metrics
+    if _pool_metrics is None:
+        _pool_metrics = AIHTTPPoolMetrics()
+    return _pool_metrics
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """回應 body 讀完 / 關閉時釋放 in-flight 計數（串流回應亦適用）。"""
+
+    def __init__(self, inner: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._inner = inner
+        self._on_close = on_close
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._inner:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._inner.aclose()
+        finally:
+            self._on_close()
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """包裝 AsyncHTTPTransport，量測取得連線等待時間與 in-flight 數。
+
+    等待時間以 httpcore trace extension 的第一個事件為界：pool 分配到連線後
+    才會開始 connect / send_request_headers，之前的時間即排隊等待。
+    """
+
+    def __init__(self, provider: str, inner: httpx.AsyncBaseTransport, metrics: AIHTTPPoolMetrics):
+        self._provider = provider
+        self._inner = inner
+        self._metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        provider = self._provider
+        metrics = self._metrics
+        started = time.perf_counter()
+        acquired = False
+        caller_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            nonlocal acquired
+            if not acquired:
+                acquired = True
+                metrics.wait.labels(provider=provider).observe(time.perf_counter() - started)
+            if event_name == "connection.connect_tcp.complete":
+                metrics.connections_opened.labels(provider=provider).inc()
+            if caller_trace is not None:
+                await caller_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        gauge = metrics.in_flight.labels(provider=provider)
+        gauge.inc()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                gauge.dec()
+
+        try:
+            response = await self._inner.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        if response.is_closed:
+            release()  # body 已整段讀入（如 MockTransport）
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class AIHTTPClientPool:
+    """每個 provider 一個長壽 httpx.AsyncClient（依 event loop 綁定）。"""
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        self._http2_warned = False
+
+    def _build(self, provider: str) -> httpx.AsyncClient:
+        config = load_pool_config(provider)
+        http2 = config.http2
+        if http2 and not _h2_available():
+            if not self._http2_warned:
+                logger.info("h2 未安裝，AI provider 連線池改用 HTTP/1.1")
+                self._http2_warned = True
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+        transport = _InstrumentedTransport(
+            provider,
+            httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+            get_ai_http_pool_metrics(),
+        )
+        logger.info(
+            "AI HTTP pool '%s' 建立: max_connections=%d keepalive=%d/%.0fs http2=%s",
+            provider, config.max_connections, config.max_keepalive, config.keepalive_expiry, http2,
+        )
+        return httpx.AsyncClient(transport=transport)
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(provider)
+        if client is None or client.is_closed or self._loops.get(provider) is not loop:
+            # 連線綁定 event loop；換 loop（測試 / reload）時重建，舊連線隨舊 loop 丟棄
+            client = self._build(provider)
+            self._clients[provider] = client
+            self._loops[provider] = loop
+        return client
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._loops.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug("AI HTTP client close failed: %s", e)
+
+
+_client_pool: Optional[AIHTTPClientPool] = None
+
+
+def get_ai_http_client_pool() -> AIHTTPClientPool:
+    global _client_pool
+    if _client_pool is None:
+        _client_pool = AIHTTPClientPool()
+    return _client_pool
+
+
+def get_ai_http_client(provider: str) -> httpx.AsyncClient:
+    """取得 provider 的共用 client（須在 event loop 內呼叫；勿 ``async with`` 關閉）。"""
+    return get_ai_http_client_pool().get(provider)
+
+
+async def close_ai_http_clients() -> None:
+    """關閉所有 provider client（lifespan shutdown 呼叫）。"""
+    if _client_pool is not None:
+        await _client_pool.aclose()
@@ -56,6 +56,16 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
+# get_current_user_from_token 建立 User 與主體快取所用的欄位
+_PRINCIPAL_FIELDS = (
+    "id", "email", "username", "full_name", "password_hash", "is_active",
+    "is_admin", "is_superuser", "google_id", "avatar_url", "auth_provider",
+    "last_login", "login_count", "permissions", "role", "created_at",
+    "updated_at", "email_verified",
+)
+# 不進主體快取的欄位：快取命中時為 None，需驗證密碼者應讀取 DB 當前值
+_UNCACHED_PRINCIPAL_FIELDS = frozenset({"password_hash"})
+
 # HTTP Bearer 認證
 security = HTTPBearer(auto_error=False)  # 不自動拋出錯誤，讓 get_current_user 處理
 
@@ -427,6 +437,8 @@ class AuthService:
             )
         )
         await db.commit()
+        from app.core.principal_cache import get_principal_cache
+        await get_principal_cache().invalidate_jti(token_jti)
         return result.rowcount > 0
     
     @staticmethod
@@ -499,6 +511,8 @@ class AuthService:
                     .values(is_active=False, revoked_at=datetime.utcnow())
                 )
                 await db.commit()
+                from app.core.principal_cache import get_principal_cache
+                await get_principal_cache().invalidate_user(replay_session.user_id)
             return None
 
         # 獲取相關聯的使用者
@@ -584,6 +598,15 @@ class AuthService:
         except (ValueError, TypeError):
             return None
         
+        # 主體快取：命中時不查 user_sessions / users（撤銷時由 invalidate_* 立即失效）
+        from app.core.principal_cache import get_principal_cache
+        cache = get_principal_cache()
+        now = datetime.utcnow()
+        cached = cache.get(jti, now=now)
+        if cached is not None and cached.user_id == user_id:
+            await AuthService._record_activity(db, jti, now)
+            return User(**cached.user_fields)
+
         # 檢查會話是否有效 - 使用 raw SQL 避免類型轉換問題
         from sqlalchemy import text
         session_result = await db.execute(
@@ -593,7 +616,7 @@ class AuthService:
                 AND is_active = true 
                 AND expires_at > :current_time
             """),
-            {"token_jti": jti, "current_time": datetime.utcnow()}
+            {"token_jti": jti, "current_time": now}
         )
         session_row = session_result.fetchone()
         
@@ -610,36 +633,34 @@ class AuthService:
         if not user_row:
             return None
         
-        # 手動創建 User 對象
-        user = User(
-            id=user_row.id,
-            email=user_row.email,
-            username=user_row.username,
-            full_name=user_row.full_name,
-            password_hash=user_row.password_hash,
-            is_active=user_row.is_active,
-            is_admin=user_row.is_admin,
-            is_superuser=user_row.is_superuser,
-            google_id=user_row.google_id,
-            avatar_url=user_row.avatar_url,
-            auth_provider=user_row.auth_provider,
-            last_login=user_row.last_login,
-            login_count=user_row.login_count,
-            permissions=user_row.permissions,
-            role=user_row.role,
-            created_at=user_row.created_at,
-            updated_at=user_row.updated_at,
-            email_verified=user_row.email_verified
+        # 手動創建 User 對象（欄位快照同時寫入主體快取）
+        user_fields = {field: getattr(user_row, field) for field in _PRINCIPAL_FIELDS}
+        cache.put(
+            jti, user_id,
+            {k: v for k, v in user_fields.items() if k not in _UNCACHED_PRINCIPAL_FIELDS},
+            session_row.expires_at,
         )
+        user = User(**user_fields)
         
-        # 更新最後活動時間 - 使用 raw SQL
+        await AuthService._record_activity(db, jti, now)
+
+        return user
+
+    @staticmethod
+    async def _record_activity(db: AsyncSession, jti: str, now: datetime) -> None:
+        """更新最後活動時間：寫回緩衝運作中則合併批次寫入，否則即時 UPDATE（CLI / 測試）"""
+        from app.core.principal_cache import get_activity_writer
+        writer = get_activity_writer()
+        if writer.running:
+            writer.touch(jti, now)
+            return
+
+        from sqlalchemy import text
         await db.execute(
             text("UPDATE user_sessions SET last_activity = :current_time WHERE token_jti = :token_jti"),
-            {"current_time": datetime.utcnow(), "token_jti": jti}
+            {"current_time": now, "token_jti": jti}
         )
         await db.commit()
-        
-        return user
     
     @staticmethod
     def check_permission(user: User, required_permission: str) -> bool:
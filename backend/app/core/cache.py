@@ -1,22 +1,32 @@
 """
 API 快取機制 - Phase 2 性能優化
 支持內存快取和 Redis 快取（可選）
+
+v2.0.0: 改為 app.core.unified_cache 的薄包裝（O(1) LRU、per-namespace 統計）
 """
 import hashlib
 import json
-import time
-from typing import Any, Optional, Dict
+from typing import Any, Iterable, Optional, Dict
 from functools import wraps
 import asyncio
 
+from app.core.unified_cache import CacheNamespace, get_cache_namespace
+
 class InMemoryCache:
-    """內存快取類"""
+    """內存快取類（app.core.unified_cache.CacheNamespace 的同步包裝）"""
     
-    def __init__(self, max_size: int = 1000, default_ttl: int = 300):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_size: int = 1000, default_ttl: int = 300, namespace: Optional[str] = None):
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self.access_times: Dict[str, float] = {}
+        if namespace:
+            self._ns = get_cache_namespace(namespace, max_size=max_size, default_ttl=default_ttl)
+        else:
+            self._ns = CacheNamespace("inmemory", max_size=max_size, default_ttl=default_ttl)
+    
+    @property
+    def cache(self) -> Dict[str, Any]:
+        """底層 key → (value, expires_at) 映射（唯讀用途）"""
+        return self._ns.local._data
     
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """生成快取鍵"""
@@ -28,105 +38,47 @@ class InMemoryCache:
         hash_object = hashlib.md5(key_string.encode())
         return f"{prefix}:{hash_object.hexdigest()}"
     
-    def _is_expired(self, cache_data: Dict[str, Any]) -> bool:
-        """檢查快取是否過期"""
-        if cache_data['ttl'] == -1:  # 永不過期
-            return False
-        return time.time() > cache_data['created_at'] + cache_data['ttl']
-    
-    def _cleanup_expired(self):
+    def _cleanup_expired(self) -> int:
         """清理過期的快取項目"""
-        current_time = time.time()
-        expired_keys = [
-            key for key, data in self.cache.items()
-            if self._is_expired(data)
-        ]
-        for key in expired_keys:
-            self.cache.pop(key, None)
-            self.access_times.pop(key, None)
-    
-    def _enforce_size_limit(self):
-        """強制執行大小限制（LRU 策略）"""
-        if len(self.cache) <= self.max_size:
-            return
-        
-        # 根據存取時間排序，移除最少使用的項目
-        sorted_keys = sorted(
-            self.access_times.keys(), 
-            key=lambda k: self.access_times[k]
-        )
-        
-        keys_to_remove = sorted_keys[:len(self.cache) - self.max_size]
-        for key in keys_to_remove:
-            self.cache.pop(key, None)
-            self.access_times.pop(key, None)
+        return self._ns.cleanup_expired()
     
     def get(self, key: str) -> Optional[Any]:
         """獲取快取值"""
-        if key not in self.cache:
-            return None
-        
-        cache_data = self.cache[key]
-        if self._is_expired(cache_data):
-            self.cache.pop(key, None)
-            self.access_times.pop(key, None)
-            return None
-        
-        # 更新存取時間
-        self.access_times[key] = time.time()
-        return cache_data['value']
+        return self._ns.get_local(key)
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """設置快取值"""
-        if ttl is None:
-            ttl = self.default_ttl
-        
-        cache_data = {
-            'value': value,
-            'created_at': time.time(),
-            'ttl': ttl
-        }
-        
-        self.cache[key] = cache_data
-        self.access_times[key] = time.time()
-        
-        # 清理過期項目和強制大小限制
-        if len(self.cache) % 100 == 0:  # 每 100 次插入清理一次
-            self._cleanup_expired()
-        
-        self._enforce_size_limit()
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """設置快取值（ttl=-1 永不過期；超出 max_size 時 O(1) 淘汰最久未用項目）"""
+        self._ns.set_local(key, value, ttl, tags)
     
     def delete(self, key: str) -> bool:
         """刪除快取項目"""
-        if key in self.cache:
-            self.cache.pop(key, None)
-            self.access_times.pop(key, None)
-            return True
-        return False
+        return self._ns.local.delete(key)
+    
+    def delete_prefix(self, prefix: str, pattern: Optional[str] = None) -> int:
+        """刪除 prefix 開頭（且含 pattern）的項目"""
+        return self._ns.local.delete_where(
+            lambda k: k.startswith(f"{prefix}:") and (pattern is None or pattern in k)
+        )
     
     def clear(self) -> None:
         """清空所有快取"""
-        self.cache.clear()
-        self.access_times.clear()
+        self._ns.local.clear()
     
     def stats(self) -> Dict[str, Any]:
         """獲取快取統計信息"""
-        current_time = time.time()
-        expired_count = sum(
-            1 for data in self.cache.values()
-            if self._is_expired(data)
-        )
+        expired_count = self._ns.local.expired_count()
+        metrics = self._ns.metrics
         
         return {
-            'total_items': len(self.cache),
+            'total_items': len(self._ns.local),
             'expired_items': expired_count,
-            'active_items': len(self.cache) - expired_count,
+            'active_items': len(self._ns.local) - expired_count,
             'max_size': self.max_size,
-            'hit_ratio': getattr(self, '_hit_count', 0) / max(getattr(self, '_total_requests', 1), 1)
+            'hit_ratio': metrics.hits / max(metrics.hits + metrics.misses, 1)
         }
 
 # 全局快取實例
-cache = InMemoryCache(max_size=2000, default_ttl=300)  # 5 分鐘預設TTL
+cache = InMemoryCache(max_size=2000, default_ttl=300, namespace="api")  # 5 分鐘預設TTL
 
 def cached(ttl: int = 300, prefix: str = "api"):
     """
@@ -142,18 +94,10 @@ def cached(ttl: int = 300, prefix: str = "api"):
             # 生成快取鍵
             cache_key = cache._generate_key(prefix, func.__name__, *args, **kwargs)
             
-            # 嘗試從快取獲取
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # 執行原函數
-            result = await func(*args, **kwargs)
-            
-            # 存儲到快取
-            cache.set(cache_key, result, ttl)
-            
-            return result
+            # 快取未命中時執行原函數；同 key 併發呼叫合併為一次
+            return await cache._ns.get_or_load(
+                cache_key, lambda: func(*args, **kwargs), ttl, tags=(prefix,)
+            )
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
@@ -169,7 +113,7 @@ def cached(ttl: int = 300, prefix: str = "api"):
             result = func(*args, **kwargs)
             
             # 存儲到快取
-            cache.set(cache_key, result, ttl)
+            cache.set(cache_key, result, ttl, tags=(prefix,))
             
             return result
         
@@ -192,14 +136,7 @@ def cache_invalidate(prefix: str = "api", pattern: str = None):
             result = await func(*args, **kwargs)
             
             # 清理相關快取
-            keys_to_delete = []
-            for key in cache.cache.keys():
-                if key.startswith(f"{prefix}:"):
-                    if pattern is None or pattern in key:
-                        keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                cache.delete(key)
+            cache.delete_prefix(prefix, pattern)
             
             return result
         
@@ -208,14 +145,7 @@ def cache_invalidate(prefix: str = "api", pattern: str = None):
             result = func(*args, **kwargs)
             
             # 清理相關快取
-            keys_to_delete = []
-            for key in cache.cache.keys():
-                if key.startswith(f"{prefix}:"):
-                    if pattern is None or pattern in key:
-                        keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                cache.delete(key)
+            cache.delete_prefix(prefix, pattern)
             
             return result
         
@@ -9,15 +9,31 @@ Redis Cache Decorator — Service 層快取裝飾器
 自動 key 生成: {prefix}:{func_name}:{args_hash}
 Redis 不可用時透明降級為直接查詢。
 
-Version: 1.0.0
+v2.0.0: 改為 app.core.unified_cache 的薄包裝 — 同 key 併發合併為一次查詢、
+Redis 寫入改為背景 write-behind，並支援標籤失效（invalidate_tags("dispatch", "project:42")）。
+
+v2.1.0: L1 記憶體快取改為 opt-in（local_ttl=...）。L1 失效只作用於執行失效的
+worker，其他 worker 最多延遲 local_ttl 秒才看到變更；預設只用 Redis，行為與 v1 相同。
+快取內容一律存 JSON 文字，每次呼叫（含首次）都回傳新解碼的物件，
+呼叫端修改回傳值不會污染快取，型別也不因命中與否而不同。
+
+Version: 2.1.0
 Created: 2026-03-26
 """
 
+import fnmatch
 import hashlib
 import json
 import logging
 from functools import wraps
-from typing import Optional
+from typing import Any, Optional
+
+from app.core.unified_cache import (  # noqa: F401 — invalidate_tags 供 service 層使用
+    CacheNamespace,
+    get_cache_namespace,
+    invalidate_tags,
+    resolve_tags,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -42,66 +58,52 @@ def _make_cache_key(prefix: str, func_name: str, args: tuple, kwargs: dict) -> s
     return f"cache:{prefix}:{func_name}:{h}"
 
 
-def redis_cache(prefix: str, ttl: int = DEFAULT_TTL):
+def _namespace(prefix: str, ttl: int = DEFAULT_TTL, local_ttl: Optional[int] = None) -> CacheNamespace:
+    """每個 prefix 一個 namespace：L2 Redis，local_ttl 有值時前面加 L1 記憶體（首次建立時決定）"""
+    return get_cache_namespace(
+        f"redis:{prefix}", default_ttl=ttl, redis_prefix=f"cache:{prefix}", local_ttl=local_ttl or 0,
+    )
+
+
+def redis_cache(prefix: str, ttl: int = DEFAULT_TTL, tags: Any = None, local_ttl: Optional[int] = None):
     """
     Redis 快取裝飾器 — 適用於 async service 方法
 
     Args:
-        prefix: 快取 key 前綴 (如 "dispatch", "stats")
+        prefix: 快取 key 前綴 (如 "dispatch", "stats")，同時作為失效標籤
         ttl: 快取存活時間 (秒)
+        tags: 額外標籤；字串序列或 callable(*args, **kwargs)
+        local_ttl: 啟用 L1 記憶體快取的 TTL 上限（秒）；其他 worker 的失效最多延遲此秒數。
+            None（預設）只用 Redis
     """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             cache_key = _make_cache_key(prefix, func.__name__, args, kwargs)
-
-            # 嘗試從 Redis 讀取
-            try:
-                from app.core.redis_client import get_redis
-                redis = await get_redis()
-                if redis:
-                    cached = await redis.get(cache_key)
-                    if cached:
-                        logger.debug("Cache HIT: %s", cache_key)
-                        return json.loads(cached)
-            except Exception:
-                pass  # Redis 不可用，降級
-
-            # 執行原始查詢
-            result = await func(*args, **kwargs)
-
-            # 寫入快取 (非阻塞)
-            try:
-                from app.core.redis_client import get_redis
-                redis = await get_redis()
-                if redis and result is not None:
-                    await redis.setex(
-                        cache_key, ttl,
-                        json.dumps(result, default=str, ensure_ascii=False),
-                    )
-                    logger.debug("Cache SET: %s (ttl=%ds)", cache_key, ttl)
-            except Exception:
-                pass  # 寫入失敗不影響回傳
-
-            return result
+            key = cache_key[len(f"cache:{prefix}:"):]
+            entry_tags = (prefix,) + resolve_tags(tags, args, kwargs)
+
+            async def load() -> Optional[str]:
+                result = await func(*args, **kwargs)
+                if result is None:
+                    return None
+                return json.dumps(result, default=str, ensure_ascii=False)
+
+            text = await _namespace(prefix, ttl, local_ttl).get_or_load(key, load, ttl, entry_tags)
+            # 快取 JSON 文字：每個呼叫端拿到獨立物件，首次與命中回傳型別一致
+            return None if text is None else json.loads(text)
         return wrapper
     return decorator
 
 
 async def invalidate_cache(prefix: str, pattern: str = "*") -> int:
-    """清除指定前綴的快取"""
-    try:
-        from app.core.redis_client import get_redis
-        redis = await get_redis()
-        if not redis:
-            return 0
-        keys = []
-        async for key in redis.scan_iter(f"cache:{prefix}:{pattern}"):
-            keys.append(key)
-        if keys:
-            await redis.delete(*keys)
-            logger.info("Cache invalidated: %s (%d keys)", prefix, len(keys))
-        return len(keys)
-    except Exception as e:
-        logger.debug("Cache invalidation failed: %s", e)
-        return 0
+    """清除指定前綴的快取（L1 + Redis）"""
+    ns = _namespace(prefix)
+    local = ns.local.delete_where(lambda k: fnmatch.fnmatchcase(k, pattern))
+    if ns.redis is None:
+        return local
+    await ns.flush()
+    count = await ns.redis.delete_pattern(pattern)
+    if count:
+        logger.info("Cache invalidated: %s (%d keys)", prefix, count)
+    return max(local, count)
@@ -1,119 +1,92 @@
 """
 API 快取管理器 - 使用記憶體快取
+
+v2.0.0: 改為 app.core.unified_cache 的薄包裝 — O(1) LRU、single-flight、
+以 prefix 為標籤（cache_result 的 clear_cache 真正生效）
 """
-import time
 import json
 import hashlib
-from typing import Any, Optional, Dict, Callable
+from typing import Any, Awaitable, Optional, Dict, Callable, Iterable
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import datetime
 import asyncio
 import logging
 
+from app.core.unified_cache import CacheNamespace, get_cache_namespace, get_cache_stats, resolve_tags
+
 logger = logging.getLogger(__name__)
 
 class MemoryCache:
-    """記憶體快取實現"""
+    """記憶體快取實現（app.core.unified_cache.CacheNamespace 的包裝）"""
 
-    def __init__(self, default_ttl: int = 300):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, default_ttl: int = 300, max_size: int = 5000, namespace: Optional[str] = None):
         self.default_ttl = default_ttl
-        self._lock = asyncio.Lock()
+        if namespace:
+            self._ns = get_cache_namespace(namespace, max_size=max_size, default_ttl=default_ttl)
+        else:
+            self._ns = CacheNamespace("memory", max_size=max_size, default_ttl=default_ttl)
 
     async def get(self, key: str) -> Optional[Any]:
         """獲取快取值"""
-        async with self._lock:
-            if key not in self.cache:
-                return None
-
-            cache_entry = self.cache[key]
+        return self._ns.get_local(key)
 
-            # 檢查是否過期
-            if time.time() > cache_entry['expires_at']:
-                del self.cache[key]
-                return None
-
-            cache_entry['last_accessed'] = time.time()
-            cache_entry['access_count'] += 1
-            return cache_entry['value']
-
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
         """設置快取值"""
-        if ttl is None:
-            ttl = self.default_ttl
-
-        async with self._lock:
-            self.cache[key] = {
-                'value': value,
-                'created_at': time.time(),
-                'expires_at': time.time() + ttl,
-                'last_accessed': time.time(),
-                'access_count': 1,
-                'ttl': ttl
-            }
+        self._ns.set_local(key, value, ttl, tags)
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None, tags: Iterable[str] = (),
+    ) -> Any:
+        """未命中時呼叫 loader 並寫回（同 key 併發合併為一次）"""
+        return await self._ns.get_or_load(key, loader, ttl, tags)
 
     async def delete(self, key: str) -> bool:
         """刪除快取項目"""
-        async with self._lock:
-            return self.cache.pop(key, None) is not None
+        return self._ns.local.delete(key)
 
     async def clear(self, pattern: Optional[str] = None) -> int:
-        """清空快取"""
-        async with self._lock:
-            if pattern is None:
-                count = len(self.cache)
-                self.cache.clear()
-                return count
-            else:
-                # 簡單的模式匹配
-                keys_to_delete = [key for key in self.cache.keys() if pattern in key]
-                for key in keys_to_delete:
-                    del self.cache[key]
-                return len(keys_to_delete)
+        """清空快取；pattern 可為標籤（如 "documents"）或 key 子字串"""
+        if pattern is None:
+            return self._ns.local.clear()
+        return (
+            self._ns.local.invalidate_tags((pattern,))
+            + self._ns.local.delete_where(lambda key: pattern in key)
+        )
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """依標籤失效"""
+        return self._ns.local.invalidate_tags(tags)
 
     async def cleanup_expired(self) -> int:
         """清理過期的快取項目"""
-        async with self._lock:
-            current_time = time.time()
-            expired_keys = [
-                key for key, entry in self.cache.items()
-                if current_time > entry['expires_at']
-            ]
-
-            for key in expired_keys:
-                del self.cache[key]
-
-            return len(expired_keys)
+        return self._ns.cleanup_expired()
 
     async def get_stats(self) -> Dict[str, Any]:
         """獲取快取統計"""
-        async with self._lock:
-            current_time = time.time()
-            total_entries = len(self.cache)
-            expired_entries = sum(
-                1 for entry in self.cache.values()
-                if current_time > entry['expires_at']
-            )
-
-            total_access = sum(entry['access_count'] for entry in self.cache.values())
+        total_entries = len(self._ns.local)
+        expired_entries = self._ns.local.expired_count()
+        metrics = self._ns.metrics
 
-            return {
-                'total_entries': total_entries,
-                'active_entries': total_entries - expired_entries,
-                'expired_entries': expired_entries,
-                'total_access_count': total_access,
-                'memory_usage_kb': self._estimate_memory_usage(),
-                'hit_rate': self._calculate_hit_rate()
-            }
+        return {
+            'total_entries': total_entries,
+            'active_entries': total_entries - expired_entries,
+            'expired_entries': expired_entries,
+            'total_access_count': metrics.hits + metrics.misses,
+            'memory_usage_kb': self._estimate_memory_usage(),
+            'hit_rate': self._calculate_hit_rate(),
+            'evictions': self._ns.local.evictions,
+            'coalesced': self._ns.flight.coalesced,
+            'avg_load_ms': metrics.to_dict()['avg_load_ms'],
+        }
 
     def _estimate_memory_usage(self) -> float:
         """估算記憶體使用量 (KB)"""
         try:
             import sys
             total_size = 0
-            for entry in self.cache.values():
-                total_size += sys.getsizeof(entry['value'])
-                total_size += sys.getsizeof(entry)
+            for value, _ in self._ns.local._data.values():
+                total_size += sys.getsizeof(value)
             return total_size / 1024
         except Exception as e:
             logger.debug(f"估算記憶體使用量失敗: {e}")
@@ -121,15 +94,12 @@ class MemoryCache:
 
     def _calculate_hit_rate(self) -> float:
         """計算命中率"""
-        if not hasattr(self, '_hit_count'):
-            self._hit_count = 0
-            self._miss_count = 0
-
-        total = self._hit_count + self._miss_count
-        return (self._hit_count / total * 100) if total > 0 else 0.0
+        metrics = self._ns.metrics
+        total = metrics.hits + metrics.misses
+        return (metrics.hits / total * 100) if total > 0 else 0.0
 
 # 全域快取實例
-cache = MemoryCache(default_ttl=300)  # 5分鐘默認過期時間
+cache = MemoryCache(default_ttl=300, namespace="service")  # 5分鐘默認過期時間
 
 def generate_cache_key(*args, prefix: str = "api", **kwargs) -> str:
     """生成快取鍵"""
@@ -150,45 +120,41 @@ def generate_cache_key(*args, prefix: str = "api", **kwargs) -> str:
     key_string = "|".join(key_parts)
     return hashlib.md5(key_string.encode()).hexdigest()
 
-def cache_result(ttl: int = 300, prefix: str = "api", key_generator: Optional[Callable] = None):
+def cache_result(
+    ttl: int = 300,
+    prefix: str = "api",
+    key_generator: Optional[Callable] = None,
+    tags: Any = None,
+):
     """
     API 結果快取裝飾器
 
     Args:
         ttl: 快取存活時間 (秒)
-        prefix: 快取鍵前綴
+        prefix: 快取鍵前綴（同時作為失效標籤）
         key_generator: 自定義鍵生成函數
+        tags: 額外標籤；可為字串序列或 callable(*args, **kwargs)（如 lambda pid: [f"project:{pid}"]）
     """
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # 生成快取鍵
-            if key_generator:
-                cache_key = key_generator(*args, **kwargs)
-            else:
-                cache_key = generate_cache_key(*args, prefix=f"{prefix}:{func.__name__}", **kwargs)
-
-            # 嘗試從快取獲取
-            cached_result = await cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit for key: {cache_key}")
-                return cached_result
+        func_tag = f"{prefix}:{func.__name__}"
 
-            # 執行原始函數
-            logger.debug(f"Cache miss for key: {cache_key}")
-            result = await func(*args, **kwargs)
-
-            # 儲存到快取
-            await cache.set(cache_key, result, ttl)
+        def make_key(*args, **kwargs) -> str:
+            if key_generator:
+                return key_generator(*args, **kwargs)
+            return generate_cache_key(*args, prefix=func_tag, **kwargs)
 
-            return result
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = make_key(*args, **kwargs)
+            entry_tags = (prefix, func_tag) + resolve_tags(tags, args, kwargs)
+            # 未命中時執行原始函數並寫回；同 key 併發呼叫合併為一次
+            return await cache.get_or_load(
+                cache_key, lambda: func(*args, **kwargs), ttl, entry_tags
+            )
 
         # 添加快取管理方法
-        wrapper.clear_cache = lambda pattern=None: cache.clear(pattern or f"{prefix}:{func.__name__}")
-        wrapper.cache_key = lambda *args, **kwargs: (
-            key_generator(*args, **kwargs) if key_generator
-            else generate_cache_key(*args, prefix=f"{prefix}:{func.__name__}", **kwargs)
-        )
+        wrapper.clear_cache = lambda pattern=None: cache.clear(pattern or func_tag)
+        wrapper.cache_key = make_key
 
         return wrapper
     return decorator
@@ -242,6 +208,7 @@ async def get_cache_statistics() -> Dict[str, Any]:
     stats.update({
         'cache_type': 'memory',
         'default_ttl': cache.default_ttl,
+        'namespaces': get_cache_stats(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -11,16 +11,17 @@ CSRF (Cross-Site Request Forgery) 防護模組
 - /api/auth/login 和 /api/auth/google 豁免（登入時尚無 CSRF token）
 - /health 等公開端點豁免
 
-@version 1.0.0
-@date 2026-02-07
+檢查本身為 csrf_rejection()，由 app.core.http_pipeline 在單一 ASGI pass 中執行。
+
+@version 1.1.0
+@date 2026-10-16
 """
 
 import secrets
 import logging
 from typing import Optional, Set
 
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from fastapi import Request, status
 from starlette.responses import Response, JSONResponse
 
 logger = logging.getLogger(__name__)
@@ -172,72 +173,72 @@ def _is_path_exempt(path: str) -> bool:
     return False
 
 
-class CSRFMiddleware(BaseHTTPMiddleware):
-    """
-    CSRF 防護中間件
-
-    使用 Double Submit Cookie 模式：
-    比較 cookie 中的 csrf_token 與 request header X-CSRF-Token
+def csrf_rejection(request: Request) -> Optional[Response]:
     """
+    CSRF 檢查（Double Submit Cookie）
 
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        # 安全方法豁免
-        if request.method.upper() in SAFE_METHODS:
-            return await call_next(request)
-
-        # 豁免路徑
-        if _is_path_exempt(request.url.path):
-            return await call_next(request)
-
-        # AUTH_DISABLED 模式豁免 CSRF（無真實認證 session，CSRF 防護無意義）
-        from app.core.config import settings
-        if settings.AUTH_DISABLED:
-            return await call_next(request)
-
-        # 檢查是否有 cookie 中的 CSRF token
-        cookie_csrf = request.cookies.get("csrf_token")
-        access_token_cookie = request.cookies.get("access_token")
-
-        # F16 (2026-05-04 事故修復)：在 middleware 內 raise HTTPException 會被
-        # starlette TaskGroup 包成 500（不會被 FastAPI exception handler 接到），
-        # 故此處改為直接 return JSONResponse(403)。
-        if not cookie_csrf:
-            if access_token_cookie:
-                logger.warning(
-                    f"[CSRF] Cookie 認證缺少 csrf_token: "
-                    f"method={request.method} path={request.url.path}"
-                )
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={"detail": "CSRF 驗證失敗：缺少 csrf_token cookie"},
-                )
-            # 純 Authorization header 認證（無 cookie）= 豁免 CSRF
-            return await call_next(request)
-
-        # 取得 header 中的 CSRF token
-        header_csrf = request.headers.get("X-CSRF-Token")
-
-        if not header_csrf:
-            logger.warning(
-                f"[CSRF] 缺少 X-CSRF-Token header: "
-                f"method={request.method} path={request.url.path}"
-            )
-            return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "CSRF 驗證失敗：缺少 X-CSRF-Token header"},
-            )
+    比較 cookie 中的 csrf_token 與 request header X-CSRF-Token。
+    由 app.core.http_pipeline.HTTPPipelineMiddleware 於請求階段呼叫
+    （原 CSRFMiddleware(BaseHTTPMiddleware)，2026-10-16 併入單一 ASGI pipeline）。
 
-        # 比較 cookie 和 header 中的 CSRF token
-        if not secrets.compare_digest(cookie_csrf, header_csrf):
+    Returns:
+        None 表示通過；否則為應直接回傳的 403 回應
+    """
+    # 安全方法豁免
+    if request.method.upper() in SAFE_METHODS:
+        return None
+
+    # 豁免路徑
+    if _is_path_exempt(request.url.path):
+        return None
+
+    # AUTH_DISABLED 模式豁免 CSRF（無真實認證 session，CSRF 防護無意義）
+    from app.core.config import settings
+    if settings.AUTH_DISABLED:
+        return None
+
+    # 檢查是否有 cookie 中的 CSRF token
+    cookie_csrf = request.cookies.get("csrf_token")
+    access_token_cookie = request.cookies.get("access_token")
+
+    # F16 (2026-05-04 事故修復)：在 middleware 內 raise HTTPException 會被
+    # starlette TaskGroup 包成 500（不會被 FastAPI exception handler 接到），
+    # 故此處改為直接回傳 JSONResponse(403)。
+    if not cookie_csrf:
+        if access_token_cookie:
             logger.warning(
-                f"[CSRF] Token 不匹配: "
+                f"[CSRF] Cookie 認證缺少 csrf_token: "
                 f"method={request.method} path={request.url.path}"
             )
             return JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "CSRF 驗證失敗：token 不匹配"},
+                content={"detail": "CSRF 驗證失敗：缺少 csrf_token cookie"},
             )
-
-        return await call_next(request)
+        # 純 Authorization header 認證（無 cookie）= 豁免 CSRF
+        return None
+
+    # 取得 header 中的 CSRF token
+    header_csrf = request.headers.get("X-CSRF-Token")
+
+    if not header_csrf:
+        logger.warning(
+            f"[CSRF] 缺少 X-CSRF-Token header: "
+            f"method={request.method} path={request.url.path}"
+        )
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={"detail": "CSRF 驗證失敗：缺少 X-CSRF-Token header"},
+        )
+
+    # 比較 cookie 和 header 中的 CSRF token
+    if not secrets.compare_digest(cookie_csrf, header_csrf):
+        logger.warning(
+            f"[CSRF] Token 不匹配: "
+            f"method={request.method} path={request.url.path}"
+        )
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={"detail": "CSRF 驗證失敗：token 不匹配"},
+        )
+
+    return None
@@ -4,6 +4,7 @@ DB Query Event Listener — SQLAlchemy → Prometheus
 
 掛接 SQLAlchemy before/after_cursor_execute 事件，
 自動追蹤每條 SQL 查詢的延遲並匯出到 Prometheus。
+同時交給 db_query_profiler 依 fingerprint / 路由彙總（熱點語句、N+1 偵測）。
 
 Usage:
     from app.core.db_query_listener import setup_query_listener
@@ -41,6 +42,9 @@ def setup_query_listener(engine) -> None:
     """掛接 SQLAlchemy event listener 追蹤查詢延遲。"""
     from sqlalchemy import event
 
+    from app.core.db_query_profiler import get_query_profiler
+    profiler = get_query_profiler()
+
     @event.listens_for(engine.sync_engine, "before_cursor_execute")
     def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
         conn.info.setdefault("query_start_time", []).append(time.perf_counter())
@@ -57,5 +61,10 @@ def setup_query_listener(engine) -> None:
                 get_query_metrics().record(operation=operation, duration_ms=duration_ms)
             except Exception:
                 pass  # metrics 不應中斷查詢
+            if profiler.enabled:
+                try:
+                    profiler.record(statement, duration_ms)
+                except Exception:
+                    pass
 
-    logger.info("DB query duration listener attached")
+    logger.info("DB query duration listener attached (fingerprint profiler=%s)", profiler.enabled)
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+SQL Fingerprint Profiler — 每條語句 / 每個路由的查詢熱點與 N+1 偵測
+
+db_query_listener 原本只依 operation（select/insert/...）記延遲 histogram，
+看不出「哪一條」慢或重複。本模組：
+
+- 把語句正規化成 fingerprint（去除字串 / 數字字面值、綁定參數、IN 清單長度、註解）
+- 依 fingerprint 彙總 count / total / max / p95（取樣 reservoir），並記錄來自哪些路由
+- QueryProfilerMiddleware 以 contextvar 收集單一請求內的查詢；請求結束時依路由樣板
+  （與 PrometheusMiddleware 同一套 _route_template）歸戶，同一 fingerprint 在一次
+  請求內執行超過 DB_N_PLUS_ONE_THRESHOLD（預設 10）次即記為 N+1
+- 請求外（排程 / 背景任務）的查詢歸在 "<background>"
+
+fingerprint 數上限 DB_PROFILER_MAX_FINGERPRINTS（預設 2000），超過的新語句只計入
+overflow，Prometheus label 基數因此有界（label 用 fingerprint 的 12 碼 hash，
+完整語句由 /api/system/db-query-profile 查）。DB_QUERY_PROFILER_ENABLED=false 關閉。
+
+Metrics:
+- db_query_fingerprint_calls_total{fingerprint}
+- db_query_fingerprint_seconds_total{fingerprint}
+- db_request_queries{route} (Histogram): 每請求查詢數
+- db_n_plus_one_total{route}
+
+@version 1.0.0
+@date 2026-10-16
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_ROUTE = "<background>"
+_SAMPLE_SIZE = 256
+_MAX_ROUTES_PER_FINGERPRINT = 50
+
+# ---------------------------------------------------------------------------
+# Fingerprint
+# ---------------------------------------------------------------------------
+
+_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """正規化 SQL：字面值 / 參數 → ?，IN (?, ?, ...) → (?+)，多列 VALUES 收斂為一列"""
+    sql = _COMMENT.sub(" ", statement)
+    sql = _STRING.sub("?", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?+)", sql)
+    sql = _VALUES_LIST.sub(r"\1, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint_id(fp: str) -> str:
+    return hashlib.sha1(fp.encode("utf-8")).hexdigest()[:12]
+
+
+# ---------------------------------------------------------------------------
+# 彙總
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _FingerprintStats:
+    fingerprint: str
+    fid: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    samples: List[float] = field(default_factory=list)
+    routes: Dict[str, List[float]] = field(default_factory=dict)  # route -> [count, total_ms]
+
+    def add(self, duration_ms: float) -> None:
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+        # reservoir sampling：樣本數固定，p95 近似全體分布
+        if len(self.samples) < _SAMPLE_SIZE:
+            self.samples.append(duration_ms)
+        else:
+            idx = random.randrange(self.count)
+            if idx < _SAMPLE_SIZE:
+                self.samples[idx] = duration_ms
+
+    def add_route(self, route: str, count: int, total_ms: float) -> None:
+        entry = self.routes.get(route)
+        if entry is None:
+            if len(self.routes) >= _MAX_ROUTES_PER_FINGERPRINT:
+                route = "<other>"
+                entry = self.routes.setdefault(route, [0, 0.0])
+            else:
+                entry = self.routes[route] = [0, 0.0]
+        entry[0] += count
+        entry[1] += total_ms
+
+    def p95(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        top_routes = sorted(self.routes.items(), key=lambda kv: kv[1][1], reverse=True)[:10]
+        return {
+            "id": self.fid,
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p95_ms": round(self.p95(), 2),
+            "max_ms": round(self.max_ms, 2),
+            "routes": [
+                {"route": r, "count": int(c), "total_ms": round(t, 1)} for r, (c, t) in top_routes
+            ],
+        }
+
+
+@dataclass
+class _RequestQueries:
+    """單一請求內的查詢（fingerprint → [count, total_ms]）"""
+
+    queries: Dict[str, List[float]] = field(default_factory=dict)
+
+
+_current_request: ContextVar[Optional[_RequestQueries]] = ContextVar("db_profiler_request", default=None)
+
+
+class QueryProfilerMetrics:
+    """SQL fingerprint profiler Prometheus 指標。"""
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        reg = registry or REGISTRY
+        self.calls = Counter(
+            "db_query_fingerprint_calls_total",
+            "SQL executions per statement fingerprint",
+            ["fingerprint"],
+            registry=reg,
+        )
+        self.seconds = Counter(
+            "db_query_fingerprint_seconds_total",
+            "Total SQL execution time per statement fingerprint",
+            ["fingerprint"],
+            registry=reg,
+        )
+        self.request_queries = Histogram(
+            "db_request_queries",
+            "SQL statements executed per HTTP request",
+            ["route"],
+            buckets=[1, 2, 5, 10, 20, 50, 100, 250, 500],
+            registry=reg,
+        )
+        self.n_plus_one = Counter(
+            "db_n_plus_one_total",
+            "Requests where one fingerprint ran more than the N+1 threshold",
+            ["route"],
+            registry=reg,
+        )
+
+
+class QueryProfiler:
+    """行程內 SQL fingerprint 彙總器"""
+
+    def __init__(
+        self,
+        metrics: Optional[QueryProfilerMetrics] = None,
+        max_fingerprints: Optional[int] = None,
+        n_plus_one_threshold: Optional[int] = None,
+    ):
+        self.enabled = os.getenv("DB_QUERY_PROFILER_ENABLED", "true").lower() != "false"
+        self.max_fingerprints = max_fingerprints or int(os.getenv("DB_PROFILER_MAX_FINGERPRINTS", "2000"))
+        self.n_plus_one_threshold = n_plus_one_threshold or int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "10"))
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _FingerprintStats] = {}
+        self._n_plus_one: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._recent_n_plus_one: deque = deque(maxlen=100)
+        self.overflow = 0
+        self.started_at = time.time()
+
+    @property
+    def metrics(self) -> QueryProfilerMetrics:
+        if self._metrics is None:
+            self._metrics = QueryProfilerMetrics()
+        return self._metrics
+
+    def record(self, statement: str, duration_ms: float) -> None:
+        """after_cursor_execute 呼叫：全域彙總 + 歸入目前請求"""
+        fp = fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(fp)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    self.overflow += 1
+                    return
+                stats = self._stats[fp] = _FingerprintStats(fp, fingerprint_id(fp))
+            stats.add(duration_ms)
+        self.metrics.calls.labels(fingerprint=stats.fid).inc()
+        self.metrics.seconds.labels(fingerprint=stats.fid).inc(duration_ms / 1000.0)
+
+        request = _current_request.get()
+        if request is None:
+            with self._lock:
+                stats.add_route(BACKGROUND_ROUTE, 1, duration_ms)
+            return
+        entry = request.queries.get(fp)
+        if entry is None:
+            request.queries[fp] = [1, duration_ms]
+        else:
+            entry[0] += 1
+            entry[1] += duration_ms
+
+    def begin_request(self) -> Any:
+        return _current_request.set(_RequestQueries())
+
+    def end_request(self, token: Any, route: str, method: str = "") -> None:
+        request = _current_request.get()
+        _current_request.reset(token)
+        if request is None:
+            return
+        label = f"{method} {route}".strip()
+        total = 0
+        with self._lock:
+            for fp, (count, total_ms) in request.queries.items():
+                total += int(count)
+                stats = self._stats.get(fp)
+                if stats is None:
+                    continue
+                stats.add_route(label, int(count), total_ms)
+                if count > self.n_plus_one_threshold:
+                    self._flag_n_plus_one(label, stats, int(count), total_ms)
+        if total:
+            self.metrics.request_queries.labels(route=label).observe(total)
+
+    def _flag_n_plus_one(self, route: str, stats: _FingerprintStats, count: int, total_ms: float) -> None:
+        key = (route, stats.fid)
+        entry = self._n_plus_one.get(key)
+        if entry is None:
+            entry = self._n_plus_one[key] = {
+                "route": route,
+                "id": stats.fid,
+                "fingerprint": stats.fingerprint,
+                "occurrences": 0,
+                "max_per_request": 0,
+            }
+            logger.warning(
+                "[N+1] %s 單次請求執行同一語句 %d 次 (%.0fms): %s",
+                route, count, total_ms, stats.fingerprint[:200],
+            )
+        entry["occurrences"] += 1
+        entry["max_per_request"] = max(entry["max_per_request"], count)
+        entry["last_seen"] = time.time()
+        self._recent_n_plus_one.append({"route": route, "id": stats.fid, "count": count, "ts": time.time()})
+        self.metrics.n_plus_one.labels(route=route).inc()
+
+    def top(self, limit: int = 20, sort_by: str = "total_ms", route: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [s.to_dict() for s in self._stats.values()
+                    if route is None or any(r.endswith(route) for r in s.routes)]
+        key = sort_by if sort_by in ("total_ms", "count", "p95_ms", "mean_ms", "max_ms") else "total_ms"
+        rows.sort(key=lambda r: r[key], reverse=True)
+        return rows[:limit]
+
+    def n_plus_one_report(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [dict(v) for v in self._n_plus_one.values()]
+        rows.sort(key=lambda r: (r["occurrences"], r["max_per_request"]), reverse=True)
+        return rows[:limit]
+
+    def snapshot(self, limit: int = 20, sort_by: str = "total_ms", route: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "since": self.started_at,
+            "fingerprints": len(self._stats),
+            "overflow": self.overflow,
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "top": self.top(limit, sort_by, route),
+            "n_plus_one": self.n_plus_one_report(limit),
+            "recent_n_plus_one": list(self._recent_n_plus_one)[-limit:],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._n_plus_one.clear()
+            self._recent_n_plus_one.clear()
+            self.overflow = 0
+            self.started_at = time.time()
+
+
+_profiler: Optional[QueryProfiler] = None
+
+
+def get_query_profiler() -> QueryProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = QueryProfiler()
+    return _profiler
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware：為每個 HTTP 請求建立查詢收集 context，結束時依路由樣板歸戶"""
+
+    def __init__(self, app: ASGIApp, profiler: Optional[QueryProfiler] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        profiler = self.profiler or get_query_profiler()
+        if scope["type"] != "http" or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        token = profiler.begin_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            from app.core.prometheus_middleware import _route_template
+
+            try:
+                route = _route_template(scope, scope.get("path", ""))
+                profiler.end_request(token, route, scope.get("method", ""))
+            except Exception as e:
+                logger.debug("query profiler flush failed: %s", e)
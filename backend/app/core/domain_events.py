@@ -7,6 +7,7 @@ Defines business events that flow across module boundaries:
 - BillingPaid: 收款確認 → 帳本入帳
 - TenderAwarded: 標案決標
 - DocumentReceived: 公文收文
+- GraphRelationsChanged: 知識圖譜關係增刪（CSR 遍歷快照增量更新）
 """
 import logging
 from dataclasses import dataclass, field, asdict
@@ -29,6 +30,7 @@ class EventType(str, Enum):
     EXPENSE_LARGE_APPROVED = "expense.large_approved"
     MILESTONE_COMPLETED = "milestone.completed"
     EVOLUTION_COMPLETED = "agent.evolution_completed"
+    GRAPH_RELATIONS_CHANGED = "graph.relations_changed"
 
 
 @dataclass
@@ -142,3 +144,20 @@ def expense_large_approved(
             **extra,
         },
     )
+
+
+def graph_relations_changed(
+    added: list, removed: list | None = None, **extra
+) -> DomainEvent:
+    """added/removed 為 [source_entity_id, target_entity_id, relation_label] 三元組清單。
+
+    added 項目可附第 4、5 欄 source / target 的 graph_domain（供 CSR 引擎收新節點）。
+    """
+    return DomainEvent(
+        event_type=EventType.GRAPH_RELATIONS_CHANGED,
+        payload={
+            "added": added,
+            "removed": removed or [],
+            **extra,
+        },
+    )
@@ -1,12 +1,42 @@
-"""Event Bus — In-process async event bus with optional Redis pub/sub.
+"""Event Bus — In-process async event bus with durable Redis Streams transport.
 
 Usage:
     bus = EventBus.get_instance()
     bus.subscribe(EventType.CASE_CREATED, handle_case_created)
     await bus.publish(case_created("CK2026_PM_01_001", "測量案", 2026))
+
+Dispatch modes (EVENT_BUS_DISPATCH):
+- queued (default): publish only enqueues. Each handler owns a bounded
+  asyncio.Queue drained by its own worker tasks, so a slow handler
+  (e.g. erp_graph_event_handler) no longer adds to the publishing request's
+  latency, and handlers run concurrently with each other. Each handler sees
+  events in publish order unless EVENT_BUS_HANDLER_CONCURRENCY > 1.
+  A full queue makes publish wait up to EVENT_BUS_PUT_TIMEOUT seconds
+  (backpressure), then the event is dropped for that handler and counted. Failed handlers are retried
+  with exponential backoff (EVENT_BUS_MAX_RETRIES).
+- inline: the v1 behaviour — await every handler sequentially in publish.
+
+Cross-process (opt-in, EVENT_BUS_STREAM_ENABLED=true): every event is appended
+to the Redis stream ``events:stream`` (XADD, approximate MAXLEN). Other processes
+consume it with ``EventStreamConsumer`` (consumer groups + XACK, pending entries
+reclaimed). Off by default: no process in this app runs a consumer yet, so the
+XADD would be an extra Redis write per event that nothing reads. Enable it
+together with the process that starts a consumer.
+
+Metrics:
+- event_bus_queue_depth{handler} (Gauge)
+- event_bus_handler_duration_seconds{handler,event_type} (Histogram)
+- event_bus_handler_failures_total{handler} (Counter, after retries exhausted)
+- event_bus_handler_retries_total{handler} (Counter)
+- event_bus_events_dropped_total{handler} (Counter)
 """
+import asyncio
 import logging
-from typing import Callable, Awaitable, Dict, List
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY
 
 from app.core.domain_events import DomainEvent, EventType
 
@@ -15,9 +45,154 @@ logger = logging.getLogger(__name__)
 # Type alias for event handlers
 EventHandler = Callable[[DomainEvent], Awaitable[None]]
 
+DISPATCH_QUEUED = "queued"
+DISPATCH_INLINE = "inline"
+
+STREAM_KEY = "events:stream"
+
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+def _env_float(key: str, default: float) -> float:
+    try:
+        return float(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+def _handler_name(handler: EventHandler) -> str:
+    return getattr(handler, "__qualname__", None) or getattr(handler, "__name__", repr(handler))
+
+
+class EventBusMetrics:
+    """EventBus Prometheus metrics."""
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        reg = registry or REGISTRY
+        self.queue_depth = Gauge(
+            "event_bus_queue_depth",
+            "Events waiting in each handler queue",
+            ["handler"],
+            registry=reg,
+        )
+        self.handler_duration = Histogram(
+            "event_bus_handler_duration_seconds",
+            "Event handler execution time (per attempt)",
+            ["handler", "event_type"],
+            buckets=[0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0, 60.0],
+            registry=reg,
+        )
+        self.failures = Counter(
+            "event_bus_handler_failures_total",
+            "Events whose handler still failed after all retries",
+            ["handler"],
+            registry=reg,
+        )
+        self.retries = Counter(
+            "event_bus_handler_retries_total",
+            "Event handler retry attempts",
+            ["handler"],
+            registry=reg,
+        )
+        self.dropped = Counter(
+            "event_bus_events_dropped_total",
+            "Events dropped because a handler queue stayed full",
+            ["handler"],
+            registry=reg,
+        )
+
+
+_bus_metrics: Optional[EventBusMetrics] = None
+
+
+def get_event_bus_metrics() -> EventBusMetrics:
+    global _bus_metrics
+    if _bus_metrics is None:
+        _bus_metrics = EventBusMetrics()
+    return _bus_metrics
+
+
+class _HandlerQueue:
+    """One handler's bounded queue plus its worker tasks."""
+
+    def __init__(
+        self,
+        handler: EventHandler,
+        metrics: EventBusMetrics,
+        maxsize: int,
+        concurrency: int,
+        max_retries: int,
+        retry_backoff: float,
+    ):
+        self.handler = handler
+        self.name = _handler_name(handler)
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.workers = [
+            asyncio.create_task(self._work(), name=f"event_bus:{self.name}:{i}")
+            for i in range(max(1, concurrency))
+        ]
+
+    def _update_depth(self) -> None:
+        self.metrics.queue_depth.labels(handler=self.name).set(self.queue.qsize())
+
+    async def put(self, event: DomainEvent, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.queue.put(event), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.metrics.dropped.labels(handler=self.name).inc()
+            logger.error(
+                "Event queue for %s full (%d), dropped %s",
+                self.name, self.queue.maxsize, event.event_type.value,
+            )
+            return False
+        self._update_depth()
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            event = await self.queue.get()
+            try:
+                await self._handle(event)
+            finally:
+                self.queue.task_done()
+                self._update_depth()
+
+    async def _handle(self, event: DomainEvent) -> None:
+        labels = {"handler": self.name, "event_type": event.event_type.value}
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                await self.handler(event)
+                self.metrics.handler_duration.labels(**labels).observe(time.perf_counter() - started)
+                return
+            except Exception as e:
+                self.metrics.handler_duration.labels(**labels).observe(time.perf_counter() - started)
+                if attempt < self.max_retries:
+                    self.metrics.retries.labels(handler=self.name).inc()
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                    continue
+                self.metrics.failures.labels(handler=self.name).inc()
+                logger.error(
+                    "Event handler %s failed for %s after %d attempts: %s",
+                    self.name, event.event_type.value, attempt + 1, e,
+                )
+
+    async def close(self) -> None:
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
 
 class EventBus:
-    """In-process async event bus with optional Redis pub/sub for cross-process."""
+    """In-process async event bus with Redis Streams for cross-process."""
 
     _instance = None
     _handlers: Dict[EventType, List[EventHandler]] = {}
@@ -29,42 +204,201 @@ class EventBus:
             cls._instance._handlers = {}
         return cls._instance
 
+    def __init__(self, metrics: Optional[EventBusMetrics] = None):
+        self._handlers = {}
+        self.dispatch_mode = os.getenv("EVENT_BUS_DISPATCH", DISPATCH_QUEUED).strip().lower()
+        self.queue_size = max(1, _env_int("EVENT_BUS_QUEUE_SIZE", 1000))
+        self.handler_concurrency = max(1, _env_int("EVENT_BUS_HANDLER_CONCURRENCY", 1))
+        self.max_retries = max(0, _env_int("EVENT_BUS_MAX_RETRIES", 2))
+        self.retry_backoff = _env_float("EVENT_BUS_RETRY_BACKOFF", 0.5)
+        self.put_timeout = _env_float("EVENT_BUS_PUT_TIMEOUT", 1.0)
+        self.stream_enabled = os.getenv("EVENT_BUS_STREAM_ENABLED", "false").lower() == "true"
+        self.stream_maxlen = _env_int("EVENT_BUS_STREAM_MAXLEN", 10000)
+        self._metrics = metrics
+        self._queues: Dict[EventHandler, _HandlerQueue] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def metrics(self) -> EventBusMetrics:
+        if self._metrics is None:
+            self._metrics = get_event_bus_metrics()
+        return self._metrics
+
     def subscribe(self, event_type: EventType, handler: EventHandler) -> None:
         if event_type not in self._handlers:
             self._handlers[event_type] = []
         self._handlers[event_type].append(handler)
-        logger.debug("Subscribed %s to %s", handler.__name__, event_type.value)
+        logger.debug("Subscribed %s to %s", _handler_name(handler), event_type.value)
 
     async def publish(self, event: DomainEvent) -> None:
-        """Publish event to in-process handlers + optionally Redis."""
+        """Dispatch event to in-process handlers (+ append to the Redis stream when enabled)."""
         handlers = self._handlers.get(event.event_type, [])
         logger.info(
-            "Publishing %s to %d handlers", event.event_type.value, len(handlers)
+            "Publishing %s to %d handlers (%s)",
+            event.event_type.value, len(handlers), self.dispatch_mode,
         )
 
-        # In-process handlers (fire-and-forget with error isolation)
+        if self.dispatch_mode == DISPATCH_INLINE:
+            await self._dispatch_inline(event, handlers)
+        else:
+            for handler in handlers:
+                await self._get_queue(handler).put(event, self.put_timeout)
+
+        if self.stream_enabled:
+            await self._append_to_stream(event)
+
+    async def _dispatch_inline(self, event: DomainEvent, handlers: List[EventHandler]) -> None:
         for handler in handlers:
             try:
                 await handler(event)
             except Exception as e:
                 logger.error(
                     "Event handler %s failed for %s: %s",
-                    handler.__name__,
+                    _handler_name(handler),
                     event.event_type.value,
                     e,
                 )
 
-        # Optional: Redis pub/sub for cross-process
+    def _get_queue(self, handler: EventHandler) -> _HandlerQueue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and workers are bound to the loop; rebuild after a loop change (tests / reload)
+            self._queues.clear()
+            self._loop = loop
+        queue = self._queues.get(handler)
+        if queue is None:
+            queue = _HandlerQueue(
+                handler,
+                self.metrics,
+                maxsize=self.queue_size,
+                concurrency=self.handler_concurrency,
+                max_retries=self.max_retries,
+                retry_backoff=self.retry_backoff,
+            )
+            self._queues[handler] = queue
+        return queue
+
+    async def _append_to_stream(self, event: DomainEvent) -> None:
         try:
             from app.core.redis_client import get_redis
 
             redis = await get_redis()
             if redis:
-                channel = f"events:{event.event_type.value}"
-                await redis.publish(channel, event.to_json())
+                await redis.xadd(
+                    STREAM_KEY,
+                    {"event_type": event.event_type.value, "data": event.to_json()},
+                    maxlen=self.stream_maxlen,
+                    approximate=True,
+                )
         except Exception as e:
-            logger.debug("Redis event publish skipped: %s", e)
+            logger.debug("Redis event stream append skipped: %s", e)
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {q.name: q.queue.qsize() for q in self._queues.values()}
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued event has been handled; False on timeout."""
+        pending = [q.queue.join() for q in self._queues.values()]
+        if not pending:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*pending), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """Drain queues then stop workers (lifespan shutdown)."""
+        if not await self.drain(timeout):
+            logger.warning("EventBus shutdown: undelivered events %s", self.queue_depths())
+        queues = list(self._queues.values())
+        self._queues.clear()
+        for queue in queues:
+            await queue.close()
 
     def clear(self) -> None:
         """Clear all handlers (for testing)."""
         self._handlers.clear()
+
+
+class EventStreamConsumer:
+    """Consume ``events:stream`` through a Redis consumer group.
+
+    Each group receives every event once; consumers within a group share the
+    load. Entries are XACKed only after the handler succeeds; entries left
+    pending longer than ``claim_idle_ms`` (crashed consumer) are reclaimed.
+    """
+
+    def __init__(
+        self,
+        redis: Any,
+        group: str,
+        consumer: str,
+        handler: EventHandler,
+        batch_size: int = 50,
+        block_ms: int = 5000,
+        claim_idle_ms: int = 60000,
+    ):
+        self.redis = redis
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self._stopped = False
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(STREAM_KEY, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _handle_entries(self, entries: List[Any]) -> int:
+        handled = 0
+        for entry_id, fields in entries:
+            data = fields.get("data") or fields.get(b"data")
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            try:
+                await self.handler(DomainEvent.from_json(data))
+            except Exception as e:
+                logger.error("Stream consumer %s/%s failed on %s: %s", self.group, self.consumer, entry_id, e)
+                continue  # stays pending → reclaimed later
+            await self.redis.xack(STREAM_KEY, self.group, entry_id)
+            handled += 1
+        return handled
+
+    async def reclaim(self) -> int:
+        result = await self.redis.xautoclaim(
+            STREAM_KEY, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.batch_size,
+        )
+        entries = result[1] if result else []
+        return await self._handle_entries(entries)
+
+    async def poll_once(self) -> int:
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {STREAM_KEY: ">"},
+            count=self.batch_size, block=self.block_ms,
+        )
+        handled = 0
+        for _stream, entries in response or []:
+            handled += await self._handle_entries(entries)
+        return handled
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        while not self._stopped:
+            try:
+                await self.reclaim()
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Stream consumer %s error: %s", self.group, e)
+                await asyncio.sleep(1)
+
+    def stop(self) -> None:
+        self._stopped = True
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP Pipeline Middleware - 單一 pure-ASGI 請求管線
+
+取代原本疊在 main.py 的六層 BaseHTTPMiddleware（LoggingMiddleware、
+SecurityHeadersMiddleware、CSRFMiddleware、TunnelGuardMiddleware、
+ApiDocsGuardMiddleware、@app.middleware("http") add_performance_headers）。
+每層 BaseHTTPMiddleware 都會為請求多開一個 task、把回應包成 memory stream
+再轉送，逐層疊加開銷；此處改為一次 pass：
+
+1. 請求階段依序執行 guards（API 文件 → Tunnel → CSRF），任一回傳 Response 即短路
+2. http.response.start 時注入安全標頭與 X-Process-Time（覆蓋同名標頭）
+3. 請求結束記 REQUEST_END / REQUEST_ERROR（RequestLogger）
+
+回應 body 原樣轉送、不做任何緩衝 —— SSE（text/event-stream）逐 chunk 到達 client；
+內層 GZipMiddleware 依 content-type 略過 text/event-stream
+（見 tests/unit/test_http_pipeline.py 回歸測試）。
+
+Usage:
+    from app.core.http_pipeline import HTTPPipelineMiddleware
+    app.add_middleware(
+        HTTPPipelineMiddleware,
+        response_headers=build_security_headers(...),
+        request_logger=RequestLogger(log_manager),
+    )
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.csrf import csrf_rejection
+from app.core.logging_manager import RequestLogger
+from app.core.tunnel_guard import api_docs_rejection, tunnel_rejection
+
+# guard：回傳 None 表示放行，回傳 Response 表示直接以該回應結束請求
+Guard = Callable[[Request], Optional[Response]]
+
+# 順序與原 middleware 疊加順序相同（外 → 內）
+DEFAULT_GUARDS: Tuple[Guard, ...] = (api_docs_rejection, tunnel_rejection, csrf_rejection)
+
+PROCESS_TIME_HEADER = b"x-process-time"
+
+
+class HTTPPipelineMiddleware:
+    """Guards + response header injection + request logging in one ASGI pass."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        guards: Sequence[Guard] = DEFAULT_GUARDS,
+        response_headers: Sequence[Tuple[bytes, bytes]] = (),
+        request_logger: Optional[RequestLogger] = None,
+    ):
+        self.app = app
+        self.guards = tuple(guards)
+        self.response_headers = list(response_headers)
+        self.request_logger = request_logger
+        self._overridden = {name.lower() for name, _ in self.response_headers}
+        self._overridden.add(PROCESS_TIME_HEADER)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request = Request(scope)
+        method = scope.get("method", "")
+        path = scope.get("path", "")
+        request_id = self.request_logger.start(request) if self.request_logger else ""
+        status_code = 500
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message.get("status", 500)
+                headers: List[Tuple[bytes, bytes]] = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in self._overridden
+                ]
+                headers.extend(self.response_headers)
+                headers.append(
+                    (PROCESS_TIME_HEADER, str(time.perf_counter() - start).encode("latin-1"))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            rejection = None
+            for guard in self.guards:
+                rejection = guard(request)
+                if rejection is not None:
+                    break
+            if rejection is not None:
+                await rejection(scope, receive, send_with_headers)
+            else:
+                await self.app(scope, receive, send_with_headers)
+        except Exception as e:
+            if self.request_logger:
+                self.request_logger.error(request_id, method, path, e, time.perf_counter() - start)
+            raise
+
+        if self.request_logger:
+            self.request_logger.end(request_id, method, path, status_code, time.perf_counter() - start)
@@ -8,6 +8,7 @@ Metrics:
 - inference_completions_total{provider, task}: 推理完成次數
 - inference_fallback_total{from_provider, to_provider, reason}: Fallback 事件
 - inference_duration_seconds{provider}: 推理延遲 histogram
+- inference_coalesced_total{kind}: single-flight 合併掉的重複上游呼叫
 """
 import logging
 from typing import Optional
@@ -22,6 +23,7 @@ DURATION_METRIC = "inference_duration_seconds"
 RATE_LIMIT_METRIC = "inference_rate_limit_total"
 CONTEXT_ROUTE_METRIC = "inference_context_route_total"
 ROUTING_DECISION_METRIC = "inference_routing_decision_total"
+COALESCED_METRIC = "inference_coalesced_total"
 
 
 class InferenceProviderMetrics:
@@ -76,6 +78,13 @@ class InferenceProviderMetrics:
             ["source", "task_type", "prefer_local", "soul_section_active"],
             registry=reg,
         )
+        # 2026-10-16: single-flight 合併的重複呼叫（kind: chat / embedding / embedding_manager / cache:{namespace}）
+        self.coalesced = Counter(
+            COALESCED_METRIC,
+            "Identical concurrent inference calls served by an in-flight upstream call",
+            ["kind"],
+            registry=reg,
+        )
 
     def record_completion(self, provider: str, task: str = "chat"):
         self.completions.labels(provider=provider, task=task).inc()
@@ -96,6 +105,10 @@ class InferenceProviderMetrics:
         """記錄 context-aware routing 決策，如 large_prompt → nvidia。"""
         self.context_routes.labels(reason=reason, target_provider=target_provider).inc()
 
+    def record_coalesced(self, kind: str):
+        """記錄一次被 single-flight 合併的呼叫（省下一次上游推理）。"""
+        self.coalesced.labels(kind=kind).inc()
+
     def record_routing_decision(
         self,
         source: str,
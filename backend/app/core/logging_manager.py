@@ -14,7 +14,6 @@ from enum import Enum
 from pathlib import Path
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 
 
 class LogLevel(str, Enum):
@@ -278,13 +277,12 @@ class SystemLogManager:
         }
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """HTTP請求日誌中介軟體"""
-    
-    def __init__(self, app, log_manager: SystemLogManager):
-        super().__init__(app)
-        self.log_manager = log_manager
-    
+class RequestLogger:
+    """HTTP請求日誌 — 由 app.core.http_pipeline 在單一 ASGI pass 中呼叫
+
+    （原 LoggingMiddleware(BaseHTTPMiddleware)，2026-10-16 併入 pipeline）
+    """
+
     # 不記錄 REQUEST_START 的高頻路徑（減少 I/O 開銷）
     _SKIP_START_LOG = {
         "/api/documents-enhanced/list",
@@ -292,15 +290,17 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         "/health",
     }
 
-    async def dispatch(self, request: Request, call_next):
-        """處理HTTP請求日誌 — 高頻路徑只記 END，低頻路徑記 START+END"""
-        start_time = time.time()
+    def __init__(self, log_manager: SystemLogManager):
+        self.log_manager = log_manager
+
+    def start(self, request: Request) -> str:
+        """高頻路徑只記 END，低頻路徑記 START+END；回傳本次 request_id"""
         request_id = f"{int(time.time() * 1000)}"
         path = request.url.path
 
         # 高頻路徑跳過 START log (省 ~50ms header serialization + file write)
         if path not in self._SKIP_START_LOG:
-            entry = LogEntry(
+            self.log_manager.log(LogEntry(
                 level=LogLevel.INFO,
                 category=ErrorCategory.API,
                 message=f"REQUEST_START {request.method} {path}",
@@ -310,46 +310,35 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                     "url": str(request.url),
                     "headers": str(dict(request.headers))[:500],
                 }
-            )
-            self.log_manager.log(entry)
-        
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # 記錄請求完成
-            entry = LogEntry(
-                level=LogLevel.INFO,
-                category=ErrorCategory.API,
-                message=f"REQUEST_END {request.method} {request.url.path} - {response.status_code}",
-                request_id=request_id,
-                details={
-                    "status_code": response.status_code,
-                    "process_time": round(process_time, 4)
-                }
-            )
-            self.log_manager.log(entry)
-            
-            return response
-            
-        except Exception as e:
-            process_time = time.time() - start_time
-            
-            # 記錄請求錯誤
-            entry = LogEntry(
-                level=LogLevel.ERROR,
-                category=ErrorCategory.API,
-                message=f"REQUEST_ERROR {request.method} {request.url.path}",
-                request_id=request_id,
-                details={
-                    "error": str(e),
-                    "error_type": type(e).__name__,
-                    "process_time": round(process_time, 4)
-                }
-            )
-            self.log_manager.log(entry)
-            
-            raise
+            ))
+        return request_id
+
+    def end(self, request_id: str, method: str, path: str, status_code: int, process_time: float) -> None:
+        """記錄請求完成"""
+        self.log_manager.log(LogEntry(
+            level=LogLevel.INFO,
+            category=ErrorCategory.API,
+            message=f"REQUEST_END {method} {path} - {status_code}",
+            request_id=request_id,
+            details={
+                "status_code": status_code,
+                "process_time": round(process_time, 4)
+            }
+        ))
+
+    def error(self, request_id: str, method: str, path: str, exc: BaseException, process_time: float) -> None:
+        """記錄請求錯誤"""
+        self.log_manager.log(LogEntry(
+            level=LogLevel.ERROR,
+            category=ErrorCategory.API,
+            message=f"REQUEST_ERROR {method} {path}",
+            request_id=request_id,
+            details={
+                "error": str(exc),
+                "error_type": type(exc).__name__,
+                "process_time": round(process_time, 4)
+            }
+        ))
 
 
 # 全局日誌管理器實例 — 讀取環境變數配置
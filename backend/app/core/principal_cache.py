@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+認證主體快取與 last_activity 寫回緩衝
+
+AuthService.get_current_user_from_token 原本每個請求都做
+SELECT user_sessions → SELECT users → UPDATE last_activity → COMMIT，
+dashboard 輪詢下是最頻繁的語句族。本模組提供兩件事：
+
+1. PrincipalCache — 以 token jti 為 key 的短 TTL 快取（預設 30 秒），
+   存使用者欄位 dict 與 session 到期時間；命中時不查 DB。
+   撤銷 / 登出 / 權限異動時呼叫 invalidate_jti / invalidate_user：
+   本行程立即失效，並經 Redis pub/sub（auth:principal:invalidate）通知其他 worker。
+   失效後 key 進入短暫墓碑期（預設 5 秒），期間不回填，
+   避免「撤銷已 flush 但未 commit」時併發請求讀到舊列又寫回快取。
+   Redis 不可用時跨 worker 失效退化為 TTL 上限。
+
+2. ActivityWriteBehind — last_activity 寫回緩衝：請求只記 jti → 最新時間，
+   每 AUTH_ACTIVITY_FLUSH_INTERVAL 秒（預設 5）以單一
+   ``UPDATE ... FROM unnest(...)`` 批次寫入。未啟動（CLI / 測試）時
+   呼叫端應退回即時 UPDATE。
+
+環境變數:
+- AUTH_PRINCIPAL_CACHE_TTL: 快取秒數，0 = 停用（預設 30）
+- AUTH_PRINCIPAL_CACHE_MAX: 最多快取條目（預設 10000，LRU 淘汰）
+- AUTH_PRINCIPAL_TOMBSTONE_SECONDS: 失效後拒絕回填秒數（預設 5）
+- AUTH_ACTIVITY_FLUSH_INTERVAL: 寫回間隔秒數（預設 5）
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "auth:principal:invalidate"
+
+_BULK_ACTIVITY_SQL = text("""
+    UPDATE user_sessions AS s
+    SET last_activity = v.ts
+    FROM unnest(CAST(:jtis AS varchar[]), CAST(:stamps AS timestamp[])) AS v(jti, ts)
+    WHERE s.token_jti = v.jti
+    AND (s.last_activity IS NULL OR s.last_activity < v.ts)
+""")
+
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+def _env_float(key: str, default: float) -> float:
+    try:
+        return float(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class CachedPrincipal:
+    """快取條目：使用者欄位快照 + session 到期時間"""
+    jti: str
+    user_id: int
+    user_fields: Dict[str, Any]
+    session_expires_at: datetime
+    cached_until: float
+
+
+class PrincipalCache:
+    """jti → 使用者主體的行程內 TTL 快取，失效經 Redis pub/sub 廣播"""
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        tombstone_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl if ttl is not None else _env_float("AUTH_PRINCIPAL_CACHE_TTL", 30.0)
+        self.max_entries = max(1, max_entries if max_entries is not None
+                               else _env_int("AUTH_PRINCIPAL_CACHE_MAX", 10000))
+        self.tombstone_seconds = (
+            tombstone_seconds if tombstone_seconds is not None
+            else _env_float("AUTH_PRINCIPAL_TOMBSTONE_SECONDS", 5.0)
+        )
+        self._clock = clock
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._by_user: Dict[int, set] = {}
+        self._jti_tombstones: Dict[str, float] = {}
+        self._user_tombstones: Dict[int, float] = {}
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    # ------------------------------------------------------------------
+    # 讀寫
+    # ------------------------------------------------------------------
+
+    def get(self, jti: str, now: Optional[datetime] = None) -> Optional[CachedPrincipal]:
+        """取得未過期條目；TTL 或 session 到期即視為未命中"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(jti)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.cached_until <= self._clock() or entry.session_expires_at <= (now or datetime.utcnow()):
+            self._drop(jti)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(jti)
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        jti: str,
+        user_id: int,
+        user_fields: Dict[str, Any],
+        session_expires_at: datetime,
+    ) -> bool:
+        """寫入條目；墓碑期內的 jti / user 拒絕回填，回傳是否寫入"""
+        if not self.enabled:
+            return False
+        mono = self._clock()
+        if self._tombstoned(self._jti_tombstones, jti, mono) or \
+                self._tombstoned(self._user_tombstones, user_id, mono):
+            return False
+        self._drop(jti)
+        self._entries[jti] = CachedPrincipal(
+            jti=jti,
+            user_id=user_id,
+            user_fields=dict(user_fields),
+            session_expires_at=session_expires_at,
+            cached_until=mono + self.ttl,
+        )
+        self._by_user.setdefault(user_id, set()).add(jti)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl,
+            "listening": self._listener is not None and not self._listener.done(),
+        }
+
+    # ------------------------------------------------------------------
+    # 失效
+    # ------------------------------------------------------------------
+
+    def invalidate_local(self, jti: Optional[str] = None, user_id: Optional[int] = None) -> None:
+        """只失效本行程（收到其他 worker 廣播時使用）"""
+        until = self._clock() + self.tombstone_seconds
+        if jti:
+            self._jti_tombstones[jti] = until
+            self._drop(jti)
+        if user_id is not None:
+            self._user_tombstones[user_id] = until
+            for cached_jti in list(self._by_user.get(user_id, ())):
+                self._drop(cached_jti)
+        self.invalidations += 1
+        self._prune_tombstones()
+
+    async def invalidate_jti(self, jti: str) -> None:
+        """session 撤銷 / 登出：本行程失效並廣播"""
+        self.invalidate_local(jti=jti)
+        await self._publish({"jti": jti})
+
+    async def invalidate_user(self, user_id: int) -> None:
+        """使用者權限 / 角色 / 啟用狀態異動、撤銷全部 session：本行程失效並廣播"""
+        self.invalidate_local(user_id=user_id)
+        await self._publish({"user_id": user_id})
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+        self._jti_tombstones.clear()
+        self._user_tombstones.clear()
+
+    def apply_message(self, data: Any) -> None:
+        """處理 pub/sub 訊息；自己發出的略過（已在本地失效）"""
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.debug(f"[PRINCIPAL_CACHE] 無法解析失效訊息: {data!r}")
+            return
+        if message.get("origin") == self._origin:
+            return
+        self.invalidate_local(jti=message.get("jti"), user_id=message.get("user_id"))
+
+    async def _publish(self, message: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            from app.core.redis_client import get_redis
+            redis = await get_redis()
+            if redis is None:
+                return
+            await redis.publish(INVALIDATION_CHANNEL, json.dumps({**message, "origin": self._origin}))
+        except Exception as e:
+            logger.warning(f"[PRINCIPAL_CACHE] 失效廣播失敗（其他 worker 依 TTL 過期）: {e}")
+
+    # ------------------------------------------------------------------
+    # 訂閱
+    # ------------------------------------------------------------------
+
+    async def start_listener(self) -> None:
+        if not self.enabled or (self._listener and not self._listener.done()):
+            return
+        self._listener = asyncio.create_task(self._listen(), name="principal-cache-invalidation")
+
+    async def stop_listener(self) -> None:
+        task, self._listener = self._listener, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _listen(self) -> None:
+        from app.core.redis_client import get_redis
+
+        while True:
+            try:
+                redis = await get_redis()
+                if redis is None:
+                    await asyncio.sleep(30)
+                    continue
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self.apply_message(message.get("data"))
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[PRINCIPAL_CACHE] 失效訂閱中斷，5 秒後重連: {e}")
+                # 斷線期間可能漏收失效訊息，保守清空本地快取
+                self._entries.clear()
+                self._by_user.clear()
+                await asyncio.sleep(5)
+
+    # ------------------------------------------------------------------
+    # 內部
+    # ------------------------------------------------------------------
+
+    def _drop(self, jti: str) -> None:
+        entry = self._entries.pop(jti, None)
+        if entry is None:
+            return
+        jtis = self._by_user.get(entry.user_id)
+        if jtis is not None:
+            jtis.discard(jti)
+            if not jtis:
+                del self._by_user[entry.user_id]
+
+    @staticmethod
+    def _tombstoned(tombstones: Dict[Any, float], key: Any, mono: float) -> bool:
+        until = tombstones.get(key)
+        return until is not None and until > mono
+
+    def _prune_tombstones(self) -> None:
+        mono = self._clock()
+        for tombstones in (self._jti_tombstones, self._user_tombstones):
+            if len(tombstones) > 1000:
+                for key in [k for k, until in tombstones.items() if until <= mono]:
+                    del tombstones[key]
+
+
+class ActivityWriteBehind:
+    """last_activity 合併寫回：jti → 最新時間，定期單一 UPDATE 批次寫入"""
+
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.flush_interval = max(
+            0.1,
+            flush_interval if flush_interval is not None
+            else _env_float("AUTH_ACTIVITY_FLUSH_INTERVAL", 5.0),
+        )
+        self._session_factory = session_factory
+        self._pending: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+        self.flush_failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def touch(self, jti: str, at: Optional[datetime] = None) -> None:
+        at = at or datetime.utcnow()
+        current = self._pending.get(jti)
+        if current is None or at > current:
+            self._pending[jti] = at
+
+    async def flush(self) -> int:
+        """寫入目前累積的活動時間，回傳批次大小；失敗時併回待寫區"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        jtis = list(batch)
+        try:
+            async with self._get_session_factory()() as db:
+                await db.execute(
+                    _BULK_ACTIVITY_SQL,
+                    {"jtis": jtis, "stamps": [batch[j] for j in jtis]},
+                )
+                await db.commit()
+        except Exception as e:
+            self.flush_failures += 1
+            for jti, at in batch.items():
+                self.touch(jti, at)
+            logger.warning(f"[ACTIVITY] last_activity 批次寫入失敗（{len(batch)} 筆，下次重試）: {e}")
+            return 0
+        self.flushed_rows += len(batch)
+        return len(batch)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="session-activity-flusher")
+
+    async def stop(self) -> None:
+        """停止背景寫回並做最後一次 flush"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _get_session_factory(self) -> Callable[[], Any]:
+        if self._session_factory is None:
+            from app.db.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+
+_principal_cache: Optional[PrincipalCache] = None
+_activity_writer: Optional[ActivityWriteBehind] = None
+
+
+def get_principal_cache() -> PrincipalCache:
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache()
+    return _principal_cache
+
+
+def get_activity_writer() -> ActivityWriteBehind:
+    global _activity_writer
+    if _activity_writer is None:
+        _activity_writer = ActivityWriteBehind()
+    return _activity_writer
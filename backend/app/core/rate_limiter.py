@@ -12,7 +12,7 @@ import logging
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from slowapi.middleware import SlowAPIASGIMiddleware
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
@@ -62,9 +62,9 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> JSO
 
     回傳統一的錯誤格式，並記錄日誌。
     注意：
-    1. 必須是同步函數，因為 SlowAPIMiddleware 使用 sync_check_limits
-       (async 函數會被 slowapi 忽略，fallback 到默認處理器)
-    2. 需要手動加入 CORS 標頭，因為 BaseHTTPMiddleware 會繞過 CORS 中介軟體
+    1. 維持同步函數（SlowAPIASGIMiddleware 的 async_check_limits 同步/非同步皆可；
+       舊 SlowAPIMiddleware 的 sync_check_limits 會忽略 async 處理器）
+    2. 需要手動加入 CORS 標頭：限流回應由 middleware 直接送出，不經內層 CORS 中介軟體
     """
     from app.core.cors import allowed_origins
 
@@ -121,8 +121,8 @@ def setup_rate_limiter(app: FastAPI) -> None:
     # 註冊異常處理器
     app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
-    # 加入中介軟體
-    app.add_middleware(SlowAPIMiddleware)
+    # 加入中介軟體（pure ASGI 版本，不經 BaseHTTPMiddleware 的 task + stream 轉送）
+    app.add_middleware(SlowAPIASGIMiddleware)
 
     logger.info(
         f"速率限制已啟用 - "
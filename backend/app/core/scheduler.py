@@ -8,6 +8,8 @@
 - 其他定時任務
 
 v2.0.0 - 2026-04-08: 新增排程執行追蹤 (SchedulerTracker)
+v2.1.0 - 2026-10-16: job 依 CPU / I/O 併發類別限流、記錄排隊等待時間；
+                     leader 選舉與獨立 runner 行程見 app.core.scheduler_runner
 """
 import logging
 import os
@@ -108,6 +110,57 @@ async def _run_script_async(
 _scheduler: Optional[AsyncIOScheduler] = None
 
 
+# ---------------------------------------------------------------------------
+# 併發類別（bounded worker pool）
+# ---------------------------------------------------------------------------
+# 所有 job 共用同一個 event loop；同時觸發時（02:00、06:00 一次十幾支）
+# 重型 job 會一起佔滿 CPU / DB 連線。依類別各給一個 semaphore：
+# - cpu: 圖譜重建、wiki 編譯、embedding 回填、fitness 等重計算 / 子行程 job
+# - io:  其餘（HTTP 抓取、推播、DB 小查詢）
+# 併發上限：SCHEDULER_CPU_CONCURRENCY（預設 2）/ SCHEDULER_IO_CONCURRENCY（預設 8）
+CPU_BOUND_JOBS = frozenset({
+    "code_graph_incremental",
+    "code_graph_reconcile",
+    "code_dup_triage",
+    "db_graph_refresh",
+    "erp_graph_ingest",
+    "kg_embedding_backfill",
+    "embedding_warmup",
+    "wiki_compile",
+    "wiki_lint",
+    "fitness_daily",
+    "fitness_weekly",
+    "optimization_pipeline",
+    "monthly_arch_review",
+    "memory_crystallization_scan",
+    "memory_pattern_extract",
+    "security_scan",
+})
+
+_CONCURRENCY_DEFAULTS = {"cpu": 2, "io": 8}
+_job_semaphores: Dict[str, tuple] = {}
+
+
+def get_job_class(job_id: str) -> str:
+    """job 的併發類別（cpu / io）"""
+    return "cpu" if job_id in CPU_BOUND_JOBS else "io"
+
+
+def _get_job_semaphore(job_class: str) -> "_asyncio.Semaphore":
+    loop = _asyncio.get_running_loop()
+    cached = _job_semaphores.get(job_class)
+    if cached is None or cached[0] is not loop:
+        # semaphore 綁 event loop；換 loop（測試 / runner 重啟）時重建
+        env_key = f"SCHEDULER_{job_class.upper()}_CONCURRENCY"
+        try:
+            limit = max(1, int(os.getenv(env_key, _CONCURRENCY_DEFAULTS[job_class])))
+        except ValueError:
+            limit = _CONCURRENCY_DEFAULTS[job_class]
+        cached = (loop, _asyncio.Semaphore(limit))
+        _job_semaphores[job_class] = cached
+    return cached[1]
+
+
 # ---------------------------------------------------------------------------
 # 排程執行追蹤器
 # ---------------------------------------------------------------------------
@@ -132,7 +185,8 @@ class SchedulerTracker:
     @classmethod
     def _append_event(cls, job_id: str, status: str, duration_ms: Optional[float],
                       error: Optional[str] = None,
-                      detail: Optional[Dict[str, Any]] = None) -> None:
+                      detail: Optional[Dict[str, Any]] = None,
+                      wait_ms: Optional[float] = None) -> None:
         """v6.13: 寫 jsonl event log — fire-and-forget 不阻斷主流程
 
         2026-07-15: 加 detail — 讓 job 附業務產出（如 embedded 計數/reason），
@@ -148,6 +202,8 @@ class SchedulerTracker:
                 "status": status,
                 "duration_ms": duration_ms,
             }
+            if wait_ms:
+                event["wait_ms"] = wait_ms
             if error:
                 event["error"] = error[:200]
             if detail:
@@ -162,7 +218,9 @@ class SchedulerTracker:
             pass  # event log silent fail 不阻斷
 
     @classmethod
-    def record_start(cls, job_id: str):
+    def record_start(cls, job_id: str, wait_ms: Optional[float] = None,
+                     job_class: Optional[str] = None):
+        """wait_ms: 排隊等待併發名額的時間（不計入 duration）"""
         if job_id not in cls._records:
             cls._records[job_id] = {
                 "success_count": 0,
@@ -172,7 +230,11 @@ class SchedulerTracker:
                 "last_duration_ms": None,
                 "last_error": None,
             }
-        cls._records[job_id]["_start_time"] = time.time()
+        rec = cls._records[job_id]
+        rec["_start_time"] = time.time()
+        rec["last_wait_ms"] = wait_ms
+        if job_class:
+            rec["job_class"] = job_class
 
     @classmethod
     def record_success(cls, job_id: str, detail: Optional[Dict[str, Any]] = None):
@@ -190,7 +252,8 @@ class SchedulerTracker:
             "last_detail": detail if detail else None,
         })
         cls._records[job_id] = rec
-        cls._append_event(job_id, "success", duration, detail=detail)  # v6.13 jsonl log
+        cls._append_event(job_id, "success", duration, detail=detail,
+                          wait_ms=rec.get("last_wait_ms"))  # v6.13 jsonl log
         if _PROM_ENABLED:
             try:
                 SCHED_LAST_RUN_AGE_SECONDS.labels(job_id=job_id).set(0)
@@ -213,7 +276,8 @@ class SchedulerTracker:
             "last_error": error[:200],
         })
         cls._records[job_id] = rec
-        cls._append_event(job_id, "failure", duration, error)  # v6.13 jsonl log
+        cls._append_event(job_id, "failure", duration, error,
+                          wait_ms=rec.get("last_wait_ms"))  # v6.13 jsonl log
         if _PROM_ENABLED:
             try:
                 SCHED_LAST_RUN_AGE_SECONDS.labels(job_id=job_id).set(0)
@@ -257,34 +321,44 @@ class SchedulerTracker:
 
 
 def tracked_job(job_id: str):
-    """裝飾器：自動追蹤排程任務的執行狀態，失敗時觸發 Telegram 告警"""
+    """裝飾器：自動追蹤排程任務的執行狀態，失敗時觸發 Telegram 告警
+
+    2026-10-16: 執行前先取得所屬併發類別（cpu / io）的名額，排隊時間記為 wait_ms。
+    """
+    job_class = get_job_class(job_id)
+
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            SchedulerTracker.record_start(job_id)
-            try:
-                result = await func(*args, **kwargs)
-                # 2026-07-15: job 若回 dict → 當作業務產出 detail 寫入 cron_events
-                # （embedded/reason 等），讓 silent success 現形。非 dict → 行為不變。
-                detail = result if isinstance(result, dict) else None
-                SchedulerTracker.record_success(job_id, detail=detail)
-                return result
-            except Exception as e:
-                SchedulerTracker.record_failure(job_id, str(e))
-                # 失敗告警 (fire-and-forget)
+            queued = time.perf_counter()
+            async with _get_job_semaphore(job_class):
+                wait_ms = round((time.perf_counter() - queued) * 1000, 1)
+                if wait_ms >= 1000:
+                    logger.info("[scheduler] %s 等待 %s 名額 %.0fms", job_id, job_class, wait_ms)
+                SchedulerTracker.record_start(job_id, wait_ms=wait_ms, job_class=job_class)
                 try:
-                    from app.core.scheduler_alert import get_alert_manager
-                    mgr = get_alert_manager()
-                    rec = SchedulerTracker._records.get(job_id, {})
-                    failure_count = rec.get("failure_count", 1)
-                    if mgr.should_alert(job_id, failure_count):
-                        import asyncio
-                        asyncio.create_task(
-                            mgr.send_failure_alert(job_id, str(e), failure_count)
-                        )
-                except Exception:
-                    pass  # 告警失敗不影響主流程
-                raise
+                    result = await func(*args, **kwargs)
+                    # 2026-07-15: job 若回 dict → 當作業務產出 detail 寫入 cron_events
+                    # （embedded/reason 等），讓 silent success 現形。非 dict → 行為不變。
+                    detail = result if isinstance(result, dict) else None
+                    SchedulerTracker.record_success(job_id, detail=detail)
+                    return result
+                except Exception as e:
+                    SchedulerTracker.record_failure(job_id, str(e))
+                    # 失敗告警 (fire-and-forget)
+                    try:
+                        from app.core.scheduler_alert import get_alert_manager
+                        mgr = get_alert_manager()
+                        rec = SchedulerTracker._records.get(job_id, {})
+                        failure_count = rec.get("failure_count", 1)
+                        if mgr.should_alert(job_id, failure_count):
+                            import asyncio
+                            asyncio.create_task(
+                                mgr.send_failure_alert(job_id, str(e), failure_count)
+                            )
+                    except Exception:
+                        pass  # 告警失敗不影響主流程
+                    raise
         return wrapper
     return decorator
 
@@ -455,19 +529,23 @@ async def erp_graph_ingest_job():
 
 @tracked_job("code_graph_incremental")
 async def code_graph_incremental_job():
-    """Code Graph 每日全量重建 — 掃描 Python AST + DB schema 重建圖譜實體與關係。
+    """Code Graph 每日增量重建 — 掃描 Python AST + DB schema 更新圖譜實體與關係。
 
     2026-07-20 治本（重大靜默 bug）：原 incremental=True 每次跑 `_recreate_relations`
     無條件全刪 code_graph 關係、只重插「本次變更檔」的關係 → 未變更檔跳過 → 關係圖
     每日塌成僅 FK（9669→85）；僅週日 reconcile 才還原 → 一週 6 天圖譜殘缺＝圖譜低價值隱因。
-    改 incremental=False（全量、6s 可接受）＋傳 db_url（建 db_table + model→db_table maps_to
+    當時改 incremental=False（全量）＋傳 db_url（建 db_table + model→db_table maps_to
     橋 + FK）→ 圖譜每日完整。週日 reconcile 續作 orphan mark-and-sweep（互補）。
     （容器無 frontend/src → 前端 ts_ 關係本就不落地，非本次變更。）
+
+    2026-10-16：關聯改為差異同步（全部檔案的提取結果來自內容雜湊快取，只增刪變動的邊），
+    上述塌陷不再可能 → 恢復 incremental=True：未變更的樹只做一次雜湊掃描即回傳
+    up_to_date（不寫 DB）；有變更時只 upsert 變更檔的實體。
     """
     from app.db.database import async_session_maker
     from app.core.config import settings
 
-    logger.info("開始執行 Code Graph 每日全量重建")
+    logger.info("開始執行 Code Graph 每日增量重建")
 
     try:
         async with async_session_maker() as db:
@@ -480,20 +558,24 @@ async def code_graph_incremental_job():
             stats = await service.ingest(
                 backend_app_dir=backend_dir,
                 db_url=settings.DATABASE_URL,  # 啟用 db_table + maps_to 橋 + FK（SchemaReflectorService SSOT）
-                incremental=False,             # 治本：全量重建，防每日洗關係圖
+                incremental=True,              # 內容雜湊增量 + 關聯差異同步（不再洗關係圖）
                 frontend_src_dir=frontend_dir if frontend_dir.exists() else None,
             )
             await db.commit()
+            if stats.get("status") == "up_to_date":
+                logger.info("Code Graph 無變更，略過重建")
+                return
             logger.info(
-                f"Code Graph 每日全量重建完成: "
+                f"Code Graph 每日增量重建完成: "
                 f"modules={stats.get('modules', 0)}, "
                 f"classes={stats.get('classes', 0)}, "
                 f"functions={stats.get('functions', 0)}, "
                 f"tables={stats.get('tables', 0)}, "
-                f"relations={stats.get('relations', 0)}"
+                f"relations={stats.get('relations', 0)} "
+                f"(+{stats.get('relations_added', 0)}/-{stats.get('relations_removed', 0)})"
             )
     except Exception as e:
-        logger.error(f"Code Graph 每日全量重建失敗: {e}", exc_info=True)
+        logger.error(f"Code Graph 每日增量重建失敗: {e}", exc_info=True)
 
 
 @tracked_job("code_graph_reconcile")
@@ -4816,11 +4898,18 @@ def setup_scheduler(
     return scheduler
 
 
-def start_scheduler():
-    """啟動排程器 + admin subscription seed"""
+def start_scheduler(paused: bool = False):
+    """啟動排程器 + admin subscription seed
+
+    Args:
+        paused: 以暫停狀態啟動（非 leader 待命），取得 leader 後由 resume_scheduler 開始派送
+    """
     scheduler = get_scheduler()
     if not scheduler.running:
-        scheduler.start()
+        scheduler.start(paused=paused)
+        if paused:
+            logger.info("排程器已啟動（暫停中，等待 leader 選舉）")
+            return
         logger.info("排程器已啟動")
 
         # 2026-06-02 開機自檢（防 8 cron .parent 路徑 bug 同型 silent 死復發）：
@@ -4847,28 +4936,62 @@ def start_scheduler():
         except Exception as _e:
             logger.warning("cron script 開機自檢跳過: %s", _e)
 
-        # B-fix2: 自動從 ENV 建立 admin 訂閱（首次啟動時）
-        import asyncio
-        async def _seed():
-            try:
-                from app.db.database import async_session_maker
-                from app.services.ai.domain.morning_report_delivery import ensure_admin_subscription
-                async with async_session_maker() as db:
-                    await ensure_admin_subscription(db)
-            except Exception as e:
-                logger.debug("admin subscription seed skipped: %s", e)
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.ensure_future(_seed())
-            else:
-                loop.run_until_complete(_seed())
-        except Exception:
-            pass
+        _seed_admin_subscription()
     else:
         logger.info("排程器已在運行中")
 
 
+def _seed_admin_subscription():
+    """B-fix2: 自動從 ENV 建立 admin 訂閱（首次啟動時）"""
+    import asyncio
+    async def _seed():
+        try:
+            from app.db.database import async_session_maker
+            from app.services.ai.domain.morning_report_delivery import ensure_admin_subscription
+            async with async_session_maker() as db:
+                await ensure_admin_subscription(db)
+        except Exception as e:
+            logger.debug("admin subscription seed skipped: %s", e)
+    try:
+        loop = asyncio.get_event_loop()
+        if loop.is_running():
+            asyncio.ensure_future(_seed())
+        else:
+            loop.run_until_complete(_seed())
+    except Exception:
+        pass
+
+
+def resume_scheduler():
+    """取得 leader 後開始派送 job
+
+    暫停期間錯過的觸發一律不補跑：前任 leader 已執行過，
+    若交給 misfire_grace_time（1 小時）補跑，換手時整批 job 會重複執行。
+    """
+    scheduler = get_scheduler()
+    if not scheduler.running:
+        start_scheduler()
+        return
+    now = datetime.now(scheduler.timezone)
+    for job in scheduler.get_jobs():
+        if job.next_run_time is None:
+            continue  # 個別停用的 job 維持停用
+        next_fire = job.trigger.get_next_fire_time(None, now)
+        if next_fire is not None:
+            job.modify(next_run_time=next_fire)
+    scheduler.resume()
+    logger.info("排程器開始派送 (%d jobs)", len(scheduler.get_jobs()))
+    _seed_admin_subscription()
+
+
+def pause_scheduler():
+    """失去 leader：停止派送新 job（執行中的 job 跑完）"""
+    scheduler = get_scheduler()
+    if scheduler.running:
+        scheduler.pause()
+        logger.info("排程器已暫停派送")
+
+
 def stop_scheduler():
     """停止排程器"""
     scheduler = get_scheduler()
@@ -4882,8 +5005,12 @@ def get_scheduler_status() -> dict:
     scheduler = get_scheduler()
     jobs = scheduler.get_jobs()
 
+    from app.core.scheduler_runner import get_scheduler_mode, is_scheduler_leader
+
     return {
         'running': scheduler.running,
+        'mode': get_scheduler_mode(),
+        'leader': is_scheduler_leader(),
         'jobs': [
             {
                 'id': job.id,
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+排程器執行模式與 leader 選舉
+
+core/scheduler.py 約 55 支 APScheduler job 原本在每個 FastAPI 行程內各自排程：
+多個 uvicorn worker 時每支 job 執行 N 次，重型 job 也與使用者請求共用 event loop。
+
+SCHEDULER_MODE:
+- embedded（預設）: API 行程內排程，但只有取得 leader 鎖的行程派送 job，其餘待命
+- runner: 由 ``python -m app.core.scheduler_runner`` 獨立行程排程（同樣經 leader 選舉，
+          可多開做熱備援）；API 行程設 ``off``
+- off: API 行程不註冊任何 job
+
+SCHEDULER_LEADER_BACKEND:
+- auto（預設）: Redis 可用時用 Redis 鎖，否則 Postgres advisory lock
+- redis / postgres: 強制指定
+- none: 不選舉，本行程即 leader（單機開發）
+
+Redis 鎖以 ``SET NX PX`` 取得、Lua 比對 token 後續期；leader 行程崩潰時
+鎖在 SCHEDULER_LEADER_TTL 秒（預設 30）後過期，待命者接手。
+Postgres advisory lock 綁在一條專用連線上，連線斷即釋放。
+
+注意：SchedulerTracker 為行程內記錄；runner 模式下 API 的 /health 排程區塊
+看不到 runner 的 in-memory 統計，跨行程請看 cron_events.jsonl（兩邊共用 CK_LOGS_DIR）。
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+import asyncio
+import inspect
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+MODE_EMBEDDED = "embedded"
+MODE_RUNNER = "runner"
+MODE_OFF = "off"
+_MODES = (MODE_EMBEDDED, MODE_RUNNER, MODE_OFF)
+
+LEADER_KEY = "scheduler:leader"
+# pg_advisory_lock 的 bigint key（"CKSCHED" 的 ASCII 值）
+ADVISORY_LOCK_ID = 0x434B5343484544
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def get_scheduler_mode() -> str:
+    mode = os.getenv("SCHEDULER_MODE", MODE_EMBEDDED).strip().lower()
+    if mode not in _MODES:
+        logger.warning("SCHEDULER_MODE=%r 無效，改用 %s", mode, MODE_EMBEDDED)
+        return MODE_EMBEDDED
+    return mode
+
+
+def _instance_token() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# ---------------------------------------------------------------------------
+# Leader 鎖
+# ---------------------------------------------------------------------------
+
+class RedisLeaderLock:
+    """Redis 租約鎖：SET NX PX 取得，token 比對後續期 / 釋放"""
+
+    backend = "redis"
+
+    def __init__(self, redis: Any, ttl_seconds: float, key: str = LEADER_KEY):
+        self._redis = redis
+        self._key = key
+        self._ttl_ms = int(ttl_seconds * 1000)
+        self.token = _instance_token()
+
+    async def acquire(self) -> bool:
+        return bool(await self._redis.set(self._key, self.token, nx=True, px=self._ttl_ms))
+
+    async def renew(self) -> bool:
+        return bool(await self._redis.eval(_RENEW_SCRIPT, 1, self._key, self.token, self._ttl_ms))
+
+    async def release(self) -> None:
+        await self._redis.eval(_RELEASE_SCRIPT, 1, self._key, self.token)
+
+
+class PostgresAdvisoryLock:
+    """Postgres session 級 advisory lock：持有一條專用連線，連線斷即失去鎖"""
+
+    backend = "postgres"
+
+    def __init__(self, engine: Any, lock_id: int = ADVISORY_LOCK_ID):
+        self._engine = engine
+        self._lock_id = lock_id
+        self._conn: Optional[Any] = None
+
+    async def acquire(self) -> bool:
+        from sqlalchemy import text
+
+        if self._conn is None:
+            self._conn = await self._engine.connect()
+        try:
+            result = await self._conn.execute(
+                text("SELECT pg_try_advisory_lock(:id)"), {"id": self._lock_id}
+            )
+            acquired = bool(result.scalar())
+        except Exception:
+            await self._drop_connection()
+            raise
+        if not acquired:
+            # 不佔著連線池的連線等待
+            await self._drop_connection()
+        return acquired
+
+    async def renew(self) -> bool:
+        from sqlalchemy import text
+
+        if self._conn is None:
+            return False
+        try:
+            await self._conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            await self._drop_connection()
+            return False
+
+    async def release(self) -> None:
+        from sqlalchemy import text
+
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": self._lock_id}
+            )
+        finally:
+            await self._drop_connection()
+
+    async def _drop_connection(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.debug("advisory lock 連線關閉失敗: %s", e)
+
+
+class _NoElectionLock:
+    """SCHEDULER_LEADER_BACKEND=none：永遠是 leader"""
+
+    backend = "none"
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def renew(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        return None
+
+
+async def build_leader_lock(ttl_seconds: float):
+    backend = os.getenv("SCHEDULER_LEADER_BACKEND", "auto").strip().lower()
+    if backend == "none":
+        return _NoElectionLock()
+    if backend in ("auto", "redis"):
+        from app.core.redis_client import get_redis
+
+        redis = await get_redis()
+        if redis is not None:
+            return RedisLeaderLock(redis, ttl_seconds)
+        if backend == "redis":
+            raise RuntimeError("SCHEDULER_LEADER_BACKEND=redis 但 Redis 不可用")
+        logger.info("[scheduler] Redis 不可用，leader 選舉改用 Postgres advisory lock")
+    from app.db.database import engine
+
+    return PostgresAdvisoryLock(engine)
+
+
+# ---------------------------------------------------------------------------
+# 選舉迴圈
+# ---------------------------------------------------------------------------
+
+class LeaderElector:
+    """週期性取得 / 續期 leader 鎖，狀態變化時呼叫 on_elected / on_revoked"""
+
+    def __init__(
+        self,
+        lock: Any,
+        on_elected: Callable[[], Any],
+        on_revoked: Callable[[], Any],
+        interval: float = 10.0,
+    ):
+        self.lock = lock
+        self._on_elected = on_elected
+        self._on_revoked = on_revoked
+        self.interval = interval
+        self.is_leader = False
+        self._stopping = asyncio.Event()
+
+    async def tick(self) -> bool:
+        """執行一輪取得 / 續期，回傳目前是否為 leader"""
+        try:
+            if self.is_leader:
+                held = await self.lock.renew()
+                if not held:
+                    logger.warning("[scheduler] leader 續期失敗（%s），停止派送", self.lock.backend)
+            else:
+                held = await self.lock.acquire()
+        except Exception as e:
+            logger.warning("[scheduler] leader 鎖操作失敗（%s）: %s", self.lock.backend, e)
+            held = False
+
+        if held and not self.is_leader:
+            self.is_leader = True
+            logger.info("[scheduler] 取得 leader（%s）", self.lock.backend)
+            await _maybe_await(self._on_elected())
+        elif not held and self.is_leader:
+            self.is_leader = False
+            await _maybe_await(self._on_revoked())
+        return self.is_leader
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            await self.tick()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self.is_leader:
+            self.is_leader = False
+            await _maybe_await(self._on_revoked())
+            try:
+                await self.lock.release()
+            except Exception as e:
+                logger.debug("leader 鎖釋放失敗: %s", e)
+
+
+async def _maybe_await(value: Any) -> None:
+    if inspect.isawaitable(value):
+        await value
+
+
+# ---------------------------------------------------------------------------
+# 生命週期
+# ---------------------------------------------------------------------------
+
+_elector: Optional[LeaderElector] = None
+_elector_task: Optional[asyncio.Task] = None
+
+
+def is_scheduler_leader() -> bool:
+    return _elector is not None and _elector.is_leader
+
+
+async def start_scheduling(mode: Optional[str] = None) -> bool:
+    """註冊 job 並啟動 leader 選舉；回傳本行程是否參與排程
+
+    API lifespan 不帶 mode 呼叫：僅 SCHEDULER_MODE=embedded 時參與；
+    runner 行程以 mode="runner" 呼叫，一律參與。
+    """
+    global _elector, _elector_task
+    from app.core.scheduler import pause_scheduler, resume_scheduler, setup_scheduler, start_scheduler
+
+    if mode is None:
+        mode = get_scheduler_mode()
+        if mode != MODE_EMBEDDED:
+            logger.info("[scheduler] SCHEDULER_MODE=%s：API 行程不執行排程 job", mode)
+            return False
+
+    ttl = float(os.getenv("SCHEDULER_LEADER_TTL", "30"))
+    setup_scheduler()
+    start_scheduler(paused=True)
+    lock = await build_leader_lock(ttl)
+    _elector = LeaderElector(lock, resume_scheduler, pause_scheduler, interval=max(1.0, ttl / 3))
+    await _elector.tick()
+    _elector_task = asyncio.create_task(_elector.run())
+    logger.info(
+        "[scheduler] mode=%s leader_backend=%s leader=%s",
+        mode, lock.backend, _elector.is_leader,
+    )
+    return True
+
+
+async def stop_scheduling() -> None:
+    global _elector, _elector_task
+    from app.core.scheduler import stop_scheduler
+
+    if _elector is not None:
+        await _elector.stop()
+    if _elector_task is not None:
+        _elector_task.cancel()
+        try:
+            await _elector_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    _elector = None
+    _elector_task = None
+    stop_scheduler()
+
+
+# ---------------------------------------------------------------------------
+# 獨立 runner 行程
+# ---------------------------------------------------------------------------
+
+async def _run_forever() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    await start_scheduling(MODE_RUNNER)
+    try:
+        await stop.wait()
+    finally:
+        await stop_scheduling()
+        try:
+            from app.core.ai_http_pool import close_ai_http_clients
+            from app.core.redis_client import close_redis
+
+            await close_ai_http_clients()
+            await close_redis()
+        except Exception as e:
+            logger.debug("runner 資源關閉失敗: %s", e)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s - %(levelname)s - [%(name)s] %(message)s",
+    )
+    logger.info("排程 runner 啟動 (pid=%d)", os.getpid())
+    asyncio.run(_run_forever())
+
+
+if __name__ == "__main__":
+    main()
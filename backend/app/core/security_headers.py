@@ -1,8 +1,8 @@
 """
-安全標頭中間件
+安全標頭
 
-@version 1.0.0
-@date 2026-02-02
+@version 1.1.0
+@date 2026-10-16
 
 提供 OWASP 建議的安全標頭配置:
 - X-Frame-Options: 防止點擊劫持
@@ -12,88 +12,66 @@
 - Permissions-Policy: 控制瀏覽器功能權限
 
 使用方式:
-    from app.core.security_headers import SecurityHeadersMiddleware
-    app.add_middleware(SecurityHeadersMiddleware)
+    from app.core.http_pipeline import HTTPPipelineMiddleware
+    from app.core.security_headers import build_security_headers
+    app.add_middleware(HTTPPipelineMiddleware, response_headers=build_security_headers())
 """
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from typing import Callable
+from typing import List, Optional, Tuple
 
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+def build_security_headers(
+    x_frame_options: str = "DENY",
+    x_content_type_options: str = "nosniff",
+    x_xss_protection: str = "1; mode=block",
+    referrer_policy: str = "strict-origin-when-cross-origin",
+    permissions_policy: str = "geolocation=(), microphone=(), camera=()",
+    content_security_policy: Optional[str] = None,
+    content_security_policy_report_only: Optional[str] = None,
+) -> List[Tuple[bytes, bytes]]:
     """
-    安全標頭中間件
+    安全標頭（ASGI raw header 形式，啟動時組一次）
 
-    為所有回應添加安全相關的 HTTP 標頭
+    由 HTTPPipelineMiddleware 在 http.response.start 注入，
+    覆蓋端點自行設定的同名標頭（與原 SecurityHeadersMiddleware 的
+    `response.headers[...] = ...` 語意相同）。
     """
-
-    def __init__(
-        self,
-        app,
-        x_frame_options: str = "DENY",
-        x_content_type_options: str = "nosniff",
-        x_xss_protection: str = "1; mode=block",
-        referrer_policy: str = "strict-origin-when-cross-origin",
-        permissions_policy: str = "geolocation=(), microphone=(), camera=()",
-        content_security_policy: str = None,
-        content_security_policy_report_only: str = None,
-    ):
-        super().__init__(app)
-        self.x_frame_options = x_frame_options
-        self.x_content_type_options = x_content_type_options
-        self.x_xss_protection = x_xss_protection
-        self.referrer_policy = referrer_policy
-        self.permissions_policy = permissions_policy
-        self.content_security_policy = content_security_policy
-        self.content_security_policy_report_only = content_security_policy_report_only
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-
+    headers = {
         # 防止點擊劫持 (Clickjacking)
-        response.headers["X-Frame-Options"] = self.x_frame_options
-
+        "x-frame-options": x_frame_options,
         # 防止 MIME 類型嗅探
-        response.headers["X-Content-Type-Options"] = self.x_content_type_options
-
+        "x-content-type-options": x_content_type_options,
         # 啟用瀏覽器 XSS 過濾器 (已棄用但仍建議設置)
-        response.headers["X-XSS-Protection"] = self.x_xss_protection
-
+        "x-xss-protection": x_xss_protection,
         # 控制 Referrer 資訊
-        response.headers["Referrer-Policy"] = self.referrer_policy
-
+        "referrer-policy": referrer_policy,
         # 控制瀏覽器功能權限
-        response.headers["Permissions-Policy"] = self.permissions_policy
-
-        # Content Security Policy (如有設置)
-        if self.content_security_policy:
-            response.headers["Content-Security-Policy"] = self.content_security_policy
-
-        # CSP Report-Only（2026-08-18 新增）
-        # 上線一份新的 CSP 之前先跑這個：瀏覽器會照常載入所有資源，
-        # 只把「若強制執行會被擋的東西」報到 console 的 securitypolicyviolation。
-        # 對這個系統特別重要的一點：前端 bundle 內有
-        # `https://www.cksurvey.tw/auth/renew`（SSO 滑動續期），
-        # connect-src 若漏掉它，使用者會在 8 小時後被登出而且**沒有任何錯誤畫面** —— 
-        # 同一個坑 lvrland 在 2026-08-09 踩過（fetch 被 CSP 擋、只有 console.warn）。
-        if self.content_security_policy_report_only:
-            response.headers["Content-Security-Policy-Report-Only"] = (
-                self.content_security_policy_report_only
-            )
-
-        # Reporting-Endpoints（2026-08-19 補）
-        # CSP 裡的 `report-to csp-endpoint` 只是**引用一個名字**，
-        # 名字要在這個標頭裡定義，否則新式瀏覽器完全不會送報告 ——
-        # 而且不會有任何錯誤，就只是安靜地不送。
-        # 只在真的有 CSP 時才送，避免對不需要的回應加無意義的標頭。
-        if self.content_security_policy or self.content_security_policy_report_only:
-            response.headers["Reporting-Endpoints"] = (
-                'csp-endpoint="/api/security/csp-report"'
-            )
-
-        return response
+        "permissions-policy": permissions_policy,
+    }
+
+    # Content Security Policy (如有設置)
+    if content_security_policy:
+        headers["content-security-policy"] = content_security_policy
+
+    # CSP Report-Only（2026-08-18 新增）
+    # 上線一份新的 CSP 之前先跑這個：瀏覽器會照常載入所有資源，
+    # 只把「若強制執行會被擋的東西」報到 console 的 securitypolicyviolation。
+    # 對這個系統特別重要的一點：前端 bundle 內有
+    # `https://www.cksurvey.tw/auth/renew`（SSO 滑動續期），
+    # connect-src 若漏掉它，使用者會在 8 小時後被登出而且**沒有任何錯誤畫面** —— 
+    # 同一個坑 lvrland 在 2026-08-09 踩過（fetch 被 CSP 擋、只有 console.warn）。
+    if content_security_policy_report_only:
+        headers["content-security-policy-report-only"] = content_security_policy_report_only
+
+    # Reporting-Endpoints（2026-08-19 補）
+    # CSP 裡的 `report-to csp-endpoint` 只是**引用一個名字**，
+    # 名字要在這個標頭裡定義，否則新式瀏覽器完全不會送報告 ——
+    # 而且不會有任何錯誤，就只是安靜地不送。
+    # 只在真的有 CSP 時才送，避免對不需要的回應加無意義的標頭。
+    if content_security_policy or content_security_policy_report_only:
+        headers["reporting-endpoints"] = 'csp-endpoint="/api/security/csp-report"'
+
+    return [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
 
 
 def get_default_csp() -> str:
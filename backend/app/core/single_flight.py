@@ -0,0 +1,100 @@
+"""
+Single-flight 請求合併 — 相同 key 的併發呼叫只打一次上游
+
+儀表板同時開啟、LINE/Telegram 摘要扇出時，EmbeddingManager / AIConnector
+會同時收到大量相同請求；各自 cache miss 後分別排隊呼叫 Ollama。
+SingleFlight 讓第一個呼叫者（leader）建立上游 task，其餘呼叫者等待同一結果。
+
+- 上游呼叫以獨立 task 執行：leader 被取消（client 斷線）時不會中斷其他等待者，
+  結果仍會完成並寫入快取
+- 例外傳給所有等待者，不做快取（下一次呼叫重新嘗試）
+- 計數：leaders（實際上游呼叫）、coalesced（加入仍在進行中呼叫的次數；
+  已完成但尚未移除的 task 不算，改起新呼叫），推理類另同步到 Prometheus
+  inference_coalesced_total{kind}
+
+unified_cache.CacheNamespace.get_or_load 亦建立在此之上（record_metric=False：
+快取載入合併只計入 namespace 自身統計，不算推理合併）。
+
+用法:
+    _flight = get_single_flight("embedding")
+    vec = await _flight.do((model, text_hash), lambda: connector.generate_embedding(text))
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """以 key 合併併發中的相同呼叫"""
+
+    def __init__(self, name: str, record_metric: bool = True):
+        self.name = name
+        self.record_metric = record_metric
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            if self.record_metric:
+                self._record_coalesced()
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.leaders += 1
+            task.add_done_callback(partial(self._forget, key))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有等待者都已取消時，避免 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def _record_coalesced(self) -> None:
+        try:
+            from app.core.inference_provider_metrics import get_inference_provider_metrics
+            get_inference_provider_metrics().record_coalesced(self.name)
+        except Exception:
+            pass  # metric 不應阻斷推理
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "inflight": len(self._calls),
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_percent": round(self.coalesced / max(total, 1) * 100, 1),
+        }
+
+    def reset_stats(self) -> None:
+        self.leaders = 0
+        self.coalesced = 0
+
+
+_flights: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """取得（或建立）具名 SingleFlight"""
+    flight = _flights.get(name)
+    if flight is None:
+        flight = _flights[name] = SingleFlight(name)
+    return flight
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """各 SingleFlight 的合併統計（name → stats）"""
+    return {name: flight.stats() for name, flight in sorted(_flights.items())}
@@ -8,15 +8,20 @@
 - Cloudflare: CF-Connecting-IP header 存在
 - ngrok: X-Forwarded-For header 存在 + ngrok-skip-browser-warning
 
-Version: 1.0.0
+檢查本身為 api_docs_rejection() / tunnel_rejection()，
+由 app.core.http_pipeline 在單一 ASGI pass 中執行。
+
+Version: 1.1.0
 Created: 2026-03-25
+Updated: 2026-10-16 - BaseHTTPMiddleware 改為 pipeline guard 函式
 """
 
 import logging
 import os
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
+
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 logger = logging.getLogger(__name__)
 
@@ -94,7 +99,7 @@ def _path_allowed(path: str) -> bool:
 API_DOC_PATHS = ("/openapi.json", "/api/docs", "/api/redoc", "/docs/oauth2-redirect")
 
 
-class ApiDocsGuardMiddleware(BaseHTTPMiddleware):
+def api_docs_rejection(request: Request) -> Optional[Response]:
     """API 文件僅限內網（2026-08-03）。
 
     這幾條路徑會回傳**全部 724 個端點的完整 schema**，而且不需任何憑證。
@@ -109,47 +114,46 @@ class ApiDocsGuardMiddleware(BaseHTTPMiddleware):
     只管這四條路徑，與那個開關無關。
 
     復用同檔的 `_is_tunnel_request` / `_is_internal_ip` —— 來源判斷只該有一份。
-    """
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        if any(path == p or path.startswith(p + "/") for p in API_DOC_PATHS):
-            client_ip = request.client.host if request.client else ""
-            if _is_tunnel_request(request) or not _is_internal_ip(client_ip):
-                logger.info("API 文件請求被拒（非內網來源）: %s from %s", path, client_ip)
-                # 回 404 而非 403：對外不必透露這個路徑存在
-                return JSONResponse(status_code=404, content={"detail": "Not Found"})
-        return await call_next(request)
+    Returns:
+        None 表示放行；否則為應直接回傳的 404 回應
+    """
+    path = request.url.path
+    if any(path == p or path.startswith(p + "/") for p in API_DOC_PATHS):
+        client_ip = request.client.host if request.client else ""
+        if _is_tunnel_request(request) or not _is_internal_ip(client_ip):
+            logger.info("API 文件請求被拒（非內網來源）: %s from %s", path, client_ip)
+            # 回 404 而非 403：對外不必透露這個路徑存在
+            return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return None
 
 
-class TunnelGuardMiddleware(BaseHTTPMiddleware):
+def tunnel_rejection(request: Request) -> Optional[Response]:
     """
-    外網路由守衛中間件
+    外網路由守衛
 
     當偵測到請求經由 Cloudflare Tunnel 或 ngrok 進入時，
     僅允許存取 webhook 相關路徑，其餘回傳 403。
 
     透過環境變數 TUNNEL_GUARD_ENABLED 控制開關 (預設 false)。
     """
-
-    async def dispatch(self, request: Request, call_next):
-        enabled = os.getenv("TUNNEL_GUARD_ENABLED", "false").lower() == "true"
-
-        if not enabled:
-            return await call_next(request)
-
-        path = request.url.path
-
-        if _is_tunnel_request(request) and not _path_allowed(path):
-            client_ip = request.headers.get("cf-connecting-ip") or \
-                        request.headers.get("x-forwarded-for", "unknown")
-            logger.warning(
-                "TunnelGuard blocked external access: path=%s ip=%s",
-                path, client_ip,
-            )
-            return JSONResponse(
-                status_code=403,
-                content={"detail": "External access denied for this endpoint"},
-            )
-
-        return await call_next(request)
+    enabled = os.getenv("TUNNEL_GUARD_ENABLED", "false").lower() == "true"
+
+    if not enabled:
+        return None
+
+    path = request.url.path
+
+    if _is_tunnel_request(request) and not _path_allowed(path):
+        client_ip = request.headers.get("cf-connecting-ip") or \
+                    request.headers.get("x-forwarded-for", "unknown")
+        logger.warning(
+            "TunnelGuard blocked external access: path=%s ip=%s",
+            path, client_ip,
+        )
+        return JSONResponse(
+            status_code=403,
+            content={"detail": "External access denied for this endpoint"},
+        )
+
+    return None
@@ -0,0 +1,550 @@
+"""
+統一快取層 — 記憶體 LRU/TTL + 選用 Redis 二層 + 標籤失效 + single-flight
+
+原本 core/cache.py (InMemoryCache)、core/cache_manager.py (MemoryCache)、
+core/cache_decorator.py (redis_cache) 與 ai/core/ai_cache.py (SimpleCache /
+RedisCache) 各自實作快取，key 格式不同、無共用失效機制。現統一由本模組提供，
+原類別 / 裝飾器保留介面，改為薄包裝。
+
+- LocalStore：OrderedDict O(1) LRU + 逐項 TTL（取代每次 set 排序的 O(n log n) 淘汰）
+- RedisTier：Redis 不可用時靜默降級；tag → key 以 SET 記錄，跨 worker 失效。
+  熱門 tag 每次寫入都會續期 SET，成員過期後也不會自然消失，因此 SET 超過
+  TAG_SET_PRUNE_SIZE（或上次修剪後存活數的兩倍）時，以 EXISTS 檢查並 SREM 已過期的 key
+- CacheNamespace：
+    * get / set：L1 → L2 read-through，命中 L2 回填 L1
+    * L2 寫入為 write-behind（背景 task，不阻塞回應；失效前先 flush）
+    * get_or_load：同 key 併發載入合併為一次（app.core.single_flight，防 stampede；
+      呼叫端取消不會中斷載入，其他等待者照常取得結果）
+    * 每個 namespace 的 L1/L2 命中、未命中、載入次數與延遲統計
+- invalidate_tags("documents", "project:42")：跨所有 namespace 失效
+
+用法:
+    docs = get_cache_namespace("documents", default_ttl=180, redis_prefix="cache:documents")
+    rows = await docs.get_or_load(key, lambda: load_rows(db), tags=("documents", "project:42"))
+    ...
+    await invalidate_tags("project:42")
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 未命中哨兵（快取值本身可能是 None / 空集合）
+MISSING = object()
+
+# Redis tag SET 的 key 前綴與最短存活時間（秒）
+TAG_KEY_PREFIX = "cache:_tag"
+TAG_SET_MIN_TTL = 86400
+# tag SET 超過此成員數才修剪過期成員；之後門檻為上次存活數的兩倍（攤銷 O(1)）
+TAG_SET_PRUNE_SIZE = 1024
+
+
+class LocalStore:
+    """process 內 LRU + TTL（同步；get/set/delete 皆 O(1)，tag 失效 O(被標記 key 數)）"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        # key -> (value, expires_at)；順序即 LRU 順序（尾端最新）
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Tuple[str, ...]] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not MISSING
+
+    def keys(self) -> List[str]:
+        return list(self._data)
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return MISSING
+        value, expires_at = item
+        if time.monotonic() > expires_at:
+            self._drop(key)
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        """ttl < 0 表示永不過期"""
+        if key in self._data:
+            self._untag(key)
+            self._data.move_to_end(key)
+        expires_at = math.inf if ttl < 0 else time.monotonic() + ttl
+        self._data[key] = (value, expires_at)
+        tags = tuple(tags)
+        if tags:
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_size:
+            oldest, _ = self._data.popitem(last=False)
+            self._untag(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        if key not in self._data:
+            return False
+        self._drop(key)
+        return True
+
+    def delete_where(self, predicate: Callable[[str], bool]) -> int:
+        doomed = [k for k in self._data if predicate(k)]
+        for key in doomed:
+            self._drop(key)
+        return len(doomed)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        count = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                if self.delete(key):
+                    count += 1
+        return count
+
+    def cleanup_expired(self) -> int:
+        now = time.monotonic()
+        return self.delete_where(lambda k: now > self._data[k][1])
+
+    def expired_count(self) -> int:
+        now = time.monotonic()
+        return sum(1 for _, expires_at in self._data.values() if now > expires_at)
+
+    def clear(self) -> int:
+        count = len(self._data)
+        self._data.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+        return count
+
+    def _drop(self, key: str) -> None:
+        self._data.pop(key, None)
+        self._untag(key)
+
+    def _untag(self, key: str) -> None:
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisTier:
+    """
+    Redis 快取層（值為字串，序列化由呼叫端負責）
+
+    Redis 不可用時所有操作靜默失敗並重設連線，下次重試。
+    """
+
+    def __init__(self, prefix: str):
+        self._prefix = prefix
+        self._redis = None
+        # tag -> 上次修剪後的存活成員數（決定下次修剪門檻）
+        self._tag_live: Dict[str, int] = {}
+
+    async def _get_redis(self):
+        """取得 Redis 連線（lazy 初始化）"""
+        if self._redis is None:
+            try:
+                from app.core.redis_client import get_redis
+                self._redis = await get_redis()
+            except Exception:
+                return None
+        return self._redis
+
+    def full_key(self, key: str) -> str:
+        return f"{self._prefix}:{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            r = await self._get_redis()
+            if r is None:
+                return None
+            return await r.get(self.full_key(key))
+        except Exception as e:
+            logger.debug(f"Redis 快取讀取失敗: {e}")
+            self._redis = None
+            return None
+
+    async def set(self, key: str, value: str, ttl: int, tags: Iterable[str] = ()) -> None:
+        try:
+            r = await self._get_redis()
+            if r is None:
+                return
+            full_key = self.full_key(key)
+            tags = tuple(tags)
+            if not tags:
+                if ttl > 0:
+                    await r.setex(full_key, ttl, value)
+                else:
+                    await r.set(full_key, value)
+                return
+            pipe = r.pipeline(transaction=False)
+            if ttl > 0:
+                pipe.setex(full_key, ttl, value)
+            else:
+                pipe.set(full_key, value)
+            for tag in tags:
+                tag_key = f"{TAG_KEY_PREFIX}:{tag}"
+                pipe.sadd(tag_key, full_key)
+                pipe.expire(tag_key, max(ttl, TAG_SET_MIN_TTL))
+                pipe.scard(tag_key)
+            results = await pipe.execute()
+            # results: [set, (sadd, expire, scard) * len(tags)]
+            for tag, size in zip(tags, results[3::3], strict=True):
+                if size > max(TAG_SET_PRUNE_SIZE, 2 * self._tag_live.get(tag, 0)):
+                    self._tag_live[tag] = await self._prune_tag(r, f"{TAG_KEY_PREFIX}:{tag}")
+        except Exception as e:
+            logger.debug(f"Redis 快取寫入失敗: {e}")
+            self._redis = None
+
+    @staticmethod
+    async def _prune_tag(r, tag_key: str) -> int:
+        """自 tag SET 移除已過期 / 已刪除的 key，回傳存活成員數"""
+        members = list(await r.smembers(tag_key))
+        if not members:
+            return 0
+        pipe = r.pipeline(transaction=False)
+        for member in members:
+            pipe.exists(member)
+        alive = await pipe.execute()
+        stale = [m for m, ok in zip(members, alive, strict=True) if not ok]
+        if stale:
+            await r.srem(tag_key, *stale)
+        return len(members) - len(stale)
+
+    async def delete(self, key: str) -> None:
+        try:
+            r = await self._get_redis()
+            if r is None:
+                return
+            await r.delete(self.full_key(key))
+        except Exception as e:
+            logger.debug(f"Redis 快取刪除失敗: {e}")
+            self._redis = None
+
+    async def delete_pattern(self, pattern: str = "*") -> int:
+        """以 SCAN 刪除 {prefix}:{pattern}"""
+        try:
+            r = await self._get_redis()
+            if r is None:
+                return 0
+            keys = []
+            async for key in r.scan_iter(self.full_key(pattern)):
+                keys.append(key)
+            if keys:
+                await r.delete(*keys)
+            return len(keys)
+        except Exception as e:
+            logger.debug(f"Redis 快取清除失敗: {e}")
+            self._redis = None
+            return 0
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """刪除 tag SET 內記錄的所有 key（不限本 prefix）"""
+        try:
+            r = await self._get_redis()
+            if r is None:
+                return 0
+            count = 0
+            for tag in tags:
+                tag_key = f"{TAG_KEY_PREFIX}:{tag}"
+                members = await r.smembers(tag_key)
+                if members:
+                    count += await r.delete(*members)
+                await r.delete(tag_key)
+                self._tag_live.pop(tag, None)
+            return count
+        except Exception as e:
+            logger.debug(f"Redis 標籤失效失敗: {e}")
+            self._redis = None
+            return 0
+
+
+@dataclass
+class CacheMetrics:
+    """單一 namespace 的命中 / 載入統計"""
+
+    hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    load_errors: int = 0
+    load_time_ms: float = 0.0
+    redis_reads: int = 0
+    redis_time_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate_percent": round((self.hits + self.redis_hits) / max(lookups, 1) * 100, 1),
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "avg_load_ms": round(self.load_time_ms / max(self.loads, 1), 2),
+            "avg_redis_ms": round(self.redis_time_ms / max(self.redis_reads, 1), 2),
+        }
+
+
+class CacheNamespace:
+    """
+    具名快取：L1 LocalStore + 選用 L2 RedisTier
+
+    Args:
+        name: namespace 名稱（統計用）
+        max_size: L1 最大項目數
+        default_ttl: 預設 TTL（秒，< 0 永不過期）
+        redis_prefix: 提供時啟用 Redis 二層，key 為 {redis_prefix}:{key}
+        local_ttl: 啟用 Redis 時 L1 的 TTL 上限，限制跨 worker 不一致的時間窗；
+            0 表示不使用 L1（每次讀 Redis，其他 worker 的失效立即可見）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_size: int = 1000,
+        default_ttl: int = 300,
+        redis_prefix: Optional[str] = None,
+        local_ttl: Optional[int] = 30,
+    ):
+        self.name = name
+        self.default_ttl = default_ttl
+        self.local = LocalStore(max_size)
+        self.redis = RedisTier(redis_prefix) if redis_prefix else None
+        self.local_ttl = local_ttl
+        self.metrics = CacheMetrics()
+        # 不放進 get_single_flight 註冊表：namespace 各自計數（快取載入不計入 inference_coalesced_total）
+        self.flight = SingleFlight(f"cache:{name}", record_metric=False)
+        self._pending: Set[asyncio.Task] = set()
+
+    # ---- L1（同步，供同步包裝類使用） ----
+
+    def get_local(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key)
+        if value is MISSING:
+            self.metrics.misses += 1
+            return default
+        self.metrics.hits += 1
+        return value
+
+    def set_local(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        self.local.set(key, value, self.default_ttl if ttl is None else ttl, tags)
+
+    def _l1_ttl(self, ttl: int) -> int:
+        if self.redis is None or self.local_ttl is None:
+            return ttl
+        return self.local_ttl if ttl < 0 else min(ttl, self.local_ttl)
+
+    def _set_l1(self, key: str, value: Any, ttl: int, tags: Iterable[str]) -> None:
+        if self.redis is not None and self.local_ttl == 0:
+            return  # 僅 Redis
+        self.local.set(key, value, self._l1_ttl(ttl), tags)
+
+    # ---- L1 + L2 ----
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.metrics.hits += 1
+            return value
+        if self.redis is not None:
+            start = time.perf_counter()
+            raw = await self.redis.get(key)
+            self.metrics.redis_reads += 1
+            self.metrics.redis_time_ms += (time.perf_counter() - start) * 1000
+            if raw is not None:
+                try:
+                    envelope = json.loads(raw)
+                    value, tags = envelope["v"], envelope.get("t") or ()
+                except (ValueError, TypeError, KeyError):
+                    value = MISSING
+                if value is not MISSING:
+                    self.metrics.redis_hits += 1
+                    self._set_l1(key, value, self.default_ttl, tags)
+                    return value
+        self.metrics.misses += 1
+        return default
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        tags = tuple(tags)
+        self._set_l1(key, value, ttl, tags)
+        if self.redis is None or ttl == 0:
+            return
+        if self.local_ttl == 0:
+            # 無 L1：必須寫完 Redis 才回傳，否則緊接著的讀取會 miss
+            payload = self._envelope(value, tags)
+            if payload is not None:
+                await self.redis.set(key, payload, ttl, tags)
+        else:
+            self._write_behind(key, value, ttl, tags)
+
+    def _envelope(self, value: Any, tags: Tuple[str, ...]) -> Optional[str]:
+        try:
+            return json.dumps({"v": value, "t": list(tags)}, default=str, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.debug("Cache %s: 值無法序列化，不寫入 Redis (%s)", self.name, e)
+            return None
+
+    def _write_behind(self, key: str, value: Any, ttl: int, tags: Tuple[str, ...]) -> None:
+        payload = self._envelope(value, tags)
+        if payload is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.redis.set(key, payload, ttl, tags))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self) -> None:
+        """等待所有 write-behind 寫入完成"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+        cache_none: bool = False,
+    ) -> Any:
+        """
+        Read-through：未命中時呼叫 loader 並寫回。
+
+        同一 key 同時間只會有一個 loader 執行，其餘呼叫等待同一結果（SingleFlight）；
+        loader 拋出的例外會傳給所有等待者，且不寫入快取。
+        """
+        value = await self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        async def load_and_store() -> Any:
+            start = time.perf_counter()
+            try:
+                loaded = await loader()
+            except Exception:
+                self.metrics.load_errors += 1
+                raise
+            self.metrics.loads += 1
+            self.metrics.load_time_ms += (time.perf_counter() - start) * 1000
+            if loaded is not None or cache_none:
+                await self.set(key, loaded, ttl, tags)
+            return loaded
+
+        return await self.flight.do(key, load_and_store)
+
+    async def delete(self, key: str) -> bool:
+        await self.flush()
+        existed = self.local.delete(key)
+        if self.redis is not None:
+            await self.redis.delete(key)
+        return existed
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        await self.flush()
+        count = self.local.invalidate_tags(tags)
+        if self.redis is not None:
+            count = max(count, await self.redis.invalidate_tags(tags))
+        return count
+
+    async def clear(self, pattern: Optional[str] = None) -> int:
+        """清除全部，或 key 含 pattern 的項目"""
+        await self.flush()
+        if pattern is None:
+            count = self.local.clear()
+        else:
+            count = self.local.delete_where(lambda k: pattern in k)
+        if self.redis is not None:
+            count = max(count, await self.redis.delete_pattern("*" if pattern is None else f"*{pattern}*"))
+        return count
+
+    def cleanup_expired(self) -> int:
+        return self.local.cleanup_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "namespace": self.name,
+            "entries": len(self.local),
+            "max_size": self.local.max_size,
+            "evictions": self.local.evictions,
+            "default_ttl": self.default_ttl,
+            "redis": self.redis is not None,
+            **self.metrics.to_dict(),
+            "coalesced": self.flight.coalesced,
+            "inflight": self.flight.stats()["inflight"],
+        }
+
+
+# ============================================================================
+# Namespace registry
+# ============================================================================
+
+_namespaces: Dict[str, CacheNamespace] = {}
+
+
+def get_cache_namespace(name: str, **options: Any) -> CacheNamespace:
+    """取得（或建立）具名快取；options 僅在首次建立時生效。"""
+    ns = _namespaces.get(name)
+    if ns is None:
+        ns = _namespaces[name] = CacheNamespace(name, **options)
+    return ns
+
+
+async def invalidate_tags(*tags: str) -> int:
+    """跨所有已註冊 namespace 依標籤失效（Redis tag SET 為全域，只需處理一次）"""
+    count = 0
+    redis_tier: Optional[RedisTier] = None
+    for ns in list(_namespaces.values()):
+        await ns.flush()
+        count += ns.local.invalidate_tags(tags)
+        if redis_tier is None and ns.redis is not None:
+            redis_tier = ns.redis
+    if redis_tier is not None:
+        count = max(count, await redis_tier.invalidate_tags(tags))
+    if count:
+        logger.info("Cache invalidated by tags %s: %d entries", tags, count)
+    return count
+
+
+def cleanup_expired() -> int:
+    return sum(ns.cleanup_expired() for ns in list(_namespaces.values()))
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """各 namespace 統計"""
+    return {name: ns.stats() for name, ns in sorted(_namespaces.items())}
+
+
+def resolve_tags(tags: Any, args: tuple, kwargs: dict) -> Tuple[str, ...]:
+    """裝飾器用：tags 可為字串序列，或以被裝飾函式參數計算標籤的 callable"""
+    if tags is None:
+        return ()
+    if callable(tags):
+        tags = tags(*args, **kwargs)
+    if isinstance(tags, str):
+        return (tags,)
+    return tuple(tags)
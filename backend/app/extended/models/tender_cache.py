@@ -62,9 +62,38 @@ class TenderCompanyLink(Base):
 
     __table_args__ = (
         Index("ix_tender_company_name_role", "company_name", "role"),
+        # 倉儲 upsert 的 ON CONFLICT 目標（重抓同一標案不再重複插入廠商）
+        Index("uq_tender_company_link", "tender_record_id", "company_name", "role", unique=True),
     )
 
 
+class TenderOrgVendorStat(Base):
+    """機關×廠商 得標彙總（標案倉儲預算表，依受影響機關增量重算）"""
+    __tablename__ = "tender_org_vendor_stats"
+
+    unit_name = Column(String(200), primary_key=True, comment="招標機關")
+    company_name = Column(String(200), primary_key=True, comment="廠商名稱")
+    appear_count = Column(Integer, nullable=False, default=0, comment="參與標案數（投標+得標）")
+    win_count = Column(Integer, nullable=False, default=0, comment="得標標案數")
+    award_amount = Column(Numeric(18, 2), nullable=True, comment="得標金額合計")
+    last_announce_date = Column(Date, nullable=True, comment="最近參與標案公告日")
+
+    __table_args__ = (
+        Index("ix_tender_org_vendor_company", "company_name"),
+    )
+
+
+class TenderOrgYearStat(Base):
+    """機關×年度×類別 標案量彙總（year=0 表公告日未知）"""
+    __tablename__ = "tender_org_year_stats"
+
+    unit_name = Column(String(200), primary_key=True, comment="招標機關")
+    year = Column(Integer, primary_key=True, comment="公告年度")
+    category = Column(String(50), primary_key=True, comment="採購類別（空字串=未分類）")
+    tender_count = Column(Integer, nullable=False, default=0, comment="標案數")
+    awarded_count = Column(Integer, nullable=False, default=0, comment="已有得標廠商或決標金額的標案數")
+
+
 class TenderRecommendationHistory(Base):
     """標案 LINE 業務推薦歷史 — L51 (2026-05-28) ADR-0046 Phase 4 觀測閉環
 
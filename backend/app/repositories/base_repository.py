@@ -21,12 +21,14 @@ Service 層應透過 Repository 進行資料存取，而非直接操作 ORM。
 建立日期: 2026-01-26
 更新日期: 2026-02-04
 更新內容: 新增投影查詢方法 (Projection Query)
+更新日期: 2026-10-16 — 新增 estimate_table_rows / estimate_count（大表估算筆數）
 """
 
+import json
 import logging
 from typing import TypeVar, Generic, Type, Optional, List, Dict, Any, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update, delete, and_, or_
+from sqlalchemy import select, func, update, delete, and_, or_, text
 from sqlalchemy.sql import Select
 from sqlalchemy.orm import selectinload, joinedload
 
@@ -453,6 +455,42 @@ class BaseRepository(Generic[T]):
         )
         return result.scalar() or 0
 
+    async def estimate_table_rows(self) -> int:
+        """
+        以 pg_class.reltuples 估算整表筆數（O(1)，由 ANALYZE / autovacuum 維護）
+
+        Returns:
+            估算筆數；從未 ANALYZE（reltuples = -1）時回傳 -1
+        """
+        result = await self.db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": self.model.__tablename__},
+        )
+        value = result.scalar()
+        return int(value) if value is not None else -1
+
+    async def estimate_count(self, query: Select) -> int:
+        """
+        以 EXPLAIN 的 Plan Rows 估算查詢筆數（不實際掃描）
+
+        適用於大表 + 寬篩選：精確 COUNT(*) 需掃過所有符合列，
+        估算值只需規劃器統計。估算可能偏差數倍，只適合「約 N 筆」顯示。
+
+        Args:
+            query: 要估算的 Select
+
+        Returns:
+            規劃器估算筆數
+        """
+        conn = await self.db.connection()
+        # asyncpg 方言為 numeric_dollar paramstyle，literal 中的 % 不需跳脫
+        sql = str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
     async def count_by(self, **kwargs) -> int:
         """
         根據條件計算資料筆數
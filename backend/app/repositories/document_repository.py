@@ -6,19 +6,23 @@ DocumentRepository - 公文資料存取層
 - 附件關聯查詢
 - 進階篩選
 - 投影查詢最佳化 (v1.1.0)
+- Keyset 分頁 (v1.3.0)
 
 統計方法已提取至 DocumentStatsRepository (v1.2.0)
 
-版本: 1.1.0
+版本: 1.3.0
 建立日期: 2026-01-26
-更新日期: 2026-02-04
+更新日期: 2026-10-16
 """
 
+import base64
+import json
 import logging
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, extract, desc, asc
+from sqlalchemy import select, func, and_, or_, extract, desc, asc, tuple_
+from sqlalchemy.sql import Select
 from sqlalchemy.orm import selectinload, joinedload
 
 from app.repositories.base_repository import BaseRepository
@@ -923,6 +927,78 @@ class DocumentRepository(BaseRepository[OfficialDocument]):
         result = await self.db.execute(query)
         return {row.document_id: int(row.count) for row in result.all()}
 
+    # =========================================================================
+    # Keyset 分頁 (v1.3.0)
+    # =========================================================================
+
+    @staticmethod
+    def encode_cursor(doc_date: Optional[date], doc_id: int) -> str:
+        """將排序鍵 (doc_date, id) 編碼為不透明 cursor 字串"""
+        raw = json.dumps(
+            {"d": doc_date.isoformat() if doc_date else None, "i": doc_id},
+            separators=(",", ":"),
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Optional[date], int]:
+        """解析 cursor，格式錯誤時拋出 ValueError"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            doc_date = date.fromisoformat(data["d"]) if data.get("d") else None
+            return doc_date, int(data["i"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"無效的分頁游標: {cursor!r}") from e
+
+    async def list_keyset(
+        self,
+        query: Select,
+        limit: int,
+        after: Optional[Tuple[Optional[date], int]] = None,
+    ) -> Tuple[List[OfficialDocument], Optional[Tuple[Optional[date], int]]]:
+        """
+        Keyset 分頁（排序 doc_date DESC NULLS LAST, id DESC，對應 ix_documents_doc_date_id）
+
+        有日期與無日期兩段分開查詢，各自由索引直接定位起點，頁深不影響延遲：
+        1. doc_date IS NOT NULL AND (doc_date, id) < (after_date, after_id)
+        2. 不足一頁時接 doc_date IS NULL AND id < after_id
+
+        Args:
+            query: 已套用 RLS / 篩選 / 預載選項的 Select
+            limit: 每頁筆數
+            after: 上一頁最後一筆的 (doc_date, id)；None 為第一頁
+
+        Returns:
+            (items, next_key)；next_key 為 None 表示已是最後一頁
+        """
+        doc = OfficialDocument
+        items: List[OfficialDocument] = []
+        in_null_section = after is not None and after[0] is None
+
+        if not in_null_section:
+            dated = query.where(doc.doc_date.isnot(None))
+            if after is not None:
+                dated = dated.where(tuple_(doc.doc_date, doc.id) < tuple_(after[0], after[1]))
+            result = await self.db.execute(
+                dated.order_by(doc.doc_date.desc(), doc.id.desc()).limit(limit + 1)
+            )
+            items.extend(result.scalars().all())
+
+        if len(items) <= limit:
+            undated = query.where(doc.doc_date.is_(None))
+            if in_null_section:
+                undated = undated.where(doc.id < after[1])
+            result = await self.db.execute(
+                undated.order_by(doc.id.desc()).limit(limit + 1 - len(items))
+            )
+            items.extend(result.scalars().all())
+
+        has_next = len(items) > limit
+        items = items[:limit]
+        next_key = (items[-1].doc_date, items[-1].id) if has_next and items else None
+        return items, next_key
+
     async def get_agency_names_by_ids(
         self, agency_ids: List[int]
     ) -> Dict[int, str]:
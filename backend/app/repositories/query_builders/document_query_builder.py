@@ -15,18 +15,22 @@ DocumentQueryBuilder - 公文查詢建構器
         .execute()
     )
 
-版本: 2.1.0
+版本: 2.2.0
 建立日期: 2026-02-06
 更新: 2026-02-09 - 新增 with_dispatch_linked() 實體關聯過濾
+更新: 2026-10-16 - 關鍵字搜尋改走 search_text / search_bigrams GIN 索引
+      （DOCUMENT_KEYWORD_SEARCH_MODE=ilike 可退回逐欄 ILIKE）
 參見: docs/SERVICE_ARCHITECTURE_STANDARDS.md
 """
 
 import logging
+import os
 from typing import List, Optional, TYPE_CHECKING
 from datetime import date
 
 import sqlalchemy as sa
 from sqlalchemy import select, or_, and_, desc, asc, func, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Select
 
@@ -35,6 +39,40 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+KEYWORD_MODE_INDEXED = "indexed"
+KEYWORD_MODE_ILIKE = "ilike"
+
+
+def _normalize_keyword_mode(mode: str) -> str:
+    mode = (mode or "").strip().lower()
+    if mode not in (KEYWORD_MODE_INDEXED, KEYWORD_MODE_ILIKE):
+        logger.warning(f"未知的 DOCUMENT_KEYWORD_SEARCH_MODE={mode!r}，改用 {KEYWORD_MODE_INDEXED}")
+        return KEYWORD_MODE_INDEXED
+    return mode
+
+
+def _ascii_lower(text: str) -> str:
+    return "".join(c.lower() if c.isascii() else c for c in text)
+
+
+def document_search_bigrams(keyword: str) -> List[str]:
+    """
+    關鍵字的字元對（與 DB 函式 doc_search_bigrams 對應，小寫、排除含空白者）
+
+    只折疊 ASCII 大小寫：資料庫以 --lc-ctype=C 初始化，PG lower() 不動
+    「Ⅱ」「Ａ」等非 ASCII 字元，Python str.lower() 會，兩邊字元對就對不上。
+    查詢條件本身改在 SQL 端以 doc_search_bigrams(lower(:kw)) 計算（與 STORED
+    欄位同一套 lower），這裡只用來判斷關鍵字是否有可用的字元對。
+    這裡排除的字元對必須是 DB 端的超集（str.isspace 涵蓋 PG 的 \\s），否則會漏列。
+    """
+    text = _ascii_lower(keyword or "")
+    pairs = {
+        text[i:i + 2]
+        for i in range(len(text) - 1)
+        if not (text[i].isspace() or text[i + 1].isspace())
+    }
+    return sorted(pairs)
+
 
 class DocumentQueryBuilder:
     """
@@ -88,6 +126,9 @@ class DocumentQueryBuilder:
         self._semantic_embedding: Optional[List[float]] = None  # 語意搜尋向量
         self._semantic_weight: float = 0.4  # 語意搜尋權重
         self._trigram_weight: float = 0.6  # 三元組搜尋權重
+        self._keyword_mode: str = _normalize_keyword_mode(
+            os.getenv("DOCUMENT_KEYWORD_SEARCH_MODE", KEYWORD_MODE_INDEXED)
+        )
 
     # =========================================================================
     # 狀態篩選
@@ -254,6 +295,16 @@ class DocumentQueryBuilder:
     # 關鍵字搜尋
     # =========================================================================
 
+    def with_keyword_search_mode(self, mode: str) -> 'DocumentQueryBuilder':
+        """
+        指定關鍵字搜尋模式（預設取 DOCUMENT_KEYWORD_SEARCH_MODE）
+
+        Args:
+            mode: "indexed"（search_text / search_bigrams GIN 索引）或 "ilike"（逐欄 ILIKE）
+        """
+        self._keyword_mode = _normalize_keyword_mode(mode)
+        return self
+
     def with_keyword(self, keyword: str) -> 'DocumentQueryBuilder':
         """
         關鍵字搜尋（主旨、公文字號、發文單位、受文單位、備註、乾坤備註）
@@ -261,17 +312,7 @@ class DocumentQueryBuilder:
         Args:
             keyword: 搜尋關鍵字
         """
-        search_pattern = f"%{keyword}%"
-        self._conditions.append(
-            or_(
-                self.model.subject.ilike(search_pattern),
-                self.model.doc_number.ilike(search_pattern),
-                self.model.sender.ilike(search_pattern),
-                self.model.receiver.ilike(search_pattern),
-                self.model.notes.ilike(search_pattern),
-                self.model.ck_note.ilike(search_pattern),
-            )
-        )
+        self._conditions.append(self._keyword_condition(keyword, include_content=False))
         return self
 
     def with_keyword_full(self, keyword: str) -> 'DocumentQueryBuilder':
@@ -281,18 +322,7 @@ class DocumentQueryBuilder:
         Args:
             keyword: 搜尋關鍵字
         """
-        search_pattern = f"%{keyword}%"
-        self._conditions.append(
-            or_(
-                self.model.subject.ilike(search_pattern),
-                self.model.doc_number.ilike(search_pattern),
-                self.model.sender.ilike(search_pattern),
-                self.model.receiver.ilike(search_pattern),
-                self.model.content.ilike(search_pattern),
-                self.model.notes.ilike(search_pattern),
-                self.model.ck_note.ilike(search_pattern),
-            )
-        )
+        self._conditions.append(self._keyword_condition(keyword, include_content=True))
         return self
 
     def with_keywords_full(self, keywords: List[str]) -> 'DocumentQueryBuilder':
@@ -302,24 +332,52 @@ class DocumentQueryBuilder:
         Args:
             keywords: 關鍵字列表
         """
-        all_conditions = []
-        for kw in keywords:
-            pattern = f"%{kw}%"
-            all_conditions.append(
-                or_(
-                    self.model.subject.ilike(pattern),
-                    self.model.doc_number.ilike(pattern),
-                    self.model.sender.ilike(pattern),
-                    self.model.receiver.ilike(pattern),
-                    self.model.content.ilike(pattern),
-                    self.model.notes.ilike(pattern),
-                    self.model.ck_note.ilike(pattern),
-                )
-            )
+        all_conditions = [
+            self._keyword_condition(kw, include_content=True) for kw in keywords
+        ]
         if all_conditions:
             self._conditions.append(or_(*all_conditions))
         return self
 
+    def _keyword_condition(self, keyword: str, include_content: bool):
+        """
+        單一關鍵字條件
+
+        indexed 模式：
+        - search_bigrams @> 關鍵字字元對 → GIN 取候選列（中文兩字詞亦可用索引）
+        - search_text ILIKE（三字以上走 trigram 索引）做精確比對；
+          full 模式另 OR content ILIKE（content 另有 trigram 索引）
+        ilike 模式：維持逐欄 ILIKE 的舊行為（未套用 20261016a002 migration 的環境）
+        """
+        pattern = f"%{keyword}%"
+        if self._keyword_mode == KEYWORD_MODE_ILIKE:
+            columns = [
+                self.model.subject,
+                self.model.doc_number,
+                self.model.sender,
+                self.model.receiver,
+            ]
+            if include_content:
+                columns.append(self.model.content)
+            columns += [self.model.notes, self.model.ck_note]
+            return or_(*(column.ilike(pattern) for column in columns))
+
+        table = self.model.__tablename__
+        match = literal_column(f"{table}.search_text").ilike(pattern)
+        if include_content:
+            match = or_(match, self.model.content.ilike(pattern))
+        # 含 LIKE 萬用字元時字元對不代表字面內容，只能靠 ILIKE
+        if "%" in keyword or "_" in keyword or not document_search_bigrams(keyword):
+            return match
+        # 字元對在 SQL 端計算：與 STORED 欄位共用 PG lower()（依資料庫 ctype 折疊）
+        keyword_bigrams = func.doc_search_bigrams(
+            func.lower(sa.literal(keyword, sa.Text)), type_=ARRAY(sa.Text)
+        )
+        return and_(
+            literal_column(f"{table}.search_bigrams").op("@>")(keyword_bigrams),
+            match,
+        )
+
     def with_keywords(self, keywords: List[str]) -> 'DocumentQueryBuilder':
         """
         多關鍵字搜尋（AND 邏輯）
@@ -15,6 +15,7 @@ from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, func, and_
 
+from app.core.principal_cache import get_principal_cache
 from app.repositories.base_repository import BaseRepository
 from app.extended.models import UserSession
 
@@ -142,12 +143,16 @@ class SessionRepository(BaseRepository[UserSession]):
                 )
             )
             .values(is_active=False, revoked_at=now)
+            .returning(UserSession.token_jti)
         )
         result = await self.db.execute(stmt)
         await self.db.flush()
-        revoked = result.rowcount > 0
+        revoked_jtis = list(result.scalars().all())
+        revoked = len(revoked_jtis) > 0
         if revoked:
             logger.info(f"Session {session_id} revoked")
+            for jti in revoked_jtis:
+                await get_principal_cache().invalidate_jti(jti)
         return revoked
 
     async def revoke_all_sessions(
@@ -184,6 +189,7 @@ class SessionRepository(BaseRepository[UserSession]):
         count = result.rowcount
         if count > 0:
             logger.info(f"Revoked {count} sessions for user {user_id}")
+            await get_principal_cache().invalidate_user(user_id)
         return count
 
     async def update_last_activity(self, session_id: int) -> None:
@@ -316,6 +322,7 @@ class SessionRepository(BaseRepository[UserSession]):
         count = result.rowcount
         if count > 0:
             logger.info(f"Revoked {count} sessions for user {user_id} (excluding jti)")
+            await get_principal_cache().invalidate_user(user_id)
         return count
 
     async def revoke_all_by_user(self, user_id: int) -> int:
@@ -347,6 +354,7 @@ class SessionRepository(BaseRepository[UserSession]):
         count = result.rowcount
         if count > 0:
             logger.info(f"Revoked all {count} sessions for user {user_id}")
+            await get_principal_cache().invalidate_user(user_id)
         return count
 
     async def get_active_count(self, user_id: int) -> int:
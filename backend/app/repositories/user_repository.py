@@ -15,6 +15,7 @@ from typing import Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, update
 
+from app.core.principal_cache import get_principal_cache
 from app.repositories.base_repository import BaseRepository
 from app.extended.models import User, UserSession
 
@@ -108,7 +109,10 @@ class UserRepository(BaseRepository[User]):
             .values(**kwargs)
         )
         result = await self.db.execute(stmt)
-        return result.rowcount > 0
+        updated = result.rowcount > 0
+        if updated:
+            await get_principal_cache().invalidate_user(user_id)
+        return updated
 
     async def update_and_refresh(self, user_id: int, **kwargs) -> Optional[User]:
         """
@@ -128,6 +132,7 @@ class UserRepository(BaseRepository[User]):
         if result.rowcount == 0:
             return None
         await self.db.commit()
+        await get_principal_cache().invalidate_user(user_id)
         user = await self.get_by_id(user_id)
         if user:
             await self.db.refresh(user)
@@ -140,6 +145,13 @@ class UserRepository(BaseRepository[User]):
         await self.db.refresh(user)
         return user
 
+    async def delete(self, id: int) -> bool:
+        """刪除使用者並失效其認證主體快取"""
+        deleted = await super().delete(id)
+        if deleted:
+            await get_principal_cache().invalidate_user(id)
+        return deleted
+
     async def soft_delete(self, user_id: int) -> bool:
         """軟刪除使用者（設為 is_active=False）"""
         return await self.update_fields(user_id, is_active=False)
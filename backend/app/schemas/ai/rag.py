@@ -205,3 +205,6 @@ class RAGQueryResponse(BaseModel):
     retrieval_count: int = Field(default=0, description="檢索到的文件數")
     latency_ms: int = Field(default=0, description="總處理時間 (毫秒)")
     model: str = Field(default="", description="使用的模型")
+    retrieval_timings: Dict[str, Any] = Field(
+        default_factory=dict, description="檢索各階段耗時 (毫秒) 與檢索模式 (fused/legacy/documents)"
+    )
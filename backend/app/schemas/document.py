@@ -4,7 +4,7 @@
 使用統一回應格式
 """
 from pydantic import BaseModel, Field, ConfigDict, field_validator
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime, date
 from enum import Enum
 
@@ -243,6 +243,15 @@ class DocumentListQuery(BaseModel):
     # 排序
     sort_by: str = Field(default="updated_at", description="排序欄位")
     sort_order: SortOrder = Field(default=SortOrder.DESC, description="排序方向")
+    # 分頁模式
+    cursor: Optional[str] = Field(
+        None,
+        description="Keyset 分頁游標：空字串為第一頁，之後帶回應的 next_cursor（忽略 page）；None 為 OFFSET 分頁",
+    )
+    count_mode: Literal["exact", "estimated", "none"] = Field(
+        default="exact",
+        description="總筆數計算：exact=精確、estimated=規劃器估算（大結果集）、none=不計算",
+    )
 
 class DocumentImportData(BaseModel):
     """匯入公文資料 - 與 OfficialDocument 模型對齊"""
@@ -294,6 +303,8 @@ class DocumentListResponse(PaginatedResponse):
     }
     """
     items: List[DocumentResponse] = Field(default=[], description="公文列表")
+    next_cursor: Optional[str] = Field(None, description="下一頁 keyset 游標（cursor 模式，無下一頁為 null）")
+    total_is_estimate: bool = Field(default=False, description="pagination.total 是否為估算值")
 
 
 class DocumentStats(BaseModel):
@@ -6,7 +6,8 @@ Created: 2026-02-08
 
 功能:
 - 查詢所有 embedding IS NULL 的公文
-- 使用 Ollama nomic-embed-text 生成 768 維向量（經 ai_connector.generate_embedding，非直呼 httpx）
+- 使用 Ollama nomic-embed-text 生成 768 維向量（經 EmbeddingManager 微批次分派器，
+  每批合併為 /api/embed 陣列請求，非直呼 httpx）
 - 批次 commit（每 50 筆）
 - 進度顯示
 - 支援 --dry-run 和 --limit 參數
@@ -139,6 +140,7 @@ async def backfill_embeddings(
     """
     from app.core.ai_connector import get_ai_connector
     from app.db.database import AsyncSessionLocal
+    from app.services.ai.core.embedding_manager import EmbeddingManager
 
     connector = get_ai_connector()
 
@@ -186,64 +188,57 @@ async def backfill_embeddings(
         skip_count = 0
         start_time = time.time()
 
-        for i, doc in enumerate(documents, 1):
-            text = build_embedding_text(doc)
-
-            if not text.strip():
-                logger.warning(f"[{i}/{target_count}] 公文 #{doc.id} 無有效文字，跳過")
-                skip_count += 1
-                continue
+        # 每批文字經 EmbeddingManager（微批次分派器）合併為 /api/embed 陣列請求
+        for batch_start in range(0, target_count, batch_size):
+            batch_docs = documents[batch_start:batch_start + batch_size]
+            texts = []
+            valid_docs = []
+            for i, doc in enumerate(batch_docs, batch_start + 1):
+                text = build_embedding_text(doc)
+                if not text.strip():
+                    logger.warning(f"[{i}/{target_count}] 公文 #{doc.id} 無有效文字，跳過")
+                    skip_count += 1
+                    continue
+                texts.append(text)
+                valid_docs.append(doc)
 
             try:
-                embedding = await connector.generate_embedding(text)
+                embeddings = await EmbeddingManager.get_embeddings_batch(texts, connector)
+            except Exception as e:
+                logger.error(f"批次 {batch_start + 1}~{batch_start + len(batch_docs)} 處理失敗: {e}")
+                error_count += len(valid_docs)
+                continue
 
+            for doc, embedding in zip(valid_docs, embeddings, strict=True):
                 if embedding is None:
-                    logger.warning(
-                        f"[{i}/{target_count}] 公文 #{doc.id} embedding 生成失敗（返回 None）"
-                    )
+                    logger.warning(f"公文 #{doc.id} embedding 生成失敗（返回 None）")
                     error_count += 1
                     continue
-
                 if not dry_run:
                     doc.embedding = embedding
-
                 success_count += 1
 
-                # 進度顯示
-                if i % 10 == 0 or i == target_count:
-                    elapsed = time.time() - start_time
-                    rate = success_count / elapsed if elapsed > 0 else 0
-                    remaining = (target_count - i) / rate if rate > 0 else 0
-                    logger.info(
-                        f"[{i}/{target_count}] "
-                        f"成功: {success_count}, 失敗: {error_count}, 跳過: {skip_count} "
-                        f"({rate:.1f} docs/s, 預估剩餘: {remaining:.0f}s)"
-                    )
-
-            except Exception as e:
-                logger.error(f"[{i}/{target_count}] 公文 #{doc.id} 處理失敗: {e}")
-                error_count += 1
+            # 進度顯示
+            done = batch_start + len(batch_docs)
+            elapsed = time.time() - start_time
+            rate = success_count / elapsed if elapsed > 0 else 0
+            remaining = (target_count - done) / rate if rate > 0 else 0
+            logger.info(
+                f"[{done}/{target_count}] "
+                f"成功: {success_count}, 失敗: {error_count}, 跳過: {skip_count} "
+                f"({rate:.1f} docs/s, 預估剩餘: {remaining:.0f}s)"
+            )
 
             # 批次 commit
-            if not dry_run and i % batch_size == 0:
+            if not dry_run:
                 try:
                     await db.commit()
-                    logger.info(f"批次 commit 完成 (第 {i // batch_size} 批)")
+                    logger.info(f"批次 commit 完成 (第 {batch_start // batch_size + 1} 批)")
                 except Exception as e:
                     logger.error(f"批次 commit 失敗: {e}")
                     await db.rollback()
                     return
 
-        # 最後一批 commit
-        if not dry_run and success_count > 0:
-            try:
-                await db.commit()
-                logger.info("最終 commit 完成")
-            except Exception as e:
-                logger.error(f"最終 commit 失敗: {e}")
-                await db.rollback()
-                return
-
         # 結果統計
         elapsed = time.time() - start_time
         logger.info("=" * 60)
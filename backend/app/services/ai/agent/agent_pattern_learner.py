@@ -16,9 +16,10 @@ Phase 3A 升級：語意匹配 fallback
 - 衰減權重（近期模式權重更高）
 - 高信心門檻（寧可多走 LLM，不可錯誤路由）
 
-Version: 2.0.0
+Version: 2.1.0
 Created: 2026-03-14
 Updated: 2026-03-15 - v2.0.0 新增語意匹配 fallback
+Updated: 2026-10-16 - v2.1.0 語意匹配改用行程內 embedding 矩陣，Redis 明細讀取改 pipeline
 """
 
 import hashlib
@@ -196,6 +197,9 @@ class QueryPatternLearner:
                     },
                 )
                 await redis.zadd(index_key, {pattern_key: score})
+                if new_hits == 2:
+                    # 晉升為可匹配模式（hit_count >= 2）→ 預先寫入 embedding 矩陣
+                    await self._index_patterns([(pattern_key, template)])
             else:
                 # 新增模式
                 score = self._calc_score(1, 1.0, now)
@@ -222,6 +226,7 @@ class QueryPatternLearner:
                     remove_count = max(1, count - self._max_patterns)
                     lowest = await redis.zrange(index_key, 0, remove_count - 1)
                     pipe = redis.pipeline()
+                    removed = []
                     for key_to_remove in lowest:
                         k = (
                             key_to_remove.decode()
@@ -230,7 +235,10 @@ class QueryPatternLearner:
                         )
                         pipe.delete(f"{self._PREFIX}:detail:{k}")
                         pipe.zrem(index_key, k)
+                        removed.append(k)
                     await pipe.execute()
+                    from app.services.ai.agent.pattern_semantic_matcher import get_pattern_embedding_index
+                    get_pattern_embedding_index().remove(removed)
 
             await redis.expire(detail_key, self._TTL)
 
@@ -244,6 +252,34 @@ class QueryPatternLearner:
         except Exception as e:
             logger.debug("PatternLearner.learn failed: %s", e)
 
+    async def _index_patterns(self, items: List[tuple]) -> None:
+        """將 (pattern_key, template) 寫入語意匹配 embedding 矩陣（失敗不影響學習）"""
+        try:
+            from app.services.ai.core.ai_config import get_ai_config
+            if not get_ai_config().pattern_semantic_enabled:
+                return
+            from app.services.ai.agent.pattern_semantic_matcher import index_pattern_templates
+            await index_pattern_templates(items)
+        except Exception as e:
+            logger.debug("Pattern embedding index update skipped: %s", e)
+
+    async def _fetch_patterns(self, redis: Any, keys: List[Any]) -> List[QueryPattern]:
+        """以單一 pipeline 讀取多個模式明細（保持 keys 順序，缺漏者略過）"""
+        names = [k.decode() if isinstance(k, bytes) else k for k in keys]
+        if not names:
+            return []
+        pipe = redis.pipeline()
+        for k in names:
+            pipe.hgetall(f"{self._PREFIX}:detail:{k}")
+        details = await pipe.execute()
+        patterns = []
+        for k, detail in zip(names, details):
+            if detail:
+                pattern = self._parse_pattern(k, detail)
+                if pattern:
+                    patterns.append(pattern)
+        return patterns
+
     async def _update_db_graduation(self, template: str, success: bool) -> None:
         """Bridge Redis pattern learning to DB graduation system."""
         from app.services.ai.agent.agent_pattern_persistence import update_db_graduation
@@ -315,14 +351,9 @@ class QueryPatternLearner:
             if not candidates:
                 return []
 
-            candidate_patterns = []
-            for key in candidates:
-                k = key.decode() if isinstance(key, bytes) else key
-                detail = await redis.hgetall(f"{self._PREFIX}:detail:{k}")
-                if detail:
-                    pattern = self._parse_pattern(k, detail)
-                    if pattern and pattern.hit_count >= 2:
-                        candidate_patterns.append(pattern)
+            candidate_patterns = [
+                p for p in await self._fetch_patterns(redis, candidates) if p.hit_count >= 2
+            ]
 
             if not candidate_patterns:
                 return []
@@ -345,16 +376,14 @@ class QueryPatternLearner:
         try:
             index_key = f"{self._PREFIX}:index"
             top_keys = await redis.zrevrange(index_key, 0, n - 1, withscores=True)
+            scores = {
+                (key.decode() if isinstance(key, bytes) else key): score
+                for key, score in top_keys
+            }
 
-            results = []
-            for key, score in top_keys:
-                k = key.decode() if isinstance(key, bytes) else key
-                detail = await redis.hgetall(f"{self._PREFIX}:detail:{k}")
-                if detail:
-                    pattern = self._parse_pattern(k, detail)
-                    if pattern:
-                        pattern.score = score
-                        results.append(pattern)
+            results = await self._fetch_patterns(redis, list(scores))
+            for pattern in results:
+                pattern.score = scores[pattern.pattern_key]
             return results
 
         except Exception as e:
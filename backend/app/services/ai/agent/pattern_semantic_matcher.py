@@ -4,14 +4,20 @@ Pattern Semantic Matcher — 模式語意匹配
 提供 embedding 餘弦相似度和 Jaccard 降級方案。
 從 agent_pattern_learner.py 提取。
 
-Version: 1.0.0
+v1.1.0: 模式 embedding 常駐行程內 float32 正規化矩陣（PatternEmbeddingIndex），
+每次查詢只需 1 次 embedding + 1 次矩陣-向量乘積；候選不在矩陣內才補算。
+learn() 在模式新增 / 晉升為可匹配（hit_count >= 2）或淘汰時同步更新矩陣。
+
+Version: 1.1.0
 Created: 2026-03-26
 """
 
 import logging
 import math
 import re
-from typing import Any, List, Optional, TYPE_CHECKING
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
 
 if TYPE_CHECKING:
     from app.services.ai.agent.agent_pattern_learner import QueryPattern
@@ -69,34 +75,118 @@ async def semantic_match(
         return []
 
 
+class PatternEmbeddingIndex:
+    """模式 template embedding 的行程內矩陣（每列 L2 正規化，float32）
+
+    pattern_key = MD5(template)，同一 key 的 template 不會變動，
+    因此列只需新增 / 移除，不需重算。
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def add(self, items: Iterable[Tuple[str, Optional[List[float]]]]) -> None:
+        """加入 (pattern_key, embedding)；已存在或 embedding 為空者略過"""
+        new: Dict[str, List[float]] = {}
+        for key, embedding in items:
+            if embedding and key not in self._rows:
+                new[key] = embedding
+        if not new:
+            return
+        vectors = np.asarray(list(new.values()), dtype=np.float32)
+        if self._matrix is not None and vectors.shape[1] != self._matrix.shape[1]:
+            self.clear()  # embedding 模型更換（維度不同），舊列作廢
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        self._matrix = vectors if self._matrix is None else np.vstack([self._matrix, vectors])
+        for key in new:
+            self._rows[key] = len(self._keys)
+            self._keys.append(key)
+
+    def remove(self, keys: Iterable[str]) -> None:
+        drop = {k for k in keys if k in self._rows}
+        if not drop:
+            return
+        keep = [i for i, k in enumerate(self._keys) if k not in drop]
+        self._keys = [self._keys[i] for i in keep]
+        self._rows = {k: i for i, k in enumerate(self._keys)}
+        self._matrix = self._matrix[keep] if keep else None
+
+    def clear(self) -> None:
+        self._keys = []
+        self._rows = {}
+        self._matrix = None
+
+    def scores(self, query: List[float], keys: Iterable[str]) -> Dict[str, float]:
+        """query 與指定 key 的餘弦相似度（不在矩陣內的 key 不回傳）"""
+        if self._matrix is None:
+            return {}
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if q.shape[0] != self._matrix.shape[1] or norm == 0:
+            return {}
+        sims = self._matrix @ (q / norm)
+        return {k: float(sims[self._rows[k]]) for k in keys if k in self._rows}
+
+
+_pattern_index = PatternEmbeddingIndex()
+
+
+def get_pattern_embedding_index() -> PatternEmbeddingIndex:
+    return _pattern_index
+
+
+async def index_pattern_templates(items: List[Tuple[str, str]]) -> int:
+    """將 (pattern_key, template) 中尚未入矩陣者批次 embedding 後加入。回傳新增數。"""
+    missing = [(k, t) for k, t in items if k not in _pattern_index]
+    if not missing:
+        return 0
+    from app.core.ai_connector import get_ai_connector
+    from app.services.ai.core.embedding_manager import EmbeddingManager
+
+    connector = get_ai_connector()
+    embeddings = await EmbeddingManager.get_embeddings_batch([t for _, t in missing], connector)
+    before = len(_pattern_index)
+    _pattern_index.add((k, e) for (k, _), e in zip(missing, embeddings))
+    return len(_pattern_index) - before
+
+
 async def _embedding_cosine_match(
     template: str,
     candidates: List["QueryPattern"],
 ) -> tuple:
-    """使用 embedding 餘弦相似度匹配。回傳 (best_pattern, score) 或 (None, 0)。"""
+    """使用 embedding 餘弦相似度匹配。回傳 (best_pattern, score) 或 (None, 0)。
+
+    候選 embedding 取自 PatternEmbeddingIndex；不在矩陣內者與查詢合併為一次批次 embedding。
+    """
     try:
+        from app.core.ai_connector import get_ai_connector
         from app.services.ai.core.embedding_manager import EmbeddingManager
-        from app.services.ai.core.base_ai_service import BaseAIService
 
-        connector = BaseAIService.get_shared_connector()
-        if not connector:
-            return (None, 0.0)
+        connector = get_ai_connector()
 
-        texts = [template] + [p.template for p in candidates]
+        missing = [p for p in candidates if p.pattern_key not in _pattern_index]
+        texts = [template] + [p.template for p in missing]
         embeddings = await EmbeddingManager.get_embeddings_batch(texts, connector)
 
         query_emb = embeddings[0]
         if not query_emb:
             return (None, 0.0)
+        _pattern_index.add((p.pattern_key, e) for p, e in zip(missing, embeddings[1:]))
 
+        scores = _pattern_index.scores(query_emb, [p.pattern_key for p in candidates])
         best_match = None
         best_score = 0.0
-
-        for i, p in enumerate(candidates):
-            cand_emb = embeddings[i + 1]
-            if not cand_emb:
-                continue
-            similarity = _cosine_similarity(query_emb, cand_emb)
+        for p in candidates:
+            similarity = scores.get(p.pattern_key, 0.0)
             if similarity > best_score:
                 best_score = similarity
                 best_match = p
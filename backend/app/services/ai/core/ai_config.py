@@ -62,6 +62,9 @@ class AIConfig:
     rag_max_history_turns: int = 4             # 多輪對話保留輪數
     rag_temperature: float = 0.3              # RAG 生成溫度
     rag_max_tokens: int = 1024                 # RAG 生成最大 tokens
+    rag_fused_retrieval: bool = False          # 向量 + BM25 + wiki 單趟候選 + RRF 融合（opt-in：尚未含 rerank / wiki 加權）
+    rag_rrf_k: int = 60                        # RRF 平滑常數 (1 / (k + rank))
+    rag_candidate_pool: int = 30               # 每路候選數（向量 / BM25 各取）
 
     # NER 實體提取 (v2.0.0 新增)
     ner_min_confidence: float = 0.6            # 實體最低信心度
@@ -73,6 +76,13 @@ class AIConfig:
     embedding_cache_max_size: int = 2000       # LRU 快取大小（覆蓋 728 文件 + 查詢快取）
     embedding_cache_ttl: int = 3600            # 快取 TTL (秒)，Embedding 穩定可延長
     embedding_max_text_chars: int = 8000       # 文字截斷長度
+    embedding_disk_cache_enabled: bool = False  # L2 SQLite 快取（跨重啟 / 跨 worker 共用）
+    embedding_disk_cache_path: str = ""        # 空字串 = data/embedding_cache.sqlite3
+    embedding_disk_cache_max_mb: int = 512     # L2 容量上限，超過依 LRU 淘汰
+    embedding_batch_window_ms: int = 5         # 微批次：收集併發請求的等待窗口
+    embedding_batch_max_size: int = 32         # 微批次：單次 /api/embed 最多筆數
+    embedding_batch_max_chars: int = 64000     # 微批次：單次請求文字總長上限（token 量近似）
+    embedding_fallback_concurrency: int = 4    # 批次失敗改逐筆重試時的同時請求上限
 
     # 知識圖譜 (v2.0.0 新增)
     kg_fuzzy_threshold: float = 0.85           # 模糊匹配相似度閾值
@@ -95,6 +105,11 @@ class AIConfig:
     graph_cache_ttl_stats: int = 1800          # 統計快取 TTL (秒)
     graph_cache_ttl_path: int = 300            # 最短路徑快取 TTL (秒)
 
+    # 圖譜 CSR 遍歷引擎 (in-process 雙向 BFS，SQL CTE 為 fallback)
+    graph_csr_enabled: bool = False            # 啟用 CSR 快照遍歷
+    graph_csr_max_staleness: int = 600         # 快照最長存活 (秒)，逾時背景重建
+    graph_csr_overlay_limit: int = 5000        # 增量 overlay 邊數上限，超過即重建
+
     # Agent 編排引擎 (v2.2.0 新增)
     agent_max_iterations: int = 3              # 工具迴圈最大輪次
     agent_tool_timeout: int = 15               # 單個工具執行超時 (秒)
@@ -286,6 +301,9 @@ class AIConfig:
             rag_max_history_turns=int(os.getenv("RAG_MAX_HISTORY_TURNS", "4")),
             rag_temperature=float(os.getenv("RAG_TEMPERATURE", "0.3")),
             rag_max_tokens=int(os.getenv("RAG_MAX_TOKENS", "1024")),
+            rag_fused_retrieval=os.getenv("RAG_FUSED_RETRIEVAL", "false").lower() == "true",
+            rag_rrf_k=int(os.getenv("RAG_RRF_K", "60")),
+            rag_candidate_pool=int(os.getenv("RAG_CANDIDATE_POOL", "30")),
             # NER
             ner_min_confidence=float(os.getenv("NER_MIN_CONFIDENCE", "0.6")),
             ner_max_input_chars=int(os.getenv("NER_MAX_INPUT_CHARS", "2000")),
@@ -295,6 +313,13 @@ class AIConfig:
             embedding_cache_max_size=int(os.getenv("EMBEDDING_CACHE_MAX_SIZE", "2000")),
             embedding_cache_ttl=int(os.getenv("EMBEDDING_CACHE_TTL", "3600")),
             embedding_max_text_chars=int(os.getenv("EMBEDDING_MAX_TEXT_CHARS", "8000")),
+            embedding_disk_cache_enabled=os.getenv("EMBEDDING_DISK_CACHE_ENABLED", "false").lower() == "true",
+            embedding_disk_cache_path=os.getenv("EMBEDDING_DISK_CACHE_PATH", ""),
+            embedding_disk_cache_max_mb=int(os.getenv("EMBEDDING_DISK_CACHE_MAX_MB", "512")),
+            embedding_batch_window_ms=int(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")),
+            embedding_batch_max_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+            embedding_batch_max_chars=int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "64000")),
+            embedding_fallback_concurrency=int(os.getenv("EMBEDDING_FALLBACK_CONCURRENCY", "4")),
             # 知識圖譜
             kg_fuzzy_threshold=float(os.getenv("KG_FUZZY_THRESHOLD", "0.85")),
             kg_semantic_distance=float(os.getenv("KG_SEMANTIC_DISTANCE", "0.15")),
@@ -312,6 +337,10 @@ class AIConfig:
             graph_cache_ttl_search=int(os.getenv("GRAPH_CACHE_TTL_SEARCH", "120")),
             graph_cache_ttl_stats=int(os.getenv("GRAPH_CACHE_TTL_STATS", "1800")),
             graph_cache_ttl_path=int(os.getenv("GRAPH_CACHE_TTL_PATH", "300")),
+            # 圖譜 CSR 遍歷引擎
+            graph_csr_enabled=os.getenv("GRAPH_CSR_ENABLED", "false").lower() == "true",
+            graph_csr_max_staleness=int(os.getenv("GRAPH_CSR_MAX_STALENESS", "600")),
+            graph_csr_overlay_limit=int(os.getenv("GRAPH_CSR_OVERLAY_LIMIT", "5000")),
             # Agent 編排引擎 (YAML: agent.*)
             agent_max_iterations=_env_or_yaml(
                 "AGENT_MAX_ITERATIONS", ("agent", "max_iterations"), 3, int),
@@ -71,7 +71,7 @@ def get_cache() -> SimpleCache:
     """取得記憶體快取實例"""
     global _cache
     if _cache is None:
-        _cache = SimpleCache()
+        _cache = SimpleCache(namespace="ai")
     return _cache
 
 
@@ -197,6 +197,7 @@ class BaseAIService:
                 max_tokens=max_tokens,
                 prefer_local=prefer_local,
                 task_type=task_type,
+                coalesce=True,  # 結果本就寫入快取共用，併發相同請求可合併
             )
         except Exception:
             await self._record_stat(feature, cache_miss=True, error=True)
@@ -313,8 +314,9 @@ class BaseAIService:
         max_tokens: Optional[int] = None,
         prefer_local: bool = False,
         task_type: Optional[str] = None,
+        coalesce: bool = False,
     ) -> str:
-        """呼叫 AI 服務"""
+        """呼叫 AI 服務（coalesce 見 AIConnector.chat_completion）"""
         if not self.is_enabled():
             raise RuntimeError("AI 服務未啟用")
 
@@ -329,6 +331,7 @@ class BaseAIService:
             max_tokens=max_tokens or 1024,
             prefer_local=prefer_local,
             task_type=task_type,
+            coalesce=coalesce,
         )
 
     async def check_health(self) -> Dict[str, Any]:
@@ -0,0 +1,153 @@
+"""
+Embedding 微批次分派器
+
+EmbeddingManager 快取未命中時，原本每段文字各自呼叫一次 generate_embedding
+（/api/embed 單筆）。分派器在短暫窗口（預設 5ms）內收集併發請求，
+湊滿筆數或文字總長上限即提早送出，以 Ollama /api/embed 陣列模式一次產生，
+再將向量分送回各等待中的呼叫端。
+
+- 窗口 / 筆數 / 文字長度上限：AIConfig.embedding_batch_*（EMBEDDING_BATCH_* 環境變數）
+- 同時在途的批次請求數由呼叫端提供的 Semaphore 限制
+- 批次只有一筆、或 connector 未提供 async generate_embeddings_batch 時，
+  退回逐筆 generate_embedding（保留單筆路徑延遲）
+- 批次呼叫拋出例外時改逐筆 generate_embedding，每個呼叫端只收到自己那筆的結果 / 例外；
+  逐筆重試同時最多 embedding_fallback_concurrency 筆（否則一個批次佔一個 semaphore
+  名額卻同時打出整批請求，外層併發上限形同虛設）
+
+v1.1.0: 批次例外不再連帶整批失敗，改逐筆重試
+
+Version: 1.1.0
+Created: 2026-10-16
+"""
+
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .ai_config import get_ai_config
+
+logger = logging.getLogger(__name__)
+
+# 與 AIConnector 截斷長度一致，用於估算批次大小
+_MAX_TEXT_CHARS = 8000
+
+
+@dataclass
+class _OpenBatch:
+    connector: Any
+    items: List[Tuple[str, asyncio.Future]] = field(default_factory=list)
+    chars: int = 0
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """收集併發 embedding 請求並合併為 /api/embed 陣列呼叫（每個 connector 一個開放批次）"""
+
+    def __init__(
+        self,
+        semaphore: asyncio.Semaphore,
+        window_ms: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ):
+        cfg = get_ai_config()
+        self.semaphore = semaphore
+        self.window = (cfg.embedding_batch_window_ms if window_ms is None else window_ms) / 1000
+        self.max_size = max(1, cfg.embedding_batch_max_size if max_size is None else max_size)
+        self.max_chars = cfg.embedding_batch_max_chars if max_chars is None else max_chars
+        self.fallback_concurrency = max(1, cfg.embedding_fallback_concurrency)
+        self._open: Dict[int, _OpenBatch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 統計
+        self.batches = 0
+        self.texts = 0
+        self.max_batch = 0
+
+    async def embed(self, text: str, connector: Any) -> Optional[List[float]]:
+        """排入目前開放批次，等待該批次送出後取回向量（失敗回傳 None 或拋出例外）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 換 event loop（測試 / reload）時捨棄舊 loop 上的批次狀態
+            self._open.clear()
+            self._loop = loop
+
+        key = id(connector)
+        batch = self._open.get(key)
+        if batch is None:
+            batch = _OpenBatch(connector)
+            self._open[key] = batch
+            batch.timer = loop.call_later(self.window, self._flush, key)
+
+        future = loop.create_future()
+        batch.items.append((text, future))
+        batch.chars += min(len(text), _MAX_TEXT_CHARS)
+        if len(batch.items) >= self.max_size or batch.chars >= self.max_chars:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: int) -> None:
+        batch = self._open.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: _OpenBatch) -> None:
+        items = [(text, fut) for text, fut in batch.items if not fut.done()]
+        if not items:
+            return
+        texts = [text for text, _ in items]
+        self.batches += 1
+        self.texts += len(texts)
+        self.max_batch = max(self.max_batch, len(texts))
+        try:
+            async with self.semaphore:
+                vectors = await self._call(batch.connector, texts)
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        except BaseException:
+            for _, fut in items:
+                fut.cancel()
+            raise
+        for (_, fut), vector in zip(items, vectors, strict=True):
+            if fut.done():
+                continue
+            if isinstance(vector, BaseException):
+                fut.set_exception(vector)
+            else:
+                fut.set_result(vector)
+
+    async def _call(self, connector: Any, texts: List[str]) -> List[Any]:
+        batch_fn = getattr(connector, "generate_embeddings_batch", None)
+        if len(texts) > 1 and inspect.iscoroutinefunction(batch_fn):
+            try:
+                vectors = await batch_fn(texts)
+            except Exception as e:
+                logger.warning("Embedding 微批次失敗，改逐筆送出 (%d 筆): %s", len(texts), e)
+            else:
+                logger.debug("Embedding 微批次送出: %d 筆", len(texts))
+                return list(vectors)[:len(texts)] + [None] * (len(texts) - len(vectors))
+        limit = asyncio.Semaphore(self.fallback_concurrency)
+
+        async def one(text: str) -> Optional[List[float]]:
+            async with limit:
+                return await connector.generate_embedding(text)
+
+        return await asyncio.gather(*(one(text) for text in texts), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+        }
@@ -0,0 +1,246 @@
+"""
+Embedding 第二層快取 — SQLite 持久化（跨重啟、跨 uvicorn worker 共用）
+
+EmbeddingManager 的記憶體 LRU 是 process 內的，重啟或多 worker 時
+同一批主旨 / 機關名稱 / 查詢會重複呼叫 Ollama。本模組提供 L2：
+
+- 單檔 SQLite（WAL，多 process 可同時讀寫），key = (model, SHA256 key)
+- value = float32 BLOB（768 維約 3KB）
+- 容量上限（bytes）：超過時依 last_access 淘汰最舊的至 90%
+- last_access 以 TOUCH_INTERVAL 節流更新，避免熱門 key 每次命中都寫檔
+- 任何 I/O 錯誤只 log warning、不拋出（L2 失效時退回原本的 L1 + Ollama）
+
+啟用：EMBEDDING_DISK_CACHE_ENABLED=true
+      EMBEDDING_DISK_CACHE_PATH（預設 data/embedding_cache.sqlite3）
+      EMBEDDING_DISK_CACHE_MAX_MB（預設 512）
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .ai_config import get_ai_config
+
+logger = logging.getLogger(__name__)
+
+# 命中後多久才回寫 last_access（秒）
+TOUCH_INTERVAL = 300
+# 淘汰後保留容量比例
+EVICT_TARGET_RATIO = 0.9
+# SQLite 單一 statement 參數上限保守值
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model       TEXT    NOT NULL,
+    key         TEXT    NOT NULL,
+    vec         BLOB    NOT NULL,
+    size        INTEGER NOT NULL,
+    last_access REAL    NOT NULL,
+    PRIMARY KEY (model, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_access ON embedding_cache(last_access);
+"""
+
+
+def _pack(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    arr = array("f")
+    arr.frombytes(blob)
+    return arr.tolist()
+
+
+class EmbeddingDiskCache:
+    """SQLite embedding store（同步 API；呼叫端以 asyncio.to_thread 包裝）"""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每個執行緒一條連線（to_thread 會在 executor 不同執行緒間切換）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        stale: List[str] = []
+        now = time.time()
+        try:
+            conn = self._conn()
+            for start in range(0, len(keys), _SQL_CHUNK):
+                part = keys[start:start + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                rows = conn.execute(
+                    f"SELECT key, vec, last_access FROM embedding_cache "
+                    f"WHERE model = ? AND key IN ({marks})",
+                    [model, *part],
+                ).fetchall()
+                for key, blob, last_access in rows:
+                    found[key] = _unpack(blob)
+                    if now - last_access > TOUCH_INTERVAL:
+                        stale.append(key)
+            if stale:
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_access = ? WHERE model = ? AND key = ?",
+                    [(now, model, k) for k in stale],
+                )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("Embedding disk cache read failed: %s", e)
+            return {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        now = time.time()
+        rows = []
+        for key, vec in items:
+            blob = _pack(vec)
+            rows.append((model, key, blob, len(blob), now))
+        if not rows:
+            return
+        try:
+            conn = self._conn()
+            with self._lock:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embedding_cache (model, key, vec, size, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                self.writes += len(rows)
+                # 覆寫既有 key 時會高估；超標時 _evict 會以實際總量重算
+                total = self._current_bytes(conn) + sum(r[3] for r in rows)
+                self._total_bytes = total
+                if total > self.max_bytes:
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("Embedding disk cache write failed: %s", e)
+
+    def _current_bytes(self, conn: sqlite3.Connection) -> int:
+        if self._total_bytes is None:
+            self._total_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM embedding_cache"
+            ).fetchone()[0]
+        return self._total_bytes
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """依 last_access 淘汰至 EVICT_TARGET_RATIO（需持有 _lock）"""
+        # 其他 worker 也在寫 → 以實際總量為準
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embedding_cache").fetchone()[0]
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        if total <= target:
+            self._total_bytes = total
+            return
+        cutoff, freed = None, 0
+        for size, last_access in conn.execute(
+            "SELECT size, last_access FROM embedding_cache ORDER BY last_access"
+        ):
+            freed += size
+            cutoff = last_access
+            if total - freed <= target:
+                break
+        if cutoff is None:
+            return
+        deleted = conn.execute(
+            "DELETE FROM embedding_cache WHERE last_access <= ?", (cutoff,)
+        ).rowcount
+        self.evictions += deleted
+        self._total_bytes = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embedding_cache"
+        ).fetchone()[0]
+        logger.info(
+            "Embedding disk cache evicted %d entries (%.1f MB → %.1f MB)",
+            deleted, total / 1e6, self._total_bytes / 1e6,
+        )
+
+    def clear(self) -> None:
+        try:
+            with self._lock:
+                self._conn().execute("DELETE FROM embedding_cache")
+                self._total_bytes = 0
+        except sqlite3.Error as e:
+            logger.warning("Embedding disk cache clear failed: %s", e)
+        self.hits = self.misses = self.writes = self.evictions = 0
+
+    def stats(self) -> Dict[str, object]:
+        try:
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embedding_cache"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = -1, -1
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_rate_percent": round(self.hits / max(self.hits + self.misses, 1) * 100, 1),
+        }
+
+
+_disk_cache: Optional[EmbeddingDiskCache] = None
+_disk_cache_checked = False
+
+
+def get_embedding_disk_cache() -> Optional[EmbeddingDiskCache]:
+    """取得 L2 快取單例；未啟用或開檔失敗時回傳 None。"""
+    global _disk_cache, _disk_cache_checked
+    if _disk_cache_checked:
+        return _disk_cache
+    _disk_cache_checked = True
+    cfg = get_ai_config()
+    if not cfg.embedding_disk_cache_enabled:
+        return None
+    path = cfg.embedding_disk_cache_path
+    if not path:
+        from app.core.paths import DATA_DIR
+        path = str(DATA_DIR / "embedding_cache.sqlite3")
+    try:
+        _disk_cache = EmbeddingDiskCache(Path(path), cfg.embedding_disk_cache_max_mb * 1024 * 1024)
+        logger.info("Embedding disk cache enabled: %s", path)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Embedding disk cache unavailable (%s), memory LRU only: %s", path, e)
+    return _disk_cache
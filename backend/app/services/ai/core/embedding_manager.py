@@ -7,7 +7,9 @@
 所有需要 embedding 的服務（搜尋、圖譜入圖、批次回填）
 均應透過此管理器取得 embedding。
 
-Version: 1.3.0 - 新增 get_embeddings_batch 批次快取 + 並發產生
+Version: 1.6.0 - 快取未命中改經 EmbeddingBatcher 微批次，併發請求合併為一次 /api/embed 陣列呼叫
+         1.5.0 - 快取未命中時相同 (模型, 文字) 的併發請求合併為一次 Ollama 呼叫（single-flight）
+         1.4.0 - 新增 L2 持久化快取（SQLite，跨重啟 / 跨 worker，見 embedding_disk_cache）
 Created: 2026-02-24
 """
 
@@ -22,10 +24,17 @@ from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.single_flight import get_single_flight
+
 from .ai_config import get_ai_config
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_disk_cache import EmbeddingDiskCache, get_embedding_disk_cache
 
 logger = logging.getLogger(__name__)
 
+# 兩層快取皆未命中時，相同 (模型, 快取 key) 的併發請求共用一次 Ollama 呼叫
+_embed_flight = get_single_flight("embedding_manager")
+
 
 class EmbeddingManager:
     """
@@ -37,6 +46,10 @@ class EmbeddingManager:
     - 快取 value = (embedding, timestamp)
     - _write_lock (asyncio.Lock) 保護快取寫入/驅逐
     - _embed_semaphore (asyncio.Semaphore) 限制並發 Ollama 呼叫，防止資源耗盡
+    - _batcher (EmbeddingBatcher)：未命中文字於數毫秒窗口內合併為一次 /api/embed 陣列請求
+    - L2（選用）：SQLite 持久化，key = (embedding 模型, 同一 SHA256 key)；
+      L1 未命中先查 L2，Ollama 產生後兩層同時寫入
+    - single-flight：兩層皆未命中且同一文字已在產生中時，等待同一次呼叫
     """
 
     _instance: Optional["EmbeddingManager"] = None
@@ -45,9 +58,14 @@ class EmbeddingManager:
     _cache_ttl: float = 0.0       # 延遲初始化
     _write_lock: Optional[asyncio.Lock] = None          # 延遲初始化（避免跨 event-loop）
     _embed_semaphore: Optional[asyncio.Semaphore] = None  # 延遲初始化
+    _batcher: Optional[EmbeddingBatcher] = None           # 延遲初始化（綁定 _embed_semaphore）
+    _disk: Optional[EmbeddingDiskCache] = None
+    _disk_checked: bool = False
 
-    # 統計
+    # 統計（_hits = L1 命中，_disk_hits = L2 命中，_misses = 實際呼叫 Ollama 次數；
+    #       被合併的併發請求另計於 _embed_flight.coalesced）
     _hits: int = 0
+    _disk_hits: int = 0
     _misses: int = 0
 
     def __new__(cls) -> "EmbeddingManager":
@@ -62,16 +80,52 @@ class EmbeddingManager:
             cls._write_lock = asyncio.Lock()
         if cls._embed_semaphore is None:
             cls._embed_semaphore = asyncio.Semaphore(5)
+        if cls._batcher is None or cls._batcher.semaphore is not cls._embed_semaphore:
+            cls._batcher = EmbeddingBatcher(cls._embed_semaphore)
         if cls._max_cache_size == 0:
             cfg = get_ai_config()
             cls._max_cache_size = cfg.embedding_cache_max_size
             cls._cache_ttl = float(cfg.embedding_cache_ttl)
+        if not cls._disk_checked:
+            cls._disk = get_embedding_disk_cache()
+            cls._disk_checked = True
 
     @classmethod
     def _cache_key(cls, text: str) -> str:
         """產生快取 key（全文 SHA256）"""
         return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
+    @staticmethod
+    def _model_name() -> str:
+        """L2 key 的模型名稱（與 AIConnector.generate_embedding 預設一致）"""
+        return os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+
+    @classmethod
+    def _remember(cls, key: str, embedding: List[float]) -> None:
+        """寫入 L1（需在 _write_lock 內呼叫）"""
+        if key not in cls._cache and len(cls._cache) >= cls._max_cache_size:
+            cls._cache.popitem(last=False)  # 移除最舊
+        cls._cache[key] = (embedding, time.monotonic())
+        cls._cache.move_to_end(key)
+
+    @classmethod
+    async def _disk_lookup(cls, keys: List[str]) -> Dict[str, List[float]]:
+        """查詢 L2（未啟用時回傳空 dict）；命中者回填 L1"""
+        if cls._disk is None or not keys:
+            return {}
+        found = await asyncio.to_thread(cls._disk.get_many, cls._model_name(), keys)
+        if found:
+            cls._disk_hits += len(found)
+            async with cls._write_lock:  # type: ignore[union-attr]
+                for key, embedding in found.items():
+                    cls._remember(key, embedding)
+        return found
+
+    @classmethod
+    async def _disk_store(cls, items: List[Tuple[str, List[float]]]) -> None:
+        if cls._disk is not None and items:
+            await asyncio.to_thread(cls._disk.put_many, cls._model_name(), items)
+
     @classmethod
     def _evict_expired(cls) -> None:
         """清除過期項目（需在 _write_lock 內呼叫）"""
@@ -116,25 +170,47 @@ class EmbeddingManager:
                 else:
                     del cls._cache[key]
 
-        # 快取未命中 → 呼叫 Ollama
-        # _embed_semaphore 限制並發數，防止同時大量請求壓垮 Ollama
-        cls._misses += 1
-        try:
-            async with cls._embed_semaphore:  # type: ignore[union-attr]
-                embedding = await connector.generate_embedding(text)  # type: ignore[attr-defined]
-        except Exception as e:
-            logger.warning("Embedding 生成失敗: %s", e)
-            return None
+        # L1 未命中 → L2（持久化，其他 worker / 重啟前產生的）
+        found = await cls._disk_lookup([key])
+        if key in found:
+            return found[key]
 
-        if embedding and isinstance(embedding, list) and len(embedding) > 0:
-            # 存入快取 (_write_lock 保護寫入 + 驅逐)
-            async with cls._write_lock:  # type: ignore[union-attr]
-                cls._evict_expired()
-                if len(cls._cache) >= cls._max_cache_size:
-                    cls._cache.popitem(last=False)  # 移除最舊
-                cls._cache[key] = (embedding, time.monotonic())
+        # 快取未命中 → 呼叫 Ollama（相同文字併發時只呼叫一次）
+        return await cls._generate(key, text, connector, store=True)
+
+    @classmethod
+    async def _generate(
+        cls,
+        key: str,
+        text: str,
+        connector: object,
+        store: bool,
+    ) -> Optional[List[float]]:
+        """
+        呼叫 Ollama 產生 embedding（single-flight，key = (模型, 快取 key)）
 
-        return embedding
+        store=True 時由實際呼叫者寫入 L1 / L2，被合併的呼叫不重複寫入；
+        批次路徑傳 False，自行批次寫入。
+        """
+        async def _call() -> Optional[List[float]]:
+            # 經微批次分派器送出；_embed_semaphore 限制同時在途的批次請求數
+            cls._misses += 1
+            try:
+                embedding = await cls._batcher.embed(text, connector)  # type: ignore[union-attr]
+            except Exception as e:
+                logger.warning("Embedding 生成失敗: %s", e)
+                return None
+            if not (embedding and isinstance(embedding, list) and len(embedding) > 0):
+                return None
+            if store:
+                # 存入快取 (_write_lock 保護寫入 + 驅逐)
+                async with cls._write_lock:  # type: ignore[union-attr]
+                    cls._evict_expired()
+                    cls._remember(key, embedding)
+                await cls._disk_store([(key, embedding)])
+            return embedding
+
+        return await _embed_flight.do((cls._model_name(), key), _call)
 
     @classmethod
     async def get_embeddings_batch(
@@ -147,7 +223,7 @@ class EmbeddingManager:
 
         相比逐一呼叫 get_embedding，此方法：
         1. 一次性查詢快取，分離命中/未命中
-        2. 未命中部分透過 Semaphore 並發產生
+        2. 未命中部分交給微批次分派器，合併為 /api/embed 陣列請求
         3. 批次寫入快取
 
         Args:
@@ -182,21 +258,24 @@ class EmbeddingManager:
                         del cls._cache[key]
                 to_generate.append((i, text, key))
 
+        # Phase 1b: L1 未命中者查 L2
+        if to_generate:
+            found = await cls._disk_lookup([key for _, _, key in to_generate])
+            if found:
+                pending = []
+                for idx, text, key in to_generate:
+                    if key in found:
+                        results[idx] = found[key]
+                    else:
+                        pending.append((idx, text, key))
+                to_generate = pending
+
         if not to_generate:
             return results
 
-        # Phase 2: 並發產生（受 Semaphore 限制）
-        cls._misses += len(to_generate)
-
+        # Phase 2: 並發產生（經微批次分派器合併；與進行中的相同請求合併）
         async def _generate_one(idx: int, text: str, key: str) -> Tuple[int, str, Optional[List[float]]]:
-            try:
-                async with cls._embed_semaphore:  # type: ignore[union-attr]
-                    emb = await connector.generate_embedding(text)  # type: ignore[attr-defined]
-                if emb and isinstance(emb, list) and len(emb) > 0:
-                    return (idx, key, emb)
-            except Exception as e:
-                logger.warning("Batch embedding failed for text[%d]: %s", idx, e)
-            return (idx, key, None)
+            return (idx, key, await cls._generate(key, text, connector, store=False))
 
         tasks = [_generate_one(idx, text, key) for idx, text, key in to_generate]
         generated = await asyncio.gather(*tasks)
@@ -207,23 +286,32 @@ class EmbeddingManager:
             for idx, key, emb in generated:
                 results[idx] = emb
                 if emb is not None:
-                    if len(cls._cache) >= cls._max_cache_size:
-                        cls._cache.popitem(last=False)
-                    cls._cache[key] = (emb, time.monotonic())
+                    cls._remember(key, emb)
+        await cls._disk_store([(key, emb) for _, key, emb in generated if emb is not None])
 
         return results
 
     @classmethod
-    def get_stats(cls) -> Dict[str, int]:
-        """快取統計"""
+    def get_stats(cls) -> Dict[str, Any]:
+        """快取統計（hits / hit_rate_percent 為 L1；disk_* 為 L2；overall 為兩層合計）"""
+        lookups = cls._hits + cls._disk_hits + cls._misses
         return {
             "cache_size": len(cls._cache),
             "max_size": cls._max_cache_size,
             "hits": cls._hits,
             "misses": cls._misses,
             "hit_rate_percent": round(
-                cls._hits / max(cls._hits + cls._misses, 1) * 100, 1
+                cls._hits / max(lookups, 1) * 100, 1
+            ),
+            "disk_enabled": cls._disk is not None,
+            "disk_hits": cls._disk_hits,
+            "disk": cls._disk.stats() if cls._disk is not None else None,
+            "overall_hit_rate_percent": round(
+                (cls._hits + cls._disk_hits) / max(lookups, 1) * 100, 1
             ),
+            "coalesced": _embed_flight.coalesced,
+            "inflight": _embed_flight.stats()["inflight"],
+            "batcher": cls._batcher.stats() if cls._batcher is not None else None,
         }
 
     @classmethod
@@ -231,7 +319,11 @@ class EmbeddingManager:
         """清除所有快取"""
         cls._cache.clear()
         cls._hits = 0
+        cls._disk_hits = 0
         cls._misses = 0
+        _embed_flight.reset_stats()
+        if cls._disk is not None:
+            cls._disk.clear()
         logger.info("Embedding 快取已清除")
 
     @classmethod
@@ -127,6 +127,8 @@ class AttachmentContentIndexer:
             self.db.add(chunk)
 
         await self.db.flush()
+        from app.services.ai.search.rag_retrieval import reset_chunk_presence_cache
+        reset_chunk_presence_cache()
 
         elapsed_ms = int((time.time() - t0) * 1000)
         logger.info(
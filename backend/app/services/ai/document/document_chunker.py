@@ -7,15 +7,26 @@
 3. 短段落合併 (min 50 chars)
 4. 批次 embedding 生成
 
-Version: 1.0.0
+v1.1.0: chunk_documents_pipeline — 大量回填用串流管線
+  keyset 分頁（id > cursor + NOT EXISTS）→ process pool 分段 →
+  大組 get_embeddings_batch → 每頁單一 multi-row INSERT → checkpoint 續跑
+
+Version: 1.1.0
 Created: 2026-03-15
 """
 
+import asyncio
+import json
 import logging
+import os
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy import delete, select, func
+from sqlalchemy import delete, exists, insert, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
@@ -24,19 +35,28 @@ MAX_CHUNK_CHARS = 400
 MIN_CHUNK_CHARS = 50
 OVERLAP_CHARS = 80
 
+# 串流管線預設值
+PIPELINE_PAGE_SIZE = 200        # 每頁公文數（= 每次 commit / INSERT 的單位）
+PIPELINE_EMBED_GROUP = 256      # 每次 get_embeddings_batch 的 chunk 數
+PIPELINE_MAX_WORKERS = 4        # 分段 process pool 上限
 
-def build_document_text(doc: Any) -> str:
-    """組合公文全文 (主旨 + 說明 + 備註)"""
+
+def _compose_text(subject: Optional[str], content: Optional[str], ck_note: Optional[str]) -> str:
     parts = []
-    if doc.subject:
-        parts.append(f"主旨：{doc.subject}")
-    if doc.content:
-        parts.append(doc.content)
-    if doc.ck_note:
-        parts.append(f"備註：{doc.ck_note}")
+    if subject:
+        parts.append(f"主旨：{subject}")
+    if content:
+        parts.append(content)
+    if ck_note:
+        parts.append(f"備註：{ck_note}")
     return "\n\n".join(parts)
 
 
+def build_document_text(doc: Any) -> str:
+    """組合公文全文 (主旨 + 說明 + 備註)"""
+    return _compose_text(doc.subject, doc.content, doc.ck_note)
+
+
 def split_into_chunks(
     text: str,
     max_chars: int = MAX_CHUNK_CHARS,
@@ -213,10 +233,224 @@ async def chunk_document(
         db.add(chunk)
 
     await db.flush()
+    _chunks_changed()
     logger.info("Chunked document %d into %d chunks", document_id, len(chunks))
     return len(chunks)
 
 
+def _chunks_changed() -> None:
+    """分段寫入 / 重建後讓 RAG 的「有無 chunks」快取重新檢查（否則回填後最長 TTL 內仍走無 chunks 路徑）"""
+    from app.services.ai.search.rag_retrieval import reset_chunk_presence_cache
+
+    reset_chunk_presence_cache()
+
+
+def _chunk_rows(
+    rows: Sequence[Tuple[int, Optional[str], Optional[str], Optional[str]]],
+) -> List[Tuple[int, List[Dict[str, Any]]]]:
+    """(id, subject, content, ck_note) → [(id, chunks)]；module-level 以便送進 process pool。"""
+    out: List[Tuple[int, List[Dict[str, Any]]]] = []
+    for doc_id, subject, content, ck_note in rows:
+        text = _compose_text(subject, content, ck_note)
+        out.append((doc_id, split_into_chunks(text) if text.strip() else []))
+    return out
+
+
+def _build_chunk_records(
+    chunked: List[Tuple[int, List[Dict[str, Any]]]],
+    embeddings: List[Optional[List[float]]],
+    with_embedding_column: bool,
+) -> List[Dict[str, Any]]:
+    """分段結果 + 攤平後的 embeddings → INSERT 參數列（所有列 key 一致）。"""
+    records: List[Dict[str, Any]] = []
+    k = 0
+    for doc_id, chunks in chunked:
+        for i, chunk_data in enumerate(chunks):
+            record = {
+                "document_id": doc_id,
+                "chunk_index": i,
+                "chunk_text": chunk_data["text"],
+                "start_char": chunk_data["start_char"],
+                "end_char": chunk_data["end_char"],
+                "token_count": len(chunk_data["text"]) // 2,  # rough estimate for CJK
+            }
+            if with_embedding_column:
+                record["embedding"] = embeddings[k] if k < len(embeddings) else None
+            records.append(record)
+            k += 1
+    return records
+
+
+async def _embed_texts(
+    texts: List[str],
+    embedding_manager,
+    ai_connector,
+    group_size: int,
+) -> List[Optional[List[float]]]:
+    """chunk 文字以大組送 get_embeddings_batch（失敗組以 None 補位，不中斷管線）。"""
+    if not (embedding_manager and ai_connector) or not texts:
+        return [None] * len(texts)
+    out: List[Optional[List[float]]] = []
+    for start in range(0, len(texts), group_size):
+        group = texts[start:start + group_size]
+        try:
+            out.extend(await embedding_manager.get_embeddings_batch(group, ai_connector))
+        except Exception as e:
+            logger.warning("Chunk embedding group failed (%d texts): %s", len(group), e)
+            out.extend([None] * len(group))
+    return out
+
+
+def _load_pipeline_checkpoint(path: Optional[Path]) -> Dict[str, Any]:
+    if path and path.exists():
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning("Chunk pipeline checkpoint unreadable (%s), starting over: %s", path, e)
+    return {}
+
+
+def _save_pipeline_checkpoint(path: Optional[Path], data: Dict[str, Any]) -> None:
+    if not path:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+async def chunk_documents_pipeline(
+    db: AsyncSession,
+    *,
+    max_docs: Optional[int] = None,
+    page_size: int = PIPELINE_PAGE_SIZE,
+    embed_group: int = PIPELINE_EMBED_GROUP,
+    workers: Optional[int] = None,
+    embedding_manager=None,
+    ai_connector=None,
+    checkpoint_path: Optional[Path] = None,
+    after_id: Optional[int] = None,
+    newest_first: bool = False,
+    before_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    串流回填尚未分段的公文。
+
+    - keyset 分頁：`id > cursor AND NOT EXISTS (chunks)`，依 id 遞增；深頁不退化
+    - newest_first=True 時改為 `id < cursor` 依 id 遞減（自 before_id 起，None 為最新），
+      不讀寫 checkpoint；供 chunk_documents_batch 優先處理新公文
+    - 分段在 process pool 執行，與上一頁的 embedding + INSERT 重疊
+    - 每頁一次 multi-row INSERT + commit，之後寫 checkpoint（cursor = 該頁最大 id）
+    - checkpoint_path 存在時自 cursor 續跑；空白公文（0 chunk）也會被 cursor 跨過，
+      不會像 NOT IN 版本一樣每輪重撈
+
+    Args:
+        workers: process pool 大小；0 表示在目前 process 內分段（測試 / 小量）
+
+    Returns:
+        {"processed", "total_chunks", "embedded", "last_id", "elapsed_s", "docs_per_sec", "chunks_per_sec"}
+    """
+    from app.extended.models import OfficialDocument, DocumentChunk
+
+    if newest_first:
+        checkpoint_path = None
+    checkpoint = _load_pipeline_checkpoint(checkpoint_path)
+    cursor: Optional[int]
+    if newest_first:
+        cursor = before_id
+    else:
+        cursor = after_id if after_id is not None else int(checkpoint.get("last_id", 0))
+    with_embedding_column = hasattr(DocumentChunk, "embedding")
+
+    stats = {"processed": 0, "total_chunks": 0, "embedded": 0}
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    pool_size = min(PIPELINE_MAX_WORKERS, os.cpu_count() or 1) if workers is None else workers
+    pool: Optional[Executor] = ProcessPoolExecutor(max_workers=pool_size) if pool_size > 0 else None
+
+    async def fetch_page(after: Optional[int], size: int) -> List[Tuple[int, Optional[str], Optional[str], Optional[str]]]:
+        has_chunks = exists().where(DocumentChunk.document_id == OfficialDocument.id)
+        query = select(
+            OfficialDocument.id, OfficialDocument.subject,
+            OfficialDocument.content, OfficialDocument.ck_note,
+        ).where(~has_chunks)
+        if newest_first:
+            if after is not None:
+                query = query.where(OfficialDocument.id < after)
+            query = query.order_by(OfficialDocument.id.desc())
+        else:
+            query = query.where(OfficialDocument.id > after).order_by(OfficialDocument.id)
+        result = await db.execute(query.limit(size))
+        return [tuple(r) for r in result.all()]
+
+    async def flush_page(chunked: List[Tuple[int, List[Dict[str, Any]]]], last_id: int) -> None:
+        texts = [c["text"] for _, chunks in chunked for c in chunks]
+        embeddings = await _embed_texts(texts, embedding_manager, ai_connector, embed_group)
+        records = _build_chunk_records(chunked, embeddings, with_embedding_column)
+        if records:
+            await db.execute(insert(DocumentChunk.__table__), records)
+        await db.commit()
+        if records:
+            _chunks_changed()
+
+        stats["processed"] += len(chunked)
+        stats["total_chunks"] += len(records)
+        stats["embedded"] += sum(1 for e in embeddings if e is not None)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        _save_pipeline_checkpoint(checkpoint_path, {
+            "last_id": last_id,
+            "processed": int(checkpoint.get("processed", 0)) + stats["processed"],
+            "total_chunks": int(checkpoint.get("total_chunks", 0)) + stats["total_chunks"],
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        logger.info(
+            "Chunk pipeline: docs=%d chunks=%d cursor=%s (%.1f docs/s)",
+            stats["processed"], stats["total_chunks"], last_id, stats["processed"] / elapsed,
+        )
+
+    try:
+        pending: Optional[Tuple[List[Tuple[int, List[Dict[str, Any]]]], int]] = None
+        remaining = max_docs
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = await fetch_page(cursor, size)
+            if not rows:
+                break
+            cursor = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+            if pool is not None:
+                chunk_future = loop.run_in_executor(pool, _chunk_rows, rows)
+            else:
+                chunk_future = loop.create_future()
+                chunk_future.set_result(_chunk_rows(rows))
+
+            # 上一頁的 embedding + INSERT 與本頁分段重疊
+            if pending is not None:
+                await flush_page(*pending)
+            pending = (await chunk_future, cursor)
+
+        if pending is not None:
+            await flush_page(*pending)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    return {
+        **stats,
+        "last_id": cursor,
+        "elapsed_s": round(elapsed, 2),
+        "docs_per_sec": round(stats["processed"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "chunks_per_sec": round(stats["total_chunks"] / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+# chunk_documents_batch（未指定 document_ids）跨呼叫保存的遞減掃描游標；None = 自最新公文開始
+_batch_sweep_cursor: Optional[int] = None
+
+
 async def chunk_documents_batch(
     db: AsyncSession,
     document_ids: Optional[List[int]] = None,
@@ -227,37 +461,56 @@ async def chunk_documents_batch(
     """
     批次分段多份公文。
 
-    若 document_ids 為 None，取尚未分段的公文。
+    若 document_ids 為 None，依 id 遞減（新公文優先）取尚未分段的公文（走 chunk_documents_pipeline）。
+    游標跨呼叫保存：無法產生 chunk 的公文（空白 / 過短）每輪掃描只跨過一次，
+    不會每次呼叫都佔滿 limit；掃到最舊一筆後下一次自最新重新開始。
+    指定 document_ids 時先刪既有 chunks 再重建（idempotent），同樣批次 embedding + 單次 INSERT。
     """
+    global _batch_sweep_cursor
     from app.extended.models import OfficialDocument, DocumentChunk
 
-    if document_ids:
-        ids = document_ids[:limit]
-    else:
-        # 找尚未分段的公文
-        subq = select(DocumentChunk.document_id).distinct()
-        result = await db.execute(
-            select(OfficialDocument.id)
-            .where(OfficialDocument.id.notin_(subq))
-            .order_by(OfficialDocument.id.desc())
-            .limit(limit)
-        )
-        ids = [r[0] for r in result.fetchall()]
-
-    total_chunks = 0
-    processed = 0
-    for doc_id in ids:
-        count = await chunk_document(
-            db, doc_id,
+    if not document_ids:
+        result = await chunk_documents_pipeline(
+            db,
+            max_docs=limit,
+            workers=0,
             embedding_manager=embedding_manager,
             ai_connector=ai_connector,
+            newest_first=True,
+            before_id=_batch_sweep_cursor,
         )
-        total_chunks += count
-        processed += 1
+        # 取不滿 limit 表示已掃到最舊一筆 → 下一輪自最新開始（期間新進公文在此時補上）
+        _batch_sweep_cursor = result["last_id"] if result["processed"] >= limit else None
+        return {
+            "processed": result["processed"],
+            "total_chunks": result["total_chunks"],
+            "remaining": 0,
+            "docs_per_sec": result["docs_per_sec"],
+        }
+
+    ids = document_ids[:limit]
+    started = time.monotonic()
+    rows = await db.execute(
+        select(
+            OfficialDocument.id, OfficialDocument.subject,
+            OfficialDocument.content, OfficialDocument.ck_note,
+        ).where(OfficialDocument.id.in_(ids))
+    )
+    chunked = [(doc_id, chunks) for doc_id, chunks in _chunk_rows([tuple(r) for r in rows.all()]) if chunks]
+
+    await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id.in_([d for d, _ in chunked])))
+    texts = [c["text"] for _, chunks in chunked for c in chunks]
+    embeddings = await _embed_texts(texts, embedding_manager, ai_connector, PIPELINE_EMBED_GROUP)
+    records = _build_chunk_records(chunked, embeddings, hasattr(DocumentChunk, "embedding"))
+    if records:
+        await db.execute(insert(DocumentChunk.__table__), records)
 
     await db.commit()
+    _chunks_changed()
+    elapsed = time.monotonic() - started
     return {
-        "processed": processed,
-        "total_chunks": total_chunks,
-        "remaining": max(0, len(ids) - processed),
+        "processed": len(ids),
+        "total_chunks": len(records),
+        "remaining": 0,
+        "docs_per_sec": round(len(ids) / elapsed, 2) if elapsed > 0 else 0.0,
     }
@@ -30,6 +30,7 @@ from app.schemas.knowledge_graph import (
     ResolvedEntity,
 )
 from app.services.ai.graph.canonical_entity_service import CanonicalEntityService
+from app.services.ai.graph.graph_change_notifier import queue_relations_changed
 
 logger = logging.getLogger(__name__)
 
@@ -191,6 +192,7 @@ class CrossDomainContributionService:
     ) -> int:
         """建立跨專案關係"""
         created = 0
+        added_edges: List[list] = []
         for rel in relations:
             source_hub_id = ext_id_to_hub.get(rel.source_external_id)
             target_hub_id = ext_id_to_hub.get(rel.target_external_id)
@@ -226,8 +228,10 @@ class CrossDomainContributionService:
                 source_project=source_project,
                 document_count=0,
             ))
+            added_edges.append([source_hub_id, target_hub_id, rel.relation_type.replace("_", " ")])
             created += 1
 
+        queue_relations_changed(self.db, added=added_edges)
         return created
 
     async def _generate_embeddings_for_new_entities(
@@ -20,6 +20,7 @@ from app.extended.models import (
     EntityRelationship,
 )
 from app.services.ai.graph.canonical_entity_matcher import CanonicalEntityMatcher
+from app.services.ai.graph.graph_change_notifier import queue_relations_changed
 
 logger = logging.getLogger(__name__)
 
@@ -194,6 +195,9 @@ class CrossDomainMatchEngine:
             source_project=source_project,
             document_count=0,
         ))
+        queue_relations_changed(
+            self.db, added=[[source_id, target_id, relation_type.replace("_", " ")]]
+        )
         return True
 
     @staticmethod
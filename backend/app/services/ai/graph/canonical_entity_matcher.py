@@ -5,7 +5,10 @@
 - CanonicalEntityMatcher: trigram 相似度、虛假匹配偵測、模糊匹配
 - CanonicalEntityMerger: 實體合併邏輯
 
-Version: 1.0.0
+v1.1.0: fuzzy_match_batch 改走 process 內 trigram 倒排索引（entity_trigram_index），
+不再每次載入整個 entity_type 做 O(names × entities) 比對。
+
+Version: 1.1.0
 Created: 2026-03-23
 """
 
@@ -21,6 +24,8 @@ from app.extended.models import (
     EntityAlias,
     DocumentEntityMention,
 )
+from app.services.ai.graph.entity_trigram_index import get_entity_trigram_index
+from app.services.ai.graph.graph_change_notifier import queue_relations_changed
 
 logger = logging.getLogger(__name__)
 
@@ -108,29 +113,34 @@ class CanonicalEntityMatcher:
             return matched
 
         try:
-            # 取得該 entity_type 所有 canonical entities（通常 <500 筆）
-            all_candidates_result = await self.db.execute(
-                select(CanonicalEntity)
-                .where(CanonicalEntity.entity_type == entity_type)
-            )
-            all_candidates = all_candidates_result.scalars().all()
+            index = get_entity_trigram_index()
+            await index.ensure_loaded(self.db, entity_type)
 
-            if not all_candidates:
+            # 每個名字取分數最高、且非虛假匹配的候選（候選已由 trigram posting 剪枝）
+            best_ids: Dict[str, int] = {}
+            for name in names:
+                for cand_id, cand_name, _score in index.candidates(
+                    entity_type, name, FUZZY_SIMILARITY_THRESHOLD,
+                ):
+                    if not self.is_false_fuzzy_match(name, cand_name):
+                        best_ids[name] = cand_id
+                        break
+
+            if not best_ids:
                 return matched
 
-            # 逐名字在記憶體中匹配（避免 N 次 DB 查詢）
-            for name in names:
-                best_match: Optional[CanonicalEntity] = None
-                best_score = 0.0
-                for candidate in all_candidates:
-                    # 簡化的相似度計算（trigram-like）
-                    score = self.compute_similarity(name, candidate.canonical_name)
-                    if score >= FUZZY_SIMILARITY_THRESHOLD and score > best_score:
-                        if not self.is_false_fuzzy_match(name, candidate.canonical_name):
-                            best_match = candidate
-                            best_score = score
-                if best_match:
-                    matched[name] = best_match
+            entities_result = await self.db.execute(
+                select(CanonicalEntity)
+                .where(CanonicalEntity.id.in_(set(best_ids.values())))
+            )
+            by_id = {e.id: e for e in entities_result.scalars().all()}
+            for name, cand_id in best_ids.items():
+                entity = by_id.get(cand_id)
+                if entity is None:
+                    # 索引殘留（他處已刪除 / 交易回滾）→ 同步移除
+                    index.remove(cand_id, entity_type)
+                    continue
+                matched[name] = entity
 
             return matched
         except Exception as e:
@@ -246,6 +256,9 @@ class CanonicalEntityMerger:
         # 刪除被合併的實體
         await self.db.delete(merge_entity)
         await self.db.flush()
+        get_entity_trigram_index().remove(merge_id, merge_entity.entity_type)
+        # 被合併實體的邊隨之消失 → commit 後 CSR 快照重建
+        queue_relations_changed(self.db, stale=True)
         # 快取失效：合併實體影響圖譜
         try:
             from app.services.ai.graph.graph_query_service import invalidate_graph_cache
@@ -109,6 +109,8 @@ class CanonicalEntityResolver:
             entity.linked_project_id = await self._find_project_id(name)
         self.db.add(entity)
         await self.db.flush()
+        from app.services.ai.graph.entity_trigram_index import get_entity_trigram_index
+        get_entity_trigram_index().add(entity.id, name, entity_type)
         try:
             from app.services.ai.graph.graph_query_service import invalidate_graph_cache
             await invalidate_graph_cache("entity_graph:*")
@@ -297,8 +297,11 @@ class CanonicalEntityService:
             # 單次 flush 取得所有新 entity 的 ID
             await self.db.flush()
 
-            # 批次建立自身別名
+            # 批次建立自身別名（並同步 trigram 索引，同批後續文件即可模糊命中）
+            from app.services.ai.graph.entity_trigram_index import get_entity_trigram_index
+            trigram_index = get_entity_trigram_index()
             for name, etype, entity in new_entities:
+                trigram_index.add(entity.id, name, etype)
                 self.db.add(EntityAlias(
                     alias_name=name,
                     canonical_entity_id=entity.id,
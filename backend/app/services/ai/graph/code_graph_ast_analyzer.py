@@ -438,7 +438,7 @@ class SchemaReflector:
     """[DEPRECATED 2026-07-20] 自建 sync Inspector 反射 DB → db_table 實體。
 
     異質同工整合後已無呼叫端：db_table 實體改由 build_table_entities_from_schema()
-    從 SchemaReflectorService（單一反射源 SSOT）建構，FK 交由 _ingest_fk_relations。
+    從 SchemaReflectorService（單一反射源 SSOT）建構，FK 交由 _fk_relation_values。
     保留一版供相容/回滾，下一版移除。新程式勿用。
     """
 
@@ -519,11 +519,11 @@ def build_table_entities_from_schema(schema: Dict[str, Any]) -> List["CodeEntity
     """從 SchemaReflectorService 的 schema dict 建 db_table 實體（純函式）。
 
     異質同工整合：舊 SchemaReflector.reflect_tables 自建 sync Inspector 反射 DB，
-    與 SchemaReflectorService（_ingest_fk_relations 用）重複讀同一 PostgreSQL。
+    與 SchemaReflectorService（_fk_relation_values 用）重複讀同一 PostgreSQL。
     改由本函式從 SchemaReflectorService.get_full_schema_async() 的輸出建實體，
     消除重複 Inspector＝單一反射源。description 形狀與舊 reflect_tables 一致（保真）。
 
-    FK 關係不在此產出——交由 code_graph_persistence._ingest_fk_relations 單一源
+    FK 關係不在此產出——交由 code_graph_persistence._fk_relation_values 單一源
     （避免 FK 雙重計算，DB 現況 relation_type='references' 即出自該處）。
 
     Args:
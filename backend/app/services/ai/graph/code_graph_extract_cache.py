@@ -0,0 +1,337 @@
+"""
+Code Graph 原始檔掃描、內容雜湊快取與平行提取
+
+CodeGraphIngestService.ingest 原本在 event loop 上逐檔呼叫
+PythonASTExtractor.extract_file，並以 mtime 判斷是否略過（git checkout /
+容器重建會改 mtime 卻沒改內容，反之亦然）。本模組提供：
+
+- scan_sources(): 列出 Python / TypeScript 原始檔並計算內容雜湊（blake2b）
+- ExtractionCache: 以 (模組, 內容雜湊, 提取器指紋) 為鍵的逐檔提取結果快取，
+  常駐行程記憶體並持久化至 CODE_GRAPH_CACHE_PATH（JSON，原子改名寫入）；
+  提取器原始碼變動時指紋改變，舊快取自動失效
+- extract_sources(): 快取未命中的檔案分批送入行程池（spawn，
+  CODE_GRAPH_EXTRACT_WORKERS，預設 min(4, CPU)）；未命中數少於
+  CODE_GRAPH_POOL_MIN_FILES（預設 32）時改在 thread 執行，避免行程啟動成本
+
+未變更的樹 = 一次雜湊掃描 + 全數快取命中。
+
+@version 1.0.0
+@date 2026-10-16
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.ai.graph.code_graph_types import CodeEntity, CodeRelation
+
+logger = logging.getLogger(__name__)
+
+KIND_PY = "py"
+KIND_TS = "ts"
+MODULE_ENTITY_TYPES = {KIND_PY: "py_module", KIND_TS: "ts_module"}
+
+_CACHE_FORMAT = 1
+_EXTRACTOR_SOURCES = (
+    "code_graph_ast_analyzer.py",
+    "ast_endpoint_extractor.py",
+    "ts_extractor.py",
+    "code_graph_types.py",
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 1
+_cache: Optional["ExtractionCache"] = None
+_extractor_fingerprint: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class SourceFile:
+    """掃描到的原始檔（kind: py / ts）"""
+    kind: str
+    path: Path
+    module: str
+    content_hash: str
+
+    @property
+    def module_key(self) -> str:
+        """與 DB 模組實體對應的 entity_type:canonical_name"""
+        return f"{MODULE_ENTITY_TYPES[self.kind]}:{self.module}"
+
+
+ExtractionResult = Tuple[List[CodeEntity], List[CodeRelation]]
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extractor_fingerprint() -> str:
+    """提取器原始碼指紋；提取邏輯改版時使整份快取失效"""
+    global _extractor_fingerprint
+    if _extractor_fingerprint is None:
+        digest = hashlib.blake2b(digest_size=8)
+        here = Path(__file__).parent
+        for name in _EXTRACTOR_SOURCES:
+            try:
+                digest.update((here / name).read_bytes())
+            except OSError:
+                digest.update(name.encode())
+        _extractor_fingerprint = digest.hexdigest()
+    return _extractor_fingerprint
+
+
+def scan_sources(
+    backend_app_dir: Path, frontend_src_dir: Optional[Path] = None,
+) -> Tuple[List[SourceFile], int]:
+    """列出原始檔並計算內容雜湊（同步，呼叫端以 to_thread 執行）。回傳 (files, 讀取失敗數)"""
+    from app.services.ai.graph.code_graph_ast_analyzer import PythonASTExtractor
+    from app.services.ai.graph.ts_extractor import TypeScriptExtractor
+
+    discovered: List[Tuple[str, Path, str]] = [
+        (KIND_PY, fpath, mod) for fpath, mod in
+        PythonASTExtractor(project_prefix="app").discover_files(backend_app_dir)
+    ]
+    if frontend_src_dir and frontend_src_dir.is_dir():
+        discovered += [
+            (KIND_TS, fpath, mod) for fpath, mod in
+            TypeScriptExtractor(project_prefix="src").discover_files(frontend_src_dir)
+        ]
+
+    files: List[SourceFile] = []
+    errors = 0
+    for kind, fpath, module in discovered:
+        try:
+            files.append(SourceFile(kind, fpath, module, hash_file(fpath)))
+        except OSError as e:
+            logger.warning("Failed to hash %s: %s", fpath, e)
+            errors += 1
+    return files, errors
+
+
+# ---------------------------------------------------------------------------
+# 快取
+# ---------------------------------------------------------------------------
+
+def _default_cache_path() -> Path:
+    configured = os.getenv("CODE_GRAPH_CACHE_PATH")
+    if configured:
+        return Path(configured)
+    from app.core.paths import DATA_DIR
+    return DATA_DIR / "cache" / "code_graph_extract.json"
+
+
+def _encode(result: ExtractionResult) -> Dict[str, Any]:
+    entities, relations = result
+    return {
+        "entities": [asdict(e) for e in entities],
+        "relations": [
+            [r.source_name, r.source_type, r.target_name, r.target_type, r.relation_type]
+            for r in relations
+        ],
+    }
+
+
+def _decode(payload: Dict[str, Any]) -> ExtractionResult:
+    return (
+        [CodeEntity(**e) for e in payload["entities"]],
+        [CodeRelation(*r) for r in payload["relations"]],
+    )
+
+
+class ExtractionCache:
+    """逐檔提取結果快取：module_key → {hash, entities, relations}"""
+
+    def __init__(self, path: Optional[Path] = None, fingerprint: Optional[str] = None):
+        self.path = path or _default_cache_path()
+        self.fingerprint = fingerprint or extractor_fingerprint()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+
+    def load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Code graph extraction cache unreadable, starting cold: %s", e)
+            return
+        if data.get("format") != _CACHE_FORMAT or data.get("fingerprint") != self.fingerprint:
+            logger.info("Code graph extractor changed — discarding extraction cache")
+            return
+        self._entries = data.get("entries", {})
+
+    def get(self, source: SourceFile) -> Optional[ExtractionResult]:
+        self.load()
+        entry = self._entries.get(source.module_key)
+        if entry is None or entry.get("hash") != source.content_hash:
+            return None
+        return _decode(entry)
+
+    def put(self, source: SourceFile, result: ExtractionResult) -> None:
+        self.load()
+        self._entries[source.module_key] = {"hash": source.content_hash, **_encode(result)}
+        self._dirty = True
+
+    def retain(self, module_keys: set, kinds: set) -> int:
+        """移除本次掃描範圍（kinds）內已不存在的檔案，回傳移除數"""
+        self.load()
+        prefixes = tuple(f"{MODULE_ENTITY_TYPES[kind]}:" for kind in kinds)
+        stale = [
+            key for key in self._entries
+            if key.startswith(prefixes) and key not in module_keys
+        ]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self._dirty = True
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(
+                json.dumps({
+                    "format": _CACHE_FORMAT,
+                    "fingerprint": self.fingerprint,
+                    "entries": self._entries,
+                }, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Failed to persist code graph extraction cache: %s", e)
+
+
+def get_extraction_cache() -> ExtractionCache:
+    global _cache
+    if _cache is None:
+        _cache = ExtractionCache()
+    return _cache
+
+
+# ---------------------------------------------------------------------------
+# 提取
+# ---------------------------------------------------------------------------
+
+def extract_chunk(items: List[Tuple[str, str, str]]) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """行程池進入點（須為模組層函式以供 pickle）。
+
+    items: [(kind, path, module)]；回傳 [(path, encoded_result | None, error | None)]
+    """
+    from app.services.ai.graph.code_graph_ast_analyzer import PythonASTExtractor
+    from app.services.ai.graph.ts_extractor import TypeScriptExtractor
+
+    extractors = {
+        KIND_PY: PythonASTExtractor(project_prefix="app"),
+        KIND_TS: TypeScriptExtractor(project_prefix="src"),
+    }
+    out: List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]] = []
+    for kind, path, module in items:
+        try:
+            result = extractors[kind].extract_file(Path(path), module)
+            out.append((path, _encode(result), None))
+        except Exception as e:
+            out.append((path, None, f"{type(e).__name__}: {e}"))
+    return out
+
+
+def get_code_graph_executor() -> ProcessPoolExecutor:
+    global _executor, _executor_workers
+    if _executor is None:
+        default_workers = min(4, os.cpu_count() or 1)
+        workers = max(1, int(os.getenv("CODE_GRAPH_EXTRACT_WORKERS", default_workers)))
+        _executor_workers = workers
+        # spawn：避免 fork 帶著執行中的 event loop / 連線池進入子行程
+        _executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info("[CodeGraph] 提取行程池啟動: workers=%d", workers)
+    return _executor
+
+
+def shutdown_code_graph_executor() -> None:
+    """lifespan shutdown 呼叫"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_sources(
+    sources: List[SourceFile],
+    cache: Optional[ExtractionCache] = None,
+) -> Tuple[Dict[str, ExtractionResult], Dict[str, int]]:
+    """取得每個檔案的提取結果（快取優先，未命中者平行提取並寫回快取）。
+
+    Returns:
+        ({module_key: (entities, relations)}, {"cache_hits", "extracted", "errors"})
+    """
+    cache = cache or get_extraction_cache()
+    await asyncio.to_thread(cache.load)
+
+    results: Dict[str, ExtractionResult] = {}
+    misses: List[SourceFile] = []
+    for source in sources:
+        cached = cache.get(source)
+        if cached is None:
+            misses.append(source)
+        else:
+            results[source.module_key] = cached
+    counters = {"cache_hits": len(results), "extracted": 0, "errors": 0}
+    if not misses:
+        return results, counters
+
+    by_path = {str(s.path): s for s in misses}
+    items = [(s.kind, str(s.path), s.module) for s in misses]
+    min_pool_files = int(os.getenv("CODE_GRAPH_POOL_MIN_FILES", "32"))
+
+    if len(items) < min_pool_files:
+        outputs = await asyncio.to_thread(extract_chunk, items)
+    else:
+        executor = get_code_graph_executor()
+        chunk_size = max(8, len(items) // (_executor_workers * 4) + 1)
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(executor, extract_chunk, items[i:i + chunk_size])
+            for i in range(0, len(items), chunk_size)
+        ))
+        outputs = [row for chunk in chunks for row in chunk]
+
+    for path, payload, error in outputs:
+        source = by_path[path]
+        if error is not None:
+            logger.warning("Failed to extract %s: %s", path, error)
+            counters["errors"] += 1
+            continue
+        result = _decode(payload)
+        cache.put(source, result)
+        results[source.module_key] = result
+        counters["extracted"] += 1
+    logger.info(
+        "Code graph extraction: %d cache hits, %d extracted (%d errors)",
+        counters["cache_hits"], counters["extracted"], counters["errors"],
+    )
+    return results, counters
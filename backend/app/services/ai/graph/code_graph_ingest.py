@@ -7,14 +7,16 @@ Code Graph 入圖服務 (Ingestion)
 - check_and_rebuild_if_changed(): 增量式變更偵測與重建
 
 DB 持久化操作已拆分至 code_graph_persistence.py (v1.0.0)
+原始檔掃描 / 內容雜湊快取 / 行程池提取見 code_graph_extract_cache.py (v1.2.0)
 
 拆分自 code_graph_service.py (v3.1.0)
 
-Version: 1.1.0
+Version: 1.2.0
 Created: 2026-04-05
-Updated: 2026-04-09
+Updated: 2026-10-16
 """
 
+import asyncio
 import json
 import logging
 import time
@@ -22,12 +24,15 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Set
 
 from app.services.ai.graph.code_graph_types import CodeEntity, CodeRelation
-from app.services.ai.graph.code_graph_ast_analyzer import (
-    PythonASTExtractor,
-    build_table_entities_from_schema,
-)
+from app.services.ai.graph.code_graph_ast_analyzer import build_table_entities_from_schema
 from app.services.ai.graph.code_graph_analysis import compute_dependency_metrics
-from app.services.ai.graph.ts_extractor import TypeScriptExtractor
+from app.services.ai.graph.code_graph_extract_cache import (
+    KIND_PY,
+    MODULE_ENTITY_TYPES,
+    extract_sources,
+    get_extraction_cache,
+    scan_sources,
+)
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -40,8 +45,8 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
     """Code Graph 建構與 DB 持久化服務。
 
     DB persistence methods inherited from CodeGraphPersistenceMixin:
-    - _clean, _upsert_entities, _recreate_relations
-    - _ingest_fk_relations, _ingest_cross_domain_links, _load_mtime_map
+    - _clean, _upsert_entities, _sync_relations / _recreate_relations
+    - _fk_relation_values, _cross_domain_link_values, _load_source_hash_map
     """
 
     def __init__(self, db: AsyncSession):
@@ -55,10 +60,12 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
         incremental: bool = False,
         frontend_src_dir: Optional[Path] = None,
     ) -> Dict[str, Any]:
-        """Full pipeline: extract -> upsert entities -> create relations.
+        """Full pipeline: extract -> upsert entities -> sync relations.
 
         Args:
-            incremental: 若為 True，比對檔案 mtime 跳過未變更的模組。
+            incremental: 若為 True，比對模組內容雜湊：未變更的檔案不重新 upsert 實體，
+                整棵樹未變更時直接回傳（不寫 DB）。關聯一律以全部檔案的提取結果
+                （內容雜湊快取）做差異同步，因此只會動到變更檔的邊。
             frontend_src_dir: 前端 src 目錄路徑（啟用 TypeScript 提取）。
         """
         from app.extended.models.knowledge_graph import (
@@ -81,51 +88,73 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
             logger.info("Cleaned %d entities, %d relations", cleaned[0], cleaned[1])
             incremental = False
 
-        # 1b. Load existing mtime map for incremental mode
-        mtime_map: Dict[str, float] = {}
+        # 2. Hash scan + extraction (content-hash cache, misses in the process pool)
+        sources, hash_errors = await asyncio.to_thread(
+            scan_sources, backend_app_dir, frontend_src_dir
+        )
+        stats["errors"] += hash_errors
+        logger.info("Discovered %d source files", len(sources))
+
+        cache = get_extraction_cache()
+        results, extract_counters = await extract_sources(sources, cache)
+        stats["errors"] += extract_counters["errors"]
+        stats["cache_hits"] = extract_counters["cache_hits"]
+        stats["extracted"] = extract_counters["extracted"]
+
+        scanned_kinds = {source.kind for source in sources} or {KIND_PY}
+        current_keys = {source.module_key for source in sources}
+        cache.retain(current_keys, scanned_kinds)
+        await asyncio.to_thread(cache.save)
+
+        # 模組實體記錄內容雜湊（供下次 incremental 比對）與目前 mtime
+        for source in sources:
+            result = results.get(source.module_key)
+            if result and result[0]:
+                module_desc = result[0][0].description
+                module_desc["content_hash"] = source.content_hash
+                try:
+                    module_desc["mtime"] = source.path.stat().st_mtime
+                except OSError:
+                    pass
+
+        # 2b. Incremental: only files whose content hash differs from the DB
+        changed_keys = current_keys
         if incremental:
-            # ⚠️ 2026-07-20 已知陷阱：incremental 模式下 _recreate_relations 仍全刪 code_graph
-            #    關係、只重插本次變更檔的關係 → 未變更檔關係被洗掉（9669→85）。scheduled job
-            #    已全部改 incremental=False 全量重建（見 scheduler code_graph_incremental_job）。
-            #    僅在你確知「只更新實體、不在意關係完整」時才用 incremental=True。
-            logger.warning(
-                "⚠️ Code Graph incremental=True：關係圖將被重建為僅本次變更檔的子集"
-                "（未變更檔關係會流失）。生產排程應用 incremental=False 全量。"
+            stored = await self._load_source_hash_map(CanonicalEntity)
+            changed_keys = {
+                source.module_key for source in sources
+                if stored.get(source.module_key) != source.content_hash
+            }
+            scanned_types = {MODULE_ENTITY_TYPES[kind] for kind in scanned_kinds}
+            removed = {
+                key for key in stored
+                if key.split(":", 1)[0] in scanned_types and key not in current_keys
+            }
+            stats["skipped"] = len(current_keys) - len(changed_keys)
+            stats["removed_modules"] = len(removed)
+            if not changed_keys and not removed:
+                stats["status"] = "up_to_date"
+                stats["elapsed_s"] = round(time.monotonic() - start, 2)
+                logger.info(
+                    "Code graph up to date — %d files unchanged (%.1fs)",
+                    len(current_keys), stats["elapsed_s"],
+                )
+                return stats
+            logger.info(
+                "Incremental mode: %d changed, %d removed, %d unchanged modules",
+                len(changed_keys), len(removed), stats["skipped"],
             )
-            mtime_map = await self._load_mtime_map(CanonicalEntity)
-            logger.info("Incremental mode: loaded %d existing module mtimes", len(mtime_map))
 
-        # 2. Extract Python AST
-        extractor = PythonASTExtractor(project_prefix="app")
         all_entities: List[CodeEntity] = []
         all_relations: List[CodeRelation] = []
-
-        files = extractor.discover_files(backend_app_dir)
-        logger.info("Discovered %d Python files", len(files))
-        for idx, (fpath, mod_name) in enumerate(files, 1):
-            if incremental:
-                try:
-                    current_mtime = fpath.stat().st_mtime
-                except OSError:
-                    current_mtime = 0.0
-                stored_mtime = mtime_map.get(mod_name, 0.0)
-                if current_mtime > 0 and current_mtime <= stored_mtime:
-                    stats["skipped"] += 1
-                    continue
-
-            try:
-                ents, rels = extractor.extract_file(fpath, mod_name)
+        for key, (ents, rels) in results.items():
+            if key in changed_keys:
                 all_entities.extend(ents)
-                all_relations.extend(rels)
-            except Exception as e:
-                logger.warning("Failed to extract %s: %s", fpath, e)
-                stats["errors"] += 1
-            if idx % 100 == 0:
-                logger.info("Extracted %d/%d files", idx, len(files))
+            all_relations.extend(rels)
 
         # 3. Extract DB schema (optional) — 單一反射源 SSOT（異質同工整合 2026-07-20）
         #    改由 SchemaReflectorService 建 db_table 實體，消除舊 reflect_tables 自建
-        #    Inspector 的重複反射；FK 關係交由步驟 5b _ingest_fk_relations 單一源
+        #    Inspector 的重複反射；FK 關係交由 _fk_relation_values 單一源
         #    （同一 SchemaReflectorService，cached）。db_url 保留供介面相容（不再直用）。
         if db_url:
             try:
@@ -141,39 +170,8 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
                 logger.warning("Schema reflection failed: %s", e)
                 stats["errors"] += 1
 
-        # 3b. Extract frontend TypeScript/React (optional)
-        if frontend_src_dir and frontend_src_dir.is_dir():
-            try:
-                ts_extractor = TypeScriptExtractor(project_prefix="src")
-                ts_files = ts_extractor.discover_files(frontend_src_dir)
-                logger.info("Discovered %d TypeScript files", len(ts_files))
-                ts_skipped = 0
-                for idx, (fpath, mod_path) in enumerate(ts_files, 1):
-                    if incremental:
-                        try:
-                            current_mtime = fpath.stat().st_mtime
-                        except OSError:
-                            current_mtime = 0.0
-                        stored_mtime = mtime_map.get(mod_path, 0.0)
-                        if current_mtime > 0 and current_mtime <= stored_mtime:
-                            ts_skipped += 1
-                            stats["skipped"] += 1
-                            continue
-                    try:
-                        ents, rels = ts_extractor.extract_file(fpath, mod_path)
-                        all_entities.extend(ents)
-                        all_relations.extend(rels)
-                    except Exception as e:
-                        logger.warning("Failed to extract TS %s: %s", fpath, e)
-                        stats["errors"] += 1
-                if ts_skipped > 0:
-                    logger.info("Skipped %d unchanged TypeScript files", ts_skipped)
-            except Exception as e:
-                logger.warning("TypeScript extraction failed: %s", e)
-                stats["errors"] += 1
-
         logger.info(
-            "Extraction complete: %d entities, %d relations",
+            "Extraction complete: %d entities to upsert, %d relations",
             len(all_entities), len(all_relations),
         )
 
@@ -199,21 +197,19 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
                 if stats_key:
                     stats[stats_key] += 1
 
-        # 5. Batch recreate relations (delete-then-insert for idempotency)
-        rel_count = await self._recreate_relations(
-            all_relations, entity_map, EntityRelationship
+        # 5. Relations: code + FK (SchemaReflectorService) + cross-domain causal links,
+        #    synced by diff against existing rows (unchanged edges untouched)
+        fk_values = await self._fk_relation_values(entity_map)
+        causal_values = self._cross_domain_link_values(entity_map)
+        synced = await self._sync_relations(
+            all_relations, entity_map, EntityRelationship,
+            extra_values=fk_values + causal_values,
         )
-        stats["relations"] = rel_count
-
-        # 5b. Ingest FK relations from DB schema (via SchemaReflectorService)
-        fk_count = await self._ingest_fk_relations(entity_map, EntityRelationship)
-        stats["fk_relations"] = fk_count
-        stats["relations"] += fk_count
-
-        # 5c. Ingest cross-domain causal links (api_endpoint → business entities)
-        causal_count = await self._ingest_cross_domain_links(entity_map, EntityRelationship)
-        stats["cross_domain_links"] = causal_count
-        stats["relations"] += causal_count
+        stats["relations"] = synced["total"]
+        stats["relations_added"] = synced["added"]
+        stats["relations_removed"] = synced["removed"]
+        stats["fk_relations"] = len(fk_values)
+        stats["cross_domain_links"] = len(causal_values)
 
         # 6. Compute dependency metrics
         await compute_dependency_metrics(self.db, CanonicalEntity, EntityRelationship)
@@ -224,9 +220,9 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
         stats["elapsed_s"] = round(elapsed, 2)
         logger.info(
             "Code graph ingestion: %d modules, %d classes, %d functions, "
-            "%d tables, %d relations in %.1fs",
+            "%d tables, %d relations (+%d/-%d) in %.1fs",
             stats["modules"], stats["classes"], stats["functions"],
-            stats["tables"], stats["relations"], elapsed,
+            stats["tables"], stats["relations"], synced["added"], synced["removed"], elapsed,
         )
         return stats
 
@@ -338,11 +334,12 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
         frontend_dir: Optional[Path] = None,
     ) -> Dict[str, Any]:
         """
-        Check file mtimes vs last ingest and trigger incremental rebuild if changed.
+        Incremental rebuild driven by module content hashes.
 
         Designed to be called from the scheduler (e.g., code_graph_update job).
-        Compares current file mtimes against stored mtimes to decide whether
-        an incremental ingest is needed.
+        Falls back to a full ingest when no module carries a stored content hash
+        yet; otherwise runs ``ingest(incremental=True)``, which returns
+        ``{"status": "up_to_date"}`` after the hash scan when nothing changed.
 
         Args:
             backend_dir: Backend app directory (e.g., project_root/backend/app)
@@ -353,69 +350,16 @@ class CodeGraphIngestService(CodeGraphPersistenceMixin):
         """
         from app.extended.models.knowledge_graph import CanonicalEntity
 
-        start = time.monotonic()
-
-        # Load stored mtimes from DB
-        mtime_map = await self._load_mtime_map(CanonicalEntity)
-        if not mtime_map:
-            logger.info("No existing mtime data — full ingest needed")
+        if not await self._load_source_hash_map(CanonicalEntity):
+            logger.info("No stored content hashes — full ingest needed")
             return await self.ingest(
                 backend_app_dir=backend_dir,
                 frontend_src_dir=frontend_dir,
                 incremental=False,
             )
 
-        # Scan current files and compare
-        from app.services.ai.graph.code_graph_ast_analyzer import PythonASTExtractor
-
-        changed_count = 0
-        extractor = PythonASTExtractor(project_prefix="app")
-        for fpath, mod_name in extractor.discover_files(backend_dir):
-            try:
-                current_mtime = fpath.stat().st_mtime
-            except OSError:
-                continue
-            stored_mtime = mtime_map.get(mod_name, 0.0)
-            if current_mtime > stored_mtime:
-                changed_count += 1
-
-        # Check frontend files if provided
-        if frontend_dir and frontend_dir.is_dir():
-            from app.services.ai.graph.ts_extractor import TypeScriptExtractor
-
-            ts_extractor = TypeScriptExtractor(project_prefix="src")
-            for fpath, mod_path in ts_extractor.discover_files(frontend_dir):
-                try:
-                    current_mtime = fpath.stat().st_mtime
-                except OSError:
-                    continue
-                stored_mtime = mtime_map.get(mod_path, 0.0)
-                if current_mtime > stored_mtime:
-                    changed_count += 1
-
-        elapsed_check = round(time.monotonic() - start, 2)
-
-        if changed_count == 0:
-            logger.info(
-                "Code graph up to date — no files changed (checked in %.1fs)",
-                elapsed_check,
-            )
-            return {
-                "status": "up_to_date",
-                "changed_files": 0,
-                "check_elapsed_s": elapsed_check,
-            }
-
-        logger.info(
-            "Code graph: %d files changed — triggering incremental rebuild",
-            changed_count,
-        )
-        result = await self.ingest(
+        return await self.ingest(
             backend_app_dir=backend_dir,
             frontend_src_dir=frontend_dir,
             incremental=True,
         )
-        result["changed_files"] = changed_count
-        result["check_elapsed_s"] = elapsed_check
-        return result
-
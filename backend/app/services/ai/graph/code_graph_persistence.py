@@ -4,20 +4,21 @@ Code Graph DB 持久化服務
 負責 Code Graph 的 DB CRUD 操作：
 - _clean(): 清除所有 code graph 資料
 - _upsert_entities(): 批次 upsert 實體
-- _recreate_relations(): 刪除後重建關聯
-- _ingest_fk_relations(): FK 關聯入圖
-- _ingest_cross_domain_links(): 跨域因果連結
-- _load_mtime_map(): 增量模式的 mtime 快取
+- _sync_relations() / _recreate_relations(): 與既有關聯比對差異，只新增缺少的、刪除多餘的
+- _relation_values() / _fk_relation_values() / _cross_domain_link_values():
+  程式碼 / FK / 跨域因果連結的目標關聯列
+- _load_source_hash_map(): 增量模式的模組內容雜湊
 
 拆分自 code_graph_ingest.py (v1.0.0)
 
-Version: 1.0.0
+Version: 1.1.0
 Created: 2026-04-09
+Updated: 2026-10-16 - 關聯改為差異同步（原全刪重插）；mtime 改內容雜湊
 """
 
 import json
 import logging
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from sqlalchemy import delete, func, select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
@@ -38,26 +39,25 @@ class CodeGraphPersistenceMixin:
 
     db: AsyncSession
 
-    async def _load_mtime_map(self, CanonicalEntity: Any) -> Dict[str, float]:
-        """Load {module_name: mtime} from existing py_module entities."""
+    async def _load_source_hash_map(self, CanonicalEntity: Any) -> Dict[str, str]:
+        """Load {"py_module:name" | "ts_module:path": content_hash} from module entities."""
         rows = (await self.db.execute(
             select(
+                CanonicalEntity.entity_type,
                 CanonicalEntity.canonical_name,
                 CanonicalEntity.description,
-            ).where(CanonicalEntity.entity_type == "py_module")
+            ).where(CanonicalEntity.entity_type.in_(("py_module", "ts_module")))
         )).all()
 
-        result: Dict[str, float] = {}
-        for name, desc in rows:
+        result: Dict[str, str] = {}
+        for entity_type, name, desc in rows:
             if isinstance(desc, str):
                 try:
                     desc = json.loads(desc)
                 except (json.JSONDecodeError, TypeError):
                     continue
-            if isinstance(desc, dict):
-                mtime = desc.get("mtime", 0.0)
-                if isinstance(mtime, (int, float)):
-                    result[name] = float(mtime)
+            if isinstance(desc, dict) and isinstance(desc.get("content_hash"), str):
+                result[f"{entity_type}:{name}"] = desc["content_hash"]
         return result
 
     async def _clean(self, CanonicalEntity: Any, EntityRelationship: Any) -> Tuple[int, int]:
@@ -125,22 +125,12 @@ class CodeGraphPersistenceMixin:
 
         return {f"{r[2]}:{r[1]}": r[0] for r in rows}
 
-    async def _recreate_relations(
-        self,
+    @staticmethod
+    def _relation_values(
         relations: List[CodeRelation],
         entity_map: Dict[str, int],
-        EntityRelationship: Any,
-    ) -> int:
-        """Delete existing code_graph relations, then batch insert new ones."""
-        from sqlalchemy import insert
-
-        BATCH_SIZE = 500
-
-        await self.db.execute(
-            delete(EntityRelationship)
-            .where(EntityRelationship.relation_label == CODE_GRAPH_LABEL)
-        )
-
+    ) -> List[Dict[str, Any]]:
+        """Resolve extracted relations to relationship rows (skip unknown endpoints)."""
         seen: Set[Tuple[int, int, str]] = set()
         values: List[Dict[str, Any]] = []
 
@@ -165,35 +155,90 @@ class CodeGraphPersistenceMixin:
                 "weight": 1.0,
                 "document_count": 0,
             })
+        return values
 
-        total_batches = (len(values) + BATCH_SIZE - 1) // BATCH_SIZE if values else 0
-        for i in range(0, len(values), BATCH_SIZE):
-            batch = values[i:i + BATCH_SIZE]
-            await self.db.execute(insert(EntityRelationship), batch)
-            batch_num = i // BATCH_SIZE + 1
-            logger.info("Inserted relations batch %d/%d (%d rows)", batch_num, total_batches, len(batch))
-
-        await self.db.flush()
-        return len(values)
-
-    async def _ingest_fk_relations(
+    async def _recreate_relations(
         self,
+        relations: List[CodeRelation],
         entity_map: Dict[str, int],
         EntityRelationship: Any,
     ) -> int:
-        """Ingest FK relationships from DB schema via SchemaReflectorService.
+        """Make the code_graph relations equal to `relations`; returns the relation count."""
+        synced = await self._sync_relations(relations, entity_map, EntityRelationship)
+        return synced["total"]
 
-        For each FK constraint, creates a 'references' relation from
-        source_table entity to target_table entity.
+    async def _sync_relations(
+        self,
+        relations: List[CodeRelation],
+        entity_map: Dict[str, int],
+        EntityRelationship: Any,
+        extra_values: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, int]:
+        """Make the code_graph relations equal to `relations` (+ extra_values) by diff.
+
+        Reads the existing (source, target, type) keys once, inserts only the
+        missing rows and deletes only rows no longer produced (and duplicates).
+        Unchanged edges are never touched.
+
+        Returns:
+            {"total": 目標關聯數, "added": 新增數, "removed": 刪除數}
         """
-        from sqlalchemy import insert as sa_insert
+        from sqlalchemy import insert
+
+        BATCH_SIZE = 500
+
+        desired: Dict[Tuple[int, int, str], Dict[str, Any]] = {}
+        for value in self._relation_values(relations, entity_map) + list(extra_values or []):
+            key = (value["source_entity_id"], value["target_entity_id"], value["relation_type"])
+            desired.setdefault(key, value)
+
+        existing = (await self.db.execute(
+            select(
+                EntityRelationship.id,
+                EntityRelationship.source_entity_id,
+                EntityRelationship.target_entity_id,
+                EntityRelationship.relation_type,
+            ).where(EntityRelationship.relation_label == CODE_GRAPH_LABEL)
+        )).all()
+
+        kept: Set[Tuple[int, int, str]] = set()
+        stale_ids: List[int] = []
+        for row_id, src_id, tgt_id, rel_type in existing:
+            key = (src_id, tgt_id, rel_type)
+            if key in desired and key not in kept:
+                kept.add(key)
+            else:
+                stale_ids.append(row_id)
+
+        for i in range(0, len(stale_ids), BATCH_SIZE):
+            await self.db.execute(
+                delete(EntityRelationship)
+                .where(EntityRelationship.id.in_(stale_ids[i:i + BATCH_SIZE]))
+            )
+
+        to_insert = [value for key, value in desired.items() if key not in kept]
+        for i in range(0, len(to_insert), BATCH_SIZE):
+            await self.db.execute(insert(EntityRelationship), to_insert[i:i + BATCH_SIZE])
+
+        await self.db.flush()
+        logger.info(
+            "Synced code_graph relations: %d total, +%d added, -%d removed",
+            len(desired), len(to_insert), len(stale_ids),
+        )
+        return {"total": len(desired), "added": len(to_insert), "removed": len(stale_ids)}
+
+    async def _fk_relation_values(self, entity_map: Dict[str, int]) -> List[Dict[str, Any]]:
+        """FK relationships from DB schema via SchemaReflectorService.
 
+        For each FK constraint, yields a 'references' relation from
+        source_table entity to target_table entity.
+        """
         try:
             from app.services.ai.graph.schema_reflector import SchemaReflectorService
             schema = await SchemaReflectorService.get_full_schema_async()
         except Exception as e:
             logger.warning("FK relation ingestion skipped — schema reflection failed: %s", e)
-            return 0
+            return []
 
         tables = schema.get("tables", [])
         seen: Set[Tuple[int, int]] = set()
@@ -230,23 +275,11 @@ class CodeGraphPersistenceMixin:
                     "confidence_level": "extracted",
                 })
 
-        if not values:
-            return 0
+        return values
 
-        for i in range(0, len(values), 500):
-            batch = values[i:i + 500]
-            await self.db.execute(sa_insert(EntityRelationship), batch)
-
-        await self.db.flush()
-        logger.info("Ingested %d FK relations from DB schema", len(values))
-        return len(values)
-
-    async def _ingest_cross_domain_links(
-        self,
-        entity_map: Dict[str, int],
-        EntityRelationship: Any,
-    ) -> int:
-        """Create cross-domain links from api_endpoint entities to business entities.
+    @staticmethod
+    def _cross_domain_link_values(entity_map: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Cross-domain links from api_endpoint entities to business entities.
 
         Heuristic mapping:
         - /documents -> entity_type 'project' (document management)
@@ -255,8 +288,6 @@ class CodeGraphPersistenceMixin:
 
         Uses relation_type='serves_domain' with confidence_level='inferred'.
         """
-        from sqlalchemy import insert as sa_insert
-
         # Collect business entities by type
         business_entities: Dict[str, List[Tuple[str, int]]] = {}
         for key, eid in entity_map.items():
@@ -266,7 +297,7 @@ class CodeGraphPersistenceMixin:
 
         if not business_entities:
             logger.debug("No business entities found for cross-domain linking")
-            return 0
+            return []
 
         # Path prefix -> target business entity type
         domain_map = {
@@ -282,7 +313,7 @@ class CodeGraphPersistenceMixin:
                 api_endpoints.append((key[len("api_endpoint:"):], eid))
 
         if not api_endpoints:
-            return 0
+            return []
 
         seen: Set[Tuple[int, int]] = set()
         values: List[Dict[str, Any]] = []
@@ -308,13 +339,4 @@ class CodeGraphPersistenceMixin:
                         "confidence_level": "inferred",
                     })
 
-        if not values:
-            return 0
-
-        for i in range(0, len(values), 500):
-            batch = values[i:i + 500]
-            await self.db.execute(sa_insert(EntityRelationship), batch)
-
-        await self.db.flush()
-        logger.info("Ingested %d cross-domain links (api_endpoint -> business)", len(values))
-        return len(values)
+        return values
@@ -0,0 +1,183 @@
+"""
+正規實體 trigram 倒排索引 — fuzzy_match_batch 候選剪枝
+
+原 `CanonicalEntityMatcher.fuzzy_match_batch` 每次呼叫都載入該 entity_type
+全部 CanonicalEntity，並對每個名字 × 每個候選做 Python trigram Jaccard，
+O(names × entities)；KG 單一類型破萬筆後入圖明顯變慢。
+
+本模組維護 process 內單例索引（每 entity_type 一份）：
+- trigram → entity_id posting（set）
+- 候選剪枝：Jaccard(A,B) >= θ ⇒ |A∩B| >= θ/(1+θ)·(|A|+|B|)，
+  且 θ·|A| <= |B| <= |A|/θ（trigram 數長度濾網）；只探測最稀有的
+  |A| - ceil(θ·|A|) + 1 個 posting（prefix filter）
+- 同步：create_entity / 批次新建 → add；merge_entities → remove；
+  跨 process 新增以 id 水位線增量補讀，另有 TTL 全量重載兜底
+
+trigram 定義與 CanonicalEntityMatcher.compute_similarity 完全一致。
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.extended.models import CanonicalEntity
+
+logger = logging.getLogger(__name__)
+
+# 全量重載週期（秒）：兜底跨 process 的改名 / 刪除
+FULL_RELOAD_INTERVAL = 1800
+
+_EPS = 1e-9
+
+
+def trigrams(name: str) -> FrozenSet[str]:
+    """與 compute_similarity 相同的 trigram 集合（小寫，短字串整串為一個 gram）。"""
+    s = name.lower()
+    return frozenset(s[i:i + 3] for i in range(max(len(s) - 2, 1)))
+
+
+@dataclass
+class _TypeIndex:
+    """單一 entity_type 的索引"""
+
+    names: Dict[int, str] = field(default_factory=dict)
+    grams: Dict[int, FrozenSet[str]] = field(default_factory=dict)
+    postings: Dict[str, Set[int]] = field(default_factory=dict)
+    max_id: int = 0
+    loaded_at: float = 0.0
+
+    def add(self, entity_id: int, name: str) -> None:
+        if entity_id in self.names:
+            self.remove(entity_id)
+        g = trigrams(name)
+        self.names[entity_id] = name
+        self.grams[entity_id] = g
+        for gram in g:
+            self.postings.setdefault(gram, set()).add(entity_id)
+        if entity_id > self.max_id:
+            self.max_id = entity_id
+
+    def remove(self, entity_id: int) -> None:
+        self.names.pop(entity_id, None)
+        for gram in self.grams.pop(entity_id, ()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(entity_id)
+                if not ids:
+                    del self.postings[gram]
+
+
+class EntityTrigramIndex:
+    """process 內 trigram → entity_id 倒排索引（見 get_entity_trigram_index）"""
+
+    def __init__(self):
+        self._types: Dict[str, _TypeIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def ensure_loaded(self, db: AsyncSession, entity_type: str) -> None:
+        """首次全量載入；之後只補讀 id 水位線以上的新實體（其他 worker 建立的）。"""
+        lock = self._locks.setdefault(entity_type, asyncio.Lock())
+        async with lock:
+            idx = self._types.get(entity_type)
+            if idx is None or time.monotonic() - idx.loaded_at > FULL_RELOAD_INTERVAL:
+                fresh = _TypeIndex(loaded_at=time.monotonic())
+                rows = await db.execute(
+                    select(CanonicalEntity.id, CanonicalEntity.canonical_name)
+                    .where(CanonicalEntity.entity_type == entity_type)
+                )
+                for entity_id, name in rows.all():
+                    if name:
+                        fresh.add(entity_id, name)
+                self._types[entity_type] = fresh
+                logger.debug(
+                    "Entity trigram index loaded: type=%s entities=%d grams=%d",
+                    entity_type, len(fresh.names), len(fresh.postings),
+                )
+                return
+
+            rows = await db.execute(
+                select(CanonicalEntity.id, CanonicalEntity.canonical_name)
+                .where(CanonicalEntity.entity_type == entity_type)
+                .where(CanonicalEntity.id > idx.max_id)
+            )
+            for entity_id, name in rows.all():
+                if name:
+                    idx.add(entity_id, name)
+
+    def add(self, entity_id: int, name: str, entity_type: str) -> None:
+        """新建實體後同步（該類型尚未載入則略過，首次載入會含它）。"""
+        idx = self._types.get(entity_type)
+        if idx is not None and entity_id is not None and name:
+            idx.add(entity_id, name)
+
+    def remove(self, entity_id: int, entity_type: Optional[str] = None) -> None:
+        """合併 / 刪除實體後同步。"""
+        targets = [self._types[entity_type]] if entity_type in self._types else self._types.values()
+        for idx in targets:
+            idx.remove(entity_id)
+
+    def candidates(
+        self, entity_type: str, name: str, threshold: float,
+    ) -> List[Tuple[int, str, float]]:
+        """回傳 Jaccard >= threshold 的候選 (entity_id, canonical_name, score)，依分數遞減。"""
+        idx = self._types.get(entity_type)
+        if idx is None or not name:
+            return []
+        query = trigrams(name)
+        q_len = len(query)
+        lo, hi = threshold * q_len, q_len / threshold if threshold > 0 else math.inf
+        overlap_ratio = threshold / (1 + threshold)
+
+        # prefix filter：合格候選至少共享 ceil(θ·|A|) 個 trigram，因此必出現在
+        # 「最稀有的 |A| - ceil(θ·|A|) + 1 個」posting 之中 → 高頻 gram（如「115年度」）不必掃
+        min_overlap = max(1, math.ceil(threshold * q_len - _EPS))
+        probe = sorted(query, key=lambda g: len(idx.postings.get(g, ())))[:q_len - min_overlap + 1]
+        shared: Dict[int, int] = {}
+        for gram in probe:
+            for entity_id in idx.postings.get(gram, ()):
+                if entity_id not in shared:
+                    shared[entity_id] = len(query & idx.grams[entity_id])
+
+        name_lower = name.lower()
+        results: List[Tuple[int, str, float]] = []
+        for entity_id, overlap in shared.items():
+            c_len = len(idx.grams[entity_id])
+            # 邊界相等時不能因浮點誤差被剪掉 → 留 _EPS 餘裕，最終仍以 score 判定
+            if c_len < lo - _EPS or c_len > hi + _EPS:
+                continue
+            if overlap < overlap_ratio * (q_len + c_len) - _EPS:
+                continue
+            cand_name = idx.names[entity_id]
+            if cand_name.lower() == name_lower:
+                score = 1.0
+            else:
+                score = overlap / (q_len + c_len - overlap)
+            if score >= threshold:
+                results.append((entity_id, cand_name, score))
+        results.sort(key=lambda r: (-r[2], r[0]))
+        return results
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            etype: {"entities": len(idx.names), "grams": len(idx.postings)}
+            for etype, idx in self._types.items()
+        }
+
+
+_index: Optional[EntityTrigramIndex] = None
+
+
+def get_entity_trigram_index() -> EntityTrigramIndex:
+    global _index
+    if _index is None:
+        _index = EntityTrigramIndex()
+    return _index
@@ -26,10 +26,16 @@ from .erp_graph_types import (
     ErpEntity,
     ErpRelation,
 )
+from .graph_change_notifier import queue_relations_changed
 
 logger = logging.getLogger(__name__)
 
 
+def _edge_triples(rows: List[Dict[str, Any]]) -> List[list]:
+    """INSERT 參數列 → GRAPH_RELATIONS_CHANGED 三元組"""
+    return [[r["source_entity_id"], r["target_entity_id"], r["relation_label"]] for r in rows]
+
+
 class ErpGraphIngestService:
     """ERP 圖譜入圖：從 ERP 表提取實體+關係 → canonical_entities"""
 
@@ -282,6 +288,7 @@ class ErpGraphIngestService:
             batch = new_values[i:i + BATCH_SIZE]
             await self.db.execute(EntityRelationship.__table__.insert(), batch)
             count += len(batch)
+        queue_relations_changed(self.db, added=_edge_triples(new_values))
 
         await self.db.flush()
         return count
@@ -363,6 +370,7 @@ class ErpGraphIngestService:
         if new_bridges:
             await self.db.execute(EntityRelationship.__table__.insert(), new_bridges)
             await self.db.flush()
+            queue_relations_changed(self.db, added=_edge_triples(new_bridges))
 
         logger.info("ERP cross-graph bridges: %d created", len(new_bridges))
         return len(new_bridges)
@@ -0,0 +1,122 @@
+"""
+圖譜關係變更通知 — commit 後才發佈 GRAPH_RELATIONS_CHANGED
+
+關係寫入端（入圖 pipeline、實體合併、ERP / 跨域 / 收發文對應）呼叫
+`queue_relations_changed(db, ...)` 登記變更，事件掛在 session 上：
+
+- 外層交易 commit 後才 publish（CSR 快照不會收到尚未落地的邊）
+- 交易或 SAVEPOINT rollback 時，丟棄該交易內登記的變更（不留幽靈 overlay 邊）
+- 同一交易內多次登記合併為一個事件
+
+payload 見 domain_events.graph_relations_changed；stale=True 表示無法列舉
+受影響的邊（如實體合併），CSR 引擎直接標記快照過期並重建。
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import asyncio
+import logging
+from typing import Any, Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "graph_relations_pending"
+_LISTENING_KEY = "graph_relations_listening"
+
+# 背景 publish task 參考（避免被 GC）
+_publish_tasks: Set[asyncio.Task] = set()
+
+
+def queue_relations_changed(
+    db: AsyncSession,
+    added: Optional[Iterable[Any]] = None,
+    removed: Optional[Iterable[Any]] = None,
+    stale: bool = False,
+) -> None:
+    """登記關係變更，於 db 外層交易 commit 後發佈。
+
+    Args:
+        added / removed: [source_entity_id, target_entity_id, relation_label] 三元組；
+            added 可再附 source / target 的 graph_domain（新建實體不在 CSR 快照內，
+            帶 domain 才能進 overlay，否則引擎只能整體重建）
+        stale: 受影響的邊無法列舉（如合併實體），要求 CSR 快照整體重建
+    """
+    added_list = [list(e) for e in added or ()]
+    removed_list = [list(e) for e in removed or ()]
+    if not (added_list or removed_list or stale):
+        return
+    try:
+        session = db.sync_session
+        _ensure_listeners(session)
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault(_PENDING_KEY, []).append(
+            (transaction, added_list, removed_list, stale)
+        )
+    except Exception as e:
+        # 通知失敗不影響寫入本身；CSR 快照仍會在 graph_csr_max_staleness 後重建
+        logger.debug("Graph relations change not queued: %s", e)
+
+
+def _ensure_listeners(session: Session) -> None:
+    if session.info.get(_LISTENING_KEY):
+        return
+    session.info[_LISTENING_KEY] = True
+    event.listen(session, "after_commit", _on_commit)
+    event.listen(session, "after_soft_rollback", _on_rollback)
+
+
+def _within(transaction: Optional[SessionTransaction], ancestor: SessionTransaction) -> bool:
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+def _on_rollback(session: Session, previous_transaction: SessionTransaction) -> None:
+    pending = session.info.get(_PENDING_KEY)
+    if not pending:
+        return
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)  # 外層交易 rollback：全部作廢
+    else:
+        session.info[_PENDING_KEY] = [
+            item for item in pending if not _within(item[0], previous_transaction)
+        ]
+
+
+def _on_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    added: List[list] = []
+    removed: List[list] = []
+    stale = False
+    for _, item_added, item_removed, item_stale in pending:
+        added.extend(item_added)
+        removed.extend(item_removed)
+        stale = stale or item_stale
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.debug("Graph relations event dropped: no running loop")
+        return
+    task = loop.create_task(_publish(added, removed, stale))
+    _publish_tasks.add(task)
+    task.add_done_callback(_publish_tasks.discard)
+
+
+async def _publish(added: List[list], removed: List[list], stale: bool) -> None:
+    try:
+        from app.core.domain_events import graph_relations_changed
+        from app.core.event_bus import EventBus
+
+        extra = {"stale": True} if stale else {}
+        await EventBus.get_instance().publish(graph_relations_changed(added, removed, **extra))
+    except Exception as e:
+        logger.debug("Graph relations event publish skipped: %s", e)
@@ -0,0 +1,575 @@
+"""
+圖譜 CSR 遍歷引擎 — in-process 雙向 BFS
+
+`GraphTraversalService` 的最短路徑 / K 跳鄰居原以 Recursive CTE 實作，
+以 ARRAY 串接 + `= ANY(path)` 枚舉所有簡單路徑，hub 節點多時呈指數成長，
+Redis 快取只對重複 pair 有效。
+
+本引擎將未失效的 knowledge 域 `entity_relationships` 載入為 CSR
+（numpy int32 offsets/targets）快照，查詢改走雙向 BFS：
+- 語意與 SQL 版一致：邊無向、排除 code_graph、鄰居端必須是 knowledge 域
+  （實作為有向弧 u→v 僅在 v 為 knowledge 時存在）
+- 增量：訂閱 EventBus `GRAPH_RELATIONS_CHANGED`（寫入端經 graph_change_notifier
+  於 commit 後發佈），新增邊進 overlay；快照外的新節點依事件攜帶的
+  graph_domain 配置虛擬 row；刪除 / 實體合併 / 缺 domain 的未知節點 /
+  overlay 過大 / 快照逾時 → 背景重建
+- 重建期間到達的事件記入 journal，新快照換上後重放，不會遺失
+- degree 與 SQL 版 COUNT(*) 同義（所有未失效邊，含 code_graph 與非 knowledge 端）
+- 快照未就緒時回傳 None，呼叫端退回 SQL CTE
+
+啟用：GRAPH_CSR_ENABLED=true
+
+v1.1.0: 重建期間事件 journal 重放、新節點虛擬 row、degree 對齊 SQL
+
+Version: 1.1.0
+Created: 2026-10-16
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.domain_events import DomainEvent, EventType
+from app.services.ai.core.ai_config import get_ai_config
+
+logger = logging.getLogger(__name__)
+
+_LOAD_EDGES_SQL = text("""
+    SELECT
+        r.source_entity_id,
+        r.target_entity_id,
+        r.relation_label,
+        cs.graph_domain = 'knowledge' AS source_knowledge,
+        ct.graph_domain = 'knowledge' AS target_knowledge
+    FROM entity_relationships r
+    JOIN canonical_entities cs ON cs.id = r.source_entity_id
+    JOIN canonical_entities ct ON ct.id = r.target_entity_id
+    WHERE r.invalidated_at IS NULL
+        AND r.relation_label IS DISTINCT FROM 'code_graph'
+        AND (cs.graph_domain = 'knowledge' OR ct.graph_domain = 'knowledge')
+""")
+
+# 與 graph_traversal_service 的 branching factor COUNT(*) 同義（自環只計一次）
+_LOAD_DEGREES_SQL = text("""
+    SELECT entity_id, COUNT(*) FROM (
+        SELECT source_entity_id AS entity_id FROM entity_relationships
+        WHERE invalidated_at IS NULL
+        UNION ALL
+        SELECT target_entity_id FROM entity_relationships
+        WHERE invalidated_at IS NULL AND target_entity_id <> source_entity_id
+    ) e
+    GROUP BY entity_id
+""")
+
+# refresh 後 journal 重放又遇到刪除 / stale 時，背景重建最多連續重跑次數
+_MAX_REFRESH_ROUNDS = 3
+
+
+def _build_csr(
+    src: np.ndarray, dst: np.ndarray, labels: np.ndarray, n_nodes: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """有向弧 (src→dst) → CSR (offsets, targets, label_codes)，同列內依 target 排序。"""
+    order = np.lexsort((dst, src))
+    counts = np.bincount(src, minlength=n_nodes)
+    offsets = np.zeros(n_nodes + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, dst[order].astype(np.int32), labels[order].astype(np.int32)
+
+
+@dataclass
+class CSRSnapshot:
+    """不可變 CSR 快照（forward 供正向擴展，reverse 供雙向 BFS 反向擴展）"""
+
+    node_ids: np.ndarray          # int64，row → entity_id（已排序）
+    knowledge: np.ndarray         # bool，row 是否為 knowledge 域
+    fwd_offsets: np.ndarray       # int32 [n+1]
+    fwd_targets: np.ndarray       # int32 [m]
+    fwd_labels: np.ndarray        # int32 [m]，索引 label_vocab
+    rev_offsets: np.ndarray
+    rev_targets: np.ndarray
+    label_vocab: List[Optional[str]]
+    built_at: float
+    degree_ids: np.ndarray        # int64，已排序
+    degree_counts: np.ndarray     # int32，所有未失效邊的無向度數（對齊 SQL COUNT）
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def n_arcs(self) -> int:
+        return len(self.fwd_targets)
+
+    def row_of(self, entity_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self.node_ids, entity_id))
+        if i < len(self.node_ids) and self.node_ids[i] == entity_id:
+            return i
+        return None
+
+    def degree_of(self, entity_id: int) -> int:
+        i = int(np.searchsorted(self.degree_ids, entity_id))
+        if i < len(self.degree_ids) and self.degree_ids[i] == entity_id:
+            return int(self.degree_counts[i])
+        return 0
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Sequence[Tuple[int, int, Optional[str], bool, bool]],
+        degrees: Optional[Sequence[Tuple[int, int]]] = None,
+    ) -> "CSRSnapshot":
+        """rows 為 _LOAD_EDGES_SQL 結果；degrees 為 _LOAD_DEGREES_SQL 結果（省略時由 rows 計算）。"""
+        label_index: Dict[Optional[str], int] = {}
+        n = len(rows)
+        s_ids = np.empty(n, dtype=np.int64)
+        t_ids = np.empty(n, dtype=np.int64)
+        codes = np.empty(n, dtype=np.int32)
+        s_kg = np.empty(n, dtype=bool)
+        t_kg = np.empty(n, dtype=bool)
+        for i, (s, t, label, sk, tk) in enumerate(rows):
+            s_ids[i], t_ids[i] = s, t
+            codes[i] = label_index.setdefault(label, len(label_index))
+            s_kg[i], t_kg[i] = bool(sk), bool(tk)
+
+        node_ids, inverse = np.unique(np.concatenate([s_ids, t_ids]), return_inverse=True)
+        s_rows, t_rows = inverse[:n], inverse[n:]
+        knowledge = np.zeros(len(node_ids), dtype=bool)
+        knowledge[s_rows[s_kg]] = True
+        knowledge[t_rows[t_kg]] = True
+
+        # 無向邊拆成兩條有向弧，鄰居端必須是 knowledge 域（對齊 SQL 的 ce.graph_domain 條件）
+        arc_src = np.concatenate([s_rows[t_kg], t_rows[s_kg]])
+        arc_dst = np.concatenate([t_rows[t_kg], s_rows[s_kg]])
+        arc_lbl = np.concatenate([codes[t_kg], codes[s_kg]])
+
+        n_nodes = len(node_ids)
+        fwd_offsets, fwd_targets, fwd_labels = _build_csr(arc_src, arc_dst, arc_lbl, n_nodes)
+        rev_offsets, rev_targets, _ = _build_csr(arc_dst, arc_src, arc_lbl, n_nodes)
+        vocab: List[Optional[str]] = [None] * len(label_index)
+        for label, code in label_index.items():
+            vocab[code] = label
+
+        if degrees is None:
+            loops = s_ids == t_ids
+            degree_ids, degree_counts = np.unique(
+                np.concatenate([s_ids, t_ids[~loops]]), return_counts=True,
+            )
+        else:
+            pairs = sorted((int(eid), int(cnt)) for eid, cnt in degrees)
+            degree_ids = np.fromiter((p[0] for p in pairs), dtype=np.int64, count=len(pairs))
+            degree_counts = np.fromiter((p[1] for p in pairs), dtype=np.int64, count=len(pairs))
+        return cls(
+            node_ids=node_ids,
+            knowledge=knowledge,
+            fwd_offsets=fwd_offsets,
+            fwd_targets=fwd_targets,
+            fwd_labels=fwd_labels,
+            rev_offsets=rev_offsets,
+            rev_targets=rev_targets,
+            label_vocab=vocab,
+            built_at=time.monotonic(),
+            degree_ids=degree_ids.astype(np.int64),
+            degree_counts=degree_counts.astype(np.int32),
+        )
+
+
+def _expand(offsets: np.ndarray, targets: np.ndarray, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """向量化展開整層 frontier → (parents, neighbors)。"""
+    starts = offsets[frontier]
+    lens = offsets[frontier + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty
+    base = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+    idx = np.arange(total, dtype=np.int64) + base
+    return np.repeat(frontier, lens), targets[idx]
+
+
+class GraphCSREngine:
+    """CSR 快照持有者 + 雙向 BFS 查詢（process 單例，見 get_graph_csr_engine）"""
+
+    def __init__(self):
+        self._config = get_ai_config()
+        self._snapshot: Optional[CSRSnapshot] = None
+        # overlay：快照建立後新增的弧（row → [(row, label)]），正反兩向
+        self._overlay_fwd: Dict[int, List[Tuple[int, Optional[str]]]] = {}
+        self._overlay_rev: Dict[int, List[int]] = {}
+        self._overlay_size = 0
+        # 快照外的新節點：entity_id → 虛擬 row（>= n_nodes），依序對應 _extra_ids / _extra_knowledge
+        self._extra_rows: Dict[int, int] = {}
+        self._extra_ids: List[int] = []
+        self._extra_knowledge: List[bool] = []
+        # 快照建立後新增邊的度數增量（entity_id → 邊數，含 code_graph）
+        self._degree_delta: Dict[int, int] = {}
+        self._stale = False
+        # 每收到一個事件 +1；refresh 期間的事件另記 journal，換上新快照後重放
+        self._generation = 0
+        self._journal: Optional[List[dict]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # 快照生命週期
+    # ------------------------------------------------------------------
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.graph_csr_enabled
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    async def refresh(self) -> Dict[str, int]:
+        """從 DB 重建快照（重建期間舊快照照常服務）。
+
+        DB 讀取前記下 generation；期間到達的事件可能已在或不在讀到的資料內，
+        一律於換上新快照後重放（已存在的弧去重，刪除 / stale 則再標 stale）。
+        """
+        async with self._lock:
+            from app.db.database import async_session_maker
+
+            t0 = time.monotonic()
+            generation = self._generation
+            self._journal = []
+            try:
+                async with async_session_maker() as db:
+                    rows = (await db.execute(_LOAD_EDGES_SQL)).all()
+                    degrees = (await db.execute(_LOAD_DEGREES_SQL)).all()
+                snapshot = await asyncio.to_thread(CSRSnapshot.from_rows, rows, degrees)
+            finally:
+                journal, self._journal = self._journal, None
+            self._snapshot = snapshot
+            self._reset_overlay()
+            self._stale = False
+            if self._generation != generation:
+                for payload in journal:
+                    self._apply(snapshot, payload, replay=True)
+            elapsed_ms = int((time.monotonic() - t0) * 1000)
+            logger.info(
+                "Graph CSR snapshot rebuilt: nodes=%d arcs=%d labels=%d replayed=%d in %dms",
+                snapshot.n_nodes, snapshot.n_arcs, len(snapshot.label_vocab), len(journal), elapsed_ms,
+            )
+            return {"nodes": snapshot.n_nodes, "arcs": snapshot.n_arcs, "duration_ms": elapsed_ms}
+
+    def _reset_overlay(self) -> None:
+        self._overlay_fwd.clear()
+        self._overlay_rev.clear()
+        self._overlay_size = 0
+        self._extra_rows.clear()
+        self._extra_ids.clear()
+        self._extra_knowledge.clear()
+        self._degree_delta.clear()
+
+    def schedule_refresh(self) -> None:
+        """背景重建（已有進行中的重建則略過）。"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        try:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._safe_refresh())
+        except RuntimeError:
+            pass  # 無 running loop（同步情境），下次查詢再觸發
+
+    async def _safe_refresh(self) -> None:
+        # 重建中收到的刪除 / stale 事件重放後仍為 stale；schedule_refresh 在本 task
+        # 執行中會略過，故此處接著再建
+        for _ in range(_MAX_REFRESH_ROUNDS):
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Graph CSR snapshot refresh failed, SQL fallback stays active: %s", e)
+                return
+            if not self._stale:
+                return
+
+    def _usable(self) -> Optional[CSRSnapshot]:
+        """取得可用快照；未就緒 / 逾時 / stale 時觸發背景重建。"""
+        if not self.enabled:
+            return None
+        snap = self._snapshot
+        if snap is None:
+            self.schedule_refresh()
+            return None
+        if self._stale or time.monotonic() - snap.built_at > self._config.graph_csr_max_staleness:
+            self.schedule_refresh()
+            if self._stale:
+                return None  # 已知有刪除/未知節點 → 重建完成前走 SQL，避免回傳錯誤路徑
+        return snap
+
+    # ------------------------------------------------------------------
+    # 增量（EventBus）
+    # ------------------------------------------------------------------
+
+    async def handle_relations_changed(self, event: DomainEvent) -> None:
+        """GRAPH_RELATIONS_CHANGED → 新增邊進 overlay，其餘情況標 stale。
+
+        事件由 graph_change_notifier 於 commit 後發佈；stale=True 表示寫入端
+        無法列舉受影響的邊（如實體合併）。added 項目為
+        [source_id, target_id, label, source_domain?, target_domain?]。
+        """
+        payload = event.payload or {}
+        self._generation += 1
+        if self._journal is not None:
+            self._journal.append(payload)
+        snap = self._snapshot
+        if snap is None:
+            return
+        self._apply(snap, payload)
+
+    def _apply(self, snap: CSRSnapshot, payload: dict, replay: bool = False) -> None:
+        if payload.get("removed") or payload.get("stale"):
+            self._mark_stale("relations removed")
+            return
+        for item in payload.get("added") or []:
+            src_id, tgt_id = int(item[0]), int(item[1])
+            label = item[2] if len(item) > 2 else None
+            if label == "code_graph":
+                self._add_degree(src_id, tgt_id)
+                continue
+            s = self._row(snap, src_id, item[3] if len(item) > 3 else None)
+            t = self._row(snap, tgt_id, item[4] if len(item) > 4 else None)
+            if s is None or t is None:
+                # 快照外的節點且事件未帶 graph_domain，無法判斷弧方向
+                self._mark_stale("unknown node")
+                return
+            known = replay and (self._has_arc(snap, s, t) or self._has_arc(snap, t, s))
+            if not known:
+                # 重放時已在新快照內的邊，度數也已計入 degree_counts
+                self._add_degree(src_id, tgt_id)
+            if self._is_knowledge(snap, t) and not self._has_arc(snap, s, t):
+                self._add_overlay_arc(s, t, label)
+            if self._is_knowledge(snap, s) and not self._has_arc(snap, t, s):
+                self._add_overlay_arc(t, s, label)
+        if self._overlay_size > self._config.graph_csr_overlay_limit:
+            self.schedule_refresh()
+
+    def _row(self, snap: CSRSnapshot, entity_id: int, domain: Optional[str]) -> Optional[int]:
+        """entity_id → row；快照外的節點有 domain 時配置虛擬 row。"""
+        row = self._lookup(snap, entity_id)
+        if row is not None or domain is None:
+            return row
+        row = snap.n_nodes + len(self._extra_ids)
+        self._extra_rows[entity_id] = row
+        self._extra_ids.append(entity_id)
+        self._extra_knowledge.append(domain == "knowledge")
+        return row
+
+    def _lookup(self, snap: CSRSnapshot, entity_id: int) -> Optional[int]:
+        row = snap.row_of(entity_id)
+        return row if row is not None else self._extra_rows.get(entity_id)
+
+    def _is_knowledge(self, snap: CSRSnapshot, row: int) -> bool:
+        if row < snap.n_nodes:
+            return bool(snap.knowledge[row])
+        return self._extra_knowledge[row - snap.n_nodes]
+
+    def _node_ids(self, snap: CSRSnapshot) -> np.ndarray:
+        """row → entity_id（含虛擬 row）"""
+        if not self._extra_ids:
+            return snap.node_ids
+        return np.concatenate([snap.node_ids, np.asarray(self._extra_ids, dtype=np.int64)])
+
+    def _has_arc(self, snap: CSRSnapshot, u: int, v: int) -> bool:
+        if u < snap.n_nodes:
+            lo, hi = int(snap.fwd_offsets[u]), int(snap.fwd_offsets[u + 1])
+            pos = lo + int(np.searchsorted(snap.fwd_targets[lo:hi], v))
+            if pos < hi and snap.fwd_targets[pos] == v:
+                return True
+        return any(w == v for w, _ in self._overlay_fwd.get(u, ()))
+
+    def _add_degree(self, src_id: int, tgt_id: int) -> None:
+        self._degree_delta[src_id] = self._degree_delta.get(src_id, 0) + 1
+        if tgt_id != src_id:
+            self._degree_delta[tgt_id] = self._degree_delta.get(tgt_id, 0) + 1
+
+    def _add_overlay_arc(self, u: int, v: int, label: Optional[str]) -> None:
+        self._overlay_fwd.setdefault(u, []).append((v, label))
+        self._overlay_rev.setdefault(v, []).append(u)
+        self._overlay_size += 1
+
+    def _mark_stale(self, reason: str) -> None:
+        self._stale = True
+        logger.debug("Graph CSR snapshot marked stale: %s", reason)
+        self.schedule_refresh()
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+
+    def degree(self, entity_id: int) -> Optional[int]:
+        """節點未失效邊數（供 K 跳降級判斷，與 SQL 版 COUNT(*) 同義）。"""
+        snap = self._usable()
+        if snap is None:
+            return None
+        return snap.degree_of(entity_id) + self._degree_delta.get(entity_id, 0)
+
+    def _step(
+        self, snap: CSRSnapshot, frontier: np.ndarray, forward: bool,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # 虛擬 row 不在 CSR 內，只有 overlay 弧
+        in_csr = frontier[frontier < snap.n_nodes] if self._extra_ids else frontier
+        if forward:
+            parents, nbrs = _expand(snap.fwd_offsets, snap.fwd_targets, in_csr)
+        else:
+            parents, nbrs = _expand(snap.rev_offsets, snap.rev_targets, in_csr)
+        overlay = self._overlay_fwd if forward else self._overlay_rev
+        if overlay:
+            keys = np.fromiter(overlay.keys(), dtype=np.int32, count=len(overlay))
+            extra_p: List[int] = []
+            extra_n: List[int] = []
+            for u in keys[np.isin(keys, frontier)].tolist():
+                for arc in overlay[u]:
+                    extra_p.append(u)
+                    extra_n.append(arc[0] if forward else arc)
+            if extra_p:
+                parents = np.concatenate([parents, np.asarray(extra_p, dtype=np.int32)])
+                nbrs = np.concatenate([nbrs, np.asarray(extra_n, dtype=np.int32)])
+        return parents, nbrs
+
+    def k_hop(self, entity_id: int, max_hops: int, limit: int) -> Optional[Dict[int, int]]:
+        """K 跳鄰居 → {entity_id: hop}；快照不可用時回傳 None。
+
+        結果集合與 SQL 版相同（DISTINCT ON entity_id ORDER BY entity_id LIMIT）。
+        """
+        snap = self._usable()
+        if snap is None:
+            return None
+        root = self._lookup(snap, entity_id)
+        if root is None:
+            return {entity_id: 0}
+        node_ids = self._node_ids(snap)
+        hops = np.full(len(node_ids), -1, dtype=np.int16)
+        hops[root] = 0
+        frontier = np.asarray([root], dtype=np.int32)
+        for hop in range(1, max_hops + 1):
+            _, nbrs = self._step(snap, frontier, forward=True)
+            nbrs = np.unique(nbrs)
+            nbrs = nbrs[hops[nbrs] < 0]
+            if len(nbrs) == 0:
+                break
+            hops[nbrs] = hop
+            frontier = nbrs.astype(np.int32)
+        reached = np.nonzero(hops >= 0)[0]
+        ids = node_ids[reached]
+        order = np.argsort(ids)[:limit]
+        return {int(ids[i]): int(hops[reached[i]]) for i in order}
+
+    def shortest_path(
+        self, source_id: int, target_id: int, max_hops: int,
+    ) -> Optional[Tuple[List[int], List[Optional[str]]]]:
+        """雙向 BFS 最短路徑 → (path_ids, relation_labels)。
+
+        回傳 None 表示快照不可用（呼叫端走 SQL）；([], []) 表示 max_hops 內不可達。
+        """
+        snap = self._usable()
+        if snap is None:
+            return None
+        s, t = self._lookup(snap, source_id), self._lookup(snap, target_id)
+        if s is None or t is None:
+            return [], []
+        if s == t:
+            return [source_id], []
+
+        node_ids = self._node_ids(snap)
+        n = len(node_ids)
+        # parent_f[v]：正向樹中 v 的前驅；parent_b[v]：反向樹中 v 的後繼（-1 未訪問，-2 根）
+        parent_f = np.full(n, -1, dtype=np.int32)
+        parent_b = np.full(n, -1, dtype=np.int32)
+        parent_f[s] = -2
+        parent_b[t] = -2
+        front_f = np.asarray([s], dtype=np.int32)
+        front_b = np.asarray([t], dtype=np.int32)
+        depth_f = depth_b = 0
+
+        meet = -1
+        while depth_f + depth_b < max_hops and len(front_f) and len(front_b):
+            forward = len(front_f) <= len(front_b)
+            frontier = front_f if forward else front_b
+            own, other = (parent_f, parent_b) if forward else (parent_b, parent_f)
+            parents, nbrs = self._step(snap, frontier, forward=forward)
+            fresh = own[nbrs] == -1
+            parents, nbrs = parents[fresh], nbrs[fresh]
+            # 同層多個前驅時取第一個（np.unique 回傳首次出現索引）
+            nbrs, first = np.unique(nbrs, return_index=True)
+            own[nbrs] = parents[first]
+            if forward:
+                depth_f += 1
+                front_f = nbrs.astype(np.int32)
+            else:
+                depth_b += 1
+                front_b = nbrs.astype(np.int32)
+            hit = nbrs[other[nbrs] != -1]
+            if len(hit):
+                meet = int(hit[0])
+                break
+
+        if meet < 0:
+            return [], []
+
+        rows: List[int] = []
+        v = meet
+        while v != -2:
+            rows.append(v)
+            v = int(parent_f[v])
+        rows.reverse()
+        v = int(parent_b[meet])
+        while v != -2:
+            rows.append(v)
+            v = int(parent_b[v])
+
+        labels = [self._arc_label(snap, rows[i], rows[i + 1]) for i in range(len(rows) - 1)]
+        return [int(node_ids[r]) for r in rows], labels
+
+    def _arc_label(self, snap: CSRSnapshot, u: int, v: int) -> Optional[str]:
+        if u < snap.n_nodes:
+            lo, hi = int(snap.fwd_offsets[u]), int(snap.fwd_offsets[u + 1])
+            pos = lo + int(np.searchsorted(snap.fwd_targets[lo:hi], v))
+            if pos < hi and snap.fwd_targets[pos] == v:
+                return snap.label_vocab[int(snap.fwd_labels[pos])]
+        for w, label in self._overlay_fwd.get(u, ()):
+            if w == v:
+                return label
+        return None
+
+    def stats(self) -> Dict[str, object]:
+        snap = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "ready": snap is not None,
+            "stale": self._stale,
+            "nodes": snap.n_nodes if snap else 0,
+            "arcs": snap.n_arcs if snap else 0,
+            "overlay_arcs": self._overlay_size,
+            "overlay_nodes": len(self._extra_ids),
+            "generation": self._generation,
+            "age_seconds": int(time.monotonic() - snap.built_at) if snap else None,
+        }
+
+
+_engine: Optional[GraphCSREngine] = None
+
+
+def get_graph_csr_engine() -> GraphCSREngine:
+    global _engine
+    if _engine is None:
+        _engine = GraphCSREngine()
+    return _engine
+
+
+def register_graph_csr_handlers() -> None:
+    """註冊 CSR 增量更新到 EventBus（app startup 呼叫）"""
+    from app.core.event_bus import EventBus
+
+    engine = get_graph_csr_engine()
+    if not engine.enabled:
+        return
+    EventBus.get_instance().subscribe(
+        EventType.GRAPH_RELATIONS_CHANGED, engine.handle_relations_changed,
+    )
+    logger.info("Graph CSR engine handler registered")
@@ -37,21 +37,9 @@ async def invalidate_graph_cache(pattern: str | None = None) -> int:
     """
     if pattern is None:
         return await _graph_cache.clear()
-    try:
-        r = await _graph_cache._get_redis()
-        if r is None:
-            return 0
-        full_pattern = f"{_graph_cache._prefix}:{pattern}"
-        keys = []
-        async for key in r.scan_iter(full_pattern):
-            keys.append(key)
-        if keys:
-            await r.delete(*keys)
-        logger.info(f"圖譜快取失效: {len(keys)} keys (pattern={pattern})")
-        return len(keys)
-    except Exception as e:
-        logger.debug(f"圖譜快取失效失敗: {e}")
-        return 0
+    count = await _graph_cache.delete_pattern(pattern)
+    logger.info(f"圖譜快取失效: {count} keys (pattern={pattern})")
+    return count
 
 
 # 行政區域提取 regex（從地址中提取區/鄉/鎮/市）
@@ -15,10 +15,11 @@ import time
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select, func as sa_func
+from sqlalchemy import inspect as sa_inspect, select, func as sa_func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.extended.models import (
+    CanonicalEntity,
     OfficialDocument,
     DocumentEntity,
     DocumentEntityMention,
@@ -28,9 +29,16 @@ from app.extended.models import (
 )
 from app.services.ai.core.ai_config import get_ai_config
 from .canonical_entity_service import CanonicalEntityService
+from .graph_change_notifier import queue_relations_changed
 
 logger = logging.getLogger(__name__)
 
+
+def _graph_domain(entity: CanonicalEntity) -> str:
+    """實體 graph_domain（新建實體走 server_default，flush 後屬性已 expire，不觸發 lazy load）"""
+    return sa_inspect(entity).dict.get("graph_domain") or "knowledge"
+
+
 # ── G-2: 關係反向映射 ──────────────────────────────────
 INVERSE_RELATION_MAP = {
     "manages": "managed_by",
@@ -201,6 +209,7 @@ class GraphIngestionPipeline:
                 )
 
         relations_found = 0
+        added_edges: list = []  # 新建關係 → GRAPH_RELATIONS_CHANGED（CSR 快照增量）
         for rel in raw_relations:
             src_key = f"{rel.source_entity_type}:{rel.source_entity_name}"
             tgt_key = f"{rel.target_entity_type}:{rel.target_entity_name}"
@@ -232,6 +241,10 @@ class GraphIngestionPipeline:
                 self.db.add(new_rel)
                 # 加入 lookup 處理同批次重複關係
                 rel_lookup[lookup_key] = new_rel
+                added_edges.append([
+                    src_canonical.id, tgt_canonical.id, rel.relation_label,
+                    _graph_domain(src_canonical), _graph_domain(tgt_canonical),
+                ])
 
             relations_found += 1
 
@@ -257,6 +270,10 @@ class GraphIngestionPipeline:
                     )
                     self.db.add(inv_rel)
                     rel_lookup[inv_key] = inv_rel
+                    added_edges.append([
+                        tgt_canonical.id, src_canonical.id, inv_rel.relation_label,
+                        _graph_domain(tgt_canonical), _graph_domain(src_canonical),
+                    ])
 
         # 記錄入圖事件
         processing_ms = int((time.monotonic() - start_time) * 1000)
@@ -279,6 +296,9 @@ class GraphIngestionPipeline:
             f"{relations_found} 關係, {processing_ms}ms"
         )
 
+        # commit 後才發佈（batch_ingest 的 SAVEPOINT rollback 會一併作廢）
+        queue_relations_changed(self.db, added=added_edges)
+
         # Wiki hook: 非阻塞更新 wiki source 頁面
         import asyncio
         asyncio.create_task(self._wiki_on_ingest(document_id, raw_entities))
@@ -6,7 +6,10 @@
 - find_shortest_path (BFS 最短路徑)
 - get_entity_timeline (實體關係時間軸)
 
-Version: 1.0.0
+v1.1.0: 啟用 GRAPH_CSR_ENABLED 時，K 跳鄰居 / 最短路徑先走 in-process
+CSR 雙向 BFS（graph_csr_engine），快照未就緒才退回 Recursive CTE。
+
+Version: 1.1.0
 Created: 2026-03-15
 """
 
@@ -22,6 +25,7 @@ from app.extended.models import (
     EntityRelationship,
 )
 from app.services.ai.core.ai_config import get_ai_config
+from .graph_csr_engine import get_graph_csr_engine
 from .graph_helpers import _graph_cache
 
 logger = logging.getLogger(__name__)
@@ -62,13 +66,17 @@ class GraphTraversalService:
         """K 跳鄰居查詢（無快取），含 branching factor 動態降級"""
         from sqlalchemy import text
 
+        engine = get_graph_csr_engine()
+
         # Dynamic degradation: if branching factor > 20, reduce max_hops
-        bf_result = await self.db.execute(text(
-            "SELECT COUNT(*) FROM entity_relationships "
-            "WHERE (source_entity_id = :eid OR target_entity_id = :eid) "
-            "AND invalidated_at IS NULL"
-        ), {"eid": entity_id})
-        branching_factor = bf_result.scalar() or 0
+        branching_factor = engine.degree(entity_id)
+        if branching_factor is None:
+            bf_result = await self.db.execute(text(
+                "SELECT COUNT(*) FROM entity_relationships "
+                "WHERE (source_entity_id = :eid OR target_entity_id = :eid) "
+                "AND invalidated_at IS NULL"
+            ), {"eid": entity_id})
+            branching_factor = bf_result.scalar() or 0
         if branching_factor > 20 and max_hops > 2:
             max_hops = 2
             logger.info(
@@ -82,6 +90,20 @@ class GraphTraversalService:
                 entity_id, branching_factor,
             )
 
+        hop_map = engine.k_hop(entity_id, max_hops, limit)
+        if hop_map is None:
+            hop_map = await self._k_hop_sql(entity_id, max_hops, limit)
+        node_ids = set(hop_map)
+
+        if not node_ids:
+            return {"nodes": [], "edges": []}
+
+        return await self._hydrate_subgraph(node_ids, hop_map)
+
+    async def _k_hop_sql(self, entity_id: int, max_hops: int, limit: int) -> dict:
+        """K 跳鄰居 Recursive CTE（CSR 快照不可用時的 fallback）→ {entity_id: hop}"""
+        from sqlalchemy import text
+
         result = await self.db.execute(text("""
             WITH RECURSIVE traversal AS (
                 -- 起始節點 (hop 0)
@@ -138,13 +160,10 @@ class GraphTraversalService:
             LIMIT :limit
         """), {"root_id": entity_id, "max_hops": max_hops, "limit": limit})
 
-        node_rows = result.all()
-        node_ids = {row[0] for row in node_rows}
-        hop_map = {row[0]: row[1] for row in node_rows}
-
-        if not node_ids:
-            return {"nodes": [], "edges": []}
+        return {row[0]: row[1] for row in result.all()}
 
+    async def _hydrate_subgraph(self, node_ids: set, hop_map: dict) -> dict:
+        """節點 id 集合 → 實體詳情 + 子圖內的邊"""
         entities_result = await self.db.execute(
             select(CanonicalEntity)
             .where(CanonicalEntity.id.in_(node_ids))
@@ -216,9 +235,53 @@ class GraphTraversalService:
     ) -> Optional[dict]:
         """兩實體間最短路徑查詢（無快取）"""
         try:
-            from sqlalchemy import text
+            found = get_graph_csr_engine().shortest_path(source_id, target_id, max_hops)
+            if found is None:
+                found = await self._shortest_path_sql(source_id, target_id, max_hops)
+            if not found or not found[0]:
+                return None
+
+            path_ids, relations = found
+            depth = len(path_ids) - 1
+
+            entities_result = await self.db.execute(
+                select(CanonicalEntity)
+                .where(CanonicalEntity.id.in_(path_ids))
+            )
+            entity_map = {e.id: e for e in entities_result.scalars().all()}
+
+            path_detail = [
+                {
+                    "id": eid,
+                    "name": entity_map[eid].canonical_name if eid in entity_map else str(eid),
+                    "type": entity_map[eid].entity_type if eid in entity_map else "unknown",
+                    "source_project": (
+                        getattr(entity_map[eid], "source_project", None) or "ck-missive"
+                    ) if eid in entity_map else "unknown",
+                }
+                for eid in path_ids
+            ]
+
+            return {
+                "found": True,
+                "depth": depth,
+                "path": path_detail,
+                "relations": list(relations),
+            }
+        except Exception as e:
+            logger.error(f"find_shortest_path failed: {e}")
+            return None
+
+    async def _shortest_path_sql(
+        self,
+        source_id: int,
+        target_id: int,
+        max_hops: int,
+    ) -> Optional[tuple]:
+        """最短路徑 Recursive CTE（CSR 快照不可用時的 fallback）→ (path_ids, relations)"""
+        from sqlalchemy import text
 
-            result = await self.db.execute(text("""
+        result = await self.db.execute(text("""
                 WITH RECURSIVE pathfinder AS (
                     SELECT
                         :source_id AS current_id,
@@ -263,44 +326,16 @@ class GraphTraversalService:
                 ORDER BY depth
                 LIMIT 1
             """), {
-                "source_id": source_id,
-                "target_id": target_id,
-                "max_hops": max_hops,
-            })
+            "source_id": source_id,
+            "target_id": target_id,
+            "max_hops": max_hops,
+        })
 
-            row = result.first()
-            if not row:
-                return None
-
-            path_ids, relations, depth = row
-
-            entities_result = await self.db.execute(
-                select(CanonicalEntity)
-                .where(CanonicalEntity.id.in_(path_ids))
-            )
-            entity_map = {e.id: e for e in entities_result.scalars().all()}
-
-            path_detail = [
-                {
-                    "id": eid,
-                    "name": entity_map[eid].canonical_name if eid in entity_map else str(eid),
-                    "type": entity_map[eid].entity_type if eid in entity_map else "unknown",
-                    "source_project": (
-                        getattr(entity_map[eid], "source_project", None) or "ck-missive"
-                    ) if eid in entity_map else "unknown",
-                }
-                for eid in path_ids
-            ]
-
-            return {
-                "found": True,
-                "depth": depth,
-                "path": path_detail,
-                "relations": list(relations),
-            }
-        except Exception as e:
-            logger.error(f"find_shortest_path failed: {e}")
+        row = result.first()
+        if not row:
             return None
+        path_ids, relations, _depth = row
+        return list(path_ids), list(relations)
 
     async def get_entity_timeline(self, entity_id: int) -> list:
         """取得實體的關係時間軸"""
@@ -105,9 +105,10 @@ class RAGQueryService:
         query_terms = extract_query_terms(question)
         # KG-RAG bridge: 擴展查詢詞彙（同義詞 + 知識圖譜別名）
         query_terms = await expand_query_with_kg(self.db, query_terms)
+        retrieval_timings: Dict[str, Any] = {}
         sources = await retrieve_chunks(
             self.db, query_embedding, top_k, similarity_threshold,
-            query_terms=query_terms,
+            query_terms=query_terms, timings=retrieval_timings,
         )
 
         if not sources:
@@ -117,6 +118,7 @@ class RAGQueryService:
                 "retrieval_count": 0,
                 "latency_ms": int((time.time() - t0) * 1000),
                 "model": "none",
+                "retrieval_timings": retrieval_timings,
             }
 
         # Graph-RAG: 2-hop 子圖擴充 — 從 KG 取相關實體鄰居注入 context
@@ -153,6 +155,7 @@ class RAGQueryService:
             "retrieval_count": len(sources),
             "latency_ms": latency_ms,
             "model": model_used,
+            "retrieval_timings": retrieval_timings,
         }
 
     async def _expand_with_graph(
@@ -248,9 +251,10 @@ class RAGQueryService:
         # 2. KG-RAG bridge: 擴展查詢詞彙 + 向量檢索 + Hybrid Reranking
         query_terms = extract_query_terms(question)
         query_terms = await expand_query_with_kg(self.db, query_terms)
+        retrieval_timings: Dict[str, Any] = {}
         sources = await retrieve_chunks(
             self.db, query_embedding, top_k, similarity_threshold,
-            query_terms=query_terms,
+            query_terms=query_terms, timings=retrieval_timings,
         )
 
         # 先發送 sources（讓前端立即顯示引用）
@@ -258,6 +262,7 @@ class RAGQueryService:
             type="sources",
             sources=sources,
             retrieval_count=len(sources),
+            retrieval_timings=retrieval_timings,
         )
 
         if not sources:
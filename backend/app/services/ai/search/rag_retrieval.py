@@ -7,14 +7,20 @@ RAG 檢索與上下文建構模組
 3. Hybrid Reranking (向量 + BM25 + 關鍵字覆蓋度)
 4. LLM 上下文建構
 5. 查詢詞提取 (jieba + regex fallback)
+6. Fused retrieval (v1.1.0)：向量 HNSW + tsvector BM25 單趟 CTE 候選，
+   與 wiki 索引並行，以 Reciprocal Rank Fusion 融合；「有無 chunks」改快取。
+   RAG_FUSED_RETRIEVAL=true 才啟用（預設關閉：融合路徑尚未重現
+   rerank_documents 與 wiki 優先加權）
 
-Version: 1.0.0
+Version: 1.1.0
 Created: 2026-03-26 (extracted from rag_query_service.py v2.4.0)
 """
 
+import asyncio
 import logging
 import re
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Sequence
 
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -144,6 +150,267 @@ async def retrieve_documents(
     return sources
 
 
+# ========================================================================
+# Chunk 可用性快取（取代每次查詢的 COUNT(*)）
+# ========================================================================
+
+# 有 chunks 幾乎不會變回沒有 → 長 TTL；沒有時短 TTL，回填完成後很快生效
+_CHUNKS_PRESENT_TTL = 600.0
+_CHUNKS_ABSENT_TTL = 60.0
+_chunks_presence: Dict[str, Any] = {"value": None, "checked_at": 0.0}
+
+
+async def has_embedded_chunks(db: AsyncSession) -> bool:
+    """document_chunks 是否有帶 embedding 的分段（EXISTS + process 內 TTL 快取）"""
+    value = _chunks_presence["value"]
+    ttl = _CHUNKS_PRESENT_TTL if value else _CHUNKS_ABSENT_TTL
+    if value is not None and time.monotonic() - _chunks_presence["checked_at"] < ttl:
+        return value
+
+    from app.extended.models import DocumentChunk
+
+    if not hasattr(DocumentChunk, "embedding"):
+        value = False
+    else:
+        result = await db.execute(
+            sa.select(sa.literal(1)).where(DocumentChunk.embedding.isnot(None)).limit(1)
+        )
+        value = result.first() is not None
+    _chunks_presence.update(value=value, checked_at=time.monotonic())
+    return value
+
+
+def reset_chunk_presence_cache() -> None:
+    """分段回填 / 清除後呼叫，下一次查詢重新檢查"""
+    _chunks_presence.update(value=None, checked_at=0.0)
+
+
+# ========================================================================
+# Reciprocal Rank Fusion
+# ========================================================================
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Mapping[Hashable, int]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> Dict[Hashable, float]:
+    """
+    RRF：score(d) = Σ w_i / (k + rank_i(d))，rank 從 1 起算。
+
+    各路排名以 {key: rank} 給定（允許同名次，例如同一公文的多個 chunk
+    共用文件級 BM25 名次）；未出現在某一路的 key 不計該路分數。
+    """
+    scores: Dict[Hashable, float] = {}
+    for i, ranks in enumerate(rankings):
+        w = weights[i] if weights else 1.0
+        for key, rank in ranks.items():
+            scores[key] = scores.get(key, 0.0) + w / (k + rank)
+    return scores
+
+
+def _to_tsquery_text(query_terms: Optional[List[str]]) -> str:
+    """查詢詞 → to_tsquery('simple', ...) 字串（去除 tsquery 運算子，避免語法錯誤）"""
+    cleaned = []
+    for term in (query_terms or [])[:10]:
+        t = re.sub(r"[^\w]", "", term)
+        if t and t not in cleaned:
+            cleaned.append(t)
+    return " | ".join(cleaned)
+
+
+# ========================================================================
+# Wiki 來源
+# ========================================================================
+
+async def _wiki_sources(query_terms: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Wiki-RAG：wiki 索引命中頁 → RAG source（依 wiki 分數排序）"""
+    wiki_query = " ".join(query_terms[:5]) if query_terms else ""
+    if not wiki_query:
+        return []
+    sources: List[Dict[str, Any]] = []
+    try:
+        from app.services.wiki.service import get_wiki_service
+        wiki_svc = get_wiki_service()
+        # search_wiki 走記憶體倒排索引，不再每次 glob 全目錄（get_stats 也免了）
+        wiki_results = await wiki_svc.search_wiki(wiki_query, limit=3, include_preview=True)
+        for wr in wiki_results:
+            if wr.get("hits", 0) >= 2:  # 查詢關鍵字至少出現 2 次（重疊子詞已去重；score 已改 BM25）
+                content = wr.get("preview") or await wiki_svc.read_page(wr["path"])
+                if content:
+                    sources.append({
+                        "document_id": None,
+                        "doc_number": f"[wiki:{wr['path']}]",
+                        "subject": wr.get("title", "Wiki"),
+                        # 截取前 1000 字作為上下文
+                        "content": content[:1000],
+                        "similarity": 0.95,  # 高權重確保排前
+                        "source_type": "wiki",
+                    })
+    except Exception as e:
+        logger.debug("Wiki-RAG fusion skipped: %s", e)
+    return sources
+
+
+# ========================================================================
+# 段落級檢索 — fused (向量 + BM25 單趟 CTE，RRF 融合)
+# ========================================================================
+
+# 向量路：HNSW 近鄰（ORDER BY <=> LIMIT 走索引）
+# BM25 路：documents.search_vector GIN 命中（文件級名次），每份文件取最接近查詢的 chunk
+# 兩路候選 UNION 後一次 JOIN 取回顯示欄位
+_FUSED_CANDIDATES_SQL = """
+WITH vec AS (
+    SELECT c.id AS chunk_id,
+           c.embedding <=> CAST(:embedding AS vector) AS distance
+    FROM document_chunks c
+    WHERE c.embedding IS NOT NULL
+    ORDER BY c.embedding <=> CAST(:embedding AS vector)
+    LIMIT :pool
+),
+vec_ranked AS (
+    SELECT chunk_id, distance, row_number() OVER (ORDER BY distance) AS vec_rank
+    FROM vec
+),
+lex AS (
+    {lex_body}
+),
+lex_chunk AS (
+    SELECT DISTINCT ON (c.document_id)
+           c.id AS chunk_id,
+           c.embedding <=> CAST(:embedding AS vector) AS distance
+    FROM document_chunks c
+    JOIN lex ON lex.document_id = c.document_id
+    WHERE c.embedding IS NOT NULL
+    ORDER BY c.document_id, c.embedding <=> CAST(:embedding AS vector)
+),
+cand AS (
+    SELECT chunk_id FROM vec_ranked
+    UNION
+    SELECT chunk_id FROM lex_chunk
+)
+SELECT c.id, c.document_id, c.chunk_index, c.chunk_text,
+       COALESCE(vr.distance, lc.distance) AS distance,
+       vr.vec_rank, lex.lex_rank, lex.bm25,
+       d.doc_number, d.subject, d.doc_type, d.category,
+       d.sender, d.receiver, d.doc_date
+FROM cand
+JOIN document_chunks c ON c.id = cand.chunk_id
+JOIN documents d ON d.id = c.document_id
+LEFT JOIN vec_ranked vr ON vr.chunk_id = c.id
+LEFT JOIN lex_chunk lc ON lc.chunk_id = c.id
+LEFT JOIN lex ON lex.document_id = c.document_id
+"""
+
+_LEX_BODY = """
+    SELECT d.id AS document_id,
+           ts_rank(d.search_vector, q) AS bm25,
+           row_number() OVER (ORDER BY ts_rank(d.search_vector, q) DESC, d.id) AS lex_rank
+    FROM documents d, to_tsquery('simple', :tsquery) q
+    WHERE d.search_vector @@ q
+    ORDER BY bm25 DESC, d.id
+    LIMIT :pool
+"""
+
+_LEX_EMPTY = "SELECT NULL::integer AS document_id, NULL::real AS bm25, NULL::bigint AS lex_rank WHERE false"
+
+
+def fuse_chunk_candidates(
+    rows: Sequence[Any],
+    wiki_sources: List[Dict[str, Any]],
+    top_k: int,
+    rrf_k: int,
+) -> List[Dict[str, Any]]:
+    """候選列（含 vec_rank / lex_rank）+ wiki 結果 → RRF 排序後的 RAG sources"""
+    by_key: Dict[Hashable, Dict[str, Any]] = {}
+    vec_ranks: Dict[Hashable, int] = {}
+    lex_ranks: Dict[Hashable, int] = {}
+    for row in rows:
+        key = ("chunk", row.id)
+        if row.vec_rank is not None:
+            vec_ranks[key] = int(row.vec_rank)
+        if row.lex_rank is not None:
+            lex_ranks[key] = int(row.lex_rank)
+        by_key[key] = {
+            "document_id": row.document_id,
+            "chunk_id": row.id,
+            "chunk_index": row.chunk_index,
+            "doc_number": row.doc_number or "",
+            "subject": row.subject or "",
+            "doc_type": row.doc_type or "",
+            "category": row.category or "",
+            "sender": row.sender or "",
+            "receiver": row.receiver or "",
+            "doc_date": str(row.doc_date) if row.doc_date else "",
+            "ck_note": row.chunk_text or "",
+            "similarity": max(0, 1 - (row.distance if row.distance is not None else 1)),
+            "bm25_score": float(row.bm25 or 0.0),
+        }
+    wiki_ranks: Dict[Hashable, int] = {}
+    for i, src in enumerate(wiki_sources, 1):
+        key = ("wiki", src["doc_number"])
+        wiki_ranks[key] = i
+        by_key[key] = src
+
+    scores = reciprocal_rank_fusion([vec_ranks, lex_ranks, wiki_ranks], k=rrf_k)
+    ordered = sorted(scores, key=lambda key: (-scores[key], str(key)))[:top_k]
+    fused = []
+    for key in ordered:
+        src = dict(by_key[key])
+        src["rrf_score"] = round(scores[key], 6)
+        fused.append(src)
+    return fused
+
+
+async def retrieve_chunks_fused(
+    db: AsyncSession,
+    query_embedding: List[float],
+    top_k: int,
+    query_terms: Optional[List[str]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    單趟候選查詢（向量 + BM25 CTE）與 wiki 索引並行，RRF 融合後回傳 top_k。
+
+    wiki 搜尋只碰記憶體索引，不佔用 db session，因此可與 SQL 並行。
+    """
+    config = get_ai_config()
+    timings = timings if timings is not None else {}
+    tsquery = _to_tsquery_text(query_terms)
+    sql = sa.text(_FUSED_CANDIDATES_SQL.format(lex_body=_LEX_BODY if tsquery else _LEX_EMPTY))
+    params: Dict[str, Any] = {
+        "embedding": "[" + ",".join(str(v) for v in query_embedding) + "]",
+        "pool": max(config.rag_candidate_pool, top_k * 2),
+    }
+    if tsquery:
+        params["tsquery"] = tsquery
+
+    async def _candidates() -> Sequence[Any]:
+        t = time.perf_counter()
+        # HNSW ef_search 調優 — 精確搜尋用高 recall
+        try:
+            from app.core.hnsw_config import get_hnsw_config
+            await db.execute(sa.text(get_hnsw_config().get_set_local_sql("precise")))
+        except Exception:
+            pass  # non-critical
+        rows = (await db.execute(sql, params)).fetchall()
+        timings["candidates_ms"] = round((time.perf_counter() - t) * 1000, 1)
+        return rows
+
+    async def _wiki() -> List[Dict[str, Any]]:
+        t = time.perf_counter()
+        sources = await _wiki_sources(query_terms)
+        timings["wiki_ms"] = round((time.perf_counter() - t) * 1000, 1)
+        return sources
+
+    rows, wiki_sources = await asyncio.gather(_candidates(), _wiki())
+
+    t = time.perf_counter()
+    fused = fuse_chunk_candidates(rows, wiki_sources, top_k, config.rag_rrf_k)
+    timings["fusion_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    timings["candidates"] = len(rows)
+    return fused
+
+
 # ========================================================================
 # 段落級檢索 (primary)
 # ========================================================================
@@ -154,28 +421,50 @@ async def retrieve_chunks(
     top_k: int,
     threshold: float,
     query_terms: Optional[List[str]] = None,
+    timings: Optional[Dict[str, float]] = None,
 ) -> List[Dict[str, Any]]:
     """
     段落級檢索 — 從 document_chunks 表搜尋最相關的分段
 
     優先使用 chunk-level retrieval (更精準)，
     若無 chunks 可用則 fallback 到 document-level。
+    rag_fused_retrieval 開啟時走 retrieve_chunks_fused（失敗則退回下方舊流程）。
+
+    Args:
+        timings: 若提供，寫入各階段耗時（ms）與採用的 mode，供回應 metadata 使用
     """
+    timings = timings if timings is not None else {}
+    t0 = time.perf_counter()
     try:
         from app.extended.models import DocumentChunk, OfficialDocument
-        from sqlalchemy import select as sa_select, func as sa_func, text as sa_text
+        from sqlalchemy import select as sa_select, text as sa_text
 
-        # 確認是否有 chunks
-        count_result = await db.execute(
-            sa_select(sa_func.count(DocumentChunk.id))
-        )
-        chunk_count = count_result.scalar() or 0
-        if chunk_count == 0:
+        # 確認是否有 chunks（EXISTS + TTL 快取，不再每次 COUNT(*)）
+        has_chunks = await has_embedded_chunks(db)
+        timings["chunk_check_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        if not has_chunks:
             logger.info("No document chunks available, falling back to doc-level retrieval")
+            timings["mode"] = "documents"
             return await retrieve_documents(
                 db, query_embedding, top_k, threshold, query_terms,
             )
 
+        if get_ai_config().rag_fused_retrieval:
+            try:
+                # SAVEPOINT：融合查詢的 DB 錯誤（如 to_tsquery 語法）只回滾到此，
+                # 不會讓外層交易 aborted 而連帶舊流程 / doc-level fallback 一起失敗
+                async with db.begin_nested():
+                    sources = await retrieve_chunks_fused(
+                        db, query_embedding, top_k, query_terms, timings,
+                    )
+                if sources:
+                    timings["mode"] = "fused"
+                    timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                    return sources
+            except Exception as e:
+                logger.warning("Fused retrieval failed, using legacy chunk retrieval: %s", e)
+            timings["mode"] = "legacy"
+
         # pgvector cosine distance search on chunks
         if not hasattr(DocumentChunk, 'embedding'):
             return await retrieve_documents(
@@ -259,29 +548,11 @@ async def retrieve_chunks(
 
         # Wiki-RAG 融合: 啟用 (v1.1 — wiki 內容由 DB 結構化編譯，可信度 high)
         # 將 wiki 搜尋結果追加到 RAG sources，boost 權重使 wiki 優先
-        try:
-            from app.services.wiki.service import get_wiki_service
-            wiki_svc = get_wiki_service()
-            wiki_query = " ".join(query_terms[:5]) if query_terms else ""
-            if wiki_query and wiki_svc.get_stats().get("total", 0) > 0:
-                wiki_results = await wiki_svc.search_wiki(wiki_query, limit=3)
-                for wr in wiki_results:
-                    if wr.get("score", 0) >= 2:  # 至少 2 個關鍵字命中
-                        content = await wiki_svc.read_page(wr["path"])
-                        if content:
-                            # 截取前 1000 字作為上下文
-                            snippet = content[:1000]
-                            sources.insert(0, {
-                                "document_id": None,
-                                "doc_number": f"[wiki:{wr['path']}]",
-                                "subject": wr.get("title", "Wiki"),
-                                "content": snippet,
-                                "similarity": 0.95,  # 高權重確保排前
-                                "source_type": "wiki",
-                            })
-        except Exception as e:
-            logger.debug("Wiki-RAG fusion skipped: %s", e)
+        for wiki_src in await _wiki_sources(query_terms):
+            sources.insert(0, wiki_src)
 
+        timings.setdefault("mode", "legacy")
+        timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
         return sources[:top_k]
 
     except Exception as e:
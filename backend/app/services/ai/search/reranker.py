@@ -8,14 +8,17 @@
 
 最終分數 = w_vector * vector_sim + w_keyword * keyword_score + w_llm * llm_score
 
-Version: 2.0.0
+Version: 2.1.0
 Created: 2026-02-26
 Updated: 2026-04-05 - v2.0.0 Gemma 4 預設 reranking + adaptive weights + quick rerank
+Updated: 2026-10-16 - v2.1.0 KeywordScorer 批次向量化關鍵字評分（數百筆候選 < 1ms 級）
 """
 
 import logging
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +68,125 @@ def _adaptive_weights(query_terms: List[str]) -> Tuple[float, float, float]:
         return (0.6, 0.2, 0.2)  # semantic-heavy for recall
 
 
+# 部分匹配（bigram 命中）打折係數
+PARTIAL_MATCH_FACTOR = 0.3
+
+# 串接候選文字用的分隔字元（不會出現在查詢詞中，避免跨文件誤命中）
+_DOC_SEPARATOR = "\x00"
+
+# BMP 小寫對照表（code point → 小寫 code point），首次使用時建立
+_LOWER_TABLE: Optional[np.ndarray] = None
+
+
+def _lower_table() -> np.ndarray:
+    global _LOWER_TABLE
+    if _LOWER_TABLE is None:
+        table = np.arange(0x10000, dtype=np.uint32)
+        for c in range(0x10000):
+            low = chr(c).lower()
+            # 展開成多字元的極少數字母（如 U+0130）維持原字元
+            if len(low) == 1 and low != chr(c):
+                table[c] = ord(low)
+        _LOWER_TABLE = table
+    return _LOWER_TABLE
+
+
+def _lower_codes(text: str) -> np.ndarray:
+    """文字 → 小寫後的 code point 陣列（uint32）"""
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    table = _lower_table()
+    if len(codes) and int(codes.max()) >= 0x10000:
+        return np.where(codes < 0x10000, np.take(table, codes & 0xFFFF), codes)
+    return np.take(table, codes)
+
+
+def _lower(text: str) -> str:
+    return _lower_codes(text).tobytes().decode("utf-32-le", "surrogatepass")
+
+
+class KeywordScorer:
+    """
+    關鍵字覆蓋度批次評分器 — 查詢詞預編譯一次，整批候選一次評分
+
+    策略（與逐筆版語意相同）：
+    - 精確匹配：查詢詞完全出現在文件中 → 權重全額
+    - 部分匹配：>= 3 字的詞未精確命中，但任一 bigram 出現 → 權重 × 0.3
+    - IDF-like 權重：min(len / 2, 3)，較長的詞較重要
+
+    實作：所有 pattern（詞 + 預先展開的 bigram）去重後轉成 code point 陣列；
+    候選文字串接後一次編碼 + 查表小寫，每個 pattern 以前兩字雜湊
+    向量比對找出候選位置、再逐字過濾 → (文件 × pattern) 命中矩陣，分數為矩陣運算。
+    """
+
+    def __init__(self, query_terms: Sequence[str]):
+        terms = [_lower(t) for t in (query_terms or []) if t not in _STOPWORDS and len(t) >= 2]
+        self.terms = terms
+        self.weights = np.array([min(len(t) / 2.0, 3.0) for t in terms], dtype=np.float64)
+        self.max_possible = float(self.weights.sum())
+
+        patterns: Dict[str, int] = {}
+        self._term_cols = np.array([patterns.setdefault(t, len(patterns)) for t in terms], dtype=np.int64)
+        # bigram_map[k, j] = 1 ⇔ pattern j 是詞 k 的 bigram（僅 >= 3 字的詞有部分匹配）
+        bigram_pairs: List[Tuple[int, int]] = []
+        for k, t in enumerate(terms):
+            if len(t) >= 3:
+                for i in range(len(t) - 1):
+                    bigram_pairs.append((k, patterns.setdefault(t[i:i + 2], len(patterns))))
+        self.patterns = list(patterns)
+        self._bigram_map = np.zeros((len(terms), len(self.patterns)), dtype=bool)
+        for k, j in bigram_pairs:
+            self._bigram_map[k, j] = True
+        self._pattern_codes = [
+            np.frombuffer(p.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+            for p in self.patterns
+        ]
+
+    def _presence(self, texts: Sequence[str]) -> np.ndarray:
+        """(文件 × pattern) 命中矩陣"""
+        n = len(texts)
+        hit = np.zeros((n, len(self.patterns)), dtype=bool)
+        if n == 0 or not self.patterns:
+            return hit
+        texts = [t or "" for t in texts]
+        codes = _lower_codes(_DOC_SEPARATOR.join(texts))
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=n)
+        doc_of = np.repeat(np.arange(n), lengths)[:len(codes)]
+        total = len(codes)
+        if total < 2:
+            return hit
+        # 相鄰兩字雜湊成 uint32：每個 pattern 以前兩字一次向量比對定位，
+        # 碰撞由後續逐字比對排除
+        pairs = (codes[:-1] << np.uint32(16)) ^ codes[1:]
+        for j, pat in enumerate(self._pattern_codes):
+            size = len(pat)
+            if size > total:
+                continue
+            head = (pat[0] << np.uint32(16)) ^ pat[1]
+            pos = np.flatnonzero(pairs[:total - size + 1] == head)
+            for k in range(size):
+                if not len(pos):
+                    break
+                pos = pos[codes[pos + k] == pat[k]]
+            if len(pos):
+                hit[doc_of[pos], j] = True
+        return hit
+
+    def score_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """整批文字 → 關鍵字覆蓋度分數 (0-1)，float64 array"""
+        if self.max_possible <= 0:
+            return np.zeros(len(texts), dtype=np.float64)
+        hit = self._presence(texts)
+        exact = hit[:, self._term_cols]                                # (n, terms)
+        partial = (hit[:, None, :] & self._bigram_map[None, :, :]).any(axis=2) & ~exact
+        raw = exact @ self.weights + (partial @ self.weights) * PARTIAL_MATCH_FACTOR
+        return np.minimum(raw / self.max_possible, 1.0)
+
+
+def compute_keyword_scores(query_terms: List[str], doc_texts: Sequence[str]) -> np.ndarray:
+    """批次計算關鍵字覆蓋度分數（見 KeywordScorer）"""
+    return KeywordScorer(query_terms).score_texts(doc_texts)
+
+
 def compute_keyword_score(
     query_terms: List[str],
     doc_text: str,
@@ -76,39 +198,12 @@ def compute_keyword_score(
     - 精確匹配：查詢詞完全出現在文件中 → 高分
     - 部分匹配：查詢詞的子字串出現 → 部分分
     - IDF 加權：罕見詞命中比常見詞更重要
+
+    單筆入口；多筆請用 compute_keyword_scores / KeywordScorer。
     """
     if not query_terms or not doc_text:
         return 0.0
-
-    # 過濾停用詞
-    effective_terms = [t for t in query_terms if t not in _STOPWORDS and len(t) >= 2]
-    if not effective_terms:
-        return 0.0
-
-    doc_lower = doc_text.lower()
-    total_score = 0.0
-    max_possible = 0.0
-
-    for term in effective_terms:
-        term_lower = term.lower()
-        # 較長的詞給予更高權重 (IDF-like)
-        weight = min(len(term_lower) / 2.0, 3.0)
-        max_possible += weight
-
-        if term_lower in doc_lower:
-            # 精確匹配
-            total_score += weight
-        else:
-            # 部分匹配 — 超過 2 字的詞，檢查是否有部分重疊
-            if len(term_lower) >= 3:
-                # 滑動窗口檢查
-                for i in range(len(term_lower) - 1):
-                    bigram = term_lower[i:i + 2]
-                    if bigram in doc_lower:
-                        total_score += weight * 0.3  # 部分匹配打折
-                        break
-
-    return min(total_score / max_possible, 1.0) if max_possible > 0 else 0.0
+    return float(compute_keyword_scores(query_terms, [doc_text])[0])
 
 
 def build_doc_text(doc: Dict[str, Any]) -> str:
@@ -157,23 +252,22 @@ def rerank_documents(
     else:
         v_w, k_w = W_VECTOR, W_KEYWORD
 
-    scored = []
-    for doc in documents:
-        vector_sim = float(doc.get("similarity", 0))
-        doc_text = build_doc_text(doc)
-        keyword_score = compute_keyword_score(query_terms, doc_text)
-
-        # 混合分數
-        final_score = (
-            v_w * vector_sim
-            + k_w * keyword_score
-        )
+    # 整批評分：查詢詞只編譯一次
+    keyword_scores = compute_keyword_scores(query_terms, [build_doc_text(d) for d in documents])
+    vector_sims = np.fromiter(
+        (float(d.get("similarity", 0)) for d in documents), dtype=np.float64, count=len(documents),
+    )
+    # 混合分數
+    final_scores = v_w * vector_sims + k_w * keyword_scores
 
-        scored.append({
+    scored = [
+        {
             **doc,
-            "rerank_score": round(final_score, 4),
-            "keyword_score": round(keyword_score, 4),
-        })
+            "rerank_score": round(float(final_score), 4),
+            "keyword_score": round(float(keyword_score), 4),
+        }
+        for doc, final_score, keyword_score in zip(documents, final_scores, keyword_scores)
+    ]
 
     # 按混合分數降序排列
     scored.sort(key=lambda d: d["rerank_score"], reverse=True)
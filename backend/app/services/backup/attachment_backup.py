@@ -13,6 +13,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, Iterator
 
+from .dump_engine import iter_db_backups, remove_backup
+
 logger = logging.getLogger(__name__)
 
 
@@ -196,7 +198,7 @@ class AttachmentBackupMixin:
         清理過期備份
 
         策略：
-        - 資料庫：刪除超過 retention_days 的 .sql 檔案，至少保留 1 個
+        - 資料庫：刪除超過 retention_days 的備份（含 manifest），至少保留 1 個
         - 附件：保留 attachments_latest（增量備份），清理舊的 manifest
         - 舊版附件目錄：清理遺留的 attachments_backup_* 目錄，至少保留 1 個
         """
@@ -204,14 +206,14 @@ class AttachmentBackupMixin:
 
         # 清理資料庫備份 — 至少保留 1 個（防止備份失敗期間全部清空）
         db_backups = sorted(
-            self.backup_dir.glob("ck_missive_backup_*.sql"),
+            iter_db_backups(self.backup_dir),
             key=self._safe_mtime,
             reverse=True,
         )
         for backup_file in db_backups[1:]:  # 跳過最新的 1 個
             try:
                 if datetime.fromtimestamp(backup_file.stat().st_mtime) < cutoff:
-                    backup_file.unlink()
+                    remove_backup(backup_file)
                     logger.info(f"已清理過期資料庫備份: {backup_file.name}")
             except OSError as e:
                 logger.warning(f"清理資料庫備份失敗: {backup_file.name}: {e}")
@@ -7,15 +7,25 @@ L49 (2026-05-27): 從 docker CLI subprocess 改 pg_dump 直連
 - 修法：backend image 加裝 postgresql-client，pg_dump 走 docker network 直連 postgres:5432
 - backwards-compat：API 回應欄位 docker_available / docker_path 保留（鏡像 pg_dump 值）
 
-@version 2.0.0
-@date 2026-05-27
+v3.0.0 (2026-10-16): pg_dump / psql 改走 dump_engine 非同步串流
+- 原 subprocess.run(capture_output=True) 在 async 方法內阻塞 event loop，整份 dump 留在記憶體
+- 備份串流壓縮落盤（預設 zstd → .sql.zst），可選 directory 格式 -j 並行
+- 每份備份旁寫 .manifest.json（大小、壓縮比、耗時、吞吐量）；還原同樣串流
+
+@version 3.0.0
+@date 2026-10-16
 """
 
 import asyncio
 import logging
 import os
-import subprocess
-from typing import Any, Dict
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from . import dump_engine
+from .dump_engine import DumpError, DumpOptions, load_dump_options
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +39,30 @@ class DatabaseBackupMixin:
         env["PGPASSWORD"] = self.db_password
         return env
 
+    def _get_dump_options(self) -> DumpOptions:
+        """串流備份設定（首次使用時由環境變數載入）"""
+        options = getattr(self, "_dump_options", None)
+        if options is None:
+            options = self._dump_options = load_dump_options()
+        return options
+
+    def _pg_client_path(self, name: str) -> str:
+        """psql / pg_restore 路徑：優先與 pg_dump 同目錄（同版本），回退 PATH 搜尋"""
+        sibling = Path(self._pg_dump_path).with_name(name)
+        if sibling.parent != Path(".") and sibling.exists():
+            return str(sibling)
+        return shutil.which(name) or name
+
+    def _pg_conn_args(self) -> List[str]:
+        return [
+            "-h", self.db_host,
+            "-p", str(self.db_port),
+            "-U", self.db_user,
+            "-d", self.db_name,
+        ]
+
     async def _backup_database(self, timestamp: str) -> Dict[str, Any]:
-        """備份資料庫 — pg_dump 直連 PostgreSQL（取代 docker exec）"""
+        """備份資料庫 — pg_dump 直連 PostgreSQL，串流壓縮落盤（見 dump_engine）"""
         # 預先檢查 pg_dump 可用性
         if not self._pg_dump_available:
             return {
@@ -41,75 +73,28 @@ class DatabaseBackupMixin:
                 ),
             }
 
-        backup_file = self.backup_dir / f"ck_missive_backup_{timestamp}.sql"
-
+        options = self._get_dump_options()
         try:
-            result = subprocess.run(
-                [
-                    self._pg_dump_path,
-                    "-h", self.db_host,
-                    "-p", str(self.db_port),
-                    "-U", self.db_user,
-                    "-d", self.db_name,
-                    "--no-owner",
-                    "--no-acl",
-                ],
-                capture_output=True,
-                text=True,
-                timeout=300,
-                env=self._build_pg_env(),
-                encoding="utf-8",
-                errors="replace",
+            result = await dump_engine.dump_database(
+                [self._pg_dump_path, *self._pg_conn_args(), "--no-owner", "--no-acl"],
+                self._build_pg_env(),
+                self.backup_dir,
+                timestamp,
+                options,
             )
-
-            if result.returncode == 0:
-                dump_data = result.stdout or ""
-                if not dump_data.strip():
-                    return {
-                        "success": False,
-                        "error": (
-                            f"pg_dump 返回空資料 (returncode=0, "
-                            f"stderr={result.stderr or 'N/A'})"
-                        ),
-                    }
-
-                # 寫入備份檔案
-                with open(backup_file, "w", encoding="utf-8") as f:
-                    f.write(dump_data)
-
-                file_size = backup_file.stat().st_size
-
-                # 備份完整性驗證
-                if file_size < 1024:
-                    logger.warning(f"備份檔案異常小: {file_size} bytes")
-
-                # 驗證 SQL dump 完整性（檢查結尾標記）
-                with open(backup_file, "r", encoding="utf-8") as f:
-                    f.seek(max(0, file_size - 500))
-                    tail = f.read()
-                    if "PostgreSQL database dump complete" not in tail:
-                        logger.warning("備份檔案可能不完整: 未找到結尾標記")
-                        return {
-                            "success": False,
-                            "error": "備份檔案不完整（缺少 pg_dump 結尾標記）",
-                        }
-
-                return {
-                    "success": True,
-                    "file": str(backup_file),
-                    "filename": backup_file.name,
-                    "size_bytes": file_size,
-                    "size_kb": round(file_size / 1024, 2),
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"pg_dump failed: {result.stderr}",
-                }
-
-        except subprocess.TimeoutExpired:
-            return {"success": False, "error": "Backup timeout (300s)"}
-        except FileNotFoundError:
+            logger.info(
+                f"資料庫備份完成: {result['filename']} "
+                f"({result['size_kb']} KB, {result['duration_seconds']}s, "
+                f"{result['throughput_mb_s']} MB/s)"
+            )
+            return result
+        except DumpError as e:
+            return {"success": False, "error": str(e)}
+        except FileNotFoundError as e:
+            if e.filename not in (None, self._pg_dump_path):
+                # 備份目錄 / 暫存檔不見了，不是 pg_dump 本身缺失，不可停用後續備份
+                logger.error(f"pg_dump backup failed: {e}")
+                return {"success": False, "error": str(e)}
             # pg_dump 不在 PATH，標記為不可用
             self._pg_dump_available = False
             self._docker_available = False  # compat 鏡像
@@ -154,61 +139,42 @@ class DatabaseBackupMixin:
         }
 
     async def restore_database(self, backup_name: str) -> Dict[str, Any]:
-        """還原資料庫 — psql 直連（取代 docker exec）"""
+        """還原資料庫 — 串流解壓餵 psql；directory 格式走 pg_restore -j"""
         backup_file = self.backup_dir / backup_name
 
         if not backup_file.exists():
             return {"success": False, "error": "Backup file not found"}
 
-        # psql 通常與 pg_dump 同套件，回退到 PATH 搜尋
-        import shutil
-        psql_path = shutil.which("psql") or "psql"
+        tool = "pg_restore" if backup_file.is_dir() else "psql"
+        tool_path = self._pg_client_path(tool)
+        conn_args = self._pg_conn_args()
 
         try:
-            # 讀取備份內容
-            with open(backup_file, "r", encoding="utf-8") as f:
-                sql_content = f.read()
-
-            result = subprocess.run(
-                [
-                    psql_path,
-                    "-h", self.db_host,
-                    "-p", str(self.db_port),
-                    "-U", self.db_user,
-                    "-d", self.db_name,
-                ],
-                input=sql_content,
-                capture_output=True,
-                text=True,
-                timeout=600,
-                env=self._build_pg_env(),
-                encoding="utf-8",
-                errors="replace",
+            stats = await dump_engine.restore_database(
+                backup_file,
+                [self._pg_client_path("psql"), *conn_args],
+                [self._pg_client_path("pg_restore"), *conn_args, "--no-owner", "--no-acl"],
+                self._build_pg_env(),
+                self._get_dump_options(),
             )
-
-            if result.returncode == 0:
-                return {
-                    "success": True,
-                    "message": f"Database restored from {backup_name}",
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Restore failed: {result.stderr}",
-                }
-
-        except subprocess.TimeoutExpired:
-            return {"success": False, "error": "Restore timeout"}
+            return {
+                "success": True,
+                "message": f"Database restored from {backup_name}",
+                "duration_seconds": stats["duration_seconds"],
+                "throughput_mb_s": stats["throughput_mb_s"],
+            }
+        except DumpError as e:
+            return {"success": False, "error": str(e)}
         except FileNotFoundError:
             return {
                 "success": False,
                 "error": (
-                    f"psql 找不到 (路徑: {psql_path})，"
+                    f"{tool} 找不到 (路徑: {tool_path})，"
                     "請確認 backend image 已安裝 postgresql-client"
                 ),
             }
         except Exception as e:
-            logger.error("psql restore failed", exc_info=True, extra={"db_host": self.db_host})
+            logger.error(f"{tool} restore failed", exc_info=True, extra={"db_host": self.db_host})
             return {"success": False, "error": str(e)}
 
     async def get_backup_config(self) -> Dict[str, Any]:
@@ -229,14 +195,28 @@ class DatabaseBackupMixin:
         }
 
     async def cleanup_orphan_files(self) -> Dict[str, Any]:
-        """清理 0-byte 孤立備份檔案"""
+        """清理 0-byte 孤立備份檔案與中斷備份留下的 .partial 暫存
+
+        .partial 最後修改時間在備份逾時內的可能仍在寫入，保留（刪掉會讓進行中
+        的備份在 rename 時失敗）；超過逾時的 pg_dump 必已被終止，可安全刪除。
+        """
         cleaned = []
-        for f in self.backup_dir.glob("ck_missive_backup_*.sql"):
+        in_flight_after = time.time() - self._get_dump_options().timeout
+        for f in self.backup_dir.glob("ck_missive_backup_*"):
             try:
-                if f.stat().st_size == 0:
-                    f.unlink()
-                    cleaned.append(f.name)
-                    logger.info(f"已清理 0-byte 孤立檔案: {f.name}")
+                if f.name.endswith(dump_engine.PARTIAL_SUFFIX):
+                    if f.stat().st_mtime > in_flight_after:
+                        continue
+                    if f.is_dir():
+                        shutil.rmtree(f)
+                    else:
+                        f.unlink()
+                elif f.is_file() and dump_engine.split_backup_name(f.name) and f.stat().st_size == 0:
+                    dump_engine.remove_backup(f)
+                else:
+                    continue
+                cleaned.append(f.name)
+                logger.info(f"已清理孤立檔案: {f.name}")
             except OSError as e:
                 logger.warning(f"清理檔案失敗 {f.name}: {e}")
 
@@ -244,7 +224,7 @@ class DatabaseBackupMixin:
             await self._log_backup_operation(
                 action="cleanup",
                 status="success",
-                details=f"清理 {len(cleaned)} 個 0-byte 孤立檔案",
+                details=f"清理 {len(cleaned)} 個孤立備份檔案",
                 operator="admin",
             )
 
@@ -0,0 +1,496 @@
+"""
+資料庫串流備份引擎 — pg_dump / psql / pg_restore 非同步串流
+
+原 `_backup_database` 以阻塞的 subprocess.run(capture_output=True, text=True)
+在 async 方法內執行 pg_dump：整段 dump 期間 event loop 凍結，且整份 SQL 先以
+Python 字串留在記憶體再寫檔（資料庫 + pgvector 欄位成長後有 OOM 風險）；
+還原同樣整檔讀進記憶體再餵 psql。
+
+本模組：
+- plain 格式：asyncio subprocess 讀 pg_dump stdout，累積 CHUNK_SIZE 後交給
+  worker thread 壓縮寫檔（zstd / gzip / none），讀下一塊與壓縮上一塊重疊進行；
+  寫到 `.partial` 暫存檔，完成且通過結尾標記驗證才 rename
+- directory 格式：pg_dump -Fd -j N（各資料表並行 dump，檔案由 pg_dump 自行壓縮）
+- 每份備份旁寫 `<stem>.manifest.json`：格式、壓縮、原始 / 壓縮後大小、耗時、吞吐量
+- 還原：plain 逐塊解壓 → psql stdin（drain 背壓）；directory → pg_restore -j N
+- stderr 只保留尾段（避免大量 NOTICE 佔記憶體）
+
+設定（環境變數）：
+  BACKUP_DB_FORMAT             plain | directory（預設 plain）
+  BACKUP_DB_COMPRESSION        zstd | gzip | none（預設 zstd；未安裝 zstandard 退回 gzip）
+  BACKUP_DB_COMPRESSION_LEVEL  預設 zstd 3 / gzip 6
+  BACKUP_DB_JOBS               directory 格式並行數（預設 2）
+  BACKUP_DB_TIMEOUT            pg_dump 逾時秒數（預設 300）
+  BACKUP_DB_RESTORE_TIMEOUT    還原逾時秒數（預設 600）
+
+BACKUP_DB_COMPRESSION=none 可回到舊版 `.sql` 純文字輸出；host 端 db_restore.ps1 /
+db_backup.ps1 / offsite_backup_completeness_audit.py 皆可讀 .sql.gz / .sql.zst 並略過 manifest。
+directory 格式的 `-Fd --compress=zstd` 需 pg_dump 16 以上。
+
+@version 1.0.0
+@date 2026-10-16
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - requirements 已列，僅防精簡映像
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "ck_missive_backup_"
+FILE_SUFFIXES = {"none": ".sql", "gzip": ".sql.gz", "zstd": ".sql.zst"}
+DIRECTORY_SUFFIX = ".dir"
+PARTIAL_SUFFIX = ".partial"
+MANIFEST_SUFFIX = ".manifest.json"
+
+DUMP_COMPLETE_MARKER = b"PostgreSQL database dump complete"
+DEFAULT_LEVELS = {"zstd": 3, "gzip": 6, "none": 0}
+
+# 每次交給壓縮執行緒的資料量；stderr 與 dump 結尾各保留的位元組
+CHUNK_SIZE = 1 << 20
+TAIL_BYTES = 4096
+
+
+class DumpError(Exception):
+    """備份 / 還原失敗（訊息直接回給 API）"""
+
+
+@dataclass(frozen=True)
+class DumpOptions:
+    format: str = "plain"
+    compression: str = "zstd"
+    level: Optional[int] = None
+    jobs: int = 2
+    timeout: float = 300.0
+    restore_timeout: float = 600.0
+
+    @property
+    def compression_level(self) -> int:
+        return DEFAULT_LEVELS[self.compression] if self.level is None else self.level
+
+
+def load_dump_options() -> DumpOptions:
+    """讀取預設值並套用環境變數覆寫（無效值沿用預設）。"""
+    base = DumpOptions()
+
+    def _choice(key: str, default: str, allowed: Sequence[str]) -> str:
+        raw = os.getenv(key, "").strip().lower()
+        if not raw:
+            return default
+        if raw not in allowed:
+            logger.warning("%s=%r 無效，沿用預設 %s", key, raw, default)
+            return default
+        return raw
+
+    def _num(key: str, default, cast):
+        raw = os.getenv(key)
+        if not raw:
+            return default
+        try:
+            return cast(raw)
+        except ValueError:
+            logger.warning("%s=%r 無效，沿用預設 %s", key, raw, default)
+            return default
+
+    compression = _choice("BACKUP_DB_COMPRESSION", base.compression, tuple(FILE_SUFFIXES))
+    if compression == "zstd" and zstandard is None:
+        logger.warning("zstandard 未安裝，資料庫備份壓縮改用 gzip")
+        compression = "gzip"
+    return replace(
+        base,
+        format=_choice("BACKUP_DB_FORMAT", base.format, ("plain", "directory")),
+        compression=compression,
+        level=_num("BACKUP_DB_COMPRESSION_LEVEL", base.level, int),
+        jobs=max(1, _num("BACKUP_DB_JOBS", base.jobs, int)),
+        timeout=_num("BACKUP_DB_TIMEOUT", base.timeout, float),
+        restore_timeout=_num("BACKUP_DB_RESTORE_TIMEOUT", base.restore_timeout, float),
+    )
+
+
+# =========================================================================
+# 備份檔命名
+# =========================================================================
+
+def split_backup_name(name: str) -> Optional[tuple]:
+    """`ck_missive_backup_<ts><suffix>` → (stem, suffix)；非備份名稱回 None。"""
+    if not name.startswith(BACKUP_PREFIX):
+        return None
+    for suffix in (*FILE_SUFFIXES.values(), DIRECTORY_SUFFIX):
+        if name.endswith(suffix) and len(name) > len(BACKUP_PREFIX) + len(suffix):
+            stem = name[: -len(suffix)]
+            if "." not in stem:
+                return stem, suffix
+    return None
+
+
+def iter_db_backups(backup_dir: Path) -> List[Path]:
+    """資料庫備份（單檔與 directory 格式），新到舊；不含 .partial 與 manifest。"""
+    if not backup_dir.exists():
+        return []
+    found = []
+    for path in backup_dir.glob(f"{BACKUP_PREFIX}*"):
+        parsed = split_backup_name(path.name)
+        if parsed is None:
+            continue
+        if (parsed[1] == DIRECTORY_SUFFIX) != path.is_dir():
+            continue
+        found.append(path)
+    return sorted(found, key=lambda p: p.name, reverse=True)
+
+
+def manifest_path_for(backup: Path) -> Path:
+    parsed = split_backup_name(backup.name)
+    stem = parsed[0] if parsed else backup.name
+    return backup.with_name(stem + MANIFEST_SUFFIX)
+
+
+def read_manifest(backup: Path) -> Dict[str, Any]:
+    try:
+        with open(manifest_path_for(backup), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def backup_size(path: Path) -> int:
+    """單檔大小或 directory 格式全部檔案大小總和。"""
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+def remove_backup(path: Path) -> None:
+    """刪除備份本體與其 manifest。"""
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+    manifest_path_for(path).unlink(missing_ok=True)
+
+
+# =========================================================================
+# 壓縮 / 解壓串流（同步，於 worker thread 執行）
+# =========================================================================
+
+class _CompressedWriter:
+    """逐塊寫入並壓縮；close() 後 written 為落盤位元組數。"""
+
+    def __init__(self, path: Path, compression: str, level: int):
+        self._raw = open(path, "wb")
+        if compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=level).stream_writer(
+                self._raw, closefd=False,
+            )
+        elif compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=level)
+        else:
+            self._stream = None
+        self.written = 0
+
+    def write(self, data: bytes) -> None:
+        (self._stream or self._raw).write(data)
+
+    def close(self) -> None:
+        try:
+            if self._stream is not None:
+                self._stream.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+            self.written = self._raw.tell()
+        finally:
+            self._raw.close()
+
+
+def open_backup_reader(path: Path) -> BinaryIO:
+    """依副檔名開啟解壓後的位元組串流。"""
+    if path.name.endswith(FILE_SUFFIXES["zstd"]):
+        if zstandard is None:
+            raise DumpError("還原 .zst 備份需要 zstandard 套件")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    if path.name.endswith(FILE_SUFFIXES["gzip"]):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+# =========================================================================
+# 子行程工具
+# =========================================================================
+
+async def _read_tail(stream: Optional[asyncio.StreamReader], limit: int = TAIL_BYTES) -> bytes:
+    """讀完整個 stream，只保留最後 limit 位元組（stream 為 None 時回空）。"""
+    tail = b""
+    if stream is None:
+        return tail
+    while chunk := await stream.read(65536):
+        tail = (tail + chunk)[-limit:]
+    return tail
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace").strip()
+
+
+def _stats(started: float, raw_bytes: Optional[int], size_bytes: int) -> Dict[str, Any]:
+    duration = max(time.perf_counter() - started, 1e-6)
+    moved = raw_bytes if raw_bytes is not None else size_bytes
+    return {
+        "raw_bytes": raw_bytes,
+        "size_bytes": size_bytes,
+        "size_kb": round(size_bytes / 1024, 2),
+        "compression_ratio": round(raw_bytes / size_bytes, 2) if raw_bytes and size_bytes else None,
+        "duration_seconds": round(duration, 3),
+        "throughput_mb_s": round(moved / duration / (1024 * 1024), 2),
+    }
+
+
+# =========================================================================
+# 備份
+# =========================================================================
+
+async def dump_database(
+    pg_dump_argv: Sequence[str],
+    env: Dict[str, str],
+    backup_dir: Path,
+    timestamp: str,
+    options: DumpOptions,
+) -> Dict[str, Any]:
+    """執行 pg_dump 並串流落盤；成功回傳檔案資訊 + 統計並寫 manifest。
+
+    pg_dump_argv 為不含輸出格式參數的連線 argv（pg_dump 路徑 + -h/-p/-U/-d 等）。
+    失敗拋 DumpError；pg_dump 不存在時拋 FileNotFoundError（filename 為 pg_dump 路徑）。
+    """
+    stem = f"{BACKUP_PREFIX}{timestamp}"
+    started = time.perf_counter()
+    if options.format == "directory":
+        final = backup_dir / f"{stem}{DIRECTORY_SUFFIX}"
+        raw_bytes, size_bytes = await _dump_directory(pg_dump_argv, env, final, options)
+    else:
+        final = backup_dir / f"{stem}{FILE_SUFFIXES[options.compression]}"
+        raw_bytes, size_bytes = await _dump_plain(pg_dump_argv, env, final, options)
+
+    result = {
+        "success": True,
+        "file": str(final),
+        "filename": final.name,
+        "format": options.format,
+        "compression": options.compression,
+        "compression_level": options.compression_level,
+        "jobs": options.jobs if options.format == "directory" else 1,
+        **_stats(started, raw_bytes, size_bytes),
+    }
+    manifest = {"timestamp": timestamp, **{k: v for k, v in result.items() if k != "success"}}
+    manifest_path = manifest_path_for(final)
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    result["manifest"] = manifest_path.name
+    return result
+
+
+async def _dump_plain(
+    argv: Sequence[str], env: Dict[str, str], final: Path, options: DumpOptions,
+) -> tuple:
+    partial = final.with_name(final.name + PARTIAL_SUFFIX)
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=env,
+    )
+    stderr_task = asyncio.create_task(_read_tail(proc.stderr))
+    writer = await asyncio.to_thread(
+        _CompressedWriter, partial, options.compression, options.compression_level,
+    )
+    raw_bytes = 0
+    tail = b""
+    pending: Optional[asyncio.Future] = None
+    ok = False
+    try:
+        async with asyncio.timeout(options.timeout):
+            while True:
+                buf = bytearray()
+                while len(buf) < CHUNK_SIZE:
+                    data = await proc.stdout.read(CHUNK_SIZE - len(buf))
+                    if not data:
+                        break
+                    buf += data
+                if pending is not None:
+                    await pending  # 上一塊壓縮完才送下一塊（保序、記憶體上限 2 塊）
+                    pending = None
+                if not buf:
+                    break
+                chunk = bytes(buf)
+                raw_bytes += len(chunk)
+                tail = (tail + chunk[-TAIL_BYTES:])[-TAIL_BYTES:]
+                pending = asyncio.ensure_future(asyncio.to_thread(writer.write, chunk))
+            returncode = await proc.wait()
+            stderr = await stderr_task
+        if returncode != 0:
+            raise DumpError(f"pg_dump failed: {_decode(stderr)}")
+        if raw_bytes == 0:
+            raise DumpError(
+                f"pg_dump 返回空資料 (returncode=0, stderr={_decode(stderr) or 'N/A'})"
+            )
+        # 備份完整性驗證（檢查結尾標記，直接看串流尾段，不必回讀檔案）
+        if DUMP_COMPLETE_MARKER not in tail:
+            logger.warning("備份檔案可能不完整: 未找到結尾標記")
+            raise DumpError("備份檔案不完整（缺少 pg_dump 結尾標記）")
+        ok = True
+    except TimeoutError:
+        raise DumpError(f"Backup timeout ({options.timeout:.0f}s)") from None
+    finally:
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+        await _kill(proc)
+        if not stderr_task.done():
+            stderr_task.cancel()
+        await asyncio.to_thread(writer.close)
+        if not ok:
+            partial.unlink(missing_ok=True)
+
+    if raw_bytes < 1024:
+        logger.warning(f"備份檔案異常小: {raw_bytes} bytes")
+    _commit_partial(partial, final)
+    return raw_bytes, writer.written
+
+
+def _commit_partial(partial: Path, final: Path) -> None:
+    """.partial rename 為正式檔名；暫存在完成前被移除時拋 DumpError（不是 pg_dump 不存在）"""
+    try:
+        partial.replace(final)
+    except FileNotFoundError:
+        raise DumpError(f"備份暫存檔在完成前被移除: {partial.name}") from None
+
+
+def _directory_compress_args(options: DumpOptions) -> List[str]:
+    if options.compression == "zstd":
+        return [f"--compress=zstd:{options.compression_level}"]
+    if options.compression == "gzip":
+        return [f"--compress={options.compression_level}"]
+    return ["--compress=0"]
+
+
+async def _dump_directory(
+    argv: Sequence[str], env: Dict[str, str], final: Path, options: DumpOptions,
+) -> tuple:
+    partial = final.with_name(final.name + PARTIAL_SUFFIX)
+    if partial.exists():
+        shutil.rmtree(partial)
+    proc = await asyncio.create_subprocess_exec(
+        *argv, "-Fd", "-j", str(options.jobs), "-f", str(partial),
+        *_directory_compress_args(options),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE, env=env,
+    )
+    ok = False
+    try:
+        async with asyncio.timeout(options.timeout):
+            stderr = await _read_tail(proc.stderr)
+            returncode = await proc.wait()
+        if returncode != 0:
+            raise DumpError(f"pg_dump failed: {_decode(stderr)}")
+        if not (partial / "toc.dat").exists():
+            raise DumpError("備份目錄不完整（缺少 toc.dat）")
+        ok = True
+    except TimeoutError:
+        raise DumpError(f"Backup timeout ({options.timeout:.0f}s)") from None
+    finally:
+        await _kill(proc)
+        if not ok and partial.exists():
+            await asyncio.to_thread(shutil.rmtree, partial, True)
+
+    _commit_partial(partial, final)
+    return None, await asyncio.to_thread(backup_size, final)
+
+
+# =========================================================================
+# 還原
+# =========================================================================
+
+async def restore_database(
+    backup: Path,
+    psql_argv: Sequence[str],
+    pg_restore_argv: Sequence[str],
+    env: Dict[str, str],
+    options: DumpOptions,
+) -> Dict[str, Any]:
+    """串流還原；directory 格式走 pg_restore -j，其餘解壓後餵 psql stdin。
+
+    失敗拋 DumpError；psql / pg_restore 不存在時拋 FileNotFoundError。
+    """
+    started = time.perf_counter()
+    if backup.is_dir():
+        await _restore_directory(backup, pg_restore_argv, env, options)
+        return _stats(started, None, await asyncio.to_thread(backup_size, backup))
+    raw_bytes = await _restore_plain(backup, psql_argv, env, options)
+    return _stats(started, raw_bytes, backup.stat().st_size)
+
+
+async def _restore_plain(
+    backup: Path, argv: Sequence[str], env: Dict[str, str], options: DumpOptions,
+) -> int:
+    reader = await asyncio.to_thread(open_backup_reader, backup)
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE, env=env,
+    )
+    stderr_task = asyncio.create_task(_read_tail(proc.stderr))
+    fed = 0
+    try:
+        async with asyncio.timeout(options.restore_timeout):
+            try:
+                while chunk := await asyncio.to_thread(reader.read, CHUNK_SIZE):
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+                    fed += len(chunk)
+                proc.stdin.close()
+                await proc.stdin.wait_closed()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # psql 提早結束 → 以 returncode / stderr 判定
+            returncode = await proc.wait()
+            stderr = await stderr_task
+    except TimeoutError:
+        raise DumpError("Restore timeout") from None
+    finally:
+        await _kill(proc)
+        if not stderr_task.done():
+            stderr_task.cancel()
+        await asyncio.to_thread(reader.close)
+
+    if returncode != 0:
+        raise DumpError(f"Restore failed: {_decode(stderr)}")
+    return fed
+
+
+async def _restore_directory(
+    backup: Path, argv: Sequence[str], env: Dict[str, str], options: DumpOptions,
+) -> None:
+    proc = await asyncio.create_subprocess_exec(
+        *argv, "-j", str(options.jobs), str(backup),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE, env=env,
+    )
+    try:
+        async with asyncio.timeout(options.restore_timeout):
+            stderr = await _read_tail(proc.stderr)
+            returncode = await proc.wait()
+    except TimeoutError:
+        raise DumpError("Restore timeout") from None
+    finally:
+        await _kill(proc)
+    if returncode != 0:
+        raise DumpError(f"Restore failed: {_decode(stderr)}")
@@ -16,6 +16,7 @@ from typing import Any, Dict, List
 
 # L49 (2026-05-28): 共用 OSError-tolerant rglob helper
 from app.services.backup.attachment_backup import _safe_rglob
+from app.services.backup.dump_engine import backup_size, iter_db_backups, manifest_path_for
 
 logger = logging.getLogger(__name__)
 
@@ -97,16 +98,23 @@ class RemoteSyncerMixin:
             failed_files: List[str] = []
 
             # 同步資料庫備份
-            for backup_file in self.backup_dir.glob("ck_missive_backup_*.sql"):
+            # （單檔 .sql / .sql.gz / .sql.zst、directory 格式 .dir，連同 manifest）
+            for backup_file in iter_db_backups(self.backup_dir):
                 dest_file = remote_db_dir / backup_file.name
                 try:
                     if (
                         not dest_file.exists()
                         or backup_file.stat().st_mtime > dest_file.stat().st_mtime
                     ):
-                        self._safe_copy2(backup_file, dest_file)
+                        if backup_file.is_dir():
+                            shutil.copytree(backup_file, dest_file, dirs_exist_ok=True)
+                        else:
+                            self._safe_copy2(backup_file, dest_file)
+                        manifest = manifest_path_for(backup_file)
+                        if manifest.exists():
+                            self._safe_copy2(manifest, remote_db_dir / manifest.name)
                         synced_files += 1
-                        total_size += backup_file.stat().st_size
+                        total_size += backup_size(backup_file)
                 except OSError as e:
                     logger.warning(f"同步資料庫備份失敗: {backup_file.name}: {e}")
                     failed_files.append(f"DB:{backup_file.name}")
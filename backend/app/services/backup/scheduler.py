@@ -4,8 +4,10 @@
 
 異地同步功能已拆分至 remote_syncer.py
 
-@version 1.1.0
-@date 2026-03-19
+v1.2.0 (2026-10-16): 資料庫備份列表涵蓋壓縮 / directory 格式，附帶 manifest 統計
+
+@version 1.2.0
+@date 2026-10-16
 """
 
 import json
@@ -15,6 +17,13 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict
 
+from .dump_engine import (
+    backup_size,
+    iter_db_backups,
+    read_manifest,
+    remove_backup,
+    split_backup_name,
+)
 from .remote_syncer import RemoteSyncerMixin
 
 logger = logging.getLogger(__name__)
@@ -104,25 +113,33 @@ class BackupSchedulerMixin(RemoteSyncerMixin):
         database_backups = []
         attachment_backups = []
 
-        # 資料庫備份列表
-        for backup_file in sorted(
-            self.backup_dir.glob("ck_missive_backup_*.sql"), reverse=True
-        ):
+        # 資料庫備份列表（.sql / .sql.gz / .sql.zst 單檔與 .dir 目錄格式）
+        for backup_file in iter_db_backups(self.backup_dir):
             try:
                 stat = backup_file.stat()
+                manifest = read_manifest(backup_file)
+                size_bytes = manifest.get("size_bytes")
+                if size_bytes is None:
+                    size_bytes = backup_size(backup_file)
                 # 略過 0-byte 的失敗備份檔案
-                if stat.st_size == 0:
+                if size_bytes == 0:
                     continue
                 database_backups.append(
                     {
                         "filename": backup_file.name,
                         "path": str(backup_file),
-                        "size_bytes": stat.st_size,
-                        "size_kb": round(stat.st_size / 1024, 2),
+                        "size_bytes": size_bytes,
+                        "size_kb": round(size_bytes / 1024, 2),
                         "created_at": datetime.fromtimestamp(
                             stat.st_mtime
                         ).isoformat(),
                         "type": "database",
+                        "format": manifest.get("format", "directory" if backup_file.is_dir() else "plain"),
+                        "compression": manifest.get("compression"),
+                        "raw_bytes": manifest.get("raw_bytes"),
+                        "compression_ratio": manifest.get("compression_ratio"),
+                        "duration_seconds": manifest.get("duration_seconds"),
+                        "throughput_mb_s": manifest.get("throughput_mb_s"),
                     }
                 )
             except OSError as e:
@@ -260,8 +277,10 @@ class BackupSchedulerMixin(RemoteSyncerMixin):
         try:
             if backup_type == "database":
                 backup_path = self.backup_dir / backup_name
-                if backup_path.exists() and backup_path.is_file():
-                    backup_path.unlink()
+                if backup_path.is_file() or (
+                    backup_path.is_dir() and split_backup_name(backup_name)
+                ):
+                    remove_backup(backup_path)
                     return {"success": True, "message": f"Deleted {backup_name}"}
             elif backup_type == "attachments":
                 # 禁止刪除增量備份主目錄（attachments_latest）
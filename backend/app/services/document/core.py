@@ -1,6 +1,10 @@
 """
 公文服務層 - 業務邏輯處理 (已重構)
 
+v2.5 - 2026-10-16
+- 列表新增 keyset 分頁 (get_documents_keyset)、估算筆數 (count_mode)、
+  分批走訪 (iter_documents，NDJSON 串流用)
+
 v2.4 - 2026-03-23
 - 拆分 DocumentFilterService (篩選邏輯)
 
@@ -30,7 +34,7 @@ v2.1 - 2026-01-10
 """
 import logging
 import unicodedata
-from typing import List, Optional, Dict, Any, TYPE_CHECKING
+from typing import AsyncIterator, List, Optional, Dict, Any, TYPE_CHECKING
 from datetime import datetime, date
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_, or_, extract, func, select, exists
@@ -142,13 +146,77 @@ class DocumentService(AuditableServiceMixin):
         """套用篩選條件到查詢（委派給 DocumentFilterService）"""
         return DocumentFilterService.apply_filters(query, filters)
 
+    # 估算筆數低於此值時仍做精確 COUNT（小結果集的精確計數很便宜）
+    EXACT_COUNT_THRESHOLD = 5000
+
+    def _build_list_query(
+        self,
+        filters: Optional[DocumentFilter] = None,
+        current_user: Optional["User"] = None,
+    ) -> Any:
+        """列表基礎查詢：RLS + 篩選（不含排序 / 分頁 / 預載）"""
+        base_query = select(Document)
+
+        # 🔒 RLS
+        if current_user is not None:
+            user_id, is_admin, is_superuser = RLSFilter.get_user_rls_flags(current_user)
+            base_query = RLSFilter.apply_document_rls(
+                base_query, Document, user_id, is_admin, is_superuser
+            )
+
+        if filters:
+            base_query = self._apply_filters(base_query, filters)
+        return base_query
+
+    @staticmethod
+    def _with_relations(query: Any) -> Any:
+        """預載列表顯示需要的關聯 (N+1 優化)"""
+        return query.options(
+            selectinload(Document.contract_project),
+            selectinload(Document.sender_agency),
+            selectinload(Document.receiver_agency),
+        )
+
+    async def _count_documents(self, base_query: Any, count_mode: str = "exact") -> tuple:
+        """
+        計算列表總筆數
+
+        Args:
+            base_query: _build_list_query 的結果
+            count_mode: exact（精確 COUNT）/ estimated（估算，小結果集自動改精確）/ none（不計數）
+
+        Returns:
+            (total, is_estimate)；count_mode=none 時 total 為 None
+        """
+        if count_mode == "none":
+            return None, False
+        if count_mode == "estimated":
+            try:
+                # SAVEPOINT：EXPLAIN / pg_class 失敗只回滾到此，外層交易不會 aborted，
+                # 下方精確 COUNT fallback 才能執行
+                async with self.db.begin_nested():
+                    if base_query.whereclause is None:
+                        estimate = await self._doc_repo.estimate_table_rows()
+                    else:
+                        estimate = await self._doc_repo.estimate_count(base_query)
+            except Exception as e:
+                logger.warning(f"公文筆數估算失敗，改用精確 COUNT: {e}")
+                estimate = -1
+            if estimate >= self.EXACT_COUNT_THRESHOLD:
+                return estimate, True
+
+        # COUNT — 用輕量 subquery (不含 selectinload)
+        count_query = select(func.count()).select_from(base_query.subquery())
+        return (await self.db.execute(count_query)).scalar_one(), False
+
     async def get_documents(
         self,
         skip: int = 0,
         limit: int = 100,
         filters: Optional[DocumentFilter] = None,
         include_relations: bool = True,
-        current_user: Optional["User"] = None
+        current_user: Optional["User"] = None,
+        count_mode: str = "exact",
     ) -> Dict[str, Any]:
         """
         取得公文列表（含行級別權限過濾）
@@ -163,36 +231,18 @@ class DocumentService(AuditableServiceMixin):
             filters: 篩選條件
             include_relations: 是否預載入關聯資料 (N+1 優化)
             current_user: 當前使用者（用於權限過濾）
+            count_mode: exact / estimated / none（見 _count_documents）
 
         Returns:
             分頁結果字典
         """
         try:
             # 基礎查詢 (不含 selectinload — count 不需要)
-            base_query = select(Document)
-
-            # 🔒 RLS
-            if current_user is not None:
-                user_id, is_admin, is_superuser = RLSFilter.get_user_rls_flags(current_user)
-                base_query = RLSFilter.apply_document_rls(
-                    base_query, Document, user_id, is_admin, is_superuser
-                )
-
-            if filters:
-                base_query = self._apply_filters(base_query, filters)
-
-            # COUNT — 用輕量 subquery (不含 selectinload)
-            count_query = select(func.count()).select_from(base_query.subquery())
-            total = (await self.db.execute(count_query)).scalar_one()
+            base_query = self._build_list_query(filters, current_user)
+            total, total_is_estimate = await self._count_documents(base_query, count_mode)
 
             # 主查詢 — 加 selectinload
-            data_query = base_query
-            if include_relations:
-                data_query = data_query.options(
-                    selectinload(Document.contract_project),
-                    selectinload(Document.sender_agency),
-                    selectinload(Document.receiver_agency),
-                )
+            data_query = self._with_relations(base_query) if include_relations else base_query
 
             result = await self.db.execute(
                 data_query.order_by(
@@ -201,10 +251,13 @@ class DocumentService(AuditableServiceMixin):
                 ).offset(skip).limit(limit)
             )
             documents = result.scalars().all()
+            if total is None:
+                total = skip + len(documents)
 
             return {
                 "items": documents,
                 "total": total,
+                "total_is_estimate": total_is_estimate,
                 "page": (skip // limit) + 1 if limit > 0 else 1,
                 "limit": limit,
                 "total_pages": (total + limit - 1) // limit if limit > 0 else 0
@@ -216,6 +269,71 @@ class DocumentService(AuditableServiceMixin):
             logger.error(f"get_documents 失敗 (DB 錯誤): {e}", exc_info=True)
             raise
 
+    async def get_documents_keyset(
+        self,
+        limit: int = 20,
+        filters: Optional[DocumentFilter] = None,
+        current_user: Optional["User"] = None,
+        cursor: Optional[str] = None,
+        count_mode: str = "exact",
+        include_relations: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        取得公文列表（keyset 分頁，排序與 get_documents 相同）
+
+        以上一頁最後一筆的 (doc_date, id) 定位，不使用 OFFSET，
+        頁深不影響延遲。翻頁時建議傳 count_mode="none" 省略重複計數。
+
+        Args:
+            limit: 每頁筆數
+            filters: 篩選條件
+            current_user: 當前使用者（用於權限過濾）
+            cursor: 上一頁回傳的 next_cursor；None 為第一頁
+            count_mode: exact / estimated / none（見 _count_documents）
+            include_relations: 是否預載入關聯資料
+
+        Returns:
+            {"items", "total", "total_is_estimate", "next_cursor", "has_next"}
+
+        Raises:
+            ValueError: cursor 格式錯誤
+        """
+        after = DocumentRepository.decode_cursor(cursor) if cursor else None
+        base_query = self._build_list_query(filters, current_user)
+        total, total_is_estimate = await self._count_documents(base_query, count_mode)
+
+        data_query = self._with_relations(base_query) if include_relations else base_query
+        items, next_key = await self._doc_repo.list_keyset(data_query, limit, after)
+
+        return {
+            "items": items,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_cursor": DocumentRepository.encode_cursor(*next_key) if next_key else None,
+            "has_next": next_key is not None,
+        }
+
+    async def iter_documents(
+        self,
+        filters: Optional[DocumentFilter] = None,
+        current_user: Optional["User"] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[List[Document]]:
+        """
+        以 keyset 分批走訪所有符合條件的公文（串流匯出用）
+
+        每批交給呼叫端處理後即 expunge，session identity map 不隨筆數累積。
+        """
+        data_query = self._with_relations(self._build_list_query(filters, current_user))
+        after = None
+        while True:
+            items, after = await self._doc_repo.list_keyset(data_query, batch_size, after)
+            if items:
+                yield items
+            if after is None:
+                return
+            self.db.expunge_all()
+
     async def create_document(
         self,
         doc_data: Dict[str, Any],
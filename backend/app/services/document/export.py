@@ -11,6 +11,8 @@ import io
 import csv
 import re
 import logging
+import uuid
+from pathlib import Path
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -109,86 +111,129 @@ class DocumentExportService:
         contract_case: Optional[str] = None,
         sender: Optional[str] = None,
         receiver: Optional[str] = None,
-    ) -> bytes:
+    ) -> Path:
         """
         匯出公文為 Excel 格式
 
+        在匯出行程池（export_engine）以串流方式寫入暫存檔，不在 API worker
+        建整份工作簿；呼叫端以 ``iter_spooled_file`` 分塊回傳並刪除暫存檔。
+
         Returns:
-            Excel 位元組
+            暫存的 .xlsx 路徑
+
+        Raises:
+            ValueError: 沒有符合條件的公文
         """
-        import pandas as pd
-        from io import BytesIO
+        from app.services.taoyuan.export_engine import spool_path, submit_job
+
+        task_id = f"documents_{uuid.uuid4().hex}"
+        await submit_job("documents", task_id, {
+            "document_ids": document_ids,
+            "category": category,
+            "year": year,
+            "status": status,
+            "keyword": keyword,
+            "contract_case": contract_case,
+            "sender": sender,
+            "receiver": receiver,
+        })
+        return spool_path(task_id)
+
+    async def stream_excel(
+        self,
+        writer: Any,
+        batch_size: int = 200,
+        **filters: Any,
+    ) -> int:
+        """Stream 公文清單 + 統計摘要 into ``writer`` batch by batch.
 
-        documents = await self._query_documents(
-            document_ids=document_ids,
-            category=category,
-            year=year,
-            status=status,
-            keyword=keyword,
-            contract_case=contract_case,
-            sender=sender,
-            receiver=receiver,
-            include_attachments=True
-        )
+        以 server-side cursor 每次取 batch_size 筆公文寫出，統計摘要最後寫入。
 
-        if not documents:
-            raise ValueError("沒有符合條件的公文可供匯出")
+        Args:
+            writer: 具 ``add_sheet(name)`` / ``write(sheet, row_dict)`` 的串流寫入器
+            filters: 同 ``_query_documents`` 的篩選參數
 
-        # 轉換為 DataFrame
-        data = []
-        for doc in documents:
-            contract_case_name = ""
-            if doc.contract_project:
-                contract_case_name = doc.contract_project.project_name or ""
+        Returns:
+            匯出的公文數
 
-            sender_agency_name = ""
-            if doc.sender_agency:
-                sender_agency_name = doc.sender_agency.agency_name or ""
-
-            receiver_agency_name = ""
-            if doc.receiver_agency:
-                receiver_agency_name = doc.receiver_agency.agency_name or ""
-
-            attachment_count = len(doc.attachments) if doc.attachments else 0
-            attachment_text = f"{attachment_count} 個附件" if attachment_count > 0 else "無"
-
-            data.append({
-                # --- 與匯入範本對齊的欄位 (順序一致) ---
-                "公文ID": doc.id,
-                "流水號": doc.auto_serial or "",
-                "發文形式": doc.delivery_method or "",
-                "類別": doc.category or "",
-                "公文類型": self._get_valid_doc_type(doc.doc_type),
-                "公文字號": doc.doc_number or "",
-                "主旨": doc.subject or "",
-                "說明": getattr(doc, 'content', '') or "",
-                "公文日期": str(doc.doc_date) if doc.doc_date else "",
-                "收文日期": str(doc.receive_date) if doc.receive_date else "",
-                "發文日期": str(doc.send_date) if doc.send_date else "",
-                "發文單位": self._clean_agency_name(doc.sender or "", sender_agency_name),
-                "受文單位": self._clean_agency_name(doc.receiver or "", receiver_agency_name),
-                "備註": getattr(doc, 'notes', '') or "",
-                "簡要說明(乾坤備註)": getattr(doc, 'ck_note', '') or "",
-                "狀態": doc.status or "",
-                "承攬案件": contract_case_name,
-                # --- 系統欄位 (僅匯出用，匯入時忽略) ---
-                "附件紀錄": attachment_text,
-                "建立時間": str(doc.created_at) if doc.created_at else "",
-                "更新時間": str(doc.updated_at) if doc.updated_at else "",
-            })
-
-        df = pd.DataFrame(data)
-
-        # 產生 Excel
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='公文清單')
-
-            # 套用樣式
-            self._apply_excel_styles(writer, df, documents)
+        Raises:
+            ValueError: 沒有符合條件的公文
+        """
+        for name in ('公文清單', '統計摘要'):
+            writer.add_sheet(name)
+
+        stats = {"total": 0, "收文": 0, "發文": 0, "attachments": 0, "assigned": 0}
+        query = self._build_document_query(include_attachments=True, **filters)
+        result = await self.db.stream_scalars(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions(batch_size):
+            for doc in partition:
+                writer.write('公文清單', self._excel_row(doc))
+                stats["total"] += 1
+                if doc.category in ('收文', '發文'):
+                    stats[doc.category] += 1
+                if doc.attachments:
+                    stats["attachments"] += 1
+                if doc.contract_project_id:
+                    stats["assigned"] += 1
+            # 已寫出的 ORM 物件不再需要，避免 identity map 隨筆數成長
+            self.db.expunge_all()
+
+        if not stats["total"]:
+            raise ValueError("沒有符合條件的公文可供匯出")
 
-        output.seek(0)
-        return output.getvalue()
+        summary = [
+            ("匯出時間", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            ("公文總數", stats["total"]),
+            ("收文數量", stats["收文"]),
+            ("發文數量", stats["發文"]),
+            ("有附件公文", stats["attachments"]),
+            ("已指派案件", stats["assigned"]),
+        ]
+        for item, value in summary:
+            writer.write('統計摘要', {"項目": item, "數值": str(value)})
+        return stats["total"]
+
+    def _excel_row(self, doc: OfficialDocument) -> Dict[str, Any]:
+        """公文 → Excel 列（欄位順序與匯入範本對齊）"""
+        contract_case_name = ""
+        if doc.contract_project:
+            contract_case_name = doc.contract_project.project_name or ""
+
+        sender_agency_name = ""
+        if doc.sender_agency:
+            sender_agency_name = doc.sender_agency.agency_name or ""
+
+        receiver_agency_name = ""
+        if doc.receiver_agency:
+            receiver_agency_name = doc.receiver_agency.agency_name or ""
+
+        attachment_count = len(doc.attachments) if doc.attachments else 0
+        attachment_text = f"{attachment_count} 個附件" if attachment_count > 0 else "無"
+
+        return {
+            # --- 與匯入範本對齊的欄位 (順序一致) ---
+            "公文ID": doc.id,
+            "流水號": doc.auto_serial or "",
+            "發文形式": doc.delivery_method or "",
+            "類別": doc.category or "",
+            "公文類型": self._get_valid_doc_type(doc.doc_type),
+            "公文字號": doc.doc_number or "",
+            "主旨": doc.subject or "",
+            "說明": getattr(doc, 'content', '') or "",
+            "公文日期": str(doc.doc_date) if doc.doc_date else "",
+            "收文日期": str(doc.receive_date) if doc.receive_date else "",
+            "發文日期": str(doc.send_date) if doc.send_date else "",
+            "發文單位": self._clean_agency_name(doc.sender or "", sender_agency_name),
+            "受文單位": self._clean_agency_name(doc.receiver or "", receiver_agency_name),
+            "備註": getattr(doc, 'notes', '') or "",
+            "簡要說明(乾坤備註)": getattr(doc, 'ck_note', '') or "",
+            "狀態": doc.status or "",
+            "承攬案件": contract_case_name,
+            # --- 系統欄位 (僅匯出用，匯入時忽略) ---
+            "附件紀錄": attachment_text,
+            "建立時間": str(doc.created_at) if doc.created_at else "",
+            "更新時間": str(doc.updated_at) if doc.updated_at else "",
+        }
 
     # =========================================================================
     # 輔助方法
@@ -207,6 +252,33 @@ class DocumentExportService:
         include_attachments: bool = False,
     ) -> List[OfficialDocument]:
         """查詢公文"""
+        query = self._build_document_query(
+            document_ids=document_ids,
+            category=category,
+            year=year,
+            status=status,
+            keyword=keyword,
+            contract_case=contract_case,
+            sender=sender,
+            receiver=receiver,
+            include_attachments=include_attachments,
+        )
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    def _build_document_query(
+        document_ids: Optional[List[int]] = None,
+        category: Optional[str] = None,
+        year: Optional[int] = None,
+        status: Optional[str] = None,
+        keyword: Optional[str] = None,
+        contract_case: Optional[str] = None,
+        sender: Optional[str] = None,
+        receiver: Optional[str] = None,
+        include_attachments: bool = False,
+    ):
+        """公文查詢（含關聯預載與篩選條件）"""
         query = select(OfficialDocument).options(
             selectinload(OfficialDocument.contract_project),
             selectinload(OfficialDocument.sender_agency),
@@ -251,10 +323,7 @@ class DocumentExportService:
         if conditions:
             query = query.where(and_(*conditions))
 
-        query = query.order_by(OfficialDocument.doc_date.desc())
-
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+        return query.order_by(OfficialDocument.doc_date.desc())
 
     def _clean_agency_name(self, raw_text: str, agency_name: str = "") -> str:
         """清理機關名稱"""
@@ -276,85 +345,3 @@ class DocumentExportService:
         if doc_type in ['收文', '發文']:
             return ""
         return doc_type or ""
-
-    def _apply_excel_styles(self, writer, df, documents) -> None:
-        """套用 Excel 樣式"""
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-        worksheet = writer.sheets['公文清單']
-
-        header_font = Font(bold=True, color="000000")
-        header_fill = PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # 套用表頭樣式
-        for cell in worksheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-
-        # 資料列樣式
-        data_alignment = Alignment(vertical="center", wrap_text=True)
-        for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-            for cell in row:
-                cell.alignment = data_alignment
-                cell.border = thin_border
-
-        # 調整欄位寬度
-        for idx, col in enumerate(df.columns):
-            max_length = max(
-                df[col].astype(str).map(len).max(),
-                len(col)
-            ) + 2
-            max_length = min(max_length, 60)
-            col_letter = chr(65 + idx) if idx < 26 else f"A{chr(65 + idx - 26)}"
-            worksheet.column_dimensions[col_letter].width = max_length
-
-        # 凍結表頭列
-        worksheet.freeze_panes = 'A2'
-
-        # 新增統計摘要工作表
-        summary_data = {
-            "項目": [
-                "匯出時間",
-                "公文總數",
-                "收文數量",
-                "發文數量",
-                "有附件公文",
-                "已指派案件",
-            ],
-            "數值": [
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                str(len(documents)),
-                str(sum(1 for d in documents if d.category == '收文')),
-                str(sum(1 for d in documents if d.category == '發文')),
-                str(sum(1 for d in documents if d.attachments and len(d.attachments) > 0)),
-                str(sum(1 for d in documents if d.contract_project_id)),
-            ]
-        }
-
-        import pandas as pd
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel(writer, index=False, sheet_name='統計摘要')
-
-        summary_ws = writer.sheets['統計摘要']
-        for cell in summary_ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-
-        for row in summary_ws.iter_rows(min_row=2, max_row=summary_ws.max_row):
-            for cell in row:
-                cell.alignment = data_alignment
-                cell.border = thin_border
-
-        summary_ws.column_dimensions['A'].width = 20
-        summary_ws.column_dimensions['B'].width = 30
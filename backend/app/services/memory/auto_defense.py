@@ -21,6 +21,7 @@ from typing import List, Optional
 logger = logging.getLogger(__name__)
 
 from app.core.paths import WIKI_MEMORY_FAILURES_DIR as FAILURES_DIR  # v6.10 P1-E SSOT
+from app.services.memory.memory_catalog import get_memory_catalog
 
 _CACHE: Optional[dict] = None
 _CACHE_TTL_SECONDS = 300  # 5 min
@@ -50,23 +51,19 @@ class AutoDefenseLoader:
         if not FAILURES_DIR.exists():
             return []
 
-        candidates = []
-        for path in FAILURES_DIR.glob("failure-*.md"):
+        # 2026-10-16：active / last_seen 由 memory catalog 索引取得，
+        # 依 last_seen 新到舊只讀到湊滿 max_items 為止（原本整目錄讀檔後排序）
+        catalog = get_memory_catalog(FAILURES_DIR)
+        catalog.reconcile()
+        entries = catalog.find("failure-*.md", status="active")
+        entries.sort(key=lambda e: e.fields.get("last_seen", "").split()[:1], reverse=True)
+
+        rules: List[str] = []
+        for entry in entries:
+            if len(rules) >= max_items:
+                break
             try:
-                text = path.read_text(encoding="utf-8")
-                fm_match = re.match(r"^---\s*\n(.*?)\n---", text, re.DOTALL)
-                if not fm_match:
-                    continue
-                fm = fm_match.group(1)
-
-                # 只看 active: true
-                active_match = re.search(r"^active:\s*(true|false)", fm, re.MULTILINE | re.IGNORECASE)
-                if not active_match or active_match.group(1).lower() != "true":
-                    continue
-
-                # 取 last_seen 用於排序
-                last_seen_match = re.search(r"^last_seen:\s*(\S+)", fm, re.MULTILINE)
-                last_seen = last_seen_match.group(1) if last_seen_match else ""
+                text = entry.path.read_text(encoding="utf-8")
 
                 # 取 Defensive Rule 區段內容
                 rule_match = re.search(
@@ -78,20 +75,15 @@ class AutoDefenseLoader:
                 rule_body = rule_match.group(1).strip()
 
                 # 取 tool_sequence 作為 header
-                seq_match = re.search(r"^tool_sequence:\s*(\[.*?\])", fm, re.MULTILINE)
-                tools_hint = seq_match.group(1) if seq_match else ""
+                seq_match = re.match(r"\[.*?\]", entry.fields.get("tool_sequence", ""))
+                tools_hint = seq_match.group(0) if seq_match else ""
 
-                candidates.append({
-                    "last_seen": last_seen,
-                    "rule": f"### 失敗教訓 {tools_hint}\n{rule_body}",
-                })
+                rules.append(f"### 失敗教訓 {tools_hint}\n{rule_body}")
             except Exception as e:
-                logger.debug("Failure parse skipped (%s): %s", path.name, e)
+                logger.debug("Failure parse skipped (%s): %s", entry.name, e)
                 continue
 
-        # 依 last_seen desc
-        candidates.sort(key=lambda c: c["last_seen"], reverse=True)
-        return [c["rule"] for c in candidates[:max_items]]
+        return rules
 
 
 async def get_defensive_rules_block(max_items: int = 5) -> str:
@@ -39,6 +39,8 @@ PATTERNS_DIR = PROJECT_ROOT / "wiki" / "memory" / "patterns"
 FAILURES_DIR = PROJECT_ROOT / "wiki" / "memory" / "failures"
 CRYSTALS_DIR = PROJECT_ROOT / "wiki" / "memory" / "crystals"
 
+from app.services.memory.memory_catalog import get_memory_catalog
+
 
 @dataclass
 class WeekSignals:
@@ -158,20 +160,21 @@ class AutobiographyGenerator:
         signals.prev_week_total = int(prev_count)
 
         # Patterns（新增的檔案：7 日內 mtime）
+        # 2026-10-16：改走 memory catalog（對帳後索引計數，不再整目錄讀檔）
         if PATTERNS_DIR.exists():
-            now_ts = datetime.now().timestamp()
-            seven_days = 7 * 86400
-            signals.new_patterns_count = sum(
-                1 for p in PATTERNS_DIR.glob("pattern-*.md")
-                if now_ts - p.stat().st_mtime < seven_days
+            patterns = get_memory_catalog(PATTERNS_DIR)
+            patterns.reconcile()
+            signals.new_patterns_count = patterns.count(
+                "pattern-*.md", modified_since=datetime.now().timestamp() - 7 * 86400,
             )
         if FAILURES_DIR.exists():
-            signals.active_failures_count = sum(
-                1 for p in FAILURES_DIR.glob("failure-*.md")
-                if "active: true" in p.read_text(encoding="utf-8", errors="ignore")
-            )
+            failures = get_memory_catalog(FAILURES_DIR)
+            failures.reconcile()
+            signals.active_failures_count = failures.count("failure-*.md", status="active")
         if CRYSTALS_DIR.exists():
-            signals.crystals_count = len(list(CRYSTALS_DIR.glob("crystal-*.md")))
+            crystals = get_memory_catalog(CRYSTALS_DIR)
+            crystals.reconcile()
+            signals.crystals_count = crystals.count("crystal-*.md")
 
         # ── Phase 7 整合：抓本週最常命中的 wiki 實體（給週自傳敘事血肉）──
         # 取本週 3 句最長 question（通常代表最有份量的案子），用 wiki search
@@ -22,6 +22,7 @@ from typing import Dict, Optional, Tuple
 
 from zoneinfo import ZoneInfo
 
+from app.services.memory.memory_catalog import get_memory_catalog
 from app.services.memory.yaml_safe_editor import (
     add_synonym_group,
     add_intent_rule,
@@ -333,6 +334,7 @@ Snapshot 備份至：`{snapshot_path}`
 """,
             encoding="utf-8",
         )
+        get_memory_catalog(CRYSTALS_DIR).record_write(crystal_path)
         return crystal_id
 
     @staticmethod
@@ -356,6 +358,7 @@ Snapshot 備份至：`{snapshot_path}`
                 text, count=1, flags=re.DOTALL,
             )
         path.write_text(text, encoding="utf-8")
+        get_memory_catalog(path.parent).record_write(path, text)
 
     @staticmethod
     async def _invalidate_caches() -> None:
@@ -43,6 +43,7 @@ TZ_TAIPEI = ZoneInfo("Asia/Taipei")
 
 from app.core.paths import WIKI_MEMORY_PATTERNS_DIR as PATTERNS_DIR  # v6.10 P1-E SSOT
 from app.core.paths import WIKI_MEMORY_PROPOSALS_DIR as PROPOSALS_DIR  # v6.10 P1-E SSOT
+from app.services.memory.memory_catalog import get_memory_catalog
 
 # 結晶門檻（比 pattern extractor 更嚴）
 MIN_HIT_FOR_CRYSTAL = 5
@@ -77,9 +78,19 @@ class Crystallizer:
         if not PATTERNS_DIR.exists():
             return []
 
+        # 2026-10-16：改走 memory catalog — 開頭各對帳一次（只重讀 mtime 有變的檔），
+        # 之後門檻預篩與 proposal 狀態皆為索引查詢，只有通過預篩的 pattern 才整檔解析
+        patterns = get_memory_catalog(PATTERNS_DIR)
+        patterns.reconcile()
+        get_memory_catalog(PROPOSALS_DIR).reconcile()
+
         proposals: List[CrystalProposal] = []
-        for path in PATTERNS_DIR.glob("pattern-*.md"):
+        for entry in patterns.find("pattern-*.md"):
+            path = entry.path
             try:
+                if (entry.get_int("hit_count") < MIN_HIT_FOR_CRYSTAL
+                        or entry.get_float("success_rate") < MIN_SUCCESS_RATE_FOR_CRYSTAL):
+                    continue
                 meta = self._parse_pattern_meta(path)
                 if not meta:
                     continue
@@ -223,8 +234,8 @@ class Crystallizer:
         """從 patterns/ 找對應 hash 的 meta。"""
         if not PATTERNS_DIR.exists():
             return None
-        for path in PATTERNS_DIR.glob("pattern-*.md"):
-            meta = self._parse_pattern_meta(path)
+        for entry in get_memory_catalog(PATTERNS_DIR).find("pattern-*.md", key=template_hash):
+            meta = self._parse_pattern_meta(entry.path)
             if meta and meta.get("template_hash") == template_hash:
                 return meta
         return None
@@ -332,14 +343,9 @@ class Crystallizer:
     @staticmethod
     def _has_pending_proposal(template_hash: str) -> bool:
         """查是否有 pending 的 proposal 針對此 pattern。"""
-        for path in PROPOSALS_DIR.glob("crystal-*.md"):
-            try:
-                text = path.read_text(encoding="utf-8")
-                if template_hash in text and "status: pending" in text:
-                    return True
-            except Exception:
-                pass
-        return False
+        return get_memory_catalog(PROPOSALS_DIR).count(
+            "crystal-*.md", key=template_hash, status="pending",
+        ) > 0
 
     @staticmethod
     def _already_applied(template_hash: str) -> bool:
@@ -350,36 +356,27 @@ class Crystallizer:
         （784432 復發、06-09 713394 同型）→ pending 永遠回填。已結晶＝終態，
         不再重複提案；owner 若移除 rule 想重啟結晶，刪除該 applied 提案檔即可。
         """
-        for path in PROPOSALS_DIR.glob("crystal-*.md"):
-            try:
-                text = path.read_text(encoding="utf-8")
-                if template_hash in text and "status: applied" in text:
-                    return True
-            except Exception:
-                pass
-        return False
+        return get_memory_catalog(PROPOSALS_DIR).count(
+            "crystal-*.md", key=template_hash, status="applied",
+        ) > 0
 
     @staticmethod
     def _was_recently_rejected(template_hash: str) -> bool:
         """查 7 天內此 pattern 是否被拒絕過。"""
         from datetime import timedelta
         seven_days_ago = (datetime.now(TZ_TAIPEI) - timedelta(days=7))
-        for path in PROPOSALS_DIR.glob("crystal-*.md"):
+        rejected = get_memory_catalog(PROPOSALS_DIR).find(
+            "crystal-*.md", key=template_hash, status="rejected",
+        )
+        for entry in rejected:
+            # 找拒絕時間
+            raw = entry.get("rejected_at").split()
+            if not raw:
+                continue
             try:
-                text = path.read_text(encoding="utf-8")
-                if template_hash not in text:
-                    continue
-                if "status: rejected" not in text:
-                    continue
-                # 找拒絕時間
-                m = re.search(r"^rejected_at:\s*(\S+)", text, re.MULTILINE)
-                if m:
-                    try:
-                        rej_time = datetime.fromisoformat(m.group(1))
-                        if rej_time > seven_days_ago:
-                            return True
-                    except Exception:
-                        pass
+                rej_time = datetime.fromisoformat(raw[0])
+                if rej_time > seven_days_ago:
+                    return True
             except Exception:
                 pass
         return False
@@ -531,6 +528,7 @@ reason: {json.dumps(p.reason, ensure_ascii=False)}
 `POST /api/ai/memory/proposals/approve` with `proposal_id={p.proposal_id}`
 """
         path.write_text(content, encoding="utf-8")
+        get_memory_catalog(PROPOSALS_DIR).record_write(path, content)
         return path
 
 
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""Memory Catalog — wiki/memory markdown 的 frontmatter 索引（SQLite）
+
+2026-10-16 新建。
+
+背景：
+- Crystallizer.scan_and_propose 對每個候選 pattern 呼叫
+  _has_pending_proposal / _already_applied / _was_recently_rejected，
+  三者各自 glob 並整檔讀取全部 crystal-*.md → O(patterns × proposals) 次讀檔
+- PatternExtractor._read_existing_stats、autobiography 週訊號、auto_defense、
+  /memory/stats 也都是「為了幾個 frontmatter 欄位讀整個目錄」
+
+設計：
+- 每個記憶目錄一份 `<dir>/.catalog.sqlite3`（WAL，多 worker 共用），
+  一列一檔：name / mtime_ns / size / key / status / 頂層 frontmatter 原始值
+- key = template_hash | signature | source_pattern（第一個存在者），
+  status = status 欄位；failure 檔無 status 時由 active 推得 active / inactive
+- 寫檔端呼叫 record_write 立即更新該列；reconcile 以 scandir 比對
+  (mtime_ns, size)，只重新解析有變動的檔案、刪除已消失者（外部編輯 / git pull）
+- racy 防護（同 git index）：建列時檔案 mtime 距今不到 RACY_WINDOW_NS，
+  之後同秒內的同長度改寫（pending → applied）mtime 可能不變 → 這類列下次一律重新解析
+- 批次作業（crystallizer 掃描、週自傳、stats）開頭 reconcile 一次，之後皆為索引查詢；
+  get() 單檔查詢每次 stat 對帳，永遠是最新值
+- frontmatter 值保留原始字串（僅去頭尾空白、截長），型別轉換與引號處理交給呼叫端，
+  讀端語意與原本手寫 regex 一致
+- 資料庫開不起來（唯讀檔案系統等）→ 退回記憶體 SQLite，功能不變只是不落盤
+
+Usage:
+    from app.services.memory.memory_catalog import get_memory_catalog
+    catalog = get_memory_catalog(PROPOSALS_DIR)
+    catalog.reconcile()
+    pending = catalog.find("crystal-*.md", key=template_hash, status="pending")
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAME = ".catalog.sqlite3"
+CATALOG_VERSION = 1
+
+# mtime 與建列時間差距小於此值的列視為 racy，下次對帳強制重新解析
+RACY_WINDOW_NS = 2_000_000_000
+
+# 依序取第一個存在的欄位作為查詢鍵（pattern / failure / proposal、crystal）
+KEY_FIELDS = ("template_hash", "signature", "source_pattern")
+
+# 單一 frontmatter 值保存上限：毀損檔（引號逃逸失控）可達上億字元，
+# 截長後呼叫端的長度檢查（如 _clean_date_scalar）仍會判定為毀損
+MAX_VALUE_CHARS = 256
+
+_FRONTMATTER_RE = re.compile(r"^---\s*\n(.*?)\n---", re.DOTALL)
+_FIELD_RE = re.compile(r"^([A-Za-z_][\w-]*):[ \t]*(.*?)[ \t]*$", re.MULTILINE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_files (
+    name       TEXT    NOT NULL PRIMARY KEY,
+    mtime_ns   INTEGER NOT NULL,
+    size       INTEGER NOT NULL,
+    indexed_ns INTEGER NOT NULL,
+    key        TEXT,
+    status     TEXT,
+    fields     TEXT    NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_memory_files_key ON memory_files(key, status);
+CREATE INDEX IF NOT EXISTS idx_memory_files_status ON memory_files(status);
+"""
+
+
+def unquote(value: str) -> str:
+    """剝一層成對的 YAML 引號（寫端 yaml.safe_dump 會替純數字字串加引號）。"""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+        return value[1:-1]
+    return value
+
+
+def parse_frontmatter_fields(text: str) -> Dict[str, str]:
+    """取頂層 `key: value` 的原始字串值（巢狀 / 續行忽略）。"""
+    m = _FRONTMATTER_RE.match(text)
+    if not m:
+        return {}
+    return {k: v[:MAX_VALUE_CHARS] for k, v in _FIELD_RE.findall(m.group(1))}
+
+
+def _is_current(known: Optional[tuple], st: os.stat_result) -> bool:
+    """索引列 (mtime_ns, size, indexed_ns) 是否仍對應磁碟上的檔案。"""
+    if known is None:
+        return False
+    mtime_ns, size, indexed_ns = known
+    if (mtime_ns, size) != (st.st_mtime_ns, st.st_size):
+        return False
+    return indexed_ns - mtime_ns >= RACY_WINDOW_NS
+
+
+def _derive_key_status(fields: Dict[str, str]) -> Tuple[Optional[str], Optional[str]]:
+    key = next((unquote(fields[f]) for f in KEY_FIELDS if fields.get(f)), None)
+    status = unquote(fields["status"]) if fields.get("status") else None
+    if status is None and fields.get("active"):
+        status = "active" if fields["active"].lower() == "true" else "inactive"
+    return key, status
+
+
+@dataclass
+class CatalogEntry:
+    """單一 markdown 檔的索引列。"""
+
+    name: str
+    path: Path
+    mtime: float
+    key: Optional[str] = None
+    status: Optional[str] = None
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    def get(self, name: str, default: str = "") -> str:
+        """去引號後的欄位值。"""
+        raw = self.fields.get(name)
+        return unquote(raw) if raw else default
+
+    def get_int(self, name: str, default: int = 0) -> int:
+        m = re.match(r"\d+", self.fields.get(name, ""))
+        return int(m.group(0)) if m else default
+
+    def get_float(self, name: str, default: float = 0.0) -> float:
+        m = re.match(r"[\d.]+", self.fields.get(name, ""))
+        try:
+            return float(m.group(0)) if m else default
+        except ValueError:
+            return default
+
+
+class MemoryCatalog:
+    """單一記憶目錄的 frontmatter 索引（同步 API，thread-safe）"""
+
+    def __init__(self, directory: Path, db_path: Optional[Path] = None):
+        self.directory = Path(directory)
+        self.db_path = Path(db_path) if db_path else self.directory / CATALOG_NAME
+        self._lock = threading.Lock()
+        self._conn = self._open()
+        self._reconciled = False
+
+    def _open(self) -> sqlite3.Connection:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.db_path), timeout=5.0, isolation_level=None, check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._init_schema(conn)
+            return conn
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Memory catalog %s unavailable, using in-memory index: %s", self.db_path, e)
+            conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+            self._init_schema(conn)
+            return conn
+
+    @staticmethod
+    def _init_schema(conn: sqlite3.Connection) -> None:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+            conn.execute("DROP TABLE IF EXISTS memory_files")
+            conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 維護
+    # ------------------------------------------------------------------
+
+    def reconcile(self) -> Dict[str, int]:
+        """與檔案系統對帳：只重新解析 (mtime_ns, size) 有變的檔案。"""
+        on_disk: Dict[str, os.stat_result] = {}
+        if self.directory.is_dir():
+            with os.scandir(self.directory) as it:
+                for de in it:
+                    if not de.name.endswith(".md") or de.name.startswith("."):
+                        continue
+                    try:
+                        if de.is_file():
+                            on_disk[de.name] = de.stat()
+                    except OSError:
+                        continue
+
+        with self._lock:
+            known = {
+                name: (mtime_ns, size, indexed_ns)
+                for name, mtime_ns, size, indexed_ns in self._conn.execute(
+                    "SELECT name, mtime_ns, size, indexed_ns FROM memory_files"
+                )
+            }
+        changed = [
+            name for name, st in on_disk.items()
+            if not _is_current(known.get(name), st)
+        ]
+        removed = [name for name in known if name not in on_disk]
+
+        rows = []
+        for name in changed:
+            row = self._build_row(self.directory / name, on_disk[name])
+            if row is not None:
+                rows.append(row)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._upsert_locked(rows)
+                self._conn.executemany(
+                    "DELETE FROM memory_files WHERE name = ?", [(n,) for n in removed],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._reconciled = True
+
+        stats = {
+            "files": len(on_disk), "reused": len(on_disk) - len(changed),
+            "parsed": len(rows), "removed": len(removed),
+        }
+        if rows or removed:
+            logger.debug("Memory catalog %s reconciled: %s", self.directory.name, stats)
+        return stats
+
+    def record_write(self, path: Path, text: Optional[str] = None) -> None:
+        """寫檔後呼叫：以剛寫入的內容更新該列（text 省略則重讀）。"""
+        path = Path(path)
+        try:
+            st = path.stat()
+        except OSError:
+            self.record_delete(path)
+            return
+        row = self._build_row(path, st, text)
+        if row is None:
+            return
+        with self._lock:
+            self._upsert_locked([row])
+
+    def record_delete(self, path: Path) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM memory_files WHERE name = ?", (Path(path).name,))
+
+    @staticmethod
+    def _build_row(path: Path, st: os.stat_result, text: Optional[str] = None) -> Optional[tuple]:
+        if text is None:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except Exception as e:
+                logger.debug("Memory catalog skip %s: %s", path.name, e)
+                return None
+        fields = parse_frontmatter_fields(text)
+        key, status = _derive_key_status(fields)
+        return (
+            path.name, st.st_mtime_ns, st.st_size, time.time_ns(), key, status,
+            json.dumps(fields, ensure_ascii=False),
+        )
+
+    def _upsert_locked(self, rows: List[tuple]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO memory_files "
+            "(name, mtime_ns, size, indexed_ns, key, status, fields) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def _ensure_loaded(self) -> None:
+        """process 內首次查詢前至少對帳一次（之後由 record_write / 明確 reconcile 維持）。"""
+        if not self._reconciled:
+            self.reconcile()
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+
+    def get(self, path: Path) -> Optional[CatalogEntry]:
+        """單檔查詢：stat 對帳，檔案有變才重新解析；檔案不存在回 None。"""
+        path = Path(path)
+        try:
+            st = path.stat()
+        except OSError:
+            self.record_delete(path)
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, mtime_ns, size, indexed_ns, key, status, fields "
+                "FROM memory_files WHERE name = ?",
+                (path.name,),
+            ).fetchone()
+        if row is None or not _is_current(row[1:4], st):
+            row = self._build_row(path, st)
+            if row is None:
+                return None
+            with self._lock:
+                self._upsert_locked([row])
+        return self._entry(row, path)
+
+    def find(
+        self,
+        pattern: str = "*.md",
+        *,
+        key: Optional[str] = None,
+        status: Optional[str] = None,
+        modified_since: Optional[float] = None,
+    ) -> List[CatalogEntry]:
+        """依檔名 glob / key / status / mtime 篩選（索引查詢，不讀檔）。"""
+        where, params = self._where(pattern, key, status, modified_since)
+        self._ensure_loaded()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT name, mtime_ns, size, indexed_ns, key, status, fields "
+                f"FROM memory_files WHERE {where} ORDER BY name",
+                params,
+            ).fetchall()
+        return [self._entry(r) for r in rows]
+
+    def count(
+        self,
+        pattern: str = "*.md",
+        *,
+        key: Optional[str] = None,
+        status: Optional[str] = None,
+        modified_since: Optional[float] = None,
+    ) -> int:
+        where, params = self._where(pattern, key, status, modified_since)
+        self._ensure_loaded()
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM memory_files WHERE {where}", params,
+            ).fetchone()[0]
+
+    @staticmethod
+    def _where(
+        pattern: str, key: Optional[str], status: Optional[str], modified_since: Optional[float],
+    ) -> Tuple[str, list]:
+        clauses, params = ["name GLOB ?"], [pattern]
+        if key is not None:
+            clauses.append("key = ?")
+            params.append(key)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if modified_since is not None:
+            clauses.append("mtime_ns >= ?")
+            params.append(int(modified_since * 1_000_000_000))
+        return " AND ".join(clauses), params
+
+    def _entry(self, row: tuple, path: Optional[Path] = None) -> CatalogEntry:
+        name, mtime_ns, _size, _indexed_ns, key, status, fields = row
+        return CatalogEntry(
+            name=name,
+            path=path or self.directory / name,
+            mtime=mtime_ns / 1_000_000_000,
+            key=key,
+            status=status,
+            fields=json.loads(fields),
+        )
+
+
+_catalogs: Dict[Path, MemoryCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_memory_catalog(directory: Path) -> MemoryCatalog:
+    """取得目錄對應的 catalog（process 內每個目錄一個實例）。"""
+    directory = Path(directory)
+    catalog = _catalogs.get(directory)  # 熱路徑：同一個 Path 物件 / 字面值免 resolve
+    if catalog is not None:
+        return catalog
+    resolved = directory.resolve()
+    with _catalogs_lock:
+        catalog = _catalogs.get(resolved)
+        if catalog is None:
+            catalog = MemoryCatalog(resolved)
+            _catalogs[resolved] = catalog
+        _catalogs[directory] = catalog
+        return catalog
+
+
+def close_memory_catalogs() -> None:
+    """關閉全部 catalog 連線（lifespan shutdown）。"""
+    with _catalogs_lock:
+        catalogs = list({id(c): c for c in _catalogs.values()}.values())
+        _catalogs.clear()
+    for catalog in catalogs:
+        try:
+            catalog.close()
+        except Exception as e:
+            logger.debug("Memory catalog close failed (%s): %s", catalog.directory, e)
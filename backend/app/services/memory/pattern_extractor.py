@@ -44,6 +44,7 @@ TZ_TAIPEI = ZoneInfo("Asia/Taipei")
 
 from app.core.paths import WIKI_MEMORY_PATTERNS_DIR as PATTERNS_DIR  # v6.10 P1-E SSOT
 from app.core.paths import WIKI_MEMORY_FAILURES_DIR as FAILURES_DIR  # v6.10 P1-E SSOT
+from app.services.memory.memory_catalog import get_memory_catalog
 
 # 閾值
 SUCCESS_RATE_THRESHOLD = 0.8
@@ -397,6 +398,7 @@ class PatternExtractor:
 _由 pattern_extractor 自動產生，最後更新：{target_date.isoformat()}_
 """
             path.write_text(content, encoding="utf-8")
+            get_memory_catalog(PATTERNS_DIR).record_write(path, content)
             return True
         except Exception as e:
             logger.warning("Pattern write failed (%s): %s", p.template_hash, e)
@@ -456,6 +458,7 @@ tags: [memory, failure, defensive]
 _由 pattern_extractor 自動產生。此規則將在 agent_planner 規劃階段作為「失敗教訓」注入，提醒 LLM 避開此組合。設 `active: false` 可關閉。_
 """
             path.write_text(content, encoding="utf-8")
+            get_memory_catalog(FAILURES_DIR).record_write(path, content)
             return True
         except Exception as e:
             logger.warning("Failure write failed (%s): %s", f.signature, e)
@@ -474,7 +477,13 @@ _由 pattern_extractor 自動產生。此規則將在 agent_planner 規劃階段
             max_age_days = int(os.getenv("FAILURE_EXPIRE_DAYS", "21"))
         cutoff = target_date - timedelta(days=max_age_days)
         expired = 0
-        for path in FAILURES_DIR.glob("failure-*.md"):
+        if not FAILURES_DIR.exists():
+            return 0
+        # 只讀 catalog 標為 active 的檔（已 inactive 者本就跳過）
+        catalog = get_memory_catalog(FAILURES_DIR)
+        catalog.reconcile()
+        for entry in catalog.find("failure-*.md", status="active"):
+            path = entry.path
             try:
                 text = path.read_text(encoding="utf-8")
                 fm = re.match(r"^---\s*\n(.*?)\n---", text, re.DOTALL)
@@ -499,6 +508,7 @@ _由 pattern_extractor 自動產生。此規則將在 agent_planner 規劃階段
                         flags=re.MULTILINE,
                     )
                     path.write_text(new_text, encoding="utf-8")
+                    catalog.record_write(path, new_text)
                     expired += 1
             except Exception as e:
                 logger.warning("expire scan failed (%s): %s", path.name, e)
@@ -549,23 +559,20 @@ _由 pattern_extractor 自動產生。此規則將在 agent_planner 規劃階段
         ⚠️ 本函式的回傳值會被**原樣寫回** frontmatter（見 `first_seen`），
         因此任何取值都必須是「反序列化後的乾淨值」，不得夾帶 YAML 語法字元。
         """
-        if not path.exists():
-            return {}
         try:
-            text = path.read_text(encoding="utf-8")
-            fm_match = re.match(r"^---\s*\n(.*?)\n---", text, re.DOTALL)
-            if not fm_match:
+            # 2026-10-16：經 memory catalog（mtime 未變即直接取索引值，不重讀檔；
+            # 檔案不存在回 None）
+            entry = get_memory_catalog(path.parent).get(path)
+            if entry is None:
                 return {}
-            fm = fm_match.group(1)
             stats: dict = {}
             for key in ("hit_count", "success_count", "failure_count"):
-                m = re.search(rf"^{key}:\s*(\d+)", fm, re.MULTILINE)
+                m = re.match(r"\d+", entry.fields.get(key, ""))
                 if m:
-                    stats[key] = int(m.group(1))
+                    stats[key] = int(m.group(0))
             for key in ("first_seen", "last_seen"):
-                m = re.search(rf"^{key}:[ \t]*(.*)$", fm, re.MULTILINE)
-                if m:
-                    cleaned = self._clean_date_scalar(m.group(1))
+                if key in entry.fields:
+                    cleaned = self._clean_date_scalar(entry.fields[key])
                     if cleaned:
                         stats[key] = cleaned
             return stats
@@ -234,6 +234,11 @@ class RolePermissionsService:
             })
 
         await self.db.commit()
+        # 已快取的 principal 仍帶舊 permissions，commit 後立即逐一失效（各 worker 經 pub/sub）
+        from app.core.principal_cache import get_principal_cache
+        principal_cache = get_principal_cache()
+        for u in updated_users:
+            await principal_cache.invalidate_user(u["id"])
         logger.info(
             "[ROLE-PERM] Sync users role=%s by actor=%d: scanned=%d updated=%d skipped=%d",
             role, actor_id, len(users), len(updated_users), len(skipped_users),
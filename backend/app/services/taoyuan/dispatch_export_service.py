@@ -1,17 +1,22 @@
 """
 DispatchExportService - 派工單總表 Excel 匯出 (5 工作表)。
 公文配對演算法見 dispatch_export_helpers.py。
+
+export_master_matrix: 同步端點，DataFrame 一次建構（MAX_EXPORT_ROWS 上限）。
+stream_master_matrix: 非同步匯出引擎用，server-side cursor 分批讀取，
+逐列寫入 write-only 工作簿（記憶體與筆數無關），見 export_engine.py。
 """
 
 import logging
+from dataclasses import dataclass
 from datetime import datetime, date
 from io import BytesIO
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Iterator
 
 import pandas as pd
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -74,6 +79,33 @@ _THIN_BORDER = Border(
 
 MAX_EXPORT_ROWS = 2000
 
+SHEET_NAMES: List[str] = ['派工總表', '作業紀錄明細', '公文對照矩陣', '契金摘要', '統計摘要']
+
+
+@dataclass
+class ExportTotals:
+    """統計摘要工作表的累計值（串流匯出時逐批累加）"""
+
+    dispatches: int = 0
+    records: int = 0
+    completed_records: int = 0
+    incoming: int = 0
+    outgoing: int = 0
+    cumulative_amount: Any = 0
+
+    def add(self, dispatches: List[TaoyuanDispatchOrder], work_records: List[TaoyuanWorkRecord]) -> None:
+        self.dispatches += len(dispatches)
+        self.records += len(work_records)
+        self.completed_records += sum(1 for wr in work_records if wr.status == 'completed')
+        for d in dispatches:
+            for lk in (d.document_links or []):
+                if lk.link_type == 'agency_incoming':
+                    self.incoming += 1
+                elif lk.link_type == 'company_outgoing':
+                    self.outgoing += 1
+            if d.payment and d.payment.cumulative_amount:
+                self.cumulative_amount += d.payment.cumulative_amount
+
 
 class DispatchExportService:
     """派工單總表 Excel 匯出服務"""
@@ -127,14 +159,7 @@ class DispatchExportService:
             wr_by_dispatch.setdefault(wr.dispatch_order_id, []).append(wr)
 
         # --- Step 3: build filter description for summary sheet ---
-        filter_parts: List[str] = []
-        if contract_project_id is not None:
-            filter_parts.append(f'承攬案件ID={contract_project_id}')
-        if work_type:
-            filter_parts.append(f'作業類別={work_type}')
-        if search:
-            filter_parts.append(f'關鍵字={search}')
-        filter_desc = ', '.join(filter_parts) if filter_parts else '全部'
+        filter_desc = self._filter_desc(contract_project_id, work_type, search)
 
         # --- Step 4: build DataFrames ---
         df_summary = self._build_sheet1(dispatches, wr_by_dispatch)
@@ -159,17 +184,96 @@ class DispatchExportService:
         output.seek(0)
         return output
 
-    # =========================================================================
-    # 資料查詢
-    # =========================================================================
-
-    async def _query_dispatches(
+    async def stream_master_matrix(
         self,
+        writer: Any,
         contract_project_id: Optional[int] = None,
         work_type: Optional[str] = None,
         search: Optional[str] = None,
-    ) -> List[TaoyuanDispatchOrder]:
-        """Query all matching dispatch orders with eager-loaded relations (no pagination)."""
+        max_rows: Optional[int] = None,
+        batch_size: int = 200,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    ) -> int:
+        """Stream the 5-sheet master matrix into ``writer`` batch by batch.
+
+        以 server-side cursor 每次取 batch_size 張派工單，查該批作業紀錄後
+        立即寫出 1~4 工作表的列；統計摘要最後寫入。
+
+        Args:
+            writer: 具 ``add_sheet(name)`` / ``write(sheet, row_dict)`` 的串流寫入器
+            max_rows: 派工單筆數上限（None = 不限）
+            on_progress: ``await on_progress(done, total)`` 每批呼叫一次
+
+        Returns:
+            匯出的派工單數
+
+        Raises:
+            ValueError: 篩選結果超過 max_rows
+        """
+        conditions = self._dispatch_conditions(contract_project_id, work_type, search)
+        count_query = select(func.count(TaoyuanDispatchOrder.id))
+        if conditions:
+            count_query = count_query.where(and_(*conditions))
+        total = (await self.db.execute(count_query)).scalar_one()
+        if max_rows is not None and total > max_rows:
+            raise ValueError(
+                f"匯出上限 {max_rows} 筆，目前篩選結果 {total} 筆，請縮小篩選範圍"
+            )
+
+        for name in SHEET_NAMES:
+            writer.add_sheet(name)
+
+        totals = ExportTotals()
+        query = self._dispatch_query(conditions).execution_options(yield_per=batch_size)
+        result = await self.db.stream_scalars(query)
+        async for partition in result.partitions(batch_size):
+            dispatches = list(partition)
+            work_records = await self._query_work_records([d.id for d in dispatches])
+            wr_by_dispatch: Dict[int, List[TaoyuanWorkRecord]] = {}
+            for wr in work_records:
+                wr_by_dispatch.setdefault(wr.dispatch_order_id, []).append(wr)
+
+            for row in self._sheet1_rows(dispatches, wr_by_dispatch):
+                writer.write('派工總表', row)
+            for row in self._sheet2_rows(dispatches, work_records):
+                writer.write('作業紀錄明細', row)
+            for row in self._sheet3_rows(dispatches, wr_by_dispatch):
+                writer.write('公文對照矩陣', row)
+            for row in self._sheet4_rows(dispatches):
+                writer.write('契金摘要', row)
+
+            totals.add(dispatches, work_records)
+            # 已寫出的 ORM 物件不再需要，避免 identity map 隨筆數成長
+            self.db.expunge_all()
+            if on_progress is not None:
+                await on_progress(totals.dispatches, total)
+
+        filter_desc = self._filter_desc(contract_project_id, work_type, search)
+        for row in self._summary_rows(totals, filter_desc):
+            writer.write('統計摘要', row)
+        return totals.dispatches
+
+    # =========================================================================
+    # 資料查詢
+    # =========================================================================
+
+    @staticmethod
+    def _filter_desc(
+        contract_project_id: Optional[int],
+        work_type: Optional[str],
+        search: Optional[str],
+    ) -> str:
+        filter_parts: List[str] = []
+        if contract_project_id is not None:
+            filter_parts.append(f'承攬案件ID={contract_project_id}')
+        if work_type:
+            filter_parts.append(f'作業類別={work_type}')
+        if search:
+            filter_parts.append(f'關鍵字={search}')
+        return ', '.join(filter_parts) if filter_parts else '全部'
+
+    @staticmethod
+    def _dispatch_query(conditions: list):
         query = select(TaoyuanDispatchOrder).options(
             selectinload(TaoyuanDispatchOrder.document_links).selectinload(
                 TaoyuanDispatchDocumentLink.document
@@ -177,7 +281,16 @@ class DispatchExportService:
             selectinload(TaoyuanDispatchOrder.attachments),
             selectinload(TaoyuanDispatchOrder.payment),
         )
+        if conditions:
+            query = query.where(and_(*conditions))
+        return query.order_by(TaoyuanDispatchOrder.id.desc())
 
+    @staticmethod
+    def _dispatch_conditions(
+        contract_project_id: Optional[int],
+        work_type: Optional[str],
+        search: Optional[str],
+    ) -> list:
         conditions = []
         if contract_project_id is not None:
             conditions.append(TaoyuanDispatchOrder.contract_project_id == contract_project_id)
@@ -192,11 +305,18 @@ class DispatchExportService:
                 )
             )
 
-        if conditions:
-            query = query.where(and_(*conditions))
-
-        query = query.order_by(TaoyuanDispatchOrder.id.desc())
+        return conditions
 
+    async def _query_dispatches(
+        self,
+        contract_project_id: Optional[int] = None,
+        work_type: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> List[TaoyuanDispatchOrder]:
+        """Query all matching dispatch orders with eager-loaded relations (no pagination)."""
+        query = self._dispatch_query(
+            self._dispatch_conditions(contract_project_id, work_type, search)
+        )
         result = await self.db.execute(query)
         return list(result.scalars().unique().all())
 
@@ -220,7 +340,13 @@ class DispatchExportService:
         wr_by_dispatch: Dict[int, List[TaoyuanWorkRecord]],
     ) -> pd.DataFrame:
         """Sheet 1: 派工總表 - one row per dispatch order."""
-        rows: List[Dict[str, Any]] = []
+        return pd.DataFrame(list(self._sheet1_rows(dispatches, wr_by_dispatch)))
+
+    def _sheet1_rows(
+        self,
+        dispatches: List[TaoyuanDispatchOrder],
+        wr_by_dispatch: Dict[int, List[TaoyuanWorkRecord]],
+    ) -> Iterator[Dict[str, Any]]:
         for d in dispatches:
             doc_links = d.document_links or []
             incoming_count = sum(1 for lk in doc_links if lk.link_type == 'agency_incoming')
@@ -235,7 +361,7 @@ class DispatchExportService:
             current_amount = payment.current_amount if payment else None
             cumulative_amount = payment.cumulative_amount if payment else None
 
-            rows.append({
+            yield {
                 '派工單號': d.dispatch_no or '',
                 '工程名稱': d.project_name or '',
                 '分案備註': d.sub_case_name or '',
@@ -252,9 +378,7 @@ class DispatchExportService:
                 '累進金額': cumulative_amount,
                 '附件數': len(d.attachments) if d.attachments else 0,
                 '建立日期': self._fmt_datetime(d.created_at),
-            })
-
-        return pd.DataFrame(rows)
+            }
 
     def _build_sheet2(
         self,
@@ -262,6 +386,13 @@ class DispatchExportService:
         work_records: List[TaoyuanWorkRecord],
     ) -> pd.DataFrame:
         """Sheet 2: 作業紀錄明細 - one row per work record."""
+        return pd.DataFrame(list(self._sheet2_rows(dispatches, work_records)))
+
+    def _sheet2_rows(
+        self,
+        dispatches: List[TaoyuanDispatchOrder],
+        work_records: List[TaoyuanWorkRecord],
+    ) -> Iterator[Dict[str, Any]]:
         # Build dispatch_id -> dispatch_no/project_name lookup
         dispatch_lookup: Dict[int, Dict[str, str]] = {
             d.id: {
@@ -271,13 +402,12 @@ class DispatchExportService:
             for d in dispatches
         }
 
-        rows: List[Dict[str, Any]] = []
         for wr in work_records:
             info = dispatch_lookup.get(wr.dispatch_order_id, {})
             category_label = WORK_CATEGORY_LABELS.get(wr.work_category or '', wr.work_category or '')
             status_label = STATUS_LABELS.get(wr.status or '', wr.status or '')
 
-            rows.append({
+            yield {
                 '派工單號': info.get('dispatch_no', ''),
                 '工程名稱': info.get('project_name', ''),
                 '序號': wr.sort_order,
@@ -288,9 +418,7 @@ class DispatchExportService:
                 '完成日期': self._fmt_date(wr.completed_date),
                 '狀態': status_label,
                 '關聯公文字號': self._get_record_doc_number(wr),
-            })
-
-        return pd.DataFrame(rows)
+            }
 
     def _build_sheet3(
         self,
@@ -298,15 +426,20 @@ class DispatchExportService:
         wr_by_dispatch: Dict[int, List[TaoyuanWorkRecord]],
     ) -> pd.DataFrame:
         """Sheet 3: 公文對照矩陣 - 3 階段配對演算法 (chain → date proximity → standalone)."""
-        rows: List[Dict[str, Any]] = []
+        return pd.DataFrame(list(self._sheet3_rows(dispatches, wr_by_dispatch)))
 
+    def _sheet3_rows(
+        self,
+        dispatches: List[TaoyuanDispatchOrder],
+        wr_by_dispatch: Dict[int, List[TaoyuanWorkRecord]],
+    ) -> Iterator[Dict[str, Any]]:
         for d in dispatches:
             records = wr_by_dispatch.get(d.id, [])
             doc_links = d.document_links or []
 
             paired_rows = self._pair_documents_for_dispatch(records, doc_links)
             for inc, out in paired_rows:
-                rows.append({
+                yield {
                     '派工單號': d.dispatch_no or '',
                     '工程名稱': d.project_name or '',
                     '來文字號': inc.get('doc_number', '') if inc else '',
@@ -316,9 +449,7 @@ class DispatchExportService:
                     '覆文字號': out.get('doc_number', '') if out else '',
                     '覆文日期': out.get('doc_date', '') if out else '',
                     '覆文主旨': out.get('subject', '') if out else '',
-                })
-
-        return pd.DataFrame(rows)
+                }
 
     def _pair_documents_for_dispatch(
         self,
@@ -333,7 +464,9 @@ class DispatchExportService:
         dispatches: List[TaoyuanDispatchOrder],
     ) -> pd.DataFrame:
         """Sheet 4: 契金摘要 - one row per dispatch order with payment data."""
-        rows: List[Dict[str, Any]] = []
+        return pd.DataFrame(list(self._sheet4_rows(dispatches)))
+
+    def _sheet4_rows(self, dispatches: List[TaoyuanDispatchOrder]) -> Iterator[Dict[str, Any]]:
         for d in dispatches:
             payment: Optional[TaoyuanContractPayment] = d.payment
             if not payment:
@@ -357,9 +490,7 @@ class DispatchExportService:
             row['剩餘金額'] = payment.remaining_amount
             row['驗收日期'] = self._fmt_date(payment.acceptance_date)
 
-            rows.append(row)
-
-        return pd.DataFrame(rows)
+            yield row
 
     def _build_sheet5(
         self,
@@ -368,38 +499,23 @@ class DispatchExportService:
         filter_desc: str,
     ) -> pd.DataFrame:
         """Sheet 5: 統計摘要 - key-value pairs."""
-        total_dispatches = len(dispatches)
-        total_records = len(work_records)
-        completed_records = sum(1 for wr in work_records if wr.status == 'completed')
-
-        total_incoming = 0
-        total_outgoing = 0
-        for d in dispatches:
-            for lk in (d.document_links or []):
-                if lk.link_type == 'agency_incoming':
-                    total_incoming += 1
-                elif lk.link_type == 'company_outgoing':
-                    total_outgoing += 1
+        totals = ExportTotals()
+        totals.add(dispatches, work_records)
+        return pd.DataFrame(self._summary_rows(totals, filter_desc))
 
-        total_cumulative = sum(
-            d.payment.cumulative_amount
-            for d in dispatches
-            if d.payment and d.payment.cumulative_amount
-        )
-
-        rows = [
+    @staticmethod
+    def _summary_rows(totals: ExportTotals, filter_desc: str) -> List[Dict[str, Any]]:
+        return [
             {'項目': '匯出時間', '值': datetime.now().strftime('%Y-%m-%d %H:%M:%S')},
             {'項目': '篩選條件', '值': filter_desc},
-            {'項目': '派工單總數', '值': total_dispatches},
-            {'項目': '作業紀錄總數', '值': total_records},
-            {'項目': '已完成紀錄', '值': completed_records},
-            {'項目': '來文總數', '值': total_incoming},
-            {'項目': '覆文總數', '值': total_outgoing},
-            {'項目': '契金累計總額', '值': total_cumulative},
+            {'項目': '派工單總數', '值': totals.dispatches},
+            {'項目': '作業紀錄總數', '值': totals.records},
+            {'項目': '已完成紀錄', '值': totals.completed_records},
+            {'項目': '來文總數', '值': totals.incoming},
+            {'項目': '覆文總數', '值': totals.outgoing},
+            {'項目': '契金累計總額', '值': totals.cumulative_amount},
         ]
 
-        return pd.DataFrame(rows)
-
     # =========================================================================
     # 輔助方法
     # =========================================================================
@@ -0,0 +1,254 @@
+"""
+ExportEngine - 行程池 + 磁碟暫存的匯出引擎
+
+ExportTaskManager 原本在 API worker 的 event loop 上以 pandas 建構整份工作簿，
+結果 bytes 存在模組層 dict（只有產生它的 worker 拿得到、最多佔 50 份記憶體）。
+改為：
+
+- 匯出在獨立行程池執行（spawn，EXPORT_PROCESS_WORKERS，預設 2），不阻塞 API
+- 子行程以 server-side cursor 分批讀 DB，逐列寫入 write-only 工作簿（記憶體恆定）
+- 結果寫入各 worker 共用的暫存目錄（EXPORT_SPOOL_DIR），以 .part 寫完後原子改名
+- 進度沿用 Redis hash（export_task:{task_id}），子行程直接更新
+- 公文 Excel 同步端點（DocumentExportService.export_to_excel）同樣走本引擎，
+  等待 job 完成後串流暫存檔
+
+@version 1.0.0
+@date 2026-10-16
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+logger = logging.getLogger(__name__)
+
+SPOOL_SUFFIX = ".xlsx"
+_PART_SUFFIX = ".part"
+_CHUNK_SIZE = 64 * 1024
+
+# 串流匯出不受記憶體限制，筆數上限較同步端點 (MAX_EXPORT_ROWS) 寬鬆
+ASYNC_EXPORT_MAX_ROWS = int(os.getenv("EXPORT_ASYNC_MAX_ROWS", "50000"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+# ---------------------------------------------------------------------------
+# 暫存目錄
+# ---------------------------------------------------------------------------
+
+def get_spool_dir() -> Path:
+    """匯出結果暫存目錄（同主機各 worker 共用）"""
+    path = Path(os.getenv("EXPORT_SPOOL_DIR") or Path(tempfile.gettempdir()) / "ck_exports")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def spool_path(task_id: str) -> Path:
+    return get_spool_dir() / f"{task_id}{SPOOL_SUFFIX}"
+
+
+def purge_spool(ttl_seconds: int) -> int:
+    """刪除超過 TTL 的結果與殘留 .part 檔，回傳刪除數"""
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for entry in get_spool_dir().iterdir():
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                entry.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def iter_spooled_file(path: Path) -> Iterator[bytes]:
+    """分塊讀出暫存結果，讀完即刪（取後即刪）"""
+    try:
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# 串流寫入器
+# ---------------------------------------------------------------------------
+
+class StreamingWorkbookWriter:
+    """openpyxl write-only 工作簿包裝：逐列寫入，記憶體不隨列數成長
+
+    第一次寫入某工作表時以 row dict 的 key 建立標題列（樣式同同步匯出），
+    欄寬依標題長度預估（write-only 模式無法事後掃描內容調整）。
+    """
+
+    def __init__(self) -> None:
+        from app.services.taoyuan.dispatch_export_service import (
+            _HEADER_ALIGNMENT, _HEADER_FILL, _HEADER_FONT, _THIN_BORDER,
+        )
+        self._header_style = (_HEADER_FONT, _HEADER_FILL, _HEADER_ALIGNMENT, _THIN_BORDER)
+        self._workbook = Workbook(write_only=True)
+        self._sheets: Dict[str, Any] = {}
+        self._headers: Dict[str, List[str]] = {}
+        self.rows_written = 0
+
+    def add_sheet(self, name: str) -> None:
+        if name not in self._sheets:
+            self._sheets[name] = self._workbook.create_sheet(title=name)
+
+    def write(self, sheet: str, row: Dict[str, Any]) -> None:
+        self.add_sheet(sheet)
+        ws = self._sheets[sheet]
+        headers = self._headers.get(sheet)
+        if headers is None:
+            headers = list(row.keys())
+            self._headers[sheet] = headers
+            self._write_header(ws, headers)
+        ws.append([row.get(h) for h in headers])
+        self.rows_written += 1
+
+    def _write_header(self, ws: Any, headers: List[str]) -> None:
+        font, fill, alignment, border = self._header_style
+        ws.freeze_panes = "A2"
+        for idx, header in enumerate(headers, start=1):
+            cjk = sum(1 for c in header if "\u4e00" <= c <= "\u9fff")
+            ws.column_dimensions[get_column_letter(idx)].width = max(14, min(40, len(header) + cjk * 1.2 + 6))
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font, cell.fill, cell.alignment, cell.border = font, fill, alignment, border
+            cells.append(cell)
+        ws.append(cells)
+
+    def save(self, path: Path) -> None:
+        self._workbook.save(path)
+
+
+# ---------------------------------------------------------------------------
+# 子行程工作
+# ---------------------------------------------------------------------------
+
+@asynccontextmanager
+async def _job_session() -> AsyncIterator[Any]:
+    """子行程自建 engine（NullPool：連線不跨 job 的 event loop 重用）"""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.db.database import async_db_url
+
+    engine = create_async_engine(async_db_url, poolclass=NullPool)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+    finally:
+        await engine.dispose()
+
+
+async def _dispatch_master_job(task_id: str, params: Dict[str, Any], part_path: Path) -> int:
+    from app.services.taoyuan.dispatch_export_service import DispatchExportService
+    from app.services.taoyuan.export_task_manager import ExportTaskManager, STATUS_RUNNING
+
+    async def on_progress(done: int, total: int) -> None:
+        await ExportTaskManager._update_progress(
+            task_id, STATUS_RUNNING,
+            progress=5 + int(90 * done / max(total, 1)),
+            total=total,
+            message=f"已處理 {done}/{total} 筆派工單",
+        )
+
+    writer = StreamingWorkbookWriter()
+    async with _job_session() as db:
+        count = await DispatchExportService(db).stream_master_matrix(
+            writer,
+            contract_project_id=params.get("contract_project_id"),
+            work_type=params.get("work_type"),
+            search=params.get("search"),
+            max_rows=ASYNC_EXPORT_MAX_ROWS,
+            on_progress=on_progress,
+        )
+    writer.save(part_path)
+    return count
+
+
+async def _documents_job(task_id: str, params: Dict[str, Any], part_path: Path) -> int:
+    """公文 Excel 匯出（同步端點，無進度回報）"""
+    from app.services.document.export import DocumentExportService
+
+    writer = StreamingWorkbookWriter()
+    async with _job_session() as db:
+        count = await DocumentExportService(db).stream_excel(writer, **params)
+    writer.save(part_path)
+    return count
+
+
+_JOBS = {
+    "dispatch_master": _dispatch_master_job,
+    "documents": _documents_job,
+}
+
+
+async def _run_job(kind: str, task_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.core.redis_client import close_redis
+
+    final_path = spool_path(task_id)
+    part_path = final_path.with_suffix(final_path.suffix + _PART_SUFFIX)
+    try:
+        count = await _JOBS[kind](task_id, params, part_path)
+        os.replace(part_path, final_path)
+        return {"rows": count, "bytes": final_path.stat().st_size}
+    finally:
+        if part_path.exists():
+            part_path.unlink()
+        await close_redis()
+
+
+def run_export_job(kind: str, task_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """行程池進入點（須為模組層函式以供 pickle）"""
+    return asyncio.run(_run_job(kind, task_id, params))
+
+
+# ---------------------------------------------------------------------------
+# 行程池
+# ---------------------------------------------------------------------------
+
+def get_export_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        workers = max(1, int(os.getenv("EXPORT_PROCESS_WORKERS", "2")))
+        # spawn：避免 fork 帶著執行中的 event loop / 連線池進入子行程
+        _executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info("[ExportEngine] 行程池啟動: workers=%d spool=%s", workers, get_spool_dir())
+    return _executor
+
+
+async def submit_job(kind: str, task_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """在行程池執行匯出，回傳 {"rows", "bytes"}；例外原樣拋回"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_export_executor(), run_export_job, kind, task_id, params)
+
+
+def shutdown_export_executor() -> None:
+    """lifespan shutdown 呼叫；不等待進行中的匯出（子行程隨主行程結束）"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
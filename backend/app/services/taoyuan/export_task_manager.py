@@ -2,10 +2,11 @@
 ExportTaskManager - 非同步匯出任務管理器
 
 透過 Redis 追蹤匯出進度，支援前端輪詢。
-任務結果暫存記憶體 (TTL + 大小限制)，前端下載後自動清理。
+匯出本身交由 export_engine 在行程池執行，結果暫存於各 worker 共用的磁碟目錄，
+下載時分塊串流並於讀完後刪除。
 
-@version 1.1.0 - 修復 stale session / 雙重查詢 / 記憶體洩漏 / task_id 驗證
-@date 2026-02-25
+@version 2.0.0 - 行程池 + server-side cursor 串流寫入 + 磁碟暫存（取代記憶體 _result_store）
+@date 2026-10-16
 """
 
 import asyncio
@@ -13,10 +14,10 @@ import logging
 import re
 import uuid
 from datetime import datetime
-from io import BytesIO
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
 
 from app.core.redis_client import get_redis
+from app.services.taoyuan import export_engine
 
 logger = logging.getLogger(__name__)
 
@@ -33,10 +34,8 @@ STATUS_FAILED = "failed"
 # task_id 格式驗證 (hex, 12 字元)
 _TASK_ID_PATTERN = re.compile(r"^[a-f0-9]{12}$")
 
-# 記憶體暫存設定
-_MAX_STORE_SIZE = 50  # 最多保留 50 筆結果
-_result_store: Dict[str, bytes] = {}
-_result_timestamps: Dict[str, float] = {}  # task_id → Unix timestamp
+# 背景 watcher task 參考（避免被 GC）
+_running_tasks: set = set()
 
 
 def _validate_task_id(task_id: str) -> bool:
@@ -45,23 +44,13 @@ def _validate_task_id(task_id: str) -> bool:
 
 
 def _evict_expired_results() -> None:
-    """清除過期或超量的暫存結果"""
-    now = datetime.now().timestamp()
-
-    # 1. 清除超過 TTL 的結果
-    expired = [
-        tid for tid, ts in _result_timestamps.items()
-        if now - ts > TASK_TTL
-    ]
-    for tid in expired:
-        _result_store.pop(tid, None)
-        _result_timestamps.pop(tid, None)
-
-    # 2. 若仍超過上限，移除最舊的
-    while len(_result_store) > _MAX_STORE_SIZE:
-        oldest = min(_result_timestamps, key=_result_timestamps.get)
-        _result_store.pop(oldest, None)
-        _result_timestamps.pop(oldest, None)
+    """清除暫存目錄中超過 TTL 的結果（未下載 / 異常殘留）"""
+    try:
+        removed = export_engine.purge_spool(TASK_TTL)
+        if removed:
+            logger.info("[ExportTask] 清除過期暫存結果 %d 筆", removed)
+    except OSError as e:
+        logger.warning("[ExportTask] 暫存目錄清理失敗: %s", e)
 
 
 class ExportTaskManager:
@@ -69,7 +58,7 @@ class ExportTaskManager:
 
     @staticmethod
     async def submit_export(
-        db,  # noqa: ANN001 — 僅用於取得 bind URL，不傳入背景任務
+        db,  # noqa: ANN001 — 僅為相容既有呼叫端，不傳入背景任務
         contract_project_id: Optional[int] = None,
         work_type: Optional[str] = None,
         search: Optional[str] = None,
@@ -88,12 +77,16 @@ class ExportTaskManager:
             })
             await redis.expire(f"{EXPORT_TASK_PREFIX}{task_id}", TASK_TTL)
 
-        # 啟動背景任務 (使用獨立 session，不依賴請求生命週期)
-        asyncio.create_task(
+        _evict_expired_results()
+
+        # 匯出在行程池執行；此 task 只等待結果並更新最終狀態
+        task = asyncio.create_task(
             ExportTaskManager._run_export(
                 task_id, contract_project_id, work_type, search
             )
         )
+        _running_tasks.add(task)
+        task.add_done_callback(_running_tasks.discard)
 
         return task_id
 
@@ -121,14 +114,13 @@ class ExportTaskManager:
         }
 
     @staticmethod
-    async def get_result(task_id: str) -> Optional[BytesIO]:
-        """取得完成的匯出結果 (取後即刪)"""
+    async def get_result(task_id: str) -> Optional[Iterator[bytes]]:
+        """取得完成的匯出結果 (分塊迭代器，讀完即刪)"""
         if not _validate_task_id(task_id):
             return None
 
-        result_bytes = _result_store.pop(task_id, None)
-        _result_timestamps.pop(task_id, None)
-        if result_bytes is None:
+        path = export_engine.spool_path(task_id)
+        if not path.is_file():
             return None
 
         # 清理 Redis 中的任務記錄
@@ -136,9 +128,7 @@ class ExportTaskManager:
         if redis:
             await redis.delete(f"{EXPORT_TASK_PREFIX}{task_id}")
 
-        output = BytesIO(result_bytes)
-        output.seek(0)
-        return output
+        return export_engine.iter_spooled_file(path)
 
     @staticmethod
     async def _update_progress(
@@ -172,67 +162,48 @@ class ExportTaskManager:
         work_type: Optional[str],
         search: Optional[str],
     ) -> None:
-        """背景執行匯出 (asyncio task) — 使用獨立 DB session"""
-        from app.db.database import AsyncSessionLocal
-        from app.services.taoyuan.dispatch_export_service import (
-            DispatchExportService,
-            MAX_EXPORT_ROWS,
-        )
+        """等待行程池中的匯出完成並寫入最終狀態（進度由子行程直接更新）"""
+        try:
+            await ExportTaskManager._update_progress(
+                task_id, STATUS_RUNNING, message="查詢派工單資料..."
+            )
+
+            result = await export_engine.submit_job(
+                "dispatch_master",
+                task_id,
+                {
+                    "contract_project_id": contract_project_id,
+                    "work_type": work_type,
+                    "search": search,
+                },
+            )
 
-        async with AsyncSessionLocal() as db:
-            try:
-                await ExportTaskManager._update_progress(
-                    task_id, STATUS_RUNNING, message="查詢派工單資料..."
-                )
-
-                export_service = DispatchExportService(db)
-
-                # 直接呼叫 export_master_matrix (內含查詢 + 建構 Excel)
-                # 避免雙重查詢：不再先 _query_dispatches 再呼叫 export_master_matrix
-                await ExportTaskManager._update_progress(
-                    task_id, STATUS_RUNNING,
-                    progress=30,
-                    message="建構 Excel 工作表..."
-                )
-
-                output = await export_service.export_master_matrix(
-                    contract_project_id=contract_project_id,
-                    work_type=work_type,
-                    search=search,
-                )
-
-                # 儲存結果 (先清理過期項目)
-                _evict_expired_results()
-
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-                filename = f'dispatch_master_{timestamp}.xlsx'
-                result_bytes = output.getvalue()
-
-                _result_store[task_id] = result_bytes
-                _result_timestamps[task_id] = datetime.now().timestamp()
-
-                await ExportTaskManager._update_progress(
-                    task_id, STATUS_COMPLETED,
-                    progress=100,
-                    message="匯出完成",
-                    filename=filename,
-                )
-
-                logger.info(
-                    "[ExportTask] %s 完成: %d bytes",
-                    task_id, len(result_bytes),
-                )
-
-            except ValueError as e:
-                # MAX_EXPORT_ROWS 超限等業務錯誤
-                logger.warning("[ExportTask] %s 業務錯誤: %s", task_id, e)
-                await ExportTaskManager._update_progress(
-                    task_id, STATUS_FAILED,
-                    message=str(e),
-                )
-            except Exception:
-                logger.exception("[ExportTask] %s 失敗", task_id)
-                await ExportTaskManager._update_progress(
-                    task_id, STATUS_FAILED,
-                    message="匯出過程發生錯誤，請稍後再試",
-                )
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+            filename = f'dispatch_master_{timestamp}.xlsx'
+
+            await ExportTaskManager._update_progress(
+                task_id, STATUS_COMPLETED,
+                progress=100,
+                total=result["rows"],
+                message="匯出完成",
+                filename=filename,
+            )
+
+            logger.info(
+                "[ExportTask] %s 完成: %d 筆, %d bytes",
+                task_id, result["rows"], result["bytes"],
+            )
+
+        except ValueError as e:
+            # 筆數超限等業務錯誤
+            logger.warning("[ExportTask] %s 業務錯誤: %s", task_id, e)
+            await ExportTaskManager._update_progress(
+                task_id, STATUS_FAILED,
+                message=str(e),
+            )
+        except Exception:
+            logger.exception("[ExportTask] %s 失敗", task_id)
+            await ExportTaskManager._update_progress(
+                task_id, STATUS_FAILED,
+                message="匯出過程發生錯誤，請稍後再試",
+            )
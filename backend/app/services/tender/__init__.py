@@ -7,12 +7,14 @@ Public API (use specific submodule for sub-types):
     .search_query        — build_tender_search_sql / rerank_by_title_similarity
     .data_transformer    — dedup_records / normalize_record / extract_award_details
     .cache               — _ingest_tender_entities / save_search_results / search_from_db
+    .warehouse           — upsert_tenders / record_award / refresh_org_aggregates / load_org_ecosystem
     .subscription_scheduler — check_all_subscriptions
     .analytics           — TenderAnalyticsService (Facade)
     .analytics_battle    — battle_room / org_ecosystem
     .analytics_price     — price_analysis / price_trends / company_profile
     .ezbid_scraper       — EzbidScraper
     .pcc_today_scraper   — PccTodayScraper
+    .scraper_engine      — get_scraper_engine（共用連線池 / 節流 / 條件請求 / 解析行程池）
 """
 from .search import TenderSearchService  # noqa: F401
 from .analytics import TenderAnalyticsService  # noqa: F401
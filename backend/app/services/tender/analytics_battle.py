@@ -3,7 +3,7 @@
 
 拆分自 tender_analytics_service.py v5.5.1
 
-Version: 2.0.0 — 去重 + 競爭強度 + 得標金額
+Version: 2.1.0 — org_ecosystem 本地倉儲優先
 """
 import re
 import logging
@@ -144,8 +144,27 @@ async def _db_org_fallback(org_name: str) -> dict:
     }
 
 
+async def _warehouse_org_ecosystem(org_name: str):
+    """本地標案倉儲彙總表（tender_org_*_stats）；機關未在有效期內完整同步或 DB 不可用時回傳 None"""
+    try:
+        from app.db.database import async_session_maker
+        from .warehouse import is_org_synced, load_org_ecosystem
+        if not await is_org_synced(org_name):
+            return None
+        async with async_session_maker() as db:
+            return await load_org_ecosystem(db, org_name)
+    except Exception as e:
+        logger.debug(f"org_ecosystem warehouse lookup failed org={org_name}: {e}")
+        return None
+
+
 async def org_ecosystem(search: TenderSearchService, org_name: str, pages: int = 10) -> dict:
-    """機關生態分析 — 年度 Top 10 廠商 + 競爭強度 + 得標金額 (Redis 快取 30min)"""
+    """機關生態分析 — 年度 Top 10 廠商 + 競爭強度 + 得標金額 (Redis 快取 30min)
+
+    本地倉儲優先：機關在 TENDER_ORG_SYNC_TTL 內完成過完整即時抓取時由彙總表回應；
+    否則並行打外部 API，各頁結果彙整後一次背景寫入倉儲（不是每頁各開一個交易），
+    全部頁面成功才標記為已同步，有效期過後重新即時抓取補齊。
+    """
     import asyncio
     import json as _json
 
@@ -162,11 +181,20 @@ async def org_ecosystem(search: TenderSearchService, org_name: str, pages: int =
     except Exception:
         pass
 
+    local = await _warehouse_org_ecosystem(org_name)
+    if local:
+        if redis:
+            try:
+                await redis.set(cache_key, _json.dumps(local, ensure_ascii=False, default=str), ex=1800)
+            except Exception:
+                pass
+        return local
+
     # 並行搜尋: orgname + title (機關改名也能找到舊標案)
     async def fetch_org(p):
-        return await search.search_by_org(org_name=org_name, page=p)
+        return await search.search_by_org(org_name=org_name, page=p, persist=False)
     async def fetch_title(p):
-        return await search.search_by_title(query=org_name, page=p)
+        return await search.search_by_title(query=org_name, page=p, persist=False)
 
     tasks = [fetch_org(p) for p in range(1, min(pages, 5) + 1)]
     # 用機關名稱的核心部分搜標題 (處理改名問題)
@@ -179,21 +207,28 @@ async def org_ecosystem(search: TenderSearchService, org_name: str, pages: int =
     tasks += [fetch_title(p) for p in range(1, 3)]
     if short_name != org_name:
         async def fetch_short(p):
-            return await search.search_by_title(query=short_name, page=p)
+            return await search.search_by_title(query=short_name, page=p, persist=False)
         tasks += [fetch_short(p) for p in range(1, 3)]
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
     seen_jobs = set()
     all_records = []
+    fetched = []
     for item in results:
         if isinstance(item, Exception):
             continue
+        fetched.extend(item.get("records", []))
         for r in item.get("records", []):
             jn = r.get("job_number", "")
             if jn and jn not in seen_jobs:
                 seen_jobs.add(jn)
                 all_records.append(r)
 
+    # 各頁結果一次寫入倉儲；有頁面失敗時資料不完整，不標記已同步
+    from .warehouse import persist_in_background
+    complete = not any(isinstance(item, Exception) for item in results)
+    persist_in_background(fetched, source="pcc", synced_org=org_name if complete and all_records else None)
+
     if not all_records:
         # 方案 A（2026-07-04 owner 授權）韌性強化：live openfun 空/限流 → 回本地 DB 標案清單
         #   （degraded），而非整頁 total:0。成功路徑不變；degraded 結果快取較短(5min)以便盡快重試 live。
@@ -4,10 +4,9 @@
 自動將 g0v/ezbid 搜尋結果寫入 tender_records，
 後續查詢優先從 DB 取得，減少外部 API 呼叫。
 
-Version: 1.0.0
+Version: 1.1.0
 """
 import re
-import json
 import logging
 from datetime import date, datetime
 from typing import Optional, List, Dict, Any
@@ -89,79 +88,15 @@ async def _ingest_tender_entities(db: AsyncSession, records: List[Dict[str, Any]
 
 
 async def save_search_results(db: AsyncSession, records: List[Dict[str, Any]], source: str = "pcc"):
-    """將搜尋結果批次寫入 DB (upsert by unit_id+job_number or ezbid_id)"""
-    saved = 0
-    for r in records:
-        try:
-            unit_id = r.get("unit_id", "") or ""
-            job_number = r.get("job_number", "") or ""
-            ezbid_id = r.get("ezbid_id")
-            title = r.get("title", "")[:500]
-
-            # 2026-04-24: ezbid 來源如果 unit_id 為空，fallback 到 ezbid_id
-            # 避免 DB 出現 unit_id='' 的壞資料（React rowKey 重複 + detail URL 404）
-            if not unit_id and ezbid_id:
-                unit_id = str(ezbid_id)
-
-            if not title:
-                continue
-
-            # 檢查是否已存在
-            if ezbid_id:
-                existing = await db.execute(
-                    text("SELECT id FROM tender_records WHERE ezbid_id = :eid"),
-                    {"eid": str(ezbid_id)}
-                )
-            elif unit_id and job_number:
-                existing = await db.execute(
-                    text("SELECT id FROM tender_records WHERE unit_id = :uid AND job_number = :jn"),
-                    {"uid": unit_id, "jn": job_number}
-                )
-            else:
-                continue
+    """將搜尋結果批次寫入 DB — 委派標案倉儲冪等 upsert，回傳新增筆數
 
-            if existing.scalar():
-                continue  # 已存在，跳過
-
-            # 插入新記錄
-            announce = _parse_date(r.get("date", ""))
-            budget = _parse_amount(r.get("budget"))
-
-            await db.execute(text("""
-                INSERT INTO tender_records (unit_id, job_number, title, unit_name, category,
-                    tender_type, budget, announce_date, status, source, ezbid_id, raw_data)
-                VALUES (:uid, :jn, :title, :uname, :cat, :type, :budget, :date, :status, :source, :eid, :raw)
-            """), {
-                "uid": unit_id, "jn": job_number or None, "title": title,
-                "uname": r.get("unit_name", "")[:200], "cat": r.get("category", "")[:50],
-                "type": r.get("type", "")[:100], "budget": budget,
-                "date": announce, "status": r.get("status", "")[:50],
-                "source": source, "eid": str(ezbid_id) if ezbid_id else None,
-                "raw": json.dumps(r, ensure_ascii=False, default=str)[:2000],
-            })
-
-            # 寫入廠商關聯
-            record_id = (await db.execute(text("SELECT lastval()"))).scalar()
-            if record_id:
-                for w in r.get("winner_names", []):
-                    if w:
-                        await db.execute(text(
-                            "INSERT INTO tender_company_links (tender_record_id, company_name, role) VALUES (:rid, :name, 'winner')"
-                        ), {"rid": record_id, "name": w[:200]})
-                for b in r.get("bidder_names", []):
-                    if b:
-                        await db.execute(text(
-                            "INSERT INTO tender_company_links (tender_record_id, company_name, role) VALUES (:rid, :name, 'bidder')"
-                        ), {"rid": record_id, "name": b[:200]})
-
-            saved += 1
-        except Exception as e:
-            logger.debug(f"Save tender record failed: {e}")
-            continue
+    v1.1.0: 原本「已存在就跳過」，同一標案後續的決標公告 / 得標廠商永遠寫不進來；
+    改由 warehouse.upsert_tenders 合併更新並增量重算機關彙總。
+    """
+    from .warehouse import upsert_tenders
 
-    if saved > 0:
-        await db.commit()
-        logger.info(f"Saved {saved} tender records to DB ({source})")
+    stats = await upsert_tenders(db, records, source)
+    saved = stats["inserted"]
 
     # Auto-ingest tender entities into Knowledge Graph
     if saved > 0:
@@ -220,10 +155,11 @@ async def search_from_db(
 async def refresh_pending_tenders(db: AsyncSession, limit: int = 30) -> Dict[str, Any]:
     """定期更新：重查等標期標案的最新狀態 (決標/廢標)"""
     from .search import TenderSearchService
+    from .warehouse import record_award, refresh_org_aggregates
 
     # 找出需要更新的標案：有 job_number、status 非決標、30 天內公告
     rows = await db.execute(text("""
-        SELECT id, unit_id, job_number, title, status
+        SELECT id, unit_id, job_number, title, status, unit_name
         FROM tender_records
         WHERE job_number IS NOT NULL AND job_number != ''
           AND (status IS NULL OR status NOT LIKE '%決標%')
@@ -239,6 +175,7 @@ async def refresh_pending_tenders(db: AsyncSession, limit: int = 30) -> Dict[str
 
     svc = TenderSearchService()
     updated = 0
+    touched_orgs: set = set()
 
     for row in pending:
         try:
@@ -264,31 +201,30 @@ async def refresh_pending_tenders(db: AsyncSession, limit: int = 30) -> Dict[str
                     WHERE id = :id
                 """), {"status": new_status, "award": award_amount, "id": row.id})
 
-                # 更新廠商關聯
+                # 寫入得標 / 投標廠商（決標品項的得標廠商 + 各公告列出的廠商）
+                winner_amounts: Dict[str, Optional[float]] = {}
+                companies: List[str] = []
                 for evt in detail.get("events", []):
-                    for w in evt.get("companies", []):
-                        pass  # companies 在 normalize_detail 中已處理
-                # 從 detail events 提取 winner/bidder
-                latest = detail.get("latest", {})
-                if latest:
-                    # 不重複新增已有的廠商
-                    existing = await db.execute(text(
-                        "SELECT company_name FROM tender_company_links WHERE tender_record_id = :rid"
-                    ), {"rid": row.id})
-                    existing_names = {r[0] for r in existing.fetchall()}
-
-                    for evt in detail.get("events", []):
-                        companies = evt.get("companies", [])
-                        if isinstance(companies, list):
-                            for c in companies:
-                                if c and c not in existing_names:
-                                    existing_names.add(c)
+                    for item in (evt.get("award_details") or {}).get("award_items", []):
+                        if item.get("winner"):
+                            winner_amounts[item["winner"]] = item.get("amount")
+                    if isinstance(evt.get("companies"), list):
+                        companies.extend(c for c in evt["companies"] if c)
+                await record_award(
+                    db, row.id,
+                    winners=list(winner_amounts),
+                    bidders=[c for c in companies if c not in winner_amounts],
+                    winner_amounts=winner_amounts,
+                )
+                if row.unit_name:
+                    touched_orgs.add(row.unit_name)
 
                 updated += 1
         except Exception:
             continue
 
     if updated > 0:
+        await refresh_org_aggregates(db, touched_orgs)
         await db.commit()
 
     return {"checked": len(pending), "updated": updated}
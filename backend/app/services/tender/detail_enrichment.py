@@ -17,6 +17,7 @@
   - openfun 需點分 orgId（如 A.13.6.20）→ 從 PCC 詳情頁 HTML regex 取得，cache 進 org_id 欄避免重抓。
   - 節流（每案延遲 + 低併發）避免封 IP；只 enrich 推薦/近期標的（非全量）。
   - 任何步驟失敗不擋主流程（保留既有基本欄，記 logger）。
+  - 得標/投標廠商同步寫入 tender_company_links 並重算機關彙總（warehouse.record_award）。
 """
 from __future__ import annotations
 
@@ -88,6 +89,7 @@ async def _fetch_openfun_detail(client: httpx.AsyncClient, org_id: str, job_numb
             return out
         data = r.json()
         bidders: List[str] = []
+        winners: List[str] = []
         for rec in data.get("records", []):
             det = rec.get("detail", {}) or {}
             cls = _pick(det, "標的分類")
@@ -111,8 +113,11 @@ async def _fetch_openfun_detail(client: httpx.AsyncClient, org_id: str, job_numb
                     name = str(v).strip()
                     if name and name not in bidders:
                         bidders.append(name)
+                    if name and "得標廠商" in k and "未得標" not in k and name not in winners:
+                        winners.append(name)
         if bidders:
             out["bidders"] = bidders[:20]
+            out["winners"] = winners
     except Exception as e:
         logger.warning(f"fetch openfun detail failed org_id={org_id} job={job_number}: {e}")
     return out
@@ -125,7 +130,7 @@ async def enrich_recent(
     stats = {"scanned": 0, "org_ok": 0, "enriched": 0, "updated_budget": 0, "errors": 0}
     where_unenriched = "AND detail_enriched_at IS NULL" if only_unenriched else ""
     rows = (await db.execute(text(f"""
-        SELECT id, unit_id, job_number, org_id, budget
+        SELECT id, unit_id, job_number, org_id, budget, unit_name
         FROM tender_records
         WHERE announce_date >= (CURRENT_DATE - :db_days * INTERVAL '1 day')::date
           AND COALESCE(tender_type, '') NOT LIKE '%決標%'
@@ -138,6 +143,9 @@ async def enrich_recent(
     if not rows:
         return stats
 
+    from .warehouse import record_award, refresh_org_aggregates
+    touched_orgs: set = set()
+
     async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
         for r in rows:
             try:
@@ -174,6 +182,14 @@ async def enrich_recent(
                     "now": datetime.now(),
                     "id": r.id,
                 })
+                # 廠商關聯寫入倉儲（bidders JSON 僅供詳情頁顯示，彙總以 tender_company_links 為準）
+                if det.get("bidders"):
+                    winners = det.get("winners") or []
+                    if await record_award(
+                        db, r.id, winners=winners,
+                        bidders=[b for b in det["bidders"] if b not in winners],
+                    ) and r.unit_name:
+                        touched_orgs.add(r.unit_name)
                 stats["enriched"] += 1
                 if r.budget is None and det.get("budget"):
                     stats["updated_budget"] += 1
@@ -181,6 +197,7 @@ async def enrich_recent(
                 logger.warning(f"enrich tender id={r.id} failed: {e}")
                 stats["errors"] += 1
             await asyncio.sleep(_THROTTLE_SEC)
+        await refresh_org_aggregates(db, touched_orgs)
         await db.commit()
     logger.info(f"tender enrich_recent done: {stats}")
     return stats
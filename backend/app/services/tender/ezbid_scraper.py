@@ -8,29 +8,38 @@ ezbid.tw 標案爬蟲 — 即時資料補充源
     scraper = EzbidScraper(redis_client)
     records = await scraper.fetch_latest(category='WORK', pages=2)
 
-Version: 1.0.0
+HTTP 走共用抓取引擎（scraper_engine）：連線池、節流、條件請求、行程池解析
+（解析函式在 app.utils.tender_parsers）。
+
+Version: 1.1.0
 """
 import asyncio
 import logging
-import re
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-import httpx
-from bs4 import BeautifulSoup
+from app.utils.tender_parsers import (
+    EZBID_BASE,
+    parse_budget,
+    parse_deadline,
+    parse_ezbid_html,
+    roc_to_date,
+)
 
 from .scraper_base import register_scraper
+from .scraper_engine import get_scraper_engine
 
 logger = logging.getLogger(__name__)
 
 # 2026-08-02：`cf.ezbid.tw` 已 301 永久搬到 `ezbid.tw`，且站台改版
 # （列表連結由 /tender/{id} 變成 /detail/{unit_id}/{job_number}，欄位移出 <a> 到 <tr>）。
 # 舊 code 不跟隨 301 → 每小時抓 0 筆、只記 warning 但 job 仍報 success
-# → **ezbid 自 2026-06-15 起 48 天無新資料，兩層監控都沒發現**（見 _parse_html 說明）。
-EZBID_BASE = "https://ezbid.tw"
-REQUEST_TIMEOUT = 15.0
+# → **ezbid 自 2026-06-15 起 48 天無新資料，兩層監控都沒發現**（見 parse_ezbid_html 說明）。
+# EZBID_BASE 定義在 app.utils.tender_parsers（解析產生 ezbid_url 也要用）。
 MAX_RETRIES = 3
 BACKOFF_BASE = 2.0
+# get_today_all 全量爬取頁數上限（每頁 100 筆）
+TODAY_MAX_PAGES = 10
 # P1-4 (2026-05-27)：5 → 3 — 縮短 silent window 從 ~5h → ~3h，配合 Prometheus alert
 BLOCK_THRESHOLD = 3
 
@@ -142,31 +151,7 @@ class EzbidScraper:
             except Exception:
                 pass
 
-        # 全量爬取: 10 頁 × 100 筆 (並行 + 節流，避免被封鎖)
-        import asyncio as _aio
-
-        async def _fetch_batch(pages):
-            """批次並行抓取，每批 3 頁"""
-            return await _aio.gather(
-                *[self._fetch_page(None, "ALL", p, 100) for p in pages],
-                return_exceptions=True,
-            )
-
-        all_records = []
-        # 分 4 批：[1,2,3], [4,5,6], [7,8,9], [10]
-        for batch_start in range(1, 11, 3):
-            batch_pages = list(range(batch_start, min(batch_start + 3, 11)))
-            batch_results = await _fetch_batch(batch_pages)
-            batch_empty = True
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    continue
-                if result:
-                    all_records.extend(result)
-                    batch_empty = False
-            if batch_empty:
-                break  # No more data
-            await _aio.sleep(0.3)  # 節流間隔
+        all_records = await self._crawl_today()
 
         result = {
             "total": len(all_records),
@@ -189,6 +174,18 @@ class EzbidScraper:
         logger.info("ezbid today fetched: %d records (cached 15min)", len(all_records))
         return result
 
+    async def _crawl_today(self, max_pages: int = TODAY_MAX_PAGES) -> List[Dict[str, Any]]:
+        """全量爬取今日列表（每頁 100 筆），遇到空頁即停；重試用盡的頁面跳過。
+
+        原本 3 頁一批 gather + 固定 sleep 0.3s：一批內最慢的一頁拖住下一批。
+        改由共用引擎分頁：token bucket 控平均速率、在途頁數跟著自適應併發上限走。
+        """
+        return await get_scraper_engine().paginate(
+            "ezbid",
+            lambda page: self._fetch_page(None, "ALL", page, 100, raise_on_error=True),
+            max_pages,
+        )
+
     async def fetch_for_keywords(
         self, keywords: List[str], category: str = "ALL",
     ) -> Dict[str, Any]:
@@ -223,8 +220,14 @@ class EzbidScraper:
 
     async def _fetch_page(
         self, query: Optional[str], category: str, page: int, per_page: int,
+        raise_on_error: bool = False,
     ) -> List[Dict[str, Any]]:
-        """爬取單頁 (含重試/退避/封鎖偵測)"""
+        """爬取單頁 (含重試/退避/封鎖偵測)
+
+        raise_on_error: 重試用盡（網路錯誤 / 持續 429、503）時拋例外而非回傳 []，
+        讓分頁把它當「這頁失敗」跳過，而不是「沒有下一頁」。封鎖（403 / captcha）
+        與其他 HTTP 錯誤仍回傳 []，結束整輪抓取。
+        """
         # 連續失敗過多，跳過以避免洪水請求
         if self._consecutive_failures >= BLOCK_THRESHOLD:
             logger.error(
@@ -242,51 +245,50 @@ class EzbidScraper:
         if page > 1:
             params["page"] = page
 
+        engine = get_scraper_engine()
         last_error: Optional[Exception] = None
         for attempt in range(MAX_RETRIES):
             try:
-                # follow_redirects：對端換網域時不要靜默抓 0 筆（2026-08-02 實際踩到）
-                async with httpx.AsyncClient(
-                    timeout=REQUEST_TIMEOUT, follow_redirects=True
-                ) as client:
-                    resp = await client.get(EZBID_BASE, params=params)
-
-                    # 封鎖偵測: 403 或回應含 captcha/block 關鍵字
-                    if resp.status_code == 403:
-                        logger.warning("ezbid 可能已封鎖 IP (HTTP 403)")
-                        self._record_failure("http_403")
-                        return []
-
-                    # 2026-08-03：原本判斷是 `"block" in body_lower`，會被 Bootstrap 的
-                    # `d-inline-block` / `d-md-block` 等 CSS class 命中 → 正常頁面被當成
-                    # 封鎖、直接放棄整批抓取。之所以沒天天爆，只因為它只看前 2000 字元，
-                    # 而那段剛好落在 <head>；CSS class 往前挪一點就會誤觸發 ——
-                    # 也就是「目前正常」純屬運氣。改為比對明確的封鎖語句。
-                    body_lower = resp.text[:2000].lower()
-                    hit = next((s for s in BLOCK_SIGNATURES if s in body_lower), None)
-                    if hit:
-                        logger.warning(f"ezbid 可能已封鎖 IP（偵測到 '{hit}'）")
-                        self._record_failure("captcha")
-                        return []
-
-                    # 可重試的 HTTP 狀態碼
-                    if resp.status_code in (429, 503):
-                        wait = BACKOFF_BASE ** attempt
-                        logger.warning(
-                            f"ezbid HTTP {resp.status_code}, 重試 {attempt + 1}/{MAX_RETRIES} "
-                            f"(等待 {wait:.1f}s)"
-                        )
-                        await asyncio.sleep(wait)
-                        continue
-
-                    if resp.status_code != 200:
-                        logger.warning(f"ezbid HTTP {resp.status_code}")
-                        self._record_failure(f"http_{resp.status_code}")
-                        return []
-
-                    # 成功
-                    self._record_success()
-                    return self._parse_html(resp.text)
+                # 共用引擎：連線池 + token bucket 節流 + 條件請求；client 一律 follow_redirects
+                # （對端換網域時不要靜默抓 0 筆，2026-08-02 實際踩到）
+                resp = await engine.fetch("ezbid", EZBID_BASE, params=params)
+
+                # 封鎖偵測: 403 或回應含 captcha/block 關鍵字
+                if resp.status_code == 403:
+                    logger.warning("ezbid 可能已封鎖 IP (HTTP 403)")
+                    self._record_failure("http_403")
+                    return []
+
+                # 2026-08-03：原本判斷是 `"block" in body_lower`，會被 Bootstrap 的
+                # `d-inline-block` / `d-md-block` 等 CSS class 命中 → 正常頁面被當成
+                # 封鎖、直接放棄整批抓取。之所以沒天天爆，只因為它只看前 2000 字元，
+                # 而那段剛好落在 <head>；CSS class 往前挪一點就會誤觸發 ——
+                # 也就是「目前正常」純屬運氣。改為比對明確的封鎖語句。
+                body_lower = resp.text[:2000].lower()
+                hit = next((s for s in BLOCK_SIGNATURES if s in body_lower), None)
+                if hit:
+                    logger.warning(f"ezbid 可能已封鎖 IP（偵測到 '{hit}'）")
+                    self._record_failure("captcha")
+                    return []
+
+                # 可重試的 HTTP 狀態碼
+                if resp.status_code in (429, 503):
+                    wait = BACKOFF_BASE ** attempt
+                    logger.warning(
+                        f"ezbid HTTP {resp.status_code}, 重試 {attempt + 1}/{MAX_RETRIES} "
+                        f"(等待 {wait:.1f}s)"
+                    )
+                    await asyncio.sleep(wait)
+                    continue
+
+                if resp.status_code != 200:
+                    logger.warning(f"ezbid HTTP {resp.status_code}")
+                    self._record_failure(f"http_{resp.status_code}")
+                    return []
+
+                # 成功
+                self._record_success()
+                return await engine.parse(resp, parse_ezbid_html)
 
             except Exception as e:
                 last_error = e
@@ -305,6 +307,8 @@ class EzbidScraper:
             logger.error(
                 f"ezbid 爬蟲連續失敗 {self._consecutive_failures} 次，可能需要人工介入"
             )
+        if raise_on_error:
+            raise RuntimeError(f"ezbid page {page} failed after {MAX_RETRIES} retries") from last_error
         return []
 
     # ────────── P1-4 (2026-05-27) Prometheus 計數輔助 ──────────
@@ -332,113 +336,12 @@ class EzbidScraper:
         except Exception:
             pass
 
-    def _parse_html(self, html: str) -> List[Dict[str, Any]]:
-        """解析 ezbid HTML，提取標案列表。
-
-        2026-08-02 重寫（站台改版）：
-        - 舊版：整列資訊塞在 `<a href="/tender/{id}">` 的文字裡，用位置索引切 8 段。
-        - 新版：`<a href="/detail/{unit_id}/{job_number}">` 只剩標題，其餘欄位在同一 `<tr>`。
-          新版反而更好——它直接給 PCC 的 unit_id/job_number，可直接與 PCC 對應（ADR-0046）。
-
-        欄位改用**特徵定位**而非固定索引：實測列可能有押標金也可能沒有，
-        寫死索引會在部分列上整排錯位（舊版就是這樣寫的）。
-        """
-        soup = BeautifulSoup(html, "html.parser")
-        records: List[Dict[str, Any]] = []
-
-        for row in soup.find_all("tr"):
-            try:
-                link = row.find("a", href=lambda h: h and "/detail/" in h)
-                if not link:
-                    continue
-                m = re.search(r"/detail/([^/]+)/([^/?#\"]+)", link.get("href", ""))
-                if not m:
-                    continue
-
-                unit_id, job_number = m.group(1), m.group(2)
-                title = link.get_text(strip=True)
-                if not title:
-                    continue
-
-                parts = [
-                    p.strip()
-                    for p in row.get_text(separator="|||", strip=True).split("|||")
-                    if p.strip()
-                ]
-
-                # 特徵定位（缺欄位時只影響該欄，不會整排位移）
-                status = parts[0] if parts else ""
-                roc_date = next((p for p in parts if re.match(r"^\d{2,3}/\d{2}/\d{2}$", p)), "")
-                deadline_text = next((p for p in parts if "天" in p or "截止" in p), "")
-                category = next((p for p in parts if p.endswith("類")), "")
-
-                # 機關：標題的前一段（該列由「機關上層 → 機關 → 標題」排列）
-                unit_name = ""
-                if title in parts:
-                    idx = parts.index(title)
-                    if idx > 0:
-                        unit_name = parts[idx - 1]
-
-                # 預算：'$' 之後那一段（舊版靠 parts[7]，改版後必錯）
-                budget_str = ""
-                if "$" in parts:
-                    bidx = parts.index("$")
-                    if bidx + 1 < len(parts):
-                        budget_str = parts[bidx + 1]
-
-                records.append({
-                    # 複合鍵當 ezbid_id（欄位為 varchar(50)，PCC key 遠短於此）
-                    "ezbid_id": f"{unit_id}/{job_number}"[:50],
-                    "unit_id": unit_id,
-                    "job_number": job_number,
-                    "title": title,
-                    "date": self._roc_to_date(roc_date),
-                    "unit_name": unit_name,
-                    "category": category.replace("類", ""),
-                    "type": "公開招標公告" if status == "公告" else status,
-                    "status": status,
-                    "budget": self._parse_budget(budget_str),
-                    "days_left": self._parse_deadline(deadline_text),
-                    "deadline_text": deadline_text,
-                    "ezbid_url": f"{EZBID_BASE}/detail/{unit_id}/{job_number}",
-                    "source": "ezbid",
-                })
-
-            except Exception as e:
-                logger.debug(f"Parse tender failed: {e}")
-                continue
-
-        return records
-
-    @staticmethod
-    def _roc_to_date(roc_str: str) -> str:
-        """ROC 日期 (115/04/07) → 西元 (2026-04-07)"""
-        match = re.match(r"(\d{2,3})/(\d{2})/(\d{2})", roc_str)
-        if not match:
-            return ""
-        year = int(match.group(1)) + 1911
-        return f"{year}-{match.group(2)}-{match.group(3)}"
-
-    @staticmethod
-    def _parse_budget(budget_str: str) -> Optional[int]:
-        """解析預算金額"""
-        cleaned = budget_str.replace(",", "").strip()
-        try:
-            return int(cleaned) if cleaned.isdigit() else None
-        except ValueError:
-            return None
-
-    @staticmethod
-    def _parse_deadline(text: str) -> Optional[int]:
-        """解析截止天數"""
-        match = re.search(r"剩\s*(\d+)\s*天", text)
-        if match:
-            return int(match.group(1))
-        if "已截止" in text:
-            return 0
-        if "今日截止" in text:
-            return 0
-        return None
+    # 解析函式放在無 app 依賴的葉模組（spawn 行程池 worker 只需 import 它）；
+    # 保留 staticmethod 別名供既有呼叫端 / 測試使用
+    _parse_html = staticmethod(parse_ezbid_html)
+    _roc_to_date = staticmethod(roc_to_date)
+    _parse_budget = staticmethod(parse_budget)
+    _parse_deadline = staticmethod(parse_deadline)
 
     # =========================================================================
     # Redis 快取
@@ -6,7 +6,8 @@ Tender Scraper Abstract Base + Registry
 
 抽象出兩個 scraper 重複的 ~30L boilerplate：
 - Redis cache 取/設邏輯（`_get_cache_value` / `_set_cache_value`）
-- HTTP fetch with retry + exponential backoff（`_fetch_with_retry`）
+- HTTP fetch with retry + exponential backoff（`_fetch_with_retry`，
+  經共用抓取引擎 scraper_engine：連線池 / 節流 / 條件請求）
 - consecutive_failures 追蹤（給 Prometheus alert / circuit breaker）
 - 統一 Prometheus metric 記錄（成功/失敗計數）
 
@@ -34,6 +35,8 @@ from typing import Any, Callable, Dict, List, Optional
 
 import httpx
 
+from .scraper_engine import get_scraper_engine
+
 logger = logging.getLogger(__name__)
 
 
@@ -192,49 +195,46 @@ class TenderScraperBase(ABC):
         params: Optional[Dict[str, Any]] = None,
         max_retries: Optional[int] = None,
     ) -> Optional[str]:
-        """HTTP fetch with exponential backoff retry。
+        """HTTP fetch with exponential backoff retry（走共用抓取引擎的連線池與節流）。
 
         回傳 response.text，失敗回 None（並 increment consecutive_failures）。
         """
         retries = max_retries if max_retries is not None else self.max_retries
         last_error: Optional[Exception] = None
+        engine = get_scraper_engine()
 
-        async with httpx.AsyncClient(timeout=self.request_timeout, follow_redirects=True) as client:
-            for attempt in range(retries):
-                try:
-                    if method.upper() == "GET":
-                        r = await client.get(url, headers=headers or {}, params=params or {})
-                    else:
-                        r = await client.request(method, url, headers=headers or {}, params=params or {})
-
-                    if r.status_code == 200:
-                        # 成功 — reset failure counter
-                        self._consecutive_failures = 0
-                        self._record_metric(success=True)
-                        return r.text
-
-                    if 500 <= r.status_code < 600 and attempt < retries - 1:
-                        # 5xx retry
-                        await asyncio.sleep(self.backoff_base ** attempt)
-                        continue
-
-                    # 4xx / 其他 — 不 retry
-                    logger.warning(
-                        f"[{self.source_name}] HTTP {r.status_code} on {url[:80]}"
-                    )
-                    last_error = httpx.HTTPStatusError(
-                        f"HTTP {r.status_code}", request=r.request, response=r
-                    )
-                    break
-                except (httpx.TimeoutException, httpx.NetworkError) as e:
-                    last_error = e
-                    if attempt < retries - 1:
-                        await asyncio.sleep(self.backoff_base ** attempt)
-                        continue
-                except Exception as e:
-                    last_error = e
-                    logger.error(f"[{self.source_name}] 未預期錯誤 on {url[:80]}: {e}")
-                    break
+        for attempt in range(retries):
+            try:
+                r = await engine.fetch(
+                    self.source_name, url, method=method, params=params, headers=headers,
+                    timeout=self.request_timeout,
+                )
+
+                if r.status_code == 200:
+                    # 成功 — reset failure counter
+                    self._consecutive_failures = 0
+                    self._record_metric(success=True)
+                    return r.text
+
+                if 500 <= r.status_code < 600 and attempt < retries - 1:
+                    # 5xx retry
+                    await asyncio.sleep(self.backoff_base ** attempt)
+                    continue
+
+                # 4xx / 其他 — 不 retry
+                logger.warning(
+                    f"[{self.source_name}] HTTP {r.status_code} on {url[:80]}"
+                )
+                break
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                last_error = e
+                if attempt < retries - 1:
+                    await asyncio.sleep(self.backoff_base ** attempt)
+                    continue
+            except Exception as e:
+                last_error = e
+                logger.error(f"[{self.source_name}] 未預期錯誤 on {url[:80]}: {e}")
+                break
 
         # 全部 retry 用盡
         self._consecutive_failures += 1
@@ -0,0 +1,493 @@
+"""
+Tender 爬蟲共用抓取引擎
+
+ezbid / PCC 今日 / openfun API / TenderScraperBase 原本每個請求都
+``async with httpx.AsyncClient()``（每頁重做 TCP + TLS 握手），ezbid 全量
+以「3 頁一批 + 固定 sleep 0.3s」節流，BeautifulSoup 解析跑在 event loop 上。
+統一改走本引擎：
+
+- 每個 host 一個長壽 client（keep-alive 連線池；PCC 另開 verify=False 的 client）
+- 每個 source 一個 token bucket（平均速率 + burst），取代固定 sleep
+- 每個 source 一個 AIMD 自適應併發上限：連續成功 +1，429 / 503 / timeout 減半
+- ETag / Last-Modified 條件請求：304 時沿用上次內容與解析結果，不重抓不重解析
+- HTML 解析丟到行程池：100 筆的 ezbid 頁面 html.parser 約 0.5s CPU，
+  thread 受 GIL 所限既不平行也擋不住 event loop 停頓
+
+重試 / 封鎖偵測 / 失敗計數仍由各 scraper 自己負責（語意各不相同），
+引擎只管「怎麼送請求」與「在哪裡解析」。
+
+Source 設定可用環境變數覆寫：
+    SCRAPER_<SOURCE>_RATE / _BURST / _MAX_CONCURRENCY / _TIMEOUT
+    SCRAPER_PARSE_WORKERS（解析 worker 數，預設 2）
+    SCRAPER_PARSE_EXECUTOR（process / thread，預設 process；thread 供測試或受限環境）
+    SCRAPER_CONDITIONAL_CACHE_SIZE（條件請求快取 URL 數，預設 64）
+
+解析函式須可 pickle，且放在不 import app.* 的葉模組（如 app.utils.tender_parsers）：
+spawn worker 反序列化時會 import 函式所在模組，放在 app.services 底下會拖進整個
+service 套件。client / 鎖綁定建立時的
+event loop；lifespan shutdown 呼叫 ``close_scraper_engine()``。
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+import asyncio
+import copy
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 對端要求放慢：觸發併發上限減半
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+@dataclass(frozen=True)
+class SourcePolicy:
+    """單一資料來源的節流設定"""
+
+    rate: float            # token 補充速度（請求 / 秒）
+    burst: int             # 桶容量（瞬間最多連發幾個）
+    max_concurrency: int   # 自適應併發上限的天花板
+    min_concurrency: int = 1
+    timeout: float = 15.0
+    verify: bool = True
+
+
+DEFAULT_POLICIES: Dict[str, SourcePolicy] = {
+    # 舊行為：3 頁並行後 sleep 0.3s ≈ 每秒 5~6 頁 —— 平均速率不變，只是不再整批空等
+    "ezbid": SourcePolicy(rate=5.0, burst=3, max_concurrency=4, timeout=15.0),
+    # PCC 憑證缺 Subject Key Identifier，只能關驗證；今日頁面單頁，不需高併發
+    "pcc": SourcePolicy(rate=1.0, burst=2, max_concurrency=2, timeout=30.0, verify=False),
+    "pcc_api": SourcePolicy(rate=5.0, burst=5, max_concurrency=4, timeout=15.0),
+}
+DEFAULT_POLICY = SourcePolicy(rate=2.0, burst=2, max_concurrency=2)
+
+
+def load_source_policy(source: str) -> SourcePolicy:
+    """讀取 source 預設值並套用環境變數覆寫。"""
+    base = DEFAULT_POLICIES.get(source, DEFAULT_POLICY)
+    prefix = f"SCRAPER_{source.upper()}_"
+
+    def _num(key: str, default, cast):
+        raw = os.getenv(prefix + key)
+        if not raw:
+            return default
+        try:
+            return cast(raw)
+        except ValueError:
+            logger.warning("%s%s=%r 無效，沿用預設 %s", prefix, key, raw, default)
+            return default
+
+    return replace(
+        base,
+        rate=_num("RATE", base.rate, float),
+        burst=_num("BURST", base.burst, int),
+        max_concurrency=_num("MAX_CONCURRENCY", base.max_concurrency, int),
+        timeout=_num("TIMEOUT", base.timeout, float),
+    )
+
+
+class TokenBucket:
+    """平均 ``rate`` 次 / 秒、最多連發 ``burst`` 次；等待者依到達順序放行。"""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = max(rate, 1e-6)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """取得一個 token，回傳等待秒數。"""
+        async with self._lock:
+            self._refill()
+            waited = 0.0
+            if self._tokens < 1.0:
+                waited = (1.0 - self._tokens) / self.rate
+                await asyncio.sleep(waited)
+                self._refill()
+            self._tokens -= 1.0
+            return waited
+
+
+class AdaptiveLimiter:
+    """AIMD 併發上限：連續 ``limit`` 次成功 +1，被限流時減半（不低於 min）。
+
+    release 為同步呼叫：在 finally / 任務取消路徑上也不會漏減 in_flight。
+    """
+
+    def __init__(self, min_limit: int, max_limit: int):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = max(self.min_limit, self.max_limit // 2)
+        self.in_flight = 0
+        self._successes = 0
+        self._waiters: List["asyncio.Future[None]"] = []
+
+    async def acquire(self) -> None:
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, outcome: str) -> None:
+        """outcome: ok / throttled / error（error 不調整上限）"""
+        self.in_flight -= 1
+        if outcome == "throttled":
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+        elif outcome == "ok":
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+        # 全部喚醒各自重新檢查（等待者個位數，不必精準挑選）
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+@dataclass
+class _Validated:
+    """條件請求快取項：上次 200 的 validator、內容與各 parser 的解析結果"""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content: bytes
+    encoding: Optional[str]
+    parsed: Dict[str, Any] = field(default_factory=dict)
+
+
+class ConditionalCache:
+    """以完整 URL（含 query）為鍵的 LRU；只收有 ETag / Last-Modified 的回應"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, _Validated]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[_Validated]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: _Validated) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class FetchResult:
+    """引擎回應；304 時 status_code 仍為 200、內容取自快取，``not_modified=True``"""
+
+    status_code: int
+    content: bytes
+    encoding: Optional[str] = None
+    not_modified: bool = False
+    cache_key: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+@dataclass
+class _SourceState:
+    policy: SourcePolicy
+    bucket: TokenBucket
+    limiter: AdaptiveLimiter
+    requests: int = 0
+    not_modified: int = 0
+    throttled: int = 0
+    rate_wait: float = 0.0
+
+
+class ScraperEngine:
+    """所有 tender 爬蟲共用的抓取引擎（每個 event loop 一組 client / 節流狀態）"""
+
+    def __init__(
+        self,
+        policies: Optional[Mapping[str, SourcePolicy]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        parse_workers: Optional[int] = None,
+        parse_executor: Optional[str] = None,
+        cache_size: Optional[int] = None,
+    ) -> None:
+        self._policies = dict(policies or {})
+        self._transport = transport  # 測試 / benchmark 注入
+        self._parse_workers = parse_workers or max(1, int(os.getenv("SCRAPER_PARSE_WORKERS", "2")))
+        self._cache = ConditionalCache(
+            cache_size or int(os.getenv("SCRAPER_CONDITIONAL_CACHE_SIZE", "64"))
+        )
+        self._parse_mode = parse_executor or os.getenv("SCRAPER_PARSE_EXECUTOR", "process")
+        self._executor: Optional[Executor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[Tuple[str, str, bool], httpx.AsyncClient] = {}
+        self._sources: Dict[str, _SourceState] = {}
+
+    # ------------------------------------------------------------------ 狀態
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # client 連線與 asyncio 鎖都綁 loop；換 loop（測試 / reload）時整組重建
+            self._loop = loop
+            self._clients = {}
+            self._sources = {}
+
+    def policy(self, source: str) -> SourcePolicy:
+        return self._policies.get(source) or load_source_policy(source)
+
+    def _state(self, source: str) -> _SourceState:
+        self._bind_loop()
+        state = self._sources.get(source)
+        if state is None:
+            policy = self.policy(source)
+            state = _SourceState(
+                policy=policy,
+                bucket=TokenBucket(policy.rate, policy.burst),
+                limiter=AdaptiveLimiter(policy.min_concurrency, policy.max_concurrency),
+            )
+            self._sources[source] = state
+        return state
+
+    def _client(self, url: httpx.URL, policy: SourcePolicy) -> httpx.AsyncClient:
+        key = (url.scheme, url.netloc.decode("ascii"), policy.verify)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=max(policy.max_concurrency * 2, 4),
+                max_keepalive_connections=max(policy.max_concurrency, 2),
+                keepalive_expiry=30.0,
+            )
+            if self._transport is not None:
+                client = httpx.AsyncClient(transport=self._transport, follow_redirects=True)
+            else:
+                client = httpx.AsyncClient(
+                    limits=limits, verify=policy.verify, follow_redirects=True,
+                )
+            self._clients[key] = client
+        return client
+
+    def concurrency(self, source: str) -> int:
+        """source 目前的自適應併發上限（分頁抓取用來決定同時開幾頁）"""
+        return self._state(source).limiter.limit
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            source: {
+                "limit": s.limiter.limit,
+                "in_flight": s.limiter.in_flight,
+                "requests": s.requests,
+                "not_modified": s.not_modified,
+                "throttled": s.throttled,
+                "rate_wait_seconds": round(s.rate_wait, 3),
+            }
+            for source, s in self._sources.items()
+        }
+
+    # ------------------------------------------------------------------ 抓取
+
+    async def fetch(
+        self,
+        source: str,
+        url: str,
+        *,
+        method: str = "GET",
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: Optional[float] = None,
+        conditional: bool = True,
+    ) -> FetchResult:
+        """送出一次請求（不重試）。網路例外照常拋出，由呼叫端的重試邏輯處理。
+
+        條件請求只用於 GET；``timeout`` 未給時用 source 設定。
+        """
+        state = self._state(source)
+        method = method.upper()
+        full_url = httpx.URL(url, params=params) if params else httpx.URL(url)
+        client = self._client(full_url, state.policy)
+        cache_key = str(full_url) if conditional and method == "GET" else None
+        entry = self._cache.get(cache_key) if cache_key else None
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+
+        await state.limiter.acquire()
+        outcome = "error"
+        try:
+            state.rate_wait += await state.bucket.acquire()
+            state.requests += 1
+            resp = await client.request(
+                method, full_url, headers=request_headers,
+                timeout=timeout if timeout is not None else state.policy.timeout,
+            )
+            outcome = "throttled" if resp.status_code in THROTTLE_STATUSES else "ok"
+        except httpx.TimeoutException:
+            outcome = "throttled"
+            raise
+        finally:
+            if outcome == "throttled":
+                state.throttled += 1
+            state.limiter.release(outcome)
+
+        if resp.status_code == 304 and entry is not None:
+            state.not_modified += 1
+            return FetchResult(200, entry.content, entry.encoding, not_modified=True, cache_key=cache_key)
+
+        etag = resp.headers.get("etag")
+        last_modified = resp.headers.get("last-modified")
+        if cache_key and resp.status_code == 200 and (etag or last_modified):
+            self._cache.put(cache_key, _Validated(etag, last_modified, resp.content, resp.encoding))
+        return FetchResult(resp.status_code, resp.content, resp.encoding, cache_key=cache_key)
+
+    # ------------------------------------------------------------------ 解析
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._parse_mode == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._parse_workers, thread_name_prefix="scraper-parse",
+                )
+            else:
+                # spawn：避免 fork 帶著執行中的 event loop / 連線池進入子行程
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._parse_workers, mp_context=multiprocessing.get_context("spawn"),
+                )
+            logger.info("[ScraperEngine] 解析池啟動: %s workers=%d", self._parse_mode, self._parse_workers)
+        return self._executor
+
+    def _shutdown_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def offload(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在解析池執行同步函式（BeautifulSoup / regex 等 CPU 工作）。
+
+        行程池崩潰（worker 被 OOM kill 等）時丟棄重建，本次改在 thread 執行。
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            logger.warning("[ScraperEngine] 解析行程池異常，重建並改以 thread 完成本次解析")
+            self._shutdown_executor()
+            return await asyncio.to_thread(fn, *args)
+
+    async def parse(self, result: FetchResult, parser: Callable[[str], Any]) -> Any:
+        """在解析池執行 ``parser(result.text)``。
+
+        回應未變（304）且同一 parser 解析過時直接回傳上次結果的副本；
+        呼叫端常會就地修改 record（如 matched_keyword），故不共用同一物件。
+        """
+        name = getattr(parser, "__qualname__", repr(parser))
+        entry = self._cache.get(result.cache_key) if result.cache_key else None
+        if result.not_modified and entry is not None and name in entry.parsed:
+            return copy.deepcopy(entry.parsed[name])
+
+        parsed = await self.offload(parser, result.text)
+        if entry is not None and entry.content is result.content:
+            entry.parsed[name] = copy.deepcopy(parsed)
+        return parsed
+
+    # ------------------------------------------------------------------ 分頁
+
+    async def paginate(
+        self,
+        source: str,
+        fetch_page: Callable[[int], Awaitable[List[Any]]],
+        max_pages: int,
+    ) -> List[Any]:
+        """依序抓 1..max_pages 頁，同時在途頁數跟隨 source 的自適應併發上限。
+
+        某頁回傳空即視為最後一頁：不再排新頁，之後的頁面結果丟棄。
+        某頁拋例外只跳過該頁（記 warning）繼續往下抓——暫時性失敗不該截斷整輪；
+        不想繼續的失敗（如被封鎖）由 fetch_page 回傳空來結束。
+        回傳依頁序串接的 records。
+        """
+        results: Dict[int, List[Any]] = {}
+        pending: Dict["asyncio.Task[List[Any]]", int] = {}
+        stop_at = max_pages + 1
+        next_page = 1
+        try:
+            while pending or next_page < stop_at:
+                while next_page < stop_at and len(pending) < self.concurrency(source):
+                    pending[asyncio.create_task(fetch_page(next_page))] = next_page
+                    next_page += 1
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page = pending.pop(task)
+                    if task.exception() is not None:
+                        logger.warning("[ScraperEngine] %s 第 %d 頁失敗，跳過: %s", source, page, task.exception())
+                        continue
+                    records = task.result()
+                    if records:
+                        results[page] = records
+                    else:
+                        stop_at = min(stop_at, page)
+                for task in [t for t, p in pending.items() if p > stop_at]:
+                    task.cancel()
+                    pending.pop(task)
+        finally:
+            for task in pending:
+                task.cancel()
+        return [r for page in sorted(results) if page < stop_at for r in results[page]]
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients = {}
+        self._sources = {}
+        self._loop = None
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug("scraper client close failed: %s", e)
+        self._shutdown_executor()
+
+
+_engine: Optional[ScraperEngine] = None
+
+
+def get_scraper_engine() -> ScraperEngine:
+    global _engine
+    if _engine is None:
+        _engine = ScraperEngine()
+    return _engine
+
+
+async def close_scraper_engine() -> None:
+    """關閉共用 client 與解析池（lifespan shutdown 呼叫）。"""
+    if _engine is not None:
+        await _engine.aclose()
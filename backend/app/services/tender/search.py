@@ -14,8 +14,6 @@ import json
 from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 
-import httpx
-
 from .data_transformer import (
     normalize_record,
     normalize_detail,
@@ -24,11 +22,11 @@ from .data_transformer import (
     parse_amount,
     build_tender_graph,
 )
+from .scraper_engine import get_scraper_engine
 
 logger = logging.getLogger(__name__)
 
 PCC_API_BASE = "https://pcc-api.openfun.app/api"
-REQUEST_TIMEOUT = 15.0
 
 # 乾坤測繪核心業務關鍵字 (用於智能推薦)
 CK_BUSINESS_KEYWORDS = [
@@ -57,6 +55,7 @@ class TenderSearchService:
         query: str,
         page: int = 1,
         category: Optional[str] = None,
+        persist: bool = True,
     ) -> Dict[str, Any]:
         """
         依標題搜尋標案
@@ -65,6 +64,7 @@ class TenderSearchService:
             query: 搜尋關鍵字
             page: 頁碼 (1-based)
             category: 分類篩選 (工程/勞務/財物)
+            persist: 即時結果是否背景回寫倉儲（多頁 fan-out 由呼叫端彙整後一次寫入）
 
         Returns:
             {query, page, total_records, total_pages, records: [...]}
@@ -112,7 +112,11 @@ class TenderSearchService:
             records = [r for r in records if self._match_category(r, category)]
 
         from .data_transformer import dedup_records
+        from .warehouse import persist_in_background
         normalized = [self._normalize_record(r) for r in records]
+        # 即時結果回寫本地倉儲（含得標/投標廠商），下次同類查詢走 DB-first
+        if persist:
+            persist_in_background(normalized, source="pcc")
         result = {
             "query": query,
             "page": data.get("page", page),
@@ -230,9 +234,9 @@ class TenderSearchService:
         return result
 
     async def search_by_org(
-        self, org_name: str, page: int = 1
+        self, org_name: str, page: int = 1, persist: bool = True,
     ) -> Dict[str, Any]:
-        """依機關名稱搜尋標案"""
+        """依機關名稱搜尋標案（persist 同 search_by_title）"""
         cache_key = f"tender:org:{org_name}:{page}"
         cached = await self._get_cache(cache_key)
         if cached:
@@ -244,14 +248,18 @@ class TenderSearchService:
         data = await self._fetch(url, params)
         if not data:
             # Fallback: 用標題搜尋
-            return await self.search_by_title(query=org_name, page=page)
+            return await self.search_by_title(query=org_name, page=page, persist=persist)
 
+        from .warehouse import persist_in_background
+        records = [self._normalize_record(r) for r in data.get("records", [])]
+        if persist:
+            persist_in_background(records, source="pcc")
         result = {
             "query": org_name,
             "page": data.get("page", page),
             "total_records": data.get("total_records", 0),
             "total_pages": data.get("total_pages", 0),
-            "records": [self._normalize_record(r) for r in data.get("records", [])],
+            "records": records,
         }
 
         await self._set_cache(cache_key, result, ttl=1800)
@@ -274,12 +282,15 @@ class TenderSearchService:
             return {"query": company_name, "page": page, "total_records": 0, "records": []}
 
         from .data_transformer import dedup_records
+        from .warehouse import persist_in_background
+        records = [self._normalize_record(r) for r in data.get("records", [])]
+        persist_in_background(records, source="pcc")
         result = {
             "query": company_name,
             "page": data.get("page", page),
             "total_records": data.get("total_records", 0),
             "total_pages": data.get("total_pages", 0),
-            "records": dedup_records([self._normalize_record(r) for r in data.get("records", [])]),
+            "records": dedup_records(records),
         }
 
         await self._set_cache(cache_key, result, ttl=1800)
@@ -367,26 +378,26 @@ class TenderSearchService:
         """HTTP GET with timeout and error handling
 
         PCC API 偶爾以 Big5 編碼回傳，需嘗試多種 charset 解碼。
+        走共用抓取引擎（連線池 + 節流 + 條件請求），不再每次新建 client。
         """
         import json as _json
         try:
-            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-                resp = await client.get(url, params=params)
-                if resp.status_code != 200:
-                    logger.warning(f"PCC API {resp.status_code}: {url} {params}")
-                    return None
-
-                # 嘗試按 response charset 解碼，回退 utf-8 → big5
-                content = resp.content
-                for encoding in ("utf-8", "big5", "latin-1"):
-                    try:
-                        text = content.decode(encoding)
-                        return _json.loads(text)
-                    except (UnicodeDecodeError, _json.JSONDecodeError):
-                        continue
-
-                logger.warning(f"PCC API all decode attempts failed: {url}")
+            resp = await get_scraper_engine().fetch("pcc_api", url, params=params)
+            if resp.status_code != 200:
+                logger.warning(f"PCC API {resp.status_code}: {url} {params}")
                 return None
+
+            # 嘗試按 response charset 解碼，回退 utf-8 → big5
+            content = resp.content
+            for encoding in ("utf-8", "big5", "latin-1"):
+                try:
+                    text = content.decode(encoding)
+                    return _json.loads(text)
+                except (UnicodeDecodeError, _json.JSONDecodeError):
+                    continue
+
+            logger.warning(f"PCC API all decode attempts failed: {url}")
+            return None
         except Exception as e:
             logger.error(f"PCC API error: {e}")
             return None
@@ -0,0 +1,617 @@
+"""
+標案本地倉儲 — 冪等 upsert + 機關/廠商得標彙總
+
+org_ecosystem / battle_room / recommend_tenders 原本每次請求都對 openfun
+打 5~10 頁 search_by_org / search_by_title，DB 只在外部失敗時當後備；
+而 save_search_results 是「先 SELECT、已存在就跳過」，同一標案後來的決標公告、
+得標廠商永遠寫不進來，DB 也就一直缺得標維度（_db_org_fallback 只能回 degraded）。
+
+本模組：
+- upsert_tenders(): 爬蟲（PccTodayScraper / EzbidScraper）與即時查詢結果批次
+  INSERT ... ON CONFLICT 寫入 tender_records；稀疏來源不會清空已補齊的欄位，
+  內容未變的列不重寫（WHERE ... IS DISTINCT FROM）；廠商關聯同樣 ON CONFLICT
+- record_award(): 詳情 enrichment / 決標狀態更新寫入得標、投標廠商
+- refresh_org_aggregates(): 依本次受影響的機關增量重算
+  tender_org_vendor_stats / tender_org_year_stats（PG materialized view 只能整份
+  REFRESH，故以彙總表 + 逐機關 DELETE/INSERT 實作增量）
+- load_org_ecosystem(): 由彙總表回傳與 org_ecosystem 相同形狀的結果（毫秒級）
+- persist_in_background(): 即時查詢結果背景回寫，不阻塞回應；org_ecosystem 的
+  完整即時抓取寫入後另記「機關已同步」標記（is_org_synced / mark_org_synced），
+  標記有效期內才由倉儲回應，過期即重新即時抓取補齊
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, func, literal_column, or_, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.extended.models.tender_cache import TenderCompanyLink, TenderRecord
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+# org_ecosystem 完整即時抓取寫入倉儲後，該機關由倉儲回應的有效期（秒）。
+# 以「最近一次完整同步」而非倉儲筆數判斷：零星寫入的幾筆不代表該機關資料已齊。
+ORG_SYNC_TTL = int(os.getenv("TENDER_ORG_SYNC_TTL", "86400"))
+_ORG_SYNC_KEY = "tender:org_synced:{}"
+
+_RECORDS = TenderRecord.__table__
+_LINKS = TenderCompanyLink.__table__
+
+# upsert 的兩種鍵：有案號 → (unit_id, job_number) 部分唯一索引；否則 → ezbid_id
+KEY_UNIT_JOB = "unit_job"
+KEY_EZBID = "ezbid"
+
+_UNIT_JOB_WHERE = text("job_number IS NOT NULL AND job_number != ''")
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+# ---------------------------------------------------------------------------
+# 來源紀錄 → 欄位值（純函數）
+# ---------------------------------------------------------------------------
+
+def _parse_date(value) -> Optional[date]:
+    from .cache import _parse_date as parse
+    return parse(str(value)) if value else None
+
+
+def _parse_amount(value) -> Optional[float]:
+    from .cache import _parse_amount as parse
+    return parse(value)
+
+
+def _clip(value, limit: int) -> str:
+    return str(value or "")[:limit]
+
+
+def build_tender_row(
+    record: Mapping[str, Any], source: str,
+) -> Optional[Tuple[Tuple[str, ...], Dict[str, Any]]]:
+    """來源紀錄（PCC 今日 / ezbid / openfun normalize_record）→ (upsert 鍵, 欄位值)。
+
+    無標題、或既無案號也無 ezbid_id 的紀錄無法冪等寫入，回傳 None。
+    """
+    title = _clip(record.get("title"), 500)
+    if not title:
+        return None
+
+    unit_id = record.get("unit_id") or ""
+    job_number = _clip(record.get("job_number"), 100)
+    ezbid_id = record.get("ezbid_id")
+    ezbid_id = _clip(ezbid_id, 50) if ezbid_id else None
+
+    # 2026-04-24: ezbid 來源如果 unit_id 為空，fallback 到 ezbid_id
+    # 避免 DB 出現 unit_id='' 的壞資料（React rowKey 重複 + detail URL 404）
+    if not unit_id and ezbid_id:
+        unit_id = ezbid_id
+    unit_id = _clip(unit_id, 50)
+
+    if unit_id and job_number:
+        key: Tuple[str, ...] = (KEY_UNIT_JOB, unit_id, job_number)
+    elif ezbid_id:
+        key = (KEY_EZBID, ezbid_id)
+    else:
+        return None
+
+    tender_type = _clip(record.get("type"), 100)
+    status = record.get("status") or ""
+    if not status and "決標" in tender_type:
+        status = tender_type  # openfun 決標公告：列表資料無 status，以公告類型代表
+
+    values = {
+        "unit_id": unit_id,
+        "job_number": job_number or None,
+        "title": title,
+        "unit_name": _clip(record.get("unit_name"), 200),
+        "category": _clip(record.get("category"), 50),
+        "tender_type": tender_type,
+        "budget": _parse_amount(record.get("budget")),
+        "award_amount": _parse_amount(record.get("award_amount")),
+        "announce_date": _parse_date(record.get("date")),
+        "deadline": _clip(record.get("deadline"), 50),
+        "status": _clip(status, 50),
+        "source": source,
+        "ezbid_id": ezbid_id,
+        "raw_data": json.dumps(dict(record), ensure_ascii=False, default=str)[:2000],
+    }
+    return key, values
+
+
+def build_company_links(record: Mapping[str, Any]) -> Dict[Tuple[str, str], Optional[float]]:
+    """紀錄中的得標 / 投標廠商 → {(company_name, role): amount}"""
+    links: Dict[Tuple[str, str], Optional[float]] = {}
+    for name in record.get("winner_names") or []:
+        if name and name.strip():
+            links[(name.strip()[:200], "winner")] = None
+    for name in record.get("bidder_names") or []:
+        if name and name.strip() and (name.strip()[:200], "winner") not in links:
+            links[(name.strip()[:200], "bidder")] = None
+    return links
+
+
+def _merge_values(current: Dict[str, Any], incoming: Dict[str, Any]) -> None:
+    """同批次內同一標案的多筆公告（招標 / 決標）合併，規則與 ON CONFLICT 相同"""
+    for column, value in incoming.items():
+        if value in (None, ""):
+            continue
+        if column in ("announce_date", "ezbid_id", "source") and current.get(column):
+            continue  # 保留首見值
+        if column == "status" and "決標" in (current.get("status") or "") and "決標" not in value:
+            continue  # 已決標不回退為招標中
+        current[column] = value
+
+
+def collect_rows(
+    records: Iterable[Mapping[str, Any]], source: str,
+) -> Dict[Tuple[str, ...], Tuple[Dict[str, Any], Dict[Tuple[str, str], Optional[float]]]]:
+    """批次去重：ON CONFLICT 不允許同一指令更新同一列兩次"""
+    rows: Dict[Tuple[str, ...], Tuple[Dict[str, Any], Dict[Tuple[str, str], Optional[float]]]] = {}
+    for record in records:
+        built = build_tender_row(record, source)
+        if built is None:
+            continue
+        key, values = built
+        links = build_company_links(record)
+        if key in rows:
+            current_values, current_links = rows[key]
+            _merge_values(current_values, values)
+            for (name, role), amount in links.items():
+                if role == "bidder" and (name, "winner") in current_links:
+                    continue
+                if role == "winner":
+                    current_links.pop((name, "bidder"), None)
+                if amount is not None or (name, role) not in current_links:
+                    current_links[(name, role)] = amount
+        else:
+            rows[key] = (values, links)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# SQL
+# ---------------------------------------------------------------------------
+
+def _merged_columns(excluded) -> Dict[str, Any]:
+    """ON CONFLICT 時每欄的合併運算式：稀疏來源不覆蓋既有值"""
+    c = _RECORDS.c
+
+    def prefer_new(name):
+        return func.coalesce(func.nullif(excluded[name], ""), c[name])
+
+    return {
+        "title": prefer_new("title"),
+        "unit_name": prefer_new("unit_name"),
+        "category": prefer_new("category"),
+        "tender_type": prefer_new("tender_type"),
+        "deadline": prefer_new("deadline"),
+        "budget": func.coalesce(excluded.budget, c.budget),
+        "award_amount": func.coalesce(excluded.award_amount, c.award_amount),
+        "announce_date": func.coalesce(c.announce_date, excluded.announce_date),
+        "ezbid_id": func.coalesce(c.ezbid_id, excluded.ezbid_id),
+        "status": case(
+            (and_(c.status.like("%決標%"), func.coalesce(excluded.status, "").notlike("%決標%")), c.status),
+            else_=func.coalesce(func.nullif(excluded.status, ""), c.status),
+        ),
+    }
+
+
+def build_upsert_statement(kind: str, values: List[Dict[str, Any]]):
+    """tender_records 批次 upsert；RETURNING 只含實際寫入（新增或內容有變）的列"""
+    stmt = pg_insert(TenderRecord).values(values)
+    merged = _merged_columns(stmt.excluded)
+    changed = or_(*(expr.is_distinct_from(_RECORDS.c[name]) for name, expr in merged.items()))
+    conflict = (
+        {"index_elements": ["unit_id", "job_number"], "index_where": _UNIT_JOB_WHERE}
+        if kind == KEY_UNIT_JOB else {"index_elements": ["ezbid_id"]}
+    )
+    return stmt.on_conflict_do_update(
+        **conflict,
+        set_={**merged, "raw_data": stmt.excluded.raw_data, "updated_at": func.now()},
+        where=changed,
+    ).returning(
+        _RECORDS.c.id, _RECORDS.c.unit_id, _RECORDS.c.job_number,
+        _RECORDS.c.ezbid_id, _RECORDS.c.unit_name,
+        literal_column("(xmax = 0)").label("inserted"),
+    )
+
+
+def build_link_statement(values: List[Dict[str, Any]]):
+    """tender_company_links 批次 upsert（uq_tender_company_link）；只回傳新增或金額有變的列"""
+    stmt = pg_insert(TenderCompanyLink).values(values)
+    amount = func.coalesce(stmt.excluded.amount, _LINKS.c.amount)
+    return stmt.on_conflict_do_update(
+        index_elements=["tender_record_id", "company_name", "role"],
+        set_={"amount": amount},
+        where=amount.is_distinct_from(_LINKS.c.amount),
+    ).returning(_LINKS.c.tender_record_id)
+
+
+def _row_key(kind: str, row) -> Tuple[str, ...]:
+    if kind == KEY_UNIT_JOB:
+        return (KEY_UNIT_JOB, row.unit_id, row.job_number)
+    return (KEY_EZBID, row.ezbid_id)
+
+
+async def _execute_batch(db: AsyncSession, kind: str, batch: List[Dict[str, Any]]) -> List[Any]:
+    """整批寫入；撞到其他唯一鍵（如舊資料佔用同一 ezbid_id）時退回逐列，略過問題列"""
+    try:
+        async with db.begin_nested():
+            return (await db.execute(build_upsert_statement(kind, batch))).all()
+    except IntegrityError as e:
+        logger.debug("Tender upsert batch conflict, retrying row by row: %s", e)
+
+    returned: List[Any] = []
+    for values in batch:
+        try:
+            async with db.begin_nested():
+                returned.extend((await db.execute(build_upsert_statement(kind, [values]))).all())
+        except IntegrityError as e:
+            logger.debug("Skip tender %s: %s", values.get("job_number") or values.get("ezbid_id"), e)
+    return returned
+
+
+async def _resolve_ids(
+    db: AsyncSession, keys: List[Tuple[str, ...]],
+) -> Dict[Tuple[str, ...], Tuple[int, str]]:
+    """未被改寫（內容相同）的列不在 RETURNING 中，廠商關聯需要其 id"""
+    resolved: Dict[Tuple[str, ...], Tuple[int, str]] = {}
+    unit_jobs = [(k[1], k[2]) for k in keys if k[0] == KEY_UNIT_JOB]
+    ezbid_ids = [k[1] for k in keys if k[0] == KEY_EZBID]
+    c = _RECORDS.c
+    if unit_jobs:
+        rows = (await db.execute(
+            select(c.id, c.unit_id, c.job_number, c.unit_name)
+            .where(tuple_(c.unit_id, c.job_number).in_(unit_jobs))
+        )).all()
+        for row in rows:
+            resolved[(KEY_UNIT_JOB, row.unit_id, row.job_number)] = (row.id, row.unit_name or "")
+    if ezbid_ids:
+        rows = (await db.execute(
+            select(c.id, c.ezbid_id, c.unit_name).where(c.ezbid_id.in_(ezbid_ids))
+        )).all()
+        for row in rows:
+            resolved[(KEY_EZBID, row.ezbid_id)] = (row.id, row.unit_name or "")
+    return resolved
+
+
+async def _upsert_links(db: AsyncSession, link_rows: List[Dict[str, Any]]) -> Set[int]:
+    """回傳有新增 / 變更關聯的 tender_record_id"""
+    changed: Set[int] = set()
+    for i in range(0, len(link_rows), BATCH_SIZE):
+        result = await db.execute(build_link_statement(link_rows[i:i + BATCH_SIZE]))
+        changed.update(row.tender_record_id for row in result.all())
+    return changed
+
+
+# ---------------------------------------------------------------------------
+# 寫入
+# ---------------------------------------------------------------------------
+
+async def upsert_tenders(
+    db: AsyncSession,
+    records: Iterable[Mapping[str, Any]],
+    source: str = "pcc",
+    refresh_aggregates: bool = True,
+) -> Dict[str, Any]:
+    """批次冪等寫入標案 + 廠商關聯，並增量重算受影響機關的彙總。
+
+    Returns:
+        {inserted, updated, unchanged, links, orgs}
+    """
+    rows = collect_rows(records, source)
+    stats: Dict[str, Any] = {"inserted": 0, "updated": 0, "unchanged": 0, "links": 0, "orgs": 0}
+    if not rows:
+        return stats
+
+    written: Dict[Tuple[str, ...], Tuple[int, str]] = {}
+    for kind in (KEY_UNIT_JOB, KEY_EZBID):
+        keyed = [(key, values) for key, (values, _) in rows.items() if key[0] == kind]
+        for i in range(0, len(keyed), BATCH_SIZE):
+            batch = [values for _, values in keyed[i:i + BATCH_SIZE]]
+            for row in await _execute_batch(db, kind, batch):
+                written[_row_key(kind, row)] = (row.id, row.unit_name or "")
+                stats["inserted" if row.inserted else "updated"] += 1
+    stats["unchanged"] = len(rows) - stats["inserted"] - stats["updated"]
+
+    touched_orgs = {unit_name for _, unit_name in written.values() if unit_name}
+
+    with_links = [key for key, (_, links) in rows.items() if links]
+    if with_links:
+        ids = dict(written)
+        missing = [key for key in with_links if key not in ids]
+        if missing:
+            ids.update(await _resolve_ids(db, missing))
+        link_rows = [
+            {"tender_record_id": ids[key][0], "company_name": name, "role": role, "amount": amount}
+            for key in with_links if key in ids
+            for (name, role), amount in rows[key][1].items()
+        ]
+        changed_ids = await _upsert_links(db, link_rows)
+        stats["links"] = len(changed_ids)
+        touched_orgs |= {unit_name for rid, unit_name in ids.values() if rid in changed_ids and unit_name}
+
+    if refresh_aggregates and touched_orgs:
+        await refresh_org_aggregates(db, touched_orgs)
+    stats["orgs"] = len(touched_orgs)
+    if written or stats["links"]:
+        await db.commit()
+
+    if stats["inserted"] or stats["updated"]:
+        logger.info(
+            "Tender warehouse (%s): %d inserted, %d updated, %d unchanged, %d tenders with new links, %d orgs refreshed",
+            source, stats["inserted"], stats["updated"], stats["unchanged"], stats["links"], stats["orgs"],
+        )
+    return stats
+
+
+async def record_award(
+    db: AsyncSession,
+    record_id: int,
+    winners: Iterable[str] = (),
+    bidders: Iterable[str] = (),
+    award_amount: Optional[float] = None,
+    winner_amounts: Optional[Mapping[str, Optional[float]]] = None,
+) -> bool:
+    """寫入單一標案的決標資料（不 commit）。回傳是否有變更（供呼叫端決定重算彙總）"""
+    links = build_company_links({"winner_names": list(winners), "bidder_names": list(bidders)})
+    for (name, role) in list(links):
+        if role == "winner" and winner_amounts:
+            links[(name, role)] = winner_amounts.get(name)
+
+    changed = False
+    if award_amount is not None:
+        result = await db.execute(text("""
+            UPDATE tender_records SET award_amount = :amount, updated_at = NOW()
+            WHERE id = :id AND award_amount IS DISTINCT FROM :amount
+        """), {"amount": award_amount, "id": record_id})
+        changed = bool(result.rowcount)
+    if links:
+        changed_ids = await _upsert_links(db, [
+            {"tender_record_id": record_id, "company_name": name, "role": role, "amount": amount}
+            for (name, role), amount in links.items()
+        ])
+        changed = changed or bool(changed_ids)
+    return changed
+
+
+# ---------------------------------------------------------------------------
+# 彙總
+# ---------------------------------------------------------------------------
+
+_VENDOR_STATS_SQL = """
+    INSERT INTO tender_org_vendor_stats
+        (unit_name, company_name, appear_count, win_count, award_amount, last_announce_date)
+    SELECT tr.unit_name, tcl.company_name,
+           COUNT(DISTINCT tr.id),
+           COUNT(DISTINCT tr.id) FILTER (WHERE tcl.role = 'winner'),
+           SUM(COALESCE(tcl.amount, tr.award_amount)) FILTER (WHERE tcl.role = 'winner'),
+           MAX(tr.announce_date)
+    FROM tender_records tr
+    JOIN tender_company_links tcl ON tcl.tender_record_id = tr.id
+    WHERE tr.unit_name IS NOT NULL AND tr.unit_name <> '' {scope}
+    GROUP BY tr.unit_name, tcl.company_name
+    ON CONFLICT (unit_name, company_name) DO UPDATE SET
+        appear_count = EXCLUDED.appear_count,
+        win_count = EXCLUDED.win_count,
+        award_amount = EXCLUDED.award_amount,
+        last_announce_date = EXCLUDED.last_announce_date
+"""
+
+_YEAR_STATS_SQL = """
+    INSERT INTO tender_org_year_stats (unit_name, year, category, tender_count, awarded_count)
+    SELECT tr.unit_name,
+           COALESCE(EXTRACT(YEAR FROM tr.announce_date)::int, 0),
+           COALESCE(tr.category, ''),
+           COUNT(*),
+           COUNT(*) FILTER (WHERE tr.award_amount IS NOT NULL OR EXISTS (
+               SELECT 1 FROM tender_company_links w
+               WHERE w.tender_record_id = tr.id AND w.role = 'winner'
+           ))
+    FROM tender_records tr
+    WHERE tr.unit_name IS NOT NULL AND tr.unit_name <> '' {scope}
+    GROUP BY 1, 2, 3
+    ON CONFLICT (unit_name, year, category) DO UPDATE SET
+        tender_count = EXCLUDED.tender_count,
+        awarded_count = EXCLUDED.awarded_count
+"""
+
+
+async def refresh_org_aggregates(db: AsyncSession, orgs: Optional[Iterable[str]] = None) -> int:
+    """重算彙總表（不 commit）。orgs=None 為整份重建；回傳重算的機關數（整份重建回傳 -1）"""
+    if orgs is None:
+        scope, params = "", {}
+    else:
+        names = sorted({o for o in orgs if o})
+        if not names:
+            return 0
+        scope, params = "AND tr.unit_name = ANY(:orgs)", {"orgs": names}
+
+    delete_scope = "WHERE unit_name = ANY(:orgs)" if params else ""
+    for table, sql in (
+        ("tender_org_vendor_stats", _VENDOR_STATS_SQL),
+        ("tender_org_year_stats", _YEAR_STATS_SQL),
+    ):
+        await db.execute(text(f"DELETE FROM {table} {delete_scope}"), params)
+        await db.execute(text(sql.format(scope=scope)), params)
+    return len(params["orgs"]) if params else -1
+
+
+# ---------------------------------------------------------------------------
+# 查詢
+# ---------------------------------------------------------------------------
+
+_ORG_MATCH = "(unit_name = :org OR unit_name ILIKE :pat)"
+
+
+def _like_pattern(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_org_ecosystem(
+    org_name: str,
+    year_rows: List[Tuple[int, int, int]],
+    category_rows: List[Tuple[str, int]],
+    vendor_rows: List[Tuple[str, int, int]],
+    recent_rows: List[Mapping[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """彙總表查詢結果 → org_ecosystem 結果形狀；倉儲沒有該機關任何標案時回傳 None"""
+    total = sum(count for _, count, _ in year_rows)
+    awarded = sum(awarded for _, _, awarded in year_rows)
+    if not total:
+        return None
+
+    year_counter: Dict[str, int] = {}
+    for year, count, _ in year_rows:
+        label = str(year) if year else "未知"
+        year_counter[label] = year_counter.get(label, 0) + count
+
+    category_counter: Dict[str, int] = {}
+    for category, count in category_rows:
+        label = category or "未分類"
+        category_counter[label] = category_counter.get(label, 0) + count
+
+    return {
+        "org_name": org_name,
+        "total": total,
+        "awarded_count": awarded,
+        "year_trend": [{"year": k, "count": v} for k, v in sorted(year_counter.items())[-15:]],
+        "top_vendors": [
+            {
+                "name": name,
+                "appear_count": appear,
+                "win_count": wins,
+                "win_rate": round(wins / appear * 100, 1) if appear > 0 else 0,
+            }
+            for name, appear, wins in vendor_rows
+        ],
+        "category_distribution": [
+            {"name": k, "value": v}
+            for k, v in sorted(category_counter.items(), key=lambda kv: kv[1], reverse=True)[:10]
+        ],
+        "recent_tenders": [
+            {
+                "title": r["title"] or "", "date": r["date"] or "",
+                "type": r["tender_type"] or "", "category": r["category"] or "",
+                "unit_name": r["unit_name"] or "", "unit_id": r["unit_id"] or "",
+                "job_number": r["job_number"] or "",
+                "winner_names": [w for w in (r["winners"] or []) if w],
+            }
+            for r in recent_rows
+        ],
+        "source": "warehouse",
+    }
+
+
+async def load_org_ecosystem(db: AsyncSession, org_name: str) -> Optional[Dict[str, Any]]:
+    """由彙總表組出機關生態；倉儲沒有該機關標案時回傳 None（是否可信由 is_org_synced 判斷）"""
+    params = {"org": org_name, "pat": _like_pattern(org_name)}
+    year_rows = (await db.execute(text(f"""
+        SELECT year, SUM(tender_count)::int, SUM(awarded_count)::int
+        FROM tender_org_year_stats WHERE {_ORG_MATCH}
+        GROUP BY year
+    """), params)).all()
+    if not year_rows:
+        return None
+
+    category_rows = (await db.execute(text(f"""
+        SELECT category, SUM(tender_count)::int
+        FROM tender_org_year_stats WHERE {_ORG_MATCH}
+        GROUP BY category
+    """), params)).all()
+    vendor_rows = (await db.execute(text(f"""
+        SELECT company_name, SUM(appear_count)::int AS appear, SUM(win_count)::int AS wins
+        FROM tender_org_vendor_stats WHERE {_ORG_MATCH}
+        GROUP BY company_name
+        ORDER BY appear DESC, wins DESC, company_name
+        LIMIT 15
+    """), params)).all()
+    recent_rows = (await db.execute(text("""
+        SELECT tr.title, to_char(tr.announce_date, 'YYYY-MM-DD') AS date, tr.tender_type,
+               tr.category, tr.unit_name, tr.unit_id, tr.job_number,
+               array_agg(tcl.company_name) FILTER (WHERE tcl.role = 'winner') AS winners
+        FROM tender_records tr
+        LEFT JOIN tender_company_links tcl ON tcl.tender_record_id = tr.id
+        WHERE (tr.unit_name = :org OR tr.unit_name ILIKE :pat)
+        GROUP BY tr.id
+        ORDER BY tr.announce_date DESC NULLS LAST
+        LIMIT 20
+    """), params)).mappings().all()
+
+    return build_org_ecosystem(
+        org_name,
+        [tuple(r) for r in year_rows],
+        [tuple(r) for r in category_rows],
+        [tuple(r) for r in vendor_rows],
+        list(recent_rows),
+    )
+
+
+# ---------------------------------------------------------------------------
+# 即時查詢結果回寫
+# ---------------------------------------------------------------------------
+
+async def is_org_synced(org_name: str) -> bool:
+    """機關在 ORG_SYNC_TTL 內是否完成過完整即時同步（Redis 不可用視為未同步）"""
+    try:
+        from app.core.redis_client import get_redis
+        redis = await get_redis()
+        return bool(redis and await redis.exists(_ORG_SYNC_KEY.format(org_name)))
+    except Exception:
+        return False
+
+
+async def mark_org_synced(org_name: str) -> None:
+    try:
+        from app.core.redis_client import get_redis
+        redis = await get_redis()
+        if redis:
+            await redis.set(
+                _ORG_SYNC_KEY.format(org_name), datetime.utcnow().isoformat(), ex=ORG_SYNC_TTL,
+            )
+    except Exception as e:
+        logger.debug(f"Tender warehouse org sync mark failed org={org_name}: {e}")
+
+
+def persist_in_background(
+    records: List[Mapping[str, Any]],
+    source: str = "pcc",
+    synced_org: Optional[str] = None,
+) -> Optional[asyncio.Task]:
+    """即時 API 結果背景寫入倉儲（失敗只記 debug，不影響回應）
+
+    synced_org: 這批是該機關的完整即時抓取；寫入成功後標記為已同步。
+    """
+    if not records:
+        return None
+    snapshot = [dict(r) for r in records]
+
+    async def _run():
+        try:
+            from app.db.database import async_session_maker
+            async with async_session_maker() as db:
+                await upsert_tenders(db, snapshot, source)
+        except Exception as e:
+            logger.debug(f"Tender warehouse background persist failed: {e}")
+            return
+        if synced_org:
+            await mark_org_synced(synced_org)
+
+    try:
+        task = asyncio.get_running_loop().create_task(_run())
+    except RuntimeError:
+        return None
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
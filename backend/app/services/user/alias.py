@@ -212,6 +212,9 @@ async def merge_alias(
     )
 
     await db.commit()
+    if harmonize_role and alias_role != canonical_role:
+        from app.core.principal_cache import get_principal_cache
+        await get_principal_cache().invalidate_user(alias_id)
     logger.info(
         "User merge: alias=%d → canonical=%d by actor=%d "
         "(alias_role=%s, canonical_role=%s, harmonized=%s)",
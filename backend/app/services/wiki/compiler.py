@@ -76,6 +76,7 @@ class WikiCompiler:
             except Exception:
                 pass  # preserve 失敗不阻斷寫入（退回新 created）
         path.write_text(content, encoding="utf-8")
+        get_wiki_service().index_page(path, content)  # 搜尋索引增量更新
 
     def _snapshot_pages(self) -> Dict[str, int]:
         """快照所有 wiki 頁面 (path → 檔案大小)"""
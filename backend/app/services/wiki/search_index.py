@@ -0,0 +1,379 @@
+"""
+Wiki 搜尋倒排索引 — 取代 search_wiki 每次查詢全目錄掃描
+
+原 `WikiService.search_wiki` 每次查詢都 glob 全部 `*.md` + 同步 read_text()
++ 逐關鍵字 count()；`rag_retrieval.retrieve_chunks` 每個 RAG 請求都會呼叫，
+wiki 越大延遲越高，且同步磁碟 I/O 直接卡住 event loop。
+
+本模組維護一份常駐記憶體的倒排索引：
+- 分詞：jieba cut_for_search（無 jieba 時退回英數詞 + CJK bigram）
+- 評分：BM25（k1=1.5, b=0.75）
+- frontmatter title/type + snippet 於建索引時預先解析
+- 增量：ingest_entity / ingest_source / save_synthesis / compiler._write_page
+  寫檔後呼叫 upsert_page；rebuild_index 做 mtime 對帳後落盤快照
+- 持久化：`<wiki_root>/.search_index.json`（含每頁 mtime/size），重啟後
+  只重新解析有變動的頁面
+
+查詢只走記憶體結構，不碰檔案系統。
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = ".search_index.json"
+SNAPSHOT_VERSION = 1
+
+# BM25 參數（Robertson 標準值）
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# 預覽長度：rag_retrieval 取前 1000 字當上下文，預存避免命中後再讀檔
+# （只在 include_preview=True 時回傳；工具 / API 結果只帶命中處附近的 snippet）
+PREVIEW_CHARS = 1000
+SNIPPET_CHARS = 150
+
+_FRONTMATTER_END_RE = re.compile(r'^---\s*\n.*?\n---\s*\n', re.DOTALL)
+_TITLE_RE = re.compile(r'^title:\s*(.+)$', re.MULTILINE)
+_TYPE_RE = re.compile(r'^type:\s*(.+)$', re.MULTILINE)
+_WORD_RE = re.compile(r'[a-z0-9_]+')
+_CJK_RUN_RE = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]+')
+
+_jieba_ready: Optional[bool] = None
+
+
+def _load_jieba():
+    """懶載入 jieba（僅首次），不可用時回傳 None。"""
+    global _jieba_ready
+    if _jieba_ready is False:
+        return None
+    try:
+        import jieba
+        if not _jieba_ready:
+            jieba.setLogLevel(logging.WARNING)
+            _jieba_ready = True
+        return jieba
+    except ImportError:
+        _jieba_ready = False
+        logger.warning("jieba not installed, wiki index falls back to bigram tokenizer")
+        return None
+
+
+def tokenize(text: str) -> List[str]:
+    """將文字切成索引詞（小寫、長度 >= 2）。
+
+    建索引與查詢共用同一函式，兩邊詞彙空間才會對齊。
+    """
+    text = text.lower()
+    jieba = _load_jieba()
+    if jieba is not None:
+        return [t for t in (tok.strip() for tok in jieba.cut_for_search(text)) if len(t) > 1]
+
+    tokens = [w for w in _WORD_RE.findall(text) if len(w) > 1]
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class _IndexedPage:
+    """單一 wiki 頁面的索引條目"""
+
+    title: str
+    page_type: str
+    snippet: str
+    preview: str
+    length: int
+    tf: Dict[str, int] = field(default_factory=dict)
+    mtime: float = 0.0
+    size: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "type": self.page_type,
+            "snippet": self.snippet,
+            "preview": self.preview,
+            "length": self.length,
+            "tf": self.tf,
+            "mtime": self.mtime,
+            "size": self.size,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_IndexedPage":
+        return cls(
+            title=data["title"],
+            page_type=data["type"],
+            snippet=data.get("snippet", ""),
+            preview=data.get("preview", ""),
+            length=int(data.get("length", 0)),
+            tf={k: int(v) for k, v in data.get("tf", {}).items()},
+            mtime=float(data.get("mtime", 0.0)),
+            size=int(data.get("size", 0)),
+        )
+
+
+def _parse_page(rel_path: str, text: str) -> _IndexedPage:
+    """解析頁面：frontmatter title/type + snippet + 詞頻。"""
+    subdir, _, filename = rel_path.partition("/")
+    title_m = _TITLE_RE.search(text)
+    type_m = _TYPE_RE.search(text)
+    tokens = tokenize(text)
+    tf: Dict[str, int] = {}
+    for tok in tokens:
+        tf[tok] = tf.get(tok, 0) + 1
+    return _IndexedPage(
+        title=title_m.group(1).strip() if title_m else Path(filename).stem,
+        page_type=type_m.group(1).strip() if type_m else subdir,
+        snippet=text[200:400].strip()[:150],
+        preview=text[:PREVIEW_CHARS],
+        length=len(tokens),
+        tf=tf,
+    )
+
+
+def _match_snippet(page: "_IndexedPage", words: List[str]) -> str:
+    """命中處附近的摘要：在預覽正文中找第一個查詢關鍵字，取前後共 SNIPPET_CHARS 字。
+
+    關鍵字不在預覽範圍內（頁面後段命中）時退回建索引時的固定 snippet。
+    """
+    text = page.preview
+    fm = _FRONTMATTER_END_RE.match(text)
+    body_start = fm.end() if fm else 0
+    lowered = text.lower()
+    positions = [p for p in (lowered.find(w, body_start) for w in words) if p >= 0]
+    if not positions:
+        return page.snippet
+    pos = min(positions)
+    start = max(body_start, pos - SNIPPET_CHARS // 3)
+    snippet = " ".join(text[start:start + SNIPPET_CHARS].split())
+    return ("…" if start > body_start else "") + snippet
+
+
+class WikiSearchIndex:
+    """Wiki 頁面 BM25 倒排索引（process 內單例，由 WikiService 持有）"""
+
+    def __init__(self, root: Path, subdirs: List[str]):
+        self.root = root
+        self.subdirs = list(subdirs)
+        self.snapshot_path = root / SNAPSHOT_NAME
+        self._pages: Dict[str, _IndexedPage] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    # ------------------------------------------------------------------
+    # 建置 / 對帳（同步，呼叫端以 asyncio.to_thread 包裝）
+    # ------------------------------------------------------------------
+
+    def load(self) -> Dict[str, int]:
+        """載入快照並與檔案系統對帳（只重新解析 mtime/size 有變的頁面）。"""
+        cached: Dict[str, _IndexedPage] = {}
+        if self.snapshot_path.exists():
+            try:
+                data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+                if data.get("version") == SNAPSHOT_VERSION:
+                    cached = {
+                        rel: _IndexedPage.from_dict(entry)
+                        for rel, entry in data.get("pages", {}).items()
+                    }
+            except Exception as e:
+                logger.warning("Wiki search index snapshot unreadable, rebuilding: %s", e)
+        return self._reconcile(cached)
+
+    def reconcile(self) -> Dict[str, int]:
+        """以目前記憶體內容為基準與檔案系統對帳並落盤（rebuild_index 使用）。"""
+        with self._lock:
+            current = dict(self._pages)
+        stats = self._reconcile(current)
+        self.save()
+        return stats
+
+    def _reconcile(self, cached: Dict[str, _IndexedPage]) -> Dict[str, int]:
+        pages: Dict[str, _IndexedPage] = {}
+        reused = parsed = 0
+        for subdir in self.subdirs:
+            dir_path = self.root / subdir
+            if not dir_path.exists():
+                continue
+            for f in dir_path.glob("*.md"):
+                rel = f"{subdir}/{f.name}"
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                old = cached.get(rel)
+                if old is not None and old.mtime == st.st_mtime and old.size == st.st_size:
+                    pages[rel] = old
+                    reused += 1
+                    continue
+                try:
+                    text = f.read_text(encoding="utf-8")
+                except Exception:
+                    continue
+                page = _parse_page(rel, text)
+                page.mtime, page.size = st.st_mtime, st.st_size
+                pages[rel] = page
+                parsed += 1
+
+        postings: Dict[str, Dict[str, int]] = {}
+        total = 0
+        for rel, page in pages.items():
+            total += page.length
+            for term, freq in page.tf.items():
+                postings.setdefault(term, {})[rel] = freq
+
+        # 整批替換：查詢端永遠看到一致的快照
+        with self._lock:
+            self._pages = pages
+            self._postings = postings
+            self._total_length = total
+            self._loaded = True
+
+        removed = len(set(cached) - set(pages))
+        logger.info(
+            "Wiki search index ready: pages=%d reused=%d parsed=%d removed=%d",
+            len(pages), reused, parsed, removed,
+        )
+        return {"pages": len(pages), "reused": reused, "parsed": parsed, "removed": removed}
+
+    def save(self) -> None:
+        """落盤快照（失敗只記 log，不影響記憶體索引）。"""
+        with self._lock:
+            payload = {
+                "version": SNAPSHOT_VERSION,
+                "pages": {rel: page.to_dict() for rel, page in self._pages.items()},
+            }
+        try:
+            tmp = self.snapshot_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.snapshot_path)
+        except Exception as e:
+            logger.warning("Wiki search index snapshot save failed: %s", e)
+
+    # ------------------------------------------------------------------
+    # 增量維護
+    # ------------------------------------------------------------------
+
+    def upsert_page(self, rel_path: str, text: str, mtime: float = 0.0, size: int = 0) -> None:
+        """新增或更新單頁（寫檔後呼叫，text 即剛寫入的內容）。"""
+        page = _parse_page(rel_path, text)
+        page.mtime, page.size = mtime, size
+        with self._lock:
+            self._drop_locked(rel_path)
+            self._pages[rel_path] = page
+            self._total_length += page.length
+            for term, freq in page.tf.items():
+                self._postings.setdefault(term, {})[rel_path] = freq
+
+    def remove_page(self, rel_path: str) -> None:
+        with self._lock:
+            self._drop_locked(rel_path)
+
+    def _drop_locked(self, rel_path: str) -> None:
+        old = self._pages.pop(rel_path, None)
+        if old is None:
+            return
+        self._total_length -= old.length
+        for term in old.tf:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(rel_path, None)
+            if not posting:
+                del self._postings[term]
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+
+    def search(
+        self, query: str, limit: int = 10, include_preview: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """BM25 查詢，純記憶體運算。
+
+        回傳欄位與舊版 search_wiki 相容（path/title/type/score/snippet），
+        snippet 為命中關鍵字附近的摘要；另附 hits（查詢關鍵字出現次數，對應
+        舊版 score 語意）與 matched_terms（命中的相異查詢關鍵字數）。
+        include_preview=True 時附頁首 PREVIEW_CHARS 字（RAG 上下文用）。
+
+        cut_for_search 會把一個關鍵字切成互相重疊的子詞（桃園市政府 →
+        桃園/市政/政府/市政府），一次出現會被每個子詞各算一次；因此 hits
+        以「查詢關鍵字」為單位，取該關鍵字各子詞頻率的最大值再加總。
+        """
+        words = [word for word in query.lower().split() if len(word) > 1]
+        groups = [list(dict.fromkeys(tokenize(word))) for word in words]
+        groups = [g for g in groups if g]
+        terms = list(dict.fromkeys(t for g in groups for t in g))
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._pages)
+            if n_docs == 0:
+                return []
+            avgdl = self._total_length / n_docs or 1.0
+            scores: Dict[str, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for rel, freq in posting.items():
+                    dl = self._pages[rel].length
+                    denom = freq + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl)
+                    scores[rel] = scores.get(rel, 0.0) + idf * freq * (BM25_K1 + 1) / denom
+
+            ranked: List[Tuple[str, float]] = sorted(
+                scores.items(), key=lambda kv: kv[1], reverse=True
+            )[:limit]
+            results = []
+            for rel, score in ranked:
+                page = self._pages[rel]
+                per_keyword = [max(page.tf.get(t, 0) for t in group) for group in groups]
+                result = {
+                    "path": rel,
+                    "title": page.title,
+                    "type": page.page_type,
+                    "score": round(score, 4),
+                    "hits": sum(per_keyword),
+                    "matched_terms": sum(1 for n in per_keyword if n),
+                    "snippet": _match_snippet(page, words),
+                }
+                if include_preview:
+                    result["preview"] = page.preview
+                results.append(result)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """各子目錄頁數（與 WikiService.get_stats 同形）。"""
+        with self._lock:
+            counts = {subdir: 0 for subdir in self.subdirs}
+            for rel in self._pages:
+                subdir = rel.partition("/")[0]
+                counts[subdir] = counts.get(subdir, 0) + 1
+            counts["total"] = len(self._pages)
+            counts["terms"] = len(self._postings)
+        return counts
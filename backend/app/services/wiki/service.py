@@ -12,6 +12,7 @@ Version: 1.0.0
 Created: 2026-04-09
 """
 
+import asyncio
 import logging
 import os
 import re
@@ -72,6 +73,8 @@ class WikiService:
         self.root = WIKI_ROOT
         self.index_path = self.root / "index.md"
         self.log_path = self.root / "log.md"
+        self._search_index = None  # WikiSearchIndex，首次查詢時懶載入
+        self._search_index_lock = asyncio.Lock()
 
     # =========================================================================
     # Ingest — 來源攝入 → wiki 頁面
@@ -141,6 +144,7 @@ confidence: {confidence}
 {chr(10).join(f'- {s}' for s in sources) if sources else '*無來源*'}
 """
         page_path.write_text(content, encoding="utf-8")
+        self.index_page(page_path, content)
 
         # 更新 log
         action = "update" if is_update else "ingest"
@@ -199,6 +203,7 @@ tags: {tags or []}
 {entity_links}
 """
         page_path.write_text(content, encoding="utf-8")
+        self.index_page(page_path, content)
         self._append_log("ingest", f"source | {title} ({source_type})")
 
         logger.info("Wiki ingest: sources/%s.md", slug)
@@ -228,6 +233,7 @@ tags: {tags or []}
 {content_md}
 """
         page_path.write_text(full_content, encoding="utf-8")
+        self.index_page(page_path, full_content)
         self._append_log("synthesis", f"query → synthesis | {title}")
 
         return {"action": "synthesis", "path": f"synthesis/{slug}.md"}
@@ -236,42 +242,49 @@ tags: {tags or []}
     # Query — wiki 搜尋
     # =========================================================================
 
-    async def search_wiki(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """搜尋 wiki 頁面 (BM25-style keyword match on frontmatter + content)"""
-        results = []
-        query_lower = query.lower()
-        keywords = [w for w in query_lower.split() if len(w) > 1]
+    async def search_wiki(
+        self, query: str, limit: int = 10, include_preview: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """搜尋 wiki 頁面 (BM25 over jieba-tokenized frontmatter + content)
 
-        for subdir in WIKI_SUBDIRS:
-            dir_path = self.root / subdir
-            if not dir_path.exists():
-                continue
-            for f in dir_path.glob("*.md"):
-                try:
-                    text = f.read_text(encoding="utf-8")
-                except Exception:
-                    continue
-                text_lower = text.lower()
-                score = sum(
-                    text_lower.count(kw) for kw in keywords
-                )
-                if score > 0:
-                    # Extract title from frontmatter
-                    title_match = re.search(r'^title:\s*(.+)$', text, re.MULTILINE)
-                    title = title_match.group(1).strip() if title_match else f.stem
-                    type_match = re.search(r'^type:\s*(.+)$', text, re.MULTILINE)
-                    page_type = type_match.group(1).strip() if type_match else subdir
-
-                    results.append({
-                        "path": f"{subdir}/{f.name}",
-                        "title": title,
-                        "type": page_type,
-                        "score": score,
-                        "snippet": text[200:400].strip()[:150],
-                    })
-
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:limit]
+        走記憶體倒排索引（見 search_index.py）；僅 process 首次查詢時載入快照並對帳。
+        app 外刪除的頁面（git pull、手動清理）於 rebuild_index 對帳時移出索引，
+        查詢路徑不碰檔案系統。
+        """
+        index = await self._get_search_index()
+        return index.search(query, limit=limit, include_preview=include_preview)
+
+    async def _get_search_index(self):
+        """取得已載入的搜尋索引（root 被替換時重建，測試以 tmp_path 覆寫 root）。"""
+        index = self._search_index
+        if index is not None and index.root == self.root and index.loaded:
+            return index
+        async with self._search_index_lock:
+            index = self._search_index
+            if index is None or index.root != self.root:
+                from .search_index import WikiSearchIndex
+                index = WikiSearchIndex(self.root, WIKI_SUBDIRS)
+                self._search_index = index
+            if not index.loaded:
+                await asyncio.to_thread(index.load)
+        return index
+
+    def index_page(self, page_path: Path, content: str) -> None:
+        """寫檔後增量更新搜尋索引（索引尚未載入時略過，首次載入會對帳補上）。"""
+        index = self._search_index
+        if index is None or not index.loaded or index.root != self.root:
+            return
+        try:
+            rel = page_path.relative_to(self.root).as_posix()
+        except ValueError:
+            return
+        if rel.partition("/")[0] not in WIKI_SUBDIRS:
+            return
+        try:
+            st = page_path.stat()
+            index.upsert_page(rel, content, mtime=st.st_mtime, size=st.st_size)
+        except Exception as e:
+            logger.debug("Wiki search index upsert skipped for %s: %s", rel, e)
 
     async def read_page(self, page_path: str) -> Optional[str]:
         """讀取指定 wiki 頁面"""
@@ -502,6 +515,10 @@ tags: {tags or []}
 
         self.index_path.write_text("\n".join(lines), encoding="utf-8")
 
+        # 搜尋索引對帳 + 落盤快照（只重新解析有變動的頁面）
+        index = await self._get_search_index()
+        await asyncio.to_thread(index.reconcile)
+
         counts = {k: len(v) for k, v in sections.items()}
         logger.info("Wiki index rebuilt: %s", counts)
         return counts
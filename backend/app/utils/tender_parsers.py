@@ -0,0 +1,236 @@
+"""
+標案列表 HTML 解析（ezbid / PCC 今日標案）
+
+抓取引擎（app.services.tender.scraper_engine）把解析丟到 spawn 行程池，
+worker 以 pickle 的「模組路徑 + 函式名」重新 import 解析函式。放在
+app.services.tender 底下會連帶執行 app.services 套件的 __init__
+（整包 service / DB / AI 模組），每個 worker 啟動多花數秒、記憶體多數百 MB。
+本模組刻意只依賴標準庫與 BeautifulSoup，**不要 import app.* 任何東西**。
+
+@version 1.0.0
+@date 2026-10-16
+"""
+import logging
+import re
+from datetime import datetime
+from typing import Any
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+EZBID_BASE = "https://ezbid.tw"
+PCC_BASE = "https://web.pcc.gov.tw"
+
+# PCC 頁面結構: 每個 section 由 header_table (id=label_typeN_M) + data_table 配對
+# header_table id 規則: label_type1_0~5 = 招標 6 類, label_type2_0~5 = 更正 6 類
+PCC_SECTION_TYPE_MAP = {
+    "label_type1_0": "公開招標公告",
+    "label_type1_1": "限制性招標",
+    "label_type1_2": "選擇性招標(名單)",
+    "label_type1_3": "選擇性招標(個案)",
+    "label_type1_4": "選擇性招標(後續邀標)",
+    "label_type1_5": "公開取得報價單或企劃書",
+    "label_type2_0": "公開招標更正公告",
+    "label_type2_1": "限制性招標更正公告",
+    "label_type2_2": "選擇性招標(名單)更正公告",
+    "label_type2_3": "選擇性招標(個案)更正公告",
+    "label_type2_4": "選擇性招標(後續邀標)更正公告",
+    "label_type2_5": "公開取得報價單更正公告",
+}
+
+
+def roc_to_date(roc_str: str) -> str:
+    """ROC 日期 (115/04/07) → 西元 (2026-04-07)"""
+    match = re.match(r"(\d{2,3})/(\d{2})/(\d{2})", roc_str.strip())
+    if not match:
+        return ""
+    year = int(match.group(1)) + 1911
+    return f"{year}-{match.group(2)}-{match.group(3)}"
+
+
+def parse_budget(budget_str: str) -> int | None:
+    """解析預算金額"""
+    cleaned = budget_str.replace(",", "").strip()
+    try:
+        return int(cleaned) if cleaned.isdigit() else None
+    except ValueError:
+        return None
+
+
+def parse_deadline(text: str) -> int | None:
+    """解析截止天數"""
+    match = re.search(r"剩\s*(\d+)\s*天", text)
+    if match:
+        return int(match.group(1))
+    if "已截止" in text:
+        return 0
+    if "今日截止" in text:
+        return 0
+    return None
+
+
+def parse_ezbid_html(html: str) -> list[dict[str, Any]]:
+    """解析 ezbid HTML，提取標案列表。
+
+    2026-08-02 重寫（站台改版）：
+    - 舊版：整列資訊塞在 `<a href="/tender/{id}">` 的文字裡，用位置索引切 8 段。
+    - 新版：`<a href="/detail/{unit_id}/{job_number}">` 只剩標題，其餘欄位在同一 `<tr>`。
+      新版反而更好——它直接給 PCC 的 unit_id/job_number，可直接與 PCC 對應（ADR-0046）。
+
+    欄位改用**特徵定位**而非固定索引：實測列可能有押標金也可能沒有，
+    寫死索引會在部分列上整排錯位（舊版就是這樣寫的）。
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    records: list[dict[str, Any]] = []
+
+    for row in soup.find_all("tr"):
+        try:
+            link = row.find("a", href=lambda h: h and "/detail/" in h)
+            if not link:
+                continue
+            m = re.search(r"/detail/([^/]+)/([^/?#\"]+)", link.get("href", ""))
+            if not m:
+                continue
+
+            unit_id, job_number = m.group(1), m.group(2)
+            title = link.get_text(strip=True)
+            if not title:
+                continue
+
+            parts = [
+                p.strip()
+                for p in row.get_text(separator="|||", strip=True).split("|||")
+                if p.strip()
+            ]
+
+            # 特徵定位（缺欄位時只影響該欄，不會整排位移）
+            status = parts[0] if parts else ""
+            roc_date = next((p for p in parts if re.match(r"^\d{2,3}/\d{2}/\d{2}$", p)), "")
+            deadline_text = next((p for p in parts if "天" in p or "截止" in p), "")
+            category = next((p for p in parts if p.endswith("類")), "")
+
+            # 機關：標題的前一段（該列由「機關上層 → 機關 → 標題」排列）
+            unit_name = ""
+            if title in parts:
+                idx = parts.index(title)
+                if idx > 0:
+                    unit_name = parts[idx - 1]
+
+            # 預算：'$' 之後那一段（舊版靠 parts[7]，改版後必錯）
+            budget_str = ""
+            if "$" in parts:
+                bidx = parts.index("$")
+                if bidx + 1 < len(parts):
+                    budget_str = parts[bidx + 1]
+
+            records.append({
+                # 複合鍵當 ezbid_id（欄位為 varchar(50)，PCC key 遠短於此）
+                "ezbid_id": f"{unit_id}/{job_number}"[:50],
+                "unit_id": unit_id,
+                "job_number": job_number,
+                "title": title,
+                "date": roc_to_date(roc_date),
+                "unit_name": unit_name,
+                "category": category.replace("類", ""),
+                "type": "公開招標公告" if status == "公告" else status,
+                "status": status,
+                "budget": parse_budget(budget_str),
+                "days_left": parse_deadline(deadline_text),
+                "deadline_text": deadline_text,
+                "ezbid_url": f"{EZBID_BASE}/detail/{unit_id}/{job_number}",
+                "source": "ezbid",
+            })
+
+        except Exception as e:
+            logger.debug(f"Parse tender failed: {e}")
+            continue
+
+    return records
+
+
+def parse_pcc_today_page(html: str) -> tuple[list[dict[str, Any]], dict[str, int]]:
+    """
+    解析 PCC 今日標案 HTML — 依 table 順序判斷公告類型。
+
+    PCC 頁面結構: 每個類型有一對 table (header + data)，
+    header table id 對應 PCC_SECTION_TYPE_MAP，其後第一個 sibling table 為資料。
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    records: list[dict[str, Any]] = []
+    type_counts: dict[str, int] = {}
+    seen_ids = set()
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    today_int = int(datetime.now().strftime("%Y%m%d"))
+
+    # 定位每個 header → 下一個 sibling table = data table
+    data_tables = []
+    for label_id, tender_type in PCC_SECTION_TYPE_MAP.items():
+        header = soup.find("table", id=label_id)
+        if not header:
+            continue
+        # 找 header 之後的下一個 table (data table)
+        next_table = header.find_next_sibling("table")
+        if not next_table:
+            continue
+        links = next_table.find_all("a", href=lambda h: h and "pkPmsMain" in str(h))
+        data_tables.append((next_table, links, tender_type))
+
+    for table, _links, tender_type in data_tables:
+        table_count = 0
+
+        for row in table.find_all("tr"):
+            cells = row.find_all("td")
+            if len(cells) < 4:
+                continue
+
+            try:
+                link = row.find("a", href=lambda h: h and "pkPmsMain" in str(h))
+                if not link:
+                    continue
+
+                href = link.get("href", "")
+                pk_match = re.search(r"pkPmsMain=([A-Za-z0-9=+/]+)", href)
+                tender_id = pk_match.group(1) if pk_match else ""
+                if not tender_id or tender_id in seen_ids:
+                    continue
+                seen_ids.add(tender_id)
+
+                cell_texts = [c.get_text(strip=True) for c in cells]
+                if len(cell_texts) >= 5:
+                    unit_name, title, job_number, deadline = (
+                        cell_texts[1], cell_texts[2], cell_texts[3], cell_texts[4],
+                    )
+                elif len(cell_texts) >= 4:
+                    unit_name, title, job_number, deadline = (
+                        cell_texts[0], cell_texts[1], cell_texts[2], cell_texts[3],
+                    )
+                else:
+                    continue
+
+                records.append({
+                    "title": title,
+                    "date": today_str,
+                    "raw_date": today_int,
+                    "type": tender_type,
+                    "category": "",
+                    "unit_id": tender_id,
+                    "unit_name": unit_name,
+                    "job_number": job_number,
+                    "deadline": roc_to_date(deadline),
+                    "winner_names": [],
+                    "source": "pcc",
+                    "pcc_url": f"{PCC_BASE}{href}" if href.startswith("/") else href,
+                })
+                table_count += 1
+            except Exception as e:
+                logger.debug(f"Parse PCC row failed: {e}")
+                continue
+
+        type_counts[tender_type] = table_count
+
+    logger.info(
+        "PCC today scrape: %d records, types=%s",
+        len(records), {k: v for k, v in type_counts.items() if v > 0},
+    )
+    return records, type_counts
@@ -37,7 +37,7 @@ import app.core.structured_logging  # noqa: F401 — 啟動 structlog stdlib bri
 from app.core.dependencies import require_admin
 from app.api.routes import api_router
 from app.db.database import get_async_db, engine
-from app.core.logging_manager import log_manager, LoggingMiddleware, log_info
+from app.core.logging_manager import log_manager, RequestLogger, log_info
 from app.services.calendar.reminder_scheduler import (
     start_reminder_scheduler,
     stop_reminder_scheduler,
@@ -250,11 +250,11 @@ async def lifespan(app: FastAPI):
         logger.warning(f"⚠️ 導覽同步失敗 (不影響核心功能): {e}")
 
     # 啟動 APScheduler (安全掃描/Code Graph/DB Schema 等定時任務)
+    # 多 worker 時僅 leader 派送；SCHEDULER_MODE=runner/off 時改由獨立 runner 行程執行
     try:
-        from app.core.scheduler import setup_scheduler, start_scheduler
-        setup_scheduler()
-        start_scheduler()
-        logger.info("✅ APScheduler 排程器已啟動 (安全掃描 02:00 等)")
+        from app.core.scheduler_runner import start_scheduling
+        if await start_scheduling():
+            logger.info("✅ APScheduler 排程器已啟動 (安全掃描 02:00 等)")
     except Exception as e:
         logger.warning(f"⚠️ APScheduler 排程器啟動失敗 (不影響核心功能): {e}")
 
@@ -308,6 +308,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ ERP 圖譜事件訂閱失敗: {e}")
 
+    # 圖譜 CSR 遍歷引擎（GRAPH_CSR_ENABLED=true 時預熱快照 + 訂閱關係異動事件）
+    try:
+        from app.services.ai.graph.graph_csr_engine import (
+            get_graph_csr_engine, register_graph_csr_handlers,
+        )
+        register_graph_csr_handlers()
+        if get_graph_csr_engine().enabled:
+            get_graph_csr_engine().schedule_refresh()
+            logger.info("✅ 圖譜 CSR 遍歷引擎已啟用（背景建立快照）")
+    except Exception as e:
+        logger.warning(f"⚠️ 圖譜 CSR 遍歷引擎初始化失敗 (將走 SQL CTE): {e}")
+
     # 測試 Redis 連線（AI 快取與統計持久化）
     try:
         from app.core.redis_client import check_redis_health
@@ -324,6 +336,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Redis 初始化失敗，將使用記憶體 fallback: {e}")
 
+    # 認證主體快取失效訂閱 + last_activity 批次寫回
+    try:
+        from app.core.principal_cache import get_activity_writer, get_principal_cache
+        await get_principal_cache().start_listener()
+        await get_activity_writer().start()
+        logger.info("✅ 認證主體快取與 last_activity 批次寫回已啟動")
+    except Exception as e:
+        logger.warning(f"⚠️ 認證主體快取啟動失敗（退回每請求查詢）: {e}")
+
     # 啟動 Embedding 背景回填（非阻塞）
     backfill_task = None
     try:
@@ -567,6 +588,15 @@ async def lifespan(app: FastAPI):
             pass
         logger.info("✅ Embedding 回填任務已取消")
 
+    # 停止主體快取訂閱並寫出剩餘 last_activity
+    try:
+        from app.core.principal_cache import get_activity_writer, get_principal_cache
+        await get_principal_cache().stop_listener()
+        await get_activity_writer().stop()
+        logger.info("✅ 認證主體快取已停止，last_activity 已寫出")
+    except Exception as e:
+        logger.warning(f"⚠️ last_activity 最終寫出失敗: {e}")
+
     # 關閉 Redis 連線
     try:
         from app.core.redis_client import close_redis
@@ -575,10 +605,58 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Redis 關閉失敗: {e}")
 
+    # 關閉 AI provider HTTP 連線池
+    try:
+        from app.core.ai_http_pool import close_ai_http_clients
+        await close_ai_http_clients()
+        logger.info("✅ AI provider HTTP 連線池已關閉")
+    except Exception as e:
+        logger.warning(f"⚠️ AI provider HTTP 連線池關閉失敗: {e}")
+
+    # 關閉標案爬蟲共用抓取引擎（連線池 + 解析 thread pool）
+    try:
+        from app.services.tender.scraper_engine import close_scraper_engine
+        await close_scraper_engine()
+        logger.info("✅ 標案爬蟲抓取引擎已關閉")
+    except Exception as e:
+        logger.warning(f"⚠️ 標案爬蟲抓取引擎關閉失敗: {e}")
+
+    # 關閉記憶 wiki frontmatter 索引（SQLite 連線）
+    try:
+        from app.services.memory.memory_catalog import close_memory_catalogs
+        close_memory_catalogs()
+        logger.info("✅ 記憶索引連線已關閉")
+    except Exception as e:
+        logger.warning(f"⚠️ 記憶索引關閉失敗: {e}")
+
+    # 排空 Domain Event Bus 佇列（佇列中的事件處理完再關閉）
+    try:
+        from app.core.event_bus import EventBus
+        await EventBus.get_instance().shutdown(timeout=10.0)
+        logger.info("✅ Domain Event Bus 已關閉")
+    except Exception as e:
+        logger.warning(f"⚠️ Domain Event Bus 關閉失敗: {e}")
+
+    # 關閉匯出行程池
+    try:
+        from app.services.taoyuan.export_engine import shutdown_export_executor
+        shutdown_export_executor()
+        logger.info("✅ 匯出行程池已關閉")
+    except Exception as e:
+        logger.warning(f"⚠️ 匯出行程池關閉失敗: {e}")
+
+    # 關閉 Code Graph 提取行程池
+    try:
+        from app.services.ai.graph.code_graph_extract_cache import shutdown_code_graph_executor
+        shutdown_code_graph_executor()
+        logger.info("✅ Code Graph 提取行程池已關閉")
+    except Exception as e:
+        logger.warning(f"⚠️ Code Graph 提取行程池關閉失敗: {e}")
+
     # 停止 APScheduler
     try:
-        from app.core.scheduler import stop_scheduler
-        stop_scheduler()
+        from app.core.scheduler_runner import stop_scheduling
+        await stop_scheduling()
         logger.info("✅ APScheduler 排程器已停止")
     except Exception as e:
         logger.warning(f"⚠️ APScheduler 排程器停止失敗: {e}")
@@ -639,38 +717,36 @@ app.add_middleware(
     expose_headers=["X-Process-Time", "X-Request-ID"],  # 允許前端讀取的回應標頭
 )
 # 已移除重複的 CORSMiddleware - 使用上面已驗證可工作的配置
+# GZip 依 content-type 略過 text/event-stream（agent / RAG SSE 串流不得被壓縮緩衝）
 app.add_middleware(GZipMiddleware, minimum_size=1000)
-app.add_middleware(LoggingMiddleware, log_manager=log_manager)
 
-# --- 🛡️ 安全標頭中間件 (v1.27.0) ---
-from app.core.security_headers import SecurityHeadersMiddleware, get_default_csp
-# 2026-08-18：本系統公網原本**完全沒有 CSP**（header 與 meta 皆無）。
-# 這支 middleware 一直支援 CSP、`get_default_csp()` 也早就寫好，
-# 只是註冊時沒有把它接上 —— 屬於「寫好了沒接線」而不是「沒寫」。
-#
-# 先掛 **Report-Only**：瀏覽器照常載入所有資源，只把「若強制執行會被擋的」
-# 報到 securitypolicyviolation。確認主要頁面零 violation 後，
-# 再把參數改成 content_security_policy=... 轉為強制。
-# 直接上強制的風險是具體的：漏掉一個來源就會靜默壞掉某個功能，
-# 而 CSP 造成的失敗多半沒有錯誤畫面。
+# --- 🛡️ HTTP pipeline（2026-10-16）---
+# 原本六層 BaseHTTPMiddleware（Logging / SecurityHeaders / CSRF / TunnelGuard /
+# ApiDocsGuard / add_performance_headers）每層都多一個 task + stream 轉送，
+# 併為單一 pure-ASGI pass：guards → 端點 → 注入安全標頭與 X-Process-Time → 記 log。
+# 檢查邏輯未變，見 app/core/{tunnel_guard,csrf,security_headers}.py。
+from app.core.http_pipeline import DEFAULT_GUARDS, HTTPPipelineMiddleware
+from app.core.security_headers import build_security_headers, get_default_csp
 app.add_middleware(
-    SecurityHeadersMiddleware,
-    content_security_policy_report_only=get_default_csp(),
+    HTTPPipelineMiddleware,
+    # guards 依序：API 文件僅限內網（2026-08-03，獨立於 TUNNEL_GUARD_ENABLED）
+    #            → Tunnel 路由守衛 (v5.2.2) → CSRF 防護 (v1.44.0)
+    guards=DEFAULT_GUARDS,
+    # 2026-08-18：本系統公網原本**完全沒有 CSP**（header 與 meta 皆無）。
+    # 安全標頭一直支援 CSP、`get_default_csp()` 也早就寫好，
+    # 只是註冊時沒有把它接上 —— 屬於「寫好了沒接線」而不是「沒寫」。
+    #
+    # 先掛 **Report-Only**：瀏覽器照常載入所有資源，只把「若強制執行會被擋的」
+    # 報到 securitypolicyviolation。確認主要頁面零 violation 後，
+    # 再把參數改成 content_security_policy=... 轉為強制。
+    # 直接上強制的風險是具體的：漏掉一個來源就會靜默壞掉某個功能，
+    # 而 CSP 造成的失敗多半沒有錯誤畫面。
+    response_headers=build_security_headers(
+        content_security_policy_report_only=get_default_csp(),
+    ),
+    request_logger=RequestLogger(log_manager),
 )
 
-# --- 🛡️ CSRF 防護中間件 (v1.44.0) ---
-from app.core.csrf import CSRFMiddleware
-app.add_middleware(CSRFMiddleware)
-
-# --- 🛡️ Tunnel 路由守衛 (v5.2.2) ---
-from app.core.tunnel_guard import TunnelGuardMiddleware, ApiDocsGuardMiddleware
-app.add_middleware(TunnelGuardMiddleware)
-
-# --- 🛡️ API 文件僅限內網（2026-08-03）---
-# /openapi.json 與 /api/docs 會吐出全部端點的 schema 且不需憑證，實測公網直接 200。
-# 獨立於 TUNNEL_GUARD_ENABLED（那個明確設為 false，不在此變動）。
-app.add_middleware(ApiDocsGuardMiddleware)
-
 # --- 📊 Prometheus 指標中間件 (v5.5.8) ---
 app.add_middleware(
     PrometheusMiddleware,
@@ -678,6 +754,10 @@ app.add_middleware(
 )
 app.add_route("/metrics", get_metrics_endpoint())
 
+# --- 🔎 SQL fingerprint profiler（每路由查詢熱點 / N+1 偵測）---
+from app.core.db_query_profiler import QueryProfilerMiddleware
+app.add_middleware(QueryProfilerMiddleware)
+
 # --- 🔍 Request ID 追蹤中間件 (v1.83.0) ---
 # 最後加入 = 最外層執行，確保所有中間件/端點都能存取 request_id
 app.add_middleware(RequestIdMiddleware)
@@ -690,15 +770,6 @@ register_exception_handlers(app)
 setup_rate_limiter(app)
 
 
-@app.middleware("http")
-async def add_performance_headers(request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
 # --- 靜態檔案與 API 路由 ---
 try:
     app.mount("/static", StaticFiles(directory="static"), name="static")
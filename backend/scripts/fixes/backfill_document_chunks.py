@@ -13,27 +13,32 @@ Usage:
 
     # 只處理特定公文
     python scripts/fixes/backfill_document_chunks.py --doc-ids 1,2,3
+
+    # 中斷後續跑 (自 checkpoint cursor 繼續)
+    python scripts/fixes/backfill_document_chunks.py --resume
 """
 
 import asyncio
 import argparse
 import sys
 import os
+from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from app.db.database import AsyncSessionLocal
-from app.services.ai.document.document_chunker import chunk_documents_batch, chunk_document
+from app.services.ai.document.document_chunker import chunk_documents_batch, chunk_documents_pipeline
+
+CHECKPOINT_PATH = Path(__file__).resolve().parent / ".backfill_document_chunks.checkpoint.json"
 
 
 async def get_unchunked_count(db) -> int:
-    from sqlalchemy import select, func
+    from sqlalchemy import exists, select, func
     from app.extended.models import OfficialDocument, DocumentChunk
 
-    subq = select(DocumentChunk.document_id).distinct()
+    has_chunks = exists().where(DocumentChunk.document_id == OfficialDocument.id)
     result = await db.execute(
-        select(func.count(OfficialDocument.id))
-        .where(OfficialDocument.id.notin_(subq))
+        select(func.count(OfficialDocument.id)).where(~has_chunks)
     )
     return result.scalar() or 0
 
@@ -49,7 +54,10 @@ async def get_total_chunks(db) -> int:
 async def main():
     parser = argparse.ArgumentParser(description="Backfill document chunks")
     parser.add_argument("--dry-run", action="store_true", help="Only show counts")
-    parser.add_argument("--batch-size", type=int, default=50, help="Batch size")
+    parser.add_argument("--batch-size", type=int, default=200, help="Documents per page (one INSERT + commit)")
+    parser.add_argument("--embed-group", type=int, default=256, help="Chunks per embedding request")
+    parser.add_argument("--workers", type=int, default=None, help="Chunking process pool size (0 = inline)")
+    parser.add_argument("--resume", action="store_true", help="Continue from checkpoint cursor")
     parser.add_argument("--doc-ids", type=str, default=None, help="Comma-separated doc IDs")
     parser.add_argument("--with-embeddings", action="store_true", help="Generate embeddings (requires Ollama)")
     args = parser.parse_args()
@@ -82,31 +90,33 @@ async def main():
             doc_ids = [int(x.strip()) for x in args.doc_ids.split(",")]
             print(f"[INFO] 指定處理 {len(doc_ids)} 份公文: {doc_ids}")
 
-        processed_total = 0
-        chunks_total = 0
-        batch_num = 0
-
-        while True:
-            batch_num += 1
-            print(f"\n[BATCH {batch_num}] 處理中 (batch_size={args.batch_size})...")
-
+        if doc_ids:
             result = await chunk_documents_batch(
                 db,
                 document_ids=doc_ids,
-                limit=args.batch_size,
+                limit=len(doc_ids),
                 embedding_manager=embedding_mgr,
                 ai_connector=ai_connector,
             )
-
-            processed = result["processed"]
-            chunks = result["total_chunks"]
-            processed_total += processed
-            chunks_total += chunks
-
-            print(f"  已處理: {processed} 份公文, 產生 {chunks} chunks")
-
-            if processed == 0 or doc_ids:
-                break
+            processed_total, chunks_total = result["processed"], result["total_chunks"]
+        else:
+            if not args.resume and CHECKPOINT_PATH.exists():
+                CHECKPOINT_PATH.unlink()
+            print(f"\n[PIPELINE] page_size={args.batch_size} embed_group={args.embed_group}")
+            result = await chunk_documents_pipeline(
+                db,
+                page_size=args.batch_size,
+                embed_group=args.embed_group,
+                workers=args.workers,
+                embedding_manager=embedding_mgr,
+                ai_connector=ai_connector,
+                checkpoint_path=CHECKPOINT_PATH,
+            )
+            processed_total, chunks_total = result["processed"], result["total_chunks"]
+            print(
+                f"  cursor={result['last_id']} 耗時 {result['elapsed_s']}s "
+                f"({result['docs_per_sec']} docs/s, {result['chunks_per_sec']} chunks/s)"
+            )
 
         final_chunks = await get_total_chunks(db)
         print(f"\n[完成] 共處理 {processed_total} 份公文, 產生 {chunks_total} chunks")
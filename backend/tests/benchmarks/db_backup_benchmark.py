@@ -0,0 +1,161 @@
+"""
+Database backup benchmark -- blocking subprocess.run vs the streaming dump engine.
+
+Generates a fake ``pg_dump`` script in a temp directory that writes
+``--size-mb`` of plain SQL (unique INSERT rows with embedding-like float
+lists drawn from a 4096-value pool) followed by the dump complete marker,
+then backs it up:
+
+  - legacy:  the pre-2026-10-16 path -- subprocess.run(capture_output=True,
+             text=True) on the event loop, write the whole string, re-read the tail
+  - none / gzip / zstd:  dump_engine.dump_database plain format with that
+             compression
+
+Reported per mode: median wall time, raw MB/s, on-disk size, compression
+ratio, the worst event-loop stall (ms) seen by a 5 ms ticker, and the
+process peak RSS growth (MB) -- legacy holds the whole dump as a str.
+
+Usage:
+  python -m tests.benchmarks.db_backup_benchmark [--size-mb 200] [--rounds 3]
+      [--modes legacy,none,gzip,zstd]
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.backup import dump_engine
+from app.services.backup.dump_engine import DumpOptions
+
+FAKE_PG_DUMP = """\
+import os, random, sys
+random.seed(7)
+target = int(os.environ["FAKE_DUMP_BYTES"])
+out = sys.stdout.buffer
+floats = [f"{random.uniform(-1, 1):.6f}" for _ in range(4096)]
+written = i = 0
+while written < target:
+    rows = []
+    for _ in range(1000):
+        vec = ",".join(random.choices(floats, k=48))
+        rows.append(f"INSERT INTO documents VALUES ({i}, '桃園市政府 函 第{i}號', '[{vec}]');\\n")
+        i += 1
+    block = "".join(rows).encode()
+    out.write(block)
+    written += len(block)
+out.write(b"--\\n-- PostgreSQL database dump complete\\n--\\n")
+"""
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _legacy_backup(argv: List[str], env: Dict[str, str], target: Path) -> int:
+    result = subprocess.run(
+        argv, capture_output=True, text=True, timeout=600, env=env,
+        encoding="utf-8", errors="replace",
+    )
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(result.stdout)
+    size = target.stat().st_size
+    with open(target, "r", encoding="utf-8", errors="replace") as f:
+        f.seek(max(0, size - 500))
+        assert "PostgreSQL database dump complete" in f.read()
+    return size
+
+
+async def _measure(mode: str, argv: List[str], env: Dict[str, str], out_dir: Path, n: int) -> Dict[str, Any]:
+    stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal stall
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stall = max(stall, time.perf_counter() - started - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "legacy":
+        target = out_dir / f"legacy_{n}.sql"
+        size = _legacy_backup(argv, env, target)  # 刻意在 event loop 上阻塞，重現舊行為
+        raw = size
+    else:
+        result = await dump_engine.dump_database(
+            argv, env, out_dir, f"{mode}_{n}", DumpOptions(compression=mode),
+        )
+        size, raw = result["size_bytes"], result["raw_bytes"]
+        target = Path(result["file"])
+    wall = time.perf_counter() - started
+    running = False
+    await tick
+    for path in out_dir.iterdir():
+        path.unlink()
+    return {
+        "wall": wall,
+        "raw": raw,
+        "size": size,
+        "stall_ms": stall * 1000,
+        "rss_growth_mb": max(0.0, _peak_rss_mb() - rss_before),
+    }
+
+
+async def run(args) -> Dict[str, Dict[str, Any]]:
+    report = {}
+    with tempfile.TemporaryDirectory(prefix="db-backup-bench-") as tmp:
+        tmp_path = Path(tmp)
+        script = tmp_path / "pg_dump"
+        script.write_text(f"#!{sys.executable}\n{FAKE_PG_DUMP}", encoding="utf-8")
+        script.chmod(0o755)
+        out_dir = tmp_path / "out"
+        out_dir.mkdir()
+        env = {**os.environ, "FAKE_DUMP_BYTES": str(args.size_mb * 1024 * 1024)}
+
+        for mode in args.modes.split(","):
+            rows = [await _measure(mode, [str(script)], env, out_dir, n) for n in range(args.rounds)]
+            wall = statistics.median(r["wall"] for r in rows)
+            report[mode] = {
+                "wall_s": round(wall, 2),
+                "raw_mb_s": round(rows[-1]["raw"] / wall / (1024 * 1024), 1),
+                "size_mb": round(rows[-1]["size"] / (1024 * 1024), 1),
+                "ratio": round(rows[-1]["raw"] / rows[-1]["size"], 2),
+                "stall_ms": round(max(r["stall_ms"] for r in rows), 1),
+                # ru_maxrss 只增不減：排在後面的模式若未超過先前峰值即為 0
+                "rss_mb": round(max(r["rss_growth_mb"] for r in rows), 1),
+            }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--modes", default="legacy,none,gzip,zstd")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(f"{'mode':<8}{'wall s':>8}{'raw MB/s':>10}{'size MB':>9}{'ratio':>7}{'stall ms':>10}{'rss+ MB':>9}")
+    for mode, row in report.items():
+        print(
+            f"{mode:<8}{row['wall_s']:>8}{row['raw_mb_s']:>10}{row['size_mb']:>9}"
+            f"{row['ratio']:>7}{row['stall_ms']:>10}{row['rss_mb']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Document keyword search benchmark -- per-column ILIKE vs indexed search columns.
+
+Builds a synthetic ``documents`` table (default 500k rows) in a scratch schema,
+adds the same generated ``search_text`` / ``search_bigrams`` columns and GIN
+indexes as migration 20261016a002, then runs the predicates emitted by
+DocumentQueryBuilder in both keyword modes under
+``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)``.
+
+Reported per query and mode:
+  - execution time (ms) and shared buffers read/hit
+  - plan node types (Seq Scan vs Bitmap Index Scan)
+  - row count (both modes must agree)
+
+Usage:
+  python -m tests.benchmarks.document_keyword_search_benchmark \\
+      [--dsn postgresql+asyncpg://...] [--rows 500000] [--keep]
+
+The scratch schema ``bench_doc_search`` is dropped afterwards unless --keep.
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import asyncpg as pg_asyncpg
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.repositories.query_builders.document_query_builder import (
+    KEYWORD_MODE_ILIKE,
+    KEYWORD_MODE_INDEXED,
+    DocumentQueryBuilder,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "bench_doc_search"
+MIGRATION_PATH = (
+    Path(__file__).resolve().parents[2]
+    / "alembic" / "versions" / "20261016a002_add_documents_search_columns.py"
+)
+
+QUERIES: List[Dict[str, Any]] = [
+    {"name": "2-char CJK", "method": "with_keyword", "args": ["桃園"]},
+    {"name": "4-char CJK", "method": "with_keyword", "args": ["排水改善"]},
+    {"name": "doc number", "method": "with_keyword", "args": ["府工字第1130012345號"]},
+    {"name": "full, content", "method": "with_keyword_full", "args": ["會勘紀錄"]},
+    {"name": "3 keywords OR", "method": "with_keywords_full", "args": [["用地取得", "路燈", "溝蓋"]]},
+    {"name": "2 keywords AND", "method": "with_keywords", "args": [["龜山", "道路"]]},
+]
+
+_SYNTHETIC_ROWS_SQL = """
+INSERT INTO documents (subject, doc_number, sender, receiver, content, notes, ck_note)
+SELECT
+    (ARRAY['桃園市','新北市','臺北市','龜山區','中壢區','八德區','大溪區'])[1 + g % 7]
+        || (ARRAY['道路','排水改善','路燈','溝蓋','用地取得','橋梁','人行道','邊坡','公園','停車場','管線'])[1 + (g * 7) % 11]
+        || '工程 ' || substr(md5(g::text), 1, 6),
+    '府工字第' || (1130000000 + g) || '號',
+    (ARRAY['桃園市政府工務局','桃園市政府養護工程處','新北市政府','交通部公路局'])[1 + g % 4],
+    (ARRAY['乾坤測繪科技有限公司','龜山區公所','中壢區公所'])[1 + (g * 3) % 3],
+    repeat('主旨所述案件辦理' || (ARRAY['會勘紀錄','現場勘查','協調會議','施工說明'])[1 + (g * 5) % 4]
+           || '，請 查照。' || md5((g * 13)::text), 4),
+    CASE WHEN g % 5 = 0 THEN '待補件 ' || md5((g * 17)::text) END,
+    CASE WHEN g % 3 = 0 THEN '派工 ' || substr(md5((g * 19)::text), 1, 12) END
+FROM generate_series(1, :rows) AS g
+"""
+
+
+def _load_migration():
+    spec = importlib.util.spec_from_file_location("doc_search_migration", MIGRATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _build_sql(mode: str, query: Dict[str, Any]) -> str:
+    """DocumentQueryBuilder 條件 → SELECT count(*)（只涉及被搜尋的欄位）"""
+    qb = DocumentQueryBuilder(db=None).with_keyword_search_mode(mode)
+    getattr(qb, query["method"])(*query["args"])
+    stmt = (
+        sa.select(sa.func.count())
+        .select_from(qb.model.__table__)
+        .where(sa.and_(*qb._conditions))
+    )
+    return str(stmt.compile(dialect=pg_asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _plan_nodes(plan: Dict[str, Any]) -> List[str]:
+    nodes = [plan["Node Type"]]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+async def _setup(conn, rows: int) -> None:
+    migration = _load_migration()
+    await conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(sa.text(f"CREATE SCHEMA {SCHEMA}"))
+    await conn.execute(sa.text(f"SET search_path TO {SCHEMA}, public"))
+    await conn.execute(sa.text("""
+        CREATE TABLE documents (
+            id bigserial PRIMARY KEY,
+            subject varchar(500), doc_number varchar(100),
+            sender varchar(200), receiver varchar(200),
+            content text, notes text, ck_note text
+        )
+    """))
+    started = time.perf_counter()
+    await conn.execute(sa.text(_SYNTHETIC_ROWS_SQL), {"rows": rows})
+    logger.info("Inserted %d rows in %.1fs", rows, time.perf_counter() - started)
+
+    # 與 20261016a002 相同：舊模式依賴的逐欄 trigram 索引 + 新搜尋欄位
+    await conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for column in ("subject", "doc_number", "sender", "receiver", "content", "ck_note"):
+        await conn.execute(sa.text(
+            f"CREATE INDEX ON documents USING gin({column} gin_trgm_ops)"
+        ))
+    started = time.perf_counter()
+    captured: List[str] = []
+
+    class _Op:
+        @staticmethod
+        def execute(sql: str) -> None:
+            captured.append(sql)
+
+    migration.op = _Op
+    migration.upgrade()
+    for sql in captured:
+        if "CREATE EXTENSION" in sql:
+            continue
+        await conn.execute(sa.text(sql.replace(":", "\\:")))
+    logger.info("Search columns + indexes built in %.1fs", time.perf_counter() - started)
+
+
+async def _explain(conn, sql: str) -> Dict[str, Any]:
+    result = await conn.execute(
+        sa.text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql.replace(":", "\\:"))
+    )
+    doc = result.scalar()
+    doc = doc if isinstance(doc, list) else json.loads(doc)
+    plan = doc[0]["Plan"]
+    count = (await conn.execute(sa.text(sql.replace(":", "\\:")))).scalar()
+    return {
+        "ms": round(doc[0]["Execution Time"], 1),
+        "shared_read": plan.get("Shared Read Blocks", 0),
+        "shared_hit": plan.get("Shared Hit Blocks", 0),
+        "nodes": sorted(set(_plan_nodes(plan))),
+        "rows": count,
+    }
+
+
+async def run(dsn: str, rows: int, keep: bool) -> List[Dict[str, Any]]:
+    engine = create_async_engine(dsn)
+    report: List[Dict[str, Any]] = []
+    try:
+        async with engine.begin() as conn:
+            await _setup(conn, rows)
+        async with engine.connect() as conn:
+            await conn.execute(sa.text(f"SET search_path TO {SCHEMA}, public"))
+            for query in QUERIES:
+                entry: Dict[str, Any] = {"query": query["name"]}
+                for mode in (KEYWORD_MODE_ILIKE, KEYWORD_MODE_INDEXED):
+                    sql = _build_sql(mode, query)
+                    await _explain(conn, sql)  # 預熱 buffer cache，兩種模式公平比較
+                    entry[mode] = await _explain(conn, sql)
+                if entry[KEYWORD_MODE_ILIKE]["rows"] != entry[KEYWORD_MODE_INDEXED]["rows"]:
+                    logger.error("Row count mismatch for %s: %s", query["name"], entry)
+                report.append(entry)
+    finally:
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+    return report
+
+
+def _print_report(report: List[Dict[str, Any]]) -> None:
+    header = f"{'query':<16}{'ilike ms':>10}{'indexed ms':>12}{'speedup':>9}  rows    indexed plan"
+    print(header)
+    print("-" * len(header))
+    for entry in report:
+        old, new = entry[KEYWORD_MODE_ILIKE], entry[KEYWORD_MODE_INDEXED]
+        speedup = old["ms"] / new["ms"] if new["ms"] else float("inf")
+        print(
+            f"{entry['query']:<16}{old['ms']:>10}{new['ms']:>12}{speedup:>8.1f}x"
+            f"  {new['rows']:<7} {', '.join(new['nodes'])}"
+        )
+
+
+def main() -> None:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=settings.DATABASE_URL)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    parser.add_argument("--json", action="store_true", help="print raw JSON report")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    report = asyncio.run(run(args.dsn, args.rows, args.keep))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
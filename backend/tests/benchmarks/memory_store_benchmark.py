@@ -0,0 +1,299 @@
+"""
+Memory store benchmark -- full markdown scans vs the frontmatter catalog.
+
+Builds a synthetic wiki/memory tree in a temp directory:
+
+  - ``--patterns`` pattern-*.md files shaped like PatternExtractor output;
+    ``--candidate-ratio`` of them pass the crystallization threshold
+  - one crystal-*.md proposal per candidate (pending / applied / rejected
+    within 7 days, so a scan proposes nothing and every run is identical),
+    padded with proposals for other patterns up to ``--proposals``
+  - ``--failures`` failure-*.md files, half active
+
+File mtimes are set an hour in the past, as on a long-lived store.
+
+Measured:
+
+  - scan:   Crystallizer.scan_and_propose -- legacy (glob + full read of every
+            proposal per candidate check, the pre-2026-10-16 code path) vs
+            the catalog on a warm index
+  - stats:  _read_existing_stats for every pattern (PatternExtractor merge path)
+  - counts: autobiography weekly signals (new patterns / active failures)
+  - build:  catalog cold build and no-change reconcile of all directories
+
+Usage:
+  python -m tests.benchmarks.memory_store_benchmark \\
+      [--patterns 10000] [--proposals 500] [--failures 1000] \\
+      [--candidate-ratio 0.02] [--rounds 3] [--skip-legacy]
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+from zoneinfo import ZoneInfo
+
+from app.services.memory import crystallizer as cs
+from app.services.memory import memory_catalog
+from app.services.memory.crystallizer import Crystallizer
+from app.services.memory.memory_catalog import get_memory_catalog
+from app.services.memory.pattern_extractor import PatternExtractor
+
+TZ_TAIPEI = ZoneInfo("Asia/Taipei")
+TOOLS = ["search_documents", "search_entities", "get_statistics", "search_dispatch_orders"]
+
+
+def _build_store(root: Path, args) -> Dict[str, Path]:
+    dirs = {name: root / name for name in ("patterns", "proposals", "failures")}
+    for d in dirs.values():
+        d.mkdir(parents=True)
+
+    now = datetime.now(TZ_TAIPEI)
+    every = max(1, round(1 / args.candidate_ratio)) if args.candidate_ratio else 0
+    candidates = []
+    for i in range(args.patterns):
+        t_hash = f"{i:010x}"
+        hot = bool(every) and i % every == 0
+        hit, success = (20, 20) if hot else (3 + i % 4, 2 + i % 3)
+        if hot:
+            candidates.append(t_hash)
+        (dirs["patterns"] / f"pattern-{t_hash}.md").write_text(
+            f"""---
+type: agent_memory
+memory_type: pattern
+template_hash: '{t_hash}'
+tool_sequence: [{TOOLS[i % 4]}, {TOOLS[(i + 1) % 4]}]
+domains: [doc]
+wiki_topics: [wiki/topics/公文管理系統總覽.md]
+hit_count: {hit}
+success_count: {success}
+failure_count: {hit - success}
+success_rate: {success / hit:.3f}
+avg_latency_ms: 850
+first_seen: '2026-09-01'
+last_seen: '2026-10-15'
+crystallization_candidate: {hot}
+tags: [memory, pattern, doc]
+---
+
+# Pattern {t_hash}
+
+## 典型問法
+
+- 桃園市政府 今年 第 {i} 件 公文 有幾件
+- 查詢 第 {i} 號 派工單 進度
+
+{"統計說明 " * 40}
+""",
+            encoding="utf-8",
+        )
+
+    statuses = ["pending", "applied", "rejected"]
+    targets = candidates + [f"{i:010x}" for i in range(1, args.patterns, 7)]
+    for n, t_hash in enumerate(targets[:max(args.proposals, len(candidates))]):
+        status = statuses[n % 3]
+        extra = f"\nrejected_at: {(now - timedelta(days=1)).isoformat()}" if status == "rejected" else ""
+        (dirs["proposals"] / f"crystal-intent-{t_hash}-{n:06x}.md").write_text(
+            f"""---
+type: memory_proposal
+proposal_kind: intent_rule
+target_file: intent_rules.yaml
+source_pattern: {t_hash}
+proposed_by: agent
+proposed_at: {now.isoformat()}
+status: {status}{extra}
+reason: "Pattern {t_hash} 已累積 20 次使用"
+---
+
+# Crystal Proposal
+
+{"批准流程說明 " * 80}
+""",
+            encoding="utf-8",
+        )
+
+    for i in range(args.failures):
+        (dirs["failures"] / f"failure-{i:08x}.md").write_text(
+            f"""---
+type: agent_memory
+memory_type: failure
+signature: {i:08x}
+tool_sequence: ["{TOOLS[i % 4]}"]
+hit_count: 4
+failure_count: 3
+active: {"true" if i % 2 else "false"}
+last_seen: 2026-10-{1 + i % 15:02d}
+---
+
+## 🛡️ Defensive Rule（planner 將自動注入）
+
+避免單獨使用 {TOOLS[i % 4]}。
+""",
+            encoding="utf-8",
+        )
+
+    past = time.time() - 3600
+    for d in dirs.values():
+        for path in d.iterdir():
+            os.utime(path, (past, past))
+    return dirs
+
+
+class _LegacyCrystallizer(Crystallizer):
+    """pre-2026-10-16 的掃描路徑：每個候選三次 glob + 整檔讀取全部 proposal。"""
+
+    async def scan_and_propose(self) -> List:
+        proposals = []
+        for path in cs.PATTERNS_DIR.glob("pattern-*.md"):
+            meta = self._parse_pattern_meta(path)
+            if not meta or not self._meets_crystal_threshold(meta):
+                continue
+            if self._was_recently_rejected(meta["template_hash"]):
+                continue
+            if self._has_pending_proposal(meta["template_hash"]):
+                continue
+            if self._already_applied(meta["template_hash"]):
+                continue
+            proposals.append(meta["template_hash"])
+        return proposals
+
+    @staticmethod
+    def _scan(template_hash: str, status: str) -> List[str]:
+        found = []
+        for path in cs.PROPOSALS_DIR.glob("crystal-*.md"):
+            text = path.read_text(encoding="utf-8")
+            if template_hash in text and f"status: {status}" in text:
+                found.append(text)
+        return found
+
+    @classmethod
+    def _has_pending_proposal(cls, template_hash: str) -> bool:
+        return bool(cls._scan(template_hash, "pending"))
+
+    @classmethod
+    def _already_applied(cls, template_hash: str) -> bool:
+        return bool(cls._scan(template_hash, "applied"))
+
+    @classmethod
+    def _was_recently_rejected(cls, template_hash: str) -> bool:
+        cutoff = datetime.now(TZ_TAIPEI) - timedelta(days=7)
+        for text in cls._scan(template_hash, "rejected"):
+            m = re.search(r"^rejected_at:\s*(\S+)", text, re.MULTILINE)
+            if m and datetime.fromisoformat(m.group(1)) > cutoff:
+                return True
+        return False
+
+
+def _legacy_stats(path: Path) -> dict:
+    text = path.read_text(encoding="utf-8")
+    fm = re.match(r"^---\s*\n(.*?)\n---", text, re.DOTALL).group(1)
+    stats = {}
+    for key in ("hit_count", "success_count", "failure_count"):
+        m = re.search(rf"^{key}:\s*(\d+)", fm, re.MULTILINE)
+        if m:
+            stats[key] = int(m.group(1))
+    for key in ("first_seen", "last_seen"):
+        m = re.search(rf"^{key}:[ \t]*(.*)$", fm, re.MULTILINE)
+        if m:
+            stats[key] = PatternExtractor._clean_date_scalar(m.group(1))
+    return stats
+
+
+def _legacy_counts(dirs: Dict[str, Path]) -> tuple:
+    now_ts = time.time()
+    new_patterns = sum(
+        1 for p in dirs["patterns"].glob("pattern-*.md") if now_ts - p.stat().st_mtime < 7 * 86400
+    )
+    active = sum(
+        1 for p in dirs["failures"].glob("failure-*.md")
+        if "active: true" in p.read_text(encoding="utf-8", errors="ignore")
+    )
+    return new_patterns, active
+
+
+def _catalog_counts(dirs: Dict[str, Path]) -> tuple:
+    patterns = get_memory_catalog(dirs["patterns"])
+    failures = get_memory_catalog(dirs["failures"])
+    patterns.reconcile()
+    failures.reconcile()
+    return (
+        patterns.count("pattern-*.md", modified_since=time.time() - 7 * 86400),
+        failures.count("failure-*.md", status="active"),
+    )
+
+
+def _timed(fn: Callable, rounds: int):
+    walls, result = [], None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn()
+        walls.append(time.perf_counter() - started)
+    return statistics.median(walls), result
+
+
+def run(args) -> List[tuple]:
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="memory-bench-") as tmp:
+        dirs = _build_store(Path(tmp), args)
+        cs.PATTERNS_DIR, cs.PROPOSALS_DIR = dirs["patterns"], dirs["proposals"]
+        extractor = PatternExtractor(db=None)
+        pattern_paths = sorted(dirs["patterns"].glob("pattern-*.md"))
+
+        def _build():
+            for d in dirs.values():
+                for f in d.glob(".catalog.sqlite3*"):
+                    f.unlink()
+            memory_catalog.close_memory_catalogs()
+            return [get_memory_catalog(d).reconcile()["parsed"] for d in dirs.values()]
+
+        wall, parsed = _timed(_build, 1)
+        rows.append(("build", "catalog (cold)", wall, sum(parsed)))
+        wall, parsed = _timed(lambda: [get_memory_catalog(d).reconcile()["parsed"] for d in dirs.values()], args.rounds)
+        rows.append(("build", "catalog (no change)", wall, sum(parsed)))
+
+        if not args.skip_legacy:
+            wall, result = _timed(lambda: asyncio.run(_LegacyCrystallizer().scan_and_propose()), 1)
+            rows.append(("scan", "legacy", wall, len(result)))
+        wall, result = _timed(lambda: asyncio.run(Crystallizer().scan_and_propose()), args.rounds)
+        rows.append(("scan", "catalog", wall, len(result)))
+
+        wall, result = _timed(lambda: [_legacy_stats(p) for p in pattern_paths], args.rounds)
+        rows.append(("stats", "legacy", wall, len(result)))
+        wall, result = _timed(lambda: [extractor._read_existing_stats(p) for p in pattern_paths], args.rounds)
+        rows.append(("stats", "catalog", wall, len(result)))
+
+        wall, result = _timed(lambda: _legacy_counts(dirs), args.rounds)
+        rows.append(("counts", "legacy", wall, result))
+        wall, result = _timed(lambda: _catalog_counts(dirs), args.rounds)
+        rows.append(("counts", "catalog", wall, result))
+
+        memory_catalog.close_memory_catalogs()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--patterns", type=int, default=10000)
+    parser.add_argument("--proposals", type=int, default=500)
+    parser.add_argument("--failures", type=int, default=1000)
+    parser.add_argument("--candidate-ratio", type=float, default=0.02)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'op':<8}{'mode':<22}{'wall s':>9}  result")
+    for op, mode, wall, result in run(args):
+        print(f"{op:<8}{mode:<22}{wall:>9.3f}  {result}")
+
+
+if __name__ == "__main__":
+    main()
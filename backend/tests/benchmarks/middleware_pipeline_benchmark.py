@@ -0,0 +1,217 @@
+"""
+Middleware pipeline microbenchmark -- six BaseHTTPMiddleware layers vs one ASGI pass.
+
+Builds two otherwise identical FastAPI apps around a trivial ``GET /ping``
+endpoint (and a CSRF-checked ``POST /ping``):
+
+  - legacy:   the pre-2026-10-16 stack -- Logging / SecurityHeaders / CSRF /
+              TunnelGuard / ApiDocsGuard / X-Process-Time, each a
+              BaseHTTPMiddleware calling the same guard / header code
+  - pipeline: HTTPPipelineMiddleware (app.core.http_pipeline)
+
+Both keep GZip and RequestId so only the replaced layers differ. Requests are
+driven straight through the ASGI callable (no sockets), ``--concurrency`` at a
+time; logging goes to a no-op log manager so file I/O does not dominate.
+
+Reported per stack: requests/sec and p50 / p99 latency (ms).
+
+Usage:
+  python -m tests.benchmarks.middleware_pipeline_benchmark \\
+      [--requests 20000] [--concurrency 32] [--method GET|POST]
+
+Version: 1.0.0
+Created: 2026-10-16
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import PlainTextResponse
+
+from app.core.csrf import csrf_rejection
+from app.core.http_pipeline import DEFAULT_GUARDS, HTTPPipelineMiddleware
+from app.core.logging_manager import RequestLogger
+from app.core.middleware import RequestIdMiddleware
+from app.core.security_headers import build_security_headers, get_default_csp
+from app.core.tunnel_guard import api_docs_rejection, tunnel_rejection
+
+
+class _NullLogManager:
+    def log(self, entry) -> None:
+        pass
+
+
+SECURITY_HEADERS = build_security_headers(content_security_policy_report_only=get_default_csp())
+
+
+def _guard_layer(guard):
+    class _GuardMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            rejection = guard(request)
+            if rejection is not None:
+                return rejection
+            return await call_next(request)
+
+    return _GuardMiddleware
+
+
+class _LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS:
+            response.headers[name.decode()] = value.decode()
+        return response
+
+
+class _LegacyLogging(BaseHTTPMiddleware):
+    def __init__(self, app, request_logger: RequestLogger):
+        super().__init__(app)
+        self.request_logger = request_logger
+
+    async def dispatch(self, request, call_next):
+        start = time.time()
+        request_id = self.request_logger.start(request)
+        response = await call_next(request)
+        self.request_logger.end(
+            request_id, request.method, request.url.path,
+            response.status_code, time.time() - start,
+        )
+        return response
+
+
+def _base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping_get():
+        return PlainTextResponse("pong")
+
+    @app.post("/ping")
+    async def ping_post():
+        return PlainTextResponse("pong")
+
+    return app
+
+
+def build_legacy_app() -> FastAPI:
+    app = _base_app()
+    request_logger = RequestLogger(_NullLogManager())
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(_LegacyLogging, request_logger=request_logger)
+    app.add_middleware(_LegacySecurityHeaders)
+    app.add_middleware(_guard_layer(csrf_rejection))
+    app.add_middleware(_guard_layer(tunnel_rejection))
+    app.add_middleware(_guard_layer(api_docs_rejection))
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.middleware("http")
+    async def add_performance_headers(request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+    return app
+
+
+def build_pipeline_app() -> FastAPI:
+    app = _base_app()
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(
+        HTTPPipelineMiddleware,
+        guards=DEFAULT_GUARDS,
+        response_headers=SECURITY_HEADERS,
+        request_logger=RequestLogger(_NullLogManager()),
+    )
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+async def _one_request(app, method: str) -> float:
+    headers = [(b"host", b"testserver"), (b"accept-encoding", b"gzip")]
+    if method == "POST":
+        headers += [(b"cookie", b"csrf_token=abc"), (b"x-csrf-token", b"abc")]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "method": method, "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "headers": headers, "client": ("127.0.0.1", 5000), "server": ("testserver", 80),
+    }
+    status: List[int] = []
+    request_sent = False
+
+    async def receive():
+        # 與 uvicorn 相同：body 送完後 receive 阻塞到斷線（BaseHTTPMiddleware 會監聽 disconnect）
+        nonlocal request_sent
+        if request_sent:
+            await asyncio.Event().wait()
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    if status != [200]:
+        raise RuntimeError(f"unexpected status {status}")
+    return elapsed
+
+
+async def _run_stack(app, requests: int, concurrency: int, method: str) -> Dict[str, Any]:
+    # lifespan 不需要；先暖身建立 middleware stack
+    for _ in range(200):
+        await _one_request(app, method)
+
+    latencies: List[float] = []
+    queue = iter(range(requests))
+
+    async def worker():
+        for _ in queue:
+            latencies.append(await _one_request(app, method))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": round(requests / wall),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+async def run(requests: int, concurrency: int, method: str) -> Dict[str, Dict[str, Any]]:
+    from app.core.config import settings
+    settings.AUTH_DISABLED = False  # 讓 POST 實際走完 CSRF 比對
+    return {
+        "legacy": await _run_stack(build_legacy_app(), requests, concurrency, method),
+        "pipeline": await _run_stack(build_pipeline_app(), requests, concurrency, method),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--method", choices=["GET", "POST"], default="GET")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.requests, args.concurrency, args.method))
+    print(f"{'stack':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, row in report.items():
+        print(f"{name:<10}{row['rps']:>10}{row['p50_ms']:>10}{row['p99_ms']:>10}")
+    print(f"speedup: {report['pipeline']['rps'] / report['legacy']['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
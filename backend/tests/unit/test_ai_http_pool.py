@@ -0,0 +1,115 @@
+"""
+AI provider 共用 HTTP 連線池測試
+
+鎖定：
+1. 同一 event loop 內同 provider 共用 client，關閉後重建
+2. 環境變數覆寫連線上限 / keep-alive；無 h2 時 HTTP/2 降級
+3. instrumented transport：in-flight 在 body 關閉後歸零、記錄等待時間與新建連線，
+   並保留呼叫端自帶的 trace callback
+"""
+import httpx
+import pytest
+from prometheus_client import CollectorRegistry
+
+from app.core import ai_http_pool
+from app.core.ai_http_pool import (
+    AIHTTPClientPool,
+    AIHTTPPoolMetrics,
+    _InstrumentedTransport,
+    load_pool_config,
+)
+
+
+class _ChunkStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b'{"ok": true}'
+
+
+class _TracingTransport(httpx.AsyncBaseTransport):
+    """模擬 httpcore：分配連線後依序觸發 trace 事件。"""
+
+    async def handle_async_request(self, request):
+        trace = request.extensions["trace"]
+        await trace("connection.connect_tcp.started", {})
+        await trace("connection.connect_tcp.complete", {})
+        return httpx.Response(200, stream=_ChunkStream())
+
+
+def _sample(registry, name, provider):
+    return registry.get_sample_value(name, {"provider": provider})
+
+
+class TestLoadPoolConfig:
+    def test_env_overrides(self, monkeypatch):
+        monkeypatch.setenv("AI_HTTP_OLLAMA_MAX_CONNECTIONS", "4")
+        monkeypatch.setenv("AI_HTTP_OLLAMA_KEEPALIVE_EXPIRY", "15")
+        config = load_pool_config("ollama")
+        assert config.max_connections == 4
+        assert config.keepalive_expiry == 15.0
+        assert config.http2 is False
+
+    def test_invalid_value_keeps_default(self, monkeypatch):
+        monkeypatch.setenv("AI_HTTP_GROQ_MAX_CONNECTIONS", "many")
+        config = load_pool_config("groq")
+        assert config.max_connections == ai_http_pool.DEFAULT_POOL_CONFIGS["groq"].max_connections
+        assert config.http2 is True
+
+
+class TestClientPool:
+    @pytest.mark.asyncio
+    async def test_reuses_client_per_provider(self):
+        pool = AIHTTPClientPool()
+        groq = pool.get("groq")
+        assert pool.get("groq") is groq
+        assert pool.get("ollama") is not groq
+        await pool.aclose()
+        assert groq.is_closed
+        assert pool.get("groq") is not groq
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_http2_falls_back_without_h2(self, monkeypatch):
+        monkeypatch.setattr(ai_http_pool, "_h2_available", lambda: False)
+        pool = AIHTTPClientPool()
+        client = pool.get("nvidia")
+        assert isinstance(client, httpx.AsyncClient)
+        await pool.aclose()
+
+
+class TestInstrumentedTransport:
+    @pytest.mark.asyncio
+    async def test_records_wait_connections_and_in_flight(self):
+        registry = CollectorRegistry()
+        metrics = AIHTTPPoolMetrics(registry=registry)
+        seen = []
+
+        async def caller_trace(name, info):
+            seen.append(name)
+
+        transport = _InstrumentedTransport("ollama", _TracingTransport(), metrics)
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream(
+                "GET", "http://ollama/api/tags", extensions={"trace": caller_trace}
+            ) as response:
+                assert _sample(registry, "ai_http_pool_requests_in_flight", "ollama") == 1
+                await response.aread()
+            assert _sample(registry, "ai_http_pool_requests_in_flight", "ollama") == 0
+
+        assert _sample(registry, "ai_http_pool_wait_seconds_count", "ollama") == 1
+        assert _sample(registry, "ai_http_pool_connections_opened_total", "ollama") == 1
+        assert seen == ["connection.connect_tcp.started", "connection.connect_tcp.complete"]
+
+    @pytest.mark.asyncio
+    async def test_failed_request_releases_in_flight(self):
+        registry = CollectorRegistry()
+        metrics = AIHTTPPoolMetrics(registry=registry)
+
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        transport = _InstrumentedTransport("groq", httpx.MockTransport(handler), metrics)
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(httpx.ConnectError):
+                await client.get("https://api.groq.com/openai/v1/models")
+
+        assert _sample(registry, "ai_http_pool_requests_in_flight", "groq") == 0
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+SQL fingerprint profiler 測試
+
+驗證：
+1. fingerprint 去除字面值 / 參數，IN 清單與多列 VALUES 收斂，保留 ::cast
+2. 彙總 count / total / p95，依路由樣板歸戶，請求外歸 <background>
+3. 單一請求同一 fingerprint 超過閾值 → N+1 報告 + Prometheus counter
+4. fingerprint 上限以外只計 overflow
+5. 實際 SQLAlchemy engine 執行經 listener 進入 profiler
+"""
+import pytest
+from prometheus_client import CollectorRegistry
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.db_query_profiler import (
+    BACKGROUND_ROUTE,
+    QueryProfiler,
+    QueryProfilerMetrics,
+    QueryProfilerMiddleware,
+    fingerprint,
+)
+
+
+@pytest.fixture
+def profiler():
+    return QueryProfiler(
+        metrics=QueryProfilerMetrics(registry=CollectorRegistry()),
+        max_fingerprints=100,
+        n_plus_one_threshold=3,
+    )
+
+
+class TestFingerprint:
+    def test_literals_and_params_become_placeholders(self):
+        a = fingerprint("SELECT * FROM documents WHERE id = 42 AND title = 'abc'")
+        b = fingerprint("SELECT * FROM documents WHERE id = 7 AND title = 'x''y'")
+        assert a == b == "SELECT * FROM documents WHERE id = ? AND title = ?"
+
+    def test_asyncpg_params_and_casts(self):
+        fp = fingerprint("SELECT t1.id FROM t1 WHERE t1.doc_no = $1::VARCHAR LIMIT $2")
+        assert fp == "SELECT t1.id FROM t1 WHERE t1.doc_no = ?::VARCHAR LIMIT ?"
+
+    def test_in_lists_collapse(self):
+        assert fingerprint("SELECT 1 FROM t WHERE id IN ($1, $2, $3)") == fingerprint(
+            "SELECT 1 FROM t WHERE id IN ($1, $2)"
+        )
+
+    def test_multi_row_values_collapse(self):
+        assert fingerprint("INSERT INTO t (a, b) VALUES (1, 2), (3, 4), (5, 6)") == fingerprint(
+            "INSERT INTO t (a, b) VALUES (1, 2), (3, 4)"
+        )
+
+    def test_comments_stripped(self):
+        assert fingerprint("/* route=x */ SELECT  a\n FROM t -- tail") == "SELECT a FROM t"
+
+
+class TestAggregation:
+    def test_background_queries(self, profiler):
+        profiler.record("SELECT * FROM t WHERE id = 1", 2.0)
+        profiler.record("SELECT * FROM t WHERE id = 2", 4.0)
+        top = profiler.top()
+        assert top[0]["count"] == 2
+        assert top[0]["total_ms"] == 6.0
+        assert top[0]["routes"][0]["route"] == BACKGROUND_ROUTE
+
+    def test_request_route_and_n_plus_one(self, profiler):
+        token = profiler.begin_request()
+        profiler.record("SELECT * FROM documents WHERE id = 1", 1.0)
+        for i in range(5):
+            profiler.record(f"SELECT * FROM attachments WHERE document_id = {i}", 1.0)
+        profiler.end_request(token, "/api/documents/{doc_id}", "GET")
+
+        report = profiler.n_plus_one_report()
+        assert len(report) == 1
+        assert report[0]["route"] == "GET /api/documents/{doc_id}"
+        assert report[0]["max_per_request"] == 5
+        assert "attachments" in report[0]["fingerprint"]
+        assert profiler.metrics.n_plus_one.labels(route="GET /api/documents/{doc_id}")._value.get() == 1
+
+        by_route = profiler.top(route="/api/documents/{doc_id}")
+        assert {r["count"] for r in by_route} == {1, 5}
+
+    def test_sort_by_count_and_p95(self, profiler):
+        for _ in range(10):
+            profiler.record("SELECT a FROM fast", 1.0)
+        profiler.record("SELECT a FROM slow", 500.0)
+        assert profiler.top(sort_by="count")[0]["fingerprint"] == "SELECT a FROM fast"
+        assert profiler.top(sort_by="p95_ms")[0]["fingerprint"] == "SELECT a FROM slow"
+
+    def test_overflow_bounded(self):
+        profiler = QueryProfiler(
+            metrics=QueryProfilerMetrics(registry=CollectorRegistry()), max_fingerprints=2,
+        )
+        for table in ("a", "b", "c", "d"):
+            profiler.record(f"SELECT 1 FROM {table}", 1.0)
+        snap = profiler.snapshot()
+        assert snap["fingerprints"] == 2
+        assert snap["overflow"] == 2
+
+
+class TestMiddleware:
+    def test_route_template_attribution(self, profiler):
+        async def detail(request):
+            for i in range(4):
+                profiler.record(f"SELECT * FROM items WHERE parent_id = {i}", 1.0)
+            return JSONResponse({"ok": True})
+
+        app = Starlette(routes=[Route("/items/{item_id}", detail)])
+        app.add_middleware(QueryProfilerMiddleware, profiler=profiler)
+
+        with TestClient(app) as client:
+            assert client.get("/items/123").status_code == 200
+
+        report = profiler.n_plus_one_report()
+        assert report[0]["route"] == "GET /items/{item_id}"
+
+
+class TestListenerIntegration:
+    @pytest.mark.asyncio
+    async def test_engine_queries_reach_profiler(self, profiler, monkeypatch):
+        pytest.importorskip("aiosqlite")
+        from sqlalchemy import text
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        from app.core import db_query_profiler
+        from app.core.db_query_listener import setup_query_listener
+
+        monkeypatch.setattr(db_query_profiler, "_profiler", profiler)
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        setup_query_listener(engine)
+        token = profiler.begin_request()
+        async with engine.connect() as conn:
+            for i in range(4):
+                await conn.execute(text("SELECT :v"), {"v": i})
+        profiler.end_request(token, "/probe", "GET")
+        await engine.dispose()
+
+        assert profiler.n_plus_one_report()[0]["route"] == "GET /probe"
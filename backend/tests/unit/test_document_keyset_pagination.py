@@ -0,0 +1,148 @@
+"""
+公文列表 keyset 分頁 / 估算筆數測試
+
+鎖定：
+1. cursor 編解碼往返；格式錯誤拋 ValueError
+2. list_keyset 兩段查詢：有日期段不足一頁時接無日期段，next_key 指向最後一筆
+3. _count_documents：none 不計數、estimated 大表用估算、小結果集改精確 COUNT
+"""
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import select
+
+from app.extended.models import OfficialDocument
+from app.repositories.document_repository import DocumentRepository
+
+
+def _result(rows):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    return result
+
+
+def _doc(doc_id, doc_date):
+    return SimpleNamespace(id=doc_id, doc_date=doc_date)
+
+
+class TestCursor:
+    def test_round_trip(self):
+        for key in ((date(2026, 3, 1), 42), (None, 7)):
+            assert DocumentRepository.decode_cursor(DocumentRepository.encode_cursor(*key)) == key
+
+    @pytest.mark.parametrize("cursor", ["", "not-base64!", "eyJ4IjoxfQ"])
+    def test_invalid_cursor_raises_value_error(self, cursor):
+        with pytest.raises(ValueError):
+            DocumentRepository.decode_cursor(cursor)
+
+
+class TestListKeyset:
+    @pytest.mark.asyncio
+    async def test_dated_section_fills_page(self):
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=_result([
+            _doc(3, date(2026, 3, 3)), _doc(2, date(2026, 3, 2)), _doc(1, date(2026, 3, 1)),
+        ]))
+        repo = DocumentRepository(db)
+
+        items, next_key = await repo.list_keyset(select(OfficialDocument), limit=2)
+
+        assert [d.id for d in items] == [3, 2]
+        assert next_key == (date(2026, 3, 2), 2)
+        assert db.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_through_to_undated_section(self):
+        db = MagicMock()
+        db.execute = AsyncMock(side_effect=[
+            _result([_doc(5, date(2026, 1, 1))]),
+            _result([_doc(9, None), _doc(4, None)]),
+        ])
+        repo = DocumentRepository(db)
+
+        items, next_key = await repo.list_keyset(
+            select(OfficialDocument), limit=2, after=(date(2026, 2, 1), 8)
+        )
+
+        assert [d.id for d in items] == [5, 9]
+        assert next_key == (None, 9)
+        undated_sql = str(db.execute.await_args_list[1].args[0])
+        assert "doc_date IS NULL" in undated_sql
+
+    @pytest.mark.asyncio
+    async def test_undated_cursor_skips_dated_section(self):
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=_result([_doc(3, None)]))
+        repo = DocumentRepository(db)
+
+        items, next_key = await repo.list_keyset(select(OfficialDocument), limit=2, after=(None, 4))
+
+        assert [d.id for d in items] == [3]
+        assert next_key is None
+        assert db.execute.await_count == 1
+
+
+class _Savepoint:
+    """db.begin_nested() 替身：記錄例外是否在 savepoint 內被回滾"""
+
+    def __init__(self):
+        self.rolled_back = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.rolled_back = exc_type is not None
+        return False
+
+
+class TestCountDocuments:
+    def _service(self, count=12, table_rows=0, plan_rows=0):
+        from app.services.document.core import DocumentService
+
+        service = DocumentService.__new__(DocumentService)
+        count_result = MagicMock()
+        count_result.scalar_one.return_value = count
+        service.db = MagicMock()
+        service.db.execute = AsyncMock(return_value=count_result)
+        service.db.begin_nested = MagicMock(return_value=_Savepoint())
+        service._doc_repo = MagicMock()
+        service._doc_repo.estimate_table_rows = AsyncMock(return_value=table_rows)
+        service._doc_repo.estimate_count = AsyncMock(return_value=plan_rows)
+        return service
+
+    @pytest.mark.asyncio
+    async def test_none_mode_skips_count(self):
+        service = self._service()
+        assert await service._count_documents(select(OfficialDocument), "none") == (None, False)
+        service.db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_estimated_unfiltered_uses_table_stats(self):
+        service = self._service(table_rows=120_000)
+        assert await service._count_documents(select(OfficialDocument), "estimated") == (120_000, True)
+        service.db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_estimated_filtered_uses_plan_rows(self):
+        service = self._service(plan_rows=8_000)
+        query = select(OfficialDocument).where(OfficialDocument.doc_type == "函")
+        assert await service._count_documents(query, "estimated") == (8_000, True)
+        service._doc_repo.estimate_table_rows.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_small_estimate_falls_back_to_exact(self):
+        service = self._service(count=37, plan_rows=40)
+        query = select(OfficialDocument).where(OfficialDocument.doc_type == "函")
+        assert await service._count_documents(query, "estimated") == (37, False)
+
+    @pytest.mark.asyncio
+    async def test_failed_estimate_rolls_back_savepoint_before_exact_count(self):
+        service = self._service(count=42)
+        service._doc_repo.estimate_count = AsyncMock(side_effect=RuntimeError("EXPLAIN failed"))
+        query = select(OfficialDocument).where(OfficialDocument.doc_type == "函")
+
+        assert await service._count_documents(query, "estimated") == (42, False)
+        assert service.db.begin_nested.return_value.rolled_back is True
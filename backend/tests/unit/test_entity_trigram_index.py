@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+正規實體 trigram 倒排索引測試（2026-10-16）
+
+鎖定：
+1. 候選集合與 compute_similarity 暴力比對完全一致（剪枝不得漏掉合格候選）
+2. add / remove 即時反映（create_entity / merge_entities 同步路徑）
+3. 依分數遞減、同分依 id 排序
+"""
+import random
+
+import pytest
+
+from app.services.ai.graph.canonical_entity_matcher import CanonicalEntityMatcher
+from app.services.ai.graph.entity_trigram_index import EntityTrigramIndex, _TypeIndex
+
+
+def _index_with(names):
+    index = EntityTrigramIndex()
+    type_index = _TypeIndex()
+    for i, name in enumerate(names, start=1):
+        type_index.add(i, name)
+    index._types["org"] = type_index
+    return index
+
+
+class TestEntityTrigramIndex:
+    @pytest.mark.parametrize("threshold", [0.5, 0.85])
+    def test_candidates_match_brute_force(self, threshold):
+        rng = random.Random(42)
+        alphabet = "桃園市政府工務局地政事務所水利署新建工程測量ab"
+        names = ["".join(rng.choice(alphabet) for _ in range(rng.randint(2, 14))) for _ in range(800)]
+        index = _index_with(names)
+
+        for _ in range(100):
+            query = rng.choice(names)[: rng.randint(2, 14)] + rng.choice(["", "a", "局"])
+            expected = {
+                i for i, n in enumerate(names, start=1)
+                if CanonicalEntityMatcher.compute_similarity(query, n) >= threshold
+            }
+            got = {c[0] for c in index.candidates("org", query, threshold)}
+            assert got == expected, query
+
+    def test_sorted_by_score_then_id(self):
+        index = _index_with(["桃園市政府工務局", "桃園市政府工務局養護科", "桃園市政府工務局"])
+        results = index.candidates("org", "桃園市政府工務局", 0.5)
+        assert [r[0] for r in results] == [1, 3, 2]
+        assert results[0][2] == 1.0
+
+    def test_add_and_remove_sync(self):
+        index = _index_with(["臺中市政府地政局"])
+        assert index.candidates("org", "桃園市政府地政局", 0.7) == []
+
+        index.add(99, "桃園市政府地政局", "org")
+        assert index.candidates("org", "桃園市政府地政局", 0.7)[0][0] == 99
+
+        index.remove(99, "org")
+        assert index.candidates("org", "桃園市政府地政局", 0.7) == []
+
+    def test_add_ignored_for_unloaded_type(self):
+        index = EntityTrigramIndex()
+        index.add(1, "桃園市", "location")
+        assert index.stats() == {}
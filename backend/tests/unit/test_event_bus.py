@@ -0,0 +1,223 @@
+"""
+EventBus 佇列分派 / Redis Streams 測試
+
+鎖定：
+1. queued 模式 publish 不等待 handler；不同 handler 並行，同一 handler 依序
+2. handler 失敗重試，用盡後計入 failures
+3. 佇列滿時 publish 等待 put_timeout 後丟棄並計數（backpressure）
+4. inline 模式維持逐一 await 的舊行為
+5. EVENT_BUS_STREAM_ENABLED 時事件寫入 events:stream（預設不寫）；
+   EventStreamConsumer 成功後 XACK、失敗保留 pending
+"""
+import asyncio
+
+import pytest
+from prometheus_client import CollectorRegistry
+from unittest.mock import AsyncMock, patch
+
+from app.core.domain_events import DomainEvent, EventType, billing_paid
+from app.core.event_bus import (
+    STREAM_KEY,
+    EventBus,
+    EventBusMetrics,
+    EventStreamConsumer,
+)
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+@pytest.fixture
+def make_bus(registry, monkeypatch):
+    monkeypatch.setenv("EVENT_BUS_RETRY_BACKOFF", "0")
+
+    def _make(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, str(value))
+        return EventBus(metrics=EventBusMetrics(registry=registry))
+    return _make
+
+
+@pytest.fixture(autouse=True)
+def no_redis():
+    with patch("app.core.redis_client.get_redis", new=AsyncMock(return_value=None)):
+        yield
+
+
+def _event(n: int = 0) -> DomainEvent:
+    return DomainEvent(event_type=EventType.BILLING_PAID, payload={"n": n})
+
+
+class TestQueuedDispatch:
+    @pytest.mark.asyncio
+    async def test_publish_returns_before_slow_handler(self, make_bus):
+        bus = make_bus()
+        release = asyncio.Event()
+        seen = []
+
+        async def slow(event):
+            await release.wait()
+            seen.append(event.payload["n"])
+
+        bus.subscribe(EventType.BILLING_PAID, slow)
+        await asyncio.wait_for(bus.publish(_event(1)), timeout=0.5)
+        assert seen == []
+
+        release.set()
+        assert await bus.drain(timeout=1)
+        assert seen == [1]
+        await bus.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_handlers_run_concurrently_and_each_in_order(self, make_bus):
+        bus = make_bus()
+        order = {"a": [], "b": []}
+        both_running = asyncio.Event()
+        active = set()
+
+        def make(name):
+            async def handler(event):
+                active.add(name)
+                if len(active) == 2:
+                    both_running.set()
+                await asyncio.sleep(0.01)
+                order[name].append(event.payload["n"])
+                active.discard(name)
+            handler.__qualname__ = f"handler_{name}"
+            return handler
+
+        bus.subscribe(EventType.BILLING_PAID, make("a"))
+        bus.subscribe(EventType.BILLING_PAID, make("b"))
+        for n in range(3):
+            await bus.publish(_event(n))
+
+        assert await bus.drain(timeout=1)
+        assert both_running.is_set()
+        assert order == {"a": [0, 1, 2], "b": [0, 1, 2]}
+        await bus.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_retries_then_counts_failure(self, make_bus, registry):
+        bus = make_bus(EVENT_BUS_MAX_RETRIES=2)
+        calls = []
+
+        async def flaky(event):
+            calls.append(1)
+            raise RuntimeError("db down")
+
+        bus.subscribe(EventType.BILLING_PAID, flaky)
+        await bus.publish(_event())
+        assert await bus.drain(timeout=1)
+
+        name = flaky.__qualname__
+        assert len(calls) == 3
+        assert registry.get_sample_value("event_bus_handler_retries_total", {"handler": name}) == 2
+        assert registry.get_sample_value("event_bus_handler_failures_total", {"handler": name}) == 1
+        assert registry.get_sample_value(
+            "event_bus_handler_duration_seconds_count",
+            {"handler": name, "event_type": "billing.paid"},
+        ) == 3
+        await bus.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_applies_backpressure_then_drops(self, make_bus, registry):
+        bus = make_bus(EVENT_BUS_QUEUE_SIZE=1, EVENT_BUS_PUT_TIMEOUT=0.05)
+        release = asyncio.Event()
+
+        async def blocked(event):
+            await release.wait()
+
+        bus.subscribe(EventType.BILLING_PAID, blocked)
+        await bus.publish(_event(0))   # 被 worker 取走
+        await asyncio.sleep(0)
+        await bus.publish(_event(1))   # 佔滿佇列
+        await bus.publish(_event(2))   # 等待逾時 → 丟棄
+
+        name = blocked.__qualname__
+        assert registry.get_sample_value("event_bus_events_dropped_total", {"handler": name}) == 1
+        assert registry.get_sample_value("event_bus_queue_depth", {"handler": name}) == 1
+        release.set()
+        assert await bus.drain(timeout=1)
+        await bus.shutdown()
+
+
+class TestInlineDispatch:
+    @pytest.mark.asyncio
+    async def test_inline_awaits_handlers_and_isolates_errors(self, make_bus):
+        bus = make_bus(EVENT_BUS_DISPATCH="inline")
+        seen = []
+
+        async def broken(event):
+            raise RuntimeError("boom")
+
+        async def ok(event):
+            seen.append(event.payload["n"])
+
+        bus.subscribe(EventType.BILLING_PAID, broken)
+        bus.subscribe(EventType.BILLING_PAID, ok)
+        await bus.publish(_event(7))
+        assert seen == [7]
+
+
+class _FakeStreamRedis:
+    def __init__(self):
+        self.entries = []
+        self.acked = []
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        entry_id = f"{len(self.entries) + 1}-0"
+        self.entries.append((key, entry_id, fields, maxlen))
+        return entry_id
+
+    async def xgroup_create(self, *args, **kwargs):
+        return True
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        return [(STREAM_KEY, [(eid, fields) for _, eid, fields, _ in self.entries])]
+
+    async def xack(self, key, group, entry_id):
+        self.acked.append(entry_id)
+
+
+class TestRedisStream:
+    @pytest.mark.asyncio
+    async def test_publish_appends_to_stream(self, make_bus):
+        redis = _FakeStreamRedis()
+        bus = make_bus(EVENT_BUS_STREAM_ENABLED="true", EVENT_BUS_STREAM_MAXLEN=500)
+        with patch("app.core.redis_client.get_redis", new=AsyncMock(return_value=redis)):
+            await bus.publish(billing_paid(12, 1000.0, "CK2026_PM_01_001"))
+
+        key, _, fields, maxlen = redis.entries[0]
+        assert key == STREAM_KEY
+        assert fields["event_type"] == "billing.paid"
+        assert DomainEvent.from_json(fields["data"]).payload["billing_id"] == 12
+        assert maxlen == 500
+
+    @pytest.mark.asyncio
+    async def test_stream_append_is_off_by_default(self, make_bus, monkeypatch):
+        monkeypatch.delenv("EVENT_BUS_STREAM_ENABLED", raising=False)
+        redis = _FakeStreamRedis()
+        bus = make_bus()
+        with patch("app.core.redis_client.get_redis", new=AsyncMock(return_value=redis)) as get_redis:
+            await bus.publish(billing_paid(12, 1000.0, "CK2026_PM_01_001"))
+
+        assert redis.entries == []
+        get_redis.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_consumer_acks_only_handled_entries(self):
+        redis = _FakeStreamRedis()
+        redis.entries = [
+            (STREAM_KEY, "1-0", {"data": _event(1).to_json()}, None),
+            (STREAM_KEY, "2-0", {"data": _event(2).to_json()}, None),
+        ]
+
+        async def handler(event):
+            if event.payload["n"] == 2:
+                raise RuntimeError("retry later")
+
+        consumer = EventStreamConsumer(redis, "notifier", "worker-1", handler)
+        assert await consumer.poll_once() == 1
+        assert redis.acked == ["1-0"]
@@ -5,10 +5,11 @@ ezbid 爬蟲單元測試
 """
 from pathlib import Path
 
+import httpx
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
 
 # v6.12 P3 (2026-05-27): 改用新 DDD path (services.tender.*)
+from app.services.tender import scraper_engine
 from app.services.tender.ezbid_scraper import EzbidScraper, BLOCK_THRESHOLD
 
 
@@ -21,6 +22,17 @@ SAMPLE_HTML = (
 ).read_text(encoding="utf-8")
 
 
+def _use_mock_engine(monkeypatch, status_code: int, text: str = ""):
+    """以 MockTransport 取代共用抓取引擎的網路層（原本 patch 每次新建的 httpx.AsyncClient）"""
+    def handler(request):
+        return httpx.Response(status_code, text=text)
+
+    monkeypatch.setattr(
+        scraper_engine, "_engine",
+        scraper_engine.ScraperEngine(transport=httpx.MockTransport(handler), parse_executor="thread"),
+    )
+
+
 class TestEzbidParser:
     """HTML 解析測試"""
 
@@ -128,33 +140,22 @@ class TestParseDeadline:
 class TestFetchLatest:
 
     @pytest.mark.asyncio
-    async def test_fetch_latest_returns_records(self):
+    async def test_fetch_latest_returns_records(self, monkeypatch):
         scraper = EzbidScraper()
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.text = SAMPLE_HTML
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(monkeypatch, 200, SAMPLE_HTML)
 
-            result = await scraper.fetch_latest(query="測量", pages=1)
+        result = await scraper.fetch_latest(query="測量", pages=1)
 
         assert result["source"] == "ezbid"
         assert result["total"] == 2
         assert len(result["records"]) == 2
 
     @pytest.mark.asyncio
-    async def test_fetch_latest_http_error(self):
+    async def test_fetch_latest_http_error(self, monkeypatch):
         scraper = EzbidScraper()
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 503
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(monkeypatch, 503)
 
-            result = await scraper.fetch_latest(pages=1)
+        result = await scraper.fetch_latest(pages=1)
 
         assert result["total"] == 0
         assert result["records"] == []
@@ -190,44 +191,32 @@ class TestEzbidBlockDetection:
         assert result == []
 
     @pytest.mark.asyncio
-    async def test_fetch_page_increments_failures_on_403(self):
+    async def test_fetch_page_increments_failures_on_403(self, monkeypatch):
         """HTTP 403 → consecutive_failures + 1，return []"""
         scraper = EzbidScraper()
         assert scraper._consecutive_failures == 0
 
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 403
-            mock_resp.text = ""
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(monkeypatch, 403, "")
 
-            result = await scraper._fetch_page(None, "ALL", 1, 100)
+        result = await scraper._fetch_page(None, "ALL", 1, 100)
 
         assert result == []
         assert scraper._consecutive_failures == 1
 
     @pytest.mark.asyncio
-    async def test_fetch_page_detects_captcha_keyword(self):
+    async def test_fetch_page_detects_captcha_keyword(self, monkeypatch):
         """response body 含 'captcha' → consecutive_failures + 1"""
         scraper = EzbidScraper()
 
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.text = "Please solve captcha to continue"
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(monkeypatch, 200, "Please solve captcha to continue")
 
-            result = await scraper._fetch_page(None, "ALL", 1, 100)
+        result = await scraper._fetch_page(None, "ALL", 1, 100)
 
         assert result == []
         assert scraper._consecutive_failures == 1
 
     @pytest.mark.asyncio
-    async def test_bootstrap_css_class_is_not_treated_as_block(self):
+    async def test_bootstrap_css_class_is_not_treated_as_block(self, monkeypatch):
         """正常頁面含 `d-inline-block` 等 CSS class，不得被判成封鎖。
 
         2026-08-03 迴歸：原偵測是 `"block" in body_lower`，會被 Bootstrap 的
@@ -236,55 +225,39 @@ class TestEzbidBlockDetection:
         """
         scraper = EzbidScraper()
 
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.text = (
-                '<html><head><style>.d-inline-block{display:block}</style></head>'
-                "<body>" + SAMPLE_HTML + "</body></html>"
-            )
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(monkeypatch, 200, (
+            '<html><head><style>.d-inline-block{display:block}</style></head>'
+            "<body>" + SAMPLE_HTML + "</body></html>"
+        ))
 
-            result = await scraper._fetch_page(None, "ALL", 1, 100)
+        result = await scraper._fetch_page(None, "ALL", 1, 100)
 
         assert scraper._consecutive_failures == 0, "正常頁面不該累計封鎖失敗"
         assert len(result) >= 1, "正常頁面應解析出標案"
 
     @pytest.mark.asyncio
-    async def test_real_block_page_still_detected(self):
+    async def test_real_block_page_still_detected(self, monkeypatch):
         """真的封鎖頁仍要被抓到（確認上面的修法沒把偵測整個關掉）。"""
         scraper = EzbidScraper()
 
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.text = "<html><body>Access Denied — your IP has been blocked</body></html>"
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(
+            monkeypatch, 200, "<html><body>Access Denied — your IP has been blocked</body></html>",
+        )
 
-            result = await scraper._fetch_page(None, "ALL", 1, 100)
+        result = await scraper._fetch_page(None, "ALL", 1, 100)
 
         assert result == []
         assert scraper._consecutive_failures == 1
 
     @pytest.mark.asyncio
-    async def test_fetch_page_resets_failures_on_success(self):
+    async def test_fetch_page_resets_failures_on_success(self, monkeypatch):
         """200 + 正常 HTML → consecutive_failures 歸 0"""
         scraper = EzbidScraper()
         scraper._consecutive_failures = 2
 
-        with patch("app.services.tender.ezbid_scraper.httpx.AsyncClient") as mock_client:
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.text = SAMPLE_HTML
-            mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client.return_value)
-            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
-            mock_client.return_value.get = AsyncMock(return_value=mock_resp)
+        _use_mock_engine(monkeypatch, 200, SAMPLE_HTML)
 
-            result = await scraper._fetch_page(None, "ALL", 1, 100)
+        result = await scraper._fetch_page(None, "ALL", 1, 100)
 
         assert len(result) == 2
         assert scraper._consecutive_failures == 0
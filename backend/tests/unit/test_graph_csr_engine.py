@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+圖譜 CSR 遍歷引擎測試（2026-10-16）
+
+鎖定與 SQL Recursive CTE 版一致的語意：
+- 邊無向、鄰居端必須是 knowledge 域
+- 最短路徑為最少跳數，relations 對應沿途 relation_label
+- K 跳鄰居回傳 {entity_id: hop}，依 entity_id 取 limit
+- GRAPH_RELATIONS_CHANGED 新增邊進 overlay；刪除 / stale 標 stale → 回退 SQL
+- 帶 graph_domain 的新節點進 overlay；重建期間的事件於新快照重放
+- degree 與 SQL COUNT(*) 同義（含 code 域鄰居）
+- graph_change_notifier：commit 後才發佈，rollback / SAVEPOINT rollback 作廢
+"""
+import asyncio
+import contextlib
+import dataclasses
+
+import pytest
+
+from app.core.domain_events import graph_relations_changed
+from app.services.ai.core.ai_config import get_ai_config
+from app.services.ai.graph.graph_csr_engine import CSRSnapshot, GraphCSREngine
+
+# 1 - 2 - 3 - 4 - 5 鏈，外加捷徑 1 - 6 - 5；9 為 code 域節點（不可作為鄰居）
+ROWS = [
+    (1, 2, "承辦", True, True),
+    (2, 3, "發文", True, True),
+    (3, 4, "收文", True, True),
+    (4, 5, "位於", True, True),
+    (1, 6, "委託", True, True),
+    (6, 5, "管轄", True, True),
+    (5, 9, "code_ref", True, False),
+    (7, 8, "無關", True, True),
+]
+
+
+@pytest.fixture
+def engine() -> GraphCSREngine:
+    eng = GraphCSREngine()
+    eng._config = dataclasses.replace(get_ai_config(), graph_csr_enabled=True)
+    eng._snapshot = CSRSnapshot.from_rows(ROWS)
+    return eng
+
+
+class TestGraphCSREngine:
+    def test_shortest_path_prefers_fewest_hops(self, engine: GraphCSREngine):
+        path, relations = engine.shortest_path(1, 5, max_hops=6)
+        assert path == [1, 6, 5]
+        assert relations == ["委託", "管轄"]
+
+    def test_shortest_path_is_undirected(self, engine: GraphCSREngine):
+        path, relations = engine.shortest_path(4, 2, max_hops=6)
+        assert path == [4, 3, 2]
+        assert relations == ["收文", "發文"]
+
+    def test_shortest_path_respects_max_hops(self, engine: GraphCSREngine):
+        assert engine.shortest_path(2, 5, max_hops=2) == ([], [])
+        path, _ = engine.shortest_path(2, 5, max_hops=3)
+        assert len(path) == 4
+
+    def test_unreachable_and_non_knowledge_neighbor(self, engine: GraphCSREngine):
+        assert engine.shortest_path(1, 7, max_hops=6) == ([], [])
+        # 9 是 code 域 → 不能當作鄰居走進去
+        assert engine.shortest_path(5, 9, max_hops=6) == ([], [])
+
+    def test_k_hop_returns_hops_ordered_by_id(self, engine: GraphCSREngine):
+        assert engine.k_hop(1, max_hops=1, limit=50) == {1: 0, 2: 1, 6: 1}
+        assert engine.k_hop(1, max_hops=2, limit=50) == {1: 0, 2: 1, 3: 2, 5: 2, 6: 1}
+        assert list(engine.k_hop(1, max_hops=4, limit=3)) == [1, 2, 3]
+
+    def test_disabled_engine_defers_to_sql(self, engine: GraphCSREngine):
+        engine._config = dataclasses.replace(engine._config, graph_csr_enabled=False)
+        assert engine.shortest_path(1, 5, max_hops=6) is None
+        assert engine.k_hop(1, max_hops=2, limit=50) is None
+
+    @pytest.mark.asyncio
+    async def test_added_edge_goes_to_overlay(self, engine: GraphCSREngine):
+        await engine.handle_relations_changed(graph_relations_changed([[2, 4, "會勘"]]))
+
+        path, relations = engine.shortest_path(1, 4, max_hops=6)
+        assert path == [1, 2, 4]
+        assert relations == ["承辦", "會勘"]
+        assert engine.stats()["overlay_arcs"] == 2
+
+    @pytest.mark.asyncio
+    async def test_removed_edge_marks_stale(self, engine: GraphCSREngine, monkeypatch):
+        monkeypatch.setattr(engine, "schedule_refresh", lambda: None)
+        await engine.handle_relations_changed(
+            graph_relations_changed([], removed=[[1, 6, "委託"]])
+        )
+        assert engine.shortest_path(1, 5, max_hops=6) is None
+
+    @pytest.mark.asyncio
+    async def test_stale_event_marks_stale(self, engine: GraphCSREngine, monkeypatch):
+        monkeypatch.setattr(engine, "schedule_refresh", lambda: None)
+        await engine.handle_relations_changed(graph_relations_changed([], stale=True))
+        assert engine.shortest_path(1, 5, max_hops=6) is None
+
+    @pytest.mark.asyncio
+    async def test_new_node_with_domain_joins_overlay(self, engine: GraphCSREngine, monkeypatch):
+        monkeypatch.setattr(engine, "schedule_refresh", lambda: None)
+        await engine.handle_relations_changed(graph_relations_changed([
+            [4, 10, "會勘", "knowledge", "knowledge"],
+            [10, 11, "code_ref", "knowledge", "code"],
+        ]))
+
+        assert engine.stats()["stale"] is False
+        path, relations = engine.shortest_path(1, 10, max_hops=6)
+        assert path == [1, 2, 3, 4, 10]
+        assert relations[-1] == "會勘"
+        assert engine.k_hop(10, max_hops=1, limit=50) == {4: 1, 10: 0}
+        assert engine.shortest_path(10, 11, max_hops=6) == ([], [])
+
+    @pytest.mark.asyncio
+    async def test_unknown_node_without_domain_marks_stale(self, engine: GraphCSREngine, monkeypatch):
+        monkeypatch.setattr(engine, "schedule_refresh", lambda: None)
+        await engine.handle_relations_changed(graph_relations_changed([[4, 10, "會勘"]]))
+        assert engine.k_hop(4, max_hops=1, limit=50) is None
+
+    @pytest.mark.asyncio
+    async def test_degree_counts_all_edges_like_sql(self, engine: GraphCSREngine):
+        # 5：4、6、9（code 域）三條邊，與 SQL COUNT(*) 相同
+        assert engine.degree(5) == 3
+        assert engine.degree(9) == 1
+        await engine.handle_relations_changed(graph_relations_changed([
+            [5, 12, "code_graph", "knowledge", "code"],
+        ]))
+        assert engine.degree(5) == 4
+
+    def test_snapshot_uses_loaded_degrees(self):
+        snap = CSRSnapshot.from_rows(ROWS, degrees=[(5, 40), (1, 2)])
+        assert snap.degree_of(5) == 40
+        assert snap.degree_of(3) == 0
+
+    @pytest.mark.asyncio
+    async def test_events_during_refresh_are_replayed(self, engine: GraphCSREngine, monkeypatch):
+        loading, release = _block_snapshot_load(monkeypatch)
+        refresh = asyncio.create_task(engine.refresh())
+        await loading.wait()
+        await engine.handle_relations_changed(graph_relations_changed([
+            [2, 4, "會勘"], [5, 13, "位於", "knowledge", "knowledge"],
+        ]))
+        release.set()
+        await refresh
+
+        assert engine.stats()["stale"] is False
+        assert engine.shortest_path(1, 4, max_hops=6)[0] == [1, 2, 4]
+        assert engine.shortest_path(6, 13, max_hops=6)[0] == [6, 5, 13]
+        assert engine.stats()["overlay_arcs"] == 4
+
+    @pytest.mark.asyncio
+    async def test_removal_during_refresh_keeps_snapshot_stale(self, engine: GraphCSREngine, monkeypatch):
+        monkeypatch.setattr(engine, "schedule_refresh", lambda: None)
+        loading, release = _block_snapshot_load(monkeypatch)
+        refresh = asyncio.create_task(engine.refresh())
+        await loading.wait()
+        await engine.handle_relations_changed(
+            graph_relations_changed([], removed=[[1, 6, "委託"]])
+        )
+        release.set()
+        await refresh
+
+        assert engine.stats()["stale"] is True
+        assert engine.shortest_path(1, 5, max_hops=6) is None
+
+
+def _block_snapshot_load(monkeypatch):
+    """替換 async_session_maker：邊查詢停在 release 之前（模擬重建中的 DB 讀取）"""
+    import app.db.database as database
+
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    class FakeResult:
+        def __init__(self, rows):
+            self._rows = rows
+
+        def all(self):
+            return self._rows
+
+    class FakeSession:
+        async def execute(self, stmt):
+            if "graph_domain" in str(stmt):
+                loading.set()
+                await release.wait()
+                return FakeResult(ROWS)  # 讀取當下事件中的邊尚未 commit
+            return FakeResult([])
+
+    @contextlib.asynccontextmanager
+    async def fake_session_maker():
+        yield FakeSession()
+
+    monkeypatch.setattr(database, "async_session_maker", fake_session_maker)
+    return loading, release
+
+
+class TestGraphChangeNotifier:
+    """變更於 commit 後才發佈；rollback（含 SAVEPOINT）作廢該交易內的變更"""
+
+    @pytest.mark.asyncio
+    async def test_publish_after_commit_and_drop_rolled_back(self, monkeypatch):
+        from sqlalchemy import text
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        from app.services.ai.graph import graph_change_notifier as notifier
+
+        published = []
+
+        async def fake_publish(added, removed, stale):
+            published.append((added, removed, stale))
+
+        monkeypatch.setattr(notifier, "_publish", fake_publish)
+        db_engine = create_async_engine("sqlite+aiosqlite://")
+        async with AsyncSession(db_engine) as db:
+            await db.execute(text("SELECT 1"))
+            notifier.queue_relations_changed(db, added=[[1, 2, "承辦"]])
+            with pytest.raises(RuntimeError):
+                async with db.begin_nested():
+                    notifier.queue_relations_changed(db, added=[[3, 4, "會勘"]])
+                    raise RuntimeError("batch failed")
+            assert published == []  # commit 前不發佈
+
+            await db.commit()
+            await asyncio.sleep(0)
+            assert published == [([[1, 2, "承辦"]], [], False)]
+
+            await db.execute(text("SELECT 1"))
+            notifier.queue_relations_changed(db, stale=True)
+            await db.rollback()
+            await db.commit()
+            await asyncio.sleep(0)
+            assert len(published) == 1
+        await db_engine.dispose()
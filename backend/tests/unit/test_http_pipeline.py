@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+HTTPPipelineMiddleware 測試（取代六層 BaseHTTPMiddleware 的單一 ASGI pass）
+
+鎖定：
+1. 安全標頭 + X-Process-Time 注入，且覆蓋端點自設的同名標頭
+2. guards 短路：非內網 API 文件 → 404、CSRF token 不匹配 → 403（也帶安全標頭）
+3. SSE 經 GZipMiddleware + pipeline 仍逐 chunk 送出、不被壓縮
+4. 例外時記 REQUEST_ERROR 並向外拋
+"""
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.core.http_pipeline import DEFAULT_GUARDS, HTTPPipelineMiddleware
+from app.core.security_headers import build_security_headers
+
+
+class _RecordingLogger:
+    def __init__(self):
+        self.events = []
+
+    def start(self, request):
+        self.events.append(("start", request.url.path))
+        return "rid"
+
+    def end(self, request_id, method, path, status_code, process_time):
+        self.events.append(("end", path, status_code))
+
+    def error(self, request_id, method, path, exc, process_time):
+        self.events.append(("error", path, type(exc).__name__))
+
+
+async def _ping(request):
+    return PlainTextResponse("pong", headers={"X-Frame-Options": "SAMEORIGIN"})
+
+
+async def _write(request):
+    return JSONResponse({"ok": True})
+
+
+async def _boom(request):
+    raise RuntimeError("boom")
+
+
+async def _events(request):
+    async def stream():
+        for i in range(3):
+            yield f"data: {'x' * 600} {i}\n\n"
+            await asyncio.sleep(0)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def _build_app(request_logger):
+    app = Starlette(routes=[
+        Route("/ping", _ping),
+        Route("/write", _write, methods=["POST"]),
+        Route("/boom", _boom),
+        Route("/events", _events),
+        Route("/api/docs", _ping),
+    ])
+    app.add_middleware(GZipMiddleware, minimum_size=100)
+    app.add_middleware(
+        HTTPPipelineMiddleware,
+        guards=DEFAULT_GUARDS,
+        response_headers=build_security_headers(content_security_policy_report_only="default-src 'self'"),
+        request_logger=request_logger,
+    )
+    return app
+
+
+async def _call(app, method, path, headers=(), client=("127.0.0.1", 5000)):
+    messages = []
+    scope = {
+        "type": "http", "method": method, "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": client, "server": ("testserver", 80),
+    }
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            await asyncio.Event().wait()  # 串流回應監聽 disconnect：保持連線直到被取消
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, messages[1:]
+
+
+@pytest.fixture
+def request_logger():
+    return _RecordingLogger()
+
+
+@pytest.fixture
+def app(request_logger, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "AUTH_DISABLED", False, raising=False)
+    return _build_app(request_logger)
+
+
+@pytest.mark.asyncio
+async def test_security_headers_and_process_time(app, request_logger):
+    status, headers, body = await _call(app, "GET", "/ping")
+
+    assert status == 200
+    assert headers["x-frame-options"] == "DENY"  # 覆蓋端點自設值
+    assert headers["content-security-policy-report-only"] == "default-src 'self'"
+    assert "reporting-endpoints" in headers
+    assert float(headers["x-process-time"]) >= 0
+    assert body[0]["body"] == b"pong"
+    assert request_logger.events == [("start", "/ping"), ("end", "/ping", 200)]
+
+
+@pytest.mark.asyncio
+async def test_api_docs_rejected_from_public_ip(app):
+    status, headers, _ = await _call(app, "GET", "/api/docs", client=("8.8.8.8", 5000))
+    assert status == 404
+    assert headers["x-content-type-options"] == "nosniff"
+
+    status, _, _ = await _call(app, "GET", "/api/docs")
+    assert status == 200
+
+
+@pytest.mark.asyncio
+async def test_csrf_mismatch_short_circuits(app):
+    status, _, body = await _call(
+        app, "POST", "/write",
+        headers=[("cookie", "csrf_token=abc; access_token=t"), ("x-csrf-token", "xyz")],
+    )
+    assert status == 403
+    assert "token 不匹配".encode() in body[0]["body"]
+
+    status, _, _ = await _call(
+        app, "POST", "/write",
+        headers=[("cookie", "csrf_token=abc"), ("x-csrf-token", "abc")],
+    )
+    assert status == 200
+
+
+@pytest.mark.asyncio
+async def test_sse_is_streamed_uncompressed(app):
+    status, headers, chunks = await _call(
+        app, "GET", "/events", headers=[("accept-encoding", "gzip")],
+    )
+    assert status == 200
+    assert "content-encoding" not in headers
+    bodies = [m["body"] for m in chunks if m.get("body")]
+    assert len(bodies) == 3
+    assert bodies[0].startswith(b"data: ")
+
+
+@pytest.mark.asyncio
+async def test_large_response_still_gzipped(request_logger):
+    async def _big(request):
+        return PlainTextResponse("y" * 5000)
+
+    app = Starlette(routes=[Route("/big", _big)])
+    app.add_middleware(GZipMiddleware, minimum_size=100)
+    app.add_middleware(HTTPPipelineMiddleware, request_logger=request_logger)
+
+    _, headers, _ = await _call(app, "GET", "/big", headers=[("accept-encoding", "gzip")])
+    assert headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_exception_logged_and_reraised(app, request_logger):
+    with pytest.raises(RuntimeError):
+        await _call(app, "GET", "/boom")
+    assert request_logger.events[-1] == ("error", "/boom", "RuntimeError")
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Memory catalog 測試（app.services.memory.memory_catalog）
+
+鎖定：
+1. frontmatter 頂層欄位原始值、key / status 推導（pattern / failure / proposal）
+2. reconcile 只重新解析 mtime/size 有變的檔、刪除已消失者；racy 同長度改寫不漏
+3. record_write / get 單檔維護；資料庫開不起來退回記憶體
+4. Crystallizer 狀態查詢走索引：7 日內拒絕 / 舊拒絕、未達門檻的 pattern 不整檔解析
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.services.memory import memory_catalog as mc
+from app.services.memory.memory_catalog import MemoryCatalog, parse_frontmatter_fields
+
+HOUR_AGO = time.time() - 3600
+
+
+def _write(path, front: str, body: str = "# body\n", mtime: float = HOUR_AGO):
+    path.write_text(f"---\n{front}\n---\n\n{body}", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _pattern(d, t_hash, hit=10, rate="1.0", mtime=HOUR_AGO):
+    return _write(d / f"pattern-{t_hash}.md", (
+        f"type: agent_memory\ntemplate_hash: '{t_hash}'\ntool_sequence: [search_documents]\n"
+        f"hit_count: {hit}\nsuccess_rate: {rate}\ncrystallization_candidate: True\n"
+        f"first_seen: '2026-10-01'\ntags:\n  - nested"
+    ), mtime=mtime)
+
+
+def test_fields_key_and_status():
+    fields = parse_frontmatter_fields(
+        "---\ntemplate_hash: '0042'\nhit_count: 7  \ntags:\n  - a\n  - b\n---\nstatus: body\n"
+    )
+    assert fields == {"template_hash": "'0042'", "hit_count": "7", "tags": ""}
+    assert parse_frontmatter_fields("no frontmatter") == {}
+
+    assert mc._derive_key_status(fields) == ("0042", None)
+    assert mc._derive_key_status({"signature": "s1", "active": "TRUE"}) == ("s1", "active")
+    assert mc._derive_key_status({"signature": "s1", "active": "false"}) == ("s1", "inactive")
+    assert mc._derive_key_status({"source_pattern": "h", "status": "pending"}) == ("h", "pending")
+
+
+class TestReconcile:
+    def test_only_changed_files_reparsed(self, tmp_path):
+        a = _pattern(tmp_path, "a")
+        _pattern(tmp_path, "b")
+        (tmp_path / "notes.txt").write_text("x", encoding="utf-8")
+        catalog = MemoryCatalog(tmp_path)
+
+        assert catalog.reconcile() == {"files": 2, "reused": 0, "parsed": 2, "removed": 0}
+        assert catalog.reconcile() == {"files": 2, "reused": 2, "parsed": 0, "removed": 0}
+
+        _pattern(tmp_path, "a", hit=11, mtime=HOUR_AGO + 60)
+        (tmp_path / "pattern-b.md").unlink()
+        assert catalog.reconcile() == {"files": 1, "reused": 0, "parsed": 1, "removed": 1}
+
+        entry = catalog.find("pattern-*.md", key="a")[0]
+        assert entry.path == a
+        assert entry.get_int("hit_count") == 11
+        assert entry.get("first_seen") == "2026-10-01"
+
+    def test_racy_same_size_rewrite_detected(self, tmp_path):
+        now = time.time()
+        path = _write(tmp_path / "crystal-x.md", "source_pattern: h\nstatus: pending", mtime=now)
+        catalog = MemoryCatalog(tmp_path)
+        assert catalog.count(status="pending") == 1
+
+        # 同長度改寫且 mtime 不變（粗粒度檔案系統同秒內寫兩次）
+        _write(path, "source_pattern: h\nstatus: applied", mtime=now)
+        catalog.reconcile()
+
+        assert catalog.count(key="h", status="applied") == 1
+        assert catalog.count(status="pending") == 0
+
+    def test_index_persists_across_instances(self, tmp_path):
+        _pattern(tmp_path, "a")
+        MemoryCatalog(tmp_path).reconcile()
+        assert MemoryCatalog(tmp_path).reconcile()["parsed"] == 0
+
+
+def test_record_write_and_get(tmp_path):
+    catalog = MemoryCatalog(tmp_path)
+    catalog.reconcile()
+    path = _write(tmp_path / "failure-s1.md", "signature: s1\nactive: true\nlast_seen: 2026-10-10")
+    catalog.record_write(path)
+    assert catalog.count("failure-*.md", status="active") == 1
+
+    _write(path, "signature: s1\nactive: false\nlast_seen: 2026-10-10", mtime=HOUR_AGO + 5)
+    assert catalog.get(path).status == "inactive"  # get 自行 stat 對帳
+    assert catalog.count(status="active") == 0
+
+    path.unlink()
+    assert catalog.get(path) is None
+    assert catalog.count() == 0
+
+
+def test_falls_back_to_memory_when_db_unavailable(tmp_path):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("", encoding="utf-8")
+    _pattern(tmp_path, "a")
+
+    catalog = MemoryCatalog(tmp_path, db_path=blocker / "catalog.sqlite3")
+
+    assert catalog.count("pattern-*.md") == 1
+
+
+def test_read_existing_stats_discards_corrupted_dates(tmp_path):
+    from app.services.memory.pattern_extractor import PatternExtractor
+
+    path = _write(tmp_path / "pattern-c.md", (
+        "template_hash: c\nhit_count: 4\nsuccess_count: 3\n"
+        f"first_seen: {chr(39) * 5000}2026-05-10{chr(39) * 5000}\nlast_seen: '2026-10-01'"
+    ))
+    stats = PatternExtractor(db=None)._read_existing_stats(path)
+
+    assert stats == {"hit_count": 4, "success_count": 3, "last_seen": "2026-10-01"}
+
+
+class TestCrystallizerQueries:
+    @pytest.fixture
+    def dirs(self, tmp_path, monkeypatch):
+        from app.services.memory import crystallizer as cs
+
+        patterns, proposals = tmp_path / "patterns", tmp_path / "proposals"
+        patterns.mkdir()
+        proposals.mkdir()
+        monkeypatch.setattr(cs, "PATTERNS_DIR", patterns)
+        monkeypatch.setattr(cs, "PROPOSALS_DIR", proposals)
+        return patterns, proposals
+
+    def _proposal(self, proposals, name, t_hash, status, rejected_at=None):
+        front = f"type: memory_proposal\nsource_pattern: {t_hash}\nstatus: {status}"
+        if rejected_at:
+            front += f"\nrejected_at: {rejected_at.isoformat()}"
+        _write(proposals / f"{name}.md", front)
+
+    def test_rejection_window(self, dirs):
+        from app.services.memory.crystallizer import Crystallizer
+
+        _, proposals = dirs
+        now = datetime.now(ZoneInfo("Asia/Taipei"))
+        self._proposal(proposals, "crystal-intent-new-1", "new", "rejected", now - timedelta(days=1))
+        self._proposal(proposals, "crystal-intent-old-1", "old", "rejected", now - timedelta(days=8))
+        self._proposal(proposals, "note-new", "other", "rejected", now)
+
+        assert Crystallizer._was_recently_rejected("new") is True
+        assert Crystallizer._was_recently_rejected("old") is False
+        assert Crystallizer._was_recently_rejected("other") is False  # 非 crystal-*.md 不算
+
+    @pytest.mark.asyncio
+    async def test_scan_only_parses_prefiltered_patterns(self, dirs, monkeypatch):
+        from app.services.memory.crystallizer import Crystallizer
+
+        patterns, proposals = dirs
+        _pattern(patterns, "hot")
+        _pattern(patterns, "cold", hit=2)
+        _pattern(patterns, "flaky", rate="0.5")
+        self._proposal(proposals, "crystal-intent-hot-1", "hot", "applied")
+
+        parsed = []
+        original = Crystallizer._parse_pattern_meta
+
+        def _spy(path):
+            parsed.append(path.name)
+            return original(path)
+
+        monkeypatch.setattr(Crystallizer, "_parse_pattern_meta", staticmethod(_spy))
+
+        assert await Crystallizer().scan_and_propose() == []
+        assert parsed == ["pattern-hot.md"]
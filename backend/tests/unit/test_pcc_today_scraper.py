@@ -15,9 +15,16 @@ from __future__ import annotations
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from app.services.tender import scraper_engine
 from app.services.tender.pcc_today_scraper import PccTodayScraper
 
 
+@pytest.fixture(autouse=True)
+def _thread_parse_engine(monkeypatch):
+    """解析改走共用引擎；測試用 thread 解析池，不啟動 spawn 子行程"""
+    monkeypatch.setattr(scraper_engine, "_engine", scraper_engine.ScraperEngine(parse_executor="thread"))
+
+
 # ============================================================================
 # Fixture HTML：模擬 PCC 頁面結構
 # 真實 PCC todayTender 頁面為 header table (id=label_typeX_Y) + sibling data table
@@ -0,0 +1,309 @@
+"""
+認證主體快取 / last_activity 寫回測試
+
+鎖定：
+1. jti 命中不查 DB；TTL 或 session 到期即失效
+2. invalidate_jti / invalidate_user 立即失效、廣播 Redis，墓碑期內拒絕回填
+3. 其他 worker 的廣播失效本地條目，自己的廣播略過
+4. last_activity 合併為單一批次 UPDATE，失敗時保留待寫
+5. get_current_user_from_token 第二次請求不再查詢 user_sessions / users
+6. password_hash 不進快取；修改密碼立即失效該使用者的快取主體
+"""
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core import principal_cache as principal_cache_module
+from app.core.principal_cache import (
+    INVALIDATION_CHANNEL,
+    ActivityWriteBehind,
+    PrincipalCache,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, data):
+        self.published.append((channel, json.loads(data)))
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return PrincipalCache(ttl=30, max_entries=100, tombstone_seconds=5, clock=clock)
+
+
+@pytest.fixture
+def redis():
+    fake = _FakeRedis()
+    with patch("app.core.redis_client.get_redis", new=AsyncMock(return_value=fake)):
+        yield fake
+
+
+def _future(minutes=60):
+    return datetime.utcnow() + timedelta(minutes=minutes)
+
+
+class TestPrincipalCache:
+    def test_hit_until_ttl(self, cache, clock):
+        cache.put("j1", 7, {"id": 7, "role": "user"}, _future())
+        assert cache.get("j1").user_fields["role"] == "user"
+
+        clock.now += 31
+        assert cache.get("j1") is None
+        assert cache.stats()["hits"] == 1
+
+    def test_expired_session_is_a_miss(self, cache):
+        cache.put("j1", 7, {"id": 7}, datetime.utcnow() - timedelta(seconds=1))
+        assert cache.get("j1") is None
+
+    def test_lru_bound(self, clock):
+        cache = PrincipalCache(ttl=30, max_entries=2, clock=clock)
+        for jti in ("a", "b", "c"):
+            cache.put(jti, 1, {"id": 1}, _future())
+        assert cache.get("a") is None
+        assert len(cache) == 2
+
+    def test_zero_ttl_disables(self, clock):
+        cache = PrincipalCache(ttl=0, clock=clock)
+        assert cache.put("j1", 7, {"id": 7}, _future()) is False
+        assert cache.get("j1") is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_jti_publishes_and_blocks_refill(self, cache, clock, redis):
+        cache.put("j1", 7, {"id": 7}, _future())
+        await cache.invalidate_jti("j1")
+
+        assert cache.get("j1") is None
+        channel, message = redis.published[0]
+        assert channel == INVALIDATION_CHANNEL
+        assert message["jti"] == "j1"
+
+        # 撤銷尚未 commit 時併發請求讀到舊列 → 墓碑期內不回填
+        assert cache.put("j1", 7, {"id": 7}, _future()) is False
+        clock.now += 6
+        assert cache.put("j1", 7, {"id": 7}, _future()) is True
+
+    @pytest.mark.asyncio
+    async def test_invalidate_user_drops_every_session(self, cache, redis):
+        cache.put("j1", 7, {"id": 7}, _future())
+        cache.put("j2", 7, {"id": 7}, _future())
+        cache.put("j3", 8, {"id": 8}, _future())
+
+        await cache.invalidate_user(7)
+
+        assert cache.get("j1") is None and cache.get("j2") is None
+        assert cache.get("j3") is not None
+        assert redis.published[0][1]["user_id"] == 7
+
+    @pytest.mark.asyncio
+    async def test_publish_failure_still_invalidates_locally(self, cache):
+        cache.put("j1", 7, {"id": 7}, _future())
+        with patch("app.core.redis_client.get_redis", new=AsyncMock(side_effect=ConnectionError)):
+            await cache.invalidate_jti("j1")
+        assert cache.get("j1") is None
+
+    @pytest.mark.asyncio
+    async def test_messages_from_other_workers(self, cache, clock, redis):
+        other = PrincipalCache(ttl=30, clock=clock)
+        with patch("app.core.redis_client.get_redis", new=AsyncMock(return_value=redis)):
+            await other.invalidate_user(7)
+        remote = json.dumps({**redis.published[0][1]})
+
+        cache.put("j1", 7, {"id": 7}, _future())
+        cache.apply_message(remote)
+        assert cache.get("j1") is None
+
+        # 自己發出的訊息略過（本地已先失效）
+        await cache.invalidate_jti("jx")
+        cache.put("j2", 9, {"id": 9}, _future())
+        cache.apply_message(json.dumps({"user_id": 9, "origin": redis.published[-1][1]["origin"]}))
+        assert cache.get("j2") is not None
+
+
+class _FakeDB:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        if self.fail:
+            raise ConnectionError("db down")
+        self.calls.append((str(stmt), params))
+
+    async def commit(self):
+        self.committed = True
+
+
+class TestActivityWriteBehind:
+    @pytest.mark.asyncio
+    async def test_coalesces_into_one_bulk_update(self):
+        db = _FakeDB()
+        writer = ActivityWriteBehind(flush_interval=60, session_factory=lambda: db)
+        t0 = datetime(2026, 10, 16, 9, 0, 0)
+        for seconds in (1, 3, 2):
+            writer.touch("j1", t0 + timedelta(seconds=seconds))
+        writer.touch("j2", t0)
+
+        assert await writer.flush() == 2
+        assert len(db.calls) == 1 and db.committed
+        sql, params = db.calls[0]
+        assert "unnest" in sql
+        stamps = dict(zip(params["jtis"], params["stamps"]))
+        assert stamps == {"j1": t0 + timedelta(seconds=3), "j2": t0}
+        assert writer.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_pending(self):
+        writer = ActivityWriteBehind(flush_interval=60, session_factory=lambda: _FakeDB(fail=True))
+        writer.touch("j1")
+        assert await writer.flush() == 0
+        assert writer.pending_count == 1
+        assert writer.flush_failures == 1
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_remaining(self):
+        db = _FakeDB()
+        writer = ActivityWriteBehind(flush_interval=60, session_factory=lambda: db)
+        await writer.start()
+        assert writer.running
+        writer.touch("j1")
+        await writer.stop()
+        assert not writer.running
+        assert len(db.calls) == 1
+
+
+class _Result:
+    def __init__(self, row):
+        self._row = row
+
+    def fetchone(self):
+        return self._row
+
+
+class TestGetCurrentUserFromToken:
+    @pytest.mark.asyncio
+    async def test_second_request_skips_session_and_user_queries(self, monkeypatch, clock):
+        from app.core.auth_service import AuthService, _PRINCIPAL_FIELDS
+
+        cache = PrincipalCache(ttl=30, clock=clock)
+        flush_db = _FakeDB()
+        writer = ActivityWriteBehind(flush_interval=60, session_factory=lambda: flush_db)
+        monkeypatch.setattr(principal_cache_module, "_principal_cache", cache)
+        monkeypatch.setattr(principal_cache_module, "_activity_writer", writer)
+
+        user_row = SimpleNamespace(**{field: None for field in _PRINCIPAL_FIELDS})
+        user_row.id, user_row.email, user_row.role, user_row.is_active = 7, "a@example.com", "user", True
+        session_row = SimpleNamespace(expires_at=_future())
+        db = AsyncMock()
+        db.execute = AsyncMock(side_effect=[_Result(session_row), _Result(user_row)])
+
+        token = AuthService.create_access_token({"sub": "7"}, jti="jti-7")
+        await writer.start()
+        try:
+            first = await AuthService.get_current_user_from_token(db, token)
+            second = await AuthService.get_current_user_from_token(db, token)
+        finally:
+            await writer.stop()
+
+        assert first.id == second.id == 7
+        assert second is not first
+        assert "password_hash" not in cache.get("jti-7").user_fields
+        assert db.execute.await_count == 2
+        db.commit.assert_not_awaited()
+        assert flush_db.calls[0][1]["jtis"] == ["jti-7"]
+
+        await cache.invalidate_jti("jti-7")
+        assert cache.get("jti-7") is None
+
+
+class TestUserChangesEvictPrincipal:
+    @pytest.mark.asyncio
+    async def test_change_password_evicts_cached_principal(self, monkeypatch, clock, redis):
+        from app.api.endpoints.auth.profile import change_password
+        from app.core.auth_service import AuthService
+        from app.schemas.auth import PasswordChange
+
+        cache = PrincipalCache(ttl=30, clock=clock)
+        monkeypatch.setattr(principal_cache_module, "_principal_cache", cache)
+        cache.put("jti-7", 7, {"id": 7, "role": "user"}, _future())
+
+        stored = SimpleNamespace(
+            id=7, username="alice",
+            password_hash=AuthService.get_password_hash("Old-Passw0rd!2026x"),
+        )
+        user_repo = SimpleNamespace(
+            get_by_id=AsyncMock(return_value=stored),
+            db=SimpleNamespace(commit=AsyncMock()),
+        )
+
+        result = await change_password.__wrapped__(
+            request=None,
+            response=None,
+            password_data=PasswordChange(
+                current_password="Old-Passw0rd!2026x",
+                new_password="N3w-Passw0rd!2026y",
+            ),
+            current_user=SimpleNamespace(id=7, auth_provider="email"),
+            user_repo=user_repo,
+        )
+
+        assert result == {"message": "密碼修改成功"}
+        user_repo.db.commit.assert_awaited_once()
+        assert cache.get("jti-7") is None
+        assert redis.published[-1][1]["user_id"] == 7
+
+    @pytest.mark.asyncio
+    async def test_role_permission_sync_evicts_updated_users(self, monkeypatch, clock, redis):
+        from app.services.system.role_permissions_service import RolePermissionsService
+
+        cache = PrincipalCache(ttl=30, clock=clock)
+        monkeypatch.setattr(principal_cache_module, "_principal_cache", cache)
+        cache.put("jti-stale", 7, {"id": 7, "role": "user"}, _future())
+        cache.put("jti-aligned", 8, {"id": 8, "role": "user"}, _future())
+
+        users = [
+            SimpleNamespace(id=7, email="a@x", full_name="A", permissions=json.dumps(["documents:read"])),
+            SimpleNamespace(id=8, email="b@x", full_name="B",
+                            permissions=json.dumps(["documents:read", "documents:edit"])),
+        ]
+        db = SimpleNamespace(
+            execute=AsyncMock(return_value=SimpleNamespace(fetchall=lambda: users)),
+            commit=AsyncMock(),
+        )
+        service = RolePermissionsService(db)
+        service.repo = SimpleNamespace(get_by_role=AsyncMock(return_value=SimpleNamespace(
+            permissions=["documents:edit", "documents:read"],
+        )))
+
+        result = await service.sync_users_to_role_permissions("user", actor_id=1)
+
+        assert result["updated"] == 1 and result["skipped"] == 1
+        db.commit.assert_awaited_once()
+        assert cache.get("jti-stale") is None
+        assert cache.get("jti-aligned") is not None
+        assert redis.published[-1][1]["user_id"] == 7
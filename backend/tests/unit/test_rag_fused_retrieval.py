@@ -0,0 +1,140 @@
+"""
+RAG fused retrieval（向量 + BM25 + wiki，RRF 融合）測試
+
+鎖定：
+1. RRF 分數 = Σ 1/(k+rank)，兩路皆命中者優先於單路
+2. 候選列 → sources：欄位與舊版 chunk retrieval 相容 + rrf_score / bm25_score
+3. tsquery 字串去除運算子（避免 to_tsquery 語法錯誤）
+4. 「有無 chunks」檢查快取，不再每次查詢打 DB
+5. 融合查詢在 SAVEPOINT 內執行；失敗或無結果時退回舊流程，mode 記為 legacy
+6. 預設關閉（opt-in），RAG_FUSED_RETRIEVAL=true 才啟用
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.ai.search.rag_retrieval import (
+    _to_tsquery_text,
+    fuse_chunk_candidates,
+    has_embedded_chunks,
+    reciprocal_rank_fusion,
+    reset_chunk_presence_cache,
+)
+
+
+def _row(chunk_id, doc_id, distance, vec_rank, lex_rank, bm25=None):
+    return SimpleNamespace(
+        id=chunk_id, document_id=doc_id, chunk_index=0, chunk_text=f"chunk {chunk_id}",
+        distance=distance, vec_rank=vec_rank, lex_rank=lex_rank, bm25=bm25,
+        doc_number=f"桃工字第{doc_id}號", subject="道路工程", doc_type="函", category="收文",
+        sender="工務局", receiver="乾坤", doc_date=None,
+    )
+
+
+def test_rrf_sums_reciprocal_ranks():
+    scores = reciprocal_rank_fusion([{"a": 1, "b": 2}, {"b": 1, "c": 3}], k=60)
+    assert scores["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert scores["a"] == pytest.approx(1 / 61)
+    assert max(scores, key=scores.get) == "b"
+
+
+def test_fuse_prefers_candidates_found_by_both_paths():
+    rows = [
+        _row(1, 10, 0.10, vec_rank=1, lex_rank=None),
+        _row(2, 20, 0.20, vec_rank=2, lex_rank=1, bm25=0.4),
+        _row(3, 30, 0.45, vec_rank=None, lex_rank=2, bm25=0.2),
+    ]
+    sources = fuse_chunk_candidates(rows, [], top_k=3, rrf_k=60)
+
+    assert [s["chunk_id"] for s in sources] == [2, 1, 3]
+    top = sources[0]
+    assert top["similarity"] == pytest.approx(0.8)
+    assert top["bm25_score"] == pytest.approx(0.4)
+    assert {"document_id", "doc_number", "subject", "ck_note", "rrf_score"} <= set(top)
+
+
+def test_fuse_includes_wiki_as_third_ranking():
+    wiki = [{"document_id": None, "doc_number": "[wiki:entities/a.md]", "subject": "甲",
+             "content": "...", "similarity": 0.95, "source_type": "wiki"}]
+    sources = fuse_chunk_candidates([_row(1, 10, 0.1, vec_rank=1, lex_rank=None)], wiki, top_k=5, rrf_k=60)
+
+    assert {s.get("source_type") for s in sources} == {None, "wiki"}
+    assert len(sources) == 2
+
+
+def test_fused_retrieval_is_opt_in(monkeypatch):
+    from app.services.ai.core.ai_config import AIConfig
+
+    monkeypatch.delenv("RAG_FUSED_RETRIEVAL", raising=False)
+    assert AIConfig.from_env().rag_fused_retrieval is False
+    monkeypatch.setenv("RAG_FUSED_RETRIEVAL", "true")
+    assert AIConfig.from_env().rag_fused_retrieval is True
+
+
+def test_tsquery_text_strips_operators():
+    assert _to_tsquery_text(["道路", "a&b", "!!", "道路", "工程:*"]) == "道路 | ab | 工程"
+    assert _to_tsquery_text(None) == ""
+
+
+@pytest.mark.asyncio
+async def test_chunk_presence_is_cached():
+    from app.extended.models import DocumentChunk
+
+    reset_chunk_presence_cache()
+    result = MagicMock()
+    result.first.return_value = (1,)
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    expected = hasattr(DocumentChunk, "embedding")  # 無 pgvector 時直接判定為無 chunks
+
+    assert await has_embedded_chunks(db) is expected
+    assert await has_embedded_chunks(db) is expected
+    assert db.execute.await_count == (1 if expected else 0)
+
+    reset_chunk_presence_cache()
+    await has_embedded_chunks(db)
+    assert db.execute.await_count == (2 if expected else 0)
+    reset_chunk_presence_cache()
+
+
+class _Savepoint:
+    """db.begin_nested() 替身：記錄例外是否在 savepoint 內被回滾"""
+
+    def __init__(self):
+        self.rolled_back = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.rolled_back = exc_type is not None
+        return False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fused_effect", [RuntimeError("syntax error in tsquery"), []])
+async def test_fused_failure_or_empty_falls_back_inside_savepoint(monkeypatch, fused_effect):
+    from app.services.ai.search import rag_retrieval
+
+    savepoint = _Savepoint()
+    db = MagicMock()
+    db.begin_nested = MagicMock(return_value=savepoint)
+    legacy = [{"document_id": 1}]
+    monkeypatch.setattr(rag_retrieval, "has_embedded_chunks", AsyncMock(return_value=True))
+    monkeypatch.setattr(
+        rag_retrieval, "get_ai_config", lambda: SimpleNamespace(rag_fused_retrieval=True)
+    )
+    fused = AsyncMock(side_effect=fused_effect) if isinstance(fused_effect, Exception) \
+        else AsyncMock(return_value=fused_effect)
+    monkeypatch.setattr(rag_retrieval, "retrieve_chunks_fused", fused)
+    monkeypatch.setattr(rag_retrieval, "retrieve_documents", AsyncMock(return_value=legacy))
+    # 舊流程無 pgvector 欄位時直接走 doc-level（retrieve_documents）
+    monkeypatch.delattr("app.extended.models.DocumentChunk.embedding", raising=False)
+
+    timings = {}
+    assert await rag_retrieval.retrieve_chunks(db, [0.1], 5, 0.5, ["道路"], timings) == legacy
+
+    db.begin_nested.assert_called_once()
+    assert savepoint.rolled_back is isinstance(fused_effect, Exception)
+    assert timings["mode"] == "legacy"
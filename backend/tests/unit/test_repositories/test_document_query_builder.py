@@ -13,7 +13,17 @@ from datetime import date
 from unittest.mock import AsyncMock, MagicMock, patch
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repositories.query_builders.document_query_builder import DocumentQueryBuilder
+from sqlalchemy.dialects import postgresql
+
+from app.repositories.query_builders.document_query_builder import (
+    DocumentQueryBuilder,
+    document_search_bigrams,
+)
+
+
+def _where_sql(qb: DocumentQueryBuilder) -> str:
+    """以 PostgreSQL dialect 編譯條件（不展開參數）"""
+    return str(qb._build_query().compile(dialect=postgresql.dialect())).split("WHERE", 1)[1]
 
 
 class TestDocumentQueryBuilder:
@@ -440,3 +450,63 @@ class TestDocumentQueryBuilder:
         qb = DocumentQueryBuilder(mock_db)
         qb.with_has_attachment(True)
         assert len(qb._conditions) == 1
+
+
+class TestIndexedKeywordSearch:
+    """關鍵字搜尋 indexed / ilike 模式產生的條件"""
+
+    @pytest.fixture
+    def qb(self):
+        return DocumentQueryBuilder(AsyncMock(spec=AsyncSession))
+
+    def test_bigrams_lowercase_and_skip_whitespace(self):
+        assert document_search_bigrams("桃園") == ["桃園"]
+        assert document_search_bigrams("AB c") == ["ab"]
+        assert document_search_bigrams("會") == []
+
+    def test_bigrams_fold_ascii_only(self):
+        """資料庫 lc-ctype=C：PG lower() 不折疊全形 / 羅馬數字，Python 端也不可折疊"""
+        assert document_search_bigrams("第Ⅱ期") == ["Ⅱ期", "第Ⅱ"]
+        assert document_search_bigrams("ＡＢ區") == ["ＡＢ", "Ｂ區"]
+
+    def test_keyword_bigrams_computed_in_sql(self):
+        """關鍵字字元對由 doc_search_bigrams(lower(:kw)) 產生，與 STORED 欄位同一套 lower"""
+        for keyword in ("第Ⅱ期", "ＡＢ區"):
+            stmt = DocumentQueryBuilder(AsyncMock(spec=AsyncSession)).with_keyword(keyword)._build_query()
+            compiled = stmt.compile(dialect=postgresql.dialect())
+            sql = str(compiled).split("WHERE", 1)[1]
+            assert "documents.search_bigrams @> doc_search_bigrams(lower(" in sql
+            assert keyword in compiled.params.values()
+
+    def test_keyword_uses_search_columns(self, qb):
+        sql = _where_sql(qb.with_keyword("桃園市"))
+        assert "documents.search_bigrams @>" in sql
+        assert "documents.search_text ILIKE" in sql
+        assert "documents.content" not in sql
+        assert "documents.subject" not in sql
+
+    def test_keyword_full_adds_content(self, qb):
+        sql = _where_sql(qb.with_keyword_full("會勘"))
+        assert "documents.search_bigrams @>" in sql
+        assert "documents.content ILIKE" in sql
+
+    def test_single_char_and_wildcards_skip_bigram_filter(self, qb):
+        assert "search_bigrams" not in _where_sql(qb.with_keyword("會"))
+        qb2 = DocumentQueryBuilder(AsyncMock(spec=AsyncSession))
+        assert "search_bigrams" not in _where_sql(qb2.with_keyword("a_b"))
+
+    def test_keywords_full_or_of_indexed_conditions(self, qb):
+        sql = _where_sql(qb.with_keywords_full(["桃園", "會勘"]))
+        assert sql.count("search_bigrams @>") == 2
+        assert " OR " in sql
+
+    def test_ilike_mode_keeps_per_column_predicates(self, qb):
+        sql = _where_sql(qb.with_keyword_search_mode("ilike").with_keyword_full("桃園"))
+        assert "search_text" not in sql
+        for column in ("subject", "doc_number", "sender", "receiver", "content", "notes", "ck_note"):
+            assert f"documents.{column} ILIKE" in sql
+
+    def test_mode_from_env(self, monkeypatch):
+        monkeypatch.setenv("DOCUMENT_KEYWORD_SEARCH_MODE", "ilike")
+        qb = DocumentQueryBuilder(AsyncMock(spec=AsyncSession))
+        assert "search_text" not in _where_sql(qb.with_keyword("桃園"))
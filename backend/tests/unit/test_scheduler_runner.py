@@ -0,0 +1,177 @@
+"""
+排程器 leader 選舉 / 併發類別測試
+
+鎖定：
+1. LeaderElector：取得鎖 → on_elected；續期失敗 → on_revoked；stop 釋放鎖
+2. SCHEDULER_MODE=runner/off 時 API 行程不註冊任何 job
+3. tracked_job 依類別限流，排隊時間寫入 SchedulerTracker (last_wait_ms)
+4. resume_scheduler 不補跑暫停期間錯過的觸發
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core import scheduler as scheduler_module
+from app.core import scheduler_runner
+from app.core.scheduler import SchedulerTracker, get_job_class, tracked_job
+from app.core.scheduler_runner import LeaderElector, RedisLeaderLock
+
+
+class _FakeLock:
+    backend = "fake"
+
+    def __init__(self, acquire=True, renew=True):
+        self.acquire_result = acquire
+        self.renew_result = renew
+        self.released = False
+
+    async def acquire(self):
+        return self.acquire_result
+
+    async def renew(self):
+        return self.renew_result
+
+    async def release(self):
+        self.released = True
+
+
+class _FakeRedis:
+    """最小 SET NX / 比對 token 的 Lua 腳本模擬"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.store.get(key) != token:
+            return 0
+        if "del" in script:
+            del self.store[key]
+        return 1
+
+
+class TestLeaderElector:
+    @pytest.mark.asyncio
+    async def test_elected_then_revoked_on_failed_renew(self):
+        events = []
+        lock = _FakeLock()
+        elector = LeaderElector(lock, lambda: events.append("up"), lambda: events.append("down"))
+
+        assert await elector.tick() is True
+        assert await elector.tick() is True  # 續期成功不重複觸發
+        lock.renew_result = False
+        assert await elector.tick() is False
+
+        assert events == ["up", "down"]
+
+    @pytest.mark.asyncio
+    async def test_lock_errors_count_as_not_leader(self):
+        lock = _FakeLock()
+
+        async def boom():
+            raise ConnectionError("redis down")
+
+        lock.acquire = boom
+        elector = LeaderElector(lock, lambda: None, lambda: None)
+        assert await elector.tick() is False
+
+    @pytest.mark.asyncio
+    async def test_stop_revokes_and_releases(self):
+        events = []
+        lock = _FakeLock()
+        elector = LeaderElector(lock, lambda: None, lambda: events.append("down"))
+        await elector.tick()
+        await elector.stop()
+        assert events == ["down"]
+        assert lock.released
+
+    @pytest.mark.asyncio
+    async def test_redis_lock_single_holder(self):
+        redis = _FakeRedis()
+        first, second = RedisLeaderLock(redis, 30), RedisLeaderLock(redis, 30)
+
+        assert await first.acquire() is True
+        assert await second.acquire() is False
+        assert await second.renew() is False
+        await second.release()  # 非持有者釋放無效
+        assert await first.renew() is True
+        await first.release()
+        assert await second.acquire() is True
+
+
+class TestSchedulingMode:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["runner", "off"])
+    async def test_api_process_registers_no_jobs(self, monkeypatch, mode):
+        monkeypatch.setenv("SCHEDULER_MODE", mode)
+        called = []
+        monkeypatch.setattr(scheduler_module, "setup_scheduler", lambda: called.append(1))
+
+        assert await scheduler_runner.start_scheduling() is False
+        assert called == []
+
+    def test_invalid_mode_falls_back_to_embedded(self, monkeypatch):
+        monkeypatch.setenv("SCHEDULER_MODE", "bogus")
+        assert scheduler_runner.get_scheduler_mode() == "embedded"
+
+
+class TestJobConcurrency:
+    def test_job_classes(self):
+        assert get_job_class("code_graph_reconcile") == "cpu"
+        assert get_job_class("process_reminders") == "io"
+
+    @pytest.mark.asyncio
+    async def test_cpu_jobs_are_bounded_and_wait_is_recorded(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("SCHEDULER_CPU_CONCURRENCY", "1")
+        monkeypatch.setattr(SchedulerTracker, "_EVENTS_LOG", tmp_path / "cron_events.jsonl")
+        monkeypatch.setattr(scheduler_module, "_job_semaphores", {})
+        running = []
+        peak = 0
+
+        def make(job_id):
+            @tracked_job(job_id)
+            async def job():
+                nonlocal peak
+                running.append(job_id)
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.02)
+                running.remove(job_id)
+            return job
+
+        await asyncio.gather(make("wiki_compile")(), make("fitness_daily")())
+
+        assert peak == 1
+        waits = [SchedulerTracker.get_all()[j]["last_wait_ms"] for j in ("wiki_compile", "fitness_daily")]
+        assert max(waits) >= 15
+        assert SchedulerTracker.get_all()["wiki_compile"]["job_class"] == "cpu"
+
+
+class TestResumeScheduler:
+    @pytest.mark.asyncio
+    async def test_resume_skips_missed_runs(self, monkeypatch):
+        sched = AsyncIOScheduler()
+        monkeypatch.setattr(scheduler_module, "_scheduler", sched)
+        monkeypatch.setattr(scheduler_module, "_seed_admin_subscription", lambda: None)
+
+        async def noop():
+            return None
+
+        sched.add_job(noop, IntervalTrigger(minutes=5), id="j")
+        sched.start(paused=True)
+        try:
+            stale = datetime.now(sched.timezone) - timedelta(minutes=30)
+            sched.get_job("j").modify(next_run_time=stale)
+
+            scheduler_module.resume_scheduler()
+
+            assert sched.get_job("j").next_run_time > datetime.now(sched.timezone)
+        finally:
+            sched.shutdown(wait=False)
@@ -6,14 +6,21 @@ QueryPatternLearner 單元測試
 - Pattern key 生成
 - 衰減評分計算
 - Few-shot 格式化
+- 模式 embedding 矩陣 / pipeline 明細讀取
 """
 
 import time
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from app.services.ai.agent import pattern_semantic_matcher
 from app.services.ai.agent.agent_pattern_learner import QueryPattern, QueryPatternLearner
-from app.services.ai.agent.pattern_semantic_matcher import _cosine_similarity, _jaccard_match
+from app.services.ai.agent.pattern_semantic_matcher import (
+    PatternEmbeddingIndex,
+    _cosine_similarity,
+    _embedding_cosine_match,
+    _jaccard_match,
+)
 
 
 class TestNormalizeQuestion:
@@ -273,3 +280,68 @@ class TestPatternLearnerNoRedis:
         learner._get_redis = AsyncMock(return_value=None)
         result = await learner.get_top_patterns()
         assert result == []
+
+
+class TestPatternEmbeddingIndex:
+    """行程內正規化 embedding 矩陣"""
+
+    def test_scores_match_cosine_similarity(self):
+        index = PatternEmbeddingIndex()
+        index.add([("a", [1.0, 0.0, 0.0]), ("b", [1.0, 1.0, 0.0]), ("z", [0.0, 0.0, 0.0])])
+        scores = index.scores([2.0, 0.0, 0.0], ["a", "b", "missing"])
+        assert scores["a"] == pytest.approx(1.0)
+        assert scores["b"] == pytest.approx(_cosine_similarity([2.0, 0.0, 0.0], [1.0, 1.0, 0.0]), rel=1e-5)
+        assert "missing" not in scores
+
+    def test_remove_keeps_remaining_rows_aligned(self):
+        index = PatternEmbeddingIndex()
+        index.add([("a", [1.0, 0.0]), ("b", [0.0, 1.0]), ("c", [1.0, 1.0])])
+        index.remove(["a"])
+        assert "a" not in index and len(index) == 2
+        assert index.scores([0.0, 1.0], ["b"])["b"] == pytest.approx(1.0)
+
+    def test_dimension_change_resets_matrix(self):
+        index = PatternEmbeddingIndex()
+        index.add([("a", [1.0, 0.0])])
+        index.add([("b", [1.0, 0.0, 0.0])])
+        assert "a" not in index and "b" in index
+
+
+class TestEmbeddingCosineMatch:
+    """候選 embedding 取自矩陣，只有缺漏者與查詢合併批次 embedding"""
+
+    @pytest.mark.asyncio
+    async def test_second_query_embeds_only_query(self, monkeypatch):
+        monkeypatch.setattr(pattern_semantic_matcher, "_pattern_index", PatternEmbeddingIndex())
+        vectors = {"q1": [1.0, 0.0], "q2": [0.0, 1.0], "t1": [1.0, 0.1], "t2": [0.1, 1.0]}
+        batch = AsyncMock(side_effect=lambda texts, connector: [vectors[t] for t in texts])
+        candidates = [QueryPattern("k1", "t1", [], {}), QueryPattern("k2", "t2", [], {})]
+
+        with patch("app.core.ai_connector.get_ai_connector", return_value=MagicMock()), \
+                patch("app.services.ai.core.embedding_manager.EmbeddingManager.get_embeddings_batch", batch):
+            best1, _ = await _embedding_cosine_match("q1", candidates)
+            best2, score2 = await _embedding_cosine_match("q2", candidates)
+
+        assert best1.pattern_key == "k1"
+        assert best2.pattern_key == "k2" and score2 > 0.99
+        assert batch.await_args_list[1].args[0] == ["q2"]
+
+
+class TestFetchPatternsPipeline:
+    @pytest.mark.asyncio
+    async def test_details_read_in_one_pipeline(self):
+        detail = {
+            "template": "{ORG}的{DOC_TYPE}", "tool_sequence": "[]", "params_template": "{}",
+            "hit_count": "3",
+        }
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[detail, {}])
+        redis = MagicMock()
+        redis.pipeline.return_value = pipe
+        redis.hgetall = AsyncMock()
+
+        patterns = await QueryPatternLearner()._fetch_patterns(redis, [b"k1", "k2"])
+
+        assert [p.pattern_key for p in patterns] == ["k1"]
+        assert pipe.hgetall.call_count == 2
+        redis.hgetall.assert_not_awaited()
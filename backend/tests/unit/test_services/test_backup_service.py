@@ -16,6 +16,9 @@ BackupService 單元測試
 
 v1.0.0 - 2026-02-21
 """
+import gzip
+import os
+import sys
 from datetime import datetime
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch, PropertyMock
@@ -188,6 +191,30 @@ class TestListBackups:
 
         assert result["statistics"]["database_backup_count"] == 0
 
+    @pytest.mark.asyncio
+    async def test_list_backups_compressed_and_directory(self, service):
+        """測試列出壓縮與 directory 格式備份，統計取自 manifest"""
+        zst = service.backup_dir / "ck_missive_backup_20260102_000000.sql.zst"
+        zst.write_bytes(b"x" * 100)
+        (service.backup_dir / "ck_missive_backup_20260102_000000.manifest.json").write_text(
+            '{"format": "plain", "compression": "zstd", "size_bytes": 100, '
+            '"raw_bytes": 800, "compression_ratio": 8.0, "throughput_mb_s": 42.0}'
+        )
+        dump_dir = service.backup_dir / "ck_missive_backup_20260101_000000.dir"
+        dump_dir.mkdir()
+        (dump_dir / "toc.dat").write_bytes(b"t" * 10)
+        (dump_dir / "3001.dat.zst").write_bytes(b"d" * 30)
+        (service.backup_dir / "ck_missive_backup_20260103_000000.sql.zst.partial").write_bytes(b"p")
+
+        result = await service.list_backups()
+
+        backups = result["database_backups"]
+        assert [b["filename"] for b in backups] == [zst.name, dump_dir.name]
+        assert backups[0]["compression_ratio"] == 8.0
+        assert backups[0]["throughput_mb_s"] == 42.0
+        assert backups[1]["format"] == "directory"
+        assert backups[1]["size_bytes"] == 40
+
 
 # ============================================================
 # 備份建立測試
@@ -210,6 +237,25 @@ class TestCreateBackup:
         assert result["success"] is False
         assert len(result["errors"]) > 0
 
+    @pytest.mark.asyncio
+    async def test_missing_backup_file_does_not_disable_pg_dump(self, service):
+        """測試非 pg_dump 本身的 FileNotFoundError 不會把 pg_dump 標記為不可用"""
+        missing = FileNotFoundError(2, "No such file", str(service.backup_dir / "x.partial"))
+        with patch("app.services.backup.db_backup.dump_engine.dump_database", AsyncMock(side_effect=missing)):
+            result = await service._backup_database("20261016_120000")
+
+        assert result["success"] is False
+        assert service._pg_dump_available is True
+
+        with patch(
+            "app.services.backup.db_backup.dump_engine.dump_database",
+            AsyncMock(side_effect=FileNotFoundError(2, "No such file", "pg_dump")),
+        ):
+            result = await service._backup_database("20261016_120000")
+
+        assert result["success"] is False
+        assert service._pg_dump_available is False
+
     @pytest.mark.asyncio
     async def test_create_backup_attachments_no_uploads(self, service):
         """測試附件備份 - 無 uploads 目錄"""
@@ -244,6 +290,21 @@ class TestDeleteBackup:
         assert result["success"] is True
         assert not backup_file.exists()
 
+    @pytest.mark.asyncio
+    async def test_delete_directory_backup_with_manifest(self, service):
+        """測試刪除 directory 格式備份時一併刪除 manifest"""
+        dump_dir = service.backup_dir / "ck_missive_backup_20260101_120000.dir"
+        dump_dir.mkdir()
+        (dump_dir / "toc.dat").write_bytes(b"t")
+        manifest = service.backup_dir / "ck_missive_backup_20260101_120000.manifest.json"
+        manifest.write_text("{}")
+
+        result = await service.delete_backup(dump_dir.name, "database")
+
+        assert result["success"] is True
+        assert not dump_dir.exists()
+        assert not manifest.exists()
+
     @pytest.mark.asyncio
     async def test_delete_backup_not_found(self, service):
         """測試刪除不存在的備份"""
@@ -278,38 +339,69 @@ class TestRestoreDatabase:
         assert result["success"] is False
         assert "not found" in result["error"]
 
+    @pytest.fixture
+    def fake_psql(self, service, tmp_path, monkeypatch):
+        """假 psql：stdin 全數寫入 FAKE_PSQL_OUT，結束碼取 FAKE_PSQL_RC"""
+        if sys.platform == "win32":
+            pytest.skip("需要可執行的 shebang 腳本")
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        psql = bin_dir / "psql"
+        psql.write_text(
+            f"#!{sys.executable}\n"
+            "import os, sys\n"
+            "open(os.environ['FAKE_PSQL_OUT'], 'wb').write(sys.stdin.buffer.read())\n"
+            "rc = int(os.environ.get('FAKE_PSQL_RC', '0'))\n"
+            "if rc:\n"
+            "    sys.stderr.write('psql: error')\n"
+            "sys.exit(rc)\n",
+            encoding="utf-8",
+        )
+        psql.chmod(0o755)
+        # psql 與 pg_dump 同目錄時優先採用
+        service._pg_dump_path = str(bin_dir / "pg_dump")
+        out = tmp_path / "psql_stdin.sql"
+        monkeypatch.setenv("FAKE_PSQL_OUT", str(out))
+        return out
+
     @pytest.mark.asyncio
-    async def test_restore_database_success(self, service):
-        """測試成功還原資料庫"""
+    async def test_restore_database_success(self, service, fake_psql):
+        """測試成功還原資料庫（內容串流送入 psql stdin）"""
         backup_file = service.backup_dir / "ck_missive_backup_restore.sql"
         backup_file.write_text("-- PostgreSQL dump")
 
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0, stderr="")
-
-            result = await service.restore_database(
-                "ck_missive_backup_restore.sql"
-            )
+        result = await service.restore_database(
+            "ck_missive_backup_restore.sql"
+        )
 
         assert result["success"] is True
         assert "restored" in result["message"].lower()
+        assert fake_psql.read_text() == "-- PostgreSQL dump"
+
+    @pytest.mark.asyncio
+    async def test_restore_database_compressed(self, service, fake_psql):
+        """測試 .sql.gz 備份解壓後送入 psql"""
+        backup_file = service.backup_dir / "ck_missive_backup_restore.sql.gz"
+        backup_file.write_bytes(gzip.compress(b"-- PostgreSQL dump\n" * 1000))
+
+        result = await service.restore_database(backup_file.name)
+
+        assert result["success"] is True
+        assert fake_psql.read_bytes() == b"-- PostgreSQL dump\n" * 1000
 
     @pytest.mark.asyncio
-    async def test_restore_database_psql_failure(self, service):
+    async def test_restore_database_psql_failure(self, service, fake_psql, monkeypatch):
         """測試 psql 還原失敗"""
         backup_file = service.backup_dir / "ck_missive_backup_fail.sql"
         backup_file.write_text("-- PostgreSQL dump")
+        monkeypatch.setenv("FAKE_PSQL_RC", "1")
 
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(
-                returncode=1, stderr="psql: error"
-            )
-
-            result = await service.restore_database(
-                "ck_missive_backup_fail.sql"
-            )
+        result = await service.restore_database(
+            "ck_missive_backup_fail.sql"
+        )
 
         assert result["success"] is False
+        assert "psql: error" in result["error"]
 
 
 # ============================================================
@@ -370,6 +462,36 @@ class TestCleanupOrphanFiles:
         assert "ck_missive_backup_orphan.sql" in result["files"]
         assert not orphan.exists()
 
+    @pytest.mark.asyncio
+    async def test_cleanup_orphan_files_removes_partial(self, service):
+        """測試清理中斷備份留下的 .partial 暫存檔與目錄"""
+        partial_file = service.backup_dir / "ck_missive_backup_1.sql.zst.partial"
+        partial_file.write_bytes(b"half")
+        partial_dir = service.backup_dir / "ck_missive_backup_2.dir.partial"
+        partial_dir.mkdir()
+        (partial_dir / "toc.dat").write_bytes(b"t")
+        stale = datetime.now().timestamp() - service._get_dump_options().timeout - 60
+        for p in (partial_file, partial_dir):
+            os.utime(p, (stale, stale))
+
+        with patch.object(service, "_log_backup_operation", new_callable=AsyncMock):
+            result = await service.cleanup_orphan_files()
+
+        assert result["cleaned_count"] == 2
+        assert not partial_file.exists()
+        assert not partial_dir.exists()
+
+    @pytest.mark.asyncio
+    async def test_cleanup_orphan_files_keeps_in_flight_partial(self, service):
+        """測試逾時內的 .partial（備份可能仍在寫入）不會被刪除"""
+        partial_file = service.backup_dir / "ck_missive_backup_1.sql.zst.partial"
+        partial_file.write_bytes(b"half")
+
+        result = await service.cleanup_orphan_files()
+
+        assert result["cleaned_count"] == 0
+        assert partial_file.exists()
+
     @pytest.mark.asyncio
     async def test_cleanup_orphan_files_keeps_valid(self, service):
         """測試清理不會刪除有效備份"""
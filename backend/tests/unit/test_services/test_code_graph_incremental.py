@@ -0,0 +1,163 @@
+"""
+Code Graph 內容雜湊增量 + 關聯差異同步測試
+
+鎖定：
+1. 快取以內容雜湊為鍵：同內容命中、改內容未命中；提取器指紋變動整份失效
+2. retain 只清除本次掃描範圍（kind）內已不存在的檔案
+3. extract_sources 第二次全數快取命中，不再呼叫提取
+4. _sync_relations 只刪多餘 / 重複的列、只插缺少的列，未變更的邊不動
+"""
+import pytest
+
+from app.services.ai.graph.code_graph_extract_cache import (
+    KIND_PY,
+    KIND_TS,
+    ExtractionCache,
+    SourceFile,
+    extract_sources,
+    scan_sources,
+)
+from app.services.ai.graph.code_graph_persistence import CodeGraphPersistenceMixin
+from app.services.ai.graph.code_graph_types import CodeEntity, CodeRelation
+
+
+def _write_project(root):
+    app = root / "app"
+    (app / "services").mkdir(parents=True)
+    (app / "__init__.py").write_text("")
+    (app / "services" / "__init__.py").write_text("")
+    (app / "services" / "alpha.py").write_text(
+        "from app.services import beta\n\n\nclass Alpha:\n    def run(self):\n        return 1\n"
+    )
+    (app / "services" / "beta.py").write_text("def helper():\n    return 2\n")
+    return app
+
+
+def _result(module):
+    return (
+        [CodeEntity(canonical_name=module, entity_type="py_module", description={"lines": 1})],
+        [CodeRelation(module, "py_module", "app.x", "py_module", "imports")],
+    )
+
+
+class TestExtractionCache:
+    def test_hit_only_for_same_content(self, tmp_path):
+        cache = ExtractionCache(path=tmp_path / "cache.json", fingerprint="f1")
+        source = SourceFile(KIND_PY, tmp_path / "a.py", "app.a", "h1")
+        cache.put(source, _result("app.a"))
+
+        assert cache.get(source)[0][0].canonical_name == "app.a"
+        assert cache.get(SourceFile(KIND_PY, tmp_path / "a.py", "app.a", "h2")) is None
+
+    def test_persists_and_fingerprint_invalidates(self, tmp_path):
+        path = tmp_path / "cache.json"
+        source = SourceFile(KIND_PY, tmp_path / "a.py", "app.a", "h1")
+        cache = ExtractionCache(path=path, fingerprint="f1")
+        cache.put(source, _result("app.a"))
+        cache.save()
+
+        reloaded = ExtractionCache(path=path, fingerprint="f1")
+        assert reloaded.get(source)[1][0].relation_type == "imports"
+        assert ExtractionCache(path=path, fingerprint="f2").get(source) is None
+
+    def test_retain_is_scoped_to_scanned_kinds(self, tmp_path):
+        cache = ExtractionCache(path=tmp_path / "cache.json", fingerprint="f1")
+        kept = SourceFile(KIND_PY, tmp_path / "a.py", "app.a", "h")
+        gone = SourceFile(KIND_PY, tmp_path / "b.py", "app.b", "h")
+        ts = SourceFile(KIND_TS, tmp_path / "c.ts", "src/c", "h")
+        for source in (kept, gone, ts):
+            cache.put(source, _result(source.module))
+
+        # 本次只掃 Python（容器無前端源）→ ts 條目保留
+        assert cache.retain({kept.module_key}, {KIND_PY}) == 1
+        assert cache.get(gone) is None
+        assert cache.get(kept) is not None and cache.get(ts) is not None
+
+
+class TestExtractSources:
+    @pytest.mark.asyncio
+    async def test_second_run_is_all_cache_hits(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CODE_GRAPH_POOL_MIN_FILES", "1000")
+        app = _write_project(tmp_path)
+        sources, errors = scan_sources(app)
+        assert errors == 0
+        assert {s.module for s in sources} >= {"app.services.alpha", "app.services.beta"}
+
+        cache = ExtractionCache(path=tmp_path / "cache.json", fingerprint="f1")
+        results, counters = await extract_sources(sources, cache)
+        assert counters["extracted"] == len(sources) and counters["cache_hits"] == 0
+        alpha = results["py_module:app.services.alpha"]
+        assert any(e.canonical_name.endswith("Alpha") for e in alpha[0])
+
+        results_again, counters = await extract_sources(sources, cache)
+        assert counters == {"cache_hits": len(sources), "extracted": 0, "errors": 0}
+        assert len(results_again[alpha[0][0].entity_type + ":app.services.alpha"][1]) == len(alpha[1])
+
+    @pytest.mark.asyncio
+    async def test_edit_invalidates_only_that_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CODE_GRAPH_POOL_MIN_FILES", "1000")
+        app = _write_project(tmp_path)
+        cache = ExtractionCache(path=tmp_path / "cache.json", fingerprint="f1")
+        await extract_sources(scan_sources(app)[0], cache)
+
+        (app / "services" / "beta.py").write_text("def helper():\n    return 3\n")
+        sources, _ = scan_sources(app)
+        _, counters = await extract_sources(sources, cache)
+        assert counters["extracted"] == 1
+        assert counters["cache_hits"] == len(sources) - 1
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _FakeDB:
+    def __init__(self, existing):
+        self.existing = existing
+        self.deleted = []
+        self.inserted = []
+
+    async def execute(self, stmt, params=None):
+        if params is not None:
+            self.inserted.extend(params)
+            return None
+        if stmt.is_select:
+            return _Rows(self.existing)
+        self.deleted.extend(stmt.whereclause.right.value)
+        return None
+
+    async def flush(self):
+        pass
+
+
+class _Service(CodeGraphPersistenceMixin):
+    def __init__(self, db):
+        self.db = db
+
+
+class TestSyncRelations:
+    @pytest.mark.asyncio
+    async def test_diff_keeps_unchanged_edges(self):
+        from app.extended.models.knowledge_graph import EntityRelationship
+
+        entity_map = {"py_module:a": 1, "py_module:b": 2, "py_module:c": 3}
+        relations = [
+            CodeRelation("a", "py_module", "b", "py_module", "imports"),   # 既有 → 不動
+            CodeRelation("a", "py_module", "c", "py_module", "imports"),   # 新增
+            CodeRelation("a", "py_module", "zz", "py_module", "imports"),  # 端點不存在 → 略過
+        ]
+        existing = [
+            (10, 1, 2, "imports"),
+            (11, 1, 2, "imports"),   # 重複列 → 刪
+            (12, 2, 3, "imports"),   # 已不再產出 → 刪
+        ]
+        db = _FakeDB(existing)
+        synced = await _Service(db)._sync_relations(relations, entity_map, EntityRelationship)
+
+        assert synced == {"total": 2, "added": 1, "removed": 2}
+        assert sorted(db.deleted) == [11, 12]
+        assert [(v["source_entity_id"], v["target_entity_id"]) for v in db.inserted] == [(1, 3)]
@@ -120,3 +120,93 @@ class TestSplitIntoChunks:
         all_text = [c["text"] for c in chunks]
         # No exact duplicates
         assert len(all_text) == len(set(all_text))
+
+
+class TestPipelineHelpers:
+    def test_chunk_rows_matches_build_document_text(self):
+        from app.services.ai.document.document_chunker import _chunk_rows
+
+        rows = [(1, "道路修繕", "說明內容" * 200, None), (2, None, None, None)]
+        out = _chunk_rows(rows)
+        assert [doc_id for doc_id, _ in out] == [1, 2]
+        assert out[0][1] == split_into_chunks("主旨：道路修繕\n\n" + "說明內容" * 200)
+        assert out[1][1] == []  # 空白公文不產生 chunk，但仍回報以推進 cursor
+
+    def test_build_chunk_records_aligns_embeddings(self):
+        from app.services.ai.document.document_chunker import _build_chunk_records
+
+        chunked = [
+            (1, [{"text": "甲" * 60, "start_char": 0, "end_char": 60}]),
+            (2, []),
+            (3, [
+                {"text": "乙" * 60, "start_char": 0, "end_char": 60},
+                {"text": "丙" * 60, "start_char": 40, "end_char": 100},
+            ]),
+        ]
+        records = _build_chunk_records(chunked, [[0.1], None, [0.3]], with_embedding_column=True)
+        assert [(r["document_id"], r["chunk_index"]) for r in records] == [(1, 0), (3, 0), (3, 1)]
+        assert [r["embedding"] for r in records] == [[0.1], None, [0.3]]
+        assert records[0]["token_count"] == 30
+
+        plain = _build_chunk_records(chunked, [], with_embedding_column=False)
+        assert all("embedding" not in r for r in plain)
+
+    @pytest.mark.asyncio
+    async def test_embed_texts_groups_requests(self):
+        from app.services.ai.document.document_chunker import _embed_texts
+
+        calls = []
+
+        class FakeManager:
+            @staticmethod
+            async def get_embeddings_batch(texts, connector):
+                calls.append(len(texts))
+                return [[float(len(t))] for t in texts]
+
+        out = await _embed_texts(["a", "bb", "ccc", "dddd", "eeeee"], FakeManager, object(), group_size=2)
+        assert calls == [2, 2, 1]
+        assert out == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert await _embed_texts(["a"], None, None, group_size=2) == [None]
+
+    @pytest.mark.asyncio
+    async def test_batch_sweeps_newest_first_and_resumes_across_calls(self, monkeypatch):
+        """未指定 ids：新公文優先，游標跨呼叫保存（空白公文不會每次佔滿 limit），掃到底後回到最新"""
+        from unittest.mock import AsyncMock
+
+        from app.services.ai.document import document_chunker
+
+        monkeypatch.setattr(document_chunker, "_batch_sweep_cursor", None)
+        pipeline = AsyncMock(side_effect=[
+            {"processed": 2, "total_chunks": 0, "last_id": 90, "docs_per_sec": 1.0},
+            {"processed": 1, "total_chunks": 3, "last_id": 40, "docs_per_sec": 1.0},
+            {"processed": 2, "total_chunks": 4, "last_id": 120, "docs_per_sec": 1.0},
+        ])
+        monkeypatch.setattr(document_chunker, "chunk_documents_pipeline", pipeline)
+
+        for _ in range(3):
+            await document_chunker.chunk_documents_batch(object(), limit=2)
+
+        kwargs = [c.kwargs for c in pipeline.await_args_list]
+        assert all(k["newest_first"] for k in kwargs)
+        assert [k["before_id"] for k in kwargs] == [None, 90, None]
+        assert document_chunker._batch_sweep_cursor == 120
+
+    @pytest.mark.asyncio
+    async def test_rechunk_resets_rag_chunk_presence_cache(self):
+        """重建分段後，RAG 的「有無 chunks」快取不再沿用回填前的結果"""
+        from unittest.mock import AsyncMock, MagicMock
+
+        from app.services.ai.document import document_chunker
+        from app.services.ai.search import rag_retrieval
+
+        rag_retrieval._chunks_presence.update(value=False, checked_at=1e18)
+        rows = MagicMock()
+        rows.all.return_value = [(7, "主旨：道路養護工程", "說明：" + "本案" * 80, None)]
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=rows)
+        db.commit = AsyncMock()
+
+        result = await document_chunker.chunk_documents_batch(db, document_ids=[7])
+
+        assert result["total_chunks"] > 0
+        assert rag_retrieval._chunks_presence["value"] is None
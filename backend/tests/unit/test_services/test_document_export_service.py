@@ -6,9 +6,10 @@
 - _get_valid_doc_type: 公文類型驗證
 - export_to_csv: CSV 匯出
 - _query_documents: 查詢邏輯
-- export_to_excel: Excel 匯出（基本流程）
+- export_to_excel: 交由匯出行程池產生暫存檔
+- stream_excel: 分批寫出公文清單 + 統計摘要
 
-共 7 test cases
+共 14 test cases
 """
 
 import pytest
@@ -139,3 +140,107 @@ class TestExportToCsv:
 
         csv_text = csv_bytes.decode("utf-8")
         assert "桃園養護工程" in csv_text
+
+
+# ============================================================================
+# export_to_excel / stream_excel
+# ============================================================================
+
+def _excel_doc(doc_id, category="收文", attachments=(), contract_project_id=None):
+    doc = MagicMock()
+    doc.id = doc_id
+    doc.auto_serial = f"R{doc_id:04d}"
+    doc.category = category
+    doc.delivery_method = "電子交換"
+    doc.doc_type = "函"
+    doc.doc_number = f"桃工字第{doc_id:03d}號"
+    doc.subject = "道路改善工程"
+    doc.content = ""
+    doc.notes = ""
+    doc.ck_note = ""
+    doc.status = "處理中"
+    doc.doc_date = date(2026, 1, 15)
+    doc.receive_date = None
+    doc.send_date = None
+    doc.sender = "桃園市政府"
+    doc.receiver = "乾坤測繪"
+    doc.sender_agency = None
+    doc.receiver_agency = None
+    doc.contract_project = None
+    doc.contract_project_id = contract_project_id
+    doc.attachments = list(attachments)
+    doc.created_at = None
+    doc.updated_at = None
+    return doc
+
+
+class _FakeStream:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def partitions(self, size):
+        for i in range(0, len(self._docs), size):
+            yield self._docs[i:i + size]
+
+
+class _RecordingWriter:
+    def __init__(self):
+        self.sheets = []
+        self.rows = {}
+
+    def add_sheet(self, name):
+        self.sheets.append(name)
+
+    def write(self, sheet, row):
+        self.rows.setdefault(sheet, []).append(row)
+
+
+class TestExportToExcel:
+    """Excel 匯出測試"""
+
+    @pytest.mark.asyncio
+    async def test_submits_documents_job_and_returns_spool_path(self, service):
+        with patch("app.services.taoyuan.export_engine.submit_job",
+                   new_callable=AsyncMock, return_value={"rows": 3, "bytes": 1024}) as submit, \
+                patch("app.services.taoyuan.export_engine.spool_path",
+                      side_effect=lambda task_id: f"/spool/{task_id}.xlsx"):
+            path = await service.export_to_excel(category="收文", keyword="道路")
+
+        kind, task_id, params = submit.await_args.args
+        assert kind == "documents"
+        assert params["category"] == "收文" and params["keyword"] == "道路"
+        assert path == f"/spool/{task_id}.xlsx"
+
+    @pytest.mark.asyncio
+    async def test_stream_excel_writes_rows_in_batches_and_summary(self, service, mock_db):
+        docs = [
+            _excel_doc(1),
+            _excel_doc(2, category="發文", attachments=[object()]),
+            _excel_doc(3, contract_project_id=9),
+        ]
+        mock_db.stream_scalars = AsyncMock(return_value=_FakeStream(docs))
+        mock_db.expunge_all = MagicMock()
+        writer = _RecordingWriter()
+
+        count = await service.stream_excel(writer, batch_size=2, year=2026)
+
+        assert count == 3
+        assert writer.sheets == ["公文清單", "統計摘要"]
+        rows = writer.rows["公文清單"]
+        assert [r["公文ID"] for r in rows] == [1, 2, 3]
+        assert rows[1]["附件紀錄"] == "1 個附件"
+        assert mock_db.expunge_all.call_count == 2  # 每批一次
+        summary = {r["項目"]: r["數值"] for r in writer.rows["統計摘要"]}
+        assert summary["公文總數"] == "3"
+        assert summary["收文數量"] == "2"
+        assert summary["發文數量"] == "1"
+        assert summary["有附件公文"] == "1"
+        assert summary["已指派案件"] == "1"
+
+    @pytest.mark.asyncio
+    async def test_stream_excel_raises_when_empty(self, service, mock_db):
+        mock_db.stream_scalars = AsyncMock(return_value=_FakeStream([]))
+        mock_db.expunge_all = MagicMock()
+
+        with pytest.raises(ValueError):
+            await service.stream_excel(_RecordingWriter())
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+dump_engine 單元測試（app.services.backup.dump_engine）
+
+以 tmp_path 內的假 pg_dump / pg_restore 腳本驗證：
+- plain 格式串流壓縮（zstd / gzip / none）、副檔名、manifest、還原串流往返
+- 結尾標記缺失 / pg_dump 失敗 / 逾時 → DumpError，且不留下 .partial
+- directory 格式 argv（-Fd -j N --compress）與 toc.dat 驗證
+- 環境變數設定與備份檔名辨識
+
+v1.0.0 - 2026-10-16
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+from app.services.backup import dump_engine
+from app.services.backup.dump_engine import DumpError, DumpOptions
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="需要可執行的 shebang 腳本")
+
+FAKE_PG_DUMP = """\
+import os, sys, time
+mode = os.environ.get("FAKE_PG_DUMP_MODE", "ok")
+with open(os.environ["FAKE_PG_DUMP_ARGV"], "w") as f:
+    f.write("\\n".join(sys.argv[1:]))
+if mode == "fail":
+    sys.stderr.write("pg_dump: error: connection refused")
+    sys.exit(1)
+if mode == "hang":
+    sys.stdout.write("-- partial\\n")
+    sys.stdout.flush()
+    time.sleep(30)
+if "-Fd" in sys.argv:
+    out = sys.argv[sys.argv.index("-f") + 1]
+    os.makedirs(out)
+    open(os.path.join(out, "toc.dat"), "wb").write(b"toc" * 100)
+    open(os.path.join(out, "3001.dat"), "wb").write(b"row" * 100)
+    sys.exit(0)
+row = "INSERT INTO documents VALUES (1, 'doc');\\n"
+for _ in range(int(os.environ.get("FAKE_PG_DUMP_ROWS", "50000"))):
+    sys.stdout.write(row)
+if mode != "nomarker":
+    sys.stdout.write("--\\n-- PostgreSQL database dump complete\\n--\\n")
+"""
+
+
+@pytest.fixture
+def pg_dump(tmp_path, monkeypatch):
+    """假 pg_dump，回傳 (argv 前綴, 記錄 argv 的檔案)"""
+    script = tmp_path / "bin" / "pg_dump"
+    script.parent.mkdir()
+    script.write_text(f"#!{sys.executable}\n{FAKE_PG_DUMP}", encoding="utf-8")
+    script.chmod(0o755)
+    argv_file = tmp_path / "argv.txt"
+    monkeypatch.setenv("FAKE_PG_DUMP_ARGV", str(argv_file))
+    return [str(script), "-h", "postgres", "-d", "test_db"], argv_file
+
+
+@pytest.fixture
+def backup_dir(tmp_path):
+    d = tmp_path / "database"
+    d.mkdir()
+    return d
+
+
+async def _dump(pg_dump, backup_dir, **options):
+    return await dump_engine.dump_database(
+        pg_dump[0], dict(os.environ), backup_dir, "20261016_120000", DumpOptions(**options),
+    )
+
+
+class TestPlainDump:
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("compression,suffix", [
+        ("zstd", ".sql.zst"), ("gzip", ".sql.gz"), ("none", ".sql"),
+    ])
+    async def test_streams_compressed_dump_with_manifest(
+        self, pg_dump, backup_dir, compression, suffix,
+    ):
+        result = await _dump(pg_dump, backup_dir, compression=compression)
+
+        path = backup_dir / f"ck_missive_backup_20261016_120000{suffix}"
+        assert result["success"] is True
+        assert result["filename"] == path.name
+        assert result["size_bytes"] == path.stat().st_size
+        with dump_engine.open_backup_reader(path) as reader:
+            data = reader.read()
+        assert len(data) == result["raw_bytes"]
+        assert data.endswith(b"-- PostgreSQL database dump complete\n--\n")
+        if compression != "none":
+            assert result["size_bytes"] < result["raw_bytes"]
+
+        manifest = json.loads((backup_dir / result["manifest"]).read_text(encoding="utf-8"))
+        assert manifest["compression"] == compression
+        assert manifest["raw_bytes"] == result["raw_bytes"]
+        assert manifest["throughput_mb_s"] > 0
+        assert [p.name for p in dump_engine.iter_db_backups(backup_dir)] == [path.name]
+
+    @pytest.mark.asyncio
+    async def test_missing_marker_fails_without_leftovers(self, pg_dump, backup_dir, monkeypatch):
+        monkeypatch.setenv("FAKE_PG_DUMP_MODE", "nomarker")
+
+        with pytest.raises(DumpError, match="結尾標記"):
+            await _dump(pg_dump, backup_dir)
+
+        assert list(backup_dir.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_pg_dump_failure_reports_stderr(self, pg_dump, backup_dir, monkeypatch):
+        monkeypatch.setenv("FAKE_PG_DUMP_MODE", "fail")
+
+        with pytest.raises(DumpError, match="connection refused"):
+            await _dump(pg_dump, backup_dir)
+
+        assert list(backup_dir.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_pg_dump(self, pg_dump, backup_dir, monkeypatch):
+        monkeypatch.setenv("FAKE_PG_DUMP_MODE", "hang")
+
+        with pytest.raises(DumpError, match=r"Backup timeout \(1s\)"):
+            await _dump(pg_dump, backup_dir, timeout=1.0)
+
+        assert list(backup_dir.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_partial_removed_before_rename_is_dump_error(self, pg_dump, backup_dir, monkeypatch):
+        close = dump_engine._CompressedWriter.close
+
+        def close_then_cleanup(writer):
+            close(writer)
+            os.unlink(writer._raw.name)  # 模擬 cleanup_orphan_files 搶先刪除暫存
+
+        monkeypatch.setattr(dump_engine._CompressedWriter, "close", close_then_cleanup)
+
+        with pytest.raises(DumpError, match="暫存檔在完成前被移除"):
+            await _dump(pg_dump, backup_dir)
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self, pg_dump, backup_dir, monkeypatch):
+        monkeypatch.setenv("FAKE_PG_DUMP_ROWS", "400000")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            await _dump(pg_dump, backup_dir, compression="gzip")
+        finally:
+            task.cancel()
+
+        assert ticks > 0
+
+
+class TestDirectoryDump:
+
+    @pytest.mark.asyncio
+    async def test_parallel_directory_dump(self, pg_dump, backup_dir):
+        result = await _dump(pg_dump, backup_dir, format="directory", jobs=3, level=5)
+
+        argv = pg_dump[1].read_text().split("\n")
+        assert argv[argv.index("-j") + 1] == "3"
+        assert "-Fd" in argv and "--compress=zstd:5" in argv
+        assert argv[argv.index("-f") + 1].endswith(".dir.partial")
+
+        path = backup_dir / "ck_missive_backup_20261016_120000.dir"
+        assert result["filename"] == path.name
+        assert (path / "toc.dat").exists()
+        assert result["size_bytes"] == 600
+        assert result["jobs"] == 3
+        assert dump_engine.read_manifest(path)["format"] == "directory"
+
+    @pytest.mark.asyncio
+    async def test_restore_directory_uses_pg_restore_jobs(self, pg_dump, backup_dir):
+        await _dump(pg_dump, backup_dir, format="directory")
+        path = backup_dir / "ck_missive_backup_20261016_120000.dir"
+
+        # 借用假 pg_dump 腳本記錄 argv（成功結束）
+        stats = await dump_engine.restore_database(
+            path, ["unused-psql"], [pg_dump[0][0], "--no-owner"], dict(os.environ),
+            DumpOptions(jobs=4),
+        )
+
+        argv = pg_dump[1].read_text().split("\n")
+        assert argv == ["--no-owner", "-j", "4", str(path)]
+        assert stats["size_bytes"] == 600
+
+
+class TestNamingAndOptions:
+
+    def test_split_backup_name(self):
+        assert dump_engine.split_backup_name("ck_missive_backup_1.sql.zst") == (
+            "ck_missive_backup_1", ".sql.zst",
+        )
+        assert dump_engine.split_backup_name("ck_missive_backup_1.dir")[1] == ".dir"
+        assert dump_engine.split_backup_name("ck_missive_backup_1.sql.zst.partial") is None
+        assert dump_engine.split_backup_name("ck_missive_backup_1.manifest.json") is None
+        assert dump_engine.split_backup_name("other.sql") is None
+
+    def test_load_dump_options_env(self, monkeypatch):
+        monkeypatch.setenv("BACKUP_DB_FORMAT", "Directory")
+        monkeypatch.setenv("BACKUP_DB_COMPRESSION", "gzip")
+        monkeypatch.setenv("BACKUP_DB_JOBS", "4")
+        monkeypatch.setenv("BACKUP_DB_TIMEOUT", "abc")
+
+        options = dump_engine.load_dump_options()
+
+        assert options.format == "directory"
+        assert options.compression == "gzip"
+        assert options.compression_level == 6
+        assert options.jobs == 4
+        assert options.timeout == 300.0
+
+    def test_invalid_compression_falls_back_to_default(self, monkeypatch):
+        monkeypatch.setenv("BACKUP_DB_COMPRESSION", "lz4")
+
+        assert dump_engine.load_dump_options().compression == "zstd"
@@ -0,0 +1,150 @@
+"""
+Embedding 微批次分派器測試
+
+鎖定：
+1. 窗口內的併發請求合併為一次 generate_embeddings_batch，向量依序分送
+2. 達筆數上限立即送出，不等窗口
+3. 單筆批次走 generate_embedding
+4. 批次呼叫例外改逐筆送出，只有自己那筆失敗的等待者收到例外；EmbeddingManager 轉為 None
+5. 逐筆重試的同時請求數受 fallback_concurrency 限制
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.ai.core.embedding_batcher import EmbeddingBatcher
+from app.services.ai.core.embedding_manager import EmbeddingManager
+
+
+def _connector():
+    connector = MagicMock()
+    connector.generate_embedding = AsyncMock(side_effect=lambda text: [float(len(text))])
+
+    async def generate_embeddings_batch(texts):
+        return [[float(len(t))] for t in texts]
+
+    connector.generate_embeddings_batch = AsyncMock(side_effect=generate_embeddings_batch)
+    return connector
+
+
+class TestEmbeddingBatcher:
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_batch(self):
+        connector = _connector()
+        batcher = EmbeddingBatcher(asyncio.Semaphore(5), window_ms=20, max_size=32, max_chars=10_000)
+
+        results = await asyncio.gather(*(batcher.embed("x" * n, connector) for n in range(1, 6)))
+
+        assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        connector.generate_embeddings_batch.assert_awaited_once()
+        connector.generate_embedding.assert_not_awaited()
+        assert batcher.stats()["max_batch_size"] == 5
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_before_window(self):
+        connector = _connector()
+        batcher = EmbeddingBatcher(asyncio.Semaphore(5), window_ms=60_000, max_size=2, max_chars=10_000)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a", connector), batcher.embed("bb", connector)), timeout=1
+        )
+
+        assert results == [[1.0], [2.0]]
+
+    @pytest.mark.asyncio
+    async def test_single_request_uses_single_endpoint(self):
+        connector = _connector()
+        batcher = EmbeddingBatcher(asyncio.Semaphore(5), window_ms=1, max_size=32, max_chars=10_000)
+
+        assert await batcher.embed("abc", connector) == [3.0]
+        connector.generate_embedding.assert_awaited_once_with("abc")
+        connector.generate_embeddings_batch.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_batch_error_falls_back_per_text(self):
+        connector = _connector()
+        connector.generate_embeddings_batch = AsyncMock(side_effect=RuntimeError("ollama down"))
+
+        async def generate_embedding(text):
+            if text == "bad":
+                raise RuntimeError("bad input")
+            return [float(len(text))]
+
+        connector.generate_embedding = AsyncMock(side_effect=generate_embedding)
+        batcher = EmbeddingBatcher(asyncio.Semaphore(5), window_ms=20, max_size=32, max_chars=10_000)
+
+        results = await asyncio.gather(
+            batcher.embed("a", connector), batcher.embed("bad", connector), return_exceptions=True
+        )
+
+        assert results[0] == [1.0]
+        assert isinstance(results[1], RuntimeError)
+        assert connector.generate_embedding.await_count == 2
+
+
+    @pytest.mark.asyncio
+    async def test_per_text_fallback_is_bounded(self):
+        connector = _connector()
+        connector.generate_embeddings_batch = AsyncMock(side_effect=RuntimeError("ollama down"))
+        in_flight = peak = 0
+
+        async def generate_embedding(text):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.005)
+            in_flight -= 1
+            return [float(len(text))]
+
+        connector.generate_embedding = AsyncMock(side_effect=generate_embedding)
+        batcher = EmbeddingBatcher(asyncio.Semaphore(5), window_ms=20, max_size=64, max_chars=100_000)
+        batcher.fallback_concurrency = 3
+
+        results = await asyncio.gather(*(batcher.embed("x" * n, connector) for n in range(1, 41)))
+
+        assert results == [[float(n)] for n in range(1, 41)]
+        assert connector.generate_embedding.await_count == 40
+        assert peak == 3
+
+
+class TestEmbeddingManagerBatching:
+    @pytest.fixture(autouse=True)
+    def _reset(self):
+        EmbeddingManager._cache.clear()
+        EmbeddingManager._hits = EmbeddingManager._disk_hits = EmbeddingManager._misses = 0
+        EmbeddingManager._write_lock = None
+        EmbeddingManager._embed_semaphore = None
+        EmbeddingManager._batcher = None
+        EmbeddingManager._disk = None
+        EmbeddingManager._disk_checked = True
+        yield
+        EmbeddingManager._cache.clear()
+        EmbeddingManager._write_lock = None
+        EmbeddingManager._embed_semaphore = None
+        EmbeddingManager._batcher = None
+
+    @pytest.mark.asyncio
+    async def test_batch_misses_go_out_as_one_request(self):
+        connector = _connector()
+        config = MagicMock(embedding_cache_max_size=100, embedding_cache_ttl=60)
+        with patch("app.services.ai.core.embedding_manager.get_ai_config", return_value=config):
+            texts = ["甲", "乙乙", "丙丙丙"]
+            results = await EmbeddingManager.get_embeddings_batch(texts, connector)
+            single = await EmbeddingManager.get_embedding("丁丁丁丁", connector)
+
+        assert results == [[1.0], [2.0], [3.0]]
+        assert single == [4.0]
+        connector.generate_embeddings_batch.assert_awaited_once()
+        assert EmbeddingManager.get_stats()["batcher"]["texts"] == 4
+
+    @pytest.mark.asyncio
+    async def test_batch_failure_returns_none(self):
+        connector = _connector()
+        connector.generate_embeddings_batch = AsyncMock(side_effect=RuntimeError("ollama down"))
+        connector.generate_embedding = AsyncMock(side_effect=RuntimeError("ollama down"))
+        config = MagicMock(embedding_cache_max_size=100, embedding_cache_ttl=60)
+        with patch("app.services.ai.core.embedding_manager.get_ai_config", return_value=config):
+            results = await EmbeddingManager.get_embeddings_batch(["a", "b"], connector)
+
+        assert results == [None, None]
@@ -0,0 +1,113 @@
+"""
+Embedding L2 持久化快取測試
+
+測試範圍：
+- SQLite 讀寫往返（float32）、模型隔離
+- 新 instance（模擬重啟 / 另一個 worker）讀得到先前寫入的向量
+- 容量上限 + LRU 淘汰
+- EmbeddingManager：L1 未命中 → L2 命中不呼叫 Ollama，分層統計
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.ai.core.embedding_disk_cache import EmbeddingDiskCache
+from app.services.ai.core.embedding_manager import EmbeddingManager
+
+
+@pytest.fixture
+def disk(tmp_path):
+    return EmbeddingDiskCache(tmp_path / "emb.sqlite3", max_bytes=1024 * 1024)
+
+
+@pytest.fixture
+def manager_with_disk(disk):
+    config = MagicMock()
+    config.embedding_cache_max_size = 100
+    config.embedding_cache_ttl = 3600
+
+    def reset():
+        EmbeddingManager._instance = None
+        EmbeddingManager._cache.clear()
+        EmbeddingManager._max_cache_size = 0
+        EmbeddingManager._cache_ttl = 0.0
+        EmbeddingManager._write_lock = None
+        EmbeddingManager._embed_semaphore = None
+        EmbeddingManager._hits = 0
+        EmbeddingManager._disk_hits = 0
+        EmbeddingManager._misses = 0
+
+    reset()
+    EmbeddingManager._disk = disk
+    EmbeddingManager._disk_checked = True
+    with patch("app.services.ai.core.embedding_manager.get_ai_config", return_value=config):
+        yield EmbeddingManager
+    reset()
+    EmbeddingManager._disk = None
+    EmbeddingManager._disk_checked = False
+
+
+class TestEmbeddingDiskCache:
+    def test_roundtrip_and_model_isolation(self, disk):
+        disk.put_many("nomic-embed-text", [("k1", [0.5, -1.25, 3.0])])
+
+        assert disk.get_many("nomic-embed-text", ["k1", "k2"]) == {"k1": [0.5, -1.25, 3.0]}
+        assert disk.get_many("other-model", ["k1"]) == {}
+        assert (disk.hits, disk.misses) == (1, 2)
+
+    def test_survives_new_instance(self, tmp_path):
+        path = tmp_path / "emb.sqlite3"
+        EmbeddingDiskCache(path, max_bytes=1 << 20).put_many("m", [("k", [0.25] * 768)])
+
+        restarted = EmbeddingDiskCache(path, max_bytes=1 << 20)
+        assert restarted.get_many("m", ["k"])["k"] == [0.25] * 768
+
+    def test_eviction_keeps_size_bounded_and_drops_oldest(self, tmp_path, monkeypatch):
+        vec_bytes = 768 * 4
+        disk = EmbeddingDiskCache(tmp_path / "emb.sqlite3", max_bytes=vec_bytes * 10)
+        clock = iter(range(1000, 2000))
+        monkeypatch.setattr("app.services.ai.core.embedding_disk_cache.time.time", lambda: next(clock))
+
+        for i in range(25):
+            disk.put_many("m", [(f"k{i}", [float(i)] * 768)])
+
+        stats = disk.stats()
+        assert stats["bytes"] <= vec_bytes * 10
+        assert stats["evictions"] > 0
+        assert disk.get_many("m", ["k0"]) == {}
+        assert "k24" in disk.get_many("m", ["k24"])
+
+
+class TestEmbeddingManagerSecondTier:
+    @pytest.mark.asyncio
+    async def test_disk_hit_skips_ollama(self, manager_with_disk, disk):
+        key = EmbeddingManager._cache_key("桃園市政府工務局")
+        disk.put_many(EmbeddingManager._model_name(), [(key, [0.5] * 768)])
+        connector = MagicMock()
+        connector.generate_embedding = AsyncMock(return_value=[0.1] * 768)
+
+        result = await EmbeddingManager.get_embedding("桃園市政府工務局", connector)
+
+        assert result == [0.5] * 768
+        connector.generate_embedding.assert_not_called()
+        # 回填 L1：第二次直接命中記憶體
+        await EmbeddingManager.get_embedding("桃園市政府工務局", connector)
+        stats = EmbeddingManager.get_stats()
+        assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+
+    @pytest.mark.asyncio
+    async def test_batch_writes_through_to_disk(self, manager_with_disk, disk):
+        connector = MagicMock()
+        connector.generate_embedding = AsyncMock(return_value=[0.25] * 768)
+
+        await EmbeddingManager.get_embeddings_batch(["甲", "乙"], connector)
+
+        keys = [EmbeddingManager._cache_key(t) for t in ("甲", "乙")]
+        assert set(disk.get_many(EmbeddingManager._model_name(), keys)) == set(keys)
+
+        # 模擬重啟：L1 清空後批次查詢全部由 L2 供應
+        EmbeddingManager._cache.clear()
+        results = await EmbeddingManager.get_embeddings_batch(["甲", "乙"], connector)
+        assert results == [[0.25] * 768] * 2
+        assert connector.generate_embedding.call_count == 2
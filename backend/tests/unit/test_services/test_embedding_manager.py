@@ -7,6 +7,7 @@ EmbeddingManager 單元測試
 - 過期清除
 - 批次快取 (get_embeddings_batch)
 - 統計
+- single-flight 併發合併
 
 共 12 test cases
 """
@@ -375,3 +376,33 @@ class TestKGEmbeddingConnectorWiring:
         for p in self.KG_EMBED_FILES:
             src = self._read(p)
             assert "get_ai_connector()" in src, f"{p} 未傳入真實 connector（get_ai_connector 缺失）"
+
+
+class TestSingleFlight:
+    """兩層快取皆未命中時，相同文字的併發請求只呼叫一次 Ollama"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_coalesce(self, mock_config):
+        from app.services.ai.core.embedding_manager import _embed_flight
+
+        _embed_flight.reset_stats()
+        connector = MagicMock()
+
+        async def slow_embed(text):
+            await asyncio.sleep(0.02)
+            return [0.3] * 768
+
+        connector.generate_embedding = AsyncMock(side_effect=slow_embed)
+        with patch("app.services.ai.core.embedding_manager.get_ai_config", return_value=mock_config):
+            results = await asyncio.gather(
+                *(EmbeddingManager.get_embedding("桃園市政府工務局", connector) for _ in range(10)),
+                EmbeddingManager.get_embeddings_batch(["桃園市政府工務局", "乙"], connector),
+            )
+
+        assert results[:10] == [[0.3] * 768] * 10
+        assert results[10] == [[0.3] * 768] * 2
+        assert connector.generate_embedding.call_count == 2  # 工務局 + 乙
+        stats = EmbeddingManager.get_stats()
+        assert stats["misses"] == 2
+        assert stats["coalesced"] == 10
+        assert stats["inflight"] == 0
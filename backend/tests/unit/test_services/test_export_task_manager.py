@@ -1,20 +1,21 @@
 """
 ExportTaskManager 單元測試
 
-測試非同步匯出任務管理：進度追蹤、結果暫存、任務生命週期。
+測試非同步匯出任務管理：進度追蹤、磁碟暫存結果、任務生命週期。
 
-@version 1.1.0 - 配合 v1.1.0 重構更新
-@date 2026-02-25
+@version 2.0.0 - 結果改存共用暫存目錄（export_engine）
+@date 2026-10-16
 """
 
+import os
+import time
+
 import pytest
-from io import BytesIO
 from unittest.mock import AsyncMock, patch, MagicMock
 
+from app.services.taoyuan import export_engine
 from app.services.taoyuan.export_task_manager import (
     ExportTaskManager,
-    _result_store,
-    _result_timestamps,
     _validate_task_id,
     _evict_expired_results,
     STATUS_PENDING,
@@ -22,7 +23,6 @@ from app.services.taoyuan.export_task_manager import (
     STATUS_FAILED,
     EXPORT_TASK_PREFIX,
     TASK_TTL,
-    _MAX_STORE_SIZE,
 )
 
 
@@ -31,13 +31,19 @@ from app.services.taoyuan.export_task_manager import (
 # ---------------------------------------------------------------------------
 
 @pytest.fixture(autouse=True)
-def clear_result_store():
-    """每次測試後清理記憶體暫存"""
-    _result_store.clear()
-    _result_timestamps.clear()
-    yield
-    _result_store.clear()
-    _result_timestamps.clear()
+def spool_dir(tmp_path, monkeypatch):
+    """每個測試使用獨立暫存目錄"""
+    monkeypatch.setenv("EXPORT_SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _spool(task_id: str, data: bytes, age: float = 0.0):
+    path = export_engine.spool_path(task_id)
+    path.write_bytes(data)
+    if age:
+        past = time.time() - age
+        os.utime(path, (past, past))
+    return path
 
 
 def make_mock_redis():
@@ -83,30 +89,14 @@ class TestValidateTaskId:
 # ---------------------------------------------------------------------------
 
 class TestEvictExpiredResults:
-    def test_evicts_expired_entries(self):
-        import time
-        _result_store["old"] = b"data"
-        _result_timestamps["old"] = time.time() - TASK_TTL - 10
-        _result_store["new"] = b"data2"
-        _result_timestamps["new"] = time.time()
-
-        _evict_expired_results()
-
-        assert "old" not in _result_store
-        assert "old" not in _result_timestamps
-        assert "new" in _result_store
-
-    def test_evicts_oldest_when_over_limit(self):
-        import time
-        # 填滿超過 _MAX_STORE_SIZE
-        for i in range(_MAX_STORE_SIZE + 5):
-            tid = f"{i:012x}"
-            _result_store[tid] = b"x"
-            _result_timestamps[tid] = time.time() + i * 0.001
+    def test_evicts_expired_entries(self, spool_dir):
+        old = _spool("aaaaaaaaaaaa", b"data", age=TASK_TTL + 10)
+        new = _spool("bbbbbbbbbbbb", b"data2")
 
         _evict_expired_results()
 
-        assert len(_result_store) <= _MAX_STORE_SIZE
+        assert not old.exists()
+        assert new.exists()
 
 
 # ---------------------------------------------------------------------------
@@ -169,33 +159,28 @@ class TestGetResult:
         assert result is None
 
     @pytest.mark.asyncio
-    async def test_returns_bytesio_and_cleans_up(self):
-        import time
-        test_data = b"PK\x03\x04fake_excel_data"
-        _result_store["abcdef012345"] = test_data
-        _result_timestamps["abcdef012345"] = time.time()
+    async def test_streams_file_and_cleans_up(self):
+        test_data = b"PK\x03\x04fake_excel_data" * 10000
+        path = _spool("abcdef012345", test_data)
 
         redis_mock = make_mock_redis()
         with patch("app.services.taoyuan.export_task_manager.get_redis", return_value=redis_mock):
             result = await ExportTaskManager.get_result("abcdef012345")
 
-            assert isinstance(result, BytesIO)
-            assert result.read() == test_data
-            # 確認已從 store 中移除
-            assert "abcdef012345" not in _result_store
-            assert "abcdef012345" not in _result_timestamps
+            assert b"".join(result) == test_data
+            # 讀完即刪除暫存檔
+            assert not path.exists()
             # 確認 Redis key 已刪除
             redis_mock.delete.assert_called_once_with(f"{EXPORT_TASK_PREFIX}abcdef012345")
 
     @pytest.mark.asyncio
     async def test_second_get_returns_none(self):
-        import time
-        _result_store["abcdef012345"] = b"data"
-        _result_timestamps["abcdef012345"] = time.time()
+        _spool("abcdef012345", b"data")
         redis_mock = make_mock_redis()
         with patch("app.services.taoyuan.export_task_manager.get_redis", return_value=redis_mock):
             first = await ExportTaskManager.get_result("abcdef012345")
             assert first is not None
+            list(first)
             second = await ExportTaskManager.get_result("abcdef012345")
             assert second is None
 
@@ -270,5 +255,62 @@ class TestConstants:
         assert STATUS_COMPLETED == "completed"
         assert STATUS_FAILED == "failed"
 
-    def test_max_store_size(self):
-        assert _MAX_STORE_SIZE == 50
+
+# ---------------------------------------------------------------------------
+# TestRunExport
+# ---------------------------------------------------------------------------
+
+class TestRunExport:
+    @pytest.mark.asyncio
+    async def test_completed_status_after_engine_job(self):
+        with patch.object(ExportTaskManager, "_update_progress", new_callable=AsyncMock) as update, \
+                patch("app.services.taoyuan.export_engine.submit_job",
+                      new_callable=AsyncMock, return_value={"rows": 12, "bytes": 2048}) as submit:
+            await ExportTaskManager._run_export("abcdef012345", 3, None, "道路")
+
+        submit.assert_awaited_once_with(
+            "dispatch_master", "abcdef012345",
+            {"contract_project_id": 3, "work_type": None, "search": "道路"},
+        )
+        final = update.await_args_list[-1]
+        assert final.args[1] == STATUS_COMPLETED
+        assert final.kwargs["total"] == 12
+        assert final.kwargs["filename"].startswith("dispatch_master_")
+
+    @pytest.mark.asyncio
+    async def test_business_error_marks_failed_with_message(self):
+        with patch.object(ExportTaskManager, "_update_progress", new_callable=AsyncMock) as update, \
+                patch("app.services.taoyuan.export_engine.submit_job",
+                      new_callable=AsyncMock, side_effect=ValueError("匯出上限 50000 筆")):
+            await ExportTaskManager._run_export("abcdef012345", None, None, None)
+
+        final = update.await_args_list[-1]
+        assert final.args[1] == STATUS_FAILED
+        assert "匯出上限" in final.kwargs["message"]
+
+
+# ---------------------------------------------------------------------------
+# TestStreamingWorkbookWriter
+# ---------------------------------------------------------------------------
+
+class TestStreamingWorkbookWriter:
+    def test_writes_sheets_in_order_with_header(self, tmp_path):
+        from openpyxl import load_workbook
+
+        writer = export_engine.StreamingWorkbookWriter()
+        for name in ("派工總表", "契金摘要"):
+            writer.add_sheet(name)
+        for i in range(3):
+            writer.write("派工總表", {"派工單號": f"D{i}", "金額": i * 100})
+        path = tmp_path / "out.xlsx"
+        writer.save(path)
+
+        wb = load_workbook(path)
+        assert wb.sheetnames == ["派工總表", "契金摘要"]
+        ws = wb["派工總表"]
+        rows = list(ws.values)
+        assert rows[0] == ("派工單號", "金額")
+        assert rows[1:] == [("D0", 0), ("D1", 100), ("D2", 200)]
+        assert ws.freeze_panes == "A2"
+        assert ws["A1"].font.bold
+        assert wb["契金摘要"].max_row <= 1
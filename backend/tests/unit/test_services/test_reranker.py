@@ -14,7 +14,9 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock
 
 from app.services.ai.search.reranker import (
+    KeywordScorer,
     compute_keyword_score,
+    compute_keyword_scores,
     build_doc_text,
     rerank_documents,
     llm_rerank,
@@ -56,6 +58,30 @@ class TestComputeKeywordScore:
         assert exact > partial
 
 
+class TestKeywordScorerBatch:
+    """批次評分與逐筆語意一致"""
+
+    def test_batch_matches_single(self):
+        terms = ["道路改善工程", "桃園", "養護科", "的"]
+        texts = ["道路改善工程施工計畫", "桃園市政府養護工程處", "橋梁維修報告", "", "改善桃園道路"]
+        batch = compute_keyword_scores(terms, texts)
+        assert batch.shape == (5,)
+        # 期望值取自改寫前的逐筆演算法（逐詞 in / bigram 掃描），鎖定批次版語意不變
+        expected = [6 / 11, 4.7 / 11, 0.0, 0.0, 3.8 / 11]
+        assert batch.tolist() == pytest.approx(expected)
+        assert [compute_keyword_score(terms, t) for t in texts] == pytest.approx(expected)
+
+    def test_no_cross_document_match(self):
+        """串接後的邊界不得組出跨文件的詞"""
+        scores = compute_keyword_scores(["道路"], ["...道", "路..."])
+        assert scores.tolist() == [0.0, 0.0]
+
+    def test_partial_counts_once_per_term(self):
+        scorer = KeywordScorer(["地政事務所"])
+        # 未精確命中，多個 bigram 命中也只給一次部分分
+        assert scorer.score_texts(["地政 事務 所"])[0] == pytest.approx(0.3)
+
+
 # ============================================================================
 # build_doc_text
 # ============================================================================
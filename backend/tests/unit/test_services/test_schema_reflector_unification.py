@@ -3,12 +3,12 @@
 
 異質同工確證：code_graph ingest 每次反射 DB schema 兩次——
   ① code_graph_ast_analyzer.SchemaReflector.reflect_tables()（自建 sync Inspector）
-  ② schema_reflector.SchemaReflectorService（_ingest_fk_relations 用，cached）
+  ② schema_reflector.SchemaReflectorService（_fk_relation_values 用，cached）
 兩套 Inspector 讀同一 PostgreSQL。整合＝db_table 實體改由 SchemaReflectorService
 的 schema dict 建構（純函式 build_table_entities_from_schema），消除重複 Inspector。
 
 本測試鎖定純建構器：從 SchemaReflectorService 格式的 schema dict 產出等價 db_table
-實體（description 形狀保真）。FK 關係交由 _ingest_fk_relations 單一源，建構器不重複產。
+實體（description 形狀保真）。FK 關係交由 _fk_relation_values 單一源，建構器不重複產。
 
 RED-GREEN-REFACTOR。相關 HETEROGENEOUS_WORK_REGISTRY.md / code_graph_self_optimization。
 """
@@ -79,7 +79,7 @@ class TestBuildTableEntitiesFromSchema:
         assert build_table_entities_from_schema({}) == []
 
     def test_no_fk_relations_produced(self):
-        """建構器只產實體，FK 關係交由 _ingest_fk_relations 單一源（不重複）。"""
+        """建構器只產實體，FK 關係交由 _fk_relation_values 單一源（不重複）。"""
         result = build_table_entities_from_schema(SAMPLE_SCHEMA)
         # 回傳純實體 list（非 tuple），無 relations
         assert isinstance(result, list)
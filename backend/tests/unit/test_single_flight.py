@@ -0,0 +1,194 @@
+"""
+Single-flight 請求合併測試（app.core.single_flight）
+
+鎖定：
+1. 相同 key 併發呼叫只執行一次，結果 / 例外共享
+2. leader 被取消時上游呼叫仍完成，其他等待者正常取得結果
+3. AIConnector.chat_completion 僅合併確定性請求（temperature == 0 / coalesce=True），
+   generate_embedding 相同請求合併，不同參數不合併
+4. 只有加入進行中呼叫才計 coalesced；快取載入的合併不計入推理 metric
+5. generate_embeddings_batch 整批失敗時逐筆重試的同時請求數有上限
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_coalesces_and_counts(self):
+        flight = SingleFlight("t")
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(8)))
+        await flight.do("other", upstream)
+
+        assert results == ["ok"] * 8
+        assert calls == 2
+        assert flight.stats() == {
+            "inflight": 0, "upstream_calls": 2, "coalesced": 7, "coalesced_percent": 77.8,
+        }
+
+    @pytest.mark.asyncio
+    async def test_error_shared_then_retried(self):
+        flight = SingleFlight("t")
+        upstream = AsyncMock(side_effect=[RuntimeError("ollama down"), "ok"])
+
+        async def call():
+            await asyncio.sleep(0.01)
+            return await upstream()
+
+        results = await asyncio.gather(*(flight.do("k", call) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await flight.do("k", call) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_leader_cancellation_does_not_cancel_followers(self):
+        flight = SingleFlight("t")
+
+        async def upstream():
+            await asyncio.sleep(0.02)
+            return 42
+
+        leader = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == 42
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+
+    @pytest.mark.asyncio
+    async def test_completed_task_is_not_joined(self):
+        flight = SingleFlight("t")
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("k", upstream) == 1
+        # _forget 尚未執行前，已完成的 task 仍在表中 → 不得當成合併
+        assert await flight.do("k", upstream) == 2
+        assert flight.coalesced == 0
+
+    @pytest.mark.asyncio
+    async def test_metric_only_for_inference_flights(self):
+        recorded = []
+
+        class FakeMetrics:
+            def record_coalesced(self, kind):
+                recorded.append(kind)
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        with patch(
+            "app.core.inference_provider_metrics.get_inference_provider_metrics",
+            return_value=FakeMetrics(),
+        ):
+            chat = SingleFlight("chat")
+            cache = SingleFlight("cache:docs", record_metric=False)
+            await asyncio.gather(chat.do("k", upstream), chat.do("k", upstream))
+            await asyncio.gather(cache.do("k", upstream), cache.do("k", upstream))
+
+        assert recorded == ["chat"]
+        assert cache.coalesced == 1
+
+
+class TestAIConnectorCoalescing:
+    @pytest.mark.asyncio
+    async def test_chat_completion_coalesces_identical_requests(self):
+        from app.core.ai_connector import AIConnector
+
+        connector = AIConnector(groq_api_key="x", nvidia_api_key="")
+
+        async def slow(*args, **kwargs):
+            await asyncio.sleep(0.02)
+            return "摘要"
+
+        messages = [{"role": "user", "content": "今日公文摘要"}]
+        with patch.object(connector, "_chat_completion", AsyncMock(side_effect=slow)) as impl:
+            results = await asyncio.gather(
+                *(connector.chat_completion(messages, task_type="summary", temperature=0) for _ in range(5)),
+                connector.chat_completion(messages, task_type="summary", temperature=0.1, coalesce=True),
+                connector.chat_completion(messages, task_type="summary", temperature=0.1, coalesce=True),
+            )
+
+        assert results == ["摘要"] * 7
+        assert impl.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_sampled_chat_completion_is_not_coalesced(self):
+        from app.core.ai_connector import AIConnector
+
+        connector = AIConnector(groq_api_key="x", nvidia_api_key="")
+
+        async def slow(*args, **kwargs):
+            await asyncio.sleep(0.02)
+            return "摘要"
+
+        messages = [{"role": "user", "content": "寫一段問候"}]
+        with patch.object(connector, "_chat_completion", AsyncMock(side_effect=slow)) as impl:
+            await asyncio.gather(*(connector.chat_completion(messages) for _ in range(3)))
+
+        assert impl.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_generate_embedding_coalesces_by_model_and_text(self):
+        from app.core.ai_connector import AIConnector
+
+        connector = AIConnector()
+
+        async def slow(text, model):
+            await asyncio.sleep(0.02)
+            return [0.1] * 768
+
+        with patch.object(connector, "_embed_one", AsyncMock(side_effect=slow)) as impl:
+            await asyncio.gather(
+                *(connector.generate_embedding("道路工程") for _ in range(4)),
+                connector.generate_embedding("道路工程", model="other-embed"),
+            )
+
+        assert impl.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_embedding_retry_is_bounded(self):
+        from app.core.ai_connector import AIConnector
+        from app.services.ai.core.ai_config import get_ai_config
+
+        connector = AIConnector()
+        in_flight = peak = 0
+
+        async def slow(text, model=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.005)
+            in_flight -= 1
+            return [float(len(text))]
+
+        client = AsyncMock()
+        client.post.side_effect = RuntimeError("ollama down")
+        texts = ["x" * n for n in range(1, 31)]
+        with patch("app.core.ai_connector.get_ai_http_client", return_value=client), \
+                patch.object(connector, "generate_embedding", AsyncMock(side_effect=slow)) as one:
+            results = await connector.generate_embeddings_batch(texts)
+
+        assert results == [[float(n)] for n in range(1, 31)]
+        assert one.await_count == 30
+        assert peak == get_ai_config().embedding_fallback_concurrency
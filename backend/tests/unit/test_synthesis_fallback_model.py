@@ -84,12 +84,12 @@ class TestSynthesisNvidiaFastFail:
         )
 
     def test_synthesis_path_shortens_nvidia_timeout(self):
-        """chat_completion 內必須對 task_type==synthesis 縮短 NVIDIA timeout。"""
+        """_chat_completion（chat_completion 的 single-flight 內層）必須對 task_type==synthesis 縮短 NVIDIA timeout。"""
         import ast
         import inspect
         from app.core import ai_connector
 
-        src = inspect.getsource(ai_connector.AIConnector.chat_completion)
+        src = inspect.getsource(ai_connector.AIConnector._chat_completion)
         # 鎖定：synthesis 條件 + 短 timeout env + 傳入 _nvidia_completion
         assert "NVIDIA_SYNTHESIS_TIMEOUT" in src
         assert 'task_type == "synthesis"' in src
@@ -2,30 +2,45 @@
 tender_cache_service.save_search_results — ezbid 源 unit_id 空時必須
 用 ezbid_id 回填，防止 DB 累積 unit_id='' 壞資料（會造成 React rowKey 重複 +
 /tender/ detail URL 404）。
+
+2026-10-16: save_search_results 改委派 warehouse.upsert_tenders（批次
+INSERT ... ON CONFLICT），改由 upsert 指令的參數驗證。
 """
 import pytest
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
+from sqlalchemy.dialects import postgresql
+
 from app.services.tender_cache_service import save_search_results
 
 
-@pytest.mark.asyncio
-async def test_save_search_results_ezbid_unit_id_fallback():
-    """ezbid record with empty unit_id should be backfilled from ezbid_id."""
+def _db_returning(row):
     db = MagicMock()
-    db.execute = AsyncMock()
     db.commit = AsyncMock()
+    nested = MagicMock()
+    nested.__aenter__ = AsyncMock(return_value=nested)
+    nested.__aexit__ = AsyncMock(return_value=False)
+    db.begin_nested.return_value = nested
+    result = MagicMock()
+    result.all.return_value = [row]
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+def _upsert_params(db):
+    stmt = next(c.args[0] for c in db.execute.call_args_list
+                if getattr(getattr(c.args[0], "table", None), "name", None) == "tender_records")
+    return stmt.compile(dialect=postgresql.dialect()).params
 
-    # Simulate: (SELECT existing ID) returns None -> not existing; then INSERT + lastval
-    exec_result = MagicMock()
-    exec_result.scalar.return_value = None  # not existing
-    lastval_result = MagicMock()
-    lastval_result.scalar.return_value = 999
-    db.execute.side_effect = [
-        exec_result,     # SELECT existing
-        MagicMock(),     # INSERT
-        lastval_result,  # lastval
-    ]
+
+@pytest.mark.asyncio
+async def test_save_search_results_ezbid_unit_id_fallback():
+    """ezbid record with empty unit_id should be backfilled from ezbid_id."""
+    db = _db_returning(SimpleNamespace(
+        id=999, unit_id="2229486", job_number=None, ezbid_id="2229486",
+        unit_name="經濟部", inserted=True,
+    ))
 
     records = [{
         "unit_id": "",          # ← blank (the bug)
@@ -39,27 +54,19 @@ async def test_save_search_results_ezbid_unit_id_fallback():
     saved = await save_search_results(db, records, source="ezbid")
     assert saved == 1
 
-    # Find the INSERT call, check uid param was filled from ezbid_id
-    insert_call = [c for c in db.execute.call_args_list
-                   if "INSERT INTO tender_records" in str(c.args[0])][0]
-    params = insert_call.args[1]
-    assert params["uid"] == "2229486", (
-        f"Expected unit_id backfill from ezbid_id, got uid={params['uid']!r}"
+    params = _upsert_params(db)
+    assert params["unit_id_m0"] == "2229486", (
+        f"Expected unit_id backfill from ezbid_id, got uid={params['unit_id_m0']!r}"
     )
 
 
 @pytest.mark.asyncio
 async def test_save_search_results_pcc_unit_id_preserved():
     """PCC record with valid unit_id should not be altered."""
-    db = MagicMock()
-    db.execute = AsyncMock()
-    db.commit = AsyncMock()
-
-    exec_result = MagicMock()
-    exec_result.scalar.return_value = None
-    lastval_result = MagicMock()
-    lastval_result.scalar.return_value = 999
-    db.execute.side_effect = [exec_result, MagicMock(), lastval_result]
+    db = _db_returning(SimpleNamespace(
+        id=999, unit_id="A.19.4.8", job_number="115-1528-02", ezbid_id=None,
+        unit_name="某機關", inserted=True,
+    ))
 
     records = [{
         "unit_id": "A.19.4.8",
@@ -70,7 +77,4 @@ async def test_save_search_results_pcc_unit_id_preserved():
     }]
 
     await save_search_results(db, records, source="pcc")
-    insert_call = [c for c in db.execute.call_args_list
-                   if "INSERT INTO tender_records" in str(c.args[0])][0]
-    params = insert_call.args[1]
-    assert params["uid"] == "A.19.4.8"
+    assert _upsert_params(db)["unit_id_m0"] == "A.19.4.8"
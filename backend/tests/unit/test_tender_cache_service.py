@@ -2,7 +2,7 @@
 標案快取服務單元測試
 
 測試 tender_cache_service.py 的 7 個模組級函數：
-- save_search_results: 批次寫入 + 去重 + 空列表
+- save_search_results: 委派倉儲 upsert + 去重 + 空列表
 - search_from_db: ILIKE 模糊搜尋
 - get_db_stats: 統計回傳結構
 - build_graph_from_db: 圖譜節點/邊建構
@@ -121,13 +121,24 @@ class TestSaveSearchResults:
         result = await save_search_results(mock_db, records)
         assert result == 0
 
+    @staticmethod
+    def _upsert_returns(mock_db, *returned):
+        """warehouse.upsert_tenders 走 begin_nested + 批次 upsert（RETURNING 寫入的列）"""
+        from types import SimpleNamespace
+        nested = MagicMock()
+        nested.__aenter__ = AsyncMock(return_value=nested)
+        nested.__aexit__ = AsyncMock(return_value=False)
+        mock_db.begin_nested = MagicMock(return_value=nested)
+        result = MagicMock()
+        result.all.return_value = [SimpleNamespace(**row) for row in returned]
+        mock_db.execute.return_value = result
+
     @pytest.mark.asyncio
-    async def test_existing_record_skipped(self, mock_db):
-        """已存在的記錄 (unit_id+job_number 重複) 應跳過"""
+    async def test_unchanged_record_not_counted(self, mock_db):
+        """已存在且內容相同的記錄 (ON CONFLICT WHERE 未命中) 不計入、不 commit"""
         from app.services.tender_cache_service import save_search_results
 
-        # 模擬 SELECT id 回傳已存在的 id
-        mock_db.execute.return_value = _scalar_result(42)
+        self._upsert_returns(mock_db)
 
         records = [{"unit_id": "U1", "job_number": "J1", "title": "已存在標案"}]
         result = await save_search_results(mock_db, records)
@@ -139,12 +150,10 @@ class TestSaveSearchResults:
         """新記錄應成功插入並回傳計數 1"""
         from app.services.tender_cache_service import save_search_results
 
-        # 第一次 execute: SELECT (不存在), 第二次: INSERT, 第三次: lastval
-        mock_db.execute.side_effect = [
-            _scalar_result(None),        # SELECT — not found
-            MagicMock(),                 # INSERT
-            _scalar_result(100),         # lastval
-        ]
+        self._upsert_returns(mock_db, {
+            "id": 100, "unit_id": "U1", "job_number": "J1", "ezbid_id": None,
+            "unit_name": "測試機關", "inserted": True,
+        })
 
         records = [{
             "unit_id": "U1", "job_number": "J1", "title": "新標案",
@@ -155,16 +164,31 @@ class TestSaveSearchResults:
         assert result == 1
         mock_db.commit.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_updated_record_not_counted_as_new(self, mock_db):
+        """既有記錄被補值 (xmax != 0) 會寫入，但不計入新增筆數"""
+        from app.services.tender_cache_service import save_search_results
+
+        self._upsert_returns(mock_db, {
+            "id": 100, "unit_id": "U1", "job_number": "J1", "ezbid_id": None,
+            "unit_name": "測試機關", "inserted": False,
+        })
+
+        records = [{"unit_id": "U1", "job_number": "J1", "title": "決標後標案", "type": "決標公告"}]
+        result = await save_search_results(mock_db, records)
+        assert result == 0
+        mock_db.commit.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_ezbid_record_uses_ezbid_id_for_dedup(self, mock_db):
-        """ezbid 來源的記錄應以 ezbid_id 做去重查詢"""
+        """ezbid 來源無案號的記錄應以 ezbid_id 為 ON CONFLICT 目標"""
+        from sqlalchemy.dialects import postgresql
         from app.services.tender_cache_service import save_search_results
 
-        mock_db.execute.side_effect = [
-            _scalar_result(None),   # SELECT by ezbid_id — not found
-            MagicMock(),            # INSERT
-            _scalar_result(101),    # lastval
-        ]
+        self._upsert_returns(mock_db, {
+            "id": 101, "unit_id": "EZ123", "job_number": None, "ezbid_id": "EZ123",
+            "unit_name": "", "inserted": True,
+        })
 
         records = [{
             "ezbid_id": "EZ123", "title": "ezbid 標案",
@@ -172,19 +196,18 @@ class TestSaveSearchResults:
         }]
         result = await save_search_results(mock_db, records, source="ezbid")
         assert result == 1
+        stmt = mock_db.execute.call_args_list[0].args[0]
+        assert "ON CONFLICT (ezbid_id)" in str(stmt.compile(dialect=postgresql.dialect()))
 
     @pytest.mark.asyncio
     async def test_winner_and_bidder_links_created(self, mock_db):
-        """有 winner_names/bidder_names 時應建立廠商關聯"""
+        """有 winner_names/bidder_names 時應批次 upsert 廠商關聯"""
         from app.services.tender_cache_service import save_search_results
 
-        mock_db.execute.side_effect = [
-            _scalar_result(None),    # SELECT — not found
-            MagicMock(),             # INSERT tender_records
-            _scalar_result(200),     # lastval
-            MagicMock(),             # INSERT winner link
-            MagicMock(),             # INSERT bidder link
-        ]
+        self._upsert_returns(mock_db, {
+            "id": 200, "unit_id": "U2", "job_number": "J2", "ezbid_id": None,
+            "unit_name": "", "inserted": True, "tender_record_id": 200,
+        })  # 同一 mock 結果同時充當 tender_records 與 tender_company_links 的 RETURNING
 
         records = [{
             "unit_id": "U2", "job_number": "J2", "title": "有廠商的標案",
@@ -193,8 +216,13 @@ class TestSaveSearchResults:
         }]
         result = await save_search_results(mock_db, records)
         assert result == 1
-        # 5 calls: SELECT + INSERT record + lastval + 2 company links
-        assert mock_db.execute.call_count == 5
+        link_stmt = next(
+            c.args[0] for c in mock_db.execute.call_args_list
+            if getattr(getattr(c.args[0], "table", None), "name", None) == "tender_company_links"
+        )
+        params = link_stmt.compile().params
+        assert {params["company_name_m0"], params["company_name_m1"]} == {"得標公司A", "投標公司B"}
+        assert params["tender_record_id_m0"] == 200
 
 
 class TestSearchFromDb:
@@ -515,12 +543,10 @@ class TestRefreshPendingTenders:
         pending_row.title = "測試標案"
         pending_row.status = "等標期"
 
-        # 第一次 execute: SELECT pending
-        mock_db.execute.side_effect = [
-            _fetchall_result([pending_row]),  # SELECT pending
-            MagicMock(),                      # UPDATE status
-            _fetchall_result([]),             # SELECT existing company_names
-        ]
+        pending_row.unit_name = "測試機關"
+
+        # 第一次 execute: SELECT pending；其後 UPDATE status + 廠商關聯 + 彙總重算
+        mock_db.execute.side_effect = [_fetchall_result([pending_row])] + [MagicMock()] * 8
 
         with patch("app.services.tender.search.TenderSearchService") as MockSvc:
             instance = MockSvc.return_value
@@ -528,7 +554,14 @@ class TestRefreshPendingTenders:
                 "title": "測試標案",
                 "latest": {"status": "決標公告"},
                 "events": [
-                    {"type": "決標公告", "award_details": {"total_award_amount": 5000000}},
+                    {
+                        "type": "決標公告",
+                        "award_details": {
+                            "total_award_amount": 5000000,
+                            "award_items": [{"item_no": 1, "winner": "得標公司A", "amount": 5000000}],
+                        },
+                        "companies": ["得標公司A", "投標公司B"],
+                    },
                 ],
             })
 
@@ -537,6 +570,18 @@ class TestRefreshPendingTenders:
             assert result["updated"] == 1
             mock_db.commit.assert_called_once()
 
+        link_stmt = next(
+            c.args[0] for c in mock_db.execute.call_args_list
+            if getattr(getattr(c.args[0], "table", None), "name", None) == "tender_company_links"
+        )
+        params = link_stmt.compile().params
+        roles = {params[f"company_name_m{i}"]: params[f"role_m{i}"] for i in range(2)}
+        assert roles == {"得標公司A": "winner", "投標公司B": "bidder"}
+        assert params["amount_m0"] == 5000000
+        refresh = [c.args[1] for c in mock_db.execute.call_args_list
+                   if "tender_org_year_stats" in str(c.args[0])]
+        assert refresh and refresh[0] == {"orgs": ["測試機關"]}
+
     @pytest.mark.asyncio
     async def test_no_status_change_no_update(self, mock_db):
         """狀態未變更時不應計入 updated"""
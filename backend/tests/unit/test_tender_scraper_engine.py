@@ -0,0 +1,257 @@
+"""
+標案爬蟲共用抓取引擎測試（app.services.tender.scraper_engine）
+
+鎖定：
+1. token bucket：burst 內不等待，之後依 rate 等待
+2. AIMD 併發上限：連續成功 +1、429 / timeout 減半；取消路徑不漏減 in_flight
+3. 同 host 共用 client；ETag / Last-Modified 條件請求，304 沿用內容與解析結果
+4. 分頁抓取遇空頁即停、失敗頁跳過、依頁序回傳；ezbid 今日全量走分頁
+5. 環境變數覆寫 source 設定；解析函式可 pickle 且所在模組不拖進 app.services
+   （預設在 spawn 行程池執行）
+"""
+import asyncio
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.services.tender import scraper_engine
+from app.services.tender.ezbid_scraper import EzbidScraper
+from app.services.tender.pcc_today_scraper import PccTodayScraper
+from app.services.tender.scraper_engine import (
+    AdaptiveLimiter,
+    ScraperEngine,
+    SourcePolicy,
+    TokenBucket,
+    load_source_policy,
+)
+
+SAMPLE_HTML = (Path(__file__).parent.parent / "fixtures" / "ezbid_sample.html").read_text(encoding="utf-8")
+FAST = {"t": SourcePolicy(rate=1000.0, burst=100, max_concurrency=4)}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    @pytest.mark.asyncio
+    async def test_burst_then_rate(self, monkeypatch):
+        clock = _Clock()
+        slept = []
+
+        async def _sleep(seconds):
+            slept.append(seconds)
+            clock.now += seconds
+
+        monkeypatch.setattr(scraper_engine.asyncio, "sleep", _sleep)
+        bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+
+        assert [await bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+        assert await bucket.acquire() == pytest.approx(0.5)
+        clock.now += 1.0  # 閒置 1 秒補回 2 個（不超過容量）
+        assert [await bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+        assert slept == [pytest.approx(0.5)]
+
+
+class TestAdaptiveLimiter:
+    @pytest.mark.asyncio
+    async def test_additive_increase_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter(min_limit=1, max_limit=8)
+        assert limiter.limit == 4
+
+        for _ in range(4):
+            await limiter.acquire()
+            limiter.release("ok")
+        assert limiter.limit == 5
+
+        await limiter.acquire()
+        limiter.release("throttled")
+        assert limiter.limit == 2
+
+        await limiter.acquire()
+        limiter.release("error")
+        assert (limiter.limit, limiter.in_flight) == (2, 0)
+
+    @pytest.mark.asyncio
+    async def test_waiters_blocked_at_limit_and_cancel_safe(self):
+        limiter = AdaptiveLimiter(min_limit=1, max_limit=2)
+        await limiter.acquire()
+
+        blocked = asyncio.create_task(limiter.acquire())
+        cancelled = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not blocked.done()
+
+        cancelled.cancel()
+        limiter.release("ok")
+        await blocked
+        assert limiter.in_flight == 1
+        assert cancelled.cancelled()
+
+
+def _engine(handler, **kwargs):
+    return ScraperEngine(
+        policies=FAST, transport=httpx.MockTransport(handler), parse_executor="thread", **kwargs,
+    )
+
+
+class TestFetch:
+    @pytest.mark.asyncio
+    async def test_etag_revalidation_reuses_parse(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers.get("if-none-match"))
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text="a,b", headers={"ETag": '"v1"'})
+
+        parsed = []
+
+        def parser(text):
+            parsed.append(text)
+            return [{"v": v} for v in text.split(",")]
+
+        engine = _engine(handler)
+        first = await engine.fetch("t", "https://example.test/list", params={"page": 2})
+        records = await engine.parse(first, parser)
+        records[0]["matched_keyword"] = "x"  # 呼叫端就地修改不得污染快取
+
+        again = await engine.fetch("t", "https://example.test/list", params={"page": 2})
+
+        assert seen == [None, '"v1"']
+        assert again.not_modified and again.status_code == 200 and again.text == "a,b"
+        assert await engine.parse(again, parser) == [{"v": "a"}, {"v": "b"}]
+        assert parsed == ["a,b"]
+        assert len(engine._clients) == 1
+        assert engine.stats()["t"]["not_modified"] == 1
+        await engine.aclose()
+
+    @pytest.mark.asyncio
+    async def test_last_modified_and_uncacheable(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers.get("if-modified-since"))
+            if request.url.path == "/plain":
+                return httpx.Response(200, text="x")
+            return httpx.Response(200, text="y", headers={"Last-Modified": "Fri, 16 Oct 2026 00:00:00 GMT"})
+
+        engine = _engine(handler)
+        for path in ("/plain", "/plain", "/lm", "/lm"):
+            await engine.fetch("t", f"https://example.test{path}")
+        await engine.fetch("t", "https://example.test/lm", conditional=False)
+
+        assert seen == [None, None, None, "Fri, 16 Oct 2026 00:00:00 GMT", None]
+        await engine.aclose()
+
+    @pytest.mark.asyncio
+    async def test_throttle_halves_concurrency(self):
+        engine = _engine(lambda request: httpx.Response(429))
+        before = engine.concurrency("t")
+
+        result = await engine.fetch("t", "https://example.test/")
+
+        assert result.status_code == 429
+        assert engine.concurrency("t") == max(1, before // 2)
+        assert engine.stats()["t"]["throttled"] == 1
+        await engine.aclose()
+
+    @pytest.mark.asyncio
+    async def test_timeout_counts_as_throttle_and_propagates(self):
+        def handler(request):
+            raise httpx.ReadTimeout("slow", request=request)
+
+        engine = _engine(handler)
+        with pytest.raises(httpx.ReadTimeout):
+            await engine.fetch("t", "https://example.test/")
+        assert engine.stats()["t"]["in_flight"] == 0
+        assert engine.stats()["t"]["throttled"] == 1
+        await engine.aclose()
+
+
+class TestPaginate:
+    @pytest.mark.asyncio
+    async def test_stops_at_first_empty_page_skipping_failed_pages(self):
+        engine = _engine(lambda request: httpx.Response(200))
+        calls = []
+
+        async def fetch_page(page):
+            calls.append(page)
+            await asyncio.sleep(0.001 * (5 - page) if page < 5 else 0)
+            if page == 4:
+                return []
+            if page == 2:
+                raise RuntimeError("boom")  # 失敗頁跳過，不當最後一頁
+            return [page]
+
+        assert await engine.paginate("t", fetch_page, 10) == [1, 3]
+        assert max(calls) <= 2 + engine.concurrency("t")
+
+    @pytest.mark.asyncio
+    async def test_ezbid_today_crawl(self, monkeypatch):
+        pages = []
+
+        def handler(request):
+            page = int(request.url.params.get("page", 1))
+            pages.append(page)
+            return httpx.Response(200, text=SAMPLE_HTML if page <= 3 else "<html></html>")
+
+        monkeypatch.setattr(scraper_engine, "_engine", ScraperEngine(
+            transport=httpx.MockTransport(handler), parse_executor="thread",
+        ))
+
+        records = await EzbidScraper()._crawl_today()
+
+        assert len(records) == 6
+        assert 4 in pages and max(pages) < 10
+
+    @pytest.mark.asyncio
+    async def test_ezbid_today_crawl_continues_past_failed_page(self, monkeypatch):
+        def handler(request):
+            page = int(request.url.params.get("page", 1))
+            if page == 2:
+                raise httpx.ConnectError("reset")
+            return httpx.Response(200, text=SAMPLE_HTML if page <= 3 else "<html></html>")
+
+        monkeypatch.setattr(scraper_engine, "_engine", ScraperEngine(
+            transport=httpx.MockTransport(handler), parse_executor="thread",
+        ))
+        monkeypatch.setattr("app.services.tender.ezbid_scraper.BACKOFF_BASE", 0.0)
+
+        records = await EzbidScraper()._crawl_today()
+
+        assert len(records) == 4  # 第 1、3 頁；第 2 頁重試用盡後跳過
+
+
+def test_policy_env_override(monkeypatch):
+    monkeypatch.setenv("SCRAPER_EZBID_RATE", "1.5")
+    monkeypatch.setenv("SCRAPER_EZBID_MAX_CONCURRENCY", "lots")
+    policy = load_source_policy("ezbid")
+    assert policy.rate == 1.5
+    assert policy.max_concurrency == scraper_engine.DEFAULT_POLICIES["ezbid"].max_concurrency
+    assert load_source_policy("pcc").verify is False
+
+
+def test_parsers_are_picklable():
+    for parser in (EzbidScraper()._parse_html, PccTodayScraper()._parse_today_page):
+        assert parser.__module__ == "app.utils.tender_parsers"
+        assert pickle.loads(pickle.dumps(parser)) is parser
+
+
+def test_parser_module_is_a_leaf():
+    """spawn worker 只 import 解析模組，不可連帶載入 app.services。"""
+    code = (
+        "import sys, app.utils.tender_parsers; "
+        "sys.exit(1 if any(m.startswith('app.services') or m == 'app.core' for m in sys.modules) else 0)"
+    )
+    backend = Path(__file__).resolve().parents[2]
+    assert subprocess.run([sys.executable, "-c", code], cwd=backend).returncode == 0
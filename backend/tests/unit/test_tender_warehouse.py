@@ -0,0 +1,399 @@
+"""
+標案本地倉儲測試（app.services.tender.warehouse）
+
+以錄製的來源資料（fixtures/pcc_today_sample.html、fixtures/openfun_searchbyorgname_sample.json）
+走完 解析 → 欄位值 → upsert 的流程，鎖定：
+1. 同批次同一案號的招標 / 決標公告合併為一列：保留首次公告日、狀態不回退、廠商去重
+2. ON CONFLICT 目標（部分唯一索引 / ezbid_id）與「內容未變不重寫」條件
+3. 第二次寫入相同資料：無新增 / 更新、不重算彙總、不 commit（冪等）
+4. 彙總表 → org_ecosystem 結果形狀；機關未在有效期內完整同步時交回即時查詢，
+   即時 fan-out 各頁結果一次寫入倉儲並標記同步
+"""
+import json
+from datetime import date
+from itertools import count
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.tender import warehouse
+from app.services.tender.data_transformer import normalize_record
+from app.services.tender.pcc_today_scraper import PccTodayScraper
+
+FIXTURES = Path(__file__).parent.parent / "fixtures"
+ORG = "交通部公路局北區養護工程分局"
+
+
+def _pcc_today_records():
+    html = (FIXTURES / "pcc_today_sample.html").read_text(encoding="utf-8")
+    records, _ = PccTodayScraper()._parse_today_page(html)
+    return records
+
+
+def _openfun_records():
+    data = json.loads((FIXTURES / "openfun_searchbyorgname_sample.json").read_text(encoding="utf-8"))
+    return [normalize_record(r) for r in data["records"]]
+
+
+def _compiled(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+class TestCollectRows:
+    def test_pcc_today_rows(self):
+        rows = warehouse.collect_rows(_pcc_today_records(), "pcc")
+
+        assert len(rows) == 4  # 更正區重複出現的 pkPmsMain 已由解析器去重
+        key = (warehouse.KEY_UNIT_JOB, "NzA5MTIzNDU2Nw==", "1151015A01")
+        values, links = rows[key]
+        assert values["unit_name"] == ORG
+        assert values["deadline"] == "2026-10-30"
+        assert values["tender_type"] == "公開招標公告"
+        assert values["source"] == "pcc"
+        assert links == {}
+
+    def test_openfun_announcements_merge_into_one_tender(self):
+        rows = warehouse.collect_rows(_openfun_records(), "pcc")
+
+        assert len(rows) == 4
+        values, links = rows[(warehouse.KEY_UNIT_JOB, "3.76.47.3", "1130801")]
+        assert values["announce_date"] == date(2024, 8, 20)  # 決標公告先出現 → 首見值保留
+        assert values["status"] == "決標公告"
+        assert links == {("甲測量有限公司", "winner"): None, ("乙工程顧問股份有限公司", "bidder"): None}
+
+    def test_award_status_not_regressed(self):
+        award, tender = _openfun_records()[2], _openfun_records()[3]
+        rows = warehouse.collect_rows([tender, award, tender], "pcc")
+
+        values, _ = rows[(warehouse.KEY_UNIT_JOB, "3.76.47.3", "1130801")]
+        assert values["status"] == "決標公告"
+        assert values["announce_date"] == date(2024, 8, 1)
+
+    def test_ezbid_without_job_number_keys_on_ezbid_id(self):
+        rows = warehouse.collect_rows([
+            {"unit_id": "", "job_number": "", "ezbid_id": "2229486", "title": "AI 輔導案"},
+            {"title": "沒有任何鍵"},
+            {"unit_id": "U1", "job_number": "J1", "title": ""},
+        ], "ezbid")
+
+        assert list(rows) == [(warehouse.KEY_EZBID, "2229486")]
+        assert rows[(warehouse.KEY_EZBID, "2229486")][0]["unit_id"] == "2229486"
+
+
+class TestStatements:
+    def test_unit_job_upsert_targets_partial_index(self):
+        values = [v for v, _ in warehouse.collect_rows(_openfun_records(), "pcc").values()]
+        sql = str(_compiled(warehouse.build_upsert_statement(warehouse.KEY_UNIT_JOB, values)))
+
+        assert "ON CONFLICT (unit_id, job_number) WHERE job_number IS NOT NULL AND job_number != ''" in sql
+        assert "coalesce(nullif(excluded.unit_name" in sql  # 稀疏來源不清空既有值
+        assert "IS DISTINCT FROM tender_records.title" in sql  # 內容未變不重寫
+        assert sql.rstrip().endswith("(xmax = 0) AS inserted")
+
+    def test_ezbid_upsert_targets_ezbid_id(self):
+        values = [v for v, _ in warehouse.collect_rows(
+            [{"ezbid_id": "EZ1", "title": "t"}], "ezbid").values()]
+        sql = str(_compiled(warehouse.build_upsert_statement(warehouse.KEY_EZBID, values)))
+        assert "ON CONFLICT (ezbid_id) DO UPDATE" in sql
+
+    def test_link_upsert_only_returns_changes(self):
+        sql = str(_compiled(warehouse.build_link_statement([
+            {"tender_record_id": 1, "company_name": "甲", "role": "winner", "amount": None},
+        ])))
+        assert "ON CONFLICT (tender_record_id, company_name, role)" in sql
+        assert "IS DISTINCT FROM tender_company_links.amount" in sql
+
+
+class _Result:
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+
+    def all(self):
+        return self._rows
+
+
+class _Nested:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _WarehouseDB:
+    """模擬 PG：第一次見到的鍵視為新增，之後內容相同 → 不回傳（ON CONFLICT ... WHERE 未命中）"""
+
+    def __init__(self):
+        self.ids = {}
+        self.links = set()
+        self.texts = []
+        self.commits = 0
+        self._next_id = count(1)
+
+    def begin_nested(self):
+        return _Nested()
+
+    async def execute(self, stmt, params=None):
+        if getattr(stmt, "is_select", False):  # _resolve_ids：未改寫列的 id
+            return _Result(
+                SimpleNamespace(id=rid, unit_id=k[0], job_number=k[1], ezbid_id=k[2], unit_name=name)
+                for k, (rid, name) in self.ids.items()
+            )
+        table = getattr(getattr(stmt, "table", None), "name", None)
+        if table is None:
+            self.texts.append((str(stmt), params))
+            return _Result()
+        compiled = _compiled(stmt).params
+        size = sum(1 for k in compiled if k.startswith(("title_m", "company_name_m"))) or 1
+
+        def value(name, i):
+            return compiled.get(f"{name}_m{i}", compiled.get(name))
+
+        rows = []
+        for i in range(size):
+            if table == "tender_records":
+                key = (value("unit_id", i), value("job_number", i), value("ezbid_id", i))
+                if key in self.ids:
+                    continue
+                self.ids[key] = (next(self._next_id), value("unit_name", i))
+                rows.append(SimpleNamespace(
+                    id=self.ids[key][0], unit_id=key[0], job_number=key[1], ezbid_id=key[2],
+                    unit_name=self.ids[key][1], inserted=True,
+                ))
+            else:
+                link = (value("tender_record_id", i), value("company_name", i), value("role", i))
+                if link not in self.links:
+                    self.links.add(link)
+                    rows.append(SimpleNamespace(tender_record_id=link[0]))
+        return _Result(rows)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class TestUpsertTenders:
+    @pytest.mark.asyncio
+    async def test_first_write_inserts_links_and_refreshes_touched_orgs(self):
+        db = _WarehouseDB()
+        stats = await warehouse.upsert_tenders(db, _openfun_records() + _pcc_today_records(), "pcc")
+
+        assert stats["inserted"] == 8  # openfun 4 案（5 則公告）+ PCC 今日 4 案
+        assert stats["updated"] == 0
+        assert stats["links"] == 3
+        assert len(db.links) == 5
+        assert db.commits == 1
+
+        deletes = [p for sql, p in db.texts if sql.startswith("DELETE FROM tender_org_vendor_stats")]
+        assert deletes and ORG in deletes[0]["orgs"]
+
+    @pytest.mark.asyncio
+    async def test_second_write_is_noop(self):
+        db = _WarehouseDB()
+        records = _openfun_records() + _pcc_today_records()
+        await warehouse.upsert_tenders(db, records, "pcc")
+        db.texts.clear()
+
+        stats = await warehouse.upsert_tenders(db, records, "pcc")
+
+        assert stats == {"inserted": 0, "updated": 0, "unchanged": 8, "links": 0, "orgs": 0}
+        assert db.texts == []  # 沒有重算彙總
+        assert db.commits == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_scope(self):
+        db = _WarehouseDB()
+        assert await warehouse.refresh_org_aggregates(db, ["", None]) == 0
+        assert db.texts == []
+
+        assert await warehouse.refresh_org_aggregates(db, [ORG, ORG]) == 1
+        assert all(p == {"orgs": [ORG]} for _, p in db.texts)
+
+        db.texts.clear()
+        assert await warehouse.refresh_org_aggregates(db) == -1
+        assert [sql.split("\n")[0] for sql, _ in db.texts][0] == "DELETE FROM tender_org_vendor_stats "
+
+
+class TestBuildOrgEcosystem:
+    def _recent(self):
+        return [{
+            "title": "114年度邊坡光達掃描監測", "date": "2025-07-20", "tender_type": "決標公告",
+            "category": "勞務類", "unit_name": ORG, "unit_id": "3.76.47.3",
+            "job_number": "1140702", "winners": ["乙工程顧問股份有限公司", None],
+        }]
+
+    def test_shape_matches_live_result(self):
+        result = warehouse.build_org_ecosystem(
+            ORG,
+            year_rows=[(2024, 1, 1), (2025, 2, 2), (0, 1, 0)],
+            category_rows=[("勞務類", 3), ("", 1)],
+            vendor_rows=[("甲測量有限公司", 2, 2), ("乙工程顧問股份有限公司", 2, 1)],
+            recent_rows=self._recent(),
+        )
+
+        assert set(result) == {
+            "org_name", "total", "awarded_count", "year_trend", "top_vendors",
+            "category_distribution", "recent_tenders", "source",
+        }
+        assert result["total"] == 4 and result["awarded_count"] == 3
+        assert result["year_trend"] == [
+            {"year": "2024", "count": 1}, {"year": "2025", "count": 2}, {"year": "未知", "count": 1},
+        ]
+        assert result["category_distribution"][1] == {"name": "未分類", "value": 1}
+        assert result["top_vendors"][1]["win_rate"] == 50.0
+        assert result["recent_tenders"][0]["winner_names"] == ["乙工程顧問股份有限公司"]
+
+    def test_empty_warehouse_defers_to_live(self):
+        assert warehouse.build_org_ecosystem(ORG, [], [], [], []) is None
+
+    def test_synced_org_served_regardless_of_award_count(self):
+        result = warehouse.build_org_ecosystem(ORG, [(2025, 10, 0)], [], [], [])
+        assert result["total"] == 10 and result["awarded_count"] == 0
+
+
+class TestOrgEcosystemWiring:
+    class _NoLiveSearch:
+        def __getattr__(self, name):
+            raise AssertionError(f"live {name} should not be called")
+
+    @pytest.fixture(autouse=True)
+    def _no_redis(self, monkeypatch):
+        import app.core.redis_client as redis_client
+
+        async def _none():
+            return None
+
+        monkeypatch.setattr(redis_client, "get_redis", _none)
+
+    @pytest.mark.asyncio
+    async def test_served_from_warehouse(self, monkeypatch):
+        from app.services.tender import analytics_battle
+
+        async def _local(org_name):
+            return {"org_name": org_name, "total": 4, "source": "warehouse"}
+
+        monkeypatch.setattr(analytics_battle, "_warehouse_org_ecosystem", _local)
+        result = await analytics_battle.org_ecosystem(self._NoLiveSearch(), ORG)
+        assert result["source"] == "warehouse"
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_live_search(self, monkeypatch):
+        from app.services.tender import analytics_battle
+
+        async def _none(org_name):
+            return None
+
+        class _Live:
+            calls = 0
+
+            async def search_by_org(self, org_name, page, persist=True):
+                _Live.calls += 1
+                assert persist is False
+                return {"records": _openfun_records()}
+
+            async def search_by_title(self, query, page, persist=True):
+                assert persist is False
+                return {"records": []}
+
+        persisted = []
+        monkeypatch.setattr(analytics_battle, "_warehouse_org_ecosystem", _none)
+        monkeypatch.setattr(
+            warehouse, "persist_in_background",
+            lambda records, source="pcc", synced_org=None: persisted.append((len(records), synced_org)),
+        )
+        result = await analytics_battle.org_ecosystem(_Live(), ORG, pages=2)
+
+        # 各頁結果一次寫入，且全部頁面成功 → 標記已同步
+        assert persisted == [(2 * len(_openfun_records()), ORG)]
+
+        assert _Live.calls == 2
+        assert result["total"] == 4
+        vendors = {v["name"]: (v["appear_count"], v["win_count"]) for v in result["top_vendors"]}
+        assert vendors["甲測量有限公司"] == (2, 2)
+        assert vendors["乙工程顧問股份有限公司"] == (2, 1)
+
+    @pytest.mark.asyncio
+    async def test_failed_page_does_not_mark_synced(self, monkeypatch):
+        from app.services.tender import analytics_battle
+
+        async def _none(org_name):
+            return None
+
+        class _Live:
+            async def search_by_org(self, org_name, page, persist=True):
+                if page == 2:
+                    raise RuntimeError("rate limited")
+                return {"records": _openfun_records()}
+
+            async def search_by_title(self, query, page, persist=True):
+                return {"records": []}
+
+        persisted = []
+        monkeypatch.setattr(analytics_battle, "_warehouse_org_ecosystem", _none)
+        monkeypatch.setattr(
+            warehouse, "persist_in_background",
+            lambda records, source="pcc", synced_org=None: persisted.append(synced_org),
+        )
+        await analytics_battle.org_ecosystem(_Live(), ORG, pages=2)
+
+        assert persisted == [None]
+
+    @pytest.mark.asyncio
+    async def test_unsynced_org_skips_warehouse(self, monkeypatch):
+        from app.services.tender import analytics_battle
+
+        async def _not_synced(org_name):
+            return False
+
+        async def _load(db, org_name):
+            raise AssertionError("warehouse should not be read before a full sync")
+
+        monkeypatch.setattr(warehouse, "is_org_synced", _not_synced)
+        monkeypatch.setattr(warehouse, "load_org_ecosystem", _load)
+        assert await analytics_battle._warehouse_org_ecosystem(ORG) is None
+
+
+class TestOrgSyncMarker:
+    class _Redis:
+        def __init__(self):
+            self.store = {}
+
+        async def exists(self, key):
+            return int(key in self.store)
+
+        async def set(self, key, value, ex=None):
+            self.store[key] = (value, ex)
+
+    @pytest.mark.asyncio
+    async def test_marked_after_successful_persist_with_ttl(self, monkeypatch):
+        import app.core.redis_client as redis_client
+        import app.db.database as database
+
+        redis = self._Redis()
+
+        async def _get_redis():
+            return redis
+
+        class _Session:
+            async def __aenter__(self):
+                return object()
+
+            async def __aexit__(self, *exc):
+                return False
+
+        upserts = []
+
+        async def _upsert(db, records, source):
+            upserts.append(len(records))
+
+        monkeypatch.setattr(redis_client, "get_redis", _get_redis)
+        monkeypatch.setattr(database, "async_session_maker", _Session)
+        monkeypatch.setattr(warehouse, "upsert_tenders", _upsert)
+
+        assert await warehouse.is_org_synced(ORG) is False
+        await warehouse.persist_in_background(_openfun_records(), synced_org=ORG)
+
+        assert upserts == [len(_openfun_records())]
+        assert await warehouse.is_org_synced(ORG) is True
+        assert next(iter(redis.store.values()))[1] == warehouse.ORG_SYNC_TTL
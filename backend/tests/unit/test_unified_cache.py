@@ -0,0 +1,325 @@
+"""
+統一快取層測試（app.core.unified_cache）
+
+鎖定：
+1. LocalStore O(1) LRU：存取會提升順序，超量淘汰最久未用
+2. 標籤失效跨 namespace，且不影響未標記項目
+3. single-flight（app.core.single_flight）：同 key 併發載入只呼叫一次 loader；例外傳給所有等待者且不快取；
+   leader 被取消不影響其他等待者
+4. Redis 二層：write-behind 寫入、L1 未命中由 L2 供應、標籤失效同步清 Redis
+5. 舊裝飾器（cache_result / redis_cache）改為薄包裝後仍可用；redis_cache 預設不開 L1、回傳獨立副本
+"""
+import asyncio
+import fnmatch
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core import unified_cache
+from app.core.unified_cache import CacheNamespace, LocalStore, MISSING
+
+
+class FakeRedis:
+    """最小 redis.asyncio 替身（get/set/setex/delete/sets/scan/pipeline）"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return value if isinstance(value, str) else None
+
+    async def set(self, key, value):
+        self.data[key] = value
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        return sum(1 for k in keys if self.data.pop(k, None) is not None)
+
+    async def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    async def expire(self, key, ttl):
+        return True
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    async def scard(self, key):
+        return len(self.data.get(key, ()))
+
+    async def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(members)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def scan_iter(self, pattern):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, pattern):
+                yield key
+
+    def pipeline(self, transaction=False):
+        redis, ops = self, []
+
+        class _Pipe:
+            def __getattr__(self, name):
+                return lambda *a: ops.append((name, a))
+
+            async def execute(self):
+                return [await getattr(redis, name)(*a) for name, a in ops]
+
+        return _Pipe()
+
+
+@pytest.fixture
+def fake_redis():
+    redis = FakeRedis()
+
+    async def _get_redis():
+        return redis
+
+    with patch("app.core.redis_client.get_redis", _get_redis):
+        yield redis
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry(monkeypatch):
+    monkeypatch.setattr(unified_cache, "_namespaces", {})
+
+
+class TestLocalStore:
+    def test_lru_eviction_respects_access_order(self):
+        store = LocalStore(max_size=3)
+        for k in ("a", "b", "c"):
+            store.set(k, k, ttl=60)
+        store.get("a")
+        store.set("d", "d", ttl=60)
+
+        assert store.get("b") is MISSING
+        assert [store.get(k) for k in ("a", "c", "d")] == ["a", "c", "d"]
+        assert store.evictions == 1
+
+    def test_ttl_and_never_expire(self):
+        store = LocalStore()
+        store.set("short", 1, ttl=0)
+        store.set("forever", 2, ttl=-1)
+        time.sleep(0.01)
+
+        assert store.get("short") is MISSING
+        assert store.get("forever") == 2
+
+    def test_tag_index_cleaned_on_overwrite_and_eviction(self):
+        store = LocalStore(max_size=1)
+        store.set("a", 1, ttl=60, tags=("documents",))
+        store.set("a", 2, ttl=60)
+        assert store.invalidate_tags(["documents"]) == 0
+        store.set("b", 3, ttl=60, tags=("documents",))
+        store.set("c", 4, ttl=60)
+        assert store._tags == {}
+
+
+class TestCacheNamespace:
+    @pytest.mark.asyncio
+    async def test_tags_invalidate_across_namespaces(self):
+        docs = unified_cache.get_cache_namespace("documents")
+        stats = unified_cache.get_cache_namespace("stats")
+        await docs.set("list:p42", [1], tags=("documents", "project:42"))
+        await docs.set("list:p7", [2], tags=("documents", "project:7"))
+        await stats.set("summary:p42", {"n": 1}, tags=("project:42",))
+
+        assert await unified_cache.invalidate_tags("project:42") == 2
+        assert await docs.get("list:p42") is None
+        assert await stats.get("summary:p42") is None
+        assert await docs.get("list:p7") == [2]
+
+    @pytest.mark.asyncio
+    async def test_single_flight_coalesces_concurrent_loads(self):
+        ns = CacheNamespace("t")
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"rows": 3}
+
+        results = await asyncio.gather(*(ns.get_or_load("k", loader) for _ in range(20)))
+
+        assert calls == 1
+        assert all(r == {"rows": 3} for r in results)
+        stats = ns.stats()
+        assert (stats["loads"], stats["coalesced"]) == (1, 19)
+        assert await ns.get_or_load("k", loader) == {"rows": 3}
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_loader_error_propagates_and_is_not_cached(self):
+        ns = CacheNamespace("t")
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(
+            *(ns.get_or_load("k", failing) for _ in range(3)), return_exceptions=True
+        )
+
+        assert calls == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert ns.local.get("k") is MISSING
+        assert ns.stats()["load_errors"] == 1
+
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_waiters(self):
+        ns = CacheNamespace("t")
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "v"
+
+        leader = asyncio.create_task(ns.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(ns.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        assert await waiter == "v"
+        assert ns.local.get("k") == "v"
+        assert ns.stats()["coalesced"] == 1
+
+
+class TestRedisTier:
+    @pytest.mark.asyncio
+    async def test_write_behind_and_read_through(self, fake_redis):
+        writer = CacheNamespace("w", redis_prefix="cache:docs")
+        await writer.set("k", {"a": 1}, ttl=60, tags=("documents",))
+        await writer.flush()
+        assert json.loads(fake_redis.data["cache:docs:k"]) == {"v": {"a": 1}, "t": ["documents"]}
+
+        # 另一個 worker：L1 空，由 L2 供應並回填
+        reader = CacheNamespace("r", redis_prefix="cache:docs")
+        assert await reader.get("k") == {"a": 1}
+        assert await reader.get("k") == {"a": 1}
+        stats = reader.stats()
+        assert (stats["redis_hits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+
+    @pytest.mark.asyncio
+    async def test_tag_invalidation_clears_redis(self, fake_redis):
+        ns = unified_cache.get_cache_namespace("docs", redis_prefix="cache:docs")
+        await ns.set("p42", [1], tags=("project:42",))
+        await ns.set("p7", [2], tags=("project:7",))
+
+        await unified_cache.invalidate_tags("project:42")
+
+        assert "cache:docs:p42" not in fake_redis.data
+        assert "cache:docs:p7" in fake_redis.data
+        assert await CacheNamespace("other", redis_prefix="cache:docs").get("p42") is None
+
+    @pytest.mark.asyncio
+    async def test_tag_set_prunes_expired_members(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(unified_cache, "TAG_SET_PRUNE_SIZE", 4)
+        tier = unified_cache.RedisTier("cache:docs")
+        tag_key = f"{unified_cache.TAG_KEY_PREFIX}:documents"
+        for i in range(4):
+            await tier.set(f"k{i}", "v", ttl=60, tags=("documents",))
+            fake_redis.data.pop(f"cache:docs:k{i}")  # 模擬 key 過期
+
+        await tier.set("k4", "v", ttl=60, tags=("documents",))
+
+        assert fake_redis.data[tag_key] == {"cache:docs:k4"}
+
+
+class TestLegacyWrappers:
+    @pytest.mark.asyncio
+    async def test_cache_result_clear_cache_uses_tags(self, monkeypatch):
+        from app.core import cache_manager
+
+        monkeypatch.setattr(cache_manager, "cache", cache_manager.MemoryCache())
+        calls = 0
+
+        @cache_manager.cache_result(ttl=60, prefix="documents")
+        async def list_docs(project_id):
+            nonlocal calls
+            calls += 1
+            return [project_id]
+
+        assert await list_docs(1) == [1]
+        assert await list_docs(1) == [1]
+        assert calls == 1
+
+        assert await list_docs.clear_cache() == 1
+        await list_docs(1)
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_cache_decorator(self, fake_redis):
+        from app.core.cache_decorator import invalidate_cache, redis_cache
+
+        calls = 0
+
+        @redis_cache(prefix="dispatch", ttl=60, tags=lambda project_id: [f"project:{project_id}"])
+        async def get_list(project_id):
+            nonlocal calls
+            calls += 1
+            return {"project": project_id}
+
+        assert await get_list(42) == {"project": 42}
+        assert await get_list(42) == {"project": 42}
+        assert calls == 1
+        await unified_cache.get_cache_namespace("redis:dispatch").flush()
+        assert any(k.startswith("cache:dispatch:get_list:") for k in fake_redis.data)
+
+        assert await invalidate_cache("dispatch") == 1
+        await get_list(42)
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_cache_has_no_l1_by_default(self, fake_redis):
+        from app.core.cache_decorator import redis_cache
+
+        calls = 0
+
+        @redis_cache(prefix="stats", ttl=60)
+        async def summary():
+            nonlocal calls
+            calls += 1
+            return {"rows": [calls]}
+
+        first = await summary()
+        first["rows"].append("mutated")  # 呼叫端修改回傳值不影響快取
+        await unified_cache.get_cache_namespace("redis:stats").flush()
+        assert await summary() == {"rows": [1]}
+        assert calls == 1
+
+        # 另一個 worker 清掉 Redis → 本 worker 立即看到（無 L1 殘留）
+        fake_redis.data.clear()
+        assert await summary() == {"rows": [2]}
+
+    @pytest.mark.asyncio
+    async def test_redis_cache_opt_in_l1_returns_copies(self, fake_redis):
+        from app.core.cache_decorator import redis_cache
+
+        calls = 0
+
+        @redis_cache(prefix="menu", ttl=60, local_ttl=5)
+        async def menu():
+            nonlocal calls
+            calls += 1
+            return [{"id": 1}]
+
+        (await menu())[0]["id"] = 99
+        fake_redis.data.clear()
+        assert await menu() == [{"id": 1}]  # L1 命中，且為獨立副本
+        assert calls == 1
+
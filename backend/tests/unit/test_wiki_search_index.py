@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Wiki 搜尋倒排索引測試（2026-10-16）
+
+鎖定行為：
+1. search_wiki 走記憶體索引，首次載入後查詢不再碰檔案系統
+2. ingest_entity / ingest_source 寫檔後增量更新索引（不需 rebuild）
+3. rebuild_index 落盤快照，新 process 載入時只重新解析有變動的頁面
+4. 回傳欄位維持舊版相容（path/title/type/score/snippet）+ hits（重疊子詞不重複計）
+5. snippet 取命中處附近；preview 僅 include_preview 時回傳；app 外刪除的頁面於 rebuild_index 對帳後不再命中
+"""
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from app.services.wiki.search_index import SNAPSHOT_NAME, WikiSearchIndex, tokenize
+from app.services.wiki.service import WIKI_SUBDIRS, WikiService
+
+
+@pytest.fixture
+def wiki_svc(tmp_path: Path) -> WikiService:
+    svc = WikiService()
+    svc.root = tmp_path
+    svc.index_path = tmp_path / "index.md"
+    svc.log_path = tmp_path / "log.md"
+    for sub in ("entities", "sources", "synthesis"):
+        (tmp_path / sub).mkdir(parents=True, exist_ok=True)
+    return svc
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _write(root: Path, rel: str, title: str, body: str) -> None:
+    (root / rel).write_text(
+        f"---\ntitle: {title}\ntype: entity\n---\n\n# {title}\n\n{body}\n",
+        encoding="utf-8",
+    )
+
+
+class TestWikiSearchIndex:
+    def test_search_returns_compatible_schema(self, wiki_svc: WikiService):
+        _write(wiki_svc.root, "entities/桃園市政府工務局.md", "桃園市政府工務局", "道路工程 養護工程 委辦")
+        _write(wiki_svc.root, "entities/水利署.md", "水利署", "河川 治理")
+
+        results = _run(wiki_svc.search_wiki("工務局 道路工程"))
+
+        assert results, "應命中工務局頁面"
+        top = results[0]
+        assert top["path"] == "entities/桃園市政府工務局.md"
+        assert top["title"] == "桃園市政府工務局"
+        assert top["type"] == "entity"
+        assert {"path", "title", "type", "score", "snippet", "hits"} <= set(top)
+        assert top["hits"] >= 2
+
+    def test_hits_count_keyword_occurrences_not_overlapping_subtokens(self, wiki_svc: WikiService):
+        # 「桃園市政府」單次出現會被 cut_for_search 切成多個重疊子詞，hits 仍只算 1
+        _write(wiki_svc.root, "entities/甲.md", "甲", "來文單位為桃園市政府")
+        _write(wiki_svc.root, "entities/乙.md", "乙", "桃園市政府 函轉 桃園市政府 核定")
+
+        results = {r["path"]: r for r in _run(wiki_svc.search_wiki("桃園市政府"))}
+
+        assert results["entities/甲.md"]["hits"] == 1
+        assert results["entities/甲.md"]["matched_terms"] == 1
+        assert results["entities/乙.md"]["hits"] == 2
+
+    def test_query_does_not_touch_filesystem_after_load(self, wiki_svc: WikiService):
+        _write(wiki_svc.root, "entities/光達.md", "光達", "光達 測量 點雲")
+        _run(wiki_svc.search_wiki("光達"))  # 首次載入
+
+        with patch.object(Path, "glob", side_effect=AssertionError("glob during query")), \
+                patch.object(Path, "read_text", side_effect=AssertionError("read during query")):
+            results = _run(wiki_svc.search_wiki("光達 測量"))
+        assert results[0]["path"] == "entities/光達.md"
+
+    def test_ingest_updates_index_incrementally(self, wiki_svc: WikiService):
+        _run(wiki_svc.search_wiki("任意"))  # 載入空索引
+        _run(wiki_svc.ingest_source(
+            title="邊坡監測報告",
+            source_type="document",
+            summary="邊坡 位移 監測",
+            key_points=["邊坡 崩塌 預警"],
+            entities_mentioned=[],
+        ))
+
+        results = _run(wiki_svc.search_wiki("邊坡"))
+        assert [r["path"] for r in results] == ["sources/邊坡監測報告.md"]
+
+    def test_rebuild_index_persists_snapshot_and_reuses_unchanged(self, wiki_svc: WikiService):
+        _write(wiki_svc.root, "entities/地政事務所.md", "地政事務所", "土地 測量 登記")
+        _write(wiki_svc.root, "entities/都發局.md", "都發局", "都市計畫 審議")
+        _run(wiki_svc.rebuild_index())
+        assert (wiki_svc.root / SNAPSHOT_NAME).exists()
+
+        # 模擬重啟：新索引從快照載入，只重新解析被改過的頁面
+        _write(wiki_svc.root, "entities/都發局.md", "都發局", "都市計畫 審議 公共設施 變更")
+        fresh = WikiSearchIndex(wiki_svc.root, WIKI_SUBDIRS)
+        stats = fresh.load()
+        assert stats == {"pages": 2, "reused": 1, "parsed": 1, "removed": 0}
+        assert fresh.search("公共設施")[0]["path"] == "entities/都發局.md"
+
+    def test_snippet_around_match_and_preview_opt_in(self, wiki_svc: WikiService):
+        filler = "一般說明文字。" * 60
+        _write(wiki_svc.root, "entities/鑽探.md", "鑽探", f"{filler}地質鑽探 取樣 深度三十公尺")
+
+        top = _run(wiki_svc.search_wiki("取樣"))[0]
+        assert "取樣" in top["snippet"]
+        assert len(top["snippet"]) <= 151
+        assert "preview" not in top
+
+        top = _run(wiki_svc.search_wiki("取樣", include_preview=True))[0]
+        assert top["preview"].startswith("---\ntitle: 鑽探")
+
+    def test_deleted_page_stops_matching(self, wiki_svc: WikiService):
+        _write(wiki_svc.root, "entities/舊.md", "舊", "廢止 規範")
+        _write(wiki_svc.root, "entities/新.md", "新", "規範 修訂")
+        _run(wiki_svc.search_wiki("規範"))
+
+        (wiki_svc.root / "entities/舊.md").unlink()
+        _run(wiki_svc.rebuild_index())
+
+        assert [r["path"] for r in _run(wiki_svc.search_wiki("規範"))] == ["entities/新.md"]
+        assert _run(wiki_svc.search_wiki("廢止")) == []
+        assert wiki_svc._search_index.stats()["total"] == 1
+
+    def test_bm25_prefers_rarer_term(self, tmp_path: Path):
+        (tmp_path / "entities").mkdir()
+        _write(tmp_path, "entities/a.md", "甲", "公文 公文 公文 決標")
+        _write(tmp_path, "entities/b.md", "乙", "公文 公文 公文 公文")
+        _write(tmp_path, "entities/c.md", "丙", "公文")
+        index = WikiSearchIndex(tmp_path, ["entities"])
+        index.load()
+
+        results = index.search("公文 決標")
+        assert results[0]["path"] == "entities/a.md"
+
+    def test_remove_page_drops_postings(self, tmp_path: Path):
+        (tmp_path / "entities").mkdir()
+        _write(tmp_path, "entities/a.md", "甲", "驗收 紀錄")
+        index = WikiSearchIndex(tmp_path, ["entities"])
+        index.load()
+        index.remove_page("entities/a.md")
+
+        assert index.search("驗收") == []
+        assert index.stats()["total"] == 0
+
+
+def test_tokenize_lowercases_and_drops_single_chars():
+    tokens = tokenize("LiDAR 光達 的")
+    assert "lidar" in tokens
+    assert "的" not in tokens
@@ -63,6 +63,15 @@ $runningContainer = docker ps --filter "name=$ContainerName" --format "{{.Names}
     Select-Object -First 1
 if ($runningContainer) { $ContainerName = $runningContainer }
 
+# 日常 dump 本體：本腳本產 .sql，容器排程（2026-10-16 起）預設產 .sql.zst，另有 .sql.gz；
+# 同目錄的 .manifest.json sidecar 與寫入中的 .partial 不算備份份數
+$DumpNamePattern = '^ck_missive_backup_\d{8}_\d{6}\.sql(\.gz|\.zst)?$'
+
+function Get-DumpFiles {
+    return @(Get-ChildItem -Path $BackupDir -File -Filter "ck_missive_backup_*" -ErrorAction SilentlyContinue |
+        Where-Object { $_.Name -match $DumpNamePattern })
+}
+
 function Ensure-Dir($path) {
     if (!(Test-Path $path)) { New-Item -ItemType Directory -Path $path -Force | Out-Null }
 }
@@ -132,12 +141,16 @@ function Clean-OldBackups {
     $count = 0
 
     # Clean database backups — 至少保留 1 個（防止備份失敗期間全部清空）
-    $dbFiles = Get-ChildItem -Path $BackupDir -Filter "ck_missive_backup_*" -ErrorAction SilentlyContinue |
-        Sort-Object LastWriteTime -Descending
+    # 只數 dump 本體；刪除時連同 ck_missive_backup_<ts>.manifest.json 一併移除
+    $dbFiles = Get-DumpFiles | Sort-Object LastWriteTime -Descending
     if ($dbFiles.Count -gt 1) {
         $dbFiles | Select-Object -Skip 1 |
             Where-Object { $_.LastWriteTime -lt $cutoff } |
-            ForEach-Object { Remove-Item $_.FullName -Force; Log "Deleted DB: $($_.Name)"; $count++ }
+            ForEach-Object {
+                Remove-Item $_.FullName -Force; Log "Deleted DB: $($_.Name)"; $count++
+                $manifest = Join-Path $BackupDir (($_.Name -replace '\.sql(\.gz|\.zst)?$', '') + ".manifest.json")
+                if (Test-Path -LiteralPath $manifest) { Remove-Item -LiteralPath $manifest -Force }
+            }
     }
 
     # Clean attachment backups — 至少保留 1 個
@@ -191,7 +204,7 @@ function Get-BackupStats {
     }
 
     if (Test-Path $BackupDir) {
-        $dbFiles = Get-ChildItem -Path $BackupDir -Filter "ck_missive_backup_*" -ErrorAction SilentlyContinue
+        $dbFiles = Get-DumpFiles
         $stats.DatabaseBackups = $dbFiles.Count
         $stats.TotalSize += ($dbFiles | Measure-Object -Property Length -Sum).Sum
     }
@@ -49,9 +49,38 @@ function Log($msg, $lvl = "INFO") {
     Write-Host $entry
 }
 
+# 日常 dump 本體：.sql / .sql.gz / .sql.zst（2026-10-16 起容器排程預設 .sql.zst）
+# 排除同目錄的 .manifest.json sidecar 與寫入中的 .partial，否則 -Latest 會挑到 manifest
+$DumpNamePattern = '^ck_missive_backup_\d{8}_\d{6}\.sql(\.gz|\.zst)?$'
+$DumpTailMarker = "PostgreSQL database dump complete"
+
 function Get-Backups {
     if (!(Test-Path $BackupDir)) { return @() }
-    return Get-ChildItem -Path $BackupDir -Filter "ck_missive_backup_*" | Sort-Object LastWriteTime -Descending
+    return @(Get-ChildItem -Path $BackupDir -File -Filter "ck_missive_backup_*" |
+        Where-Object { $_.Name -match $DumpNamePattern } |
+        Sort-Object LastWriteTime -Descending)
+}
+
+function Expand-Dump($path) {
+    # 壓縮 dump 先解到暫存 .sql 再餵 psql —— PowerShell 管線以文字傳遞，二進位資料不能直接 pipe
+    if ($path -match '\.sql$') { return $path }
+    $tmp = Join-Path ([System.IO.Path]::GetTempPath()) ("ck_missive_restore_{0}.sql" -f [guid]::NewGuid().ToString("N"))
+    if ($path -match '\.sql\.gz$') {
+        $in = [System.IO.File]::OpenRead($path)
+        $gz = New-Object System.IO.Compression.GZipStream($in, [System.IO.Compression.CompressionMode]::Decompress)
+        $out = [System.IO.File]::Create($tmp)
+        try { $gz.CopyTo($out) } finally { $out.Dispose(); $gz.Dispose(); $in.Dispose() }
+    } elseif ($path -match '\.sql\.zst$') {
+        $zstd = Get-Command zstd -ErrorAction SilentlyContinue
+        if (-not $zstd) {
+            throw "zstd not found in PATH; install zstd, or restore this backup from the admin backup page"
+        }
+        & $zstd.Source -d -q -f $path -o $tmp
+        if ($LASTEXITCODE -ne 0) { throw "zstd -d failed (exit $LASTEXITCODE)" }
+    } else {
+        throw "Unsupported backup file: $path (directory-format .dir backups: see docs/runbooks/disaster-recovery.md)"
+    }
+    return $tmp
 }
 
 if ($List) {
@@ -117,9 +146,20 @@ if ($dockerCheck -ne $ContainerName) {
     exit 1
 }
 
+$SqlFile = $null
 try {
+    $SqlFile = Expand-Dump $BackupFile
+    if ($SqlFile -ne $BackupFile) { Log "Decompressed to: $SqlFile" }
+
+    # 截斷的 dump 還原到一半才斷 —— 先驗結尾完成標記
+    $tail = (Get-Content -Path $SqlFile -Tail 5 -Encoding UTF8) -join "`n"
+    if ($tail -notmatch $DumpTailMarker) {
+        Log "Integrity check FAILED: missing pg_dump completion marker (truncated dump?)" "ERROR"
+        exit 1
+    }
+
     $env:PGPASSWORD = $DbPassword
-    $sqlContent = Get-Content -Path $BackupFile -Raw -Encoding UTF8
+    $sqlContent = Get-Content -Path $SqlFile -Raw -Encoding UTF8
     $sqlContent | docker exec -i $ContainerName psql -U $DbUser -d $DbName 2>&1 | ForEach-Object {
         if ($_ -match "ERROR") { Log $_ "ERROR" }
     }
@@ -129,4 +169,6 @@ try {
 } catch {
     Log "Restore error: $_" "ERROR"
     exit 1
+} finally {
+    if ($SqlFile -and $SqlFile -ne $BackupFile -and (Test-Path $SqlFile)) { Remove-Item $SqlFile -Force }
 }
@@ -64,7 +64,7 @@ function Write-SyncStatus {
         # NAS 實際內容（ground truth）
         $cnt = 0; $latestName = $null; $latestMB = $null; $latestTime = $null
         try {
-            $remote = Get-ChildItem -LiteralPath $Dest -Filter "*.sql" -File -ErrorAction Stop |
+            $remote = Get-ChildItem -LiteralPath $Dest -Filter "*.sql*" -File -ErrorAction Stop |
                       Sort-Object LastWriteTime -Descending
             $cnt = $remote.Count
             if ($cnt -gt 0) {
@@ -140,7 +140,10 @@ if ($milestones) {
 # 2b. robocopy 複製新增/變更的日常備份（/XO 只複製較新；不用 /MIR 保留 NAS 既有）
 #     filter 由 *.sql 收窄為 ck_missive_backup_*.sql —— 否則里程碑會被 2a 與這裡各傳一次，
 #     然後在步驟 3 被輪替刪掉。
-$rcArgs = @($Source, $Dest, "ck_missive_backup_*.sql", "/XO", "/R:2", "/W:5", "/NP", "/NDL", "/NJH")
+#     2026-10-16：容器端預設改為串流壓縮 .sql.zst（另有 .sql.gz / 舊 .sql）並附 .manifest.json，
+#     filter 放寬為 *.sql* 並帶上 manifest（/XF 排除寫入中的 .partial）。
+#     directory 格式（.dir，BACKUP_DB_FORMAT=directory）不在此同步範圍，由容器端 remote_syncer 處理。
+$rcArgs = @($Source, $Dest, "ck_missive_backup_*.sql*", "ck_missive_backup_*.manifest.json", "/XF", "*.partial", "/XO", "/R:2", "/W:5", "/NP", "/NDL", "/NJH")
 if ($DryRun) { $rcArgs += "/L" }
 Log "robocopy $($rcArgs -join ' ')"
 & robocopy @rcArgs | ForEach-Object { if ($_ -match '\S') { Log "  $_" } }
@@ -152,16 +155,19 @@ if ($code -ge 8) {
     exit 1
 }
 
-# 3. 保留最近 N 份（僅刪 dest 超量的舊 .sql）
+# 3. 保留最近 N 份（僅刪 dest 超量的舊 .sql / .sql.gz / .sql.zst）
 if (-not $DryRun) {
     try {
         # 只輪替日常備份。里程碑在 _milestones/ 子目錄，Get-ChildItem 非遞迴故不會掃到，
         # 但仍明確收窄 filter —— 依賴「它剛好掃不到」是下一個人踩的坑。
-        $files = Get-ChildItem -Path $Dest -Filter "ck_missive_backup_*.sql" -File -ErrorAction Stop | Sort-Object LastWriteTime -Descending
+        $files = Get-ChildItem -Path $Dest -Filter "ck_missive_backup_*.sql*" -File -ErrorAction Stop | Sort-Object LastWriteTime -Descending
         if ($files.Count -gt $KeepCount) {
             $files | Select-Object -Skip $KeepCount | ForEach-Object {
                 Log "prune 超量舊備份: $($_.Name)"
                 Remove-Item $_.FullName -Force
+                # 同名 manifest（ck_missive_backup_<ts>.manifest.json）一併移除
+                $manifest = Join-Path $Dest (($_.Name -replace '\.sql(\.gz|\.zst)?$', '') + ".manifest.json")
+                if (Test-Path -LiteralPath $manifest) { Remove-Item -LiteralPath $manifest -Force }
             }
         }
         Log "NAS 現存 dump 份數: $([math]::Min($files.Count, $KeepCount))"
@@ -28,6 +28,8 @@ Windows 排程 `LastTaskResult=0`、NAS 上檔案一天比一天多 —— **全
 **尾端完整性是刻意加的**：截斷的 dump 症狀是「檔案在、大小看起來也還好、
 還原到一半才斷」。只看檔案存不存在、大小合不合理，抓不到它。
 pg_dump 的輸出結尾一定是 `PostgreSQL database dump complete`。
+2026-10-16 起容器端預設輸出壓縮檔（`.sql.zst`，另有 `.sql.gz` / 舊 `.sql`）並附
+`.manifest.json`：份數只算 dump 本體，壓縮檔串流解壓後取尾端驗證（不落地）。
 
 ## 這支不做什麼
 
@@ -43,7 +45,9 @@ pg_dump 的輸出結尾一定是 `PostgreSQL database dump complete`。
 """
 from __future__ import annotations
 
+import gzip
 import os
+import re
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -67,18 +71,48 @@ MIN_DUMPS = 20            # 保留 30 份，低於 20 代表輪替或同步出
 DUMP_MAX_AGE_H = 30       # 每日 02:00 產、03:00 同步 → 逾 30h 就是漏了一天
 SECRETS_MAX_AGE_H = 30
 DUMP_TAIL_MARKER = b"PostgreSQL database dump complete"
+TAIL_BYTES = 4096
+# 日常 dump 本體：.sql / .sql.gz / .sql.zst；不含 .manifest.json 與寫入中的 .partial
+DUMP_NAME_RE = re.compile(r"^ck_missive_backup_(\d{8}_\d{6})\.sql(?:\.gz|\.zst)?$")
 
 
 def _age_hours(p: Path) -> float:
     return (datetime.now() - datetime.fromtimestamp(p.stat().st_mtime)).total_seconds() / 3600
 
 
+def _list_dumps(d: Path) -> list[Path]:
+    return sorted((p for p in d.iterdir() if p.is_file() and DUMP_NAME_RE.match(p.name)),
+                  key=lambda p: p.stat().st_mtime)
+
+
+def _dump_tail(p: Path) -> bytes:
+    """dump 解壓後的最後 TAIL_BYTES；純 .sql 直接 seek，壓縮檔串流解壓只留尾段。"""
+    if p.name.endswith(".sql"):
+        with open(p, "rb") as fh:
+            fh.seek(max(0, p.stat().st_size - TAIL_BYTES))
+            return fh.read()
+    if p.name.endswith(".gz"):
+        stream = gzip.open(p, "rb")
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            # 解不開 ≠ 完整：拒絕把「驗不了」讀成綠燈
+            raise OSError("未安裝 zstandard（pip install zstandard），無法驗證 .sql.zst 尾端")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(p, "rb"), closefd=True)
+    tail = b""
+    with stream:
+        while chunk := stream.read(1 << 20):
+            tail = (tail + chunk)[-TAIL_BYTES:]
+    return tail
+
+
 def check_db(reds: list[str], rows: list[str]) -> None:
     if not DB_DIR.exists():
         reds.append(f"資料庫備份目錄不存在: {DB_DIR}")
         rows.append("  [RED  ] 資料庫 dump        目錄不存在")
         return
-    dumps = sorted(DB_DIR.glob("ck_missive_backup_*.sql"), key=lambda p: p.stat().st_mtime)
+    dumps = _list_dumps(DB_DIR)
     if len(dumps) < MIN_DUMPS:
         reds.append(f"資料庫 dump 只有 {len(dumps)} 份（低於 {MIN_DUMPS}）")
     if not dumps:
@@ -92,17 +126,15 @@ def check_db(reds: list[str], rows: list[str]) -> None:
     # 尾端完整性：截斷的 dump 大小看起來正常，只有結尾看得出來
     tail_ok = False
     try:
-        with open(latest, "rb") as fh:
-            fh.seek(max(0, latest.stat().st_size - 4096))
-            tail_ok = DUMP_TAIL_MARKER in fh.read()
-    except OSError as exc:
+        tail_ok = DUMP_TAIL_MARKER in _dump_tail(latest)
+    except (OSError, EOFError) as exc:
         reds.append(f"無法讀取最新 dump 尾端: {exc}")
     if not tail_ok:
         reds.append(f"最新 dump 尾端缺少完成標記 → 可能截斷（{latest.name}）")
 
     size_mb = latest.stat().st_size / 1024 / 1024
     rows.append(f"  [{'GREEN' if tail_ok and age <= DUMP_MAX_AGE_H else 'RED  '}] "
-                f"資料庫 dump        {len(dumps)} 份｜最新 {latest.name[-19:-4]} "
+                f"資料庫 dump        {len(dumps)} 份｜最新 {DUMP_NAME_RE.match(latest.name).group(1)} "
                 f"({size_mb:.0f}MB, {age:.1f}h 前)｜尾端{'完整' if tail_ok else '不完整'}")
 
 
@@ -175,15 +207,23 @@ def self_test() -> int:
     failed = 0
     tmp = Path(tempfile.mkdtemp())
 
-    # 尾端完整性：完整 vs 截斷
-    good = tmp / "good.sql"
-    good.write_bytes(b"x" * 100 + b"--\n-- PostgreSQL database dump complete\n--\n")
-    bad = tmp / "bad.sql"
+    # 尾端完整性：完整 vs 截斷（純文字與 gzip 壓縮各一組）
+    complete = b"x" * 100 + b"--\n-- PostgreSQL database dump complete\n--\n"
+    good = tmp / "ck_missive_backup_20261016_020000.sql"
+    good.write_bytes(complete)
+    bad = tmp / "ck_missive_backup_20261015_020000.sql"
     bad.write_bytes(b"x" * 200)
-    for label, f, expect in (("完整 dump 不該紅", good, False), ("截斷 dump 必須紅", bad, True)):
-        with open(f, "rb") as fh:
-            fh.seek(max(0, f.stat().st_size - 4096))
-            has = DUMP_TAIL_MARKER in fh.read()
+    good_gz = tmp / "ck_missive_backup_20261014_020000.sql.gz"
+    good_gz.write_bytes(gzip.compress(b"y" * 10_000 + complete))
+    bad_gz = tmp / "ck_missive_backup_20261013_020000.sql.gz"
+    bad_gz.write_bytes(gzip.compress(complete)[:-30])
+    for label, f, expect in (("完整 dump 不該紅", good, False), ("截斷 dump 必須紅", bad, True),
+                             ("完整 .sql.gz 不該紅", good_gz, False),
+                             ("截斷 .sql.gz 必須紅", bad_gz, True)):
+        try:
+            has = DUMP_TAIL_MARKER in _dump_tail(f)
+        except (OSError, EOFError):
+            has = False
         got = not has
         mark = "✓" if got == expect else "✗"
         if got != expect:
@@ -206,12 +246,21 @@ def self_test() -> int:
             failed += 1
         print(f"  {mark} {label:<28} 預期紅={int(expect)} 實際={int(got)}")
 
+    # 份數只算 dump 本體：manifest 與寫入中的 .partial 不得充數
+    (tmp / "ck_missive_backup_20261016_020000.manifest.json").write_text("{}")
+    (tmp / "ck_missive_backup_20261016_030000.sql.zst.partial").write_bytes(b"")
+    got = len(_list_dumps(tmp))
+    mark = "✓" if got == 4 else "✗"
+    if got != 4:
+        failed += 1
+    print(f"  {mark} {'manifest / .partial 不計份數':<28} 預期=4 實際={got}")
+
     import shutil
     shutil.rmtree(tmp, ignore_errors=True)
     if failed:
         print(f"\n✗ 判準有 {failed} 項不符預期")
         return 2
-    print("\n✓ 判準有鑑別力（正向 3 例、負向 3 例）")
+    print("\n✓ 判準有鑑別力（正向 5 例、負向 4 例）")
     return 0
 
 